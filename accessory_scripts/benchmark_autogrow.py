@@ -0,0 +1,1274 @@
+"""
+This script benchmarks the stages of an AutoGrow4 generation which take the
+most time. Each stage is run on fixed inputs, with fixed random seeds, through
+the same functions AutoGrow uses, at 1 to N processors. No network or GPU is
+needed.
+
+The stages are:
+    - smiles_validation: testing the source compounds can be used
+        (operations.test_source_smiles_convert)
+    - mutation: SmilesClickChem mutations of fragments
+    - crossover: SmilesMerge crossovers of pairs of naphthalene derivatives
+    - filter_{name}: each of the ligand filters on its own
+    - diversity: the diversity scores of a population of fragments
+    - gypsum: Gypsum-DL 3D conversion of the PARP inhibitors in PARPi.smi
+    - pdb_to_pdbqt: PDB to PDBQT conversion of ligands with RDKit
+        (--conversion_choice RDKitConversion)
+    - docking: VinaDocking run with a stubbed docking executable which
+        writes the bundled example poses instead of docking. This measures
+        AutoGrow's own docking overhead with the PARP receptor of the tutorial.
+    - vina_scoring, nn1_rescoring and nn2_rescoring: scoring the bundled
+        NNScore example poses
+
+The inputs are taken from /autogrow4/source_compounds/, /autogrow4/tutorial/PARP/
+and the NNScore examples in
+/autogrow4/autogrow/docking/scoring/nn_score_exe/. Nothing is downloaded.
+
+Each stage is run once to start the workers and fill any caches, then timed
+--num_repeats times. The fastest time is used to report the throughput (items
+per second) at each number of processors.
+
+The throughputs are compared to a stored baseline (by default
+/autogrow4/accessory_scripts/benchmark_baseline.json). A stage is flagged as a
+regression if its throughput is more than --tolerance below the baseline for
+the same number of processors. The script exits with a status of 1 if any
+stage regressed or failed. A stage fails if it raises or if every one of its
+items failed, and failed stages are never saved to the baseline. Timings
+depend on the machine, so the baseline should be saved on the machine it will
+be compared on (--save_baseline).
+
+Example submit to save a baseline:
+    python autogrow4/accessory_scripts/benchmark_autogrow.py \
+        --processor_counts 1 2 4 \
+        --save_baseline True
+
+Example submit to compare a change against the baseline:
+    python autogrow4/accessory_scripts/benchmark_autogrow.py \
+        --processor_counts 1 2 4 \
+        --output_json benchmark_results.json
+
+Example submit of only some stages:
+    python autogrow4/accessory_scripts/benchmark_autogrow.py \
+        --stages mutation crossover docking
+"""
+import __future__
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import shutil
+import platform
+import tempfile
+import argparse
+
+import numpy as np
+
+import rdkit
+import rdkit.Chem as Chem
+from rdkit.Chem import AllChem
+
+# Disable the unnecessary RDKit warnings
+rdkit.RDLogger.DisableLog("rdApp.*")
+
+# Benchmark the code of this copy of AutoGrow
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import autogrow.config.defaults as Defaults
+import autogrow.operators.operations as operations
+import autogrow.operators.mutation.smiles_click_chem.smiles_click_chem as SmileClickClass
+import autogrow.operators.mutation.execute_mutations as Mutation
+import autogrow.operators.crossover.smiles_merge.smiles_merge as smiles_merge
+import autogrow.operators.filter.execute_filters as Filter
+import autogrow.operators.convert_files.conversion_to_3d as conversion_to_3d
+import autogrow.operators.convert_files.gypsum_dl.gypsum_dl.MolObjectHandling as MOH
+import autogrow.docking.ranking.ranking_mol as Ranking
+import autogrow.docking.scoring.execute_scoring_mol as Scoring
+from autogrow.operators.filter.filter_classes.parent_filter_class import ParentFilter
+from autogrow.operators.filter.filter_classes.get_child_filter_class import (
+    get_all_subclasses,
+)
+from autogrow.docking.docking_class.docking_file_conversion.convert_with_rdkit import (
+    RDKitConversion,
+)
+from autogrow.docking.docking_class.docking_class_children.vina_docking import (
+    VinaDocking,
+)
+from autogrow.docking.scoring.scoring_classes.scoring_functions.vina import VINA
+from autogrow.docking.scoring.scoring_classes.scoring_functions.nn1 import NN1
+from autogrow.docking.scoring.scoring_classes.scoring_functions.nn2 import NN2
+from autogrow.operators.convert_files.gypsum_dl.gypsum_dl.Parallelizer import (
+    Parallelizer,
+)
+
+AUTOGROW_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_COMPOUNDS_DIR = os.path.join(AUTOGROW_DIR, "source_compounds")
+RECEPTOR_FILE = os.path.join(
+    AUTOGROW_DIR, "tutorial", "PARP", "4r6eA_PARP1_prepared.pdb"
+)
+NN_SCORE_EXE_DIR = os.path.join(
+    AUTOGROW_DIR, "autogrow", "docking", "scoring", "nn_score_exe"
+)
+DEFAULT_BASELINE_FILE = os.path.join(
+    AUTOGROW_DIR, "accessory_scripts", "benchmark_baseline.json"
+)
+
+# The pocket of the PARP receptor used in the tutorial
+DOCKING_BOX = {
+    "center_x": -70.76,
+    "center_y": 21.82,
+    "center_z": 28.33,
+    "size_x": 25.0,
+    "size_y": 16.0,
+    "size_z": 25.0,
+}
+
+# The number of ligands used by the stages which are fast per ligand
+NUM_SOURCE_LIGANDS = 4000
+NUM_DIVERSITY_LIGANDS = 1500
+NUM_SCORING_FILES = 200
+
+# The filter objects of each filter, made once per process
+FILTER_CHILD_DICTS = {}
+
+STUB_DOCKING_EXECUTABLE = """#!{}
+# Stubbed docking executable used by benchmark_autogrow.py. It takes the same
+# arguments as Vina but writes example poses to --out instead of docking.
+import shutil
+import sys
+
+args = sys.argv[1:]
+out_file = args[args.index("--out") + 1]
+shutil.copyfile({}, out_file)
+print("Stubbed docking wrote: " + out_file)
+"""
+
+
+def run_seeded_job(seed, func, *args, **kwargs):
+    """
+    Seed the random number generators and then run a job. Each job has its
+    own seed so the results don't depend on which process runs which job.
+
+    Inputs:
+    :param int seed: the seed for random and numpy.random
+    :param func func: the function to run
+    :param args: the arguments of func
+    :param kwargs: the keyword arguments of func
+
+    Returns:
+    :returns: the result of func
+    """
+
+    random.seed(seed)
+    np.random.seed(seed % (2**32))
+
+    return func(*args, **kwargs)
+
+
+def run_jobs(parallelizer, seed, func, list_of_args, shared_kwargs=None):
+    """
+    Run a function on each set of arguments with the parallelizer, seeding
+    each job.
+
+    Inputs:
+    :param Parallelizer parallelizer: the parallelizer to run the jobs with
+    :param int seed: the seed of the first job. Job i is seeded with seed + i
+    :param func func: the function to run
+    :param list list_of_args: a list of the arguments of each job
+    :param dict shared_kwargs: keyword arguments passed to every job
+
+    Returns:
+    :returns: list results: the result of each job
+    """
+
+    job_input = tuple(
+        [tuple([seed + i, func] + list(args)) for i, args in enumerate(list_of_args)]
+    )
+
+    return parallelizer.run(job_input, run_seeded_job, shared_kwargs=shared_kwargs)
+
+
+#######################################
+# Preparing the inputs
+#######################################
+def read_smi_file(smi_file):
+    """
+    Read the ligands of a .smi file.
+
+    Inputs:
+    :param str smi_file: the path to the .smi file
+
+    Returns:
+    :returns: list ligands: a list of [SMILES, name] lists
+    """
+
+    ligands = []
+    with open(smi_file, "r") as f:
+        for line in f:
+            line = line.replace("\n", "").replace("    ", "\t")
+            parts = [x for x in line.split("\t") if x != ""]
+            if len(parts) < 2:
+                continue
+            ligands.append([parts[0], parts[1]])
+
+    return ligands
+
+
+def write_smi_file(ligands, smi_file):
+    """
+    Write ligands to a .smi file.
+
+    Inputs:
+    :param list ligands: a list of [SMILES, name] lists
+    :param str smi_file: the path to the .smi file
+    """
+
+    with open(smi_file, "w") as f:
+        for smiles, name in ligands:
+            f.write("{}\t{}\n".format(smiles, name))
+
+
+def write_ligand_pdb(smiles, name, pdb_file, seed):
+    """
+    Make a 3D model of a ligand with RDKit and write it to a .pdb file. This
+    is only used to make the inputs of the PDB to PDBQT conversion and docking
+    stages; the Gypsum-DL stage is timed on its own.
+
+    Inputs:
+    :param str smiles: the SMILES string of the ligand
+    :param str name: the name of the ligand
+    :param str pdb_file: the path of the .pdb file to write
+    :param int seed: the seed for the conformer
+
+    Returns:
+    :returns: bool made_pdb: True if the .pdb file was written
+    """
+
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        return False
+    mol = Chem.AddHs(mol)
+    if AllChem.EmbedMolecule(mol, randomSeed=seed) != 0:
+        return False
+    mol.SetProp("_Name", name)
+    Chem.MolToPDBFile(mol, pdb_file)
+
+    return True
+
+
+def prepare_inputs(work_dir, seed):
+    """
+    Make the inputs of every stage in the working folder. Nothing made here
+    is timed.
+
+    Inputs:
+    :param str work_dir: the folder to put the inputs in
+    :param int seed: the random seed
+
+    Returns:
+    :returns: dict inputs: the inputs of each stage
+    """
+
+    inputs = {}
+    source_ligands = []
+    for smi_file in sorted(glob.glob(os.path.join(SOURCE_COMPOUNDS_DIR, "*.smi"))):
+        source_ligands.extend(read_smi_file(smi_file))
+    inputs["source_ligands"] = source_ligands[:NUM_SOURCE_LIGANDS]
+
+    fragments = read_smi_file(
+        os.path.join(SOURCE_COMPOUNDS_DIR, "Fragment_MW_200_to_250.smi")
+    )
+    inputs["diversity_ligands"] = fragments[:NUM_DIVERSITY_LIGANDS]
+
+    naphthalenes = read_smi_file(
+        os.path.join(SOURCE_COMPOUNDS_DIR, "naphthalene_smiles.smi")
+    )
+    brics_fragments = read_smi_file(
+        os.path.join(SOURCE_COMPOUNDS_DIR, "PARPI_BRICS_frags.smi")
+    )
+    parp_inhibitors = read_smi_file(os.path.join(SOURCE_COMPOUNDS_DIR, "PARPi.smi"))
+
+    inputs["mutation_ligands"] = naphthalenes + brics_fragments
+    inputs["crossover_pairs"] = [
+        [naphthalenes[i][0], naphthalenes[i + 1][0]]
+        for i in range(0, len(naphthalenes) - 1)
+    ]
+
+    # Gypsum-DL
+    gypsum_dir = os.path.join(work_dir, "gypsum") + os.sep
+    os.makedirs(gypsum_dir)
+    inputs["gypsum_dir"] = gypsum_dir
+    inputs["gypsum_smi_file"] = gypsum_dir + "PARPi.smi"
+    write_smi_file(parp_inhibitors, inputs["gypsum_smi_file"])
+
+    # PDB to PDBQT conversion
+    pdb_dir = os.path.join(work_dir, "PDBs") + os.sep
+    os.makedirs(pdb_dir)
+    inputs["pdb_files"] = []
+    for i, (smiles, name) in enumerate(parp_inhibitors + naphthalenes):
+        pdb_file = "{}{}__1.pdb".format(pdb_dir, name)
+        if write_ligand_pdb(smiles, name, pdb_file, seed + i) is True:
+            inputs["pdb_files"].append(pdb_file)
+
+    # Docking. Each ligand needs its .pdb and .pdbqt files
+    docking_dir = os.path.join(work_dir, "docking") + os.sep
+    os.makedirs(docking_dir)
+    converter = RDKitConversion(test_boot=True)
+    converter.debug_mode = True
+    inputs["docking_files"] = []
+    for pdb_file in inputs["pdb_files"]:
+        new_pdb_file = docking_dir + os.path.basename(pdb_file)
+        shutil.copyfile(pdb_file, new_pdb_file)
+        did_it_convert, _ = converter.convert_ligand_pdb_file_to_pdbqt(new_pdb_file)
+        if did_it_convert is True:
+            inputs["docking_files"].append(new_pdb_file + "qt")
+
+    nnscore1_examples = os.path.join(NN_SCORE_EXE_DIR, "nnscore1", "examples")
+    example_poses = os.path.join(nnscore1_examples, "myligand.pdbqt")
+    inputs["docking_executable"] = os.path.join(work_dir, "stub_vina.py")
+    with open(inputs["docking_executable"], "w") as f:
+        f.write(STUB_DOCKING_EXECUTABLE.format(sys.executable, repr(example_poses)))
+    os.chmod(inputs["docking_executable"], 0o755)
+
+    # Scoring. Copies of the example poses, each with its ligand (NNScore2
+    # scores the ligand file of each pose file) and a .pdb file with the
+    # REMARK of its SMILES string (the Vina scoring reads the SMILES from it)
+    scoring_dir = os.path.join(work_dir, "scoring") + os.sep
+    os.makedirs(scoring_dir)
+    scoring_ligands = []
+    for i in range(0, NUM_SCORING_FILES):
+        name = "Pose_{}".format(i)
+        smiles = parp_inhibitors[i % len(parp_inhibitors)][0]
+        scoring_ligands.append([smiles, name])
+        with open("{}{}__1.pdb".format(scoring_dir, name), "w") as f:
+            f.write("REMARK Final SMILES string: {}\n".format(smiles))
+        shutil.copyfile(example_poses, "{}{}__1.pdbqt".format(scoring_dir, name))
+        shutil.copyfile(example_poses, "{}{}__1.pdbqt.vina".format(scoring_dir, name))
+    inputs["scoring_dir"] = scoring_dir
+    inputs["scoring_smi_file"] = os.path.join(work_dir, "scoring_ligands.smi")
+    write_smi_file(scoring_ligands, inputs["scoring_smi_file"])
+
+    return inputs
+
+
+def get_benchmark_vars(inputs):
+    """
+    Get the AutoGrow user variables used by the stages. These are AutoGrow's
+    defaults, with the docking and scoring variables of the benchmark.
+
+    Inputs:
+    :param dict inputs: the inputs of each stage from prepare_inputs
+
+    Returns:
+    :returns: dict vars: the user variables
+    """
+
+    vars = Defaults.define_defaults()
+    vars.update(DOCKING_BOX)
+    vars["filename_of_receptor"] = RECEPTOR_FILE
+    vars["docking_executable"] = inputs["docking_executable"]
+    vars["timeout_vs_gtimeout"] = "timeout"
+    vars["debug_mode"] = True
+    vars["nn_rescoring_in_process"] = True
+
+    return vars
+
+
+#######################################
+# The stages
+#######################################
+def benchmark_smiles_validation(inputs, parallelizer, seed):
+    """
+    Test the source compounds can be used, as is done before generation 0.
+
+    Inputs:
+    :param dict inputs: the inputs of each stage from prepare_inputs
+    :param Parallelizer parallelizer: the parallelizer to run the jobs with
+    :param int seed: the random seed
+
+    Returns:
+    :returns: int num_items: the number of ligands tested
+    :returns: int num_failed: the number of ligands which failed
+    """
+
+    list_of_args = [[x] for x in inputs["source_ligands"]]
+    results = run_jobs(
+        parallelizer, seed, operations.test_source_smiles_convert, list_of_args
+    )
+    num_failed = len([x for x in results if type(x) is str])
+
+    return len(list_of_args), num_failed
+
+
+def benchmark_mutation(inputs, parallelizer, seed):
+    """
+    Mutate each ligand once with SmilesClickChem and the default reaction
+    library. The products aren't filtered.
+
+    Inputs:
+    :param dict inputs: the inputs of each stage from prepare_inputs
+    :param Parallelizer parallelizer: the parallelizer to run the jobs with
+    :param int seed: the random seed
+
+    Returns:
+    :returns: int num_items: the number of ligands mutated
+    :returns: int num_failed: the number of ligands which didn't react
+    """
+
+    vars = inputs["vars"]
+    rxn_library_variables = [
+        vars["rxn_library"],
+        vars["rxn_library_file"],
+        vars["function_group_library"],
+        vars["complementary_mol_directory"],
+    ]
+    a_smiles_click_chem_object = SmileClickClass.SmilesClickChem(
+        rxn_library_variables, [], None
+    )
+
+    list_of_args = [[x[0]] for x in inputs["mutation_ligands"]]
+    results = run_jobs(
+        parallelizer,
+        seed,
+        Mutation.run_smiles_click_for_multithread,
+        list_of_args,
+        shared_kwargs={"a_smiles_click_chem_object": a_smiles_click_chem_object},
+    )
+    num_failed = len([x for x in results if x is None])
+
+    return len(list_of_args), num_failed
+
+
+def benchmark_crossover(inputs, parallelizer, seed):
+    """
+    Merge each pair of ligands with SmilesMerge. The MCS of each pair is found
+    in the job.
+
+    Inputs:
+    :param dict inputs: the inputs of each stage from prepare_inputs
+    :param Parallelizer parallelizer: the parallelizer to run the jobs with
+    :param int seed: the random seed
+
+    Returns:
+    :returns: int num_items: the number of pairs merged
+    :returns: int num_failed: the number of pairs which failed to merge
+    """
+
+    temp_vars = {}
+    for key in list(inputs["vars"].keys()):
+        if key == "parallelizer":
+            continue
+        temp_vars[key] = inputs["vars"][key]
+
+    list_of_args = [
+        [temp_vars, smiles_1, smiles_2]
+        for smiles_1, smiles_2 in inputs["crossover_pairs"]
+    ]
+    results = run_jobs(
+        parallelizer, seed, smiles_merge.run_main_smiles_merge, list_of_args
+    )
+    num_failed = len([x for x in results if x is None or x is False])
+
+    return len(list_of_args), num_failed
+
+
+def run_single_filter(smiles, filter_name):
+    """
+    Run a single filter on a SMILES string, preparing the mol as
+    execute_filters.run_filter_on_just_smiles does. FILTER_RESULT_CACHE isn't
+    used so every ligand is filtered in every repeat.
+
+    A ligand the filter rejects hasn't failed: the filter ran on it. Only
+    ligands which can't be prepared for the filter fail.
+
+    Inputs:
+    :param str smiles: the SMILES string
+    :param str filter_name: the name of the filter class. ie. 'LipinskiStrictFilter'
+
+    Returns:
+    :returns: bool passed: True if the ligand passed the filter. None if the
+        mol couldn't be sanitized and deprotonated.
+    """
+
+    if filter_name not in FILTER_CHILD_DICTS:
+        FILTER_CHILD_DICTS[filter_name] = Filter.make_run_class_dict([filter_name])
+    child_dict = FILTER_CHILD_DICTS[filter_name]
+
+    mol = Chem.MolFromSmiles(smiles, sanitize=False)
+    mol = MOH.check_sanitization(mol)
+    if mol is None:
+        return None
+    mol = MOH.try_deprotanation(mol)
+    if mol is None:
+        return None
+
+    return Filter.run_filters_on_sanitized_mol(mol, child_dict)
+
+
+def get_filter_names():
+    """
+    Get the names of all of the ligand filters.
+
+    Returns:
+    :returns: list filter_names: the names of the filter classes
+    """
+
+    return sorted([x().get_name() for x in get_all_subclasses(ParentFilter)])
+
+
+def make_filter_benchmark(filter_name):
+    """
+    Make the benchmark function of a filter.
+
+    Inputs:
+    :param str filter_name: the name of the filter class
+
+    Returns:
+    :returns: func benchmark_filter: the benchmark function of the filter
+    """
+
+    def benchmark_filter(inputs, parallelizer, seed):
+        """
+        Run the filter on each of the source ligands.
+
+        Inputs:
+        :param dict inputs: the inputs of each stage from prepare_inputs
+        :param Parallelizer parallelizer: the parallelizer to run the jobs with
+        :param int seed: the random seed
+
+        Returns:
+        :returns: int num_items: the number of ligands filtered
+        :returns: int num_failed: the number of ligands which couldn't be
+            prepared for the filter
+        """
+
+        list_of_args = [[x[0], filter_name] for x in inputs["source_ligands"]]
+        results = run_jobs(parallelizer, seed, run_single_filter, list_of_args)
+        num_failed = len([x for x in results if x is None])
+
+        return len(list_of_args), num_failed
+
+    return benchmark_filter
+
+
+def benchmark_diversity(inputs, parallelizer, seed):
+    """
+    Score the diversity of a population. The population is large enough for
+    the similarity sums to be split across the parallelizer.
+
+    Inputs:
+    :param dict inputs: the inputs of each stage from prepare_inputs
+    :param Parallelizer parallelizer: the parallelizer to run the jobs with
+    :param int seed: the random seed
+
+    Returns:
+    :returns: int num_items: the number of ligands scored
+    :returns: int num_failed: always 0
+    """
+
+    molecules_list = [list(x) for x in inputs["diversity_ligands"]]
+    Ranking.score_and_append_diversity_scores(
+        molecules_list, parallelizer, inputs["vars"]["diversity_fingerprint"]
+    )
+
+    return len(molecules_list), 0
+
+
+def benchmark_gypsum(inputs, parallelizer, seed):
+    """
+    Convert ligands from SMILES to 3D SDFs with Gypsum-DL, in the batches
+    AutoGrow uses.
+
+    Inputs:
+    :param dict inputs: the inputs of each stage from prepare_inputs
+    :param Parallelizer parallelizer: the parallelizer to run the jobs with
+    :param int seed: the random seed
+
+    Returns:
+    :returns: int num_items: the number of ligands converted
+    :returns: int num_failed: the number of ligands which failed to convert
+    """
+
+    vars = dict(inputs["vars"])
+    vars["parallelizer"] = parallelizer
+    _, job_input = conversion_to_3d.make_gypsum_batch_job_inputs(
+        vars, inputs["gypsum_smi_file"], inputs["gypsum_dir"]
+    )
+
+    results = run_jobs(parallelizer, seed, conversion_to_3d.run_gypsum_batch, job_input)
+    num_items = sum([len(x[2]) for x in job_input])
+    num_failed = sum([len(x) for x in results])
+
+    return num_items, num_failed
+
+
+def convert_pdb_to_pdbqt(pdb_file, file_conversion_class_object):
+    """
+    Convert a ligand from PDB to PDBQT, removing the PDBQT of a previous
+    repeat first.
+
+    Inputs:
+    :param str pdb_file: the path to the .pdb file
+    :param obj file_conversion_class_object: the RDKitConversion object
+
+    Returns:
+    :returns: bool did_it_convert: True if the .pdbqt was written
+    """
+
+    if os.path.exists(pdb_file + "qt"):
+        os.remove(pdb_file + "qt")
+    did_it_convert, _ = file_conversion_class_object.convert_ligand_pdb_file_to_pdbqt(
+        pdb_file
+    )
+
+    return did_it_convert
+
+
+def benchmark_pdb_to_pdbqt(inputs, parallelizer, seed):
+    """
+    Convert ligands from PDB to PDBQT with RDKit.
+
+    Inputs:
+    :param dict inputs: the inputs of each stage from prepare_inputs
+    :param Parallelizer parallelizer: the parallelizer to run the jobs with
+    :param int seed: the random seed
+
+    Returns:
+    :returns: int num_items: the number of ligands converted
+    :returns: int num_failed: the number of ligands which failed to convert
+    """
+
+    file_conversion_class_object = RDKitConversion(test_boot=True)
+    file_conversion_class_object.debug_mode = True
+
+    list_of_args = [[x] for x in inputs["pdb_files"]]
+    results = run_jobs(
+        parallelizer,
+        seed,
+        convert_pdb_to_pdbqt,
+        list_of_args,
+        shared_kwargs={"file_conversion_class_object": file_conversion_class_object},
+    )
+    num_failed = len([x for x in results if x is not True])
+
+    return len(list_of_args), num_failed
+
+
+def run_stub_docking(pdbqt_file, dock_class):
+    """
+    Dock a ligand with the stubbed docking executable, removing the poses of
+    a previous repeat first.
+
+    Inputs:
+    :param str pdbqt_file: the path to the ligand's .pdbqt file
+    :param obj dock_class: the VinaDocking object
+
+    Returns:
+    :returns: str smile_name: the name of the ligand if it failed to dock.
+        None if it docked.
+    """
+
+    if os.path.exists(pdbqt_file + ".vina"):
+        os.remove(pdbqt_file + ".vina")
+
+    return dock_class.run_dock(pdbqt_file)
+
+
+def benchmark_docking(inputs, parallelizer, seed):
+    """
+    Dock ligands with VinaDocking and the stubbed docking executable.
+
+    Inputs:
+    :param dict inputs: the inputs of each stage from prepare_inputs
+    :param Parallelizer parallelizer: the parallelizer to run the jobs with
+    :param int seed: the random seed
+
+    Returns:
+    :returns: int num_items: the number of ligands docked
+    :returns: int num_failed: the number of ligands which failed to dock
+    """
+
+    temp_vars = {}
+    for key in list(inputs["vars"].keys()):
+        if key == "parallelizer":
+            continue
+        temp_vars[key] = inputs["vars"][key]
+
+    file_conversion_class_object = RDKitConversion(test_boot=True)
+    file_conversion_class_object.debug_mode = True
+    dock_class = VinaDocking(test_boot=True)
+    dock_class.vars = temp_vars
+    dock_class.debug_mode = True
+    dock_class.file_conversion_class_object = file_conversion_class_object
+    dock_class.receptor_pdbqt_file = RECEPTOR_FILE + "qt"
+
+    list_of_args = [[x] for x in inputs["docking_files"]]
+    results = run_jobs(
+        parallelizer,
+        seed,
+        run_stub_docking,
+        list_of_args,
+        shared_kwargs={"dock_class": dock_class},
+    )
+    num_failed = len([x for x in results if x is not None])
+
+    return len(list_of_args), num_failed
+
+
+def get_scoring_object(scoring_class, inputs, receptor_file):
+    """
+    Make a scoring object for the example poses, as
+    execute_scoring_mol.run_scoring_common does.
+
+    Inputs:
+    :param class scoring_class: the scoring class. ie. VINA
+    :param dict inputs: the inputs of each stage from prepare_inputs
+    :param str receptor_file: the path to the receptor's .pdb file. Its
+        .pdbqt file must be next to it.
+
+    Returns:
+    :returns: obj scoring_object: the scoring object
+    :returns: list files_to_score: the pose files to score
+    """
+
+    temp_vars = {}
+    for key in list(inputs["vars"].keys()):
+        if key == "parallelizer":
+            continue
+        temp_vars[key] = inputs["vars"][key]
+    temp_vars["filename_of_receptor"] = receptor_file
+
+    smiles_dict = Scoring.make_dict_of_smiles(inputs["scoring_smi_file"])
+    scoring_object = scoring_class(temp_vars, smiles_dict, test_boot=False)
+    files_to_score = sorted(scoring_object.find_files_to_score(inputs["scoring_dir"]))
+
+    return scoring_object, files_to_score
+
+
+def benchmark_vina_scoring(inputs, parallelizer, seed):
+    """
+    Get the Vina score of each example pose file.
+
+    Inputs:
+    :param dict inputs: the inputs of each stage from prepare_inputs
+    :param Parallelizer parallelizer: the parallelizer to run the jobs with
+    :param int seed: the random seed
+
+    Returns:
+    :returns: int num_items: the number of files scored
+    :returns: int num_failed: the number of files which failed to score
+    """
+
+    scoring_object, files_to_score = get_scoring_object(VINA, inputs, RECEPTOR_FILE)
+
+    list_of_args = [[scoring_object, x, False, None] for x in files_to_score]
+    results = run_jobs(
+        parallelizer, seed, Scoring.score_files_multithread, list_of_args
+    )
+    num_failed = len([x for x in results if x is None])
+
+    return len(list_of_args), num_failed
+
+
+def make_rescoring_benchmark(scoring_class, nnscore_dir):
+    """
+    Make the benchmark function of a NNScore rescoring function.
+
+    Inputs:
+    :param class scoring_class: the scoring class. ie. NN1
+    :param str nnscore_dir: the NNScore folder with the example receptor. ie.
+        'nnscore1'
+
+    Returns:
+    :returns: func benchmark_rescoring: the benchmark function
+    """
+
+    def benchmark_rescoring(inputs, parallelizer, seed):
+        """
+        Rescore the example pose files in the batches AutoGrow uses, one batch
+        per processor.
+
+        Inputs:
+        :param dict inputs: the inputs of each stage from prepare_inputs
+        :param Parallelizer parallelizer: the parallelizer to run the jobs with
+        :param int seed: the random seed
+
+        Returns:
+        :returns: int num_items: the number of files rescored
+        :returns: int num_failed: the number of files which failed to rescore
+        """
+
+        receptor_file = os.path.join(
+            NN_SCORE_EXE_DIR, nnscore_dir, "examples", "myreceptor.pdb"
+        )
+        scoring_object, files_to_score = get_scoring_object(
+            scoring_class, inputs, receptor_file
+        )
+
+        list_of_args = [
+            [batch, scoring_object]
+            for batch in Scoring.split_into_batches(
+                files_to_score, parallelizer.return_node()
+            )
+        ]
+        results = run_jobs(
+            parallelizer, seed, Scoring.rescore_batch_of_files, list_of_args
+        )
+        num_failed = len([x for batch in results for x in batch if x[1] is False])
+
+        return len(files_to_score), num_failed
+
+    return benchmark_rescoring
+
+
+def get_stages():
+    """
+    Get the stages to benchmark, in the order they are run in a generation.
+
+    Returns:
+    :returns: list stages: a list of [stage name, benchmark function] lists
+    """
+
+    stages = [
+        ["smiles_validation", benchmark_smiles_validation],
+        ["mutation", benchmark_mutation],
+        ["crossover", benchmark_crossover],
+    ]
+    for filter_name in get_filter_names():
+        stages.append(["filter_" + filter_name, make_filter_benchmark(filter_name)])
+    stages.extend(
+        [
+            ["diversity", benchmark_diversity],
+            ["gypsum", benchmark_gypsum],
+            ["pdb_to_pdbqt", benchmark_pdb_to_pdbqt],
+            ["docking", benchmark_docking],
+            ["vina_scoring", benchmark_vina_scoring],
+            ["nn1_rescoring", make_rescoring_benchmark(NN1, "nnscore1")],
+            ["nn2_rescoring", make_rescoring_benchmark(NN2, "nnscore2")],
+        ]
+    )
+
+    return stages
+
+
+#######################################
+# Timing and reporting
+#######################################
+def time_stage(benchmark_func, inputs, parallelizer, seed, num_repeats):
+    """
+    Run a stage once untimed, to start the workers and fill any caches, and
+    then time it num_repeats times. A stage where every item failed is timing
+    how fast it fails, not how fast it works, so it raises an exception.
+
+    Inputs:
+    :param func benchmark_func: the benchmark function of the stage
+    :param dict inputs: the inputs of each stage from prepare_inputs
+    :param Parallelizer parallelizer: the parallelizer to run the jobs with
+    :param int seed: the random seed
+    :param int num_repeats: the number of times to time the stage
+
+    Returns:
+    :returns: dict result: the number of items, the number which failed, the
+        fastest time in seconds and the throughput in items per second
+    """
+
+    benchmark_func(inputs, parallelizer, seed)
+
+    times = []
+    for i in range(0, num_repeats):
+        start = time.perf_counter()
+        num_items, num_failed = benchmark_func(inputs, parallelizer, seed)
+        times.append(time.perf_counter() - start)
+
+    if num_items > 0 and num_failed == num_items:
+        raise Exception("all {} of its items failed".format(num_items))
+
+    best_time = min(times)
+    return {
+        "items": num_items,
+        "failures": num_failed,
+        "seconds": best_time,
+        "throughput": num_items / best_time if best_time > 0 else 0.0,
+    }
+
+
+def get_machine_info():
+    """
+    Get a description of the machine the benchmark was run on.
+
+    Returns:
+    :returns: dict machine_info: the machine's details
+    """
+
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "rdkit": rdkit.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Compare the throughputs to the baseline. Stages where every item failed
+    in the baseline aren't compared.
+
+    Inputs:
+    :param dict results: the results by stage and number of processors
+    :param dict baseline: the results of the baseline
+    :param float tolerance: the fraction the throughput can fall below the
+        baseline before it is flagged as a regression
+
+    Returns:
+    :returns: dict comparisons: the ratio of the throughput to the baseline,
+        by stage and number of processors. None if it isn't in the baseline.
+    :returns: list regressions: a list of [stage, num_processors, ratio] for
+        each regression
+    """
+
+    comparisons = {}
+    regressions = []
+    for stage, stage_results in results.items():
+        comparisons[stage] = {}
+        for num_processors, result in stage_results.items():
+            comparisons[stage][num_processors] = None
+            if result is None:
+                continue
+            try:
+                baseline_result = baseline["results"][stage][num_processors]
+            except (KeyError, TypeError):
+                continue
+            if baseline_result is None or baseline_result["throughput"] <= 0:
+                continue
+            if baseline_result["failures"] == baseline_result["items"]:
+                continue
+
+            ratio = result["throughput"] / baseline_result["throughput"]
+            comparisons[stage][num_processors] = ratio
+            if ratio < 1.0 - tolerance:
+                regressions.append([stage, num_processors, ratio])
+
+    return comparisons, regressions
+
+
+def print_report(results, comparisons, tolerance):
+    """
+    Print the throughput of each stage at each number of processors.
+
+    Inputs:
+    :param dict results: the results by stage and number of processors
+    :param dict comparisons: the ratios to the baseline from
+        compare_to_baseline
+    :param float tolerance: the regression tolerance
+    """
+
+    print("")
+    print("######################")
+    print(
+        "{:<34} {:>6} {:>8} {:>10} {:>14} {:>9} {:>12}".format(
+            "stage",
+            "procs",
+            "items",
+            "failures",
+            "items/second",
+            "speedup",
+            "vs_baseline",
+        )
+    )
+    for stage, stage_results in results.items():
+        single_processor = stage_results.get("1")
+        for num_processors, result in stage_results.items():
+            if result is None:
+                print("{:<34} {:>6} FAILED".format(stage, num_processors))
+                continue
+
+            speedup = ""
+            if single_processor is not None and single_processor["throughput"] > 0:
+                speedup = "{:.2f}x".format(
+                    result["throughput"] / single_processor["throughput"]
+                )
+
+            ratio = comparisons[stage][num_processors]
+            vs_baseline = ""
+            if ratio is not None:
+                vs_baseline = "{:+.1f}%".format((ratio - 1.0) * 100)
+                if ratio < 1.0 - tolerance:
+                    vs_baseline = vs_baseline + " REGRESSION"
+
+            print(
+                "{:<34} {:>6} {:>8} {:>10} {:>14.2f} {:>9} {:>12}".format(
+                    stage,
+                    num_processors,
+                    result["items"],
+                    result["failures"],
+                    result["throughput"],
+                    speedup,
+                    vs_baseline,
+                )
+            )
+    print("######################")
+    print("")
+
+
+def run_main(vars):
+    """
+    Run the benchmark of each stage at each number of processors, report the
+    throughputs and compare them to the baseline. Stages which failed aren't
+    saved to the baseline.
+
+    Inputs:
+    :param dict vars: dictionary of user variables.
+
+    Returns:
+    :returns: list regressions: a list of [stage, num_processors, ratio] for
+        each stage which regressed
+    :returns: list failed_stages: a list of [stage, num_processors] for each
+        stage which failed
+    """
+
+    random.seed(vars["seed"])
+    np.random.seed(vars["seed"])
+
+    stages = get_stages()
+    if vars["stages"] is not None:
+        stage_names = [x[0] for x in stages]
+        for stage in vars["stages"]:
+            if stage not in stage_names:
+                raise Exception(
+                    "Unknown stage {}. Choose from: {}".format(stage, stage_names)
+                )
+        stages = [x for x in stages if x[0] in vars["stages"]]
+
+    if vars["work_dir"] is None:
+        work_dir = tempfile.mkdtemp(prefix="autogrow_benchmark_")
+        # AutoGrow finds a ligand's .pdb file by removing every "qt" from the
+        # path of its .pdbqt file, so the folder can't contain "qt"
+        while "qt" in work_dir:
+            os.rmdir(work_dir)
+            work_dir = tempfile.mkdtemp(prefix="autogrow_benchmark_")
+    else:
+        work_dir = vars["work_dir"]
+        if os.path.exists(work_dir) is True:
+            raise Exception("--work_dir already exists: {}".format(work_dir))
+        os.makedirs(work_dir)
+
+    results = {}
+    failed_stages = []
+    try:
+        print("Preparing the benchmark inputs in: {}".format(work_dir))
+        inputs = prepare_inputs(work_dir, vars["seed"])
+        inputs["vars"] = get_benchmark_vars(inputs)
+
+        for stage, _ in stages:
+            results[stage] = {}
+
+        for num_processors in vars["processor_counts"]:
+            parallelizer = Parallelizer("multiprocessing", num_processors, True)
+            try:
+                for stage, benchmark_func in stages:
+                    print(
+                        "Benchmarking {} with {} processors".format(
+                            stage, num_processors
+                        )
+                    )
+                    try:
+                        result = time_stage(
+                            benchmark_func,
+                            inputs,
+                            parallelizer,
+                            vars["seed"],
+                            vars["num_repeats"],
+                        )
+                    except Exception as e:
+                        printout = "ERROR: Benchmark of {} with {} processors "
+                        printout = printout + "failed: {}"
+                        print(printout.format(stage, num_processors, e))
+                        failed_stages.append([stage, str(num_processors)])
+                        result = None
+                    results[stage][str(num_processors)] = result
+            finally:
+                parallelizer.end()
+    finally:
+        if vars["work_dir"] is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = {
+        "machine": get_machine_info(),
+        "seed": vars["seed"],
+        "num_repeats": vars["num_repeats"],
+        "results": results,
+    }
+
+    baseline = None
+    if os.path.exists(vars["baseline_file"]) is True:
+        with open(vars["baseline_file"], "r") as f:
+            baseline = json.load(f)
+        if baseline["machine"]["cpu_count"] != output["machine"]["cpu_count"]:
+            print(
+                "WARNING: The baseline was run on a different machine: {}".format(
+                    baseline["machine"]
+                )
+            )
+
+    comparisons, regressions = compare_to_baseline(results, baseline, vars["tolerance"])
+    print_report(results, comparisons, vars["tolerance"])
+
+    if vars["output_json"] is not None:
+        with open(vars["output_json"], "w") as f:
+            json.dump(output, f, indent=4)
+        print("Results saved to: {}".format(vars["output_json"]))
+
+    if vars["save_baseline"] is True:
+        baseline_results = {}
+        for stage, stage_results in results.items():
+            stage_results = {
+                num_processors: result
+                for num_processors, result in stage_results.items()
+                if result is not None
+            }
+            if len(stage_results) != 0:
+                baseline_results[stage] = stage_results
+        output["results"] = baseline_results
+        with open(vars["baseline_file"], "w") as f:
+            json.dump(output, f, indent=4)
+        print("Baseline saved to: {}".format(vars["baseline_file"]))
+        if len(failed_stages) != 0:
+            print("The stages which failed were left out of the baseline.")
+    elif baseline is None:
+        print(
+            "No baseline found at {}. Run with --save_baseline to make one.".format(
+                vars["baseline_file"]
+            )
+        )
+    elif len(regressions) != 0:
+        print("Stages which regressed more than {:.0%}:".format(vars["tolerance"]))
+        for stage, num_processors, ratio in regressions:
+            print(
+                "\t{} with {} processors: {:.1f}% of the baseline".format(
+                    stage, num_processors, ratio * 100
+                )
+            )
+    else:
+        print("No regressions found")
+
+    if len(failed_stages) != 0:
+        print("ERROR: These stages failed:")
+        for stage, num_processors in failed_stages:
+            print("\t{} with {} processors".format(stage, num_processors))
+
+    return regressions, failed_stages
+
+
+def get_arguments_from_argparse(arg_dict):
+    """
+    This function handles the arg parser arguments for the script.
+
+    Inputs:
+    :param dict arg_dict: dictionary of parameters
+    Returns:
+    :returns: dict arg_dict: dictionary of parameters
+    """
+
+    if arg_dict["processor_counts"] is None:
+        # 1, 2, 4, ... up to all of the processors
+        max_processors = os.cpu_count() or 1
+        processor_counts = [1]
+        while processor_counts[-1] * 2 < max_processors:
+            processor_counts.append(processor_counts[-1] * 2)
+        if processor_counts[-1] != max_processors:
+            processor_counts.append(max_processors)
+        arg_dict["processor_counts"] = processor_counts
+
+    for num_processors in arg_dict["processor_counts"]:
+        if num_processors < 1:
+            raise Exception("--processor_counts must all be 1 or more")
+
+    if arg_dict["num_repeats"] < 1:
+        raise Exception("--num_repeats must be 1 or more")
+
+    if arg_dict["tolerance"] < 0.0 or arg_dict["tolerance"] >= 1.0:
+        raise Exception("--tolerance must be from 0.0 up to 1.0")
+
+    if arg_dict["save_baseline"] in [True, "true", "True"]:
+        arg_dict["save_baseline"] = True
+    else:
+        arg_dict["save_baseline"] = False
+
+    arg_dict["baseline_file"] = os.path.abspath(arg_dict["baseline_file"])
+    if arg_dict["output_json"] is not None:
+        arg_dict["output_json"] = os.path.abspath(arg_dict["output_json"])
+    if arg_dict["work_dir"] is not None:
+        arg_dict["work_dir"] = os.path.abspath(arg_dict["work_dir"])
+
+    return arg_dict
+
+
+# Argument parsing
+PARSER = argparse.ArgumentParser()
+PARSER.add_argument(
+    "--processor_counts",
+    type=int,
+    nargs="+",
+    default=None,
+    help="The numbers of processors to benchmark each stage with. \
+    Defaults to 1, 2, 4, ... up to the number of processors of the machine.",
+)
+PARSER.add_argument(
+    "--stages",
+    type=str,
+    nargs="+",
+    default=None,
+    help="The stages to benchmark. Defaults to every stage.",
+)
+PARSER.add_argument(
+    "--num_repeats",
+    type=int,
+    default=3,
+    help="The number of times each stage is timed. The fastest time is used.",
+)
+PARSER.add_argument(
+    "--seed", type=int, default=1, help="The random seed. Defaults to 1."
+)
+PARSER.add_argument(
+    "--baseline_file",
+    type=str,
+    default=DEFAULT_BASELINE_FILE,
+    help="The path to the baseline .json file to compare to or save. \
+    Defaults to autogrow4/accessory_scripts/benchmark_baseline.json",
+)
+PARSER.add_argument(
+    "--save_baseline",
+    choices=[True, False, "True", "False", "true", "false"],
+    default=False,
+    help="If True the results are saved as the new baseline.",
+)
+PARSER.add_argument(
+    "--tolerance",
+    type=float,
+    default=0.2,
+    help="How far below the baseline throughput a stage can fall before it \
+    is flagged as a regression, as a fraction. Defaults to 0.2 (20%%).",
+)
+PARSER.add_argument(
+    "--output_json",
+    type=str,
+    default=None,
+    help="Path to a .json file to save the results to.",
+)
+PARSER.add_argument(
+    "--work_dir",
+    type=str,
+    default=None,
+    help="A new folder to make the inputs in. It is kept after the \
+    benchmark. Defaults to a temporary folder which is deleted.",
+)
+
+if __name__ == "__main__":
+    ARGS_DICT = vars(PARSER.parse_args())
+    ARGS_DICT = get_arguments_from_argparse(ARGS_DICT)
+    REGRESSIONS, FAILED_STAGES = run_main(ARGS_DICT)
+    if len(REGRESSIONS) != 0 or len(FAILED_STAGES) != 0:
+        sys.exit(1)
@@ -0,0 +1,107 @@
+"""
+This script builds the line indexes of a complementary molecule library.
+
+Mutation picks random complementary molecules through a line index saved next
+to each .smi file ({file}.smi.idx.npy), so it does not need to read the whole
+file for every pick. AutoGrow builds any missing or out-of-date indexes when
+it starts mutating, but this script can build them ahead of time. This is
+useful if AutoGrow will be run from a read-only install or if a custom
+complementary_mol_directory is shared by many runs.
+
+An index is only rebuilt if it is older than its .smi file, unless --force is
+used.
+
+Example submit:
+
+python autogrow4/accessory_scripts/index_complementary_mol_library.py \
+--complementary_mol_directory \
+autogrow4/autogrow/operators/mutation/smiles_click_chem/reaction_libraries/all_rxns/complementary_mol_dir
+"""
+import __future__
+
+import os
+import sys
+import glob
+import argparse
+
+# Use the same index format as AutoGrow
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import autogrow.operators.mutation.smiles_click_chem.complementary_mol_library as ComplementaryMolLibrary
+
+
+def run_main(vars):
+    """
+    Build the line index of every .smi file in the complementary_mol_directory.
+
+    Inputs:
+    :param dict vars: dictionary of user variables.
+    """
+
+    smi_files = glob.glob(vars["complementary_mol_directory"] + "*.smi")
+    smi_files.sort()
+    if len(smi_files) == 0:
+        raise Exception(
+            "No .smi files were found in {}".format(
+                vars["complementary_mol_directory"]
+            )
+        )
+
+    for smi_file in smi_files:
+        if vars["force"] is False and ComplementaryMolLibrary.index_is_current(
+            smi_file
+        ):
+            print("Index is up to date: {}".format(smi_file))
+            continue
+        ComplementaryMolLibrary.write_line_index(smi_file)
+        print("Indexed: {}".format(smi_file))
+
+    print("Finished indexing {} .smi files".format(len(smi_files)))
+
+
+def get_arguments_from_argparse(args_dict):
+    """
+    This function handles the arg parser arguments for the script.
+
+    Inputs:
+    :param dict args_dict: dictionary of parameters
+    Returns:
+    :returns: dict args_dict: dictionary of parameters
+    """
+
+    if os.path.isdir(args_dict["complementary_mol_directory"]) is False:
+        raise Exception(
+            "--complementary_mol_directory could not be found: {}".format(
+                args_dict["complementary_mol_directory"]
+            )
+        )
+    args_dict["complementary_mol_directory"] = (
+        os.path.abspath(args_dict["complementary_mol_directory"]) + os.sep
+    )
+
+    if args_dict["force"] in [True, "True", "true"]:
+        args_dict["force"] = True
+    else:
+        args_dict["force"] = False
+
+    return args_dict
+
+
+# Argument parsing
+PARSER = argparse.ArgumentParser()
+PARSER.add_argument(
+    "--complementary_mol_directory",
+    "-i",
+    type=str,
+    required=True,
+    help="Path to the directory of complementary molecule .smi files to index.",
+)
+PARSER.add_argument(
+    "--force",
+    choices=[True, False, "True", "False", "true", "false"],
+    default=False,
+    help="Rebuild every index, even if it is up to date.",
+)
+
+ARGS_DICT = vars(PARSER.parse_args())
+ARGS_DICT = get_arguments_from_argparse(ARGS_DICT)
+run_main(ARGS_DICT)
@@ -13,6 +13,8 @@ import shutil
 import autogrow.docking.execute_docking as DockingClass
 import autogrow.operators.operations as operations
 import autogrow.docking.concatenate_files as concatenate_files
+import autogrow.utils.checkpoint_journal as CheckpointJournal
+import autogrow.utils.stage_metrics as StageMetrics
 
 
 def main_execute(vars):
@@ -30,7 +32,9 @@ def main_execute(vars):
     num_gens_to_make = vars["num_generations"]
 
     # Determine what was the last completed generation in the Run directory
-    last_generation = determine_current_gen(output_directory)
+    last_generation = determine_current_gen(
+        output_directory, vars["checkpoint_journal"]
+    )
     if last_generation is None:
         # Check to see if there's a Run 0 based on the seed.
         if vars["use_docked_source_compounds"] is True:
@@ -73,6 +77,17 @@ def main_execute(vars):
         print(current_generation_dir)
         sys.stdout.flush()
 
+        if vars["checkpoint_journal"] is True:
+            # Record the work finished in this generation so it can be
+            # resumed if this run is stopped before the generation finishes
+            CheckpointJournal.start_journal(current_generation_dir)
+
+        # Record the time, throughput and failures of each stage. They are
+        # saved to generation_N_metrics.json/.csv when the generation ends
+        StageMetrics.start_generation(
+            current_generation_number, current_generation_dir, vars["profile_stages"]
+        )
+
         if (
             current_generation_number == 0
             and vars["use_docked_source_compounds"] is True
@@ -148,7 +163,12 @@ def main_execute(vars):
             job_input = tuple(
                 [tuple([x]) for x in files_to_del if os.path.isfile(x) is True]
             )
-            vars["parallelizer"].run(job_input, delete_temporary_files_and_folders)
+            StageMetrics.run_jobs(
+                vars["parallelizer"],
+                "delete_temporary_files",
+                job_input,
+                delete_temporary_files_and_folders,
+            )
             # Delete Folders in an ordered manor incase folders are nested
             for i in range(0, len(folders_to_del)):
                 delete_temporary_files_and_folders(folders_to_del[i])
@@ -160,13 +180,17 @@ def main_execute(vars):
             # data
             pdbs_folder = "{}{}PDBs{}".format(current_generation_dir, os.sep, os.sep)
             if os.path.exists(pdbs_folder) is True:
-                concatenate_files.run_concatenation(vars["parallelizer"], pdbs_folder)
+                with StageMetrics.time_stage("reduce_files_sizes"):
+                    concatenate_files.run_concatenation(
+                        vars["parallelizer"], pdbs_folder
+                    )
             else:
                 print(
                     "\nNo PDB folder to concatenate and compress. This is likely generation 0 seeded with a Ranked .smi file.\n"
                 )
         print("")
         print("Finished generation ", current_generation_number)
+        StageMetrics.save_generation(current_generation_dir)
 
         sys.stdout.flush()
 
@@ -189,7 +213,7 @@ def main_execute(vars):
     sys.stdout.flush()
 
 
-def determine_current_gen(output_directory):
+def determine_current_gen(output_directory, resume_from_journal=False):
     """
     Check if there has been any previous runs in the output directory. Returns
     an integer of the last completed generation folder. The last completed
@@ -211,9 +235,15 @@ def determine_current_gen(output_directory):
     -if Path/generation_3_Failed_0 already exists it will be name
     Path/generation_3_Failed_1 or so on until unique
 
+    If resume_from_journal is True and the failed generation has a checkpoint
+    journal (see checkpoint_journal.py), the generation is kept and resumed
+    rather than renamed.
+
     Inputs:
     :param str output_directory: is the path of the Run folder within root
         output folder.
+    :param bool resume_from_journal: if True resume a generation which failed
+        to complete if it has a checkpoint journal. Defaults to False.
 
     Returns:
     :returns: int last_gen_number: the int of the last generation number or
@@ -255,6 +285,18 @@ def determine_current_gen(output_directory):
         )
         print(printout)
 
+        if resume_from_journal is True and CheckpointJournal.has_journal(folder_path):
+            # The work the previous simulation finished was recorded, so
+            # continue that generation where it stopped
+            print(
+                "Resuming generation {} from its checkpoint journal.".format(
+                    last_gen_number
+                )
+            )
+            if last_gen_number == 0:
+                return None
+            return last_gen_number - 1
+
         counter = 0
         dir_exists = True
         while dir_exists is True:
@@ -198,6 +198,16 @@ def get_argparse_vars() -> dict:
         multithreading: mpi, multithreading, or serial. serial will override \
         number_of_processors and force it to be on a single processor.",
     )
+    parser.add_argument(
+        "--mpi_schedule",
+        default="dynamic",
+        choices=["dynamic", "static"],
+        help="How jobs are shared between the nodes when --multithread_mode is \
+        mpi. static splits the jobs into one equal chunk per node. dynamic has \
+        the root node hand out small chunks of jobs, longest expected first, \
+        as the other nodes finish their last ones, so a node which gets a few \
+        slow ligands doesn't hold up the rest.",
+    )
 
     # Genetic Algorithm Options
     parser.add_argument(
@@ -248,6 +258,15 @@ def get_argparse_vars() -> dict:
         default=2,
         help="Each gen diversity_mols_to_seed_first_generation will decrease this amount",
     )
+    parser.add_argument(
+        "--diversity_fingerprint",
+        choices=["count", "bit_vector"],
+        default="count",
+        help="The Morgan fingerprints used to score diversity. count uses \
+        count-based fingerprints and gives the same diversity scores as previous \
+        versions of AutoGrow. bit_vector uses 2048-bit fingerprints, which are \
+        faster to compare for large populations but give slightly different scores.",
+    )
 
     # Populations settings
     parser.add_argument(
@@ -397,14 +416,21 @@ def get_argparse_vars() -> dict:
     # DOCUMENT THE file conversion for docking inputs
     parser.add_argument(
         "--conversion_choice",
-        choices=["MGLToolsConversion", "ObabelConversion", "Custom"],
+        choices=[
+            "MGLToolsConversion",
+            "ObabelConversion",
+            "RDKitConversion",
+            "Custom",
+        ],
         default="MGLToolsConversion",
         help="Determines how .pdb files will be converted \
         to the final format for docking. For Autodock Vina and QuickVina style docking software, \
         files must be in .pdbqt format. MGLToolsConversion: uses MGLTools and is the \
         recommended converter. MGLTools conversion is required for NNScore1/2 rescoring. \
         ObabelConversion: uses commandline obabel. Easier to install but Vina docking has \
-        been optimized with MGLTools conversion.",
+        been optimized with MGLTools conversion. RDKitConversion: writes the PDBQT \
+        with RDKit within AutoGrow, at the same time as the PDB, so no external \
+        program is needed and the PDB is not converted in a separate step.",
     )
     parser.add_argument(
         "--custom_conversion_script",
@@ -453,8 +479,17 @@ def get_argparse_vars() -> dict:
         "--dock_choice",
         metavar="dock_choice",
         default="QuickVina2Docking",
-        choices=["VinaDocking", "QuickVina2Docking", "Custom"],
-        help="dock_choice assigns which docking software module to use.",
+        choices=[
+            "VinaDocking",
+            "QuickVina2Docking",
+            "VinaPersistentDocking",
+            "Custom",
+        ],
+        help="dock_choice assigns which docking software module to use. \
+        VinaPersistentDocking docks with the AutoDock Vina Python bindings \
+        (pip install vina) and keeps the receptor grid maps in memory in each \
+        worker process. If the bindings are not installed it runs the Vina \
+        executable for each ligand, like VinaDocking.",
     )
     parser.add_argument(
         "--docking_executable",
@@ -499,6 +534,24 @@ def get_argparse_vars() -> dict:
         dock ligands. This is required for Custom docking choices Must be a list of \
         strings [name_custom_conversion_class, Path/to/name_custom_conversion_class.py]",
     )
+    parser.add_argument(
+        "--use_docking_cache",
+        choices=[True, False, "True", "False", "true", "false"],
+        default=False,
+        help="If True, docked poses are saved to docking_cache.db in the output \
+        directory. Ligands made again in later generations (same canonical SMILES, \
+        receptor, box, exhaustiveness, num_modes, dock_choice and scoring_choice) \
+        are not converted or docked again; their saved poses are reused for ranking.",
+    )
+    parser.add_argument(
+        "--streaming_pipeline",
+        choices=[True, False, "True", "False", "true", "false"],
+        default=False,
+        help="If True, each ligand is converted to 3D with Gypsum-DL, converted \
+        to PDBQT and docked in a single job, so ligands are docked as soon as \
+        their own conversion finishes instead of waiting for the whole \
+        generation to be converted. Ranking still waits for the whole generation.",
+    )
 
     # scoring
     parser.add_argument(
@@ -520,6 +573,16 @@ def get_argparse_vars() -> dict:
         non-Hydrogen atoms in the ligand. This adjusted ligand efficiency score will \
         override the scoring_choice value. This is compatible with all scoring_choice options.",
     )
+    parser.add_argument(
+        "--nn_rescoring_in_process",
+        choices=[True, False, "True", "False", "true", "false"],
+        default=True,
+        help="If True, NN1 and NN2 rescoring are run inside the AutoGrow worker \
+        processes. The receptor and networks are loaded once per worker and all \
+        poses of a worker's batch are scored together. For NN2 the Vina terms are \
+        also computed in-process, so no vina --score_only run is needed. If False, \
+        a separate NNScore.py/NNScore2.py process is run for every docked file.",
+    )
     parser.add_argument(
         "--custom_scoring_script",
         metavar="custom_scoring_script",
@@ -583,6 +646,16 @@ def get_argparse_vars() -> dict:
         how long it takes to run. If increasing gypsum settings it is best to increase \
         the gypsum_timeout_limit. Default gypsum_timeout_limit is 15 seconds",
     )
+    parser.add_argument(
+        "--batch_gypsum_conversion",
+        choices=[True, False, "True", "False", "true", "false"],
+        default=False,
+        help="If True, Gypsum-DL converts the ligands of a generation in batches. \
+        Each job sets up Gypsum-DL once and converts several ligands in memory \
+        rather than reading a .smi file and setting up Gypsum-DL for every \
+        ligand. gypsum_timeout_limit still applies to each ligand. Does not \
+        change --streaming_pipeline, which converts one ligand per job.",
+    )
 
     # Reduce files down. This compiles and compresses the files in the PDBs folder
     # (contains docking outputs, pdb, pdbqt...). This reduces the data size and
@@ -605,6 +678,34 @@ def get_argparse_vars() -> dict:
         help="Make a line plot of the simulation at the end of the run.",
     )
 
+    # Keep a journal of the work finished in each generation so a run which
+    # is stopped part way through a generation can be resumed.
+    parser.add_argument(
+        "--checkpoint_journal",
+        choices=[True, False, "True", "False", "true", "false"],
+        default=True,
+        help="If True, the work finished in each generation (mutants, \
+        crossovers, 3D conversion, docking and rescoring of each ligand) is \
+        recorded in checkpoint_journal.txt in the generation folder. If the run \
+        is stopped before a generation finishes, restarting it with the same \
+        output directory resumes that generation where it stopped instead of \
+        renaming it to _FAILED and starting it again.",
+    )
+
+    # Each generation's stage timings are saved to generation_N_metrics.json
+    # and generation_N_metrics.csv. This also profiles the workers' jobs.
+    parser.add_argument(
+        "--profile_stages",
+        choices=[True, False, "True", "False", "true", "false"],
+        default=False,
+        help="If True, every job run by the workers (ie. each Gypsum-DL \
+        conversion or dock) is also run under cProfile. The profiles of each \
+        stage are merged into profiles/{stage}.prof in the generation folder \
+        and can be read with pstats. The time, throughput and failures of each \
+        stage are saved to generation_N_metrics.json and \
+        generation_N_metrics.csv whether or not this is used.",
+    )
+
     # mpi mode pre-Run so there are python cache files without EOF Errors
     parser.add_argument(
         "--cache_prerun",
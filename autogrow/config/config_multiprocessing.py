@@ -52,7 +52,9 @@ def config_multiprocessing(params):
     # launch mpi workers
     if params["multithread_mode"] == "mpi":
         params["parallelizer"] = Parallelizer(
-            params["multithread_mode"], params["number_of_processors"]
+            params["multithread_mode"],
+            params["number_of_processors"],
+            mpi_schedule=params["mpi_schedule"],
         )
 
         if params["parallelizer"] is None:
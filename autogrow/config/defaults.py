@@ -70,6 +70,7 @@ def define_defaults():
     # processors
     default_vars["number_of_processors"] = 1
     default_vars["multithread_mode"] = "multithreading"
+    default_vars["mpi_schedule"] = "dynamic"
 
     # Genetic Algorithm Components
     default_vars["selector_choice"] = "Roulette_Selector"
@@ -80,6 +81,7 @@ def define_defaults():
     default_vars["top_mols_to_seed_next_generation"] = 10
     default_vars["diversity_mols_to_seed_first_generation"] = 10
     default_vars["diversity_seed_depreciation_per_gen"] = 2
+    default_vars["diversity_fingerprint"] = "count"
 
     # Populations settings
     default_vars["filter_source_compounds"] = True
@@ -113,10 +115,13 @@ def define_defaults():
     default_vars["docking_num_modes"] = None
     default_vars["docking_timeout_limit"] = 120
     default_vars["custom_docking_script"] = ""
+    default_vars["use_docking_cache"] = False
+    default_vars["streaming_pipeline"] = False
 
     # scoring
     default_vars["scoring_choice"] = "VINA"
     default_vars["rescore_lig_efficiency"] = False
+    default_vars["nn_rescoring_in_process"] = True
     default_vars["custom_scoring_script"] = ""
 
     # gypsum # max variance is the number of conformers made per ligand
@@ -126,11 +131,14 @@ def define_defaults():
     default_vars["max_ph"] = 8.4
     default_vars["pka_precision"] = 1.0
     default_vars["gypsum_timeout_limit"] = 10
+    default_vars["batch_gypsum_conversion"] = False
 
     # Other vars
     default_vars["debug_mode"] = False
     default_vars["reduce_files_sizes"] = False
     default_vars["generate_plot"] = True
+    default_vars["checkpoint_journal"] = True
+    default_vars["profile_stages"] = False
     # Check Bash Timeout function (There's a difference between MacOS and linux)
     # Linux uses timeout while MacOS uses gtimeout
     timeout_option = determine_bash_timeout_vs_gtimeout()
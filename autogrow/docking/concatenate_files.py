@@ -2,35 +2,237 @@
 This script compresses files which makes it easier to transfer data To
     decompress the files use the script in
     $PATH/autogrow4/accessory_scripts/file_concatenation_and_compression.py .
+
+The files are written to compressed_PDBS.txt.gz in the same concatenated
+format AutoGrow has always used:
+    "\n##############################File_name: {}\n".format(file_name_1)
+    ... Content of the 1st file...
+    "\n##############################$$END_FILE$$ {}".format(file_name_1)
+    ...
+
+Each file is compressed on its own as a separate gzip member. Gzip members
+written one after another are a valid gzip file, so the archive can still be
+decompressed as a whole (ie. with gunzip or gzip.open). Because each member
+can also be decompressed on its own, compressed_PDBS.txt.gz.index records
+where each file's member starts and how long it is, so a single ligand can be
+extracted without decompressing the whole generation (see extract_file()).
+
+The files are compressed by a pool of threads (zlib releases the GIL while it
+compresses) and written to the archive in order as they finish. Only a few
+files per thread are held in memory at a time.
 """
 import __future__
 
+import collections
 import glob
 import os
 import gzip
 import shutil
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+ARCHIVE_FILE_NAME = "compressed_PDBS.txt.gz"
+INDEX_FILE_SUFFIX = ".index"
+
+FILE_NAME_INSERT = "\n##############################File_name: {}\n"
+FILE_TERMINATION_INSERT = "\n##############################$$END_FILE$$ {}"
 
+COMPRESSION_LEVEL = 6
+# The most files waiting to be written to the archive per thread. This
+# bounds the memory used however many files there are.
+MAX_PENDING_FILES_PER_THREAD = 4
 
-def compress_file(file_name):
+
+def compress_file_member(file_name):
     """
-    Compress the concatenated file
+    Compress a file, with the separators of the concatenated format, as a
+    single gzip member.
 
     Inputs:
     :param str file_name: the path to the file to compress.
+
+    Returns:
+    :returns: bytes member: the gzip member
+    """
+
+    base_name = os.path.basename(file_name)
+    with open(file_name, "rb") as f:
+        data = f.read()
+
+    # wbits of 31 makes a gzip header and trailer
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+    member = compressor.compress(FILE_NAME_INSERT.format(base_name).encode("utf-8"))
+    member = member + compressor.compress(data)
+    member = member + compressor.compress(
+        FILE_TERMINATION_INSERT.format(base_name).encode("utf-8")
+    )
+    member = member + compressor.flush()
+
+    return member
+
+
+#######
+def read_index(compressed_file):
+    """
+    Read the index of an archive made by write_archive().
+
+    Inputs:
+    :param str compressed_file: the path to the archive.
+
+    Returns:
+    :returns: collections.OrderedDict index: the (offset, length) of the gzip
+        member of each file, by file name, in the order the files were
+        written. None if the archive has no index.
+    """
+
+    index_file = compressed_file + INDEX_FILE_SUFFIX
+    if os.path.exists(index_file) is False:
+        return None
+
+    index = collections.OrderedDict()
+    with open(index_file, "r") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) != 3:
+                continue
+            index[parts[0]] = (int(parts[1]), int(parts[2]))
+
+    return index
+
+
+def write_index(compressed_file, index):
+    """
+    Write the index of an archive. The index is written to a temporary file
+    which then replaces the old index, so the index is never left partly
+    written.
+
+    Inputs:
+    :param str compressed_file: the path to the archive.
+    :param collections.OrderedDict index: the (offset, length) of the gzip
+        member of each file, by file name.
+    """
+
+    index_file = compressed_file + INDEX_FILE_SUFFIX
+    with open(index_file + ".tmp", "w") as f:
+        for base_name, (offset, length) in index.items():
+            f.write("{}\t{}\t{}\n".format(base_name, offset, length))
+    os.replace(index_file + ".tmp", index_file)
+
+
+#######
+def write_archive(file_list, compressed_file, num_threads=1):
+    """
+    Compress a list of files into an archive and write its index. If the
+    archive already has an index (ie. a previous attempt stopped while it was
+    deleting the files it had archived), the files are added to it and files
+    which are already in it are not added again.
+
+    Inputs:
+    :param list file_list: the paths of the files to compress.
+    :param str compressed_file: the path to the archive.
+    :param int num_threads: the number of threads to compress with.
+
+    Returns:
+    :returns: collections.OrderedDict index: the (offset, length) of the gzip
+        member of each file in the archive, by file name.
+    """
+
+    index = read_index(compressed_file)
+    if index is None or os.path.exists(compressed_file) is False:
+        index = collections.OrderedDict()
+        mode = "wb"
+    else:
+        mode = "r+b"
+
+    file_list = [x for x in file_list if os.path.basename(x) not in index]
+    num_threads = max(int(num_threads), 1)
+    max_pending_files = num_threads * MAX_PENDING_FILES_PER_THREAD
+
+    with open(compressed_file, mode) as archive:
+        # Drop anything written after the last member in the index
+        end = max([offset + length for offset, length in index.values()] + [0])
+        archive.seek(end)
+        archive.truncate()
+
+        def write_member(base_name, future):
+            member = future.result()
+            index[base_name] = (archive.tell(), len(member))
+            archive.write(member)
+
+        pending = collections.deque()
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            for file_name in file_list:
+                pending.append(
+                    (
+                        os.path.basename(file_name),
+                        executor.submit(compress_file_member, file_name),
+                    )
+                )
+                if len(pending) >= max_pending_files:
+                    write_member(*pending.popleft())
+
+            while len(pending) != 0:
+                write_member(*pending.popleft())
+
+        archive.flush()
+        os.fsync(archive.fileno())
+
+    write_index(compressed_file, index)
+
+    return index
+
+
+#######
+def extract_file(compressed_file, file_name, output_folder=None):
+    """
+    Extract a single file from an archive made by write_archive(), without
+    decompressing the rest of the archive.
+
+    Inputs:
+    :param str compressed_file: the path to the archive.
+    :param str file_name: the name of the file to extract. ie.
+        'Gen_3_Mutant_7_123__1.pdbqt.vina'
+    :param str output_folder: the folder to write the file to. Defaults to
+        the folder of the archive.
+
+    Returns:
+    :returns: str out_file: the path of the extracted file.
     """
 
-    with open(file_name, "r") as f:
-        printout = f.read()
-    printout = printout.encode("utf-8")
-    with gzip.open(file_name + ".gz", "wb") as f:
-        f.write(printout)
+    index = read_index(compressed_file)
+    if index is None:
+        raise Exception(
+            "{} has no index. Decompress the whole file instead.".format(
+                compressed_file
+            )
+        )
+    base_name = os.path.basename(file_name)
+    if base_name not in index:
+        raise Exception("{} is not in {}".format(base_name, compressed_file))
+
+    offset, length = index[base_name]
+    with open(compressed_file, "rb") as archive:
+        archive.seek(offset)
+        data = gzip.decompress(archive.read(length))
+
+    header = FILE_NAME_INSERT.format(base_name).encode("utf-8")
+    termination = FILE_TERMINATION_INSERT.format(base_name).encode("utf-8")
+    data = data[len(header) : len(data) - len(termination)]
+
+    if output_folder is None:
+        output_folder = os.path.dirname(os.path.abspath(compressed_file))
+    out_file = os.path.join(output_folder, base_name)
+    with open(out_file, "wb") as f:
+        f.write(data)
+
+    return out_file
 
 
 #######
 def decompress_file(decompressed_file):
     """
     Decompress a file. Not used in running the program but is the counter of
-    def compress_file(file_name)
+    def write_archive(file_list, compressed_file, num_threads)
 
     Inputs:
     :param str decompressed_file: the path to the file to decompress.
@@ -49,7 +251,11 @@ def decompress_file(decompressed_file):
 def separate_files(compressed_file):
     """
     separate a concatenated file. Not used in running the program but is the
-    counter of def compress_file(file_name)
+    counter of def write_archive(file_list, compressed_file, num_threads)
+
+    If the archive has an index each file is extracted on its own. Otherwise
+    (ie. archives made before the index was added) the whole file is
+    decompressed and split up.
 
     Inputs:
     :param str compressed_file: the path to the file to separate/decompress.
@@ -61,7 +267,13 @@ def separate_files(compressed_file):
     )
     compressed_file = os.path.abspath(compressed_file)
 
-    decompressed_file = decompress_file(directory, compressed_file)
+    index = read_index(compressed_file)
+    if index is not None:
+        for base_name in index.keys():
+            extract_file(compressed_file, base_name, directory)
+        return
+
+    decompressed_file = decompress_file(compressed_file)
     if os.path.exists(decompressed_file) is False:
         raise Exception("Failed to decompress the file")
 
@@ -103,32 +315,7 @@ def separate_files(compressed_file):
             print("file failed to decompress: {}".format(f))
             all_are_made = False
     if all_are_made is True:
-        torun = "rm {}".format(decompressed_file)
-        os.system(torun)
-
-
-#######
-def get_file_info(file_name):
-    """
-    Used for concatenating files together. This function appends a seperator
-    and the filename of a file before and after the text of the file
-    file_name. It returns it as a string
-
-    Inputs:
-    :param str file_name: the path to the file to compress.
-
-    Returns:
-    :returns: str concat: the text of the file file_name with a seperator and
-        label before and after the file text.
-    """
-    file_name_insert = "\n##############################File_name: {}\n".format(
-        os.path.basename(file_name)
-    )
-    file_termination_insert = "\n##############################$$END_FILE$$ {}".format(
-        os.path.basename(file_name)
-    )
-    concat = file_name_insert + open(file_name).read() + file_termination_insert
-    return concat
+        del_files(decompressed_file)
 
 
 #######
@@ -142,8 +329,8 @@ def del_files(file_name):
 
     if os.path.exists(file_name):
         try:
-            os.system("rm {}".format(file_name))
-        except:
+            os.unlink(file_name)
+        except OSError:
             print("couldn't delete file: {}".format(file_name))
 
 
@@ -163,27 +350,31 @@ def run_concatenation(parallelizer_object, directory):
     :param Parallelizer_obj parallelizer_object: a paralellizer object used to
         multiprocess. initialized from
         autogrow/operators/convert_files/gypsum_dl/gypsum_dl/Parallelizer.py.
+        Its number of processors is the number of threads used to compress.
     :param str directory: the path to the folder which will be compiled and compressed.
     """
 
-    concat_file = directory + os.sep + "compressed_PDBS.txt"
+    compressed_file = os.path.abspath(directory + os.sep + ARCHIVE_FILE_NAME)
     print(
         "Start Concatenation: To separate files use the \
         file_concatenation_and_compression.py in the Utility script folder."
     )
     file_list = glob.glob(directory + os.sep + "*")
     file_list = [os.path.abspath(x) for x in file_list]
-
-    with open(concat_file, "a+") as f:
-        for file_name in file_list:
-            f.write(get_file_info(file_name))
-
-    job_list = tuple([(file_path,) for file_path in file_list])
-    print("\tFinish Concatenation")
+    # Leave out the archive and its index
+    file_list = [
+        x
+        for x in file_list
+        if os.path.isfile(x) is True and x.startswith(compressed_file) is False
+    ]
+
+    num_threads = min(parallelizer_object.return_node(), os.cpu_count() or 1)
+    write_archive(file_list, compressed_file, num_threads)
+    print("\tFinish Concatenation and Compression")
+
+    # The files are only deleted once they are all in the archive and its
+    # index is written
     print("\tRemoving files that were concatenated")
-    parallelizer_object.run(job_list, del_files)
-    print("\tCompressing file")
-    compress_file(concat_file)
-    if os.path.exists(concat_file + ".gz"):
-        del_files(concat_file)
+    for file_name in file_list:
+        del_files(file_name)
     print("Finished Compression")
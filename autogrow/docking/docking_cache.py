@@ -0,0 +1,280 @@
+"""
+docking_cache.py keeps the docked poses of every ligand in an SQLite database
+in the run's output directory so ligands which are made again in a later
+generation are not converted to 3D and docked a second time.
+
+Ligands are keyed by their canonical isomeric SMILES plus everything which
+changes the docking result: the receptor file contents, the docking box, the
+exhaustiveness, the number of modes, the docking program and the scoring
+choice. Cached ligands are left out of the generation_*_to_convert.smi file
+and are written to generation_*_cached.smi instead. After docking, their
+files are copied back into the generation's PDBs folder under the ligand's
+new name so they are ranked alongside the newly docked ligands.
+"""
+import __future__
+
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+
+import rdkit
+import rdkit.Chem as Chem
+
+# Disable the unnecessary RDKit warnings
+rdkit.RDLogger.DisableLog("rdApp.*")
+
+# Only ligands with a docked output file are stored
+DOCKED_FILE_EXTENSION = ".pdbqt.vina"
+
+
+def get_docking_cache_file(vars):
+    """
+    Get the path of the docking cache database for this run.
+
+    Inputs:
+    :param dict vars: User variables which will govern how the programs runs
+
+    Returns:
+    :returns: str cache_file: path to the SQLite database
+    """
+
+    return vars["output_directory"] + "docking_cache.db"
+
+
+def connect_to_docking_cache(vars):
+    """
+    Open the docking cache database, creating the table if needed.
+
+    Inputs:
+    :param dict vars: User variables which will govern how the programs runs
+
+    Returns:
+    :returns: sqlite3.Connection conn: connection to the docking cache
+    """
+
+    conn = sqlite3.connect(get_docking_cache_file(vars))
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS docked_files ("
+        + "cache_key TEXT NOT NULL, "
+        + "smiles TEXT NOT NULL, "
+        + "file_suffix TEXT NOT NULL, "
+        + "contents TEXT NOT NULL, "
+        + "PRIMARY KEY (cache_key, file_suffix))"
+    )
+    return conn
+
+
+def get_docking_settings_hash(vars):
+    """
+    Hash every setting which changes the result of docking a ligand. The
+    receptor is hashed by its contents so a changed receptor file at the same
+    path does not reuse old poses.
+
+    Inputs:
+    :param dict vars: User variables which will govern how the programs runs
+
+    Returns:
+    :returns: str settings_hash: sha1 hex digest of the docking settings
+    """
+
+    with open(vars["filename_of_receptor"], "rb") as f:
+        receptor_hash = hashlib.sha1(f.read()).hexdigest()
+
+    settings = [
+        receptor_hash,
+        [str(vars[x]) for x in ["center_x", "center_y", "center_z"]],
+        [str(vars[x]) for x in ["size_x", "size_y", "size_z"]],
+        str(vars["docking_exhaustiveness"]),
+        str(vars["docking_num_modes"]),
+        vars["dock_choice"],
+        vars["scoring_choice"],
+    ]
+    return hashlib.sha1(json.dumps(settings).encode("utf-8")).hexdigest()
+
+
+def get_canonical_smiles(smiles):
+    """
+    Get the canonical isomeric SMILES of a ligand. If RDKit can not read the
+    SMILES the original string is used.
+
+    Inputs:
+    :param str smiles: SMILES string of a ligand
+
+    Returns:
+    :returns: str canonical_smiles: canonical isomeric SMILES string
+    """
+
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        return smiles
+    return Chem.MolToSmiles(mol, isomericSmiles=True)
+
+
+def make_cache_key(settings_hash, canonical_smiles):
+    """
+    Combine the docking settings and a ligand into a single key.
+
+    Inputs:
+    :param str settings_hash: hash from get_docking_settings_hash
+    :param str canonical_smiles: canonical isomeric SMILES of a ligand
+
+    Returns:
+    :returns: str cache_key: the key for the ligand in the docking cache
+    """
+
+    return settings_hash + "\t" + canonical_smiles
+
+
+def get_short_name(ligand_name):
+    """
+    Get the shorthand name of a ligand which the PDBs folder files are named
+    after. ie) '(ZINC123+ZINC345)Gen_0_Cross_99571' -> 'Gen_0_Cross_99571'
+
+    Inputs:
+    :param str ligand_name: the full ligand ID
+
+    Returns:
+    :returns: str lig_name_short: the shorthand ligand ID
+    """
+
+    if len(ligand_name.split(")")) == 2:
+        return ligand_name.split(")")[1]
+    return ligand_name
+
+
+def split_cached_ligands(vars, smiles_list):
+    """
+    Split a list of ligands to convert and dock into those which still need
+    to be docked and those which already have poses in the docking cache.
+
+    Inputs:
+    :param dict vars: User variables which will govern how the programs runs
+    :param list smiles_list: list of ligands, each a list like
+        [SMILES, ligand_ID, ...]
+
+    Returns:
+    :returns: list uncached_list: ligands which must be converted and docked
+    :returns: list cached_list: ligands which can be copied from the cache
+    """
+
+    settings_hash = get_docking_settings_hash(vars)
+
+    conn = connect_to_docking_cache(vars)
+    try:
+        cached_keys = set(
+            x[0]
+            for x in conn.execute(
+                "SELECT DISTINCT cache_key FROM docked_files WHERE cache_key LIKE ?",
+                (settings_hash + "%",),
+            )
+        )
+    finally:
+        conn.close()
+
+    uncached_list = []
+    cached_list = []
+    for smile_info in smiles_list:
+        cache_key = make_cache_key(settings_hash, get_canonical_smiles(smile_info[0]))
+        if cache_key in cached_keys:
+            cached_list.append(smile_info)
+        else:
+            uncached_list.append(smile_info)
+
+    print(
+        "Docking cache: {} of {} ligands were already docked".format(
+            len(cached_list), len(smiles_list)
+        )
+    )
+    return uncached_list, cached_list
+
+
+def store_docked_ligands(vars, smi_file, pdb_dir):
+    """
+    Add every ligand in smi_file which docked successfully to the docking
+    cache. All of the ligand's files in pdb_dir are stored.
+
+    Inputs:
+    :param dict vars: User variables which will govern how the programs runs
+    :param str smi_file: .smi file of the ligands which were docked
+    :param str pdb_dir: the PDBs folder of the generation
+    """
+
+    if os.path.exists(smi_file) is False:
+        return
+
+    settings_hash = get_docking_settings_hash(vars)
+
+    rows = []
+    with open(smi_file, "r") as f:
+        for line in f.readlines():
+            split_line = line.replace("\n", "").split("\t")
+            if len(split_line) < 2:
+                continue
+            short_name = get_short_name(split_line[1])
+            lig_files = glob.glob(pdb_dir + short_name + "__*")
+            if len([x for x in lig_files if x.endswith(DOCKED_FILE_EXTENSION)]) == 0:
+                # Failed to convert or dock
+                continue
+
+            canonical_smiles = get_canonical_smiles(split_line[0])
+            cache_key = make_cache_key(settings_hash, canonical_smiles)
+            for file_path in lig_files:
+                if os.path.isfile(file_path) is False:
+                    continue
+                file_suffix = os.path.basename(file_path)[len(short_name) :]
+                with open(file_path, "r") as lig_file:
+                    rows.append(
+                        (cache_key, canonical_smiles, file_suffix, lig_file.read())
+                    )
+
+    conn = connect_to_docking_cache(vars)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO docked_files VALUES (?, ?, ?, ?)", rows
+            )
+    finally:
+        conn.close()
+
+
+def restore_cached_ligands(vars, smi_file, pdb_dir):
+    """
+    Write the cached files of every ligand in smi_file into pdb_dir, renamed
+    after the ligand's current shorthand name.
+
+    Inputs:
+    :param dict vars: User variables which will govern how the programs runs
+    :param str smi_file: .smi file of the ligands found in the docking cache
+    :param str pdb_dir: the PDBs folder of the generation
+    """
+
+    if os.path.exists(smi_file) is False:
+        return
+
+    if os.path.isdir(pdb_dir) is False:
+        os.makedirs(pdb_dir)
+
+    settings_hash = get_docking_settings_hash(vars)
+
+    conn = connect_to_docking_cache(vars)
+    try:
+        with open(smi_file, "r") as f:
+            for line in f.readlines():
+                split_line = line.replace("\n", "").split("\t")
+                if len(split_line) < 2:
+                    continue
+                short_name = get_short_name(split_line[1])
+                cache_key = make_cache_key(
+                    settings_hash, get_canonical_smiles(split_line[0])
+                )
+                for file_suffix, contents in conn.execute(
+                    "SELECT file_suffix, contents FROM docked_files "
+                    + "WHERE cache_key = ?",
+                    (cache_key,),
+                ):
+                    with open(pdb_dir + short_name + file_suffix, "w") as lig_file:
+                        lig_file.write(contents)
+    finally:
+        conn.close()
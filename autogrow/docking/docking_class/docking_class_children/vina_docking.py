@@ -11,6 +11,7 @@ import autogrow.docking.delete_failed_mol as Delete
 import autogrow.docking.ranking.ranking_mol as Ranking
 from autogrow.docking.docking_class.parent_dock_class import ParentDocking
 import autogrow.docking.scoring.execute_scoring_mol as Scoring
+import autogrow.utils.generation_store as GenerationStore
 
 
 class VinaDocking(ParentDocking):
@@ -542,10 +543,6 @@ class VinaDocking(ParentDocking):
                         + "Check if output folder has been moved"
                     )
 
-                # Get the data for all ligands from previous generation ranked
-                # file
-                prev_gen_data_list = Ranking.get_usable_format(ranked_smi_file_prev_gen)
-
                 # Get the list of pass through ligands
                 current_gen_pass_through_smi = (
                     current_generation_dir
@@ -553,14 +550,28 @@ class VinaDocking(ParentDocking):
                         os.sep, str(current_gen_int)
                     )
                 )
-                pass_through_list = Ranking.get_usable_format(
-                    current_gen_pass_through_smi
+                pass_through_list = GenerationStore.get_ligand_list(
+                    run_folder, current_gen_pass_through_smi
                 )
+                if pass_through_list is None:
+                    pass_through_list = Ranking.get_usable_format(
+                        current_gen_pass_through_smi
+                    )
 
-                # Convert lists to searchable Dictionaries.
-                prev_gen_data_dict = Ranking.convert_usable_list_to_lig_dict(
-                    prev_gen_data_list
+                # Look up the pass through ligands in the previous generation
+                # in the generation store. If it doesn't have the previous
+                # generation, read the ranked file into a searchable
+                # Dictionary.
+                prev_gen_data_dict = GenerationStore.get_ligands_by_smiles_and_id(
+                    run_folder, ranked_smi_file_prev_gen, pass_through_list
                 )
+                if prev_gen_data_dict is None:
+                    prev_gen_data_list = Ranking.get_usable_format(
+                        ranked_smi_file_prev_gen
+                    )
+                    prev_gen_data_dict = Ranking.convert_usable_list_to_lig_dict(
+                        prev_gen_data_list
+                    )
 
                 pass_through_data = []
                 for lig in pass_through_list:
@@ -587,17 +598,16 @@ class VinaDocking(ParentDocking):
         # ligands in the group this adds on a float in the last column for the
         # sum of pairwise comparisons the lower the diversity score the more
         # unique a molecule is from the other mols in the same generation
-        smiles_list = Ranking.score_and_append_diversity_scores(smiles_list)
+        smiles_list = Ranking.score_and_append_diversity_scores(
+            smiles_list, vars["parallelizer"], vars["diversity_fingerprint"]
+        )
 
         # name for the output file
         output_ranked_smile_file = smile_file.replace(".smi", "") + "_ranked.smi"
 
         # save to a new output smiles file. ie. save to ranked_smiles_file
-
-        with open(output_ranked_smile_file, "w") as output:
-            for ligand_info_list in smiles_list:
-                str_ligand_info_list = [str(x) for x in ligand_info_list]
-                output_line = "\t".join(str_ligand_info_list) + "\n"
-                output.write(output_line)
+        GenerationStore.save_ligand_list(
+            vars["output_directory"], output_ranked_smile_file, smiles_list
+        )
 
         return output_ranked_smile_file
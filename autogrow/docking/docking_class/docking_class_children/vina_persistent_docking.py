@@ -0,0 +1,326 @@
+"""
+The child classes from ParentExample
+
+VinaPersistentDocking docks with the AutoDock Vina Python bindings when they
+are installed. Each worker process builds the receptor grid maps for the
+search box once and then reuses them for every ligand it takes off the
+parallelizer's job queue, rather than starting a Vina process (which
+recomputes the maps) for each ligand. If the bindings are not installed, it
+falls back to running the Vina executable once per ligand, exactly as
+VinaDocking does.
+
+Vina holds the GIL while it docks, so it can't be timed out from a thread.
+Instead each worker docks in a helper process which it kills if a ligand
+takes longer than docking_timeout_limit.
+"""
+import __future__
+
+import os
+import multiprocessing
+
+from autogrow.docking.docking_class.docking_class_children.vina_docking import (
+    VinaDocking,
+)
+
+try:
+    from vina import Vina
+except ImportError:
+    Vina = None
+
+# The Vina object of a docking helper process, with the grid maps of the last
+# receptor and search box it docked into. A new receptor file (or a change to
+# the file) or box replaces it.
+VINA_WORKER_CACHE = {}
+
+# The docking helper process of this worker, the end of the pipe its jobs are
+# sent down and the pid of the process which started it. A forked worker
+# inherits its parent's entry, so a helper is only used by the process which
+# started it. Emptied when the helper is killed.
+VINA_HELPER = {}
+
+
+def get_vina_worker(receptor_pdbqt_file, center, box_size):
+    """
+    Get the Vina object for this process, loading the receptor and computing
+    the grid maps for the search box only if they are not already loaded.
+
+    Inputs:
+    :param str receptor_pdbqt_file: path to the receptor pdbqt file
+    :param list center: the x, y and z coordinates of the box center
+    :param list box_size: the x, y and z dimensions of the box
+
+    Returns:
+    :returns: Vina vina_obj: Vina object with the receptor grid maps loaded
+    """
+
+    key = (
+        os.path.abspath(receptor_pdbqt_file),
+        os.path.getmtime(receptor_pdbqt_file),
+        tuple(center),
+        tuple(box_size),
+    )
+    if key not in VINA_WORKER_CACHE:
+        # Only keep one receptor per process
+        VINA_WORKER_CACHE.clear()
+
+        vina_obj = Vina(sf_name="vina", cpu=1, verbosity=0)
+        vina_obj.set_receptor(receptor_pdbqt_file)
+        vina_obj.compute_vina_maps(center=center, box_size=box_size)
+        VINA_WORKER_CACHE[key] = vina_obj
+
+    return VINA_WORKER_CACHE[key]
+
+
+def run_vina_helper(connection):
+    """
+    The loop of a docking helper process. Each job sent down the pipe is
+    docked with this process's Vina object, and the energies of the poses are
+    sent back. A job of None stops the helper.
+
+    Inputs:
+    :param Connection connection: the helper's end of the pipe
+    """
+
+    while True:
+        job = connection.recv()
+        if job is None:
+            break
+
+        receptor_pdbqt_file, center, box_size, lig_pdbqt_filename = job[:4]
+        exhaustiveness, num_modes, output_file = job[4:]
+        try:
+            vina_obj = get_vina_worker(receptor_pdbqt_file, center, box_size)
+            vina_obj.set_ligand_from_file(lig_pdbqt_filename)
+            vina_obj.dock(exhaustiveness=exhaustiveness, n_poses=20)
+            vina_obj.write_poses(
+                output_file, n_poses=num_modes, energy_range=3.0, overwrite=True
+            )
+            energies = vina_obj.energies(n_poses=num_modes, energy_range=3.0)
+        except Exception as e:
+            connection.send((False, str(e)))
+            continue
+
+        connection.send((True, energies))
+
+
+def dock_in_vina_helper(job, timeout_limit):
+    """
+    Dock a ligand in this process's docking helper, starting the helper if it
+    isn't running. If the helper doesn't answer within timeout_limit seconds
+    it is killed. The next ligand starts a new helper, which has to compute
+    the grid maps again.
+
+    Inputs:
+    :param tuple job: the receptor pdbqt file, box center, box size, ligand
+        pdbqt file, exhaustiveness, number of modes and output file
+    :param float timeout_limit: the most seconds to wait for the ligand
+
+    Returns:
+    :returns: bool did_it_dock: True if the ligand docked
+    :returns: numpy.array energies: the energies of the poses if it docked.
+        The reason it failed if not.
+    """
+
+    if (
+        VINA_HELPER.get("pid") != os.getpid()
+        or VINA_HELPER["process"].is_alive() is False
+    ):
+        stop_vina_helper()
+        connection, helper_connection = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=run_vina_helper, args=(helper_connection,)
+        )
+        # Stop the helper when the worker stops
+        process.daemon = True
+        process.start()
+        helper_connection.close()
+        VINA_HELPER["process"] = process
+        VINA_HELPER["connection"] = connection
+        VINA_HELPER["pid"] = os.getpid()
+
+    connection = VINA_HELPER["connection"]
+    try:
+        connection.send(job)
+        if connection.poll(timeout_limit) is True:
+            return connection.recv()
+    except (EOFError, OSError):
+        stop_vina_helper()
+        return False, "the docking helper process stopped"
+
+    stop_vina_helper()
+    return False, "timed out after {} seconds".format(timeout_limit)
+
+
+def stop_vina_helper():
+    """
+    Kill this process's docking helper, if it has one. A helper inherited
+    from a parent process is left to the parent.
+    """
+
+    if VINA_HELPER.get("pid") == os.getpid():
+        VINA_HELPER["process"].terminate()
+        VINA_HELPER["process"].join()
+        VINA_HELPER["connection"].close()
+
+    VINA_HELPER.clear()
+
+
+class VinaPersistentDocking(VinaDocking):
+    """
+    RUN VINA DOCKING WITH THE RECEPTOR GRID MAPS KEPT IN MEMORY
+
+    Inputs:
+    :param class ParentDocking: Parent docking class to inherit from
+    """
+
+    def __init__(
+        self,
+        vars=None,
+        receptor_file=None,
+        file_conversion_class_object=None,
+        test_boot=True,
+    ):
+        """
+        get the specifications for Vina from vars load them into the self
+        variables we will need and convert the receptor to the proper file
+        format (ie pdb-> pdbqt)
+
+        Inputs:
+        :param dict vars: Dictionary of User variables
+        :param str receptor_file: the path for the receptor pdb
+        :param obj file_conversion_class_object: object which is used to
+            convert files from pdb to pdbqt
+        :param bool test_boot: used to initialize class without objects for
+            testing purpose
+        """
+
+        if test_boot is False:
+
+            self.vars = vars
+            self.debug_mode = vars["debug_mode"]
+            self.file_conversion_class_object = file_conversion_class_object
+
+            # VINA SPECIFIC VARS
+            receptor_file = vars["filename_of_receptor"]
+
+            ###########################
+
+            self.receptor_pdbqt_file = receptor_file + "qt"
+
+            if Vina is None:
+                # The executable is only needed for the subprocess fallback
+                print(
+                    "The vina Python package is not installed. "
+                    + "VinaPersistentDocking will run the Vina executable "
+                    + "for each ligand instead."
+                )
+                self.vars["docking_executable"] = self.get_docking_executable_file(
+                    self.vars
+                )
+
+    #######################################
+    # DOCK USING THE VINA PYTHON BINDINGS #
+    #######################################
+    def dock_ligand(self, lig_pdbqt_filename):
+        """
+        Dock a ligand pdbqt file using the AutoDock Vina Python bindings. The
+        receptor grid maps are computed once per worker process and reused for
+        every ligand. The poses are written to lig_pdbqt_filename + ".vina",
+        the same file the Vina executable writes.
+
+        If the bindings are not installed this runs VinaDocking.dock_ligand.
+
+        Inputs:
+        :param str lig_pdbqt_filename: the ligand pdbqt filename
+        """
+
+        if Vina is None:
+            VinaDocking.dock_ligand(self, lig_pdbqt_filename)
+            return
+
+        print("\tDocking: {}".format(lig_pdbqt_filename))
+        results = self.run_vina_in_process(lig_pdbqt_filename)
+
+        if results is None:
+            made_changes = self.replace_atoms_not_handled_by_forcefield(
+                lig_pdbqt_filename
+            )
+            if made_changes is True:
+                results = self.run_vina_in_process(lig_pdbqt_filename)
+                if results is None:
+                    print(
+                        "\nLigand failed to dock after corrections: {}\n".format(
+                            lig_pdbqt_filename
+                        )
+                    )
+        else:
+            print("\tFinished Docking: {}".format(lig_pdbqt_filename))
+
+    def run_vina_in_process(self, lig_pdbqt_filename):
+        """
+        Dock a single ligand in this process's docking helper, allowing it
+        docking_timeout_limit seconds, and write the poses and a short log,
+        matching the files VinaDocking produces.
+
+        Inputs:
+        :param str lig_pdbqt_filename: the ligand pdbqt filename
+
+        Returns:
+        :returns: str output_file: the path of the .vina output file. None if
+            it failed.
+        """
+
+        vars = self.vars
+        exhaustiveness = self.get_int_docking_option("docking_exhaustiveness", 8)
+        num_modes = self.get_int_docking_option("docking_num_modes", 9)
+        output_file = lig_pdbqt_filename + ".vina"
+        log_file = lig_pdbqt_filename + "_docking_output.txt"
+
+        job = (
+            self.receptor_pdbqt_file,
+            [vars["center_x"], vars["center_y"], vars["center_z"]],
+            [vars["size_x"], vars["size_y"], vars["size_z"]],
+            lig_pdbqt_filename,
+            exhaustiveness,
+            num_modes,
+            output_file,
+        )
+        did_it_dock, energies = dock_in_vina_helper(
+            job, float(vars["docking_timeout_limit"])
+        )
+        if did_it_dock is False:
+            with open(log_file, "a") as f:
+                f.write(
+                    "Vina failed to dock {}: {}\n".format(lig_pdbqt_filename, energies)
+                )
+            return None
+
+        with open(log_file, "a") as f:
+            f.write("mode |   affinity\n")
+            f.write("     | (kcal/mol)\n")
+            f.write("-----+-----------\n")
+            for i, energy in enumerate(energies):
+                f.write("{:4d}   {:9.3f}\n".format(i + 1, energy[0]))
+
+        return output_file
+
+    def get_int_docking_option(self, option_name, default_value):
+        """
+        Get an optional integer docking setting from vars, using the same
+        checks as VinaDocking.dock_ligand. Returns the Vina default if the
+        user did not set it.
+
+        Inputs:
+        :param str option_name: the name of the option in vars
+        :param int default_value: Vina's default value for the option
+
+        Returns:
+        :returns: int value: the value of the option
+        """
+
+        value = self.vars[option_name]
+        if value is None or value == "None":
+            return default_value
+        if type(value) == int or type(value) == float:
+            return int(value)
+        return default_value
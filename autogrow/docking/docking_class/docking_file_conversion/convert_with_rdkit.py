@@ -0,0 +1,651 @@
+"""
+The child classes from ParentExample
+
+RDKitConversion writes PDBQT files with RDKit in the same process, rather than
+running obabel or MGLTools once per ligand. The PDBQT writer below assigns the
+AutoDock atom types and Gasteiger charges, merges the nonpolar hydrogens into
+their heavy atoms and builds the ROOT/BRANCH torsion tree from the rotatable
+bonds.
+
+Because the writer works on an RDKit mol, a ligand's PDBQT can be made from
+the mol read out of Gypsum-DL's SDF at the same time as its PDB (see
+conversion_to_3d.convert_single_sdf_to_pdb), so the PDB does not need to be
+read back and converted in a separate step.
+"""
+import __future__
+
+import datetime
+import os
+
+import rdkit.Chem as Chem
+from rdkit.Chem import AllChem
+
+import autogrow.docking.delete_failed_mol as Delete
+import autogrow.operators.convert_files.gypsum_dl.gypsum_dl.MolObjectHandling as MOH
+
+from autogrow.docking.docking_class.parent_pdbqt_converter import ParentPDBQTConverter
+
+# Rotatable bonds: single, not in a ring, not next to a triple bond and not an
+# amide C-N bond. Atoms with only one heavy neighbor are excluded separately,
+# because the nonpolar hydrogens are merged before the torsion tree is built.
+ROTATABLE_BOND_SMARTS = Chem.MolFromSmarts("[!$(*#*)]-&!@[!$(*#*)]")
+AMIDE_BOND_SMARTS = Chem.MolFromSmarts("[NX3]-&!@[CX3]=[O,S]")
+
+# Record, serial, name, residue name, chain, residue number, x, y, z,
+# occupancy, B-factor, partial charge and AutoDock type
+PDBQT_ATOM_LINE = (
+    "{:<6s}{:5d} {:<4s} {:>3s} {:1s}{:4d}    {:8.3f}{:8.3f}{:8.3f}{:6.2f}{:6.2f}"
+    + "    {:+6.3f} {:<2s}\n"
+)
+
+
+def get_autodock_atom_type(atom):
+    """
+    Get the AutoDock atom type of an atom.
+
+    Inputs:
+    :param rdkit.Chem.rdchem.Atom atom: the atom to type
+
+    Returns:
+    :returns: str ad_type: the AutoDock atom type (ie. C, A, N, NA, OA, HD)
+    """
+
+    symbol = atom.GetSymbol()
+    if symbol == "C":
+        if atom.GetIsAromatic() is True:
+            return "A"
+        return "C"
+    if symbol == "N":
+        # Nitrogens with a lone pair to accept a hydrogen bond: no hydrogens,
+        # no positive charge and not in an amide or aromatic amine
+        if (
+            atom.GetTotalNumHs(includeNeighbors=True) == 0
+            and atom.GetFormalCharge() <= 0
+            and (
+                atom.GetDegree() < 3
+                or (
+                    atom.GetIsAromatic() is False
+                    and atom.GetHybridization() == Chem.HybridizationType.SP3
+                )
+            )
+        ):
+            return "NA"
+        return "N"
+    if symbol == "O":
+        return "OA"
+    if symbol == "S":
+        return "SA"
+    if symbol == "H":
+        if is_polar_hydrogen(atom) is True:
+            return "HD"
+        return "H"
+    return symbol
+
+
+def is_polar_hydrogen(atom):
+    """
+    Check if an atom is a hydrogen bonded to a nitrogen or an oxygen.
+
+    Inputs:
+    :param rdkit.Chem.rdchem.Atom atom: the atom to check
+
+    Returns:
+    :returns: bool is_polar: True if the atom is a polar hydrogen
+    """
+
+    if atom.GetAtomicNum() != 1:
+        return False
+    for neighbor in atom.GetNeighbors():
+        if neighbor.GetAtomicNum() in [7, 8]:
+            return True
+    return False
+
+
+def get_gasteiger_charges(mol):
+    """
+    Compute the Gasteiger charge of every atom. Atoms whose charge can't be
+    computed get a charge of 0.
+
+    Inputs:
+    :param rdkit.Chem.rdchem.Mol mol: the molecule
+
+    Returns:
+    :returns: list charges: the charge of each atom, in atom index order
+    """
+
+    mol_copy = Chem.Mol(mol)
+    try:
+        AllChem.ComputeGasteigerCharges(mol_copy)
+    except:
+        return [0.0 for i in range(mol.GetNumAtoms())]
+
+    charges = []
+    for atom in mol_copy.GetAtoms():
+        charge = atom.GetDoubleProp("_GasteigerCharge")
+        if charge != charge or abs(charge) == float("inf"):
+            # nan or inf
+            charge = 0.0
+        charges.append(charge)
+    return charges
+
+
+def get_rotatable_bonds(mol, kept_atoms):
+    """
+    Find the rotatable bonds between the atoms which will be written to the
+    PDBQT.
+
+    Inputs:
+    :param rdkit.Chem.rdchem.Mol mol: the molecule
+    :param set kept_atoms: indexes of the atoms written to the PDBQT
+
+    Returns:
+    :returns: list rotatable_bonds: (atom index, atom index) of each rotatable
+        bond
+    """
+
+    amide_bonds = set()
+    for match in mol.GetSubstructMatches(AMIDE_BOND_SMARTS):
+        amide_bonds.add(frozenset([match[0], match[1]]))
+
+    rotatable_bonds = []
+    for atom_1, atom_2 in mol.GetSubstructMatches(ROTATABLE_BOND_SMARTS):
+        if frozenset([atom_1, atom_2]) in amide_bonds:
+            continue
+        if atom_1 not in kept_atoms or atom_2 not in kept_atoms:
+            continue
+        # Rotating about a bond to a terminal heavy atom only moves
+        # hydrogens
+        if get_num_heavy_neighbors(mol.GetAtomWithIdx(atom_1)) < 2:
+            continue
+        if get_num_heavy_neighbors(mol.GetAtomWithIdx(atom_2)) < 2:
+            continue
+        rotatable_bonds.append((atom_1, atom_2))
+
+    return rotatable_bonds
+
+
+def get_num_heavy_neighbors(atom):
+    """
+    Count the non-hydrogen neighbors of an atom.
+
+    Inputs:
+    :param rdkit.Chem.rdchem.Atom atom: the atom
+
+    Returns:
+    :returns: int num_heavy_neighbors: the number of heavy atom neighbors
+    """
+
+    return len([x for x in atom.GetNeighbors() if x.GetAtomicNum() != 1])
+
+
+def get_rigid_groups(mol, kept_atoms, rotatable_bonds):
+    """
+    Split the atoms into the rigid groups left when every rotatable bond is
+    cut.
+
+    Inputs:
+    :param rdkit.Chem.rdchem.Mol mol: the molecule
+    :param set kept_atoms: indexes of the atoms written to the PDBQT
+    :param list rotatable_bonds: (atom index, atom index) of each rotatable
+        bond
+
+    Returns:
+    :returns: list groups: a sorted list of atom indexes for each group
+    :returns: dict group_of_atom: the index of the group of each atom
+    """
+
+    cut_bonds = set(frozenset(x) for x in rotatable_bonds)
+    group_of_atom = {}
+    groups = []
+    for start_atom in sorted(kept_atoms):
+        if start_atom in group_of_atom:
+            continue
+        group = []
+        to_visit = [start_atom]
+        group_of_atom[start_atom] = len(groups)
+        while len(to_visit) != 0:
+            atom_idx = to_visit.pop()
+            group.append(atom_idx)
+            for neighbor in mol.GetAtomWithIdx(atom_idx).GetNeighbors():
+                neighbor_idx = neighbor.GetIdx()
+                if neighbor_idx not in kept_atoms or neighbor_idx in group_of_atom:
+                    continue
+                if frozenset([atom_idx, neighbor_idx]) in cut_bonds:
+                    continue
+                group_of_atom[neighbor_idx] = len(groups)
+                to_visit.append(neighbor_idx)
+        groups.append(sorted(group))
+
+    return groups, group_of_atom
+
+
+def pick_root_group(groups, group_links):
+    """
+    Pick the rigid group to use as the ROOT of the torsion tree. This is the
+    group which makes the largest branch hanging off the root as small as
+    possible (ie. the most central group), so the torsions move as few atoms
+    as possible. Ties go to the larger group.
+
+    Inputs:
+    :param list groups: a list of atom indexes for each group
+    :param dict group_links: for each group index, a list of (group index,
+        atom index in this group, atom index in the other group) for every
+        rotatable bond to another group
+
+    Returns:
+    :returns: int root_group: the index of the root group
+    """
+
+    best_group = None
+    best_score = None
+    for group_idx in range(len(groups)):
+        largest_branch = 0
+        for other_group, _, _ in group_links[group_idx]:
+            largest_branch = max(
+                largest_branch,
+                count_branch_atoms(groups, group_links, other_group, group_idx),
+            )
+        score = (largest_branch, -len(groups[group_idx]))
+        if best_score is None or score < best_score:
+            best_score = score
+            best_group = group_idx
+
+    return best_group
+
+
+def count_branch_atoms(groups, group_links, group_idx, parent_group):
+    """
+    Count the atoms in a branch of the torsion tree.
+
+    Inputs:
+    :param list groups: a list of atom indexes for each group
+    :param dict group_links: the rotatable bonds between groups (see
+        pick_root_group)
+    :param int group_idx: the group at the base of the branch
+    :param int parent_group: the group the branch hangs off
+
+    Returns:
+    :returns: int num_atoms: the number of atoms in the branch
+    """
+
+    num_atoms = 0
+    to_visit = [(group_idx, parent_group)]
+    while len(to_visit) != 0:
+        current_group, previous_group = to_visit.pop()
+        num_atoms = num_atoms + len(groups[current_group])
+        for other_group, _, _ in group_links[current_group]:
+            if other_group != previous_group:
+                to_visit.append((other_group, current_group))
+    return num_atoms
+
+
+def make_pdbqt_atom_line(serial, name, res_info, position, charge, ad_type):
+    """
+    Format a single PDBQT atom line.
+
+    Inputs:
+    :param int serial: the atom serial number
+    :param str name: the atom name
+    :param list res_info: [record name, residue name, chain id, residue
+        number]
+    :param rdkit.Geometry.rdGeometry.Point3D position: the atom coordinates
+    :param float charge: the partial charge of the atom
+    :param str ad_type: the AutoDock atom type
+
+    Returns:
+    :returns: str line: the PDBQT atom line
+    """
+
+    record, res_name, chain_id, res_num = res_info
+    if len(name) < 4:
+        name = " " + name
+    return PDBQT_ATOM_LINE.format(
+        record,
+        serial % 100000,
+        name[:4],
+        res_name[:3],
+        chain_id[:1],
+        res_num % 10000,
+        position.x,
+        position.y,
+        position.z,
+        1.0,
+        0.0,
+        charge,
+        ad_type,
+    )
+
+
+def mol_to_pdbqt_block(mol, name=None, is_receptor=False):
+    """
+    Make the PDBQT of a molecule with explicit hydrogens and a 3D conformer.
+
+    Nonpolar hydrogens are merged into their heavy atom (their charge is
+    added to it) as AutoDock expects. A ligand is written as a torsion tree:
+    its rotatable bonds split it into rigid groups, the most central of which
+    is the ROOT, and the rest are nested BRANCHes. A receptor is written
+    rigid, without a torsion tree.
+
+    Inputs:
+    :param rdkit.Chem.rdchem.Mol mol: the molecule, with explicit hydrogens
+        and 3D coordinates
+    :param str name: the name to put in a REMARK line. Defaults to None.
+    :param bool is_receptor: write the molecule as a rigid receptor. Defaults
+        to False.
+
+    Returns:
+    :returns: str pdbqt_block: the PDBQT of the molecule
+    """
+
+    conformer = mol.GetConformer()
+    charges = get_gasteiger_charges(mol)
+
+    # Merge the nonpolar hydrogens
+    kept_atoms = set()
+    for atom in mol.GetAtoms():
+        if atom.GetAtomicNum() == 1 and is_polar_hydrogen(atom) is False:
+            neighbors = atom.GetNeighbors()
+            if len(neighbors) != 0:
+                charges[neighbors[0].GetIdx()] = (
+                    charges[neighbors[0].GetIdx()] + charges[atom.GetIdx()]
+                )
+                continue
+        kept_atoms.add(atom.GetIdx())
+
+    # Atom names, residues and AutoDock types
+    atom_names = {}
+    atom_res_info = {}
+    ad_types = {}
+    element_counts = {}
+    for atom_idx in kept_atoms:
+        atom = mol.GetAtomWithIdx(atom_idx)
+        ad_types[atom_idx] = get_autodock_atom_type(atom)
+        pdb_info = atom.GetPDBResidueInfo()
+        if pdb_info is not None and is_receptor is True:
+            atom_names[atom_idx] = pdb_info.GetName().strip()
+            atom_res_info[atom_idx] = [
+                "HETATM" if pdb_info.GetIsHeteroAtom() is True else "ATOM",
+                pdb_info.GetResidueName().strip(),
+                pdb_info.GetChainId(),
+                pdb_info.GetResidueNumber(),
+            ]
+        else:
+            symbol = atom.GetSymbol()
+            element_counts[symbol] = element_counts.get(symbol, 0) + 1
+            atom_names[atom_idx] = "{}{}".format(
+                symbol.upper(), element_counts[symbol]
+            )
+            atom_res_info[atom_idx] = ["HETATM", "LIG", "X", 999]
+
+    pdbqt_lines = []
+    if name is not None:
+        pdbqt_lines.append("REMARK  Name = {}\n".format(name))
+
+    if is_receptor is True:
+        for serial, atom_idx in enumerate(sorted(kept_atoms)):
+            pdbqt_lines.append(
+                make_pdbqt_atom_line(
+                    serial + 1,
+                    atom_names[atom_idx],
+                    atom_res_info[atom_idx],
+                    conformer.GetAtomPosition(atom_idx),
+                    charges[atom_idx],
+                    ad_types[atom_idx],
+                )
+            )
+        return "".join(pdbqt_lines)
+
+    # Build the torsion tree
+    rotatable_bonds = get_rotatable_bonds(mol, kept_atoms)
+    groups, group_of_atom = get_rigid_groups(mol, kept_atoms, rotatable_bonds)
+    group_links = {x: [] for x in range(len(groups))}
+    for atom_1, atom_2 in rotatable_bonds:
+        group_1 = group_of_atom[atom_1]
+        group_2 = group_of_atom[atom_2]
+        group_links[group_1].append((group_2, atom_1, atom_2))
+        group_links[group_2].append((group_1, atom_2, atom_1))
+    for group_idx in group_links:
+        group_links[group_idx].sort(key=lambda x: groups[x[0]][0])
+    root_group = pick_root_group(groups, group_links)
+
+    pdbqt_lines.append(
+        "REMARK  {} active torsions:\n".format(len(rotatable_bonds))
+    )
+    serials = {}
+
+    def write_group(group_idx, parent_group, first_atom):
+        """
+        Write the atoms of a group, then each branch hanging off it.
+
+        Inputs:
+        :param int group_idx: the group to write
+        :param int parent_group: the group this one hangs off (None for the
+            root)
+        :param int first_atom: the atom to write first (the atom bonded to
+            the parent group); None for the root
+        """
+
+        group_atoms = groups[group_idx]
+        if first_atom is not None:
+            group_atoms = [first_atom] + [x for x in group_atoms if x != first_atom]
+        for atom_idx in group_atoms:
+            serials[atom_idx] = len(serials) + 1
+            pdbqt_lines.append(
+                make_pdbqt_atom_line(
+                    serials[atom_idx],
+                    atom_names[atom_idx],
+                    atom_res_info[atom_idx],
+                    conformer.GetAtomPosition(atom_idx),
+                    charges[atom_idx],
+                    ad_types[atom_idx],
+                )
+            )
+        if parent_group is None:
+            pdbqt_lines.append("ENDROOT\n")
+
+        for other_group, atom_idx, other_atom_idx in group_links[group_idx]:
+            if other_group == parent_group:
+                continue
+            branch = "{:4d}{:4d}".format(serials[atom_idx], len(serials) + 1)
+            pdbqt_lines.append("BRANCH{}\n".format(branch))
+            write_group(other_group, group_idx, other_atom_idx)
+            pdbqt_lines.append("ENDBRANCH{}\n".format(branch))
+
+    pdbqt_lines.append("ROOT\n")
+    write_group(root_group, None, None)
+    pdbqt_lines.append("TORSDOF {}\n".format(len(rotatable_bonds)))
+
+    return "".join(pdbqt_lines)
+
+
+class RDKitConversion(ParentPDBQTConverter):
+    """
+    This is a class to convert ligands from PDB to PDBQT format using RDKit,
+    within the python process.
+
+    Inputs:
+    :param class ParentPDBQTConverter: Parent PDBQTConverter class to inherit
+      from
+    """
+
+    def __init__(self, vars=None, receptor_file=None, test_boot=True):
+        """
+        get the specifications for Vina from vars load them into the self
+        variables we will need and convert the receptor to the proper file
+        format (ie pdb-> pdbqt)
+
+        Inputs:
+        :param dict vars: Dictionary of User variables
+        :param str receptor_file: the path for the receptor pdb
+        :param bool test_boot: used to initialize class without objects for
+            testing purpose
+        """
+
+        if test_boot is False:
+
+            self.vars = vars
+            self.debug_mode = vars["debug_mode"]
+
+            # VINA SPECIFIC VARS
+            receptor_file = vars["filename_of_receptor"]
+            number_of_processors = vars["number_of_processors"]
+
+            ###########################
+
+            # convert Receptor from PDB to PDBQT
+            self.convert_receptor_pdb_files_to_pdbqt(
+                receptor_file, number_of_processors
+            )
+
+            self.receptor_pdbqt_file = receptor_file + "qt"
+
+    def convert_receptor_pdb_files_to_pdbqt(self, receptor_file, number_of_processors):
+        """
+        Convert the receptor from PDB to PDBQT, if it hasn't been converted
+        already. The receptor is written rigid, with its polar hydrogens and
+        Gasteiger charges.
+
+        Inputs:
+        :param str receptor_file:  the file path of the receptor
+        :param int number_of_processors: number of processors to multithread
+        """
+
+        if os.path.exists(receptor_file + "qt"):
+            return
+
+        print("Converting receptor PDB file to PDBQT using RDKit")
+        mol = Chem.MolFromPDBFile(receptor_file, sanitize=False, removeHs=False)
+        if mol is None:
+            raise Exception(
+                "Could not convert receptor with RDKit: {}".format(receptor_file)
+            )
+        # Ring and aromaticity info is needed to type the atoms, even if the
+        # receptor can't be fully sanitized
+        try:
+            Chem.SanitizeMol(mol)
+        except:
+            mol.UpdatePropertyCache(strict=False)
+            Chem.GetSymmSSSR(mol)
+
+        printout = "REMARK Receptor file prepared using RDKit on: "
+        printout = printout + str(datetime.datetime.now()) + "\n"
+        printout = printout + "REMARK Filename is: {}\n".format(receptor_file + "qt")
+        printout = printout + mol_to_pdbqt_block(mol, is_receptor=True)
+
+        # Write to a temp file first so a partly written receptor is never
+        # mistaken for a converted one
+        temp_file = "{}qt.{}.tmp".format(receptor_file, os.getpid())
+        with open(temp_file, "w") as f:
+            f.write(printout)
+        os.replace(temp_file, receptor_file + "qt")
+
+    ###################################################
+    # Convert the Ligand from PDB to PDBQT DockingModel
+    ###################################################
+    def convert_ligand_pdb_file_to_pdbqt(self, pdb_file):
+        """
+        Convert the ligands of a given directory from pdb to pdbqt format
+
+        Inputs:
+        :param str pdb_file: the file name, a string.
+
+        Returns:
+        :returns: bool bool: True if it worked; False if its the gypsum param
+            file or if it failed to make PDBQT
+        :returns: str smile_name: name of the SMILES string from a pdb file
+            None if its the param file
+        """
+
+        smile_name = self.get_smile_name_from_pdb(pdb_file)
+
+        # gypsum makes 1 files labeled params which is not a valid pdb, but is
+        # actually a log Do not convert the params files
+        if "params" in pdb_file:
+            return False, None
+
+        # if the file already has been converted to a .pbdqt skip this file.
+        # (ie. the PDBQT was written with the PDB by
+        # conversion_to_3d.convert_single_sdf_to_pdb)
+        if not os.path.exists(pdb_file + "qt"):
+            try:
+                mol = Chem.MolFromPDBFile(pdb_file, sanitize=False, removeHs=False)
+                if mol is not None:
+                    mol = MOH.check_sanitization(mol)
+            except:
+                mol = None
+
+            if mol is not None:
+                write_ligand_pdbqt(mol, pdb_file + "qt", smile_name)
+
+            if not os.path.exists(pdb_file + "qt"):
+                # FILE FAILED TO CONVERT TO PDBQT DELETE PDB AND RETURN FALSE
+                if self.debug_mode is False:
+                    print(
+                        "PDBQT not generated: Deleting "
+                        + os.path.basename(pdb_file)
+                        + "..."
+                    )
+
+                    # REMOVED FOR LIGANDS WHICH FAILED TO CONVERT TO PDBQT
+                    Delete.delete_all_associated_files(pdb_file)
+                    return False, smile_name
+                # In debug mode but pdbqt file does not exist
+                print("PDBQT not generated: " + os.path.basename(pdb_file) + "...")
+                return False, smile_name
+
+        return True, smile_name
+
+    #######################################
+    # Handle Failed PDBS                  #
+    #######################################
+    def get_smile_name_from_pdb(self, pdb_file):
+        """
+        This will return the unique identifier name for the compound
+
+        Inputs:
+        :param str pdb_file: pdb file path
+        Returns:
+        :returns: str line_stripped: the name of the SMILES string
+                                with the new lines and COMPND removed
+        """
+        if os.path.exists(pdb_file):
+            with open(pdb_file, "r") as f:
+                for line in f.readlines():
+                    if "COMPND" in line:
+                        line_stripped = line.replace(
+                            "COMPND", ""
+                        ).strip()  # Need to remove whitespaces on both ends
+                        line_stripped = line_stripped.replace(
+                            "\n", ""
+                        ).strip()  # Need to remove whitespaces on both ends
+
+            # line_stripped is now the name of the smile for this compound
+        else:
+            line_stripped = "unknown"
+        return line_stripped
+
+
+def write_ligand_pdbqt(mol, pdbqt_file, name=None):
+    """
+    Write the PDBQT of a ligand. Nothing is written if the PDBQT can't be
+    made.
+
+    Inputs:
+    :param rdkit.Chem.rdchem.Mol mol: the ligand, with explicit hydrogens and
+        3D coordinates
+    :param str pdbqt_file: the path to write the PDBQT to
+    :param str name: the name of the ligand, for the REMARK. Defaults to None.
+
+    Returns:
+    :returns: bool did_it_write: True if the PDBQT was written
+    """
+
+    try:
+        pdbqt_block = mol_to_pdbqt_block(mol, name)
+    except:
+        print("Failed to make PDBQT: {}".format(pdbqt_file))
+        return False
+
+    with open(pdbqt_file, "w") as f:
+        f.write(pdbqt_block)
+    return True
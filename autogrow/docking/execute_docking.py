@@ -6,6 +6,11 @@ import __future__
 import os
 
 from autogrow.docking.docking_class.get_child_class import get_all_subclasses
+import autogrow.docking.docking_cache as DockingCache
+import autogrow.operators.convert_files.conversion_to_3d as conversion_to_3d
+import autogrow.utils.checkpoint_journal as CheckpointJournal
+import autogrow.utils.job_costs as JobCosts
+import autogrow.utils.stage_metrics as StageMetrics
 
 from autogrow.docking.docking_class.docking_class_children import *
 from autogrow.docking.docking_class.parent_dock_class import ParentDocking
@@ -67,6 +72,7 @@ def pick_run_conversion_class_dict(conversion_choice):
     return child_dict[conversion_choice]
 
 
+@StageMetrics.timed_stage("run_docking_common")
 def run_docking_common(
     vars, current_gen_int, current_generation_dir, smile_file_new_gen
 ):
@@ -121,16 +127,112 @@ def run_docking_common(
         docking_executable = docking_object.get_docking_executable_file(temp_vars)
         vars["docking_executable"] = docking_executable
 
+    if vars["streaming_pipeline"] is True:
+        (
+            deleted_smiles_names_list_convert,
+            deleted_smiles_names_list_dock,
+        ) = run_streaming_conversion_and_docking(
+            vars,
+            docking_object,
+            smile_file_new_gen.replace(".smi", "") + "_to_convert.smi",
+            current_generation_dir,
+        )
+    else:
+        (
+            deleted_smiles_names_list_convert,
+            deleted_smiles_names_list_dock,
+        ) = run_conversion_and_docking(vars, docking_object, current_generation_pdb_dir)
+
+    print("####################")
+    if vars["use_docking_cache"] is True:
+        # Save the newly docked ligands and copy the ligands which were
+        # docked in earlier generations into the PDBs folder so they are
+        # ranked with the rest of the generation.
+        DockingCache.store_docked_ligands(
+            vars,
+            smile_file_new_gen.replace(".smi", "") + "_to_convert.smi",
+            current_generation_pdb_dir,
+        )
+        DockingCache.restore_cached_ligands(
+            vars,
+            smile_file_new_gen.replace(".smi", "") + "_cached.smi",
+            current_generation_pdb_dir,
+        )
+
+    deleted_smiles_names_list = (
+        deleted_smiles_names_list_convert + deleted_smiles_names_list_dock
+    )
+
+    if len(deleted_smiles_names_list) != 0:
+        print("")
+        print("THE FOLLOWING LIGANDS WHERE DELETED FOR FAILURE TO CONVERT OR DOCK:")
+        print(deleted_smiles_names_list)
+
+    print("#################### ")
+    print("")
+    print("Begin Ranking and Saving results")
+    with StageMetrics.time_stage("rank_and_save_output_smi"):
+        unweighted_ranked_smile_file = docking_object.rank_and_save_output_smi(
+            vars,
+            current_generation_dir,
+            current_gen_int,
+            smile_file_new_gen,
+            deleted_smiles_names_list,
+        )
+    print("")
+    print("Completed Ranking and Saving results")
+    print("")
+
+    return unweighted_ranked_smile_file
+
+
+def run_conversion_and_docking(vars, docking_object, current_generation_pdb_dir):
+    """
+    Convert every PDB in the generation's PDBs folder to PDBQT and then dock
+    every ligand which converted.
+
+    Inputs:
+    :param dict vars: User variables which will govern how the programs runs
+    :param object docking_object: the class for running the chosen docking
+        method
+    :param str current_generation_pdb_dir: the PDBs folder of the generation
+
+    Returns:
+    :returns: list deleted_smiles_names_list_convert: names of the ligands
+        which failed to convert to PDBQT
+    :returns: list deleted_smiles_names_list_dock: names of the ligands which
+        failed to dock
+    """
+
+    # Files converted or docked by an earlier attempt at this generation
+    # (see checkpoint_journal.py) aren't converted or docked again
+    current_generation_dir = os.path.dirname(
+        os.path.abspath(current_generation_pdb_dir)
+    )
+    converted_pdbs = CheckpointJournal.get_completed(
+        current_generation_dir, CheckpointJournal.CONVERTED_PDB_STAGE
+    )
+    docked_files = CheckpointJournal.get_completed(
+        current_generation_dir, CheckpointJournal.DOCKED_FILE_STAGE
+    )
+
     # Find PDB's
     pdbs_in_folder = docking_object.find_pdb_ligands(current_generation_pdb_dir)
+    pdbs_in_folder = [
+        pdb for pdb in pdbs_in_folder if os.path.basename(pdb) not in converted_pdbs
+    ]
     job_input_convert_lig = tuple(
         [tuple([docking_object, pdb]) for pdb in pdbs_in_folder]
     )
 
     print("####################")
     print("Convert Ligand to PDBQT format Begun")
-    smiles_names_failed_to_convert = vars["parallelizer"].run(
-        job_input_convert_lig, lig_convert_multithread
+    smiles_names_failed_to_convert = StageMetrics.run_jobs(
+        vars["parallelizer"],
+        "pdbqt_conversion",
+        job_input_convert_lig,
+        lig_convert_multithread,
+        count_failures=lambda result: result is not None,
     )
 
     print("Convert Ligand to PDBQT format Completed")
@@ -146,14 +248,24 @@ def run_docking_common(
 
     # Docking the ligands which converted to PDBQT Find PDBQT's
     pdbqts_in_folder = docking_object.find_converted_ligands(current_generation_pdb_dir)
+    pdbqts_in_folder = [
+        pdbqt
+        for pdbqt in pdbqts_in_folder
+        if os.path.basename(pdbqt) not in docked_files
+    ]
 
     job_input_dock_lig = tuple(
         [tuple([docking_object, pdbqt]) for pdbqt in pdbqts_in_folder]
     )
     print("####################")
     print("Docking Begun")
-    smiles_names_failed_to_dock = vars["parallelizer"].run(
-        job_input_dock_lig, run_dock_multithread
+    smiles_names_failed_to_dock = StageMetrics.run_jobs(
+        vars["parallelizer"],
+        "docking",
+        job_input_dock_lig,
+        run_dock_multithread,
+        count_failures=lambda result: result is not None,
+        job_cost_func=get_dock_job_cost,
     )
 
     print("")
@@ -171,31 +283,105 @@ def run_docking_common(
         print("THE FOLLOWING LIGANDS WHICH FAILED TO DOCK:")
         print(deleted_smiles_names_list_dock)
 
+    return deleted_smiles_names_list_convert, deleted_smiles_names_list_dock
+
+
+def run_streaming_conversion_and_docking(
+    vars, docking_object, smi_file, current_generation_dir
+):
+    """
+    Convert and dock the ligands in smi_file one ligand per job. Each job
+    runs Gypsum-DL, converts the SDF to PDBs, converts the PDBs to PDBQT and
+    docks them, so a ligand is docked as soon as its own conversion finishes
+    rather than after every ligand in the generation has been converted. The
+    jobs share the parallelizer's worker pool and its job queue, so a slow
+    Gypsum-DL run or dock only holds up one worker.
+
+    Inputs:
+    :param dict vars: User variables which will govern how the programs runs
+    :param object docking_object: the class for running the chosen docking
+        method
+    :param str smi_file: the .smi file of the ligands to convert and dock
+    :param str current_generation_dir: the current generation directory
+
+    Returns:
+    :returns: list deleted_smiles_names_list_convert: names of the ligands
+        which failed to convert to PDBQT
+    :returns: list deleted_smiles_names_list_dock: names of the ligands which
+        failed to dock
+    """
+
+    current_generation_pdb_dir = current_generation_dir + "PDBs" + os.sep
+    if os.path.isdir(current_generation_pdb_dir) is False:
+        os.makedirs(current_generation_pdb_dir)
+
+    if os.path.exists(smi_file) is False:
+        return [], []
+
+    # Ligands docked by an earlier attempt at this generation (see
+    # checkpoint_journal.py) aren't converted and docked again
+    docked_ligands = CheckpointJournal.get_completed(
+        current_generation_dir, CheckpointJournal.DOCKED_LIGAND_STAGE
+    )
+    job_input_gypsum = conversion_to_3d.make_gypsum_job_inputs(
+        vars, smi_file, current_generation_dir, docked_ligands
+    )[1]
+    if len(job_input_gypsum) == 0:
+        # ie) every ligand was found in the docking cache or was already
+        # docked
+        return [], []
+    job_input = tuple(
+        [
+            tuple([docking_object, current_generation_pdb_dir]) + gypsum_job
+            for gypsum_job in job_input_gypsum
+        ]
+    )
+
     print("####################")
-    deleted_smiles_names_list = (
-        deleted_smiles_names_list_convert + deleted_smiles_names_list_dock
+    print("Streaming 3D Conversion and Docking Begun")
+    results = StageMetrics.run_jobs(
+        vars["parallelizer"],
+        "convert_and_dock",
+        job_input,
+        convert_and_dock_multithread,
+        count_failures=lambda result: result[0] is not None
+        or len(result[2]) + len(result[3]) != 0,
+        job_cost_func=get_convert_and_dock_job_cost,
     )
+    print("Streaming 3D Conversion and Docking Completed")
+    print("####################")
 
-    if len(deleted_smiles_names_list) != 0:
-        print("")
-        print("THE FOLLOWING LIGANDS WHERE DELETED FOR FAILURE TO CONVERT OR DOCK:")
-        print(deleted_smiles_names_list)
+    lig_failed_gypsum = list(set([x[0] for x in results if x[0] is not None]))
+    if len(lig_failed_gypsum) > 0:
+        print("The Following ligands Failed to convert in Gypsum")
+        print("Likely due to a Timeout")
+        print(lig_failed_gypsum)
+
+    if len([x for x in results if len(x[1]) != 0]) == 0:
+        printout = "\n\nNo PDB files were made for any ligand. "
+        printout = printout + "This may be a problem with the Gypsum-DL "
+        printout = (
+            printout + "settings.\nPlease check that the `--gypsum_timeout_limit` "
+        )
+        printout = printout + "is appropriate relative to the `--gypsum_thoroughness` "
+        printout = printout + "and `--max_variants_per_compound` parameters.\n"
+        raise Exception(printout)
+
+    deleted_smiles_names_list_convert = list(
+        set([x for result in results for x in result[2]])
+    )
+    if len(deleted_smiles_names_list_convert) != 0:
+        print("THE FOLLOWING LIGANDS WHICH FAILED TO CONVERT:")
+        print(deleted_smiles_names_list_convert)
 
-    print("#################### ")
-    print("")
-    print("Begin Ranking and Saving results")
-    unweighted_ranked_smile_file = docking_object.rank_and_save_output_smi(
-        vars,
-        current_generation_dir,
-        current_gen_int,
-        smile_file_new_gen,
-        deleted_smiles_names_list,
+    deleted_smiles_names_list_dock = list(
+        set([x for result in results for x in result[3]])
     )
-    print("")
-    print("Completed Ranking and Saving results")
-    print("")
+    if len(deleted_smiles_names_list_dock) != 0:
+        print("THE FOLLOWING LIGANDS WHICH FAILED TO DOCK:")
+        print(deleted_smiles_names_list_dock)
 
-    return unweighted_ranked_smile_file
+    return deleted_smiles_names_list_convert, deleted_smiles_names_list_dock
 
 
 def lig_convert_multithread(docking_object, pdb):
@@ -215,6 +401,12 @@ def lig_convert_multithread(docking_object, pdb):
     """
 
     failed_smiles_name = docking_object.run_ligand_handling_for_docking(pdb)
+    if failed_smiles_name is None:
+        CheckpointJournal.record(
+            CheckpointJournal.get_gen_dir_of_pdbs_file(pdb),
+            CheckpointJournal.CONVERTED_PDB_STAGE,
+            os.path.basename(pdb),
+        )
     return failed_smiles_name
 
 
@@ -234,4 +426,111 @@ def run_dock_multithread(docking_object, pdb):
 
     print("Attempt to Dock complete: ", pdb)
     failed_smiles_names = docking_object.run_dock(pdb)
+    if failed_smiles_names is None:
+        CheckpointJournal.record(
+            CheckpointJournal.get_gen_dir_of_pdbs_file(pdb),
+            CheckpointJournal.DOCKED_FILE_STAGE,
+            os.path.basename(pdb),
+        )
     return failed_smiles_names
+
+
+def get_dock_job_cost(docking_object, pdb):
+    """
+    Estimate how long a run_dock_multithread job will take relative to the
+    others, from the heavy atoms and torsions in the ligand's PDBQT file.
+    This takes the same inputs as run_dock_multithread.
+
+    Inputs:
+    :param object docking_object: the class for running the chosen docking
+        method
+    :param str pdb: the path to the pdbqt of a molecule
+
+    Returns:
+    :returns: float cost: the relative cost of the job
+    """
+
+    return JobCosts.get_pdbqt_cost(pdb)
+
+
+def get_convert_and_dock_job_cost(
+    docking_object, pdb_dir, gypsum_log_path, gypsum_params, gypsum_timeout_limit
+):
+    """
+    Estimate how long a convert_and_dock_multithread job will take relative
+    to the others, from the size and flexibility of its ligand. This takes
+    the same inputs as convert_and_dock_multithread.
+
+    Inputs:
+    :param object docking_object: the class for running the chosen docking
+        method
+    :param str pdb_dir: the PDBs folder of the generation
+    :param str gypsum_log_path: a path to the folder to place the log files
+        produced when running gypsum.
+    :param dict gypsum_params: dictionary of params to be feed to Gypsum-DL to
+        convert to 3D sdf for a single ligand
+    :param int gypsum_timeout_limit: the maximum amount of time to run Gypsum
+        for the ligand
+
+    Returns:
+    :returns: float cost: the relative cost of the job
+    """
+
+    return conversion_to_3d.get_gypsum_job_cost(
+        gypsum_log_path, gypsum_params, gypsum_timeout_limit
+    )
+
+
+def convert_and_dock_multithread(
+    docking_object, pdb_dir, gypsum_log_path, gypsum_params, gypsum_timeout_limit
+):
+    """
+    Run every step from SMILES to docked pose for a single ligand: Gypsum-DL
+    3D conversion, SDF to PDB, PDB to PDBQT and docking.
+
+    Inputs:
+    :param object docking_object: the class for running the chosen docking
+        method
+    :param str pdb_dir: the PDBs folder of the generation
+    :param str gypsum_log_path: a path to the folder to place the log files
+        produced when running gypsum.
+    :param dict gypsum_params: dictionary of params to be feed to Gypsum-DL to
+        convert to 3D sdf for a single ligand
+    :param int gypsum_timeout_limit: the maximum amount of time to run Gypsum
+        for the ligand
+
+    Returns:
+    :returns: list results: [lig_id if Gypsum-DL failed else None, list of
+        pdb files made, list of smiles names which failed to convert to
+        PDBQT, list of smiles names which failed to dock]
+    """
+
+    # RDKitConversion's PDBQTs are written with the PDBs
+    make_pdbqt = docking_object.vars["conversion_choice"] == "RDKitConversion"
+    failed_gypsum, pdb_files = conversion_to_3d.convert_single_ligand_to_pdbs(
+        gypsum_log_path, gypsum_params, gypsum_timeout_limit, pdb_dir, make_pdbqt
+    )
+
+    failed_to_convert = []
+    failed_to_dock = []
+    for pdb in pdb_files:
+        failed_smiles_name = lig_convert_multithread(docking_object, pdb)
+        if failed_smiles_name is not None:
+            failed_to_convert.append(failed_smiles_name)
+            continue
+        if os.path.exists(pdb + "qt") is False:
+            continue
+        failed_smiles_name = run_dock_multithread(docking_object, pdb + "qt")
+        if failed_smiles_name is not None:
+            failed_to_dock.append(failed_smiles_name)
+
+    # Ligands with any failures are tried again if the generation is resumed
+    if failed_gypsum is None and len(failed_to_convert) + len(failed_to_dock) == 0:
+        lig_id = gypsum_params["source"].split(os.sep)[-1].replace(".smi", "")
+        CheckpointJournal.record(
+            os.path.dirname(os.path.abspath(pdb_dir)),
+            CheckpointJournal.DOCKED_LIGAND_STAGE,
+            lig_id,
+        )
+
+    return [failed_gypsum, pdb_files, failed_to_convert, failed_to_dock]
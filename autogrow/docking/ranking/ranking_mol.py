@@ -6,9 +6,13 @@ import __future__
 import os
 import random
 
+import numpy as np
 import rdkit
 import rdkit.Chem as Chem
-from rdkit.Chem.rdMolDescriptors import GetMorganFingerprint
+from rdkit.Chem.rdMolDescriptors import (
+    GetMorganFingerprint,
+    GetMorganFingerprintAsBitVect,
+)
 from rdkit import DataStructs
 
 # Disable the unnecessary RDKit warnings
@@ -18,6 +22,19 @@ import autogrow.operators.convert_files.gypsum_dl.gypsum_dl.MolObjectHandling as
 import autogrow.docking.ranking.selecting.rank_selection as Rank_Sel
 import autogrow.docking.ranking.selecting.roulette_selection as Roulette_Sel
 import autogrow.docking.ranking.selecting.tournament_selection as Tournament_Sel
+import autogrow.docking.ranking.selecting.population_arrays as PopulationArrays
+import autogrow.utils.stage_metrics as StageMetrics
+
+# Number of bits in the Morgan fingerprints used when
+# diversity_fingerprint="bit_vector"
+DIVERSITY_BIT_VECTOR_SIZE = 2048
+
+# Populations at least this large have their pairwise similarity sums split
+# across the parallelizer. Smaller ones are not worth the process overhead.
+DIVERSITY_PARALLEL_MIN_POPULATION = 1000
+
+# Number of rows of the similarity matrix computed at once in bit_vector mode
+DIVERSITY_BIT_VECTOR_CHUNK = 1000
 
 
 def create_seed_list(
@@ -35,12 +52,12 @@ def create_seed_list(
     by a weighted function to their diversity-fitness (docking score) Then it
     will merge these sets of smiles into a single list
 
-    Using the merged list it will make a list of all the smiles in the
-    merged-list (chosen_mol_list) with all the other information about each of
-    the chosen mols from the usable_list_of_smiles
+    The list is converted once into arrays of the docking and diversity
+    scores (PopulationArrays). The selectors choose indices from these arrays,
+    so all the other information about each chosen mol is found by its index
+    rather than by searching for its SMILES string.
 
     It will return this list with the complete information of each chosen mol
-    (weighted_order_list)
 
     Inputs:
     :param list usable_list_of_smiles: a list with SMILES strings, names, and
@@ -60,51 +77,94 @@ def create_seed_list(
         weighted ranking ie ["CCCC"  "zinc123"   1    -0.1]
     """
 
-    if selector_choice == "Roulette_Selector":
+    population = PopulationArrays.PopulationArrays(usable_list_of_smiles)
+
+    chosen_mol_full_data_list = create_seed_list_from_arrays(
+        population,
+        num_seed_diversity,
+        num_seed_dock_fitness,
+        selector_choice,
+        tourn_size,
+    )
+
+    return chosen_mol_full_data_list
+
+
+def create_seed_list_from_arrays(
+    population, num_seed_diversity, num_seed_dock_fitness, selector_choice, tourn_size
+):
+    """
+    This is the same as create_seed_list() but selects from the score arrays
+    of a SourceLibrary or PopulationArrays. The selectors choose indices, and
+    the chosen ligands are looked up by index. As in
+    get_chosen_mol_full_data_list(), each chosen ligand is replaced by the
+    best docked ligand with the same SMILES string.
+
+    Inputs:
+    :param object population: a SourceLibrary or PopulationArrays of the
+        ligands of either the previous generation or the source compound list
+    :param int num_seed_diversity: the number of seed molecules which come
+        from diversity selection
+    :param int num_seed_dock_fitness: the number of seed molecules which come
+        from eite selection by docking score
+    :param int selector_choice: the choice of selector method. Choices are
+        Roulette_Selector, Rank_Selector, or Tournament_Selector
+    :param float tourn_size: percentage of the total pool of ligands to be
+        tested in each tournament.
+
+    Returns:
+    :returns: list chosen_mol_full_data_list: a list of all the chosen
+        ligands in a random order ie [["CCCC"  "zinc123"   1    -0.1], ...]
+    """
 
+    if selector_choice == "Roulette_Selector":
         print("Roulette_Selector")
         # Get seed molecules based on docking scores
-        docking_fitness_smiles_list = Roulette_Sel.spin_roulette_selector(
-            usable_list_of_smiles, num_seed_dock_fitness, "docking"
+        docking_fitness_indices = Roulette_Sel.spin_roulette_selector_on_array(
+            population.scores, num_seed_dock_fitness, "docking"
         )
 
         # Get seed molecules based on diversity scores
-        diversity_smile_list = Roulette_Sel.spin_roulette_selector(
-            usable_list_of_smiles, num_seed_diversity, "diversity"
+        diversity_indices = Roulette_Sel.spin_roulette_selector_on_array(
+            population.diversity_scores, num_seed_diversity, "diversity"
         )
 
     elif selector_choice == "Rank_Selector":
         print("Rank_Selector")
         # This assumes the most negative number is the best option which is
-        # true for both This is true for both the diversity score and the
-        # docking score. This may need to be adjusted for different scoring
-        # functions.
+        # true for both the diversity score and the docking score.
 
         # Get seed molecules based on docking scores
-        docking_fitness_smiles_list = Rank_Sel.run_rank_selector(
-            usable_list_of_smiles, num_seed_dock_fitness, -2, False
+        docking_fitness_indices = Rank_Sel.run_rank_selector_on_array(
+            population.scores,
+            num_seed_dock_fitness,
+            population.smiles_keys,
+            population.row_keys,
+            False,
         )
 
         # Get seed molecules based on diversity scores
-        diversity_smile_list = Rank_Sel.run_rank_selector(
-            usable_list_of_smiles, num_seed_diversity, -1, False
+        diversity_indices = Rank_Sel.run_rank_selector_on_array(
+            population.diversity_scores,
+            num_seed_diversity,
+            population.smiles_keys,
+            population.row_keys,
+            False,
         )
 
     elif selector_choice == "Tournament_Selector":
         print("Tournament_Selector")
         # This assumes the most negative number is the best option which is
-        # true for both This is true for both the diversity score and the
-        # docking score. This may need to be adjusted for different scoring
-        # functions.
+        # true for both the diversity score and the docking score.
 
         # Get seed molecules based on docking scores
-        docking_fitness_smiles_list = Tournament_Sel.run_Tournament_Selector(
-            usable_list_of_smiles, num_seed_dock_fitness, tourn_size, -2, True
+        docking_fitness_indices = Tournament_Sel.run_tournament_selector_on_array(
+            population.scores, num_seed_dock_fitness, tourn_size, True
         )
 
         # Get seed molecules based on diversity scores
-        diversity_smile_list = Tournament_Sel.run_Tournament_Selector(
-            usable_list_of_smiles, num_seed_diversity, tourn_size, -1, True
+        diversity_indices = Tournament_Sel.run_tournament_selector_on_array(
+            population.diversity_scores, num_seed_diversity, tourn_size, True
         )
 
     else:
@@ -113,31 +173,48 @@ def create_seed_list(
             "selector_choice value is not Roulette_Selector, Rank_Selector, nor Tournament_Selector"
         )
 
-    chosen_mol_list = [x for x in docking_fitness_smiles_list]
-    chosen_mol_list.extend(diversity_smile_list)
+    chosen_indices = np.concatenate([docking_fitness_indices, diversity_indices])
+    chosen_indices = get_best_docked_indices(population, chosen_indices)
+    chosen_mol_full_data_list = population.get_rows(chosen_indices)
 
     if selector_choice in ["Rank_Selector", "Roulette_Selector"]:
-        # Get all the information about the chosen molecules. chosen_mol_list
-        # is 1D list of all chosen ligands chosen_mol_full_data_list is a 1D
-        # list with each item of the list having multiple pieces of
-        # information such as the ligand name/id, the smiles string, the
-        # diversity and docking score...
-        chosen_mol_full_data_list = get_chosen_mol_full_data_list(
-            chosen_mol_list, usable_list_of_smiles
-        )
+        # Shuffle to prevent biasing by the order of the ligands, like
+        # get_chosen_mol_full_data_list()
+        random.shuffle(chosen_mol_full_data_list)
 
-    elif selector_choice == "Tournament_Selector":
-        # Tournament_Selector returns an already full list of ligands so you
-        # can skip the get_chosen_mol_full_data_list step
-        chosen_mol_full_data_list = chosen_mol_list
+    return chosen_mol_full_data_list
 
-    else:
-        print(selector_choice)
-        raise Exception(
-            "selector_choice value is not Roulette_Selector, Rank_Selector, nor Tournament_Selector"
-        )
 
-    return chosen_mol_full_data_list
+def get_best_docked_indices(population, chosen_indices):
+    """
+    Replace the index of each chosen ligand with the index of the best docked
+    ligand with the same SMILES string. Ties go to the ligand which comes
+    first in the population, as in get_chosen_mol_full_data_list().
+
+    Inputs:
+    :param object population: a SourceLibrary or PopulationArrays
+    :param numpy.array chosen_indices: the indices of the chosen ligands
+
+    Returns:
+    :returns: numpy.array best_indices: the index of the best docked ligand
+        with the SMILES string of each chosen ligand, in the same order
+    """
+
+    chosen_indices = np.asarray(chosen_indices, dtype=np.int64)
+    if len(chosen_indices) == 0:
+        return chosen_indices
+
+    # A stable sort keeps ties in their original order
+    order = np.argsort(np.asarray(population.scores), kind="stable")
+    best_of_each_smiles = Rank_Sel.get_first_of_each_key(order, population.smiles_keys)
+
+    # Number the SMILES strings 0 to N-1 so the best ligand of each can be
+    # looked up in an array
+    _, smiles_numbers = np.unique(population.smiles_keys, return_inverse=True)
+    best_index_of_smiles = np.zeros(len(best_of_each_smiles), dtype=np.int64)
+    best_index_of_smiles[smiles_numbers[best_of_each_smiles]] = best_of_each_smiles
+
+    return best_index_of_smiles[smiles_numbers[chosen_indices]]
 
 
 def get_chosen_mol_full_data_list(chosen_mol_list, usable_list_of_smiles):
@@ -146,10 +223,9 @@ def get_chosen_mol_full_data_list(chosen_mol_list, usable_list_of_smiles):
     SMILES which could have been chosen and all of the information about those
     SMILES (ie. ligand name, SMILES string, docking score, diversity score...)
 
-    It will iterated through the list of chosen mols (chosen_mol_list), get
-    all the information from the usable_list_of_smiles Then it appends the
-    corresponding item in usable_list_of_smiles to a new list
-    weighted_order_list
+    It indexes the best docked ligand with each SMILES string in
+    usable_list_of_smiles once, then looks up each of the chosen mols
+    (chosen_mol_list) and appends it to a new list weighted_order_list
 
     --- an issue to be aware of is that there may be redundancies in both
         chosen_mol_list and usable_list_of_smiles this causes a many-to-many
@@ -175,13 +251,21 @@ def get_chosen_mol_full_data_list(chosen_mol_list, usable_list_of_smiles):
         the associated information in a random order
     """
 
-    sorted_list = sorted(usable_list_of_smiles, key=lambda x: float(x[-2]))
-    weighted_order_list = []
-    for smile in chosen_mol_list:
-        for smile_pair in sorted_list:
-            if smile == smile_pair[0]:
-                weighted_order_list.append(smile_pair)
-                break
+    # Index the best docked ligand with each SMILES string. Ties go to the
+    # ligand which comes first in usable_list_of_smiles.
+    best_lig_for_smiles = {}
+    for smile_pair in usable_list_of_smiles:
+        smile = smile_pair[0]
+        if smile not in best_lig_for_smiles or float(smile_pair[-2]) < float(
+            best_lig_for_smiles[smile][-2]
+        ):
+            best_lig_for_smiles[smile] = smile_pair
+
+    weighted_order_list = [
+        best_lig_for_smiles[smile]
+        for smile in chosen_mol_list
+        if smile in best_lig_for_smiles
+    ]
 
     if len(weighted_order_list) != len(chosen_mol_list):
         raise AssertionError(
@@ -277,7 +361,9 @@ def convert_usable_list_to_lig_dict(usable_list_of_smiles):
 
 
 ##### Called in the docking class ######
-def score_and_append_diversity_scores(molecules_list):
+def score_and_append_diversity_scores(
+    molecules_list, parallelizer=None, fingerprint_type="count"
+):
     """
     This function will take list of molecules which makes up a population. It
     will then create a diversity score for each molecules:
@@ -301,6 +387,15 @@ def score_and_append_diversity_scores(molecules_list):
             -ie) if there are 15 ligands the max score is 15 the minimum is 0.0
                     with 15.0 if all ligands are identical
 
+        fingerprint_type="count" uses count-based feature Morgan
+            fingerprints (radius 10) compared with
+            DataStructs.BulkDiceSimilarity. These are the original AutoGrow
+            diversity scores.
+        fingerprint_type="bit_vector" uses 2048-bit feature Morgan
+            fingerprints. All pairwise Dice similarities are computed with
+            NumPy matrix products. This is faster for large populations but the
+            scores differ slightly from the count-based scores.
+
         It then appends the diversity score to the molecule list which it
         returns.
 
@@ -313,12 +408,22 @@ def score_and_append_diversity_scores(molecules_list):
     Inputs:
     :param list molecules_list: list of all molecules in the populations with
     the respective info
+    :param object parallelizer: optional Parallelizer object. If provided,
+        large populations have their similarity sums split across it.
+    :param str fingerprint_type: "count" or "bit_vector"
 
     Returns:
     :returns: list molecules_list: list of all molecules in the populations
         with the respective info and append diversity score
     """
 
+    if fingerprint_type not in ["count", "bit_vector"]:
+        raise Exception(
+            "fingerprint_type must be count or bit_vector, not {}".format(
+                fingerprint_type
+            )
+        )
+
     mol_list = []
 
     for pair in molecules_list:
@@ -361,27 +466,36 @@ def score_and_append_diversity_scores(molecules_list):
         else:
             print("noneitem in molecules_list in score_and_append_diversity_scores")
 
-    fps_list = []
-    for molecule in mol_list:
-        fp = GetMorganFingerprint(molecule[-1], 10, useFeatures=True)
-        temp = [x for x in molecule]
-        temp.append(fp)
-        fps_list.append(temp)
+    fps = get_diversity_fingerprints([x[-1] for x in mol_list], fingerprint_type)
+
+    # if DiceSimilarity=1.0 its a perfect match, the smaller the number the
+    # more diverse it is. The sum of all of these gives the distance from the
+    # normal. The smaller the number means the more distant
+    num_mols = len(mol_list)
+    if parallelizer is not None and num_mols >= DIVERSITY_PARALLEL_MIN_POPULATION:
+        num_batches = max(1, min(parallelizer.return_node(), num_mols))
+        batch_bounds = [
+            (num_mols * i // num_batches, num_mols * (i + 1) // num_batches)
+            for i in range(num_batches)
+        ]
+        job_input = tuple(
+            [tuple([fps, start, end, fingerprint_type]) for start, end in batch_bounds]
+        )
+        results = StageMetrics.run_jobs(
+            parallelizer,
+            "diversity",
+            job_input,
+            sum_dice_similarities,
+            count_items=lambda fps, start, end, fingerprint_type: end - start,
+        )
+        diversity_scores = [x for batch in results for x in batch]
+    else:
+        diversity_scores = sum_dice_similarities(fps, 0, num_mols, fingerprint_type)
 
     fps_list_w_div_score = []
-    for i in range(0, len(fps_list)):
-        diversity_score = 0
-        for j in range(0, len(fps_list)):
-            if i != j:
-                # if DiceSimilarity=1.0 its a perfect match, the smaller the
-                # number the more diverse it is. The sum of all of these gives
-                # the distance from the normal. The smaller the number means
-                # the more distant
-                diversity_score = diversity_score + DataStructs.DiceSimilarity(
-                    fps_list[i][-1], fps_list[j][-1]
-                )
-        temp = [x for x in fps_list[i]]
-        temp.append(str(diversity_score))
+    for i in range(0, num_mols):
+        temp = [x for x in mol_list[i]]
+        temp.append(str(diversity_scores[i]))
         fps_list_w_div_score.append(temp)
 
     # take the diversity score and append to the last column in the original
@@ -393,3 +507,82 @@ def score_and_append_diversity_scores(molecules_list):
             molecules_list[i].append(fps_list_w_div_score[i][-1])
 
     return molecules_list
+
+
+def get_diversity_fingerprints(mols, fingerprint_type):
+    """
+    Make the fingerprints used to score diversity.
+
+    Inputs:
+    :param list mols: list of rdkit mol objects
+    :param str fingerprint_type: "count" or "bit_vector"
+
+    Returns:
+    :returns: list fps: for "count", a list of count-based Morgan
+        fingerprints. For "bit_vector", a float32 numpy array with one row of
+        0/1 bits per mol.
+    """
+
+    if fingerprint_type == "bit_vector":
+        fps = np.zeros((len(mols), DIVERSITY_BIT_VECTOR_SIZE), dtype=np.float32)
+        for i, mol in enumerate(mols):
+            fp = GetMorganFingerprintAsBitVect(
+                mol, 10, nBits=DIVERSITY_BIT_VECTOR_SIZE, useFeatures=True
+            )
+            fps[i, list(fp.GetOnBits())] = 1.0
+        return fps
+
+    return [GetMorganFingerprint(mol, 10, useFeatures=True) for mol in mols]
+
+
+def sum_dice_similarities(fps, row_start, row_end, fingerprint_type):
+    """
+    For each fingerprint from row_start up to row_end, sum its Dice
+    similarity to every other fingerprint in fps.
+
+    Inputs:
+    :param list fps: fingerprints from get_diversity_fingerprints
+    :param int row_start: index of the first fingerprint to score
+    :param int row_end: index after the last fingerprint to score
+    :param str fingerprint_type: "count" or "bit_vector"
+
+    Returns:
+    :returns: list diversity_scores: the summed similarities for the rows
+    """
+
+    diversity_scores = []
+    if fingerprint_type == "bit_vector":
+        num_bits_on = fps.sum(axis=1)
+        for chunk_start in range(row_start, row_end, DIVERSITY_BIT_VECTOR_CHUNK):
+            chunk_end = min(chunk_start + DIVERSITY_BIT_VECTOR_CHUNK, row_end)
+
+            # For 0/1 vectors the dot product is the number of shared bits
+            intersections = np.dot(fps[chunk_start:chunk_end], fps.T)
+            denominators = (
+                num_bits_on[chunk_start:chunk_end, np.newaxis]
+                + num_bits_on[np.newaxis, :]
+            )
+            similarities = np.divide(
+                2.0 * intersections,
+                denominators,
+                out=np.zeros_like(intersections),
+                where=denominators > 0,
+            )
+
+            # Don't compare a molecule against itself
+            rows = np.arange(chunk_end - chunk_start)
+            similarities[rows, rows + chunk_start] = 0.0
+
+            diversity_scores.extend(
+                [float(x) for x in similarities.sum(axis=1, dtype=np.float64)]
+            )
+        return diversity_scores
+
+    for i in range(row_start, row_end):
+        similarities = DataStructs.BulkDiceSimilarity(fps[i], fps)
+        diversity_score = 0
+        for j in range(0, len(similarities)):
+            if i != j:
+                diversity_score = diversity_score + similarities[j]
+        diversity_scores.append(diversity_score)
+    return diversity_scores
@@ -0,0 +1,80 @@
+"""
+This script converts a list of ligands into the arrays which the selectors
+choose from.
+
+The population is converted once. The selectors then choose indices from the
+score arrays, and the chosen ligands are found from their indices rather than
+by searching for their SMILES strings.
+"""
+import __future__
+
+import numpy as np
+
+
+class PopulationArrays(object):
+    """
+    The docking and diversity scores of a list of ligands, with keys for
+    finding duplicate ligands. This has the same arrays as a SourceLibrary,
+    so the selectors work on either.
+    """
+
+    def __init__(self, usable_list_of_smiles):
+        """
+        Inputs:
+        :param list usable_list_of_smiles: a list with all the information of
+            all the mols in the previous generation. Each must have a docking
+            score (part -2) and a diversity score (part -1). ie. [['CCC',
+            'ZINC123', '-7.1', '0.4'], ...]
+        """
+
+        self.usable_list_of_smiles = usable_list_of_smiles
+
+        self.scores = np.array(
+            [float(x[-2]) for x in usable_list_of_smiles], dtype=np.float64
+        )
+        self.diversity_scores = np.array(
+            [float(x[-1]) for x in usable_list_of_smiles], dtype=np.float64
+        )
+        self.smiles_keys = get_key_array([x[0] for x in usable_list_of_smiles])
+        self.row_keys = get_key_array(["\t".join(x) for x in usable_list_of_smiles])
+
+    def __len__(self):
+        """
+        Returns:
+        :returns: int num_ligands: the number of ligands in the population
+        """
+
+        return len(self.usable_list_of_smiles)
+
+    def get_rows(self, indices):
+        """
+        Get the ligands at several indices.
+
+        Inputs:
+        :param iter indices: the indices of the ligands
+
+        Returns:
+        :returns: list rows: all the information about each ligand, in the
+            order of indices
+        """
+
+        return [self.usable_list_of_smiles[int(i)] for i in indices]
+
+
+def get_key_array(strings):
+    """
+    Number each distinct string, so that duplicates can be found by
+    comparing integers.
+
+    Inputs:
+    :param list strings: a list of strings
+
+    Returns:
+    :returns: numpy.array keys: the number of each string. Equal strings get
+        the same number.
+    """
+
+    string_to_key = {}
+    keys = [string_to_key.setdefault(x, len(string_to_key)) for x in strings]
+
+    return np.array(keys, dtype=np.int64)
@@ -4,8 +4,9 @@ This script is use to select molecules using a ranked selector
 import __future__
 
 
-import os
-import random
+import numpy as np
+
+import autogrow.docking.ranking.selecting.population_arrays as PopulationArrays
 
 
 def run_rank_selector(
@@ -48,58 +49,91 @@ def run_rank_selector(
         top_choice_smile_order = []
         return top_choice_smile_order
 
-    # Sort by chosen idx property
-    sorted_list = sorted(
-        usable_list_of_smiles,
-        key=lambda x: float(x[column_idx_to_select]),
-        reverse=reverse_sort,
+    scores = np.array([float(x[column_idx_to_select]) for x in usable_list_of_smiles])
+    smiles_keys = PopulationArrays.get_key_array([x[0] for x in usable_list_of_smiles])
+    row_keys = PopulationArrays.get_key_array(
+        ["\t".join(x) for x in usable_list_of_smiles]
+    )
+
+    chosen_indices = run_rank_selector_on_array(
+        scores, number_to_chose, smiles_keys, row_keys, reverse_sort
     )
 
-    # remove any redundants
-    new_sorted_list = []
-    temp_list_info = []
-    for i in range(len(sorted_list)):
-        info = sorted_list[i]
-        if "\t".join(info) in temp_list_info:
-            continue
+    top_choice_smile_order = [usable_list_of_smiles[i][0] for i in chosen_indices]
+
+    return top_choice_smile_order
+
 
-        temp_list_info.append("\t".join(info))
-        new_sorted_list.append(info)
+def run_rank_selector_on_array(
+    scores, number_to_chose, smiles_keys, row_keys, reverse_sort=False
+):
+    """
+    Select the indices of the top ranked ligands from an array of scores (ie.
+    the scores or diversity_scores of a SourceLibrary or PopulationArrays).
 
-    del sorted_list
-    del temp_list_info
-    if len(new_sorted_list) < number_to_chose:
+    Duplicate ligands are removed. If there are enough unique SMILES strings
+    only the best scoring ligand with each SMILES is chosen.
+
+    Inputs:
+    :param numpy.array scores: the score of every ligand to select by
+    :param int number_to_chose: the number of molecules to chose
+    :param numpy.array smiles_keys: a key for each ligand's SMILES string.
+        Ligands with the same SMILES string have the same key.
+    :param numpy.array row_keys: a key for all the information about each
+        ligand. Duplicated ligands have the same key.
+    :param bol reverse_sort: Set to True if you want to select the most
+        positive number is the best choice Set to False if you want to select
+        the most negative number
+
+    Returns:
+    :returns: numpy.array chosen_indices: the indices of the chosen ligands,
+        best first
+    """
+
+    num_ligands = len(scores)
+    if num_ligands == 0:
+        raise Exception("scores is an empty array. There is nothing to chose from.")
 
+    if number_to_chose <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Sort by score. A stable sort keeps ties in their original order.
+    if reverse_sort is True:
+        order = np.argsort(-np.asarray(scores), kind="stable")
+    else:
+        order = np.argsort(np.asarray(scores), kind="stable")
+
+    # remove any redundants, keeping the best scoring copy
+    order = get_first_of_each_key(order, row_keys)
+    if len(order) < number_to_chose:
         raise Exception(
             "Asked for {} but only {} availabe to chose from \
             There are more ligands to chose to seed the list than ligands to select from. \
             Please lower the top_mols_to_seed_next_generation and/or \
             diversity_mols_to_seed_first_generation".format(
-                number_to_chose, len(new_sorted_list)
+                number_to_chose, len(order)
             )
         )
 
-    new_sorted_list = sorted(
-        new_sorted_list,
-        key=lambda x: float(x[column_idx_to_select]),
-        reverse=reverse_sort,
-    )
+    unique_smiles_order = get_first_of_each_key(order, smiles_keys)
+    if len(unique_smiles_order) >= number_to_chose:
+        order = unique_smiles_order
 
-    if len(list(set([x[0] for x in new_sorted_list]))) >= number_to_chose:
-        sorted_list = []
-        smiles_list = []
-        for mol_info in new_sorted_list:
-            if mol_info[0] in smiles_list:
-                continue
-            else:
-                sorted_list.append(mol_info)
-                smiles_list.append(mol_info[0])
-    else:
-        sorted_list = new_sorted_list
+    return order[:number_to_chose]
 
-    top_choice_smile_order = []
-    for i in range(0, number_to_chose):
-        smile = sorted_list[i]
-        top_choice_smile_order.append(smile[0])
 
-    return top_choice_smile_order
+def get_first_of_each_key(order, keys):
+    """
+    Remove the indices whose key appeared earlier in order.
+
+    Inputs:
+    :param numpy.array order: indices of ligands
+    :param numpy.array keys: the key of every ligand
+
+    Returns:
+    :returns: numpy.array order: the indices of order which are the first with
+        their key, in the same order
+    """
+
+    _, first_positions = np.unique(np.asarray(keys)[order], return_index=True)
+    return order[np.sort(first_positions)]
@@ -3,7 +3,7 @@ This script is use to select molecules using a roulette selector
 """
 import __future__
 
-import numpy.random as rn
+import numpy as np
 
 
 def spin_roulette_selector(
@@ -39,56 +39,112 @@ def spin_roulette_selector(
         top_choice_smile_order = []
         return top_choice_smile_order
 
-    adjusted = adjust_scores(usable_list_of_smiles, docking_or_diversity)
-
-    total = sum(adjusted)
-    probability = [x / total for x in adjusted]
-    smiles_list = [x[0] for x in usable_list_of_smiles]
-
-    top_choice_smile_order = rn.choice(
-        smiles_list, size=number_to_chose, replace=False, p=probability
+    scores = get_score_array(usable_list_of_smiles, docking_or_diversity)
+    chosen_indices = spin_roulette_selector_on_array(
+        scores, number_to_chose, docking_or_diversity
     )
 
+    top_choice_smile_order = [usable_list_of_smiles[i][0] for i in chosen_indices]
+
     return top_choice_smile_order
 
 
-def adjust_scores(usable_list_of_smiles, docking_or_diversity):
+def get_score_array(usable_list_of_smiles, docking_or_diversity):
     """
-    This function adjusts the scores appropriately. This is where we weight
-    the scores so smaller differences are more pronounced and where we adjust
-    for the fact that docking score is better with a more negative number
-    while diversity score is the smallest positive number is the most unique.
+    Get the docking or diversity score of every ligand as an array.
 
     Inputs:
     :param list usable_list_of_smiles: a list with all the information of all
         the mols in the previous generation
     :param str docking_or_diversity: an string describing either "docking"
-        or "diversity" this tells the function how to adjust the weighted
-        scores
+        (part -2 of each ligand) or "diversity" (part -1 of each ligand)
 
     Returns:
-    :returns: list adjusted: list of ligand scores which have been weighted
-        and adjusted
+    :returns: numpy.array scores: the score of every ligand
     """
 
     if docking_or_diversity == "docking":
-        weight_scores = [float(x[-1]) for x in usable_list_of_smiles]
-        # minimum is the most positive value from usable_list_of_smiles the
-        # more negative the docking score the better the dock
-        minimum = max(weight_scores) + 0.1
-        if minimum < 0:
-            minimum = 0
+        column = -2
+    elif docking_or_diversity == "diversity":
+        column = -1
+    else:
+        raise Exception("docking_or_diversity choice not an option")
 
-        adjusted = [(x ** 10) + minimum for x in weight_scores]
+    return np.array([float(x[column]) for x in usable_list_of_smiles])
 
-    elif docking_or_diversity == "diversity":
 
-        weight_scores = [float(x[-1]) for x in usable_list_of_smiles]
+def spin_roulette_selector_on_array(
+    scores, number_to_chose, docking_or_diversity, rng=None
+):
+    """
+    make an array of the indices of ligands chosen by a random weighted
+    roulette selection, without replacement, weighted by their scores.
+
+    Inputs:
+    :param numpy.array scores: the docking or diversity score of every ligand
+    :param int number_to_chose: the number of molecules to chose
+    :param str docking_or_diversity: an string describing either "docking" or
+        "diversity" this tells the function how to adjust the weighted scores
+    :param numpy.random.Generator rng: the random number generator to use. If
+        None a new one is seeded from numpy.random, so np.random.seed() still
+        makes the selection repeatable.
+
+    Returns:
+    :returns: numpy.array chosen_indices: the indices of the chosen ligands
+    """
+
+    num_ligands = len(scores)
+    if num_ligands == 0:
+        raise Exception("scores is an empty array. There is nothing to chose from.")
+
+    if number_to_chose <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    if rng is None:
+        rng = np.random.default_rng(np.random.randint(2**32, dtype=np.uint32))
+
+    adjusted = adjust_score_array(scores, docking_or_diversity)
+    probability = adjusted / adjusted.sum()
+
+    chosen_indices = rng.choice(
+        num_ligands, size=number_to_chose, replace=False, p=probability
+    )
+
+    return chosen_indices
 
+
+def adjust_score_array(scores, docking_or_diversity):
+    """
+    This function adjusts an array of scores appropriately. This is where we
+    weight the scores so smaller differences are more pronounced and where we
+    adjust for the fact that docking score is better with a more negative
+    number while diversity score is the smallest positive number is the most
+    unique.
+
+    Inputs:
+    :param numpy.array scores: the docking or diversity score of every ligand
+    :param str docking_or_diversity: an string describing either "docking"
+        or "diversity" this tells the function how to adjust the weighted
+        scores
+
+    Returns:
+    :returns: numpy.array adjusted: array of ligand scores which have been
+        weighted and adjusted
+    """
+
+    weight_scores = np.asarray(scores, dtype=np.float64)
+
+    if docking_or_diversity == "docking":
+        # minimum is the most positive score. the more negative the docking
+        # score the better the dock
+        minimum = max(weight_scores.max() + 0.1, 0)
+        adjusted = (weight_scores ** 10) + minimum
+
+    elif docking_or_diversity == "diversity":
         # adjust by squaring the number to make the discrpency larger and
         # invert by dividing 1/x^2 (because the more diverse a mol is the
         # smaller the number)
-        adjusted = [(x ** -2) for x in weight_scores]
+        adjusted = weight_scores ** -2.0
 
     else:
         raise Exception("docking_or_diversity choice not an option")
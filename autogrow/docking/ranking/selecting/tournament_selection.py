@@ -5,7 +5,12 @@ import __future__
 
 import random
 import math
-import copy
+
+import numpy as np
+
+# The most ligands entered into tournaments at once by
+# run_tournament_selector_on_array()
+MAX_TOURNAMENT_ENTRANTS_PER_BLOCK = 1000000
 
 
 def run_Tournament_Selector(
@@ -59,77 +64,72 @@ def run_Tournament_Selector(
                 "The idx to select by does not exist in the provided list_of_ligand."
             )
 
-    num_per_tourn = int(math.ceil(num_ligands * tourn_size))
+    scores = np.array([float(x[idx_to_sel]) for x in list_of_ligands])
+    chosen_indices = run_tournament_selector_on_array(
+        scores, num_to_chose, tourn_size, favor_most_negative
+    )
 
-    chosen_ligands = []
-    list_of_ligands_reduced = copy.deepcopy(list_of_ligands)
-    for i in range(0, num_to_chose):
-        chosen_ligand = run_one_tournament(
-            list_of_ligands, num_per_tourn, idx_to_sel, favor_most_negative
-        )
-        list_of_ligands_reduced = [
-            x for x in list_of_ligands_reduced if x != chosen_ligand
-        ]
-        chosen_ligands.append(chosen_ligand)
+    chosen_ligands = [list_of_ligands[i] for i in chosen_indices]
 
     return chosen_ligands
 
 
-def run_one_tournament(
-    list_of_ligands, num_per_tourn, idx_to_sel, favor_most_negative=True
+def run_tournament_selector_on_array(
+    scores, num_to_chose, tourn_size, favor_most_negative=True, rng=None
 ):
     """
-    This runs a single tournament style selection given a list of ligands and
-    specified metric. It will randomly select ligands for the tournament. The
-    best scoring ligand from the tournament will be returned.
-
-    This is done WITHOUT REPLACEMENT. This does provide an opportunity for any
-    ligand to make it into the chosen_ligands list even if it doesn't have a
-    high score, but that chance of random incorporation decreases as
-    tourn_size increases.
-        -ie tourn_size=1.0 will randomly pick N number of ligands equal to the
-            total number of ligands in the list this means theres a high chance
-            that the top ligand will be chosen enter every tournament and will
-            win everytime. This could result in a very homogenous choice.
+    This runs a tournament style selector on an array of scores (ie. the
+    scores or diversity_scores of a SourceLibrary or PopulationArrays). This
+    is the same as run_Tournament_Selector() but returns the indices of the
+    winners.
 
-        -num_per_tourn is the int(math.ceil(num_ligands * tourn_size)) so that
-            it rounds to the nearest int with a minimum values of 1
+    The ligands in each tournament are picked at random (with replacement)
+    and ties go to the ligand picked first.
 
     Inputs:
-    :param list list_of_ligands: The list of lists containing info about
-        ligands with scores to select from.
-    :param int num_per_tourn: the number of ligands to be tested in each
-        tournament.
-    :param int idx_to_sel: the idx within each sublist which will serve as
-        the metric for each tournament.
+    :param numpy.array scores: the score of every ligand to select by
+    :param int num_to_chose: the number of ligands to be chosen total this
+        also is the number of tournaments that will be conducted.
+    :param float tourn_size: percentage of the total pool of ligands to be
+        tested in each tournament.
     :param bol favor_most_negative: True if the most negative number is
         the best solution. False if the most positive number is the best
         solution default to True.
+    :param numpy.random.Generator rng: the random number generator to use. If
+        None a new one is seeded from random, so random.seed() still makes the
+        selection repeatable.
 
     Returns:
-    :returns: list chosen_option: a list with a single ligand chosen from a
-        single tournament
+    :returns: numpy.array chosen_indices: the index of the winner of each
+        tournament, with potential for redundancy
     """
 
-    num_ligands = len(list_of_ligands)
+    num_ligands = len(scores)
+    if num_ligands == 0:
+        raise Exception("scores is an empty array. There is nothing to chose from.")
+
+    if num_to_chose <= 0:
+        return np.zeros(0, dtype=np.int64)
 
-    chosen_option = []
-    temp = []
-    for i in range(0, num_per_tourn):
-        temp.append(i)
-        if i == 0:
-            chosen_option = list_of_ligands[random.randint(0, num_ligands - 1)]
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(32))
+
+    scores = np.asarray(scores)
+    num_per_tourn = int(math.ceil(num_ligands * tourn_size))
+    num_per_tourn = max(num_per_tourn, 1)
+
+    # Run the tournaments in blocks so that the entrants of all tournaments
+    # are never held in memory at once
+    tourns_per_block = max(1, MAX_TOURNAMENT_ENTRANTS_PER_BLOCK // num_per_tourn)
+
+    chosen_indices = []
+    for block_start in range(0, num_to_chose, tourns_per_block):
+        num_tourns = min(tourns_per_block, num_to_chose - block_start)
+        entrants = rng.integers(0, num_ligands, size=(num_tourns, num_per_tourn))
+        if favor_most_negative is True:
+            winner_columns = np.argmin(scores[entrants], axis=1)
         else:
-            choice = list_of_ligands[random.randint(0, num_ligands - 1)]
-            if favor_most_negative is True:
-                if float(chosen_option[idx_to_sel]) > float(choice[idx_to_sel]):
-                    chosen_option = choice
-                else:
-                    continue
-            elif favor_most_negative is False:
-                if float(chosen_option[idx_to_sel]) < float(choice[idx_to_sel]):
-                    chosen_option = choice
-                else:
-                    continue
-
-    return chosen_option
+            winner_columns = np.argmax(scores[entrants], axis=1)
+        chosen_indices.append(entrants[np.arange(num_tourns), winner_columns])
+
+    return np.concatenate(chosen_indices)
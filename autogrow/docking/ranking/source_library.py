@@ -0,0 +1,278 @@
+"""
+This script holds a compact, columnar copy of a source compound list or a
+ranked generation .smi file.
+
+Large fragment libraries can have millions of ligands. Holding each ligand as
+a Python list of strings takes several hundred bytes per ligand, so instead
+every ligand's line is stored as UTF-8 text in a single NumPy byte array, with
+the columns needed for seed selection kept as NumPy arrays:
+    - row_offsets: where each ligand's line starts in row_text
+    - smiles_lengths and id_lengths: the length of the SMILES string and the
+        ID at the start of each line
+    - scores: the fitness (docking) score, part -2 of each line, as float32.
+        NaN if the ligand has no score.
+    - diversity_scores: the diversity score, part -1 of each line, as
+        float32. NaN if the ligand has no score.
+    - smiles_keys and row_keys: hashes of each SMILES string and each line,
+        used to find duplicates without comparing strings
+
+A ligand is only made into a list (ie. ['CCC', 'ZINC123', '-7.1', '0.4']) when
+it is chosen.
+
+The keys are made with Python's hash(), so they are only valid in the process
+which built the library.
+"""
+import __future__
+
+import os
+
+import numpy as np
+
+
+# Number of lines read from a .smi file at a time
+SOURCE_LIBRARY_CHUNK_SIZE = 20000
+
+
+def iter_smi_file_chunks(infile, chunk_size=SOURCE_LIBRARY_CHUNK_SIZE):
+    """
+    Read a .smi file a chunk of lines at a time. Each line is split into its
+    parts the same way as Ranking.get_usable_format(), so that only one chunk
+    of lines is held as lists at a time.
+
+    Inputs:
+    :param str infile: the PATH of a formatted .smi file
+    :param int chunk_size: the number of lines in each chunk
+
+    Returns:
+    :returns: list chunk: (yielded) a list of the split lines of up to
+        chunk_size lines. ie. [['CCC', 'ZINC123'], ['CCCC', 'ZINC456']]
+    """
+
+    if os.path.exists(infile) is False:
+        print("\nFile of Source compounds does not exist: {}\n".format(infile))
+        raise Exception("File of Source compounds does not exist")
+
+    chunk = []
+    with open(infile) as smiles_file:
+        for line in smiles_file:
+            line = line.replace("\n", "")
+            parts = line.split("\t")
+            if len(parts) == 1:
+                # split line into parts separated by 4-spaces
+                parts = line.split("    ")
+            chunk.append(parts)
+
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+
+    if len(chunk) != 0:
+        yield chunk
+
+
+def get_float_or_nan(value):
+    """
+    Convert a column of a .smi line to a float.
+
+    Inputs:
+    :param str value: the value to convert
+
+    Returns:
+    :returns: float value: the value as a float, or NaN if it isn't a number
+    """
+
+    try:
+        return float(value)
+    except:
+        return np.nan
+
+
+class SourceLibrary(object):
+    """
+    A columnar list of ligands. Ligands are added a chunk at a time with
+    add_rows() and the chunks are joined into single arrays by finalize(),
+    which must be called before the library is used.
+    """
+
+    def __init__(self):
+        """
+        Make an empty library.
+        """
+
+        self.row_text = np.zeros(0, dtype=np.uint8)
+        self.row_offsets = np.zeros(1, dtype=np.int64)
+        self.smiles_lengths = np.zeros(0, dtype=np.int32)
+        self.id_lengths = np.zeros(0, dtype=np.int32)
+        self.scores = np.zeros(0, dtype=np.float32)
+        self.diversity_scores = np.zeros(0, dtype=np.float32)
+        self.smiles_keys = np.zeros(0, dtype=np.int64)
+        self.row_keys = np.zeros(0, dtype=np.int64)
+
+        # Column arrays of each chunk added since the last finalize()
+        self.pending_chunks = []
+
+    def __len__(self):
+        """
+        Returns:
+        :returns: int num_ligands: the number of ligands in the library
+        """
+
+        return len(self.row_offsets) - 1
+
+    def add_rows(self, rows):
+        """
+        Add a chunk of ligands to the library.
+
+        Inputs:
+        :param list rows: a list of ligands, each a list of the parts of its
+            .smi line with at least a SMILES string and an ID. ie. [['CCC',
+            'ZINC123', '-7.1', '0.4'], ...]
+        """
+
+        if len(rows) == 0:
+            return
+
+        lines = ["\t".join(row) for row in rows]
+        encoded_lines = [line.encode("utf-8") for line in lines]
+        row_lengths = np.array([len(x) for x in encoded_lines], dtype=np.int64)
+
+        chunk = {
+            "row_text": np.frombuffer(b"".join(encoded_lines), dtype=np.uint8),
+            "row_lengths": row_lengths,
+            "smiles_lengths": np.array(
+                [len(row[0].encode("utf-8")) for row in rows], dtype=np.int32
+            ),
+            "id_lengths": np.array(
+                [len(row[1].encode("utf-8")) for row in rows], dtype=np.int32
+            ),
+            "scores": np.array(
+                [get_float_or_nan(row[-2]) for row in rows], dtype=np.float32
+            ),
+            "diversity_scores": np.array(
+                [get_float_or_nan(row[-1]) for row in rows], dtype=np.float32
+            ),
+            "smiles_keys": np.array([hash(row[0]) for row in rows], dtype=np.int64),
+            "row_keys": np.array([hash(line) for line in lines], dtype=np.int64),
+        }
+        self.pending_chunks.append(chunk)
+
+    def finalize(self):
+        """
+        Join the chunks added with add_rows() into the library's arrays.
+        """
+
+        if len(self.pending_chunks) == 0:
+            return
+
+        chunks = self.pending_chunks
+        self.pending_chunks = []
+
+        row_lengths = np.concatenate([x["row_lengths"] for x in chunks])
+        new_offsets = self.row_offsets[-1] + np.cumsum(row_lengths)
+        self.row_offsets = np.concatenate([self.row_offsets, new_offsets])
+
+        for column in [
+            "row_text",
+            "smiles_lengths",
+            "id_lengths",
+            "scores",
+            "diversity_scores",
+            "smiles_keys",
+            "row_keys",
+        ]:
+            arrays = [getattr(self, column)] + [x[column] for x in chunks]
+            setattr(self, column, np.concatenate(arrays))
+
+    def get_smiles(self, index):
+        """
+        Get the SMILES string of a ligand.
+
+        Inputs:
+        :param int index: the index of the ligand
+
+        Returns:
+        :returns: str smiles: the SMILES string of the ligand
+        """
+
+        start = self.row_offsets[index]
+        end = start + self.smiles_lengths[index]
+        return self.row_text[start:end].tobytes().decode("utf-8")
+
+    def get_id(self, index):
+        """
+        Get the ID of a ligand.
+
+        Inputs:
+        :param int index: the index of the ligand
+
+        Returns:
+        :returns: str lig_id: the name/ID of the ligand
+        """
+
+        start = self.row_offsets[index] + self.smiles_lengths[index] + 1
+        end = start + self.id_lengths[index]
+        return self.row_text[start:end].tobytes().decode("utf-8")
+
+    def get_row(self, index):
+        """
+        Get all of the information about a ligand as a list, in the same
+        format as Ranking.get_usable_format().
+
+        Inputs:
+        :param int index: the index of the ligand
+
+        Returns:
+        :returns: list row: the parts of the ligand's .smi line. ie. ['CCC',
+            'ZINC123', '-7.1', '0.4']
+        """
+
+        start = self.row_offsets[index]
+        end = self.row_offsets[index + 1]
+        return self.row_text[start:end].tobytes().decode("utf-8").split("\t")
+
+    def get_rows(self, indices):
+        """
+        Get all of the information about several ligands.
+
+        Inputs:
+        :param iter indices: the indices of the ligands
+
+        Returns:
+        :returns: list rows: a list of each ligand's row, in the order of
+            indices
+        """
+
+        return [self.get_row(int(i)) for i in indices]
+
+    def iter_rows(self):
+        """
+        Go through every ligand in the library without making them all into
+        lists at once.
+
+        Returns:
+        :returns: list row: (yielded) the parts of each ligand's .smi line
+        """
+
+        for index in range(len(self)):
+            yield self.get_row(index)
+
+    def to_list(self):
+        """
+        Get every ligand in the library as a list.
+
+        Returns:
+        :returns: list usable_list_of_smiles: list of SMILES and their
+            associated information, as returned by Ranking.get_usable_format()
+        """
+
+        return self.get_rows(range(len(self)))
+
+    def has_scores(self):
+        """
+        Check if every ligand in the library has a docking score.
+
+        Returns:
+        :returns: bool has_scores: True if every ligand has a score
+        """
+
+        return bool(len(self) != 0 and not np.isnan(self.scores).any())
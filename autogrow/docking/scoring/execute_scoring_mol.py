@@ -4,7 +4,12 @@ This function handles the scoring/rescoring of docked molecules.
 
 import __future__
 
+import os
+
 from autogrow.docking.docking_class.get_child_class import get_all_subclasses
+import autogrow.utils.checkpoint_journal as CheckpointJournal
+import autogrow.utils.generation_store as GenerationStore
+import autogrow.utils.stage_metrics as StageMetrics
 
 # importing scoring_functions is necessary to find rescoring modules
 import autogrow.docking.scoring.scoring_classes.scoring_functions
@@ -35,6 +40,7 @@ def pick_run_class_dict(scoring_choice):
 
 ############
 ############
+@StageMetrics.timed_stage("run_scoring_common")
 def run_scoring_common(vars, smile_file, folder_to_search):
     """
     This section runs the functions common to all scoring functions.
@@ -66,7 +72,7 @@ def run_scoring_common(vars, smile_file, folder_to_search):
     # be taken from the .smi file gen_n_to_convert.smi file Keys are the
     # shortened name of the ligand id and the item is the SMILES string and
     # the ligand id full name
-    smiles_dict = make_dict_of_smiles(smile_file)
+    smiles_dict = make_dict_of_smiles(smile_file, vars["output_directory"])
 
     # Use a temp vars dict so you don't put mpi multiprocess info through
     # itself...
@@ -118,8 +124,12 @@ def run_scoring_common(vars, smile_file, folder_to_search):
 
     # Format for list_of_raw_data must be [lig_id_shortname, any_details,
     # fitness_score_to_use]
-    list_of_list_of_lig_data = vars["parallelizer"].run(
-        job_input_files_to_score, score_files_multithread
+    list_of_list_of_lig_data = StageMetrics.run_jobs(
+        vars["parallelizer"],
+        "scoring",
+        job_input_files_to_score,
+        score_files_multithread,
+        count_failures=lambda result: result is None,
     )
 
     # Convert all list_of_list_of_lig_data to a searchable dictionary This
@@ -162,24 +172,68 @@ def run_rescoring(vars, scoring_object, files_to_score):
 
     files_to_score = [x for x in files_to_score if x is not None]
 
-    # Run Rescoring If applicable (All classes should have this even if its
-    # just returning None)
-    job_input_files_to_score = tuple(
-        [tuple([file_path, scoring_object]) for file_path in files_to_score]
-    )
+    # Files rescored by an earlier attempt at this generation (see
+    # checkpoint_journal.py) aren't rescored again
+    previously_rescored = []
+    if len(files_to_score) != 0:
+        rescored_files = CheckpointJournal.get_completed(
+            CheckpointJournal.get_gen_dir_of_pdbs_file(files_to_score[0]),
+            CheckpointJournal.RESCORED_FILE_STAGE,
+        )
+        previously_rescored = [
+            [rescored_files[os.path.basename(x)], True]
+            for x in files_to_score
+            if os.path.basename(x) in rescored_files
+        ]
+        files_to_score = [
+            x for x in files_to_score if os.path.basename(x) not in rescored_files
+        ]
 
-    # Format for list_of_raw_data must be [lig_id_shortname, any_details,
-    # fitness_score_to_use]
-    results_rescore = vars["parallelizer"].run(
-        job_input_files_to_score, rescore_single_file
-    )
+    if scoring_object.uses_batch_rescoring() is True:
+        # Split the files into one batch per processor so each worker loads
+        # the receptor and any models once and rescores its whole batch.
+        num_batches = vars["parallelizer"].return_node()
+        job_input_files_to_score = tuple(
+            [
+                tuple([batch, scoring_object])
+                for batch in split_into_batches(files_to_score, num_batches)
+            ]
+        )
+        results_rescore = StageMetrics.run_jobs(
+            vars["parallelizer"],
+            "rescoring",
+            job_input_files_to_score,
+            rescore_batch_of_files,
+            count_failures=lambda result: len([x for x in result if x[1] is False]),
+            count_items=lambda batch, scoring_object: len(batch),
+        )
+        results_rescore = [x for batch in results_rescore for x in batch]
+    else:
+        # Run Rescoring If applicable (All classes should have this even if
+        # its just returning None)
+        job_input_files_to_score = tuple(
+            [tuple([file_path, scoring_object]) for file_path in files_to_score]
+        )
+
+        # Format for list_of_raw_data must be [lig_id_shortname,
+        # any_details, fitness_score_to_use]
+        results_rescore = StageMetrics.run_jobs(
+            vars["parallelizer"],
+            "rescoring",
+            job_input_files_to_score,
+            rescore_single_file,
+            count_failures=lambda result: type(result) is list
+            and result[1] is False,
+        )
 
-    if len(results_rescore) == 0:
+    if len(results_rescore) == 0 and len(previously_rescored) == 0:
         return files_to_score
-    if results_rescore[0] == "Not Applicable":
+    if len(results_rescore) != 0 and results_rescore[0] == "Not Applicable":
         return files_to_score
 
-    results_rescore = [x for x in results_rescore if x is not None]
+    results_rescore = previously_rescored + [
+        x for x in results_rescore if x is not None
+    ]
     completed_rescore = [x[0] for x in results_rescore if x[1] is True]
     failed_to_rescore = [x[0] for x in results_rescore if x[1] is False]
 
@@ -221,7 +275,83 @@ def rescore_single_file(file_path, scoring_object):
         all NN1 files
     """
 
-    return scoring_object.run_rescoring(file_path)
+    result = scoring_object.run_rescoring(file_path)
+    record_rescored_file(file_path, result)
+
+    return result
+
+
+def rescore_batch_of_files(list_of_files, scoring_object):
+    """
+    Run scoring_object.run_rescoring_batch through this function so
+    multithread doesn't break.
+
+    Inputs:
+    :param list list_of_files: Paths to vina output files to be rescored
+    :param object scoring_object: object that rescores in batches such as an
+        NN1 class object
+
+    Returns:
+    :returns: list results of a rescoring function: [[file_path,
+        it_rescored], ...] [PATH, True] means it passed [PATH, False] means it
+        failed
+    """
+
+    results = scoring_object.run_rescoring_batch(list_of_files)
+    if len(results) == len(list_of_files):
+        for file_path, result in zip(list_of_files, results):
+            record_rescored_file(file_path, result)
+
+    return results
+
+
+def record_rescored_file(file_path, result):
+    """
+    Record a file which was rescored in its generation's checkpoint journal.
+    Files which failed to be rescored aren't recorded.
+
+    Inputs:
+    :param str file_path: Path to the vina output file which was rescored
+    :param list result: the result of rescoring the file: [PATH, True] if it
+        passed
+    """
+
+    if type(result) is not list or len(result) != 2 or result[1] is not True:
+        return
+
+    CheckpointJournal.record(
+        CheckpointJournal.get_gen_dir_of_pdbs_file(file_path),
+        CheckpointJournal.RESCORED_FILE_STAGE,
+        os.path.basename(file_path),
+        result[0],
+    )
+
+
+def split_into_batches(list_of_items, num_batches):
+    """
+    Split a list into at most num_batches contiguous batches of nearly equal
+    size. Empty batches are not returned.
+
+    Inputs:
+    :param list list_of_items: the list to split
+    :param int num_batches: the number of batches to make
+
+    Returns:
+    :returns: list batches: a list of lists
+    """
+
+    num_batches = max(1, min(int(num_batches), len(list_of_items)))
+    batch_size, remainder = divmod(len(list_of_items), num_batches)
+
+    batches = []
+    start = 0
+    for i in range(num_batches):
+        end = start + batch_size + (1 if i < remainder else 0)
+        if end > start:
+            batches.append(list_of_items[start:end])
+        start = end
+
+    return batches
 
 
 def make_lig_score_dictionary(list_of_list_of_lig_data):
@@ -301,7 +431,7 @@ def score_files_multithread(
 ############
 
 
-def make_dict_of_smiles(smile_file):
+def make_dict_of_smiles(smile_file, output_directory=None):
     """
     This will take a .smi file and make a dictionary with all of the info
     about the smiles. This list won't have scores yet but will have all of the
@@ -309,31 +439,40 @@ def make_dict_of_smiles(smile_file):
 
     The keys will be the shorthand id for each ligand.
 
+    If the run's generation store has an up-to-date copy of the .smi file the
+    ligands are read from it instead.
+
     Inputs:
     :param str smile_file: the path for the receptor pdb
+    :param str output_directory: the output directory of the run. If None
+        the .smi file is always read.
 
     Returns:
     :return dict smiles_dict: a list of ligand info before docking
     """
 
-    smiles_dict = {}
-    # load smile file and convert to list with index
-    with open(str(smile_file), "r") as smi:
+    ligand_list = None
+    if output_directory is not None:
+        ligand_list = GenerationStore.get_ligand_list(output_directory, smile_file)
 
-        # index for this for-loop is zero based indexing while ligand naming
-        # index is one-based-indexing so we will use index = index+1
-        for index, line in enumerate(smi.readlines()):
+    if ligand_list is None:
+        # load smile file and convert to list with index
+        with open(str(smile_file), "r") as smi:
+            ligand_list = [
+                line.replace("\n", "").split("\t") for line in smi.readlines()
+            ]
 
-            split_line = line.replace("\n", "").split("\t")
-            ligand_name = line.replace("\n", "").split("\t")[1]
-            # ligand_name should be something like: ['CCC',
-            # '(ZINC123+ZINC345)Gen_0_Cross_99571'] or ['CCC', 'ZINC123']
+    smiles_dict = {}
+    for split_line in ligand_list:
+        # ligand_name should be something like: ['CCC',
+        # '(ZINC123+ZINC345)Gen_0_Cross_99571'] or ['CCC', 'ZINC123']
+        ligand_name = split_line[1]
 
-            if len(ligand_name.split(")")) == 2:
-                lig_name_short = ligand_name.split(")")[1]
-            elif len(ligand_name.split(")")) == 1:
-                lig_name_short = ligand_name
+        if len(ligand_name.split(")")) == 2:
+            lig_name_short = ligand_name.split(")")[1]
+        elif len(ligand_name.split(")")) == 1:
+            lig_name_short = ligand_name
 
-            smiles_dict[lig_name_short] = split_line
+        smiles_dict[lig_name_short] = split_line
 
     return smiles_dict
@@ -0,0 +1,582 @@
+"""
+In-process NNScore1 engine.
+
+This reproduces the scoring of the bundled NNScore.py script (NNScore 1.1)
+without starting a new python interpreter for every docked file. The receptor
+PDBQT and the FFNet network files are loaded once per process and the
+2 Angstrom/4 Angstrom proximity and coulomb features are computed with NumPy
+distance matrices. All poses handed to the engine are then scored by every
+network as a single matrix batch.
+
+If you use NNScore in your research, please cite the following reference:
+NNScore: A Neural-Network-Based Scoring Function for the Characterization of
+Protein-Ligand Complexes. Jacob D. Durrant, J. Andrew McCammon. Journal of
+Chemical Information and Modeling, 2010, 50 (10), pp 1865-1871.
+"""
+import __future__
+
+import os
+
+import numpy as np
+
+# These are the atom-type pairs the NNScore1 networks were trained on. The
+# order of these lists defines the order of the network input vector and
+# must match NNScore.py exactly.
+CHARGE_TYPE_COMBOS = [
+    "A_A", "A_BR", "A_C", "A_CL", "A_F", "A_FE", "A_HD", "A_I", "A_N", "A_NA",
+    "A_OA", "A_P", "A_S", "A_SA", "A_ZN", "BR_C", "BR_HD", "BR_N", "BR_OA",
+    "C_C", "C_CL", "C_F", "C_FE", "C_HD", "C_I", "CL_HD", "CL_N", "CL_OA",
+    "CL_SA", "C_MG", "C_MN", "C_N", "C_NA", "C_OA", "C_P", "C_S", "C_SA",
+    "C_ZN", "FE_HD", "FE_N", "FE_OA", "F_HD", "F_N", "F_OA", "F_SA", "HD_HD",
+    "HD_I", "HD_MG", "HD_MN", "HD_N", "HD_NA", "HD_OA", "HD_P", "HD_S",
+    "HD_SA", "HD_ZN", "I_N", "I_OA", "MG_NA", "MG_OA", "MG_P", "MN_N", "MN_OA",
+    "MN_P", "NA_OA", "NA_SA", "NA_ZN", "N_N", "N_NA", "N_OA", "N_P", "N_S",
+    "N_SA", "N_ZN", "OA_OA", "OA_P", "OA_S", "OA_SA", "OA_ZN", "P_ZN", "SA_SA",
+    "SA_ZN", "S_ZN",
+]
+PROXIMITY_2_TYPE_COMBOS = [
+    "A_HD", "C_HD", "C_OA", "C_SA", "FE_HD", "HD_HD", "HD_MG", "HD_N", "HD_NA",
+    "HD_OA", "HD_ZN", "MG_OA", "NA_ZN", "OA_ZN",
+]
+PROXIMITY_4_TYPE_COMBOS = list(CHARGE_TYPE_COMBOS)
+LIG_TYPES_COMBOS = [
+    "A", "BR", "C", "CL", "F", "HD", "I", "N", "NA", "OA", "P", "S", "SA",
+]
+
+NUM_FEATURES = (
+    len(CHARGE_TYPE_COMBOS)
+    + len(PROXIMITY_2_TYPE_COMBOS)
+    + len(PROXIMITY_4_TYPE_COMBOS)
+    + len(LIG_TYPES_COMBOS)
+    + 1
+)
+
+# Score assigned by NNScore1 to complexes containing untrained atom types
+BAD_TRAINING_SCORE = -999999.9
+
+# Engines already built in this process. Keyed by receptor, networks and the
+# receptor modification time so a changed receptor is reloaded.
+ENGINE_CACHE = {}
+
+
+def make_key(string1, string2):
+    """
+    Make the alphabetically ordered atom-type pair key used by NNScore1.
+
+    Inputs:
+    :param str string1: the first atom type
+    :param str string2: the second atom type
+
+    Returns:
+    :returns: str key: the two atom types joined by an underscore with the
+        alphabetically smaller type first.
+    """
+
+    if string1 < string2:
+        return string1 + "_" + string2
+    return string2 + "_" + string1
+
+
+def parse_pdbqt_lines(lines):
+    """
+    Parse the atoms of a PDBQT model the same way NNScore.py does.
+
+    Inputs:
+    :param list lines: list of lines from a pdbqt file or a single model of a
+        vina output file
+
+    Returns:
+    :returns: np.array coordinates: an (N, 3) float array of atom coordinates
+    :returns: list atom_types: a list of the AutoDock atom types of each atom
+    :returns: np.array charges: an (N,) float array of atom partial charges
+    :returns: int entropy_count: the number of active torsions
+    """
+
+    coordinates = []
+    atom_types = []
+    charges = []
+    entropy_count = 0
+    for line in lines:
+        if len(line) < 7:
+            continue
+
+        if "between atoms" in line and " A " in line:
+            entropy_count = entropy_count + 1
+
+        if line[0:5] == "ATOM " or line[0:7] == "HETATM ":
+            coordinates.append(
+                [float(line[30:38]), float(line[38:46]), float(line[46:54])]
+            )
+            atom_types.append(line[77:79].strip().upper())
+            charges.append(float(line[69:76]))
+
+    coordinates = np.array(coordinates, dtype=np.float64).reshape(-1, 3)
+    charges = np.array(charges, dtype=np.float64)
+
+    return coordinates, atom_types, charges, entropy_count
+
+
+def split_vina_output(lines):
+    """
+    Split the lines of a vina output file into its individual models.
+
+    This mirrors how NNScore.py walks through a -vina_output file so that each
+    pose gets the same label (ie "MODEL 1").
+
+    Inputs:
+    :param list lines: list of lines of a vina output file
+
+    Returns:
+    :returns: list poses: a list of [label, list_of_lines] for every pose
+    """
+
+    poses = []
+    the_lines = []
+    label = ""
+    for line in lines:
+        if "MODEL " in line:
+            if len(the_lines) != 0:
+                poses.append([label, the_lines])
+            the_lines = [line.strip()]
+            label = line.strip()
+        else:
+            the_lines.append(line.strip())
+
+    poses.append([label, the_lines])
+
+    return poses
+
+
+class BatchFFNet(object):
+    """
+    A feed-forward network from an NNScore1 .net file that evaluates a whole
+    batch of input vectors at once.
+
+    The .net files list connections grouped by target unit. Consecutive
+    targets that do not feed into each other are fused into a single layer so
+    each layer is one matrix multiplication over the batch.
+    """
+
+    def __init__(self, filename):
+        """
+        Load a network file.
+
+        Inputs:
+        :param str filename: path to a .net network file
+        """
+
+        weights = []
+        conec = []
+        inno = []
+        outno = []
+        eni = []
+        deo = []
+        with open(filename, "r") as f:
+            for line in f.readlines():
+                if line[:8] == "WEIGHTS:":
+                    weights.append(float(line[8:]))
+                elif line[:6] == "CONEC:":
+                    pair = line[6:].split(" ")
+                    conec.append([int(pair[0]), int(pair[1])])
+                elif line[:5] == "INNO:":
+                    inno.append(int(line[5:]))
+                elif line[:6] == "OUTNO:":
+                    outno.append(int(line[6:]))
+                elif line[:4] == "ENI:":
+                    pair = line[4:].split(" ")
+                    eni.append([float(pair[0]), float(pair[1])])
+                elif line[:4] == "DEO:":
+                    pair = line[4:].split(" ")
+                    deo.append([float(pair[0]), float(pair[1])])
+
+        self.filename = filename
+        self.unit_count = max([max(pair) for pair in conec]) + 1
+        self.inno = np.array(inno, dtype=np.int64)
+        self.outno = np.array(outno, dtype=np.int64)
+        self.eni = np.array(eni, dtype=np.float64)
+        self.deo = np.array(deo, dtype=np.float64)
+        self.layers = self.build_layers(weights, conec)
+
+    def build_layers(self, weights, conec):
+        """
+        Group the connections into layers of independent target units.
+
+        Inputs:
+        :param list weights: the weight of each connection
+        :param list conec: list of [source, target] connections. A source of
+            -1 is the bias.
+
+        Returns:
+        :returns: list layers: a list of [targets, weight_matrix, bias] where
+            weight_matrix has the shape (unit_count, len(targets))
+        """
+
+        target_order = []
+        connections = {}
+        for weight, (src, trg) in zip(weights, conec):
+            if trg not in connections:
+                target_order.append(trg)
+                connections[trg] = []
+            connections[trg].append([src, weight])
+
+        grouped_layers = []
+        current_targets = []
+        for trg in target_order:
+            sources = [src for src, weight in connections[trg]]
+            if any([src in current_targets for src in sources]):
+                # this target depends on a unit in the current layer
+                grouped_layers.append(current_targets)
+                current_targets = []
+            current_targets.append(trg)
+        if len(current_targets) != 0:
+            grouped_layers.append(current_targets)
+
+        layers = []
+        for targets in grouped_layers:
+            weight_matrix = np.zeros((self.unit_count, len(targets)))
+            bias = np.zeros(len(targets))
+            for col, trg in enumerate(targets):
+                for src, weight in connections[trg]:
+                    if src == -1:
+                        bias[col] = bias[col] + weight
+                    else:
+                        weight_matrix[src, col] = weight_matrix[src, col] + weight
+            layers.append([np.array(targets, dtype=np.int64), weight_matrix, bias])
+
+        return layers
+
+    def call(self, inputs):
+        """
+        Run the network on a batch of input vectors.
+
+        Inputs:
+        :param np.array inputs: an (B, num_inputs) array of network inputs
+
+        Returns:
+        :returns: np.array outputs: an (B, num_outputs) array of the
+            denormalized network outputs
+        """
+
+        units = np.zeros((inputs.shape[0], self.unit_count))
+        units[:, self.inno] = self.eni[:, 0] * inputs + self.eni[:, 1]
+
+        with np.errstate(over="ignore"):
+            for targets, weight_matrix, bias in self.layers:
+                units[:, targets] = 1.0 / (
+                    1.0 + np.exp(-(np.dot(units, weight_matrix) + bias))
+                )
+
+        return self.deo[:, 0] * units[:, self.outno] + self.deo[:, 1]
+
+
+class NNScore1Engine(object):
+    """
+    Scores docked poses against a single receptor with an ensemble of
+    NNScore1 networks.
+    """
+
+    def __init__(self, receptor_file, network_files):
+        """
+        Load and preprocess the receptor and the networks.
+
+        Inputs:
+        :param str receptor_file: path to the receptor pdbqt
+        :param list network_files: list of paths to .net network files
+        """
+
+        if len(network_files) == 0:
+            raise Exception("NNScore1 requires at least one network file.")
+
+        self.receptor_file = receptor_file
+        self.networks = [BatchFFNet(net) for net in network_files]
+
+        with open(receptor_file, "r") as f:
+            rec_coords, rec_types, rec_charges, _ = parse_pdbqt_lines(f.readlines())
+
+        self.rec_coords = rec_coords
+        self.rec_charges = rec_charges
+
+        # Index the receptor atom types once and build lookup tables from
+        # (ligand type, receptor type) to the column of each feature block.
+        # A value of -1 means the pair is not trained.
+        rec_type_list = sorted(set(rec_types))
+        rec_type_index = {t: i for i, t in enumerate(rec_type_list)}
+        self.rec_type_ids = np.array(
+            [rec_type_index[t] for t in rec_types], dtype=np.int64
+        )
+        self.lig_type_index = {t: i for i, t in enumerate(LIG_TYPES_COMBOS)}
+
+        self.charge_table = self.make_pair_table(CHARGE_TYPE_COMBOS, rec_type_list)
+        self.proximity_2_table = self.make_pair_table(
+            PROXIMITY_2_TYPE_COMBOS, rec_type_list
+        )
+        self.proximity_4_table = self.make_pair_table(
+            PROXIMITY_4_TYPE_COMBOS, rec_type_list
+        )
+
+    def make_pair_table(self, combos, rec_type_list):
+        """
+        Make a lookup table from (ligand type id, receptor type id) to the
+        position of that pair's key in combos.
+
+        Inputs:
+        :param list combos: the list of keys of a feature block
+        :param list rec_type_list: the receptor atom types
+
+        Returns:
+        :returns: np.array table: an int array of shape (num_lig_types,
+            num_rec_types). -1 marks pairs the networks were not trained on.
+        """
+
+        combo_index = {key: i for i, key in enumerate(combos)}
+        table = np.full((len(LIG_TYPES_COMBOS), len(rec_type_list)), -1, np.int64)
+        for lig_id, lig_type in enumerate(LIG_TYPES_COMBOS):
+            for rec_id, rec_type in enumerate(rec_type_list):
+                key = make_key(lig_type, rec_type)
+                if key in combo_index:
+                    table[lig_id, rec_id] = combo_index[key]
+
+        return table
+
+    def featurize(self, ligand_lines):
+        """
+        Compute the NNScore1 input vector for a single ligand pose.
+
+        Inputs:
+        :param list ligand_lines: the pdbqt lines of one pose
+
+        Returns:
+        :returns: np.array features: the network input vector or None if the
+            pose has no atoms
+        :returns: bool bad_training: True if the pose contains atom types or
+            atom-type pairs the networks were not trained on
+        """
+
+        lig_coords, lig_types, lig_charges, entropy_count = parse_pdbqt_lines(
+            ligand_lines
+        )
+        if len(lig_types) == 0:
+            return None, True
+
+        features = np.zeros(NUM_FEATURES)
+        lig_type_ids = np.array(
+            [self.lig_type_index.get(t, -1) for t in lig_types], dtype=np.int64
+        )
+        if np.any(lig_type_ids == -1):
+            return features, True
+
+        # Only receptor atoms inside the ligand bounding box (padded by the
+        # 4 Angstrom cutoff) can contribute.
+        lower = lig_coords.min(axis=0) - 4.0
+        upper = lig_coords.max(axis=0) + 4.0
+        near = np.nonzero(
+            np.all((self.rec_coords >= lower) & (self.rec_coords <= upper), axis=1)
+        )[0]
+        rec_coords = self.rec_coords[near]
+
+        diff = lig_coords[:, np.newaxis, :] - rec_coords[np.newaxis, :, :]
+        dist_matrix = np.sqrt(np.sum(diff * diff, axis=2))
+
+        lig_idx, rec_idx = np.nonzero(dist_matrix < 4.0)
+        dists = dist_matrix[lig_idx, rec_idx]
+        pair_lig_types = lig_type_ids[lig_idx]
+        pair_rec_types = self.rec_type_ids[near][rec_idx]
+
+        num_charge = len(CHARGE_TYPE_COMBOS)
+        num_prox_2 = len(PROXIMITY_2_TYPE_COMBOS)
+        num_prox_4 = len(PROXIMITY_4_TYPE_COMBOS)
+
+        charge_cols = self.charge_table[pair_lig_types, pair_rec_types]
+        close = dists < 2.0
+        prox_2_cols = self.proximity_2_table[
+            pair_lig_types[close], pair_rec_types[close]
+        ]
+        prox_4_cols = self.proximity_4_table[
+            pair_lig_types[~close], pair_rec_types[~close]
+        ]
+        if np.any(charge_cols == -1) or np.any(prox_2_cols == -1) or np.any(
+            prox_4_cols == -1
+        ):
+            return features, True
+
+        coulomb = lig_charges[lig_idx] * self.rec_charges[near][rec_idx] / dists
+
+        start = 0
+        features[start : start + num_charge] = np.bincount(
+            charge_cols, weights=coulomb, minlength=num_charge
+        )
+        start = start + num_charge
+        features[start : start + num_prox_2] = np.bincount(
+            prox_2_cols, minlength=num_prox_2
+        )
+        start = start + num_prox_2
+        features[start : start + num_prox_4] = np.bincount(
+            prox_4_cols, minlength=num_prox_4
+        )
+        start = start + num_prox_4
+        features[start : start + len(LIG_TYPES_COMBOS)] = np.bincount(
+            lig_type_ids, minlength=len(LIG_TYPES_COMBOS)
+        )
+        features[-1] = entropy_count
+
+        return features, False
+
+    def score_features(self, feature_matrix, bad_training):
+        """
+        Score a batch of feature vectors with every network.
+
+        Inputs:
+        :param np.array feature_matrix: an (B, NUM_FEATURES) array
+        :param np.array bad_training: an (B,) bool array marking poses with
+            untrained atom types
+
+        Returns:
+        :returns: np.array scores: an (B,) array of the average network score
+            of each pose
+        """
+
+        total = np.zeros(feature_matrix.shape[0])
+        for net in self.networks:
+            output = net.call(feature_matrix)
+            total = total + (output[:, 0] - output[:, 1])
+        scores = total / len(self.networks)
+        scores[bad_training] = BAD_TRAINING_SCORE
+
+        return scores
+
+    def score_vina_files(self, list_of_vina_files):
+        """
+        Score every pose of every vina output file as a single batch.
+
+        Inputs:
+        :param list list_of_vina_files: list of paths to vina output files
+
+        Returns:
+        :returns: list file_results: for each file either None (if it could
+            not be read or has no poses) or a list of [label, score] for every
+            pose
+        """
+
+        pose_owner = []
+        pose_labels = []
+        features = []
+        bad_training = []
+        for file_index, vina_file in enumerate(list_of_vina_files):
+            try:
+                with open(vina_file, "r") as f:
+                    lines = f.readlines()
+                for label, pose_lines in split_vina_output(lines):
+                    pose_features, is_bad = self.featurize(pose_lines)
+                    if pose_features is None:
+                        continue
+                    pose_owner.append(file_index)
+                    pose_labels.append(label)
+                    features.append(pose_features)
+                    bad_training.append(is_bad)
+            except Exception:
+                continue
+
+        file_results = [None for x in list_of_vina_files]
+        if len(features) == 0:
+            return file_results
+
+        scores = self.score_features(
+            np.array(features), np.array(bad_training, dtype=bool)
+        )
+        for file_index, label, score in zip(pose_owner, pose_labels, scores):
+            if file_results[file_index] is None:
+                file_results[file_index] = []
+            file_results[file_index].append([label, float(score)])
+
+        return file_results
+
+    def rescore_vina_files(self, list_of_vina_files):
+        """
+        Score vina output files and write a .nn1 file next to each one, in
+        the same format NNScore.py reports the best score.
+
+        Inputs:
+        :param list list_of_vina_files: list of paths to vina output files
+
+        Returns:
+        :returns: list results: a list of [nn1_file_path, it_rescored] for
+            each file. [PATH, True] means it passed. [PATH, False] means it
+            failed.
+        """
+
+        file_results = self.score_vina_files(list_of_vina_files)
+
+        results = []
+        for vina_file, pose_scores in zip(list_of_vina_files, file_results):
+            nn1_output = vina_file + ".nn1"
+            if pose_scores is None:
+                results.append([nn1_output, False])
+                continue
+
+            best_binder = -10000000.0
+            best_binder_name = ""
+            printout = "NNScore 1.1 (in-process)\n\n"
+            printout = printout + "Receptor: " + self.receptor_file + "\n\n"
+            for label, score in pose_scores:
+                name = vina_file + ", " + label
+                printout = printout + name + "\n"
+                printout = printout + "\tAverage score:  " + str(score) + "\n"
+                if best_binder < score:
+                    best_binder = score
+                    best_binder_name = name
+            printout = printout + "\nBest score: {} ({})\n".format(
+                best_binder, best_binder_name
+            )
+
+            try:
+                with open(nn1_output, "w") as f:
+                    f.write(printout)
+            except Exception:
+                results.append([nn1_output, False])
+                continue
+            results.append([nn1_output, True])
+
+        return results
+
+
+def get_network_files(networks_dir):
+    """
+    List the network files of an NNScore1 networks directory.
+
+    Inputs:
+    :param str networks_dir: a directory containing only network files
+
+    Returns:
+    :returns: list network_files: sorted paths of the network files
+    """
+
+    return sorted(
+        [
+            os.path.join(networks_dir, filename)
+            for filename in os.listdir(networks_dir)
+            if os.path.isfile(os.path.join(networks_dir, filename))
+        ]
+    )
+
+
+def get_nnscore1_engine(receptor_file, networks_dir):
+    """
+    Return an NNScore1Engine for this receptor, building it only the first
+    time it is requested in this process.
+
+    Inputs:
+    :param str receptor_file: path to the receptor pdbqt
+    :param str networks_dir: a directory containing only network files
+
+    Returns:
+    :returns: NNScore1Engine engine: the engine for the receptor
+    """
+
+    key = (receptor_file, networks_dir, os.path.getmtime(receptor_file))
+    if key not in ENGINE_CACHE:
+        ENGINE_CACHE.clear()
+        ENGINE_CACHE[key] = NNScore1Engine(
+            receptor_file, get_network_files(networks_dir)
+        )
+
+    return ENGINE_CACHE[key]
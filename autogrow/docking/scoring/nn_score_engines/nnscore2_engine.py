@@ -0,0 +1,1102 @@
+"""
+In-process NNScore2 engine.
+
+This reproduces the scoring of the bundled NNScore2.py script (NNScore 2.02)
+without starting a new python interpreter for every docked file. The
+receptor is loaded, typed, and assigned its charges, aromatic rings and
+secondary structure once per process and is indexed with a KD-tree, so each
+pose only visits the receptor atoms near it. The AutoDock Vina terms that
+NNScore2 normally obtains by running "vina --score_only" are computed in
+this process and the 20 networks are evaluated as one stacked matrix batch
+over every pose handed to the engine.
+
+If you use NNScore 2 in your research, please cite the following reference:
+NNScore 2.0: A Neural-Network Receptor-Ligand Scoring Function. Jacob D.
+Durrant, Andrew McCammon. Journal of Chemical Information and Modeling, 2011,
+51 (11), pp 2897-2903.
+"""
+import __future__
+
+import math
+import os
+import textwrap
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from autogrow.docking.scoring.nn_score_exe.nnscore2 import NNScore2
+from autogrow.docking.scoring.nn_score_engines.nnscore1_engine import (
+    parse_pdbqt_lines,
+)
+
+# Candidate neighbors are gathered with the KD-tree using slightly padded
+# cutoffs. The exact NNScore2 distance test is then applied to each candidate
+# so borderline contacts are counted the same way the script counts them.
+NEIGHBOR_PADDING = 0.01
+
+PI_PADDING = 0.75
+
+# The feature blocks that are always present in the input vector, with the
+# keys NNScore2.py initializes them with.
+HBOND_KEYS = [
+    "HDONOR-LIGAND_BACKBONE_ALPHA", "HDONOR-LIGAND_BACKBONE_BETA",
+    "HDONOR-LIGAND_BACKBONE_OTHER", "HDONOR-LIGAND_SIDECHAIN_ALPHA",
+    "HDONOR-LIGAND_SIDECHAIN_BETA", "HDONOR-LIGAND_SIDECHAIN_OTHER",
+    "HDONOR-RECEPTOR_BACKBONE_ALPHA", "HDONOR-RECEPTOR_BACKBONE_BETA",
+    "HDONOR-RECEPTOR_BACKBONE_OTHER", "HDONOR-RECEPTOR_SIDECHAIN_ALPHA",
+    "HDONOR-RECEPTOR_SIDECHAIN_BETA", "HDONOR-RECEPTOR_SIDECHAIN_OTHER",
+]
+LOCATION_STRUCTURE_KEYS = [
+    "BACKBONE_ALPHA", "BACKBONE_BETA", "BACKBONE_OTHER",
+    "SIDECHAIN_ALPHA", "SIDECHAIN_BETA", "SIDECHAIN_OTHER",
+]
+STRUCTURE_KEYS = ["ALPHA", "BETA", "OTHER"]
+PI_CATION_KEYS = [
+    "LIGAND-CHARGED_ALPHA", "LIGAND-CHARGED_BETA", "LIGAND-CHARGED_OTHER",
+    "RECEPTOR-CHARGED_ALPHA", "RECEPTOR-CHARGED_BETA", "RECEPTOR-CHARGED_OTHER",
+]
+
+# AutoDock Vina 1.1.2 scoring function. XS van der Waals radii by element,
+# AutoDock covalent radii by element, and the weights of the intermolecular
+# terms in the order gauss 1, gauss 2, repulsion, hydrophobic, hydrogen.
+VINA_CUTOFF = 8.0
+VINA_XS_RADII = {
+    "C": 1.9, "N": 1.8, "O": 1.7, "S": 2.0, "P": 2.1, "F": 1.5, "CL": 1.8,
+    "BR": 2.0, "I": 2.2, "MET": 1.2,
+}
+VINA_COVALENT_RADII = {
+    "C": 0.77, "N": 0.75, "O": 0.73, "S": 1.02, "P": 1.06, "F": 0.71,
+    "CL": 0.99, "BR": 1.14, "I": 1.33, "H": 0.37, "MG": 1.30, "MN": 1.39,
+    "ZN": 1.31, "CA": 1.74, "FE": 1.25,
+}
+VINA_AD_TYPE_ELEMENTS = {
+    "C": "C", "A": "C", "N": "N", "NA": "N", "NS": "N", "OA": "O", "OS": "O",
+    "S": "S", "SA": "S", "P": "P", "F": "F", "CL": "CL", "BR": "BR", "I": "I",
+    "H": "H", "HD": "H", "HS": "H", "MG": "MG", "MN": "MN", "ZN": "ZN",
+    "CA": "CA", "FE": "FE",
+}
+VINA_METALS = ["MG", "MN", "ZN", "CA", "FE"]
+VINA_WEIGHTS = np.array([-0.0356, -0.00516, 0.840, -0.0351, -0.587])
+VINA_ROTATABLE_WEIGHT = 0.0585
+
+# Engines already built in this process. Keyed by receptor and the receptor
+# modification time so a changed receptor is reloaded.
+ENGINE_CACHE = {}
+
+
+def add_to_count(counts, key, toadd=1):
+    """
+    Add to the count of a key of a feature dictionary.
+
+    Inputs:
+    :param dict counts: the feature dictionary to modify
+    :param str key: the feature key
+    :param float toadd: the value to add to that feature
+    """
+
+    if key in counts:
+        counts[key] = counts[key] + toadd
+    else:
+        counts[key] = toadd
+
+
+def split_ligand_models(lines):
+    """
+    Split the lines of a ligand pdbqt or vina output file into its models the
+    same way NNScore2.py walks through its -ligand file.
+
+    Inputs:
+    :param list lines: list of lines of a pdbqt or vina output file
+
+    Returns:
+    :returns: list models: a list of [model_name, list_of_lines] for every
+        model (ie ["MODEL 1", [...]])
+    """
+
+    models = []
+    lig_array = []
+    for line in lines + [""]:
+        if line[:6] != "ENDMDL":
+            lig_array.append(line)
+        if line[:6] == "ENDMDL" or len(line) == 0:
+            if len(lig_array) != 0 and lig_array != [""]:
+                models.append(["MODEL " + str(len(models) + 1), lig_array])
+            lig_array = []
+
+    return models
+
+
+def get_vina_bonds(coordinates, atom_types):
+    """
+    Find the bonds of a molecule by distance, as AutoDock Vina does. Two atoms
+    are bonded if they are closer than 1.1 times the sum of their covalent
+    radii.
+
+    Inputs:
+    :param np.array coordinates: an (N, 3) float array of atom coordinates
+    :param list atom_types: a list of the AutoDock atom types of each atom
+
+    Returns:
+    :returns: list elements: the Vina element of each atom. None for atom
+        types Vina does not know
+    :returns: list neighbors: for each atom the list of the indices of the
+        atoms bonded to it
+    """
+
+    elements = [VINA_AD_TYPE_ELEMENTS.get(t, None) for t in atom_types]
+
+    neighbors = [[] for x in elements]
+    if len(elements) > 1:
+        tree = cKDTree(coordinates)
+        for i, j in sorted(tree.query_pairs(2.0 * max(VINA_COVALENT_RADII.values()))):
+            if elements[i] is None or elements[j] is None:
+                continue
+            bond_length = 1.1 * (
+                VINA_COVALENT_RADII[elements[i]] + VINA_COVALENT_RADII[elements[j]]
+            )
+            if np.linalg.norm(coordinates[i] - coordinates[j]) < bond_length:
+                neighbors[i].append(j)
+                neighbors[j].append(i)
+
+    return elements, neighbors
+
+
+def count_vina_torsions(lines, elements, neighbors):
+    """
+    Count the torsions Vina uses to scale the affinity of a ligand.
+
+    Each heavy atom adds half of its rotatable (BRANCH) bonds to heavy atoms
+    that are themselves bonded to more than one heavy atom, capped at one. So
+    rotating terminal groups (ie -CH3) only count half from the side of the
+    rest of the molecule.
+
+    Inputs:
+    :param list lines: list of lines of a pdbqt model
+    :param list elements: the Vina element of each atom
+    :param list neighbors: for each atom the list of the indices of the atoms
+        bonded to it
+
+    Returns:
+    :returns: float num_tors: the number of torsions
+    """
+
+    serial_to_index = {}
+    for line in lines:
+        if line[0:5] == "ATOM " or line[0:7] == "HETATM ":
+            serial_to_index[int(line[6:11])] = len(serial_to_index)
+
+    rotatable = []
+    for line in lines:
+        if line[:6] != "BRANCH":
+            continue
+        serials = [int(x) for x in line.split()[1:3]]
+        if serials[0] in serial_to_index and serials[1] in serial_to_index:
+            rotatable.append(
+                sorted([serial_to_index[serials[0]], serial_to_index[serials[1]]])
+            )
+
+    is_heavy = [x is not None and x != "H" for x in elements]
+    heavy_degrees = [
+        len([j for j in neighbors[i] if is_heavy[j]]) for i in range(len(elements))
+    ]
+
+    num_tors = 0.0
+    for i in range(len(elements)):
+        if is_heavy[i] is False:
+            continue
+        atom_rotors = len(
+            [
+                j
+                for j in neighbors[i]
+                if sorted([i, j]) in rotatable and is_heavy[j] and heavy_degrees[j] > 1
+            ]
+        )
+        if atom_rotors > 2:
+            num_tors = num_tors + 0.5
+        else:
+            num_tors = num_tors + 0.5 * atom_rotors
+
+    return num_tors
+
+
+def assign_vina_types(atom_types, elements, neighbors):
+    """
+    Assign the AutoDock Vina XS types of the heavy atoms of a molecule.
+
+    Carbons bonded to a heteroatom are polar. Nitrogens and oxygens bonded to
+    a polar hydrogen (and all metals) are donors and NA/OA atoms are
+    acceptors.
+
+    Inputs:
+    :param list atom_types: a list of the AutoDock atom types of each atom
+    :param list elements: the Vina element of each atom
+    :param list neighbors: for each atom the list of the indices of the atoms
+        bonded to it
+
+    Returns:
+    :returns: np.array heavy_indices: the indices of the typed heavy atoms
+    :returns: np.array radii: the XS radius of each typed heavy atom
+    :returns: np.array hydrophobic: bool array, True for XS hydrophobic atoms
+    :returns: np.array donor: bool array, True for XS donors
+    :returns: np.array acceptor: bool array, True for XS acceptors
+    """
+
+    heavy_indices = []
+    radii = []
+    hydrophobic = []
+    donor = []
+    acceptor = []
+    for i, element in enumerate(elements):
+        if element is None or element == "H":
+            continue
+
+        is_hydrophobic = False
+        is_donor = False
+        is_acceptor = False
+        if element in VINA_METALS:
+            radius = VINA_XS_RADII["MET"]
+            is_donor = True
+        else:
+            radius = VINA_XS_RADII[element]
+            if element == "C":
+                is_hydrophobic = not any(
+                    [
+                        elements[j] not in ["C", "H"]
+                        for j in neighbors[i]
+                        if elements[j] is not None
+                    ]
+                )
+            elif element in ["N", "O"]:
+                is_acceptor = atom_types[i] in ["NA", "OA"]
+                is_donor = any([atom_types[j] == "HD" for j in neighbors[i]])
+            elif element in ["F", "CL", "BR", "I"]:
+                is_hydrophobic = True
+
+        heavy_indices.append(i)
+        radii.append(radius)
+        hydrophobic.append(is_hydrophobic)
+        donor.append(is_donor)
+        acceptor.append(is_acceptor)
+
+    return (
+        np.array(heavy_indices, dtype=np.int64),
+        np.array(radii, dtype=np.float64),
+        np.array(hydrophobic, dtype=bool),
+        np.array(donor, dtype=bool),
+        np.array(acceptor, dtype=bool),
+    )
+
+
+class BatchFFNetEnsemble(object):
+    """
+    The 20 NNScore2 networks stacked into one set of weight tensors.
+
+    All the networks share one topology so each layer of independent target
+    units is a single batched matrix multiplication over every network and
+    every pose.
+    """
+
+    def __init__(self, nets):
+        """
+        Stack the networks.
+
+        Inputs:
+        :param list nets: the network dictionaries returned by
+            NNScore2.networks()
+        """
+
+        conec = nets[0]["conec"]
+        for net in nets:
+            if net["conec"] != conec:
+                raise Exception("The NNScore2 networks must share a topology.")
+
+        num_conec = len(conec)
+        conec_list = [[conec[xn][1], conec[xn][2]] for xn in range(1, num_conec + 1)]
+        weights = np.array(
+            [[net["weights"][xn] for xn in range(1, num_conec + 1)] for net in nets]
+        )
+
+        self.num_nets = len(nets)
+        self.unit_count = max([max(pair) for pair in conec_list]) + 1
+        self.inno = np.array(
+            [nets[0]["inno"][k] for k in range(1, len(nets[0]["inno"]) + 1)],
+            dtype=np.int64,
+        )
+        self.outno = np.array(
+            [nets[0]["outno"][k] for k in range(1, len(nets[0]["outno"]) + 1)],
+            dtype=np.int64,
+        )
+        self.eni = np.array(
+            [
+                [[net["eni"][k][1], net["eni"][k][2]] for k in range(1, len(self.inno) + 1)]
+                for net in nets
+            ]
+        )
+        self.deo = np.array(
+            [
+                [[net["deo"][k][1], net["deo"][k][2]] for k in range(1, len(self.outno) + 1)]
+                for net in nets
+            ]
+        )
+        self.layers = self.build_layers(weights, conec_list)
+
+    def build_layers(self, weights, conec_list):
+        """
+        Group the connections into layers of independent target units.
+
+        Inputs:
+        :param np.array weights: an (num_nets, num_connections) array of the
+            weight of each connection in each network
+        :param list conec_list: list of [source, target] connections. A
+            source of 0 is the bias.
+
+        Returns:
+        :returns: list layers: a list of [targets, weight_tensor, bias] where
+            weight_tensor has the shape (num_nets, unit_count, len(targets))
+            and bias has the shape (num_nets, len(targets))
+        """
+
+        target_order = []
+        connections = {}
+        for xn, (src, trg) in enumerate(conec_list):
+            if trg not in connections:
+                target_order.append(trg)
+                connections[trg] = []
+            connections[trg].append([src, xn])
+
+        grouped_layers = []
+        current_targets = []
+        for trg in target_order:
+            sources = [src for src, xn in connections[trg]]
+            if any([src in current_targets for src in sources]):
+                # this target depends on a unit in the current layer
+                grouped_layers.append(current_targets)
+                current_targets = []
+            current_targets.append(trg)
+        if len(current_targets) != 0:
+            grouped_layers.append(current_targets)
+
+        layers = []
+        for targets in grouped_layers:
+            weight_tensor = np.zeros((self.num_nets, self.unit_count, len(targets)))
+            bias = np.zeros((self.num_nets, len(targets)))
+            for col, trg in enumerate(targets):
+                for src, xn in connections[trg]:
+                    if src == 0:
+                        bias[:, col] = bias[:, col] + weights[:, xn]
+                    else:
+                        weight_tensor[:, src, col] = (
+                            weight_tensor[:, src, col] + weights[:, xn]
+                        )
+            layers.append([np.array(targets, dtype=np.int64), weight_tensor, bias])
+
+        return layers
+
+    def call(self, inputs):
+        """
+        Run every network on a batch of input vectors.
+
+        NNScore2.py skips a network when math.exp overflows while propagating
+        a pose. Those network/pose combinations are reported as invalid.
+
+        Inputs:
+        :param np.array inputs: an (B, num_inputs) array of network inputs
+
+        Returns:
+        :returns: np.array outputs: an (num_nets, B) array of the first
+            denormalized output of each network for each pose
+        :returns: np.array valid: an (num_nets, B) bool array. False where the
+            network overflowed for that pose
+        """
+
+        num_poses = inputs.shape[0]
+        units = np.zeros((self.num_nets, num_poses, self.unit_count))
+        units[:, :, self.inno] = (
+            self.eni[:, np.newaxis, :, 0] * inputs[np.newaxis, :, :]
+            + self.eni[:, np.newaxis, :, 1]
+        )
+
+        overflow = np.zeros((self.num_nets, num_poses), dtype=bool)
+        with np.errstate(over="ignore"):
+            for targets, weight_tensor, bias in self.layers:
+                activation = np.exp(
+                    -(np.matmul(units, weight_tensor) + bias[:, np.newaxis, :])
+                )
+                overflow = overflow | np.any(np.isinf(activation), axis=2)
+                units[:, :, targets] = 1.0 / (1.0 + activation)
+
+        outputs = (
+            self.deo[:, np.newaxis, 0, 0] * units[:, :, self.outno[0]]
+            + self.deo[:, np.newaxis, 0, 1]
+        )
+
+        return outputs, ~overflow
+
+
+class NNScore2Engine(object):
+    """
+    Scores ligand poses against a single receptor with the ensemble of
+    NNScore2 networks.
+    """
+
+    functions = NNScore2.MathFunctions()
+
+    def __init__(self, receptor_file):
+        """
+        Load and preprocess the receptor and the networks.
+
+        Inputs:
+        :param str receptor_file: path to the receptor pdbqt
+        """
+
+        self.receptor_file = receptor_file
+        self.networks = BatchFFNetEnsemble(NNScore2.networks())
+
+        receptor = NNScore2.PDB()
+        receptor.LoadPDB_from_file(receptor_file)
+        receptor.OrigFileName = receptor_file
+        # NNScore2.py recalculates this for every pose. It only depends on the
+        # receptor so it is done once here.
+        receptor.assign_secondary_structure()
+        self.receptor = receptor
+
+        self.rec_indices = list(receptor.AllAtoms.keys())
+        self.rec_atoms = [receptor.AllAtoms[index] for index in self.rec_indices]
+        self.rec_coords = np.array(
+            [
+                [a.coordinates.x, a.coordinates.y, a.coordinates.z]
+                for a in self.rec_atoms
+            ]
+        ).reshape(-1, 3)
+        self.rec_tree = cKDTree(self.rec_coords)
+        self.rec_location_keys = [
+            a.SideChainOrBackBone() + "_" + a.structure for a in self.rec_atoms
+        ]
+
+        # The receptor hydrogens within 1.3 Angstroms of each receptor N/O
+        self.rec_hydrogens = {}
+        rec_hydrogen_positions = [
+            pos for pos, a in enumerate(self.rec_atoms) if a.element == "H"
+        ]
+        if len(rec_hydrogen_positions) != 0:
+            hydrogen_tree = cKDTree(self.rec_coords[rec_hydrogen_positions])
+            for pos, rec_atom in enumerate(self.rec_atoms):
+                if rec_atom.element != "O" and rec_atom.element != "N":
+                    continue
+                close = hydrogen_tree.query_ball_point(
+                    self.rec_coords[pos], 1.3 + NEIGHBOR_PADDING
+                )
+                hydrogens = []
+                for h in sorted(close):
+                    hydrogen = self.rec_atoms[rec_hydrogen_positions[h]]
+                    if hydrogen.coordinates.dist_to(rec_atom.coordinates) < 1.3:
+                        hydrogens.append(hydrogen)
+                self.rec_hydrogens[pos] = hydrogens
+
+        self.rec_ring_centers = np.array(
+            [[r.center.x, r.center.y, r.center.z] for r in receptor.aromatic_rings]
+        ).reshape(-1, 3)
+        self.rec_charge_centers = np.array(
+            [
+                [c.coordinates.x, c.coordinates.y, c.coordinates.z]
+                for c in receptor.charges
+            ]
+        ).reshape(-1, 3)
+
+        # The receptor side of the Vina terms
+        with open(receptor_file, "r") as f:
+            vina_coords, vina_types, _, _ = parse_pdbqt_lines(f.readlines())
+        elements, neighbors = get_vina_bonds(vina_coords, vina_types)
+        (
+            heavy_indices,
+            self.vina_rec_radii,
+            self.vina_rec_hydrophobic,
+            self.vina_rec_donor,
+            self.vina_rec_acceptor,
+        ) = assign_vina_types(vina_types, elements, neighbors)
+        self.vina_rec_coords = vina_coords[heavy_indices]
+        self.vina_rec_tree = cKDTree(self.vina_rec_coords)
+
+    def close_by(self, centers, apoint, cutoff):
+        """
+        Find the positions of the centers that may be within a cutoff of a
+        point.
+
+        Inputs:
+        :param np.array centers: an (N, 3) array of coordinates
+        :param point apoint: an NNScore2 point
+        :param float cutoff: the distance cutoff
+
+        Returns:
+        :returns: list positions: the positions in centers of the candidates
+        """
+
+        if len(centers) == 0:
+            return []
+        diff = centers - np.array([apoint.x, apoint.y, apoint.z])
+        dists = np.sqrt(np.sum(diff * diff, axis=1))
+
+        return list(np.nonzero(dists < cutoff + NEIGHBOR_PADDING)[0])
+
+    def vina_terms(self, ligand_lines):
+        """
+        Compute the Vina score-only output used by NNScore2 for a pose.
+
+        This follows the AutoDock Vina 1.1.2 scoring function. Vina evaluates
+        the terms from precalculated tables, so values can differ from a
+        "vina --score_only" run in the last decimal places.
+
+        Inputs:
+        :param list ligand_lines: the pdbqt lines of one pose
+
+        Returns:
+        :returns: list vina_output: [affinity, gauss 1, gauss 2, repulsion,
+            hydrophobic, hydrogen]
+        """
+
+        lig_coords, lig_types, _, _ = parse_pdbqt_lines(ligand_lines)
+        elements, neighbors = get_vina_bonds(lig_coords, lig_types)
+        num_tors = count_vina_torsions(ligand_lines, elements, neighbors)
+        (
+            heavy_indices,
+            lig_radii,
+            lig_hydrophobic,
+            lig_donor,
+            lig_acceptor,
+        ) = assign_vina_types(lig_types, elements, neighbors)
+        lig_coords = lig_coords[heavy_indices]
+
+        terms = np.zeros(5)
+        if len(lig_coords) != 0 and len(self.vina_rec_coords) != 0:
+            neighbors = self.vina_rec_tree.query_ball_point(lig_coords, VINA_CUTOFF)
+            lig_idx = np.array(
+                [i for i, near in enumerate(neighbors) for j in near], dtype=np.int64
+            )
+            rec_idx = np.array(
+                [j for near in neighbors for j in near], dtype=np.int64
+            )
+            if len(lig_idx) != 0:
+                diff = lig_coords[lig_idx] - self.vina_rec_coords[rec_idx]
+                r = np.sqrt(np.sum(diff * diff, axis=1))
+                in_cutoff = r < VINA_CUTOFF
+                lig_idx = lig_idx[in_cutoff]
+                rec_idx = rec_idx[in_cutoff]
+                surface = (
+                    r[in_cutoff] - lig_radii[lig_idx] - self.vina_rec_radii[rec_idx]
+                )
+
+                terms[0] = np.sum(np.exp(-((surface / 0.5) ** 2)))
+                terms[1] = np.sum(np.exp(-(((surface - 3.0) / 2.0) ** 2)))
+                terms[2] = np.sum(np.where(surface < 0.0, surface * surface, 0.0))
+
+                hydrophobic_pair = (
+                    lig_hydrophobic[lig_idx] & self.vina_rec_hydrophobic[rec_idx]
+                )
+                terms[3] = np.sum(
+                    np.where(
+                        hydrophobic_pair, np.clip(1.5 - surface, 0.0, 1.0), 0.0
+                    )
+                )
+
+                hbond_pair = (
+                    lig_donor[lig_idx] & self.vina_rec_acceptor[rec_idx]
+                ) | (lig_acceptor[lig_idx] & self.vina_rec_donor[rec_idx])
+                terms[4] = np.sum(
+                    np.where(hbond_pair, np.clip(surface / -0.7, 0.0, 1.0), 0.0)
+                )
+
+        affinity = np.dot(VINA_WEIGHTS, terms) / (
+            1.0 + VINA_ROTATABLE_WEIGHT * num_tors
+        )
+
+        return [float(affinity)] + [float(x) for x in terms]
+
+    def featurize(self, ligand_lines):
+        """
+        Compute the NNScore2 input vector for a single ligand pose.
+
+        This is the feature calculation of the binana class of NNScore2.py,
+        restricted to the receptor atoms, rings and charges the KD-tree finds
+        near the ligand.
+
+        Inputs:
+        :param list ligand_lines: the pdbqt lines of one pose
+
+        Returns:
+        :returns: list input_vector: the network input vector
+        """
+
+        receptor = self.receptor
+        functions = self.functions
+
+        ligand = NNScore2.PDB()
+        ligand.LoadPDB_from_list(ligand_lines, "\t")
+
+        lig_atoms = [ligand.AllAtoms[index] for index in ligand.AllAtoms]
+        lig_coords = np.array(
+            [[a.coordinates.x, a.coordinates.y, a.coordinates.z] for a in lig_atoms]
+        ).reshape(-1, 3)
+        lig_hydrogens = [a for a in lig_atoms if a.element == "H"]
+
+        pairs_less_than_two_half = {}
+        pairs_less_than_four = {}
+        pairs_electrostatic = {}
+        active_site_flexibility = {}
+        hbonds = {}
+        hydrophobics = {}
+
+        if len(lig_atoms) != 0:
+            neighbors = self.rec_tree.query_ball_point(
+                lig_coords, 4.0 + NEIGHBOR_PADDING
+            )
+        else:
+            neighbors = []
+
+        for ligand_atom, near in zip(lig_atoms, neighbors):
+            for pos in sorted(near):
+                receptor_atom = self.rec_atoms[pos]
+                dist = ligand_atom.coordinates.dist_to(receptor_atom.coordinates)
+                if dist >= 4.0:
+                    continue
+
+                key = "_".join(sorted([ligand_atom.atomtype, receptor_atom.atomtype]))
+                if dist < 2.5:
+                    add_to_count(pairs_less_than_two_half, key)
+                else:
+                    add_to_count(pairs_less_than_four, key)
+
+                coulomb_energy = (
+                    ligand_atom.charge * receptor_atom.charge / dist
+                ) * 138.94238460104697e4
+                add_to_count(pairs_electrostatic, key, coulomb_energy)
+
+                location_key = self.rec_location_keys[pos]
+                add_to_count(active_site_flexibility, location_key)
+
+                if ligand_atom.element == "C" and receptor_atom.element == "C":
+                    add_to_count(hydrophobics, location_key)
+
+                if (ligand_atom.element == "O" or ligand_atom.element == "N") and (
+                    receptor_atom.element == "O" or receptor_atom.element == "N"
+                ):
+                    hydrogens = []
+                    for hydrogen in lig_hydrogens:
+                        if hydrogen.coordinates.dist_to(ligand_atom.coordinates) < 1.3:
+                            hydrogens.append(["LIGAND", hydrogen])
+                    for hydrogen in self.rec_hydrogens[pos]:
+                        hydrogens.append(["RECEPTOR", hydrogen])
+
+                    for comment, hydrogen in hydrogens:
+                        angle = functions.angle_between_three_points(
+                            ligand_atom.coordinates,
+                            hydrogen.coordinates,
+                            receptor_atom.coordinates,
+                        )
+                        if math.fabs(180 - angle * 180.0 / math.pi) <= 40.0:
+                            hbonds_key = "HDONOR-" + comment + "_" + location_key
+                            add_to_count(hbonds, hbonds_key)
+
+        ligand_atom_types = {}
+        for ligand_atom in lig_atoms:
+            add_to_count(ligand_atom_types, ligand_atom.atomtype)
+
+        stacking = {}
+        t_shaped = {}
+        pi_cation = {}
+        salt_bridges = {}
+
+        for aromatic1 in ligand.aromatic_rings:
+            for ring_pos in self.close_by(self.rec_ring_centers, aromatic1.center, 7.5):
+                aromatic2 = receptor.aromatic_rings[ring_pos]
+                if aromatic1.center.dist_to(aromatic2.center) >= 7.5:
+                    continue
+
+                aromatic1_norm_vector = NNScore2.point(
+                    aromatic1.plane_coeff[0],
+                    aromatic1.plane_coeff[1],
+                    aromatic1.plane_coeff[2],
+                )
+                aromatic2_norm_vector = NNScore2.point(
+                    aromatic2.plane_coeff[0],
+                    aromatic2.plane_coeff[1],
+                    aromatic2.plane_coeff[2],
+                )
+                angle_between_planes = (
+                    functions.angle_between_points(
+                        aromatic1_norm_vector, aromatic2_norm_vector
+                    )
+                    * 180.0
+                    / math.pi
+                )
+                structure = receptor.AllAtoms[aromatic2.indices[0]].structure
+                if structure == "":
+                    structure = "OTHER"
+
+                if (
+                    math.fabs(angle_between_planes - 0) < 30.0
+                    or math.fabs(angle_between_planes - 180) < 30.0
+                ):
+                    # parallel rings, check for stacking
+                    pi_pi = False
+                    for ligand_ring_index in aromatic1.indices:
+                        pt_on_receptor_plane = functions.project_point_onto_plane(
+                            ligand.AllAtoms[ligand_ring_index].coordinates,
+                            aromatic2.plane_coeff,
+                        )
+                        if (
+                            pt_on_receptor_plane.dist_to(aromatic2.center)
+                            <= aromatic2.radius + PI_PADDING
+                        ):
+                            pi_pi = True
+                            break
+
+                    if pi_pi is False:
+                        for receptor_ring_index in aromatic2.indices:
+                            pt_on_ligand_plane = functions.project_point_onto_plane(
+                                receptor.AllAtoms[receptor_ring_index].coordinates,
+                                aromatic1.plane_coeff,
+                            )
+                            if (
+                                pt_on_ligand_plane.dist_to(aromatic1.center)
+                                <= aromatic1.radius + PI_PADDING
+                            ):
+                                pi_pi = True
+                                break
+
+                    if pi_pi is True:
+                        add_to_count(stacking, structure)
+
+                elif (
+                    math.fabs(angle_between_planes - 90) < 30.0
+                    or math.fabs(angle_between_planes - 270) < 30.0
+                ):
+                    # perpendicular rings, check for a T-shaped interaction
+                    min_dist = 100.0
+                    for ligand_ind in aromatic1.indices:
+                        ligand_at = ligand.AllAtoms[ligand_ind]
+                        for receptor_ind in aromatic2.indices:
+                            receptor_at = receptor.AllAtoms[receptor_ind]
+                            dist = ligand_at.coordinates.dist_to(receptor_at.coordinates)
+                            if dist < min_dist:
+                                min_dist = dist
+
+                    if min_dist <= 5.0:
+                        pt_on_receptor_plane = functions.project_point_onto_plane(
+                            aromatic1.center, aromatic2.plane_coeff
+                        )
+                        pt_on_ligand_plane = functions.project_point_onto_plane(
+                            aromatic2.center, aromatic1.plane_coeff
+                        )
+                        if (
+                            pt_on_receptor_plane.dist_to(aromatic2.center)
+                            <= aromatic2.radius + PI_PADDING
+                        ) or (
+                            pt_on_ligand_plane.dist_to(aromatic1.center)
+                            <= aromatic1.radius + PI_PADDING
+                        ):
+                            add_to_count(t_shaped, structure)
+
+        for charged in ligand.charges:
+            if charged.positive is not True:
+                continue
+            for ring_pos in self.close_by(
+                self.rec_ring_centers, charged.coordinates, 6.0
+            ):
+                aromatic = receptor.aromatic_rings[ring_pos]
+                if charged.coordinates.dist_to(aromatic.center) >= 6.0:
+                    continue
+                charge_projected = functions.project_point_onto_plane(
+                    charged.coordinates, aromatic.plane_coeff
+                )
+                if charge_projected.dist_to(aromatic.center) < aromatic.radius + PI_PADDING:
+                    structure = receptor.AllAtoms[aromatic.indices[0]].structure
+                    if structure == "":
+                        structure = "OTHER"
+                    add_to_count(pi_cation, "LIGAND-CHARGED_" + structure)
+
+        for aromatic in ligand.aromatic_rings:
+            for charge_pos in self.close_by(
+                self.rec_charge_centers, aromatic.center, 6.0
+            ):
+                charged = receptor.charges[charge_pos]
+                if charged.positive is not True:
+                    continue
+                if charged.coordinates.dist_to(aromatic.center) >= 6.0:
+                    continue
+                charge_projected = functions.project_point_onto_plane(
+                    charged.coordinates, aromatic.plane_coeff
+                )
+                if charge_projected.dist_to(aromatic.center) < aromatic.radius + PI_PADDING:
+                    structure = receptor.AllAtoms[charged.indices[0]].structure
+                    if structure == "":
+                        structure = "OTHER"
+                    add_to_count(pi_cation, "RECEPTOR-CHARGED_" + structure)
+
+        for ligand_charge in ligand.charges:
+            for charge_pos in self.close_by(
+                self.rec_charge_centers, ligand_charge.coordinates, 5.5
+            ):
+                receptor_charge = receptor.charges[charge_pos]
+                if ligand_charge.positive == receptor_charge.positive:
+                    continue
+                if ligand_charge.coordinates.dist_to(receptor_charge.coordinates) >= 5.5:
+                    continue
+                structure = receptor.AllAtoms[receptor_charge.indices[0]].structure
+                if structure == "":
+                    structure = "OTHER"
+                add_to_count(salt_bridges, structure)
+
+        # Now put the features together in the order of NNScore2.py. Features
+        # the networks were not trained on are ignored.
+        input_vector = self.vina_terms(ligand_lines)
+        for trained, counts in [
+            [NNScore2.TRAINED_PAIRS_LESS_THAN_FOUR, pairs_less_than_four],
+            [NNScore2.TRAINED_PAIRS_ELECTROSTATIC, pairs_electrostatic],
+            [NNScore2.TRAINED_LIGAND_ATOM_TYPES, ligand_atom_types],
+            [NNScore2.TRAINED_PAIRS_LESS_THAN_TWO_HALF, pairs_less_than_two_half],
+            [HBOND_KEYS, hbonds],
+            [LOCATION_STRUCTURE_KEYS, hydrophobics],
+            [STRUCTURE_KEYS, stacking],
+            [PI_CATION_KEYS, pi_cation],
+            [STRUCTURE_KEYS, t_shaped],
+            [LOCATION_STRUCTURE_KEYS, active_site_flexibility],
+            [STRUCTURE_KEYS, salt_bridges],
+        ]:
+            for key in sorted(trained):
+                input_vector.append(counts.get(key, 0))
+        input_vector.append(ligand.rotateable_bonds_count)
+
+        return input_vector
+
+    def score_features(self, feature_matrix):
+        """
+        Score a batch of feature vectors with every network.
+
+        Inputs:
+        :param np.array feature_matrix: an (B, num_inputs) array
+
+        Returns:
+        :returns: list pose_scores: for each pose the [average, stdev,
+            best_score, best_network, scores] that calculate_score of
+            NNScore2.py returns. scores only contains the networks that did
+            not overflow.
+        """
+
+        outputs, valid = self.networks.call(feature_matrix)
+
+        pose_scores = []
+        for pose in range(feature_matrix.shape[0]):
+            scores = [
+                float(outputs[net, pose])
+                for net in range(self.networks.num_nets)
+                if valid[net, pose]
+            ]
+            if len(scores) == 0:
+                pose_scores.append([0, 0, 0, 0, []])
+                continue
+
+            average = sum(scores) / len(scores)
+            best_score = 0.0
+            best_network = -1
+            total = 0.0
+            for count, score in enumerate(scores):
+                if score > best_score:
+                    best_score = score
+                    best_network = count + 1
+                total = total + math.pow(score - average, 2)
+            if len(scores) > 1:
+                stdev = math.pow(total / (len(scores) - 1), 0.5)
+            else:
+                stdev = 0.0
+            pose_scores.append([average, stdev, best_score, best_network, scores])
+
+        return pose_scores
+
+    def score_ligand_files(self, list_of_ligand_files):
+        """
+        Score every model of every ligand file as a single batch.
+
+        Inputs:
+        :param list list_of_ligand_files: list of paths to pdbqt or vina
+            output files
+
+        Returns:
+        :returns: list file_results: for each file either None (if it could
+            not be read or has no models) or a list of [model_name, score]
+            where score is the list returned by score_features
+        """
+
+        pose_owner = []
+        pose_names = []
+        features = []
+        for file_index, ligand_file in enumerate(list_of_ligand_files):
+            try:
+                with open(ligand_file, "r") as f:
+                    lines = f.readlines()
+                file_features = []
+                file_names = []
+                for model_name, model_lines in split_ligand_models(lines):
+                    file_features.append(self.featurize(model_lines))
+                    file_names.append(model_name)
+            except Exception:
+                continue
+            pose_owner.extend([file_index for x in file_features])
+            pose_names.extend(file_names)
+            features.extend(file_features)
+
+        file_results = [None for x in list_of_ligand_files]
+        if len(features) == 0:
+            return file_results
+
+        pose_scores = self.score_features(np.array(features, dtype=np.float64))
+        for file_index, model_name, score in zip(pose_owner, pose_names, pose_scores):
+            if file_results[file_index] is None:
+                file_results[file_index] = []
+            file_results[file_index].append([model_name, score])
+
+        return file_results
+
+    def make_report(self, ligand_file, model_scores):
+        """
+        Make the text NNScore2.py prints for a ligand file. Each model lists
+        its network scores and its "Best Score:" line, followed by the
+        summary of the best poses.
+
+        Inputs:
+        :param str ligand_file: path to the scored ligand file
+        :param list model_scores: a list of [model_name, score] for every
+            model of the file
+
+        Returns:
+        :returns: str printout: the report
+        """
+
+        score_to_kd = NNScore2.score_to_kd
+        line_header = "\t"
+
+        printout = "NNScore 2.02 (in-process)\n\n"
+        printout = printout + "Receptor: " + self.receptor_file + "\n"
+        printout = printout + "Ligand: " + ligand_file + "\n\n"
+        for model_name, score in model_scores:
+            average, stdev, best_score, best_network, scores = score
+            printout = printout + model_name + "\n"
+            if len(scores) == 0:
+                printout = printout + line_header
+                printout = printout + "Could not compute the score of this "
+                printout = printout + "receptor-ligand complex because none of "
+                printout = printout + "the networks returned a valid score.\n\n"
+                continue
+            for count, val in enumerate(scores):
+                printout = printout + "{}Network #{} gave a score of {} ({})\n".format(
+                    line_header, count + 1, round(val, 3), score_to_kd(val)
+                )
+            printout = printout + "\n"
+            printout = printout + str(
+                (
+                    line_header + "Best Score:         ",
+                    round(best_score, 3),
+                    "(" + score_to_kd(best_score) + ")",
+                )
+            ) + "\n"
+            printout = printout + str(
+                (
+                    line_header + "Average Score:      ",
+                    round(average, 3),
+                    "(" + score_to_kd(average) + ")",
+                )
+            ) + "\n"
+            printout = printout + str(
+                (line_header + "Standard Deviation: ", round(stdev, 3))
+            ) + "\n\n"
+
+        best_best_score = sorted(
+            model_scores, key=lambda model: model[1][2], reverse=True
+        )[0]
+        best_of_average_scores = sorted(
+            model_scores, key=lambda model: model[1][0], reverse=True
+        )[0]
+
+        printout = printout + "\nSUMMARY\n=======\n\n"
+        printout = printout + textwrap.fill(
+            "When the poses were ranked by the best of the 20 network scores "
+            + "associated with each pose, the best-scoring pose was "
+            + best_best_score[0]
+            + " (Score = "
+            + str(round(best_best_score[1][2], 3))
+            + " = "
+            + score_to_kd(best_best_score[1][2]).replace("Kd = ", "")
+            + ")"
+        )
+        printout = printout + "\n\n"
+        printout = printout + textwrap.fill(
+            "When the poses were ranked by the average of the 20 network "
+            + "scores associated with each pose, the best-scoring pose was "
+            + best_of_average_scores[0]
+            + " (Score = "
+            + str(round(best_of_average_scores[1][0], 3))
+            + " +/- "
+            + str(round(best_of_average_scores[1][1], 3))
+            + " = "
+            + score_to_kd(best_of_average_scores[1][0]).replace("Kd = ", "")
+            + "). This is the recommended ranking/scoring metric."
+        )
+        printout = printout + "\n\n"
+
+        return printout
+
+    def rescore_ligand_files(self, list_of_ligand_files, list_of_output_files):
+        """
+        Score ligand files and write each report to its output file.
+
+        Inputs:
+        :param list list_of_ligand_files: list of paths to pdbqt or vina
+            output files to score
+        :param list list_of_output_files: the path of the report to write for
+            each ligand file (ie *.pdbqt.vina.nn2)
+
+        Returns:
+        :returns: list results: a list of [output_file_path, it_rescored] for
+            each file. [PATH, True] means it passed. [PATH, False] means it
+            failed.
+        """
+
+        file_results = self.score_ligand_files(list_of_ligand_files)
+
+        results = []
+        for ligand_file, output_file, model_scores in zip(
+            list_of_ligand_files, list_of_output_files, file_results
+        ):
+            if model_scores is None:
+                results.append([output_file, False])
+                continue
+
+            try:
+                printout = self.make_report(ligand_file, model_scores)
+                with open(output_file, "w") as f:
+                    f.write(printout)
+            except Exception:
+                results.append([output_file, False])
+                continue
+            results.append([output_file, True])
+
+        return results
+
+
+def get_nnscore2_engine(receptor_file):
+    """
+    Return an NNScore2Engine for this receptor, building it only the first
+    time it is requested in this process.
+
+    Inputs:
+    :param str receptor_file: path to the receptor pdbqt
+
+    Returns:
+    :returns: NNScore2Engine engine: the engine for the receptor
+    """
+
+    key = (receptor_file, os.path.getmtime(receptor_file))
+    if key not in ENGINE_CACHE:
+        ENGINE_CACHE.clear()
+        ENGINE_CACHE[key] = NNScore2Engine(receptor_file)
+
+    return ENGINE_CACHE[key]
@@ -1517,6 +1517,14 @@ def getCommandOutput2(command):
         raise RuntimeError('%s failed w/ exit code %d' % (command, err))
     return data
 
+# The binana features the neural networks were trained on. Features with any
+# other key are ignored when the input vector is built.
+TRAINED_PAIRS_LESS_THAN_TWO_HALF = {"A_A": 0, "A_C": 0, "A_CL": 0, "A_F": 0, "A_FE": 0, "A_MG": 0, "A_MN": 0, "A_NA": 0, "A_SA": 0, "BR_C": 0, "BR_OA": 0, "C_CL": 0, "CD_OA": 0, "CL_FE": 0, "CL_MG": 0, "CL_N": 0, "CL_OA": 0, "CL_ZN": 0, "C_MN": 0, "C_NA": 0, "F_N": 0, "F_SA": 0, "F_ZN": 0, "HD_MN": 0, "MN_N": 0, "NA_SA": 0, "N_SA": 0, "A_HD": 0, "A_N": 0, "A_OA": 0, "A_ZN": 0, "BR_HD": 0, "C_C": 0, "C_F": 0, "C_HD": 0, "CL_HD": 0, "C_MG": 0, "C_N": 0, "C_OA": 0, "C_SA": 0, "C_ZN": 0, "FE_HD": 0, "FE_N": 0, "FE_OA": 0, "F_HD": 0, "F_OA": 0, "HD_HD": 0, "HD_I": 0, "HD_MG": 0, "HD_N": 0, "HD_NA": 0, "HD_OA": 0, "HD_P": 0, "HD_S": 0, "HD_SA": 0, "HD_ZN": 0, "MG_NA": 0, "MG_OA": 0, "MN_OA": 0, "NA_OA": 0, "NA_ZN": 0, "N_N": 0, "N_NA": 0, "N_OA": 0, "N_ZN": 0, "OA_OA": 0, "OA_SA": 0, "OA_ZN": 0, "SA_ZN": 0, "S_ZN": 0}
+TRAINED_PAIRS_LESS_THAN_FOUR = {"A_CU": 0, "A_MG": 0, "A_MN": 0, "BR_SA": 0, "C_CD": 0, "CL_FE": 0, "CL_MG": 0, "CL_MN": 0, "CL_NA": 0, "CL_P": 0, "CL_S": 0, "CL_ZN": 0, "CU_HD": 0, "CU_N": 0, "FE_NA": 0, "FE_SA": 0, "MG_N": 0, "MG_S": 0, "MG_SA": 0, "MN_NA": 0, "MN_S": 0, "MN_SA": 0, "NA_P": 0, "P_S": 0, "P_SA": 0, "S_SA": 0, "A_A": 0, "A_BR": 0, "A_C": 0, "A_CL": 0, "A_F": 0, "A_FE": 0, "A_HD": 0, "A_I": 0, "A_N": 0, "A_NA": 0, "A_OA": 0, "A_P": 0, "A_S": 0, "A_SA": 0, "A_ZN": 0, "BR_C": 0, "BR_HD": 0, "BR_N": 0, "BR_OA": 0, "C_C": 0, "C_CL": 0, "C_F": 0, "C_FE": 0, "C_HD": 0, "C_I": 0, "CL_HD": 0, "CL_N": 0, "CL_OA": 0, "CL_SA": 0, "C_MG": 0, "C_MN": 0, "C_N": 0, "C_NA": 0, "C_OA": 0, "C_P": 0, "C_S": 0, "C_SA": 0, "C_ZN": 0, "FE_HD": 0, "FE_N": 0, "FE_OA": 0, "F_HD": 0, "F_N": 0, "F_OA": 0, "F_SA": 0, "HD_HD": 0, "HD_I": 0, "HD_MG": 0, "HD_MN": 0, "HD_N": 0, "HD_NA": 0, "HD_OA": 0, "HD_P": 0, "HD_S": 0, "HD_SA": 0, "HD_ZN": 0, "I_N": 0, "I_OA": 0, "MG_NA": 0, "MG_OA": 0, "MG_P": 0, "MN_N": 0, "MN_OA": 0, "MN_P": 0, "NA_OA": 0, "NA_S": 0, "NA_SA": 0, "NA_ZN": 0, "N_N": 0, "N_NA": 0, "N_OA": 0, "N_P": 0, "N_S": 0, "N_SA": 0, "N_ZN": 0, "OA_OA": 0, "OA_P": 0, "OA_S": 0, "OA_SA": 0, "OA_ZN": 0, "P_ZN": 0, "SA_SA": 0, "SA_ZN": 0, "S_ZN": 0}
+TRAINED_LIGAND_ATOM_TYPES = {'A': 0, 'BR': 0, 'C': 0, 'CL': 0, 'F': 0, 'HD': 0, 'I': 0, 'N': 0, 'NA': 0, 'OA': 0, 'P': 0, 'S': 0, 'SA': 0}
+TRAINED_PAIRS_ELECTROSTATIC = {"A_MG": 0, "A_MN": 0, "BR_SA": 0, "CL_FE": 0, "CL_MG": 0, "CL_MN": 0, "CL_NA": 0, "CL_P": 0, "CL_S": 0, "CL_ZN": 0, "CU_HD": 0, "CU_N": 0, "FE_NA": 0, "FE_SA": 0, "MG_N": 0, "MG_S": 0, "MG_SA": 0, "MN_NA": 0, "MN_S": 0, "MN_SA": 0, "NA_P": 0, "P_S": 0, "P_SA": 0, "S_SA": 0, "A_A": 0.0, "A_BR": 0.0, "A_C": 0.0, "A_CL": 0.0, "A_F": 0.0, "A_FE": 0.0, "A_HD": 0.0, "A_I": 0.0, "A_N": 0.0, "A_NA": 0.0, "A_OA": 0.0, "A_P": 0.0, "A_S": 0.0, "A_SA": 0.0, "A_ZN": 0.0, "BR_C": 0.0, "BR_HD": 0.0, "BR_N": 0.0, "BR_OA": 0.0, "C_C": 0.0, "C_CL": 0.0, "C_F": 0.0, "C_FE": 0.0, "C_HD": 0.0, "C_I": 0.0, "CL_HD": 0.0, "CL_N": 0.0, "CL_OA": 0.0, "CL_SA": 0.0, "C_MG": 0.0, "C_MN": 0.0, "C_N": 0.0, "C_NA": 0.0, "C_OA": 0.0, "C_P": 0.0, "C_S": 0.0, "C_SA": 0.0, "C_ZN": 0.0, "FE_HD": 0.0, "FE_N": 0.0, "FE_OA": 0.0, "F_HD": 0.0, "F_N": 0.0, "F_OA": 0.0, "F_SA": 0.0, "HD_HD": 0.0, "HD_I": 0.0, "HD_MG": 0.0, "HD_MN": 0.0, "HD_N": 0.0, "HD_NA": 0.0, "HD_OA": 0.0, "HD_P": 0.0, "HD_S": 0.0, "HD_SA": 0.0, "HD_ZN": 0.0, "I_N": 0.0, "I_OA": 0.0, "MG_NA": 0.0, "MG_OA": 0.0, "MG_P": 0.0, "MN_N": 0.0, "MN_OA": 0.0, "MN_P": 0.0, "NA_OA": 0.0, "NA_S": 0.0, "NA_SA": 0.0, "NA_ZN": 0.0, "N_N": 0.0, "N_NA": 0.0, "N_OA": 0.0, "N_P": 0.0, "N_S": 0.0, "N_SA": 0.0, "N_ZN": 0.0, "OA_OA": 0.0, "OA_P": 0.0, "OA_S": 0.0, "OA_SA": 0.0, "OA_ZN": 0.0, "P_ZN": 0.0, "SA_SA": 0.0, "SA_ZN": 0.0, "S_ZN": 0, "F_ZN": 0}
+
+
 class binana:
 
     functions = MathFunctions()
@@ -1884,7 +1892,7 @@ class binana:
 
         self.rotateable_bonds_count = {'rot_bonds':data['rotateable_bonds_count']}
 
-        self.ligand_receptor_atom_type_pairs_less_than_two_half = {"A_A": 0, "A_C": 0, "A_CL": 0, "A_F": 0, "A_FE": 0, "A_MG": 0, "A_MN": 0, "A_NA": 0, "A_SA": 0, "BR_C": 0, "BR_OA": 0, "C_CL": 0, "CD_OA": 0, "CL_FE": 0, "CL_MG": 0, "CL_N": 0, "CL_OA": 0, "CL_ZN": 0, "C_MN": 0, "C_NA": 0, "F_N": 0, "F_SA": 0, "F_ZN": 0, "HD_MN": 0, "MN_N": 0, "NA_SA": 0, "N_SA": 0, "A_HD": 0, "A_N": 0, "A_OA": 0, "A_ZN": 0, "BR_HD": 0, "C_C": 0, "C_F": 0, "C_HD": 0, "CL_HD": 0, "C_MG": 0, "C_N": 0, "C_OA": 0, "C_SA": 0, "C_ZN": 0, "FE_HD": 0, "FE_N": 0, "FE_OA": 0, "F_HD": 0, "F_OA": 0, "HD_HD": 0, "HD_I": 0, "HD_MG": 0, "HD_N": 0, "HD_NA": 0, "HD_OA": 0, "HD_P": 0, "HD_S": 0, "HD_SA": 0, "HD_ZN": 0, "MG_NA": 0, "MG_OA": 0, "MN_OA": 0, "NA_OA": 0, "NA_ZN": 0, "N_N": 0, "N_NA": 0, "N_OA": 0, "N_ZN": 0, "OA_OA": 0, "OA_SA": 0, "OA_ZN": 0, "SA_ZN": 0, "S_ZN": 0}
+        self.ligand_receptor_atom_type_pairs_less_than_two_half = TRAINED_PAIRS_LESS_THAN_TWO_HALF.copy()
         for key in data['ligand_receptor_atom_type_pairs_less_than_two_half']:
             if not key in self.ligand_receptor_atom_type_pairs_less_than_two_half:
                   print(("\tWARNING: Atoms of types " + key.replace("_"," and ") + " come within 2.5 angstroms of each other."))
@@ -1894,7 +1902,7 @@ class binana:
             else:
                   self.ligand_receptor_atom_type_pairs_less_than_two_half[key] = data['ligand_receptor_atom_type_pairs_less_than_two_half'][key]
 
-        self.ligand_receptor_atom_type_pairs_less_than_four = {"A_CU": 0, "A_MG": 0, "A_MN": 0, "BR_SA": 0, "C_CD": 0, "CL_FE": 0, "CL_MG": 0, "CL_MN": 0, "CL_NA": 0, "CL_P": 0, "CL_S": 0, "CL_ZN": 0, "CU_HD": 0, "CU_N": 0, "FE_NA": 0, "FE_SA": 0, "MG_N": 0, "MG_S": 0, "MG_SA": 0, "MN_NA": 0, "MN_S": 0, "MN_SA": 0, "NA_P": 0, "P_S": 0, "P_SA": 0, "S_SA": 0, "A_A": 0, "A_BR": 0, "A_C": 0, "A_CL": 0, "A_F": 0, "A_FE": 0, "A_HD": 0, "A_I": 0, "A_N": 0, "A_NA": 0, "A_OA": 0, "A_P": 0, "A_S": 0, "A_SA": 0, "A_ZN": 0, "BR_C": 0, "BR_HD": 0, "BR_N": 0, "BR_OA": 0, "C_C": 0, "C_CL": 0, "C_F": 0, "C_FE": 0, "C_HD": 0, "C_I": 0, "CL_HD": 0, "CL_N": 0, "CL_OA": 0, "CL_SA": 0, "C_MG": 0, "C_MN": 0, "C_N": 0, "C_NA": 0, "C_OA": 0, "C_P": 0, "C_S": 0, "C_SA": 0, "C_ZN": 0, "FE_HD": 0, "FE_N": 0, "FE_OA": 0, "F_HD": 0, "F_N": 0, "F_OA": 0, "F_SA": 0, "HD_HD": 0, "HD_I": 0, "HD_MG": 0, "HD_MN": 0, "HD_N": 0, "HD_NA": 0, "HD_OA": 0, "HD_P": 0, "HD_S": 0, "HD_SA": 0, "HD_ZN": 0, "I_N": 0, "I_OA": 0, "MG_NA": 0, "MG_OA": 0, "MG_P": 0, "MN_N": 0, "MN_OA": 0, "MN_P": 0, "NA_OA": 0, "NA_S": 0, "NA_SA": 0, "NA_ZN": 0, "N_N": 0, "N_NA": 0, "N_OA": 0, "N_P": 0, "N_S": 0, "N_SA": 0, "N_ZN": 0, "OA_OA": 0, "OA_P": 0, "OA_S": 0, "OA_SA": 0, "OA_ZN": 0, "P_ZN": 0, "SA_SA": 0, "SA_ZN": 0, "S_ZN": 0}
+        self.ligand_receptor_atom_type_pairs_less_than_four = TRAINED_PAIRS_LESS_THAN_FOUR.copy()
         for key in data['ligand_receptor_atom_type_pairs_less_than_four']:
             if not key in self.ligand_receptor_atom_type_pairs_less_than_four:
                   print(("\tWARNING: Atoms of types " + key.replace("_"," and ") + " come within 4 angstroms of each other."))
@@ -1905,7 +1913,7 @@ class binana:
             else:
                   self.ligand_receptor_atom_type_pairs_less_than_four[key] = data['ligand_receptor_atom_type_pairs_less_than_four'][key]
 
-        self.ligand_atom_types = {'A': 0, 'BR': 0, 'C': 0, 'CL': 0, 'F': 0, 'HD': 0, 'I': 0, 'N': 0, 'NA': 0, 'OA': 0, 'P': 0, 'S': 0, 'SA': 0}
+        self.ligand_atom_types = TRAINED_LIGAND_ATOM_TYPES.copy()
         for key in data['ligand_atom_types']:
             if not key in self.ligand_atom_types:
                   print(("\tWARNING: The ligand contains an atoms of type " + key + ". The neural networks"))
@@ -1915,7 +1923,7 @@ class binana:
             else:
                   self.ligand_atom_types[key] = data['ligand_atom_types'][key]
 
-        self.ligand_receptor_atom_type_pairs_electrostatic = {"A_MG": 0, "A_MN": 0, "BR_SA": 0, "CL_FE": 0, "CL_MG": 0, "CL_MN": 0, "CL_NA": 0, "CL_P": 0, "CL_S": 0, "CL_ZN": 0, "CU_HD": 0, "CU_N": 0, "FE_NA": 0, "FE_SA": 0, "MG_N": 0, "MG_S": 0, "MG_SA": 0, "MN_NA": 0, "MN_S": 0, "MN_SA": 0, "NA_P": 0, "P_S": 0, "P_SA": 0, "S_SA": 0, "A_A": 0.0, "A_BR": 0.0, "A_C": 0.0, "A_CL": 0.0, "A_F": 0.0, "A_FE": 0.0, "A_HD": 0.0, "A_I": 0.0, "A_N": 0.0, "A_NA": 0.0, "A_OA": 0.0, "A_P": 0.0, "A_S": 0.0, "A_SA": 0.0, "A_ZN": 0.0, "BR_C": 0.0, "BR_HD": 0.0, "BR_N": 0.0, "BR_OA": 0.0, "C_C": 0.0, "C_CL": 0.0, "C_F": 0.0, "C_FE": 0.0, "C_HD": 0.0, "C_I": 0.0, "CL_HD": 0.0, "CL_N": 0.0, "CL_OA": 0.0, "CL_SA": 0.0, "C_MG": 0.0, "C_MN": 0.0, "C_N": 0.0, "C_NA": 0.0, "C_OA": 0.0, "C_P": 0.0, "C_S": 0.0, "C_SA": 0.0, "C_ZN": 0.0, "FE_HD": 0.0, "FE_N": 0.0, "FE_OA": 0.0, "F_HD": 0.0, "F_N": 0.0, "F_OA": 0.0, "F_SA": 0.0, "HD_HD": 0.0, "HD_I": 0.0, "HD_MG": 0.0, "HD_MN": 0.0, "HD_N": 0.0, "HD_NA": 0.0, "HD_OA": 0.0, "HD_P": 0.0, "HD_S": 0.0, "HD_SA": 0.0, "HD_ZN": 0.0, "I_N": 0.0, "I_OA": 0.0, "MG_NA": 0.0, "MG_OA": 0.0, "MG_P": 0.0, "MN_N": 0.0, "MN_OA": 0.0, "MN_P": 0.0, "NA_OA": 0.0, "NA_S": 0.0, "NA_SA": 0.0, "NA_ZN": 0.0, "N_N": 0.0, "N_NA": 0.0, "N_OA": 0.0, "N_P": 0.0, "N_S": 0.0, "N_SA": 0.0, "N_ZN": 0.0, "OA_OA": 0.0, "OA_P": 0.0, "OA_S": 0.0, "OA_SA": 0.0, "OA_ZN": 0.0, "P_ZN": 0.0, "SA_SA": 0.0, "SA_ZN": 0.0, "S_ZN": 0, "F_ZN": 0}
+        self.ligand_receptor_atom_type_pairs_electrostatic = TRAINED_PAIRS_ELECTROSTATIC.copy()
 
         for key in data['ligand_receptor_atom_type_pairs_electrostatic']:
             if not key in self.ligand_receptor_atom_type_pairs_electrostatic:
@@ -2177,190 +2185,195 @@ def networks():
     nets.append({'outno': {1: 359}, 'eni': {1: {1: 0.0304046423545, 2: 0.651959362024}, 2: {1: 0.00261812943927, 2: 0.138937931856}, 3: {1: 0.000173034126841, 2: 0.137653838555}, 4: {1: 0.0223427311116, 2: 0.148292791916}, 5: {1: 0.00402370444764, 2: 0.15}, 6: {1: 0.0319499025528, 2: 0.15}, 7: {1: 0.00853658536585, 2: 0.15}, 8: {1: 0.07, 2: 0.15}, 9: {1: 0.00843373493976, 2: 0.15}, 10: {1: 0.04375, 2: 0.15}, 11: {1: 0.7, 2: 0.15}, 12: {1: 0.0318181818182, 2: 0.15}, 13: {1: 0.14, 2: 0.15}, 14: {1: 0.00666666666667, 2: 0.15}, 15: {1: 0.175, 2: 0.15}, 16: {1: 0.0875, 2: 0.15}, 17: {1: 0.0875, 2: 0.15}, 18: {1: 0.021875, 2: 0.15}, 19: {1: 0.025, 2: 0.15}, 20: {1: 0.0134615384615, 2: 0.15}, 21: {1: 0.14, 2: 0.15}, 22: {1: 0.1, 2: 0.15}, 23: {1: 0.07, 2: 0.15}, 24: {1: 0.0777777777778, 2: 0.15}, 25: {1: 0.07, 2: 0.15}, 26: {1: 0.14, 2: 0.15}, 27: {1: 0.14, 2: 0.15}, 28: {1: 0.175, 2: 0.15}, 29: {1: 0.35, 2: 0.15}, 30: {1: 0.7, 2: 0.15}, 31: {1: 0.0538461538462, 2: 0.15}, 32: {1: 0.7, 2: 0.15}, 33: {1: 0.7, 2: 0.15}, 34: {1: 0.0875, 2: 0.15}, 35: {1: 0.7, 2: 0.15}, 36: {1: 0.0777777777778, 2: 0.15}, 37: {1: 0.7, 2: 0.15}, 38: {1: 0.7, 2: 0.15}, 39: {1: 0.35, 2: 0.15}, 40: {1: 0.7, 2: 0.15}, 41: {1: 0.7, 2: 0.15}, 42: {1: 0.7, 2: 0.15}, 43: {1: 0.0102941176471, 2: 0.15}, 44: {1: 0.35, 2: 0.15}, 45: {1: 0.0466666666667, 2: 0.15}, 46: {1: 0.0291666666667, 2: 0.15}, 47: {1: 0.175, 2: 0.15}, 48: {1: 0.00945945945946, 2: 0.15}, 49: {1: 0.0538461538462, 2: 0.15}, 50: {1: 0.0777777777778, 2: 0.15}, 51: {1: 0.1, 2: 0.15}, 52: {1: 0.0205882352941, 2: 0.15}, 53: {1: 0.0304347826087, 2: 0.15}, 54: {1: 0.00804597701149, 2: 0.15}, 55: {1: 0.1, 2: 0.15}, 56: {1: 0.14, 2: 0.15}, 57: {1: 0.0583333333333, 2: 0.15}, 58: {1: 0.14, 2: 0.15}, 59: {1: 0.35, 2: 0.15}, 60: {1: 0.233333333333, 2: 0.15}, 61: {1: 0.233333333333, 2: 0.15}, 62: {1: 0.35, 2: 0.15}, 63: {1: 0.7, 2: 0.15}, 64: {1: 0.0583333333333, 2: 0.15}, 65: {1: 0.07, 2: 0.15}, 66: {1: 0.0636363636364, 2: 0.15}, 67: {1: 0.175, 2: 0.15}, 68: {1: 0.0259259259259, 2: 0.15}, 69: {1: 0.116666666667, 2: 0.15}, 70: {1: 0.175, 2: 0.15}, 71: {1: 0.35, 2: 0.15}, 72: {1: 0.0212121212121, 2: 0.15}, 73: {1: 0.0466666666667, 2: 0.15}, 74: {1: 0.00777777777778, 2: 0.15}, 75: {1: 0.0225806451613, 2: 0.15}, 76: {1: 0.0368421052632, 2: 0.15}, 77: {1: 0.0636363636364, 2: 0.15}, 78: {1: 0.175, 2: 0.15}, 79: {1: 0.14, 2: 0.15}, 80: {1: 0.14, 2: 0.15}, 81: {1: 0.35, 2: 0.15}, 82: {1: 0.7, 2: 0.15}, 83: {1: 0.116666666667, 2: 0.15}, 84: {1: 0.14, 2: 0.15}, 85: {1: 0.7, 2: 0.15}, 86: {1: 0.7, 2: 0.15}, 87: {1: 0.35, 2: 0.15}, 88: {1: 0.7, 2: 0.15}, 89: {1: 0.175, 2: 0.15}, 90: {1: 0.175, 2: 0.15}, 91: {1: 0.7, 2: 0.15}, 92: {1: 0.35, 2: 0.15}, 93: {1: 0.0583333333333, 2: 0.15}, 94: {1: 0.7, 2: 0.15}, 95: {1: 0.7, 2: 0.15}, 96: {1: 0.233333333333, 2: 0.15}, 97: {1: 0.233333333333, 2: 0.15}, 98: {1: 0.07, 2: 0.15}, 99: {1: 0.0583333333333, 2: 0.15}, 100: {1: 0.0179487179487, 2: 0.15}, 101: {1: 0.05, 2: 0.15}, 102: {1: 0.116666666667, 2: 0.15}, 103: {1: 0.1, 2: 0.15}, 104: {1: 0.35, 2: 0.15}, 105: {1: 0.0318181818182, 2: 0.15}, 106: {1: 0.116666666667, 2: 0.15}, 107: {1: 0.14, 2: 0.15}, 108: {1: 0.1, 2: 0.15}, 109: {1: 0.233333333333, 2: 0.15}, 110: {1: 0.7, 2: 0.15}, 111: {1: 0.7, 2: 0.15}, 112: {1: 0.233333333333, 2: 0.15}, 113: {1: 0.35, 2: 0.15}, 114: {1: 0.35, 2: 0.15}, 115: {1: 0.7, 2: 0.15}, 116: {1: 0.7, 2: 0.15}, 117: {1: 3.87374150895e-06, 2: 0.241484336616}, 118: {1: 9.1513333069e-05, 2: 0.766520574414}, 119: {1: 1.00992148454e-06, 2: 0.163933793932}, 120: {1: 2.48414365543e-05, 2: 0.789884848031}, 121: {1: 1.30975514685e-05, 2: 0.766361493713}, 122: {1: 6.59324162593e-07, 2: 0.17025699176}, 123: {1: 8.17739471218e-07, 2: 0.164133755398}, 124: {1: 0.000167593113975, 2: 0.737334549945}, 125: {1: 1.5464440133e-06, 2: 0.16902428405}, 126: {1: 1.22347176214e-06, 2: 0.15}, 127: {1: 7.30883962944e-07, 2: 0.829064171192}, 128: {1: 5.7291070724e-06, 2: 0.759815993108}, 129: {1: 7.49262071283e-07, 2: 0.831419138892}, 130: {1: 1.08182938119e-05, 2: 0.23912023872}, 131: {1: 1.15823776086e-05, 2: 0.207196926645}, 132: {1: 5.66538965622e-06, 2: 0.805092286718}, 133: {1: 7.25309313051e-07, 2: 0.169603659975}, 134: {1: 2.14071551021e-05, 2: 0.85}, 135: {1: 1.43789916949e-05, 2: 0.85}, 136: {1: 2.07879410441e-05, 2: 0.15}, 137: {1: 1.4712765834e-05, 2: 0.15}, 138: {1: 8.28474553007e-05, 2: 0.15}, 139: {1: 4.48132351188e-06, 2: 0.85}, 140: {1: 7.29335404606e-06, 2: 0.85}, 141: {1: 7.52267963728e-06, 2: 0.85}, 142: {1: 1.02205250245e-05, 2: 0.85}, 143: {1: 8.64871808319e-06, 2: 0.15}, 144: {1: 0.000105484564531, 2: 0.15}, 145: {1: 5.26783530509e-06, 2: 0.15}, 146: {1: 4.4794304865e-05, 2: 0.85}, 147: {1: 8.6071196746e-05, 2: 0.85}, 148: {1: 6.42726531599e-05, 2: 0.15}, 149: {1: 2.88337019365e-06, 2: 0.85}, 150: {1: 8.20115210765e-05, 2: 0.15}, 151: {1: 4.59702491179e-05, 2: 0.85}, 152: {1: 1.42834286818e-06, 2: 0.165217591298}, 153: {1: 1.08646375961e-05, 2: 0.85}, 154: {1: 2.67353702245e-06, 2: 0.849818558507}, 155: {1: 6.16660516646e-07, 2: 0.164406019442}, 156: {1: 6.23053341881e-07, 2: 0.155232189189}, 157: {1: 2.15322086711e-05, 2: 0.85}, 158: {1: 8.89598109933e-07, 2: 0.15}, 159: {1: 9.78923087766e-07, 2: 0.15}, 160: {1: 7.44721657761e-07, 2: 0.815304690842}, 161: {1: 2.5585212063e-06, 2: 0.714192567361}, 162: {1: 2.53560643555e-07, 2: 0.848300867199}, 163: {1: 3.03479876511e-06, 2: 0.156137054749}, 164: {1: 6.83582644776e-06, 2: 0.160017249654}, 165: {1: 7.46703541115e-06, 2: 0.772736409688}, 166: {1: 6.35602431782e-07, 2: 0.15}, 167: {1: 4.28132932403e-07, 2: 0.15}, 168: {1: 4.5619236151e-07, 2: 0.775861322815}, 169: {1: 2.26111797938e-06, 2: 0.85}, 170: {1: 3.54925419893e-07, 2: 0.85}, 171: {1: 5.28972169235e-06, 2: 0.85}, 172: {1: 3.39018182563e-06, 2: 0.85}, 173: {1: 3.51530418416e-06, 2: 0.159291858218}, 174: {1: 1.68375498935e-06, 2: 0.15}, 175: {1: 1.48535582186e-05, 2: 0.15}, 176: {1: 3.04981097616e-06, 2: 0.85}, 177: {1: 1.03224930002e-06, 2: 0.15}, 178: {1: 2.43009983658e-05, 2: 0.85}, 179: {1: 6.65575477243e-07, 2: 0.15}, 180: {1: 1.12256869854e-06, 2: 0.15}, 181: {1: 6.77344120409e-07, 2: 0.775348711427}, 182: {1: 1.91204751533e-06, 2: 0.726883199998}, 183: {1: 1.07997369738e-07, 2: 0.85}, 184: {1: 5.40332864562e-07, 2: 0.15}, 185: {1: 1.78351478793e-06, 2: 0.15}, 186: {1: 5.33651617685e-06, 2: 0.693993575673}, 187: {1: 3.75459032168e-07, 2: 0.15}, 188: {1: 3.74940334159e-05, 2: 0.15}, 189: {1: 2.43043514963e-05, 2: 0.15}, 190: {1: 9.87764471542e-07, 2: 0.72284175909}, 191: {1: 1.82151336559e-06, 2: 0.646662722318}, 192: {1: 1.33879211779e-07, 2: 0.85}, 193: {1: 4.80980529835e-07, 2: 0.15}, 194: {1: 2.92122211936e-06, 2: 0.15}, 195: {1: 6.39148628048e-06, 2: 0.85}, 196: {1: 7.10090127137e-07, 2: 0.77089749952}, 197: {1: 2.79244481728e-06, 2: 0.85}, 198: {1: 2.22838538385e-07, 2: 0.85}, 199: {1: 4.81155800939e-07, 2: 0.15}, 200: {1: 3.38210815284e-06, 2: 0.15}, 201: {1: 9.37452115359e-06, 2: 0.85}, 202: {1: 1.18318889482e-06, 2: 0.248599577106}, 203: {1: 1.74020480673e-05, 2: 0.85}, 204: {1: 2.97358178694e-05, 2: 0.85}, 205: {1: 2.04662535052e-05, 2: 0.334703335937}, 206: {1: 8.28082859147e-07, 2: 0.85}, 207: {1: 1.69218106344e-06, 2: 0.277363300137}, 208: {1: 2.09956887178e-06, 2: 0.285838747635}, 209: {1: 2.68256612731e-07, 2: 0.211890792482}, 210: {1: 1.47301043354e-06, 2: 0.802495129318}, 211: {1: 3.82691779191e-06, 2: 0.814028569912}, 212: {1: 6.71107109288e-06, 2: 0.275516715583}, 213: {1: 1.00596730095e-06, 2: 0.654788033668}, 214: {1: 3.0613085843e-07, 2: 0.15}, 215: {1: 1.66632022455e-06, 2: 0.85}, 216: {1: 3.08220797994e-06, 2: 0.85}, 217: {1: 3.33635498928e-06, 2: 0.29918211991}, 218: {1: 1.90008203665e-07, 2: 0.85}, 219: {1: 3.32049850362e-05, 2: 0.15}, 220: {1: 5.6308839472e-05, 2: 0.85}, 221: {1: 9.43695879039e-07, 2: 0.15}, 222: {1: 3.11730517483e-05, 2: 0.392700518419}, 223: {1: 1.5771216231e-06, 2: 0.85}, 224: {1: 4.19320874302e-05, 2: 0.85}, 225: {1: 1.9807710649e-06, 2: 0.15}, 226: {1: 0.0184210526316, 2: 0.15}, 227: {1: 0.14, 2: 0.15}, 228: {1: 0.0137254901961, 2: 0.15}, 229: {1: 0.175, 2: 0.15}, 230: {1: 0.0875, 2: 0.15}, 231: {1: 0.0291666666667, 2: 0.15}, 232: {1: 0.175, 2: 0.15}, 233: {1: 0.0636363636364, 2: 0.15}, 234: {1: 0.116666666667, 2: 0.15}, 235: {1: 0.0127272727273, 2: 0.15}, 236: {1: 0.116666666667, 2: 0.15}, 237: {1: 0.0777777777778, 2: 0.15}, 238: {1: 0.233333333333, 2: 0.15}, 239: {1: 0.7, 2: 0.15}, 240: {1: 0.35, 2: 0.15}, 241: {1: 0.7, 2: 0.15}, 242: {1: 0.7, 2: 0.15}, 243: {1: 0.7, 2: 0.15}, 244: {1: 0.0538461538462, 2: 0.15}, 245: {1: 0.35, 2: 0.15}, 246: {1: 0.7, 2: 0.15}, 247: {1: 0.35, 2: 0.15}, 248: {1: 0.7, 2: 0.15}, 249: {1: 0.175, 2: 0.15}, 250: {1: 0.35, 2: 0.15}, 251: {1: 0.7, 2: 0.15}, 252: {1: 0.7, 2: 0.15}, 253: {1: 0.35, 2: 0.15}, 254: {1: 0.7, 2: 0.15}, 255: {1: 0.7, 2: 0.15}, 256: {1: 0.7, 2: 0.15}, 257: {1: 0.175, 2: 0.15}, 258: {1: 0.7, 2: 0.15}, 259: {1: 0.35, 2: 0.15}, 260: {1: 0.35, 2: 0.15}, 261: {1: 0.35, 2: 0.15}, 262: {1: 0.35, 2: 0.15}, 263: {1: 0.35, 2: 0.15}, 264: {1: 0.233333333333, 2: 0.15}, 265: {1: 0.07, 2: 0.15}, 266: {1: 0.35, 2: 0.15}, 267: {1: 0.7, 2: 0.15}, 268: {1: 0.233333333333, 2: 0.15}, 269: {1: 0.7, 2: 0.15}, 270: {1: 0.175, 2: 0.15}, 271: {1: 0.35, 2: 0.15}, 272: {1: 0.7, 2: 0.15}, 273: {1: 0.35, 2: 0.15}, 274: {1: 0.35, 2: 0.15}, 275: {1: 0.35, 2: 0.15}, 276: {1: 0.116666666667, 2: 0.15}, 277: {1: 0.7, 2: 0.15}, 278: {1: 0.233333333333, 2: 0.15}, 279: {1: 0.7, 2: 0.15}, 280: {1: 0.7, 2: 0.15}, 281: {1: 0.0777777777778, 2: 0.15}, 282: {1: 0.7, 2: 0.15}, 283: {1: 0.35, 2: 0.15}, 284: {1: 0.7, 2: 0.15}, 285: {1: 0.0875, 2: 0.15}, 286: {1: 0.14, 2: 0.15}, 287: {1: 0.0291666666667, 2: 0.15}, 288: {1: 0.35, 2: 0.15}, 289: {1: 0.233333333333, 2: 0.15}, 290: {1: 0.233333333333, 2: 0.15}, 291: {1: 0.175, 2: 0.15}, 292: {1: 0.7, 2: 0.15}, 293: {1: 0.14, 2: 0.15}, 294: {1: 0.7, 2: 0.15}, 295: {1: 0.233333333333, 2: 0.15}, 296: {1: 0.7, 2: 0.15}, 297: {1: 0.7, 2: 0.15}, 298: {1: 0.35, 2: 0.15}, 299: {1: 0.7, 2: 0.15}, 300: {1: 0.7, 2: 0.15}, 301: {1: 0.175, 2: 0.15}, 302: {1: 0.7, 2: 0.15}, 303: {1: 0.7, 2: 0.15}, 304: {1: 0.233333333333, 2: 0.15}, 305: {1: 0.7, 2: 0.15}, 306: {1: 0.175, 2: 0.15}, 307: {1: 0.35, 2: 0.15}, 308: {1: 0.7, 2: 0.15}, 309: {1: 0.233333333333, 2: 0.15}, 310: {1: 0.14, 2: 0.15}, 311: {1: 0.14, 2: 0.15}, 312: {1: 0.1, 2: 0.15}, 313: {1: 0.14, 2: 0.15}, 314: {1: 0.116666666667, 2: 0.15}, 315: {1: 0.14, 2: 0.15}, 316: {1: 0.233333333333, 2: 0.15}, 317: {1: 0.0875, 2: 0.15}, 318: {1: 0.05, 2: 0.15}, 319: {1: 0.0636363636364, 2: 0.15}, 320: {1: 0.0636363636364, 2: 0.15}, 321: {1: 0.0291666666667, 2: 0.15}, 322: {1: 0.0388888888889, 2: 0.15}, 323: {1: 0.0175, 2: 0.15}, 324: {1: 0.00886075949367, 2: 0.15}, 325: {1: 0.00933333333333, 2: 0.15}, 326: {1: 0.00823529411765, 2: 0.15}, 327: {1: 0.116666666667, 2: 0.15}, 328: {1: 0.0777777777778, 2: 0.15}, 329: {1: 0.0777777777778, 2: 0.15}, 330: {1: 0.35, 2: 0.15}, 331: {1: 0.0636363636364, 2: 0.15}, 332: {1: 0.175, 2: 0.15}, 333: {1: 0.175, 2: 0.15}, 334: {1: 0.35, 2: 0.15}, 335: {1: 0.233333333333, 2: 0.15}, 336: {1: 0.175, 2: 0.15}, 337: {1: 0.175, 2: 0.15}, 338: {1: 0.116666666667, 2: 0.15}, 339: {1: 0.00933333333333, 2: 0.15}, 340: {1: 0.00729166666667, 2: 0.15}, 341: {1: 0.00546875, 2: 0.15}, 342: {1: 0.00269230769231, 2: 0.15}, 343: {1: 0.00333333333333, 2: 0.15}, 344: {1: 0.00263157894737, 2: 0.15}, 345: {1: 0.0538461538462, 2: 0.15}, 346: {1: 0.07, 2: 0.15}, 347: {1: 0.07, 2: 0.15}, 348: {1: 0.0155555555556, 2: 0.15}}, 'weights': {1: 0.372787572493, 2: 39.6491049566, 3: 24.3457064618, 4: 7.74672619262, 5: 47.1302586693, 6: -0.811080653887, 7: -8.35287489766, 8: -16.6498261938, 9: -5.5694029189, 10: 50.0542912379, 11: 27.9904995735, 12: 29.2616667362, 13: 5.63152167803, 14: 6.58512112819, 15: 1.49474302728, 16: -17.2997094408, 17: 37.799431957, 18: -36.815508153, 19: 22.4767169151, 20: 6.66366817094, 21: 2.4230494126, 22: 6.95225594101, 23: 5.37105185521, 24: -35.9324649864, 25: 73.0990594434, 26: 12.088102019, 27: 41.6356254966, 28: -31.0269547812, 29: 15.8296874463, 30: 17.725327324, 31: 52.2722264002, 32: 6.69398241178, 33: -48.2379438356, 34: 2.3420559966, 35: -51.0783422926, 36: 12.4125638422, 37: 22.7529823707, 38: 70.3630810304, 39: 35.8958917367, 40: 4.83729392555, 41: 3.70735359018, 42: 1.55954079629, 43: -0.791649241445, 44: 41.2943893361, 45: -13.0531548934, 46: 34.3373906421, 47: -12.5368910247, 48: 2.58107539331, 49: 9.72944903764, 50: 2.81649623733, 51: -2.07381055098, 52: 18.8314791207, 53: 2.85079148475, 54: 20.6793227948, 55: 3.34791788425, 56: 2.36073806401, 57: -20.0660656305, 58: 2.02632026839, 59: 42.4111513769, 60: -1.48331862535, 61: -2.31200802777, 62: 45.0662031786, 63: -23.47606746, 64: -24.7035176625, 65: -15.8905125999, 66: 2.06638030708, 67: -13.048552607, 68: -0.189707049464, 69: -12.8865422327, 70: 0.571597154288, 71: 0.695984173487, 72: 2.64639844178, 73: 2.63834135115, 74: 67.7969909395, 75: 16.3579221849, 76: 5.95565968814, 77: -1.0457451819, 78: -0.172672745233, 79: 11.9930312726, 80: -56.152028807, 81: -18.5313206237, 82: -0.857870193932, 83: 2.1088287201, 84: 0.557638539812, 85: -29.2627491148, 86: 1.97866800354, 87: -7.57381089454, 88: -92.8393257936, 89: 0.650099950464, 90: 13.4583534999, 91: -15.9999500957, 92: 2.28923528778, 93: 14.9575701879, 94: -4.22661397524, 95: -1.45992925468, 96: -13.6702416137, 97: 3.17345942477, 98: 1.38010735306, 99: 10.8089219468, 100: 5.150563515, 101: -9.42767080586, 102: -4.17816355988, 103: 22.8886875382, 104: 0.567657885613, 105: 0.680198074071, 106: -69.3174468134, 107: 2.28236876842, 108: 0.718107517945, 109: 17.0787549788, 110: -26.8934598127, 111: -4.00611673694, 112: -3.9043293874, 113: 5.69598486626, 114: 42.6182776668, 115: -100.0, 116: 4.67927419996, 117: 46.3165575976, 118: 17.6051857515, 119: -92.3089361089, 120: 32.2430327342, 121: 44.6614443362, 122: 100.0, 123: 23.0537705361, 124: 44.9628845751, 125: 37.3536040098, 126: 0.744903166244, 127: 3.23164966297, 128: 0.18214736417, 129: -6.28839518029, 130: 0.452106706431, 131: -3.98512540507, 132: 2.12482550277, 133: 3.61467999926, 134: -2.06020113462, 135: 5.85793220404, 136: 20.8957082404, 137: 2.73567568042, 138: -27.1077375782, 139: 0.2059030882, 140: -0.459995764105, 141: 64.125941923, 142: -27.5852035187, 143: 26.6746723294, 144: -0.893864239335, 145: 20.4348907674, 146: 0.54912194893, 147: 0.399892166035, 148: -29.8546858658, 149: 0.455318408222, 150: -6.8169988469, 151: 3.65576625127, 152: 0.277891527931, 153: 0.386484237693, 154: 0.407095748791, 155: 0.353513655098, 156: -0.802181391109, 157: -21.7356425659, 158: 0.671688380562, 159: 1.13703312071, 160: 1.28058640254, 161: 36.0073428835, 162: 19.3757808, 163: 57.7438946432, 164: -10.4404288519, 165: 55.9101209247, 166: -58.4654342247, 167: -24.9444922586, 168: -8.73596172606, 169: -1.89203118625, 170: -4.16677378993, 171: 3.77231434427, 172: 1.45755333506, 173: 4.34379011094, 174: 0.347059933056, 175: 6.83288022382, 176: -35.5797272802, 177: -25.5870625149, 178: -0.698377086395, 179: 0.475745498187, 180: 0.360856693655, 181: 0.732893593015, 182: -0.24560444371, 183: 5.50553095862, 184: -44.7876064946, 185: 9.66530558693, 186: -49.5954674537, 187: -59.4027568768, 188: -3.22948564867, 189: 17.7579464821, 190: -9.70806382433, 191: 0.314464106031, 192: -46.4312005814, 193: 0.859790588259, 194: 5.92040134487, 195: -4.22372780105, 196: 3.70298470096, 197: 4.81330404568, 198: 5.020999933, 199: 0.380991878766, 200: 1.11301416426, 201: 0.470427008808, 202: -89.6104961959, 203: 0.388754779246, 204: 0.480671490526, 205: 8.23122532221, 206: 0.421768655174, 207: -51.1462341131, 208: 0.501407223155, 209: 0.351528541306, 210: 0.089465333566, 211: 0.713558451958, 212: -5.23368602329, 213: -13.7377818432, 214: 22.9171138372, 215: 0.0212017305625, 216: 2.1794688797, 217: -63.8480808213, 218: 26.9594543141, 219: 7.00234497664, 220: -46.6446952083, 221: 7.39822622599, 222: -39.8465335502, 223: -20.0447026414, 224: 0.450917683278, 225: -9.93992008844, 226: 1.57290230232, 227: 50.2902658865, 228: 31.3699755592, 229: 0.152262590012, 230: -9.29858550063, 231: -6.11690807733, 232: -1.9128205814, 233: -0.940581209736, 234: 56.0794975906, 235: -9.41465151566, 236: 24.3654716448, 237: 33.3009503174, 238: -6.33826194602, 239: 2.08704491039, 240: -3.9386747862, 241: 0.586028934974, 242: 2.19098853468, 243: 71.115240805, 244: -16.8493401291, 245: -41.3970963441, 246: -27.8623556893, 247: 42.8646749693, 248: -100.0, 249: -23.6212088925, 250: -42.7914661033, 251: 30.6670674873, 252: -61.8030344474, 253: -24.4517851267, 254: -8.17930289056, 255: 4.49703257831, 256: 2.42079142636, 257: -1.3465198395, 258: 2.32719662118, 259: -6.74336469735, 260: 2.86459093225, 261: 8.87895157905, 262: 2.42721477067, 263: -2.20594846608, 264: -0.276774747573, 265: -0.938485375083, 266: -16.5715755745, 267: 25.254994673, 268: -23.003240902, 269: -27.8287462674, 270: 40.0419030767, 271: -12.419212139, 272: 38.08880439, 273: -13.0979309859, 274: 12.6941491451, 275: 28.0414130776, 276: -12.7850973309, 277: -38.619196745, 278: 44.0793130686, 279: -12.3520703784, 280: 15.0468257983, 281: -20.9001150467, 282: 21.7096583648, 283: 14.0402061003, 284: -57.9184680318, 285: 67.4624253732, 286: -100.0, 287: 1.68345674871, 288: 25.7141031191, 289: -0.651482052672, 290: 35.6341606545, 291: 33.5948626764, 292: 6.1038403364, 293: 14.2245536273, 294: 64.408520308, 295: 38.4982108535, 296: 20.0421018783, 297: 14.0731820348, 298: -34.5831681587, 299: -2.31324782026, 300: -38.3714831659, 301: -21.5172036814, 302: -3.62978598827, 303: -1.9258209496, 304: 21.6668655068, 305: 2.27332642961, 306: -1.37018116891, 307: 23.0074236227, 308: 1.12096524146, 309: 0.93511830413, 310: -3.79228155657, 311: 13.257535701, 312: 2.34821863923, 313: 2.41414861355, 314: -7.51601258165, 315: 0.387173007891, 316: 79.4280779912, 317: 2.16433714302, 318: 2.37801487347, 319: -29.191438094, 320: -2.20635658342, 321: -9.09884278236, 322: -15.6135710988, 323: 17.0037886379, 324: 4.46363081997, 325: -16.3905355774, 326: 8.90719883659, 327: 40.7040708814, 328: -70.5355666816, 329: -10.88659528, 330: -20.0752595164, 331: 20.4397029268, 332: -4.90111011498, 333: 0.772520244677, 334: -5.76324660945, 335: -14.2177111437, 336: 15.0117552702, 337: -59.9888373353, 338: -39.921058303, 339: 0.315545846894, 340: -26.1132739509, 341: -2.15237728235, 342: -15.3141797916, 343: 29.4691921722, 344: -27.5412650768, 345: -3.02073259599, 346: -60.1013800526, 347: 37.1284603981, 348: -50.4179316265, 349: -42.265223023, 350: -0.0120688125554, 351: -0.472606301018, 352: -0.647567583498, 353: 3.17411335251, 354: -9.83008782344, 355: 1.76918718251, 356: 3.68820668995, 357: -4.67023208809, 358: -3.65693903784, 359: 1.4220086917, 360: 8.82530363437, 361: -1.23435311069, 362: -6.35459402645, 363: 2.43892316181, 364: 0.375810358766, 365: -3.9367575386, 366: -10.9758351986, 367: 0.950891671329, 368: -1.19903436903, 369: -10.2498406597, 370: 2.794696636, 371: -0.86617609985, 372: -5.93672056279, 373: 3.56522570014, 374: -8.15719774807, 375: 0.214659641612, 376: 3.06262237244, 377: -0.00806953230368, 378: -2.13743390979, 379: -7.81860714048, 380: -5.92490864796, 381: 8.01271543385, 382: 5.0856153436, 383: 1.17147923457, 384: 3.66009398766, 385: -0.421708692692, 386: -5.64463895573, 387: 4.88140143081, 388: -3.30498655202, 389: -7.21199388319, 390: -3.35074305093, 391: 1.08760878403, 392: -0.152830744046, 393: -3.6520530766, 394: 5.53545192293, 395: -1.23318601323, 396: 0.333795554927, 397: -1.98001225516, 398: -1.52477644223, 399: 0.489809961998, 400: 1.91258129949, 401: -4.2557814537, 402: 1.82702499562, 403: -1.22591678181, 404: -7.01722011837, 405: 0.840887741506, 406: -2.71514029315, 407: 3.40534008257, 408: -6.80703468084, 409: -10.451488768, 410: -0.391702096454, 411: -4.01294783679, 412: 3.33606940504, 413: -0.939147575202, 414: 6.77793035383, 415: -3.95958929761, 416: -8.01540866566, 417: 0.116346607986, 418: -2.32554369301, 419: 0.421812358236, 420: -3.56073205058, 421: -12.29579147, 422: 3.8837196718, 423: -9.88829716268, 424: -6.55687798834, 425: 5.0762626317, 426: 0.994042476559, 427: 0.57312375361, 428: -13.0204475834, 429: -7.31485001069, 430: 4.48036086865, 431: 15.3800742886, 432: 1.4601612843, 433: -1.51756268405, 434: 6.9392423319, 435: -3.95109781947, 436: 17.2666742377, 437: 9.92393012364, 438: -7.78587249274, 439: -4.76625831797, 440: 5.09140531093, 441: 1.75445755099, 442: 0.250821570585, 443: -2.66057152028, 444: -1.03603106573, 445: 1.27434739026, 446: 8.64357898431, 447: 0.831583446858, 448: 5.5769659836, 449: 2.75281188062, 450: -1.03784952337, 451: 1.39785298934, 452: -10.6365780731, 453: 0.680352551352, 454: 1.43550868143, 455: 8.97141654647, 456: 1.42676009512, 457: 2.99665521424, 458: -6.80942502872, 459: 5.83425202615, 460: 0.388626873927, 461: -5.64932032782, 462: 10.0234107082, 463: 1.63765038195, 464: -1.99576143441, 465: 3.54842683808, 466: -0.974461012847, 467: 0.0108274125961, 468: -12.8660931549, 469: -10.3284306842, 470: -0.561006399269, 471: -3.94183516494, 472: 0.966950725893, 473: -4.79494100032, 474: -2.80132529768, 475: 0.124578484501, 476: 0.32173658596, 477: -4.6126077014, 478: -4.62630192896, 479: -0.133684944009, 480: 1.21655926611, 481: 0.639977697692, 482: -0.500238048061, 483: 2.92683492065, 484: -1.96336855138, 485: -4.69651537703, 486: -4.80912879093, 487: -9.34427907116, 488: -0.402472629035, 489: -0.069611343939, 490: -5.57427887207, 491: 0.153689122662, 492: 3.66833384931, 493: -0.182309907213, 494: -8.36446170434, 495: 0.350522244433, 496: 0.0310987442919, 497: -3.50199490031, 498: 0.0877205596232, 499: 1.61943452655, 500: -3.61487312679, 501: 0.524533296866, 502: 0.193878676411, 503: 0.232183225546, 504: 0.159476353693, 505: -0.438950228729, 506: 10.1655043122, 507: 0.965557557547, 508: 0.510112851718, 509: 0.464897884213, 510: -3.00138795673, 511: 0.206555773423, 512: 2.20557997257, 513: 1.05170872555, 514: -8.81684846471, 515: 9.87148559895, 516: -1.24857374247, 517: 2.25282394356, 518: 7.09700402522, 519: -1.93778190202, 520: 7.57185582685, 521: 0.291334054777, 522: 10.963835234, 523: 0.103363844713, 524: 1.29817287193, 525: 8.36426156481, 526: -12.726317775, 527: -0.976288706592, 528: 0.0684956746013, 529: 0.545400658329, 530: 0.482779494863, 531: -0.0204598755843, 532: 0.664242255768, 533: 2.06010024082, 534: 0.105650159355, 535: 15.6172695663, 536: 12.7254690372, 537: 7.57108467998, 538: -0.605547843217, 539: -2.03156547106, 540: 7.48932528702, 541: -6.32537510689, 542: 0.0818480953265, 543: -10.8697256453, 544: 0.180432895064, 545: -0.296006415438, 546: -0.510342052801, 547: 2.03547176573, 548: 0.0734999571206, 549: 1.76723016848, 550: 0.4868981007, 551: -8.02264437271, 552: 0.121630849611, 553: 0.200958662364, 554: 11.7269898765, 555: 1.14947468676, 556: -7.22010302658, 557: 0.268201295996, 558: 0.128843371923, 559: -1.50639886649, 560: 0.494833201972, 561: 0.00815222451478, 562: 11.0081861223, 563: -2.49660292146, 564: -0.519760233472, 565: 1.03423543691, 566: -2.27927552213, 567: 1.21858202844, 568: -2.36217397464, 569: 6.72447995893, 570: -2.38427936395, 571: -2.65898722853, 572: -6.34005071193, 573: 6.32034308617, 574: 2.53725887467, 575: 0.685247825129, 576: -3.41768321652, 577: -0.292661168469, 578: -2.71753987542, 579: -0.295089121218, 580: 0.713110470412, 581: -0.77107319801, 582: -4.52341209609, 583: -4.28647781186, 584: 3.10363695792, 585: -3.25624361625, 586: 3.30598805422, 587: 4.02038913151, 588: 5.73729795297, 589: 1.17443774716, 590: -5.37086282726, 591: 7.12865214596, 592: -3.37147516719, 593: -2.52661696746, 594: 8.82902729344, 595: -0.604328484161, 596: 1.13618950553, 597: 4.72615156081, 598: -4.02992329009, 599: -5.33634823256, 600: -4.7125920677, 601: -3.66150686422, 602: 6.41221717122, 603: 6.33214770636, 604: 1.2943202561, 605: 2.41839995496, 606: 1.77375998055, 607: 1.58555810419, 608: 1.86558749643, 609: 3.34313835416, 610: -0.220014524187, 611: 1.45543552319, 612: 2.01390812113, 613: 5.15280927245, 614: -0.541369518124, 615: -5.28863995703, 616: -8.73432710889, 617: 8.34285576306, 618: 13.6578640719, 619: -3.04765369466, 620: -0.712625327126, 621: -1.71130910723, 622: 10.9870644309, 623: -5.85801087064, 624: -13.1659060823, 625: 0.426228742295, 626: 4.87458136548, 627: 6.13517620653, 628: 1.07243786678, 629: -0.771988882467, 630: -0.218247142114, 631: -3.54902534465, 632: 1.11564271354, 633: 7.4875204654, 634: 8.26777038945, 635: 7.0613254197, 636: -0.779179516821, 637: -4.66603431636, 638: -0.958351538216, 639: 3.42642988335, 640: 1.68307314444, 641: 3.96484313698, 642: -9.75887070595, 643: -12.2371368002, 644: -7.09811867192, 645: 1.13732807015, 646: -5.25324982379, 647: 2.12583169471, 648: 9.66603394189, 649: 14.5038973774, 650: 3.73059693708, 651: 5.05117827219, 652: 4.89107702293, 653: 3.05607428707, 654: -6.29812524688, 655: -0.967295302553, 656: 1.13037199165, 657: 1.56047334092, 658: 1.70289587362, 659: -0.949985341129, 660: 7.81584046453, 661: 1.60595507376, 662: 2.10882471989, 663: -6.6826909672, 664: 1.28275323047, 665: 4.19885871286, 666: 1.34448279781, 667: 1.67499089354, 668: -3.48827755205, 669: -0.656062007815, 670: -0.23618245651, 671: 6.66933449596, 672: -15.015904403, 673: 12.1791817232, 674: -9.48358864988, 675: 10.5488532009, 676: -4.6747731748, 677: -8.46525001058, 678: -11.0301450884, 679: 4.83989744315, 680: -10.2255408524, 681: -2.16240804953, 682: 8.77752517341, 683: 7.93257092627, 684: -2.08048124754, 685: 4.4652996187, 686: -1.49498416578, 687: -15.0215402511, 688: 1.33794246496, 689: 2.30389344731, 690: -3.806785156, 691: 17.3763165376, 692: 2.06689867316, 693: -10.3521602085, 694: -3.37606653473, 695: 20.024864174, 696: 1.4121925027, 697: 3.32705886788, 698: 0.804203999036, 699: -1.38780096485, 700: -38.939921734, 701: 33.7950030561, 702: -1.80600221726, 703: -0.487387486405, 704: 12.1035886674, 705: -6.47891798079, 706: 36.939710885, 707: 9.94513969194, 708: -15.7213624434, 709: -8.92383652822, 710: 48.6892186434, 711: 92.9985171405, 712: 18.6000484684, 713: 15.9366017693, 714: 13.0158804885, 715: -36.3024737147, 716: -17.8019826849, 717: 2.78730545831, 718: 39.7320953127, 719: -1.22866236338, 720: 28.5777888124, 721: -0.674200819777, 722: 13.7686893617, 723: -16.1346595381, 724: -16.3622581629, 725: -24.0838612854, 726: -9.0595967844, 727: -21.3398226014, 728: -2.78507952587, 729: -2.84899232462, 730: 14.017773932, 731: 11.9977432928, 732: 0.0286466735669, 733: 9.17324721641, 734: 6.9450576235, 735: 6.11626172733, 736: 19.2650891897, 737: -3.8384746562, 738: -0.224051429164, 739: 43.5790709716, 740: -4.88516205385, 741: 9.23091529571, 742: 8.74266466768, 743: -0.919230907572, 744: -2.76503520556, 745: 4.37563820828, 746: -4.90640392884, 747: -1.04281711492, 748: -0.693523800785, 749: 8.76765102825, 750: 19.7611578501, 751: 5.86368382451, 752: 20.8044132973, 753: 3.84697102926, 754: -3.75844919524, 755: 1.54882995222, 756: -5.03925481908, 757: 15.93340903, 758: 49.780041811, 759: -6.9182574279, 760: -13.2428153387, 761: -3.5450534629, 762: 5.17547347543, 763: -27.953858007, 764: -3.38666497759, 765: 1.86757093033, 766: -4.78511215898, 767: 12.707297327, 768: -5.15533183114, 769: -5.27598736096, 770: -5.10662324568, 771: -5.0978264185, 772: -47.3027587887, 773: -4.75532152954, 774: 6.73966676333, 775: 7.03126368624, 776: -5.09240745901, 777: -12.4652097972, 778: -6.64340175517, 779: -0.680020991901, 780: 43.6802998069, 781: -5.21221112005, 782: -4.55843362725, 783: -26.5153632609, 784: -4.69774449828, 785: 4.30666076698, 786: 36.223679464, 787: -5.22809655422, 788: 0.20794517841, 789: -5.47355825545, 790: -5.10283088651, 791: 3.32909319686, 792: -5.13662444838, 793: -4.28725675343, 794: -5.04968088932, 795: -5.25125255809, 796: -5.18269934536, 797: -6.44647096893, 798: -5.05947407659, 799: 41.2838313567, 800: -5.57989198485, 801: 26.1015911138, 802: -3.25327049253, 803: -5.29803324176, 804: 47.9470211801, 805: -5.02721495664, 806: -3.35159769823, 807: -5.16262905307, 808: 20.138051524, 809: 32.8667132236, 810: 17.6189614647, 811: -10.4054582865, 812: -4.95785485338, 813: 1.52260962855, 814: 11.2505364154, 815: -29.1787396043, 816: -0.00619411972585, 817: 45.0511916667, 818: 80.2811277912, 819: 56.1349122962, 820: -7.20087420904, 821: -9.31625664722, 822: 12.0339801204, 823: -40.134895798, 824: -1.77053326641, 825: -1.98768555526, 826: 5.12976236105, 827: -10.795447305, 828: -1.48074101142, 829: -5.39904388324, 830: -1.68622225027, 831: -29.0165743791, 832: -4.30434327896, 833: 2.37242319191, 834: -2.19246560356, 835: -1.92834318597, 836: -4.9096209435, 837: -2.17928737633, 838: 5.39782117283, 839: -20.4931472703, 840: -42.219565581, 841: -31.8539527926, 842: -0.209558822152, 843: 5.71524182093, 844: -1.32287489083, 845: -1.39654399161, 846: -30.4826554094, 847: -1.57120179865, 848: -4.00059533191, 849: 0.982322184, 850: -1.07901021394, 851: -1.33703851425, 852: -1.4973923606, 853: -1.40371493164, 854: 0.499772073454, 855: -2.90891957305, 856: -2.65969852179, 857: -1.41259269033, 858: -2.11339476646, 859: -3.08972751476, 860: -5.69601284961, 861: -25.0003890163, 862: 0.159612946864, 863: 42.4777159486, 864: -67.8993595621, 865: 1.81973258175, 866: -17.0230098424, 867: 3.04200707761, 868: -4.79449680578, 869: -1.9813387104, 870: -1.29292676814, 871: -14.6941145643, 872: -1.33549073526, 873: -28.7522972815, 874: -45.0937680992, 875: -2.72501834371, 876: -1.05467414603, 877: -1.54037962819, 878: -1.40623535738, 879: -1.33127288416, 880: -1.77972199707, 881: 4.0149702119, 882: -2.03072022679, 883: 15.5135180459, 884: 4.05251797276, 885: 30.5126208373, 886: 3.4100148155, 887: 25.3315423527, 888: -1.53716436545, 889: -5.10579204765, 890: 4.96397797461, 891: -1.42027900341, 892: -26.1673636351, 893: 2.43512269167, 894: -0.997864769457, 895: -1.62146357415, 896: 23.36785547, 897: -1.33326929148, 898: -5.11701971533, 899: -1.54177148355, 900: -15.3064925846, 901: -1.43922795964, 902: -1.50687169171, 903: -1.17613260323, 904: -5.10742386618, 905: 9.35891938297, 906: -1.3517612441, 907: -1.50276025361, 908: -0.532864094248, 909: -1.49771839737, 910: -4.64586715262, 911: 2.99953017743, 912: 2.99863205905, 913: -1.18959676846, 914: -0.109095358292, 915: -7.36079483652, 916: 6.22402887127, 917: -13.7941518983, 918: 6.98058731202, 919: 8.46722114206, 920: -0.813218035479, 921: 8.06093925101, 922: -4.41924797068, 923: -3.87965002063, 924: -1.36428429519, 925: -25.2435735013, 926: -4.2449529028, 927: -1.66343284724, 928: 0.190089833796, 929: 22.5982146478, 930: -1.49182020101, 931: -11.6142876236, 932: -1.15879603554, 933: 5.96458989485, 934: 3.92257458049, 935: -16.0428930808, 936: 7.2654055936, 937: -5.25756613893, 938: -5.43141035501, 939: 7.63179916225, 940: 8.20581976466, 941: -20.6608692003, 942: -26.9855445825, 943: -7.52526611963, 944: 6.61243710821, 945: -7.00786847465, 946: 69.1671649659, 947: 3.07007987703, 948: 62.8750182452, 949: -24.9228727991, 950: 30.690785537, 951: 0.693122495255, 952: -7.69615408779, 953: -5.58768053643, 954: -5.14306502245, 955: 38.3486935966, 956: -4.55200169517, 957: -4.0106181205, 958: 1.04535475704, 959: -1.24604533132, 960: -5.07661892638, 961: -3.25436290066, 962: -3.75502573087, 963: 0.468914432559, 964: -2.31536229626, 965: -0.690095080682, 966: -4.41571394942, 967: -4.51876428105, 968: -2.9666502969, 969: -5.35845160931, 970: -17.2018763567, 971: -12.9167104688, 972: -19.8588285756, 973: -22.5743272117, 974: 67.4935765778, 975: 17.71503687, 976: -30.0069051107, 977: -5.4016695181, 978: -0.0646132992435, 979: -5.55422701099, 980: -2.64375105026, 981: 8.81805256972, 982: -22.9630100163, 983: 28.7087652856, 984: 3.93526535552, 985: -5.04981687729, 986: -5.29921446519, 987: -5.26338875925, 988: -4.50075866979, 989: -4.58787478485, 990: 0.314800791451, 991: -8.54476137565, 992: -31.3533492842, 993: 10.3625222988, 994: -6.32751200483, 995: 13.9208517676, 996: 14.3841948138, 997: -4.90827149289, 998: -0.782727133558, 999: -3.24500774996, 1000: 25.8809691405, 1001: 7.17364199047, 1002: -10.262729899, 1003: -41.4358129829, 1004: -4.35224356687, 1005: 11.0149929295, 1006: -5.04604228257, 1007: -5.03479001173, 1008: -5.15044876246, 1009: -5.00203697599, 1010: -5.13090157711, 1011: -5.22535369658, 1012: 11.5290985681, 1013: -5.17704545595, 1014: 8.25772106608, 1015: -5.13992990544, 1016: -5.23365377762, 1017: 11.9461743326, 1018: -5.11528499698, 1019: -4.16652475907, 1020: 21.3062996759, 1021: -8.11595521369, 1022: -14.2233533839, 1023: 16.9742431125, 1024: -51.8100701328, 1025: 7.74248878898, 1026: 11.3900542855, 1027: 14.5797899525, 1028: 26.3901350211, 1029: 7.81869024283, 1030: -1.69576638356, 1031: -3.79307585074, 1032: -3.62024211624, 1033: 0.913699205286, 1034: -21.5037902913, 1035: -4.64232706681, 1036: 10.1647028225, 1037: -2.55131565859, 1038: -12.7576869687, 1039: -14.0547568652, 1040: -5.52567710622, 1041: -14.6626233172, 1042: 4.55289842905, 1043: 3.44837453436, 1044: -10.4748520498, 1045: 0.449008679503, 1046: 14.5295409818, 1047: 32.5854789079, 1048: 0.672239396833, 1049: 35.1180297687, 1050: -6.87646628841, 1051: -3.14812617933, 1052: 3.83909518896, 1053: -10.1567260456, 1054: 13.6753267569, 1055: -8.35014971506, 1056: -16.8167224989, 1057: -26.1837310828, 1058: -37.0963935386, 1059: -7.89229419784, 1060: 20.3109897718, 1061: 18.7912462917, 1062: -0.726848777491, 1063: -4.48116464539, 1064: 5.33459534956, 1065: -9.05260048983, 1066: 36.9868065354, 1067: -8.30770206639, 1068: -5.62008713717, 1069: -12.1175386284, 1070: 9.3127501289, 1071: 0.466357527504, 1072: -16.3790553421, 1073: -18.4430303292, 1074: -8.20567672228, 1075: 7.99141487715, 1076: 32.830856168, 1077: -3.04125482842, 1078: -7.35191013408, 1079: -15.0068655946, 1080: 1.7092082822, 1081: -2.70756889789, 1082: 7.97409051097, 1083: 11.1113799972, 1084: 4.64044777613, 1085: 18.2214813414, 1086: 13.2419840757, 1087: -2.11565547151, 1088: 20.2146281322, 1089: -8.16102615344, 1090: -8.04188034032, 1091: 0.878775591146, 1092: -19.3578871501, 1093: 4.30547758495, 1094: -18.4479743191, 1095: 10.0377658323, 1096: 6.15349413117, 1097: 1.81831058903, 1098: -26.4972644317, 1099: -46.0441127704, 1100: 5.57776978298, 1101: 13.8862164067, 1102: -5.82344964452, 1103: 3.21908455814, 1104: 22.8370034768, 1105: 3.22073400979, 1106: 29.2273585888, 1107: 6.13429949791, 1108: 19.9490225542, 1109: -3.79889121445, 1110: 18.1450163431, 1111: -15.6328259046, 1112: 10.6168603307, 1113: -7.3184938507, 1114: -3.27998180892, 1115: 1.48339235033, 1116: -6.70745378397, 1117: 4.56066577555, 1118: 4.4553316524, 1119: 4.64423964486, 1120: 5.76652511078, 1121: -37.0558969583, 1122: 2.88613449954, 1123: 3.48299005063, 1124: -5.55070886589, 1125: 4.01160330356, 1126: 20.3425576768, 1127: -0.127237371341, 1128: 4.28004533394, 1129: 2.86368835155, 1130: 3.56714535715, 1131: -9.64975630256, 1132: 2.17698522732, 1133: -1.99629130502, 1134: -1.44964525436, 1135: 14.5775878433, 1136: 1.8639937118, 1137: 2.97446618325, 1138: -1.78842770243, 1139: 5.44043664989, 1140: -46.702529063, 1141: 3.47808163046, 1142: 0.716988864731, 1143: 3.04932843546, 1144: -5.75253647022, 1145: 4.58083415348, 1146: 4.75094677557, 1147: 2.81891172491, 1148: 1.02995422177, 1149: -1.34038652908, 1150: 14.1177729581, 1151: -4.51551182103, 1152: -6.66309529827, 1153: -6.00100269456, 1154: 1.5832027007, 1155: 5.85688768978, 1156: 0.785938316159, 1157: -26.9813373139, 1158: -16.5337925781, 1159: -2.26230623149, 1160: 72.5262062053, 1161: -6.84825336874, 1162: -25.9431386957, 1163: 2.83694526793, 1164: -14.3167743601, 1165: 28.3803228228, 1166: -17.1165026046, 1167: 18.0969608587, 1168: 23.4018836338, 1169: -25.9777180347, 1170: 3.65451519046, 1171: -18.7585761738, 1172: 20.8471346795, 1173: 0.942203446284, 1174: 2.70369645161, 1175: 0.515358741377, 1176: 27.7911309233, 1177: 1.48746750148, 1178: 3.07554197891, 1179: 1.08462336185, 1180: -21.3158474049, 1181: -0.0280790020955, 1182: 7.1395285722, 1183: -5.27548471898, 1184: 0.614675267091, 1185: 31.6286552711, 1186: 1.64511747615, 1187: -1.87830128189, 1188: 4.31208309453, 1189: 16.9179090717, 1190: 30.3253812332, 1191: 2.10338288547, 1192: -6.36460619444, 1193: 1.09272531641, 1194: 0.754028852966, 1195: 0.804265836969, 1196: 1.16663090602, 1197: 3.69956358814, 1198: 1.63922369007, 1199: 1.2039877066, 1200: 0.878921470325, 1201: 1.26157979599, 1202: 0.901610617094, 1203: 0.914106890392, 1204: -25.3150649563, 1205: 2.93286129792, 1206: 2.02281796112, 1207: 0.661691677504, 1208: -1.25195392816, 1209: -7.20315639636, 1210: -25.5733614062, 1211: -2.13788709377, 1212: -47.8137395463, 1213: -13.4232078867, 1214: -5.41112221924, 1215: 1.42632518509, 1216: 7.03238910759, 1217: 6.66217842038, 1218: -26.1975983632, 1219: 1.15121094851, 1220: 15.1264744989, 1221: 0.842025946483, 1222: -10.4633475491, 1223: -17.0460282818, 1224: -12.564681471, 1225: 0.868349170371, 1226: 0.934004067569, 1227: 1.31664048247, 1228: 1.25077300118, 1229: 1.19091327581, 1230: -7.4089684768, 1231: 11.8748664867, 1232: -6.47437772636, 1233: -39.8825909485, 1234: -9.06228145608, 1235: 12.5444269403, 1236: 9.56817914646, 1237: 7.83337088153, 1238: 1.86318560716, 1239: -12.556447823, 1240: 1.24960262995, 1241: 24.9927804701, 1242: -0.980493533377, 1243: 1.10568628955, 1244: -5.21464081422, 1245: 15.8186914545, 1246: 0.758326598333, 1247: 4.29769794703, 1248: 0.934704855203, 1249: -12.6460472688, 1250: 0.816672737917, 1251: 0.881010909806, 1252: -29.2404797206, 1253: 3.63681829234, 1254: 57.3273170328, 1255: 0.991821118798, 1256: 0.797186960384, 1257: -1.58210599857, 1258: 0.921263940993, 1259: 4.30321028653, 1260: -7.42238090988, 1261: -20.8832579717, 1262: -0.661911039301, 1263: 1.26608126112, 1264: -6.86769110121, 1265: -3.40463137947, 1266: 3.91259420893, 1267: -45.6117984545, 1268: -1.25371270321, 1269: -4.58146297868, 1270: 9.75544909105, 1271: -1.77349258992, 1272: -10.3081214749, 1273: 2.90367668855, 1274: 2.17095472384, 1275: 8.0803743379, 1276: 8.03542990549, 1277: 0.756228768517, 1278: -3.37462795856, 1279: 0.87071038533, 1280: -11.1299029393, 1281: -3.92810933065, 1282: -0.450104851333, 1283: 21.763901421, 1284: -0.226879139949, 1285: -9.29295682923, 1286: -13.6848397895, 1287: 3.05737059983, 1288: 8.77538478837, 1289: 10.0507156594, 1290: -27.2581834285, 1291: 8.36407827346, 1292: 9.33725773118, 1293: 0.76454167557, 1294: -7.05222770042, 1295: -11.3115856825, 1296: 0.0968568249199, 1297: 24.5828065977, 1298: 4.83907296912, 1299: 7.74793131382, 1300: -5.35912014615, 1301: -22.5076241255, 1302: -2.0364723578, 1303: 4.57045624173, 1304: 10.9981517202, 1305: -2.7471602516, 1306: 3.70199023191, 1307: 10.9646062521, 1308: 0.865819297213, 1309: 5.76375174367, 1310: 0.238824056457, 1311: 9.53000529273, 1312: 0.709450730783, 1313: 20.4302886349, 1314: 1.89893470705, 1315: -16.5659817223, 1316: -1.59557506776, 1317: -1.39404775549, 1318: 10.8873078745, 1319: 24.1176832197, 1320: -28.4321538824, 1321: -12.8675795145, 1322: 33.0404588795, 1323: -18.7329035721, 1324: -19.3923989515, 1325: -10.8319795112, 1326: 9.88097067523, 1327: -23.6108278581, 1328: -7.40074395988, 1329: -8.8788922687, 1330: -27.2534290737, 1331: -29.3190627276, 1332: 0.909302164945, 1333: 43.4776221213, 1334: 2.51109459467, 1335: -0.383515729873, 1336: 1.34924017604, 1337: 2.15248009847, 1338: 1.05345037694, 1339: -47.7493456871, 1340: 5.03810683579, 1341: -12.4941667199, 1342: 10.2825097167, 1343: -5.67195390112, 1344: -17.0685342454, 1345: -10.9313258167, 1346: 7.59467917191, 1347: 25.3276780347, 1348: -9.95744377266, 1349: -24.9426364657, 1350: 1.9512799192, 1351: -4.00715741833, 1352: -15.909342157, 1353: 0.547514001193, 1354: -34.1603519028, 1355: 4.32189013507, 1356: 4.40830446223, 1357: 3.98357162782, 1358: -30.750275409, 1359: 2.15325520815, 1360: 4.6454475852, 1361: 28.5295000028, 1362: 3.83161222198, 1363: -70.3527660587, 1364: 3.96688478489, 1365: 4.55927056565, 1366: 7.99835803026, 1367: 2.31659843038, 1368: 4.45427540665, 1369: -15.9244177484, 1370: 26.392905381, 1371: 3.63529156318, 1372: -17.4266103727, 1373: -12.963525394, 1374: -1.37921208413, 1375: 2.45005581795, 1376: 16.5165055969, 1377: -6.12383866367, 1378: -27.0309810529, 1379: -23.789864978, 1380: -0.701713460608, 1381: -4.54268262475, 1382: -15.5343325243, 1383: 22.155793087, 1384: -4.06912253738, 1385: 3.05012011934, 1386: 4.64175816145, 1387: -45.2716605387, 1388: 1.46371101501, 1389: 1.03626728208, 1390: -4.1225692372, 1391: -42.1777198928, 1392: -17.2180706874, 1393: 21.1406602027, 1394: -6.78647279489, 1395: 3.29053792529, 1396: 9.79299544213, 1397: 0.708985580112, 1398: 0.684545088415, 1399: 1.94325232876, 1400: -4.20112042308, 1401: 0.590363390297, 1402: -0.0672040505641, 1403: -8.57687960712, 1404: -7.9635140426, 1405: 7.6532236061, 1406: -3.18385760647, 1407: -0.680292395992, 1408: -1.04639324786, 1409: 7.89113116847, 1410: 0.246831856105, 1411: 1.37193461007, 1412: 0.981312504019, 1413: 8.59647867254, 1414: 0.822695422213, 1415: -8.99315302449, 1416: 0.795554690297, 1417: 5.06091761622, 1418: -2.77641811943, 1419: -0.0856823900035, 1420: 3.79448108617, 1421: -2.32515358943, 1422: 3.13814081877, 1423: -10.1642040812, 1424: 0.900258838176, 1425: 0.578188355437, 1426: -0.776356644819, 1427: 4.88785968809, 1428: 4.0170000138, 1429: -5.81563177003, 1430: 2.20452911302, 1431: 0.505146959393, 1432: -4.53290363324, 1433: 0.533707074101, 1434: -1.007670215, 1435: -2.82373642568, 1436: 1.03054601696, 1437: -0.0736426134874, 1438: -0.152293802082, 1439: 1.35473690326, 1440: 5.02614353727, 1441: -2.43634988351, 1442: -2.09813131603, 1443: -4.13334432374, 1444: 5.13784342513, 1445: 1.34879254466, 1446: 2.22405422912, 1447: 2.16585081497, 1448: 2.75310954231, 1449: -0.906950109679, 1450: -5.99307864053, 1451: -1.77737881446, 1452: -0.496250701619, 1453: -8.238933397, 1454: -1.4536404885, 1455: 5.18715949134, 1456: -2.09315894952, 1457: -0.757889461653, 1458: -1.55320790669, 1459: 1.35432538244, 1460: 0.916902359605, 1461: -17.4022278091, 1462: -0.424769411178, 1463: -0.122342769476, 1464: -4.49424080308, 1465: 1.6411762289, 1466: 5.53185831509, 1467: 4.48874921569, 1468: -2.15406423425, 1469: 5.06068399235, 1470: -26.0010548932, 1471: 3.71346658069, 1472: 0.844080448352, 1473: 0.28392201023, 1474: 1.76707604965, 1475: -7.65090962253, 1476: -5.09929795302, 1477: 1.84103127264, 1478: -6.53446964945, 1479: 5.33621588163, 1480: -0.654510663953, 1481: -0.0575404338558, 1482: 1.84755232856, 1483: -16.0152824228, 1484: -12.5200865276, 1485: 0.804259356006, 1486: -6.14792255891, 1487: 0.653499122464, 1488: 5.32474792327, 1489: 1.40842222408, 1490: -2.65527647899, 1491: 3.03465082645, 1492: -3.06644531817, 1493: -9.61287910834, 1494: 0.555747918747, 1495: -7.86129980718, 1496: 5.43766721587, 1497: -10.8016774844, 1498: 2.47302089227, 1499: 0.630093779856, 1500: -1.94572285564, 1501: 3.71811985024, 1502: -1.66654903585, 1503: 4.933196972, 1504: -3.68656365379, 1505: 0.156969253865, 1506: -3.63665933045, 1507: 2.1180883502, 1508: -3.30191237873, 1509: 4.66560689853, 1510: 4.64804030892, 1511: -4.16461044233, 1512: -0.411686020672, 1513: -1.90690655356, 1514: -2.33072829801, 1515: 12.3993440195, 1516: -1.39531536102, 1517: 11.4315749371, 1518: 1.45651645253, 1519: 8.34630965376, 1520: -0.885485692881, 1521: -12.39753938, 1522: 0.858079238104, 1523: 1.43693680688, 1524: 4.27285986546, 1525: 2.03265537008, 1526: 0.879398239549, 1527: 5.19801089522, 1528: 2.17549839477, 1529: -4.62384242176, 1530: -2.21628689873, 1531: 2.15620739529, 1532: -1.76236453736, 1533: 1.45703475832, 1534: 1.45951083789, 1535: -0.625297881737, 1536: 1.43581529148, 1537: 0.942343540062, 1538: -2.13088275382, 1539: -1.84834719956, 1540: -0.721601969714, 1541: 1.65112537333, 1542: 0.75290900017, 1543: 0.823104385388, 1544: 4.29182875106, 1545: 0.636966389672, 1546: 4.48712159508, 1547: 3.46296850733, 1548: 1.09481428044, 1549: 0.640799323235, 1550: 0.951756284354, 1551: 1.06792939624, 1552: 4.54851930867, 1553: 2.9122433644, 1554: 5.00482017179, 1555: 0.850394752951, 1556: 1.27046770545, 1557: -3.61387858441, 1558: 6.96640897945, 1559: 0.471988663308, 1560: 0.470168209542, 1561: 4.00318024486, 1562: 1.28842532753, 1563: -8.56155296421, 1564: 2.05962389017, 1565: -16.9499185877, 1566: 8.91236259468, 1567: 5.4156743794, 1568: 0.87794785845, 1569: 0.774263160901, 1570: 0.807490221206, 1571: 3.49435075785, 1572: -16.1449045833, 1573: 7.97548452856, 1574: 1.58306135372, 1575: 0.736494867127, 1576: 1.03323883768, 1577: 0.745404356288, 1578: 0.987464361441, 1579: -0.426114494311, 1580: -0.672887648957, 1581: 5.62314565843, 1582: 0.713600015653, 1583: -2.95757737592, 1584: -10.1030055035, 1585: 6.53769255924, 1586: -7.65664017731, 1587: -9.28233942554, 1588: 11.9005269605, 1589: 0.952235123313, 1590: 1.12936048007, 1591: -2.19963770465, 1592: -3.39476174812, 1593: 3.37788963831, 1594: 0.5667233938, 1595: 0.739739899799, 1596: 1.85278496907, 1597: 0.906984023923, 1598: 1.73876067677, 1599: 0.701819787247, 1600: 0.755794579483, 1601: -3.82907542897, 1602: 5.08399411199, 1603: 2.5684133823, 1604: 0.840947848286, 1605: 0.838680830791, 1606: -2.11218060704, 1607: 1.05593082913, 1608: 1.47610469162, 1609: -3.44736688974, 1610: 1.28259681827, 1611: 0.777297838661, 1612: 0.768434723485, 1613: 9.53929802183, 1614: -1.07633743219, 1615: 11.7725130556, 1616: -3.59814312969, 1617: -3.25458574109, 1618: -1.23379880406, 1619: 0.802326975522, 1620: 2.2843957988, 1621: 0.757088831843, 1622: 0.621852200324, 1623: -1.5493663245, 1624: 2.26829344265, 1625: 2.33663695538, 1626: -5.95171633467, 1627: 0.691782216841, 1628: 0.0972030941375, 1629: -8.03081781742, 1630: 4.52547193388, 1631: -0.0221809149553, 1632: -15.0723266315, 1633: 1.39000434937, 1634: -3.16963595994, 1635: 2.61845333464, 1636: 5.07410880436, 1637: 1.66421433771, 1638: -0.696750407426, 1639: -3.57103125906, 1640: -0.759480743804, 1641: -1.59128466889, 1642: -2.44047721121, 1643: 6.02636496167, 1644: 5.74018149596, 1645: -6.15118680392, 1646: -2.08635384367, 1647: 4.24414525491, 1648: 4.45945929395, 1649: -4.98792418908, 1650: 3.64343535718, 1651: 1.9125004094, 1652: -0.841710528427, 1653: 4.70821092071, 1654: 5.03409699714, 1655: 4.61247594967, 1656: 6.81380403371, 1657: -2.38013546367, 1658: 6.17466713236, 1659: -2.27930467216, 1660: -2.97422860496, 1661: 4.5218747699, 1662: -3.88925988558, 1663: 9.16100062564, 1664: 5.54786564491, 1665: -3.68817296215, 1666: -5.22873481207, 1667: 3.28053584717, 1668: -4.92860317311, 1669: 0.516484655327, 1670: -2.610015374, 1671: 2.64189298787, 1672: -0.667369536805, 1673: -4.94185133043, 1674: -11.9087638318, 1675: 0.853440064449, 1676: -10.1809043326, 1677: 8.41322269719, 1678: -2.10326940048, 1679: -11.9208673922, 1680: 10.7399320702, 1681: -3.18808020219, 1682: -5.46262055555, 1683: 3.76701359429, 1684: 0.796020278713, 1685: 4.85271796514, 1686: -2.63027848774, 1687: -0.923346131738, 1688: 3.43362189936, 1689: 3.54337672564, 1690: 2.09382203553, 1691: 6.65208157274, 1692: -4.17137411583, 1693: 1.23473536229, 1694: -5.17711331328, 1695: 1.06854695728, 1696: 0.317376753182, 1697: -6.79634660409, 1698: 1.91058258312, 1699: 1.77915172985, 1700: 0.433386983904, 1701: -1.64927448756, 1702: 2.98944035139, 1703: 0.754877396256, 1704: 1.8388464845, 1705: 1.71654493815, 1706: 1.02357416616, 1707: -12.0446232004, 1708: 4.9137744644, 1709: 5.09220764343, 1710: 3.14489594093, 1711: 5.04326661363, 1712: -4.14261443756, 1713: 4.6654439357, 1714: -3.68866381119, 1715: -5.12863395994, 1716: 0.873032407479, 1717: 1.58176221338, 1718: -2.43732528427, 1719: -1.62603715754, 1720: -1.05671644955, 1721: 5.14257463572, 1722: -8.35325331713, 1723: -1.6092694152, 1724: -3.91112912173, 1725: 1.81651360798, 1726: -1.79060297451, 1727: -6.71760951494, 1728: -3.70408589431, 1729: -2.94542743471, 1730: -1.16936235789, 1731: 0.585583018976, 1732: 13.8582863991, 1733: -10.7501147188, 1734: 3.27908488212, 1735: 3.81169532732, 1736: -4.58189131795, 1737: 1.51664584335, 1738: -5.48610232171, 1739: -6.19797399935, 1740: 3.4793279878, 1741: 6.61127465271, 1742: -13.9208879797, 1743: -7.78425680751, 1744: 7.4028187125, 1745: 6.83065662439, 1746: 0.755645375117, 1747: 7.47330029114, 1748: 9.51043983894, 1749: 7.63897440806, 1750: 26.9663597854, 1751: -13.0079009147, 1752: -23.5389603177, 1753: -23.0729415562, 1754: 4.87138671433, 1755: -4.40496633495, 1756: -6.29328176111, 1757: -7.68567098902, 1758: 1.42084596885, 1759: 9.77653392868, 1760: -8.31051707997, 1761: 1.94317173723, 1762: 10.2237274935, 1763: 3.61385080969, 1764: 3.54839698796, 1765: 5.48193333523, 1766: 8.99357114552, 1767: 3.20838888278, 1768: 18.8900772031, 1769: -17.7963853323, 1770: 0.948681290149, 1771: -1.20031642429, 1772: -11.9886607073, 1773: 4.45731012104, 1774: -14.8733506908, 1775: 18.4903396947, 1776: 22.7783669757, 1777: -4.74743468085, 1778: 6.00354025965, 1779: 2.27093604436, 1780: 2.38060760992, 1781: 3.46720854432, 1782: 18.1281783804, 1783: 18.8922598426, 1784: 23.0873116989, 1785: 4.17627821865, 1786: 0.452674787347, 1787: 4.30581113987, 1788: 11.2916715702, 1789: 9.17030347149, 1790: 4.12748582185, 1791: -0.819353523525, 1792: -11.1979410353, 1793: 2.97787794857, 1794: -1.43496996524, 1795: -12.2361226416, 1796: 0.17124044369, 1797: 25.7087691069, 1798: 4.06884447418, 1799: -9.44065555256, 1800: 3.14299841014, 1801: 3.51412635877, 1802: 12.560876959, 1803: 4.46637476444, 1804: 5.77835091025, 1805: -8.48723003022, 1806: 34.6019771377, 1807: -5.72976410707, 1808: 0.127353448148, 1809: -0.862874484975, 1810: -10.5756886046, 1811: 0.841793614736, 1812: -16.2883279968, 1813: 4.0950519981, 1814: -4.3668258788, 1815: 3.53968401424, 1816: -7.0124396094, 1817: -15.9732233674, 1818: 3.93266862842, 1819: -18.325565787, 1820: 8.25391830275, 1821: 9.50728116216, 1822: 11.9400218856, 1823: 6.64106027935, 1824: 16.4521899697, 1825: 9.84532072557, 1826: 0.829774322233, 1827: -2.0337047376, 1828: -0.846129001299, 1829: 4.2325011137, 1830: -5.27699784311, 1831: -0.331017918303, 1832: -21.7078453813, 1833: 2.15716035374, 1834: 3.86782614398, 1835: -23.5949689827, 1836: -28.2437073911, 1837: 3.97108516907, 1838: -16.2077632802, 1839: 2.91858148151, 1840: -2.183613706, 1841: 3.63563310393, 1842: 3.23222774731, 1843: -3.65430164387, 1844: 1.02675861135, 1845: 1.10316626991, 1846: 4.16843241933, 1847: -8.89014471575, 1848: 3.86825202941, 1849: 2.39330927966, 1850: 3.7226022175, 1851: -13.9271943688, 1852: 4.0280703662, 1853: 4.0948753334, 1854: 5.4692871501, 1855: -9.28895891857, 1856: 0.292804479361, 1857: -8.96806960959, 1858: 6.80314638617, 1859: -3.1597598794, 1860: -6.47936596858, 1861: -11.7208029221, 1862: -1.10960630841, 1863: 14.7940526548, 1864: 15.7350306881, 1865: 12.9259973711, 1866: -12.6650187127, 1867: 9.46647149265, 1868: -12.1628928707, 1869: 2.96510199815, 1870: 12.3154901011, 1871: 0.836411470332, 1872: 0.689146660495, 1873: -9.93350576174, 1874: -0.635834173718, 1875: 0.768242124309, 1876: 3.21965759677, 1877: 0.808303319166, 1878: -9.24653935549, 1879: 1.98052505139, 1880: 1.22585150636, 1881: -1.32246922979, 1882: 1.84146811964, 1883: 8.57680035289, 1884: 2.81401032667, 1885: -0.915912157527, 1886: 16.4108074398, 1887: -4.04019097819, 1888: 2.88449917802, 1889: -0.59572436811, 1890: -4.02523308378, 1891: 1.16934297395, 1892: 0.805980625647, 1893: 24.3895910046, 1894: 0.738518489113, 1895: 3.90689718598, 1896: 3.84342877962, 1897: 0.756474183306, 1898: 0.711215509964, 1899: 0.815825764137, 1900: 0.837072727047, 1901: 1.69745312491, 1902: 0.436912052873, 1903: -1.16174213735, 1904: 1.63836365185, 1905: 2.3824874295, 1906: 4.70300250324, 1907: 5.56201257451, 1908: 9.0192197761, 1909: -1.60162888056, 1910: 1.64903802151, 1911: -4.82628468343, 1912: -35.9730667082, 1913: 6.35374134792, 1914: -13.5251385845, 1915: 2.60040842316, 1916: 29.7272472494, 1917: 0.801852133391, 1918: 6.84210828867, 1919: 0.856963553614, 1920: -2.38616482334, 1921: -17.25674597, 1922: -19.1962509279, 1923: 0.0571570610392, 1924: 0.861117960976, 1925: 0.686287243047, 1926: 0.721759804873, 1927: 0.34104313503, 1928: 8.47996738984, 1929: 27.1359531614, 1930: -1.85263768401, 1931: -47.6405721522, 1932: -1.7288498752, 1933: -1.98701914142, 1934: -5.84277666956, 1935: 10.2441289006, 1936: 0.779729162488, 1937: 4.24096169287, 1938: 0.830384339042, 1939: 24.5036797632, 1940: -4.07229429663, 1941: -0.477113433889, 1942: 1.47348083654, 1943: 3.38982538544, 1944: 0.718703996503, 1945: 2.64375515262, 1946: 0.673679133746, 1947: 16.9687826229, 1948: 0.796276282798, 1949: 0.754740495835, 1950: 14.1802429038, 1951: 3.75639267164, 1952: 36.1840504201, 1953: 0.686128679297, 1954: 0.867343420575, 1955: -1.42163829014, 1956: 0.842305789213, 1957: 0.950871034495, 1958: -9.86891780194, 1959: -8.91435168754, 1960: 0.658852540648, 1961: -1.14483647128, 1962: -4.24597617268, 1963: -3.0356626583, 1964: 7.24908237818, 1965: -14.3992531835, 1966: 3.07485379012, 1967: 12.3914985677, 1968: -1.76859332685, 1969: 3.56962493799, 1970: -13.3549687438, 1971: 0.961882076064, 1972: 13.4846054709, 1973: 10.8498234465, 1974: 8.28763420852, 1975: -6.43388241383, 1976: 11.2877157505, 1977: 1.29165565194, 1978: 9.66549624794, 1979: 6.25254750331, 1980: 2.60993060616, 1981: 10.4066653628, 1982: -3.75817677309, 1983: -19.312218845, 1984: 4.13975036251, 1985: 3.12660363291, 1986: -3.5128991711, 1987: 1.40987929251, 1988: -1.62236949465, 1989: 15.6679640835, 1990: -1.29465075848, 1991: 8.90286227847, 1992: -1.10814918813, 1993: -14.7629952651, 1994: 54.9015293553, 1995: 0.138449483771, 1996: -0.598021166602, 1997: -12.6407307872, 1998: 42.2847066537, 1999: -0.906761776145, 2000: -4.85555666207, 2001: 3.41070905558, 2002: -23.1948495653, 2003: 3.4601137669, 2004: 3.88315365032, 2005: 3.83932478746, 2006: 0.402846088423, 2007: 4.01042717882, 2008: 3.96192378931, 2009: 2.13890513621, 2010: 1.59864112402, 2011: -0.0641474227862, 2012: -0.717028214844, 2013: -1.59088389307, 2014: -14.0049789757, 2015: 5.16388709941, 2016: 5.15795780137, 2017: -0.140069531486, 2018: -6.80627657647, 2019: 17.9137800846, 2020: 1.87680268644, 2021: -31.0228872381, 2022: 8.17737356817, 2023: -19.7831847667, 2024: 3.6496906904, 2025: -19.9874036146, 2026: 6.71049731692, 2027: 0.438705060932, 2028: 2.65505730375, 2029: 8.68931908255, 2030: 10.639033227, 2031: 25.1590713081, 2032: 3.79249582101, 2033: 3.35054514813, 2034: 4.67897488829, 2035: -6.85477074892, 2036: -0.193816764062, 2037: -21.8297171962, 2038: 0.650770053597, 2039: 13.8370022647, 2040: 29.1227139576, 2041: -40.2968919654, 2042: 6.35007623237, 2043: -4.73965142115, 2044: -2.37728365577, 2045: -55.696987183, 2046: 5.5143697364, 2047: -16.7954370368, 2048: -0.818999144364, 2049: 3.58341292446, 2050: 0.828751713498, 2051: -1.94529149019, 2052: -8.46543917226, 2053: 2.76074069482, 2054: 2.76462258861, 2055: 0.757432512128, 2056: -4.06759867057, 2057: -1.64618367518, 2058: 4.03680953808, 2059: -5.42175899022, 2060: 3.85333034252, 2061: -29.4834922391, 2062: 4.02637447397, 2063: 4.08063407145, 2064: 16.1705907247, 2065: 3.37302641049, 2066: 0.984789013651, 2067: -25.672137391, 2068: 14.1543713691, 2069: 5.68651391021, 2070: 0.809898984969, 2071: -26.2927143877, 2072: -3.76786576617, 2073: 0.9032692952, 2074: 1.06326980432, 2075: -7.24178136245, 2076: 20.4778817327, 2077: 16.3219379222, 2078: 3.282687967, 2079: -1.49563029221, 2080: 12.5657318325, 2081: -49.3590063017, 2082: -28.0616443123, 2083: -5.00629829193, 2084: 3.70495635144, 2085: -6.68313556377, 2086: -7.55384009104, 2087: -11.7010885533, 2088: -12.8466090262, 2089: 6.52796798292, 2090: -1.19588290382, 2091: -3.40869523603, 2092: 27.7270485186, 2093: 18.3798362133, 2094: -51.6814132748, 2095: -0.671910906735, 2096: 1.68049578597, 2097: 2.43185091927, 2098: 1.09809761145, 2099: 72.9416645463, 2100: 19.3393207484, 2101: -10.8408945638, 2102: 8.42948246099, 2103: 1.31999959678, 2104: -0.840327831843, 2105: -31.7585329335, 2106: -25.928691611, 2107: 18.9383522289, 2108: -1.56676165188, 2109: -12.3233629539, 2110: 1.53327812866, 2111: -67.8382891916, 2112: -22.2439451403, 2113: 94.7191884711, 2114: 37.8999604986, 2115: -27.5099423601, 2116: 58.970931087, 2117: 12.2420042053, 2118: 8.3007733932, 2119: 14.4857703566, 2120: -13.303163458, 2121: -25.1066833866, 2122: -9.94824126439, 2123: 11.7378082747, 2124: 12.4085519329, 2125: 10.1448595682, 2126: 0.142535881775, 2127: -17.855953908, 2128: -2.77025783381, 2129: -7.78176239461, 2130: -4.61366988945, 2131: -20.6478059464, 2132: -2.51395168274, 2133: -2.75999121018, 2134: -22.838861692, 2135: 37.2083706297, 2136: 5.94448958933, 2137: -46.1612202216, 2138: -8.64834229896, 2139: -4.00840750166, 2140: -4.24558745007, 2141: 2.03237929819, 2142: -7.76156646844, 2143: 23.4846110969, 2144: -6.7328766487, 2145: 7.75212165298, 2146: -11.2651330408, 2147: -5.44049547114, 2148: 33.6191913757, 2149: 1.42145943185, 2150: -4.68802337531, 2151: 8.69061201638, 2152: -9.25787989988, 2153: 0.45271210607, 2154: -5.76434283582, 2155: 12.0223979418, 2156: -32.1312882124, 2157: -4.91100080305, 2158: -0.213004361656, 2159: 6.38449312995, 2160: -3.50208188882, 2161: -2.28274003792, 2162: -3.95066581787, 2163: 4.80696611999, 2164: -4.27526372987, 2165: 0.000399258372208, 2166: -21.454780155, 2167: -4.70401697103, 2168: -5.69311415834, 2169: 2.61242718848, 2170: -5.19582418044, 2171: 1.466337104, 2172: -4.20873442499, 2173: 2.86748053904, 2174: 35.8170284421, 2175: -5.29706904368, 2176: 31.3620879983, 2177: -4.88345055041, 2178: -3.13016282268, 2179: 38.0005818974, 2180: 8.62648086133, 2181: 97.2840694013, 2182: 14.6381764526, 2183: -1.65975287817, 2184: 51.8974050585, 2185: 38.7751555703, 2186: -6.17314597486, 2187: -11.1687536542, 2188: 3.50268352262, 2189: -1.57193698464, 2190: -3.32836006539, 2191: 1.31409563682, 2192: -4.20257518175, 2193: 1.83054938596, 2194: -5.29367604711, 2195: 57.1387178461, 2196: 31.928907082, 2197: 17.9245601391, 2198: 2.09161343416, 2199: -4.34575696964, 2200: 34.884695962, 2201: 1.36548945193, 2202: -4.90733765809, 2203: -1.12363060301, 2204: 26.3500623316, 2205: 3.12629157752, 2206: -42.0481372878, 2207: -39.0550794314, 2208: 20.8232675883, 2209: 22.693256562, 2210: 4.11559035209, 2211: -28.3976692826, 2212: 1.98506552112, 2213: 100.0, 2214: -42.2988290135, 2215: 34.8482957454, 2216: -46.8148415797, 2217: 19.9265138321, 2218: -11.2260086847, 2219: -26.8185817167, 2220: -0.848687596998, 2221: 0.294676009188, 2222: 11.1983535148, 2223: 16.0773499889, 2224: -0.797999507789, 2225: 2.37744163978, 2226: -7.31178288626, 2227: -10.9218447214, 2228: 0.0637900041235, 2229: -10.4833988995, 2230: -12.5856991967, 2231: 1.38992687528, 2232: 8.39455363051, 2233: -4.7466989798, 2234: -18.3765333907, 2235: 6.33932651061, 2236: -0.407602972259, 2237: -18.3315913196, 2238: 1.58709668651, 2239: -13.1500685831, 2240: -0.848167947136, 2241: -0.738454504958, 2242: -7.28118587622, 2243: -0.967699940485, 2244: -4.2957485177, 2245: 1.20036885765, 2246: -0.906872239807, 2247: -0.725735988391, 2248: -0.995433238206, 2249: -0.902609878233, 2250: -3.74494118341, 2251: -17.0693076139, 2252: -2.77043048784, 2253: -1.19669835346, 2254: -1.33664760631, 2255: 12.1131325142, 2256: 4.75949477979, 2257: -15.293806946, 2258: 18.9223159341, 2259: 32.199897673, 2260: 47.573199869, 2261: 4.78347065589, 2262: -8.62356616322, 2263: -3.30945928814, 2264: -2.7111240216, 2265: 7.45537223149, 2266: -1.37774443559, 2267: -63.7657037274, 2268: -0.947249265174, 2269: 14.338516589, 2270: 3.40068917249, 2271: 48.9683925561, 2272: 0.676461436745, 2273: -0.93932801103, 2274: -0.899609514124, 2275: -0.825212943649, 2276: -1.14222784675, 2277: -1.31996826877, 2278: 4.15115035526, 2279: 6.63156621451, 2280: 3.11614608372, 2281: -2.32465366844, 2282: -1.6240665493, 2283: 12.8412114035, 2284: 0.307044671529, 2285: -4.84052108636, 2286: 0.588698600882, 2287: -0.941823880301, 2288: 26.7973281716, 2289: 2.93168980657, 2290: 4.03311629583, 2291: -6.10895296129, 2292: 40.9548830599, 2293: -0.901220937194, 2294: -4.59247673998, 2295: -1.09838980282, 2296: -6.77941650692, 2297: -0.927029264987, 2298: -0.815798350737, 2299: 33.1908295475, 2300: -4.5872432815, 2301: -60.275764476, 2302: -0.779851529743, 2303: -0.725328160569, 2304: 1.878982476, 2305: -1.09358217781, 2306: 0.906570970731, 2307: 4.23191632227, 2308: -19.6712097922, 2309: -0.724998966783, 2310: -1.00596197168, 2311: -17.6215705669, 2312: -0.108282423808, 2313: 26.5419525077, 2314: -38.3757400982, 2315: -4.12466563154, 2316: -4.36846773473, 2317: 8.13304737786, 2318: -3.59209585685, 2319: 2.89382676569, 2320: -1.61448421024, 2321: 18.4369571763, 2322: -9.64551258828, 2323: -5.09315482359, 2324: 32.4359816487, 2325: -82.3684703881, 2326: -0.891474084838, 2327: -14.3747265945, 2328: 6.86313919636, 2329: -3.9907308794, 2330: -5.55271381507, 2331: 30.8077334949, 2332: -24.6158377475, 2333: -4.47039880643, 2334: 2.40954327615, 2335: -16.2504051811, 2336: 11.9954708421, 2337: -21.9509861856, 2338: -6.62883318374, 2339: -13.6911177565, 2340: -14.5603076554, 2341: 50.7015297694, 2342: 4.83290216092, 2343: 2.73866052081, 2344: 12.4195069481, 2345: 21.5593303526, 2346: 24.224500437, 2347: 59.6697779446, 2348: 14.5994596042, 2349: -4.31788537427, 2350: -5.4031877399, 2351: 1.68436174677, 2352: -3.71515284408, 2353: -4.26571277749, 2354: 1.39965930844, 2355: -0.285740732945, 2356: -4.49294696732, 2357: -1.85374286523, 2358: -1.26134740123, 2359: -3.8398814931, 2360: -39.6301119387, 2361: 12.2056590246, 2362: 22.1565595108, 2363: -0.973085617672, 2364: 12.3916302586, 2365: 7.62790694967, 2366: 1.79685741453, 2367: 21.9100021355, 2368: -24.0552261599, 2369: 4.59394262865, 2370: -11.7919171303, 2371: -19.4256461531, 2372: 35.2273700143, 2373: -0.985620042271, 2374: 20.1040770692, 2375: 17.3054247809, 2376: -7.67979676401, 2377: -32.7733008245, 2378: 19.7457483914, 2379: 13.0092526748, 2380: -19.8691861897, 2381: -4.31106739765, 2382: -26.195131479, 2383: -3.83474280781, 2384: 5.21676113295, 2385: -5.60839745284, 2386: 49.3923269349, 2387: 43.312370098, 2388: 3.21795078465, 2389: -5.65607561569, 2390: -0.345091586042, 2391: 2.50682400746, 2392: -1.16627040465, 2393: -2.81492865431, 2394: -4.5473019976, 2395: 7.0423902832, 2396: 23.2733827106, 2397: 3.78170624831, 2398: 2.57482436958, 2399: 32.4602909943, 2400: -1.7120854454, 2401: 0.261122712344, 2402: -4.53466254322, 2403: -4.65102507693, 2404: 4.76037153085, 2405: -9.63827544214, 2406: 0.757081584832, 2407: -6.2734484024, 2408: -78.6835860044, 2409: -4.37673396959, 2410: 26.8851474566, 2411: -4.56040359899, 2412: -4.75263047352, 2413: -54.5216033598, 2414: -4.20848793599, 2415: 3.71664425125, 2416: 9.56228325134, 2417: -2.45688231642, 2418: 11.4295988035, 2419: 17.7094877692, 2420: -17.7868120055, 2421: 11.139320446, 2422: -21.5931187094, 2423: -18.0623889433, 2424: -13.5670477146, 2425: -4.00441300626, 2426: 47.9976209995, 2427: 2.73578565874, 2428: -6.46752692524, 2429: -71.7478621348, 2430: -11.641065871, 2431: 6.46111157172, 2432: -19.8906540227, 2433: -4.55353954174, 2434: -14.0202613434, 2435: -2.96309657048, 2436: -4.07113060252, 2437: 15.0150634277, 2438: -46.2792404103, 2439: -13.1558935335, 2440: 56.6839801543, 2441: 5.99391952854, 2442: -37.4799233199, 2443: -30.3642929397, 2444: -0.288796832917, 2445: -43.9372561111, 2446: 14.1868992831, 2447: 7.8985225414, 2448: 55.0506617571, 2449: -4.38576255358, 2450: 42.7152116465, 2451: 50.3762665275, 2452: -55.0966355861, 2453: 43.5846324413, 2454: 15.077286418, 2455: 23.8812545858, 2456: -33.5176028234, 2457: -27.107796421, 2458: 11.498141871, 2459: 39.1756332831, 2460: -60.9715073998, 2461: 7.82064410125, 2462: 4.01031360263, 2463: -5.15924989469, 2464: -18.2263749844, 2465: -10.5858834854, 2466: -7.94685498331, 2467: -9.02534248737, 2468: -22.2226572845, 2469: 23.9692612311, 2470: 40.6823162566, 2471: -10.8800693523, 2472: -29.6735403285, 2473: -7.86904180554, 2474: -6.79832250956, 2475: -17.8370122366, 2476: -19.1947651968, 2477: -73.7292588474, 2478: 9.77458517345, 2479: -1.61210589523, 2480: 4.68867827058, 2481: -19.7138323923, 2482: 18.3339598832, 2483: -59.7168961269, 2484: -21.0207309532, 2485: -2.00285707233, 2486: -30.7462700463, 2487: -37.5651694849, 2488: 3.34469008478, 2489: 1.07706029646, 2490: 55.0785761825, 2491: -2.21142588978, 2492: -4.18379534369, 2493: -1.63098415547, 2494: 22.9344663782, 2495: -42.5290044958, 2496: -2.037014165, 2497: 68.6359002548, 2498: -45.0167373017, 2499: -1.94481935027, 2500: 39.0481472843, 2501: -30.9156456108, 2502: -96.3755955216, 2503: 22.1269028618, 2504: -25.7918173355, 2505: -66.4513638618, 2506: -26.483451946, 2507: 1.78818878849, 2508: 44.919551031, 2509: -1.81921432228, 2510: 26.9775932912, 2511: -2.1210616762, 2512: 13.0183141551, 2513: -2.77850600152, 2514: -9.11814748154, 2515: -37.7980239188, 2516: -1.98703948067, 2517: 75.6443663263, 2518: -12.1820746485, 2519: -1.32455866738, 2520: -9.72839876654, 2521: -2.35890342125, 2522: 24.1631420481, 2523: 97.4022973948, 2524: -0.633312665878, 2525: 20.3977863606, 2526: -2.24589272015, 2527: -3.47147865834, 2528: 15.004708091, 2529: -3.37996973997, 2530: 11.3274216151, 2531: 3.95317309752, 2532: -2.66267659442, 2533: 12.9228117757, 2534: 12.2370116406, 2535: -2.01159234109, 2536: -17.1117788171, 2537: -2.72230901894, 2538: -3.27949551023, 2539: -2.19363336532, 2540: 2.8615495664, 2541: -2.12717203398, 2542: -2.31856119707, 2543: -2.36992381948, 2544: 37.1361953659, 2545: -1.84994845398, 2546: 1.752634983, 2547: -1.75282094344, 2548: 6.47684585933, 2549: 15.5813027488, 2550: -1.97665530009, 2551: -1.43465623846, 2552: -2.71703021671, 2553: 10.0722430804, 2554: -2.4263398807, 2555: -6.40200960383, 2556: -100.0, 2557: 5.04957047105, 2558: -23.2207285213, 2559: -21.008414968, 2560: -80.4882418123, 2561: 14.3031946779, 2562: 14.0101195931, 2563: -45.3343433538, 2564: -5.64117614137, 2565: -97.0227218706, 2566: 33.6088705549, 2567: -23.4275155057, 2568: -11.8118127764, 2569: -0.63838153058, 2570: 0.710021840383, 2571: 3.37291384284, 2572: 11.924954495, 2573: -0.277602701356, 2574: 6.6147530662, 2575: 3.39295324786, 2576: 11.9527286749, 2577: 0.25990809352, 2578: 12.6940201209, 2579: 4.06738467333, 2580: -10.2998442482, 2581: 8.25498500713, 2582: 3.08174384542, 2583: -10.8619896255, 2584: 28.1458372103, 2585: -8.14103533972, 2586: -13.9231342182, 2587: 0.657722241195, 2588: 0.966796123148, 2589: 0.14183516022, 2590: -0.489136714712, 2591: 29.296140914, 2592: -0.297577161559, 2593: -4.05961443649, 2594: -27.732440787, 2595: 1.18177544596, 2596: -0.397073811008, 2597: -0.381368494651, 2598: -0.376390079428, 2599: -2.40835303872, 2600: -39.8123762223, 2601: 2.53912302811, 2602: 1.14834315059, 2603: -1.12247261348, 2604: -0.0244800853665, 2605: -2.96744077022, 2606: -48.2406723231, 2607: 24.5226811076, 2608: -49.33765797, 2609: 30.6054882482, 2610: -35.3278346714, 2611: -18.6485582784, 2612: 1.60135710975, 2613: 9.10719760584, 2614: 46.3164857678, 2615: -0.270710975758, 2616: -32.8726364756, 2617: -0.212377200802, 2618: -13.8641726898, 2619: -8.79042338101, 2620: -6.90380190587, 2621: -1.59364127634, 2622: -0.37207899912, 2623: 0.0839165548247, 2624: -0.41143812977, 2625: -0.608152314941, 2626: -8.52870020841, 2627: -6.56054050887, 2628: 19.6074347203, 2629: 36.3648795915, 2630: 22.9694366343, 2631: 22.4130536691, 2632: 17.3441967191, 2633: 16.4677811079, 2634: -17.2099451023, 2635: -30.6832244501, 2636: -0.768078242003, 2637: -3.40555023904, 2638: -5.22401046688, 2639: -15.648648295, 2640: 7.14141206807, 2641: -50.5380286438, 2642: -0.342186648797, 2643: -1.89767147961, 2644: -0.409977544623, 2645: -4.01175217646, 2646: -0.344072479949, 2647: -0.502933283954, 2648: -42.6022104804, 2649: -1.82323158363, 2650: 3.23792586454, 2651: -0.399405111928, 2652: -0.301376044143, 2653: -2.98837662533, 2654: -0.375725502923, 2655: -4.65424459677, 2656: 16.3831306994, 2657: 6.40810506617, 2658: -2.36789563404, 2659: -0.593714037535, 2660: -16.0151168456, 2661: 4.09582726794, 2662: -43.6305512533, 2663: -24.7688839104, 2664: 14.8805521441, 2665: -9.93625078039, 2666: -26.2012744191, 2667: -1.77359062984, 2668: -20.768809584, 2669: -0.132029257891, 2670: 61.6310093159, 2671: -3.32710030081, 2672: -10.2687564087, 2673: 12.8904807108, 2674: -4.14548349451, 2675: -1.73818628491, 2676: -2.0674928066, 2677: -14.9870606712, 2678: 18.7837294283, 2679: -9.33226309298, 2680: -15.0803458802, 2681: -27.7282186049, 2682: -1.91590054832, 2683: 6.62164434915, 2684: 56.9891690399, 2685: 22.298058657, 2686: -46.8902362508, 2687: 12.6408103187, 2688: -14.9733166109, 2689: 32.9760156945, 2690: -13.7857065106, 2691: 32.8770024163, 2692: 15.6219813857, 2693: 14.8547770087, 2694: 6.58980774996, 2695: 12.0283993273, 2696: -10.3584878962, 2697: -31.4572382916, 2698: -4.90197612329, 2699: -2.00000517826, 2700: -50.5464114374, 2701: -2.07716537443, 2702: -4.15220761282, 2703: -30.7024459494, 2704: -7.9722016701, 2705: -1.68469431787, 2706: -1.18833074262, 2707: 7.602067587, 2708: -2.25656702519, 2709: 10.9722894238, 2710: -24.9817865181, 2711: -64.4204468486, 2712: 41.2957311635, 2713: 11.6319119634, 2714: -6.18989991899, 2715: -28.9808880693, 2716: 31.7037236433, 2717: -0.406573240455, 2718: -61.7197832804, 2719: -5.21296517515, 2720: 1.44028660641, 2721: -1.38285728537, 2722: 12.8245919847, 2723: 30.8022631981, 2724: -10.6153011881, 2725: 43.3007718363, 2726: 17.429139578, 2727: -35.2068129779, 2728: -56.4468381488, 2729: 36.6009475843, 2730: -2.02833792577, 2731: -2.03185599965, 2732: -2.27397937228, 2733: -6.81566219879, 2734: 9.55744205243, 2735: -6.34661401928, 2736: 61.8985708969, 2737: -38.5623135073, 2738: 19.9842777993, 2739: 41.9396701935, 2740: 16.445677438, 2741: 60.9307669725, 2742: -8.12570975296, 2743: 0.747180078536, 2744: 7.12678254773, 2745: -54.7336418802, 2746: 0.81642393479, 2747: -29.9903047606, 2748: 2.91970514899, 2749: -3.08933656064, 2750: 12.4975616831, 2751: -1.9394578625, 2752: -1.8040156123, 2753: 1.50022204113, 2754: 17.0994892728, 2755: -1.47316819818, 2756: -1.73259943086, 2757: 82.5375251608, 2758: -1.8774667786, 2759: -32.2631928562, 2760: -1.97504652904, 2761: -1.93499069134, 2762: -12.6132600856, 2763: -1.96528358943, 2764: -6.61997627644, 2765: -60.4246684164, 2766: 57.2254842111, 2767: -74.8586736683, 2768: 53.9146757093, 2769: -52.4447001161, 2770: 53.0101785658, 2771: -64.2016288319, 2772: 6.45828404091, 2773: 16.8786025156, 2774: 100.0, 2775: 8.97377414227, 2776: -1.23145889925, 2777: -3.24891784531, 2778: 2.27281915096, 2779: -60.7830242695, 2780: -17.4593822954, 2781: -0.174654307961, 2782: -1.5266827163, 2783: 7.52719134737, 2784: -6.69190389204, 2785: 20.064047885, 2786: -1.48071005884, 2787: -39.8301431977, 2788: 58.9347054453, 2789: 100.0, 2790: 100.0, 2791: 34.4460499761, 2792: 89.7474770911, 2793: -1.18601609691, 2794: 23.87389611, 2795: 2.36885086986, 2796: 30.7178199763, 2797: 69.6278309258, 2798: -26.6565936536, 2799: 2.71770889821, 2800: -19.8610257011, 2801: 40.5376935208, 2802: 34.6339732322, 2803: 81.8232740221, 2804: 18.1292159831, 2805: 4.73547739663, 2806: 29.4502313925, 2807: -2.97760800634, 2808: 18.5970134667, 2809: 16.2119874464, 2810: -8.35222347427, 2811: 50.0119691694, 2812: -41.9367577555, 2813: -11.1552544668, 2814: 9.15858383651, 2815: -20.31574633, 2816: 20.5524480112, 2817: -28.2302848473, 2818: 25.1465551213, 2819: -12.7045410399, 2820: -29.4384200885, 2821: 41.2315654555, 2822: -19.5687854126, 2823: -4.12153853144, 2824: -44.246467846, 2825: -7.59072720618, 2826: -13.6160167237, 2827: 47.5631870752, 2828: -20.7031279783, 2829: -22.1866387324, 2830: 13.0440425119, 2831: -30.8611048461, 2832: -15.9517145445, 2833: -16.1971541548, 2834: -8.34695153661, 2835: -7.14849700112, 2836: -7.75781633544, 2837: 10.053202415, 2838: -13.0696046526, 2839: 38.832374884, 2840: -8.15975752994, 2841: 40.7631618957, 2842: -20.2491110749, 2843: 32.2438949747, 2844: 0.623205173545, 2845: 9.22965734563, 2846: -1.09216136349, 2847: 6.31392797565, 2848: -7.7852698348, 2849: -54.7829592404, 2850: -4.8232202077, 2851: -23.6637356138, 2852: 0.249924691795, 2853: 67.9577821058, 2854: -6.03639677713, 2855: 2.2551708034, 2856: -14.6260244856, 2857: 15.7433039199, 2858: -1.24659100846, 2859: 12.231145966, 2860: -7.93539603737, 2861: -23.9934577558, 2862: -8.12340257119, 2863: -1.46550660584, 2864: 67.6932931363, 2865: -8.097866939, 2866: 38.4908888172, 2867: -5.1907378645, 2868: -8.32994859007, 2869: 5.0861790502, 2870: -3.82235687798, 2871: -4.65685317389, 2872: -5.55762167774, 2873: -3.47518204545, 2874: 30.4012013316, 2875: -7.96842817119, 2876: -3.84058764421, 2877: 9.61298111276, 2878: -39.9066156507, 2879: -7.37891032054, 2880: 32.3303236893, 2881: -7.94467753537, 2882: -6.84529184484, 2883: -8.80612942008, 2884: -8.2197075955, 2885: 16.7454888013, 2886: -8.25523441873, 2887: -8.02996573551, 2888: 15.584857727, 2889: 35.2867282422, 2890: -8.27997411384, 2891: 2.79277872524, 2892: -5.64479450703, 2893: -40.3495079776, 2894: -8.08676186238, 2895: -4.03806300163, 2896: -7.74095839416, 2897: -0.0381360659673, 2898: 100.0, 2899: -8.27249811235, 2900: -6.61213451966, 2901: -8.01371504952, 2902: 34.1123121726, 2903: -7.57409664863, 2904: -8.56462549231, 2905: 19.0016074275, 2906: 20.8812520844, 2907: 38.6998869438, 2908: -2.675136854, 2909: 13.9524590219, 2910: 5.50344706094, 2911: 12.8685693454, 2912: 21.8079253853, 2913: -25.2934238489, 2914: -6.92055484288, 2915: -4.97930186165, 2916: -30.6719721905, 2917: 13.9817751, 2918: -1.37849902878, 2919: -1.76543872948, 2920: 6.19944256809, 2921: -86.2241014618, 2922: -1.43707271915, 2923: -6.07749189848, 2924: 0.213937044157, 2925: -2.30607646346, 2926: -5.85468403352, 2927: -9.56954172674, 2928: 19.0919469507, 2929: 3.42533698561, 2930: -11.5237802217, 2931: 0.688597105441, 2932: -27.2532367148, 2933: 40.4568487712, 2934: 18.5788209701, 2935: -13.7997979909, 2936: -1.13810991602, 2937: -34.9339282577, 2938: -1.48437712751, 2939: -1.39917189347, 2940: -5.57342909483, 2941: -1.5336376251, 2942: 1.72385654112, 2943: -2.96561158191, 2944: -2.22689181976, 2945: -1.40204279045, 2946: -1.89059220359, 2947: -1.53161542194, 2948: -7.67580910133, 2949: -13.7759284137, 2950: -2.73411631985, 2951: -2.1889488576, 2952: -2.14589801202, 2953: -5.19948327897, 2954: -12.8532167245, 2955: 4.13504722894, 2956: 24.1823244399, 2957: -13.6128442696, 2958: -43.4489581086, 2959: -0.872941077824, 2960: 14.5825810876, 2961: 11.6556633368, 2962: 10.9882305841, 2963: 23.5593016196, 2964: -1.41539205669, 2965: -1.06196774584, 2966: -1.47211384447, 2967: -2.11437163077, 2968: 6.48278312426, 2969: -20.0350780529, 2970: -3.08929543801, 2971: -1.43015286115, 2972: -2.00626626175, 2973: -1.49145842807, 2974: -1.47615642339, 2975: 1.14671249733, 2976: 21.2391757488, 2977: 15.089402543, 2978: 3.08157882853, 2979: 12.674954221, 2980: 0.112901442657, 2981: 23.361781142, 2982: -0.713975331596, 2983: 9.63134268389, 2984: 0.209943690358, 2985: -1.51217107365, 2986: -15.1286867718, 2987: 2.21215836707, 2988: 0.402613831989, 2989: 3.0291617852, 2990: -13.8968935764, 2991: -1.51769858299, 2992: -8.184237768, 2993: -1.59783434605, 2994: 1.85747028749, 2995: -1.52612855517, 2996: -1.50441101115, 2997: 6.51096353459, 2998: -8.17164198088, 2999: -5.78552824784, 3000: -1.4651313542, 3001: -1.45209771648, 3002: -2.08525480877, 3003: -1.47872820168, 3004: -1.17751749499, 3005: 21.5266741024, 3006: -12.7722905531, 3007: -1.83081432388, 3008: 0.701074467781, 3009: -4.59174378521, 3010: -3.84896026882, 3011: -15.94522179, 3012: 45.6130984996, 3013: -11.5911904928, 3014: 4.16875648413, 3015: -1.72144019915, 3016: -9.13315759208, 3017: 1.97906770827, 3018: -2.08909120415, 3019: -55.5374878781, 3020: -22.4702761112, 3021: 5.83928779222, 3022: -4.24238321298, 3023: 21.5153257554, 3024: -3.4203985411, 3025: 22.4364075444, 3026: 21.9956971336, 3027: -8.91529006689, 3028: 10.7669148202, 3029: -9.3256030624, 3030: -28.4997640855, 3031: -8.29058692177, 3032: -6.07337358827, 3033: 36.3007314304, 3034: 14.7974061598, 3035: -35.2063134158, 3036: -20.069396148, 3037: 0.282436091242, 3038: -50.4660571599, 3039: 60.6475793864, 3040: -61.9511358114, 3041: 9.00363175423, 3042: -23.9400114011, 3043: 77.6411660284, 3044: 30.7601398385, 3045: -47.2729307817, 3046: 12.4168019901, 3047: -9.29941998439, 3048: -8.71625380994, 3049: 2.13317482933, 3050: -8.17721249796, 3051: 1.69752704995, 3052: -1.37773175817, 3053: 13.1213479067, 3054: -8.1230964895, 3055: -1.89202992151, 3056: -9.38368324563, 3057: -7.70652156655, 3058: 39.0578774186, 3059: -9.68776636354, 3060: 5.54349320484, 3061: 17.1405609463, 3062: -7.06775311309, 3063: -11.1547271985, 3064: 15.4939487798, 3065: 1.72277043808, 3066: 10.70830482, 3067: -67.3039471485, 3068: 13.2272434863, 3069: 22.4815945371, 3070: -30.7877549741, 3071: 13.8060292201, 3072: 32.338046045, 3073: -7.70834361069, 3074: 20.781771369, 3075: -38.1495575237, 3076: -5.57652175615, 3077: -22.9301013564, 3078: -9.07750053877, 3079: -8.08024025951, 3080: -2.51773712395, 3081: -7.98518166006, 3082: -22.3887060737, 3083: -13.1165251669, 3084: 41.6232710131, 3085: 1.09404959607, 3086: 10.5218114783, 3087: -46.112720055, 3088: -23.5496274766, 3089: 4.43363430574, 3090: -12.6821081941, 3091: 3.7060155744, 3092: -18.2998835131, 3093: -5.66473234364, 3094: -26.6471976432, 3095: 4.9757746743, 3096: 21.3298123917, 3097: 21.9850702357, 3098: -8.12372209081, 3099: 33.3417562839, 3100: -8.13718607068, 3101: -8.00719698546, 3102: -8.17581372116, 3103: 9.2203478047, 3104: -8.2298712809, 3105: -8.6359988925, 3106: 14.422706085, 3107: -8.26831179681, 3108: -15.0345289191, 3109: -8.05332345004, 3110: -8.23618383464, 3111: 15.7520639422, 3112: -2.38031650602, 3113: 3.81282703469, 3114: -44.563669206, 3115: 12.9208383186, 3116: -6.31606224647, 3117: -17.7022068442, 3118: 9.25079517823, 3119: -16.436154549, 3120: 30.9491848149, 3121: 75.797610918, 3122: 23.810746612, 3123: -1.53332633062, 3124: 15.4925319042, 3125: -9.41267054973, 3126: -4.85814744116, 3127: 19.3080257266, 3128: -28.5038266609, 3129: -17.3187012566, 3130: -13.8508774685, 3131: -8.0740795328, 3132: -0.59765037905, 3133: -1.15458228821, 3134: -7.97425658626, 3135: -14.8737506975, 3136: 10.7102807119, 3137: 21.1139937811, 3138: 8.44885033091, 3139: 25.4801344155, 3140: 4.11604774502, 3141: 33.4397869164, 3142: -0.189231076156, 3143: -1.11204980204, 3144: -0.191721138857, 3145: -0.147728241978, 3146: -12.7554408916, 3147: 6.91871564571, 3148: 0.905421938371, 3149: -11.8330644826, 3150: -6.8081712619, 3151: 1.44800962141, 3152: 17.1541150472, 3153: 3.51634942378, 3154: -7.16366722151, 3155: 2.17842372384, 3156: 2.2233468686, 3157: -2.49267095618, 3158: -6.09792722866, 3159: -0.603268342323, 3160: 2.74962002509, 3161: -4.87179582995, 3162: 9.5542231054, 3163: -9.58276591532, 3164: -4.11732650141, 3165: 1.1796973029, 3166: -2.65714313873, 3167: 6.19868039329, 3168: 7.02115253186, 3169: 4.54692168985, 3170: -3.80210569165, 3171: -5.09603145438, 3172: 0.00363699253217, 3173: 16.241486267, 3174: 0.311456263522, 3175: -1.69723670755, 3176: 3.62879250703, 3177: 0.273342883944, 3178: -0.417409912163, 3179: 12.8226368152, 3180: 1.93008286812, 3181: -7.2237442564, 3182: -8.77452863616, 3183: -7.49199289216, 3184: -17.8924063782, 3185: -4.7294971196, 3186: 8.2643142301, 3187: 0.652114795431, 3188: -1.7200685215, 3189: -1.42874902257, 3190: -0.780435512269, 3191: 3.86210666694, 3192: 4.09651090485, 3193: -6.30504166247, 3194: -2.25198839376, 3195: 0.265895164185, 3196: -7.84184146877, 3197: -1.13594806957, 3198: 1.63660707805, 3199: -0.427514299283, 3200: -3.95841595937, 3201: -12.7900898142, 3202: -4.22004782412, 3203: -4.95653096181, 3204: -0.0100125434859, 3205: -3.82879723681, 3206: -1.57297784309, 3207: 0.953658864199, 3208: 1.54851001274, 3209: -0.124148418987, 3210: 1.77672958055, 3211: 0.0264183082397, 3212: 0.379285808281, 3213: 13.2624403374, 3214: 0.66019662444, 3215: -10.6514982665, 3216: -3.84914014644, 3217: 0.460013879704, 3218: -4.95497016749, 3219: 5.3282585192, 3220: -22.2089870693, 3221: -8.24859801962, 3222: 3.01989204791, 3223: 11.5198759105, 3224: -1.05341650269, 3225: 0.52675886214, 3226: 2.9031257838, 3227: 4.62394976401, 3228: 11.1193707642, 3229: 2.52991949, 3230: -1.05212884355, 3231: -1.81890472323, 3232: 2.77874120173, 3233: -1.16747810275, 3234: -8.26825754377, 3235: -0.875919628094, 3236: -0.0572838034944, 3237: -0.806517214338, 3238: -2.55792710638, 3239: -0.312134463541, 3240: -5.71712155401, 3241: -0.504965783531, 3242: -1.44544746867, 3243: -1.04143959637, 3244: -12.8925097627, 3245: 1.11264280915, 3246: -1.34642224404, 3247: 8.25208040578, 3248: 0.476131530517, 3249: -1.54476683034, 3250: -0.963444392435, 3251: 15.0995503866, 3252: 2.7660401138, 3253: -7.41450288866, 3254: 2.88160055171, 3255: 6.23313947406, 3256: -9.47543788966, 3257: 0.313463840721, 3258: -4.56971713183, 3259: 0.0278641100793, 3260: -15.6871378452, 3261: -12.9248662944, 3262: 11.3667770121, 3263: 2.75751830221, 3264: 2.91931978755, 3265: -4.75665755406, 3266: 19.5612556309, 3267: -0.383978348879, 3268: -0.148457208628, 3269: -2.30997014, 3270: 14.8249767859, 3271: -0.236419698292, 3272: -0.899692126138, 3273: -1.58744385981, 3274: -4.52315624266, 3275: -1.48221402636, 3276: 3.34633777335, 3277: 2.97345897352, 3278: 2.73214780734, 3279: -9.26339485883, 3280: -1.05772163031, 3281: 0.763169324399, 3282: 2.27398688821, 3283: -0.334605138695, 3284: -2.51506344171, 3285: 1.59013096768, 3286: -4.54612370774, 3287: -0.361875036813, 3288: -0.192898400882, 3289: -1.63017061133, 3290: -0.11009234848, 3291: -1.09006262338, 3292: -3.72313772742, 3293: -0.359918024893, 3294: -0.361602929393, 3295: -0.291756128298, 3296: -0.465598639611, 3297: -0.184885252411, 3298: -19.4483119046, 3299: -0.0080167162645, 3300: -0.226874206387, 3301: -1.15704929095, 3302: 3.62243173405, 3303: -9.31996648039, 3304: -8.20080096552, 3305: 1.0646906736, 3306: -16.1043733176, 3307: -16.3369095933, 3308: 4.41272337631, 3309: 1.317609611, 3310: -1.20731399408, 3311: 0.245376039205, 3312: -12.6104722801, 3313: -0.326126979066, 3314: 17.3056565519, 3315: -0.309704163481, 3316: -5.68316548691, 3317: -4.32723054723, 3318: -3.34746446134, 3319: 1.6259454652, 3320: -0.349666786003, 3321: -0.0405325957982, 3322: -0.353316875866, 3323: -0.222712690403, 3324: -0.151731905407, 3325: -7.8252551574, 3326: -3.2890888801, 3327: 1.62402296278, 3328: 9.61220366686, 3329: 1.27781905041, 3330: 5.19460868646, 3331: 2.36362812072, 3332: 3.56173189902, 3333: 9.46890579968, 3334: -0.228925529575, 3335: -0.226705644021, 3336: 2.65745853404, 3337: 0.0149297690876, 3338: 0.142681563184, 3339: 0.282382547929, 3340: -0.295342377304, 3341: -0.512508187876, 3342: -0.310767181771, 3343: 8.54425596516, 3344: -0.310916792897, 3345: -0.338817846633, 3346: -3.15943968438, 3347: -0.00160549125309, 3348: 8.22041266319, 3349: -0.155640392303, 3350: -0.319675883603, 3351: 0.884222962689, 3352: -0.149496308069, 3353: -0.650901270193, 3354: 2.66751652596, 3355: -8.05714973345, 3356: -0.3342112309, 3357: -0.413555249297, 3358: 13.0581008062, 3359: -0.401131918004, 3360: -3.08832334965, 3361: -10.706403529, 3362: -1.35237991148, 3363: 2.01020949127, 3364: -0.48970907066, 3365: -0.427996776179, 3366: 5.10301865613, 3367: -0.789766431905, 3368: 2.56412998955, 3369: -1.87831790485, 3370: 0.849957960896, 3371: 1.631688984, 3372: -0.217993155498, 3373: 0.528163889867, 3374: -4.75456583795, 3375: -7.11174017861, 3376: 3.63175685786, 3377: -0.0926242108797, 3378: 8.37786749639, 3379: -9.31770049033, 3380: 4.58360122601, 3381: -0.984453549675, 3382: -7.19026152978, 3383: 9.6645898656, 3384: -1.40471279977, 3385: 4.72168649573, 3386: 5.70953374152, 3387: -1.6359392987, 3388: 5.3068539393, 3389: 0.238441714614, 3390: -10.2843566998, 3391: 0.892581561898, 3392: 0.529457548096, 3393: 2.2678225126, 3394: -0.889055724119, 3395: 0.575171906514, 3396: 1.57601410906, 3397: -0.695985893188, 3398: 3.4114025163, 3399: -0.398346574682, 3400: -1.01880895256, 3401: -7.99399843435, 3402: 2.24303909723, 3403: 0.275295824475, 3404: -1.45766745982, 3405: 2.04001623347, 3406: -0.132175305596, 3407: 20.0287055274, 3408: -2.36503494165, 3409: 4.91168981796, 3410: 10.6941592838, 3411: 2.59848553758, 3412: -4.72609886667, 3413: 13.2928394125, 3414: 3.84973562019, 3415: 7.54804088172, 3416: 8.69782409681, 3417: -4.47236526972, 3418: 1.69602763724, 3419: -5.42788235535, 3420: 0.329243228223, 3421: 10.0264469845, 3422: -4.52982936386, 3423: -2.2835737801, 3424: 14.2942797619, 3425: 10.4425164971, 3426: 9.5255342643, 3427: -3.7643290307, 3428: 1.76578319149, 3429: -0.554982631828, 3430: -0.363475397558, 3431: 0.290101679662, 3432: 2.42967585507, 3433: 7.28127739428, 3434: -15.7289975867, 3435: -1.52778141858, 3436: 8.35142618328, 3437: -5.04149077432, 3438: -2.60492979944, 3439: 12.7347228983, 3440: 0.250412786406, 3441: -7.90606304393, 3442: 3.61142364243, 3443: -7.95636669517, 3444: 3.37101470752, 3445: 7.37451153299, 3446: -18.9362005944, 3447: -0.0332548938609, 3448: 5.54030479178, 3449: -0.741321180175, 3450: -0.677758675519, 3451: 0.170094593285, 3452: -9.0739225965, 3453: -0.484813895982, 3454: -1.18791913864, 3455: 18.4309007378, 3456: -0.028118478852, 3457: -6.61940612362, 3458: -0.822278108486, 3459: -1.30878724342, 3460: -2.19989095513, 3461: -0.6988335142, 3462: -1.1583674543, 3463: -1.33109319691, 3464: 8.68042430069, 3465: 5.14093068052, 3466: -11.9979013154, 3467: -0.967561976218, 3468: -4.39997762129, 3469: -11.4833204212, 3470: -9.46153266453, 3471: 9.54113433324, 3472: -6.98206583813, 3473: -6.38837193357, 3474: 0.54613324574, 3475: 0.166099410992, 3476: -2.16884426499, 3477: 12.0911360533, 3478: -7.57361916464, 3479: -12.9332662617, 3480: -0.883081756649, 3481: -6.31540520588, 3482: -1.52074836323, 3483: 12.3532934627, 3484: 5.32833673425, 3485: -16.3078720116, 3486: -1.98803928125, 3487: 10.5907449958, 3488: 3.89592458306, 3489: -4.30076030139, 3490: 23.7012826441, 3491: 0.526696877588, 3492: 1.27026220716, 3493: -1.02244917665, 3494: 1.32748051149, 3495: 1.34647134218, 3496: 1.48944591944, 3497: -0.602322981958, 3498: 0.0378468276193, 3499: 0.464210200179, 3500: -0.880906327613, 3501: -1.00625061641}, 'conec': {1: {1: 0, 2: 352}, 2: {1: 1, 2: 352}, 3: {1: 2, 2: 352}, 4: {1: 3, 2: 352}, 5: {1: 4, 2: 352}, 6: {1: 5, 2: 352}, 7: {1: 6, 2: 352}, 8: {1: 7, 2: 352}, 9: {1: 8, 2: 352}, 10: {1: 9, 2: 352}, 11: {1: 10, 2: 352}, 12: {1: 11, 2: 352}, 13: {1: 12, 2: 352}, 14: {1: 13, 2: 352}, 15: {1: 14, 2: 352}, 16: {1: 15, 2: 352}, 17: {1: 16, 2: 352}, 18: {1: 17, 2: 352}, 19: {1: 18, 2: 352}, 20: {1: 19, 2: 352}, 21: {1: 20, 2: 352}, 22: {1: 21, 2: 352}, 23: {1: 22, 2: 352}, 24: {1: 23, 2: 352}, 25: {1: 24, 2: 352}, 26: {1: 25, 2: 352}, 27: {1: 26, 2: 352}, 28: {1: 27, 2: 352}, 29: {1: 28, 2: 352}, 30: {1: 29, 2: 352}, 31: {1: 30, 2: 352}, 32: {1: 31, 2: 352}, 33: {1: 32, 2: 352}, 34: {1: 33, 2: 352}, 35: {1: 34, 2: 352}, 36: {1: 35, 2: 352}, 37: {1: 36, 2: 352}, 38: {1: 37, 2: 352}, 39: {1: 38, 2: 352}, 40: {1: 39, 2: 352}, 41: {1: 40, 2: 352}, 42: {1: 41, 2: 352}, 43: {1: 42, 2: 352}, 44: {1: 43, 2: 352}, 45: {1: 44, 2: 352}, 46: {1: 45, 2: 352}, 47: {1: 46, 2: 352}, 48: {1: 47, 2: 352}, 49: {1: 48, 2: 352}, 50: {1: 49, 2: 352}, 51: {1: 50, 2: 352}, 52: {1: 51, 2: 352}, 53: {1: 52, 2: 352}, 54: {1: 53, 2: 352}, 55: {1: 54, 2: 352}, 56: {1: 55, 2: 352}, 57: {1: 56, 2: 352}, 58: {1: 57, 2: 352}, 59: {1: 58, 2: 352}, 60: {1: 59, 2: 352}, 61: {1: 60, 2: 352}, 62: {1: 61, 2: 352}, 63: {1: 62, 2: 352}, 64: {1: 63, 2: 352}, 65: {1: 64, 2: 352}, 66: {1: 65, 2: 352}, 67: {1: 66, 2: 352}, 68: {1: 67, 2: 352}, 69: {1: 68, 2: 352}, 70: {1: 69, 2: 352}, 71: {1: 70, 2: 352}, 72: {1: 71, 2: 352}, 73: {1: 72, 2: 352}, 74: {1: 73, 2: 352}, 75: {1: 74, 2: 352}, 76: {1: 75, 2: 352}, 77: {1: 76, 2: 352}, 78: {1: 77, 2: 352}, 79: {1: 78, 2: 352}, 80: {1: 79, 2: 352}, 81: {1: 80, 2: 352}, 82: {1: 81, 2: 352}, 83: {1: 82, 2: 352}, 84: {1: 83, 2: 352}, 85: {1: 84, 2: 352}, 86: {1: 85, 2: 352}, 87: {1: 86, 2: 352}, 88: {1: 87, 2: 352}, 89: {1: 88, 2: 352}, 90: {1: 89, 2: 352}, 91: {1: 90, 2: 352}, 92: {1: 91, 2: 352}, 93: {1: 92, 2: 352}, 94: {1: 93, 2: 352}, 95: {1: 94, 2: 352}, 96: {1: 95, 2: 352}, 97: {1: 96, 2: 352}, 98: {1: 97, 2: 352}, 99: {1: 98, 2: 352}, 100: {1: 99, 2: 352}, 101: {1: 100, 2: 352}, 102: {1: 101, 2: 352}, 103: {1: 102, 2: 352}, 104: {1: 103, 2: 352}, 105: {1: 104, 2: 352}, 106: {1: 105, 2: 352}, 107: {1: 106, 2: 352}, 108: {1: 107, 2: 352}, 109: {1: 108, 2: 352}, 110: {1: 109, 2: 352}, 111: {1: 110, 2: 352}, 112: {1: 111, 2: 352}, 113: {1: 112, 2: 352}, 114: {1: 113, 2: 352}, 115: {1: 114, 2: 352}, 116: {1: 115, 2: 352}, 117: {1: 116, 2: 352}, 118: {1: 117, 2: 352}, 119: {1: 118, 2: 352}, 120: {1: 119, 2: 352}, 121: {1: 120, 2: 352}, 122: {1: 121, 2: 352}, 123: {1: 122, 2: 352}, 124: {1: 123, 2: 352}, 125: {1: 124, 2: 352}, 126: {1: 125, 2: 352}, 127: {1: 126, 2: 352}, 128: {1: 127, 2: 352}, 129: {1: 128, 2: 352}, 130: {1: 129, 2: 352}, 131: {1: 130, 2: 352}, 132: {1: 131, 2: 352}, 133: {1: 132, 2: 352}, 134: {1: 133, 2: 352}, 135: {1: 134, 2: 352}, 136: {1: 135, 2: 352}, 137: {1: 136, 2: 352}, 138: {1: 137, 2: 352}, 139: {1: 138, 2: 352}, 140: {1: 139, 2: 352}, 141: {1: 140, 2: 352}, 142: {1: 141, 2: 352}, 143: {1: 142, 2: 352}, 144: {1: 143, 2: 352}, 145: {1: 144, 2: 352}, 146: {1: 145, 2: 352}, 147: {1: 146, 2: 352}, 148: {1: 147, 2: 352}, 149: {1: 148, 2: 352}, 150: {1: 149, 2: 352}, 151: {1: 150, 2: 352}, 152: {1: 151, 2: 352}, 153: {1: 152, 2: 352}, 154: {1: 153, 2: 352}, 155: {1: 154, 2: 352}, 156: {1: 155, 2: 352}, 157: {1: 156, 2: 352}, 158: {1: 157, 2: 352}, 159: {1: 158, 2: 352}, 160: {1: 159, 2: 352}, 161: {1: 160, 2: 352}, 162: {1: 161, 2: 352}, 163: {1: 162, 2: 352}, 164: {1: 163, 2: 352}, 165: {1: 164, 2: 352}, 166: {1: 165, 2: 352}, 167: {1: 166, 2: 352}, 168: {1: 167, 2: 352}, 169: {1: 168, 2: 352}, 170: {1: 169, 2: 352}, 171: {1: 170, 2: 352}, 172: {1: 171, 2: 352}, 173: {1: 172, 2: 352}, 174: {1: 173, 2: 352}, 175: {1: 174, 2: 352}, 176: {1: 175, 2: 352}, 177: {1: 176, 2: 352}, 178: {1: 177, 2: 352}, 179: {1: 178, 2: 352}, 180: {1: 179, 2: 352}, 181: {1: 180, 2: 352}, 182: {1: 181, 2: 352}, 183: {1: 182, 2: 352}, 184: {1: 183, 2: 352}, 185: {1: 184, 2: 352}, 186: {1: 185, 2: 352}, 187: {1: 186, 2: 352}, 188: {1: 187, 2: 352}, 189: {1: 188, 2: 352}, 190: {1: 189, 2: 352}, 191: {1: 190, 2: 352}, 192: {1: 191, 2: 352}, 193: {1: 192, 2: 352}, 194: {1: 193, 2: 352}, 195: {1: 194, 2: 352}, 196: {1: 195, 2: 352}, 197: {1: 196, 2: 352}, 198: {1: 197, 2: 352}, 199: {1: 198, 2: 352}, 200: {1: 199, 2: 352}, 201: {1: 200, 2: 352}, 202: {1: 201, 2: 352}, 203: {1: 202, 2: 352}, 204: {1: 203, 2: 352}, 205: {1: 204, 2: 352}, 206: {1: 205, 2: 352}, 207: {1: 206, 2: 352}, 208: {1: 207, 2: 352}, 209: {1: 208, 2: 352}, 210: {1: 209, 2: 352}, 211: {1: 210, 2: 352}, 212: {1: 211, 2: 352}, 213: {1: 212, 2: 352}, 214: {1: 213, 2: 352}, 215: {1: 214, 2: 352}, 216: {1: 215, 2: 352}, 217: {1: 216, 2: 352}, 218: {1: 217, 2: 352}, 219: {1: 218, 2: 352}, 220: {1: 219, 2: 352}, 221: {1: 220, 2: 352}, 222: {1: 221, 2: 352}, 223: {1: 222, 2: 352}, 224: {1: 223, 2: 352}, 225: {1: 224, 2: 352}, 226: {1: 225, 2: 352}, 227: {1: 226, 2: 352}, 228: {1: 227, 2: 352}, 229: {1: 228, 2: 352}, 230: {1: 229, 2: 352}, 231: {1: 230, 2: 352}, 232: {1: 231, 2: 352}, 233: {1: 232, 2: 352}, 234: {1: 233, 2: 352}, 235: {1: 234, 2: 352}, 236: {1: 235, 2: 352}, 237: {1: 236, 2: 352}, 238: {1: 237, 2: 352}, 239: {1: 238, 2: 352}, 240: {1: 239, 2: 352}, 241: {1: 240, 2: 352}, 242: {1: 241, 2: 352}, 243: {1: 242, 2: 352}, 244: {1: 243, 2: 352}, 245: {1: 244, 2: 352}, 246: {1: 245, 2: 352}, 247: {1: 246, 2: 352}, 248: {1: 247, 2: 352}, 249: {1: 248, 2: 352}, 250: {1: 249, 2: 352}, 251: {1: 250, 2: 352}, 252: {1: 251, 2: 352}, 253: {1: 252, 2: 352}, 254: {1: 253, 2: 352}, 255: {1: 254, 2: 352}, 256: {1: 255, 2: 352}, 257: {1: 256, 2: 352}, 258: {1: 257, 2: 352}, 259: {1: 258, 2: 352}, 260: {1: 259, 2: 352}, 261: {1: 260, 2: 352}, 262: {1: 261, 2: 352}, 263: {1: 262, 2: 352}, 264: {1: 263, 2: 352}, 265: {1: 264, 2: 352}, 266: {1: 265, 2: 352}, 267: {1: 266, 2: 352}, 268: {1: 267, 2: 352}, 269: {1: 268, 2: 352}, 270: {1: 269, 2: 352}, 271: {1: 270, 2: 352}, 272: {1: 271, 2: 352}, 273: {1: 272, 2: 352}, 274: {1: 273, 2: 352}, 275: {1: 274, 2: 352}, 276: {1: 275, 2: 352}, 277: {1: 276, 2: 352}, 278: {1: 277, 2: 352}, 279: {1: 278, 2: 352}, 280: {1: 279, 2: 352}, 281: {1: 280, 2: 352}, 282: {1: 281, 2: 352}, 283: {1: 282, 2: 352}, 284: {1: 283, 2: 352}, 285: {1: 284, 2: 352}, 286: {1: 285, 2: 352}, 287: {1: 286, 2: 352}, 288: {1: 287, 2: 352}, 289: {1: 288, 2: 352}, 290: {1: 289, 2: 352}, 291: {1: 290, 2: 352}, 292: {1: 291, 2: 352}, 293: {1: 292, 2: 352}, 294: {1: 293, 2: 352}, 295: {1: 294, 2: 352}, 296: {1: 295, 2: 352}, 297: {1: 296, 2: 352}, 298: {1: 297, 2: 352}, 299: {1: 298, 2: 352}, 300: {1: 299, 2: 352}, 301: {1: 300, 2: 352}, 302: {1: 301, 2: 352}, 303: {1: 302, 2: 352}, 304: {1: 303, 2: 352}, 305: {1: 304, 2: 352}, 306: {1: 305, 2: 352}, 307: {1: 306, 2: 352}, 308: {1: 307, 2: 352}, 309: {1: 308, 2: 352}, 310: {1: 309, 2: 352}, 311: {1: 310, 2: 352}, 312: {1: 311, 2: 352}, 313: {1: 312, 2: 352}, 314: {1: 313, 2: 352}, 315: {1: 314, 2: 352}, 316: {1: 315, 2: 352}, 317: {1: 316, 2: 352}, 318: {1: 317, 2: 352}, 319: {1: 318, 2: 352}, 320: {1: 319, 2: 352}, 321: {1: 320, 2: 352}, 322: {1: 321, 2: 352}, 323: {1: 322, 2: 352}, 324: {1: 323, 2: 352}, 325: {1: 324, 2: 352}, 326: {1: 325, 2: 352}, 327: {1: 326, 2: 352}, 328: {1: 327, 2: 352}, 329: {1: 328, 2: 352}, 330: {1: 329, 2: 352}, 331: {1: 330, 2: 352}, 332: {1: 331, 2: 352}, 333: {1: 332, 2: 352}, 334: {1: 333, 2: 352}, 335: {1: 334, 2: 352}, 336: {1: 335, 2: 352}, 337: {1: 336, 2: 352}, 338: {1: 337, 2: 352}, 339: {1: 338, 2: 352}, 340: {1: 339, 2: 352}, 341: {1: 340, 2: 352}, 342: {1: 341, 2: 352}, 343: {1: 342, 2: 352}, 344: {1: 343, 2: 352}, 345: {1: 344, 2: 352}, 346: {1: 345, 2: 352}, 347: {1: 346, 2: 352}, 348: {1: 347, 2: 352}, 349: {1: 348, 2: 352}, 350: {1: 0, 2: 353}, 351: {1: 1, 2: 353}, 352: {1: 2, 2: 353}, 353: {1: 3, 2: 353}, 354: {1: 4, 2: 353}, 355: {1: 5, 2: 353}, 356: {1: 6, 2: 353}, 357: {1: 7, 2: 353}, 358: {1: 8, 2: 353}, 359: {1: 9, 2: 353}, 360: {1: 10, 2: 353}, 361: {1: 11, 2: 353}, 362: {1: 12, 2: 353}, 363: {1: 13, 2: 353}, 364: {1: 14, 2: 353}, 365: {1: 15, 2: 353}, 366: {1: 16, 2: 353}, 367: {1: 17, 2: 353}, 368: {1: 18, 2: 353}, 369: {1: 19, 2: 353}, 370: {1: 20, 2: 353}, 371: {1: 21, 2: 353}, 372: {1: 22, 2: 353}, 373: {1: 23, 2: 353}, 374: {1: 24, 2: 353}, 375: {1: 25, 2: 353}, 376: {1: 26, 2: 353}, 377: {1: 27, 2: 353}, 378: {1: 28, 2: 353}, 379: {1: 29, 2: 353}, 380: {1: 30, 2: 353}, 381: {1: 31, 2: 353}, 382: {1: 32, 2: 353}, 383: {1: 33, 2: 353}, 384: {1: 34, 2: 353}, 385: {1: 35, 2: 353}, 386: {1: 36, 2: 353}, 387: {1: 37, 2: 353}, 388: {1: 38, 2: 353}, 389: {1: 39, 2: 353}, 390: {1: 40, 2: 353}, 391: {1: 41, 2: 353}, 392: {1: 42, 2: 353}, 393: {1: 43, 2: 353}, 394: {1: 44, 2: 353}, 395: {1: 45, 2: 353}, 396: {1: 46, 2: 353}, 397: {1: 47, 2: 353}, 398: {1: 48, 2: 353}, 399: {1: 49, 2: 353}, 400: {1: 50, 2: 353}, 401: {1: 51, 2: 353}, 402: {1: 52, 2: 353}, 403: {1: 53, 2: 353}, 404: {1: 54, 2: 353}, 405: {1: 55, 2: 353}, 406: {1: 56, 2: 353}, 407: {1: 57, 2: 353}, 408: {1: 58, 2: 353}, 409: {1: 59, 2: 353}, 410: {1: 60, 2: 353}, 411: {1: 61, 2: 353}, 412: {1: 62, 2: 353}, 413: {1: 63, 2: 353}, 414: {1: 64, 2: 353}, 415: {1: 65, 2: 353}, 416: {1: 66, 2: 353}, 417: {1: 67, 2: 353}, 418: {1: 68, 2: 353}, 419: {1: 69, 2: 353}, 420: {1: 70, 2: 353}, 421: {1: 71, 2: 353}, 422: {1: 72, 2: 353}, 423: {1: 73, 2: 353}, 424: {1: 74, 2: 353}, 425: {1: 75, 2: 353}, 426: {1: 76, 2: 353}, 427: {1: 77, 2: 353}, 428: {1: 78, 2: 353}, 429: {1: 79, 2: 353}, 430: {1: 80, 2: 353}, 431: {1: 81, 2: 353}, 432: {1: 82, 2: 353}, 433: {1: 83, 2: 353}, 434: {1: 84, 2: 353}, 435: {1: 85, 2: 353}, 436: {1: 86, 2: 353}, 437: {1: 87, 2: 353}, 438: {1: 88, 2: 353}, 439: {1: 89, 2: 353}, 440: {1: 90, 2: 353}, 441: {1: 91, 2: 353}, 442: {1: 92, 2: 353}, 443: {1: 93, 2: 353}, 444: {1: 94, 2: 353}, 445: {1: 95, 2: 353}, 446: {1: 96, 2: 353}, 447: {1: 97, 2: 353}, 448: {1: 98, 2: 353}, 449: {1: 99, 2: 353}, 450: {1: 100, 2: 353}, 451: {1: 101, 2: 353}, 452: {1: 102, 2: 353}, 453: {1: 103, 2: 353}, 454: {1: 104, 2: 353}, 455: {1: 105, 2: 353}, 456: {1: 106, 2: 353}, 457: {1: 107, 2: 353}, 458: {1: 108, 2: 353}, 459: {1: 109, 2: 353}, 460: {1: 110, 2: 353}, 461: {1: 111, 2: 353}, 462: {1: 112, 2: 353}, 463: {1: 113, 2: 353}, 464: {1: 114, 2: 353}, 465: {1: 115, 2: 353}, 466: {1: 116, 2: 353}, 467: {1: 117, 2: 353}, 468: {1: 118, 2: 353}, 469: {1: 119, 2: 353}, 470: {1: 120, 2: 353}, 471: {1: 121, 2: 353}, 472: {1: 122, 2: 353}, 473: {1: 123, 2: 353}, 474: {1: 124, 2: 353}, 475: {1: 125, 2: 353}, 476: {1: 126, 2: 353}, 477: {1: 127, 2: 353}, 478: {1: 128, 2: 353}, 479: {1: 129, 2: 353}, 480: {1: 130, 2: 353}, 481: {1: 131, 2: 353}, 482: {1: 132, 2: 353}, 483: {1: 133, 2: 353}, 484: {1: 134, 2: 353}, 485: {1: 135, 2: 353}, 486: {1: 136, 2: 353}, 487: {1: 137, 2: 353}, 488: {1: 138, 2: 353}, 489: {1: 139, 2: 353}, 490: {1: 140, 2: 353}, 491: {1: 141, 2: 353}, 492: {1: 142, 2: 353}, 493: {1: 143, 2: 353}, 494: {1: 144, 2: 353}, 495: {1: 145, 2: 353}, 496: {1: 146, 2: 353}, 497: {1: 147, 2: 353}, 498: {1: 148, 2: 353}, 499: {1: 149, 2: 353}, 500: {1: 150, 2: 353}, 501: {1: 151, 2: 353}, 502: {1: 152, 2: 353}, 503: {1: 153, 2: 353}, 504: {1: 154, 2: 353}, 505: {1: 155, 2: 353}, 506: {1: 156, 2: 353}, 507: {1: 157, 2: 353}, 508: {1: 158, 2: 353}, 509: {1: 159, 2: 353}, 510: {1: 160, 2: 353}, 511: {1: 161, 2: 353}, 512: {1: 162, 2: 353}, 513: {1: 163, 2: 353}, 514: {1: 164, 2: 353}, 515: {1: 165, 2: 353}, 516: {1: 166, 2: 353}, 517: {1: 167, 2: 353}, 518: {1: 168, 2: 353}, 519: {1: 169, 2: 353}, 520: {1: 170, 2: 353}, 521: {1: 171, 2: 353}, 522: {1: 172, 2: 353}, 523: {1: 173, 2: 353}, 524: {1: 174, 2: 353}, 525: {1: 175, 2: 353}, 526: {1: 176, 2: 353}, 527: {1: 177, 2: 353}, 528: {1: 178, 2: 353}, 529: {1: 179, 2: 353}, 530: {1: 180, 2: 353}, 531: {1: 181, 2: 353}, 532: {1: 182, 2: 353}, 533: {1: 183, 2: 353}, 534: {1: 184, 2: 353}, 535: {1: 185, 2: 353}, 536: {1: 186, 2: 353}, 537: {1: 187, 2: 353}, 538: {1: 188, 2: 353}, 539: {1: 189, 2: 353}, 540: {1: 190, 2: 353}, 541: {1: 191, 2: 353}, 542: {1: 192, 2: 353}, 543: {1: 193, 2: 353}, 544: {1: 194, 2: 353}, 545: {1: 195, 2: 353}, 546: {1: 196, 2: 353}, 547: {1: 197, 2: 353}, 548: {1: 198, 2: 353}, 549: {1: 199, 2: 353}, 550: {1: 200, 2: 353}, 551: {1: 201, 2: 353}, 552: {1: 202, 2: 353}, 553: {1: 203, 2: 353}, 554: {1: 204, 2: 353}, 555: {1: 205, 2: 353}, 556: {1: 206, 2: 353}, 557: {1: 207, 2: 353}, 558: {1: 208, 2: 353}, 559: {1: 209, 2: 353}, 560: {1: 210, 2: 353}, 561: {1: 211, 2: 353}, 562: {1: 212, 2: 353}, 563: {1: 213, 2: 353}, 564: {1: 214, 2: 353}, 565: {1: 215, 2: 353}, 566: {1: 216, 2: 353}, 567: {1: 217, 2: 353}, 568: {1: 218, 2: 353}, 569: {1: 219, 2: 353}, 570: {1: 220, 2: 353}, 571: {1: 221, 2: 353}, 572: {1: 222, 2: 353}, 573: {1: 223, 2: 353}, 574: {1: 224, 2: 353}, 575: {1: 225, 2: 353}, 576: {1: 226, 2: 353}, 577: {1: 227, 2: 353}, 578: {1: 228, 2: 353}, 579: {1: 229, 2: 353}, 580: {1: 230, 2: 353}, 581: {1: 231, 2: 353}, 582: {1: 232, 2: 353}, 583: {1: 233, 2: 353}, 584: {1: 234, 2: 353}, 585: {1: 235, 2: 353}, 586: {1: 236, 2: 353}, 587: {1: 237, 2: 353}, 588: {1: 238, 2: 353}, 589: {1: 239, 2: 353}, 590: {1: 240, 2: 353}, 591: {1: 241, 2: 353}, 592: {1: 242, 2: 353}, 593: {1: 243, 2: 353}, 594: {1: 244, 2: 353}, 595: {1: 245, 2: 353}, 596: {1: 246, 2: 353}, 597: {1: 247, 2: 353}, 598: {1: 248, 2: 353}, 599: {1: 249, 2: 353}, 600: {1: 250, 2: 353}, 601: {1: 251, 2: 353}, 602: {1: 252, 2: 353}, 603: {1: 253, 2: 353}, 604: {1: 254, 2: 353}, 605: {1: 255, 2: 353}, 606: {1: 256, 2: 353}, 607: {1: 257, 2: 353}, 608: {1: 258, 2: 353}, 609: {1: 259, 2: 353}, 610: {1: 260, 2: 353}, 611: {1: 261, 2: 353}, 612: {1: 262, 2: 353}, 613: {1: 263, 2: 353}, 614: {1: 264, 2: 353}, 615: {1: 265, 2: 353}, 616: {1: 266, 2: 353}, 617: {1: 267, 2: 353}, 618: {1: 268, 2: 353}, 619: {1: 269, 2: 353}, 620: {1: 270, 2: 353}, 621: {1: 271, 2: 353}, 622: {1: 272, 2: 353}, 623: {1: 273, 2: 353}, 624: {1: 274, 2: 353}, 625: {1: 275, 2: 353}, 626: {1: 276, 2: 353}, 627: {1: 277, 2: 353}, 628: {1: 278, 2: 353}, 629: {1: 279, 2: 353}, 630: {1: 280, 2: 353}, 631: {1: 281, 2: 353}, 632: {1: 282, 2: 353}, 633: {1: 283, 2: 353}, 634: {1: 284, 2: 353}, 635: {1: 285, 2: 353}, 636: {1: 286, 2: 353}, 637: {1: 287, 2: 353}, 638: {1: 288, 2: 353}, 639: {1: 289, 2: 353}, 640: {1: 290, 2: 353}, 641: {1: 291, 2: 353}, 642: {1: 292, 2: 353}, 643: {1: 293, 2: 353}, 644: {1: 294, 2: 353}, 645: {1: 295, 2: 353}, 646: {1: 296, 2: 353}, 647: {1: 297, 2: 353}, 648: {1: 298, 2: 353}, 649: {1: 299, 2: 353}, 650: {1: 300, 2: 353}, 651: {1: 301, 2: 353}, 652: {1: 302, 2: 353}, 653: {1: 303, 2: 353}, 654: {1: 304, 2: 353}, 655: {1: 305, 2: 353}, 656: {1: 306, 2: 353}, 657: {1: 307, 2: 353}, 658: {1: 308, 2: 353}, 659: {1: 309, 2: 353}, 660: {1: 310, 2: 353}, 661: {1: 311, 2: 353}, 662: {1: 312, 2: 353}, 663: {1: 313, 2: 353}, 664: {1: 314, 2: 353}, 665: {1: 315, 2: 353}, 666: {1: 316, 2: 353}, 667: {1: 317, 2: 353}, 668: {1: 318, 2: 353}, 669: {1: 319, 2: 353}, 670: {1: 320, 2: 353}, 671: {1: 321, 2: 353}, 672: {1: 322, 2: 353}, 673: {1: 323, 2: 353}, 674: {1: 324, 2: 353}, 675: {1: 325, 2: 353}, 676: {1: 326, 2: 353}, 677: {1: 327, 2: 353}, 678: {1: 328, 2: 353}, 679: {1: 329, 2: 353}, 680: {1: 330, 2: 353}, 681: {1: 331, 2: 353}, 682: {1: 332, 2: 353}, 683: {1: 333, 2: 353}, 684: {1: 334, 2: 353}, 685: {1: 335, 2: 353}, 686: {1: 336, 2: 353}, 687: {1: 337, 2: 353}, 688: {1: 338, 2: 353}, 689: {1: 339, 2: 353}, 690: {1: 340, 2: 353}, 691: {1: 341, 2: 353}, 692: {1: 342, 2: 353}, 693: {1: 343, 2: 353}, 694: {1: 344, 2: 353}, 695: {1: 345, 2: 353}, 696: {1: 346, 2: 353}, 697: {1: 347, 2: 353}, 698: {1: 348, 2: 353}, 699: {1: 0, 2: 354}, 700: {1: 1, 2: 354}, 701: {1: 2, 2: 354}, 702: {1: 3, 2: 354}, 703: {1: 4, 2: 354}, 704: {1: 5, 2: 354}, 705: {1: 6, 2: 354}, 706: {1: 7, 2: 354}, 707: {1: 8, 2: 354}, 708: {1: 9, 2: 354}, 709: {1: 10, 2: 354}, 710: {1: 11, 2: 354}, 711: {1: 12, 2: 354}, 712: {1: 13, 2: 354}, 713: {1: 14, 2: 354}, 714: {1: 15, 2: 354}, 715: {1: 16, 2: 354}, 716: {1: 17, 2: 354}, 717: {1: 18, 2: 354}, 718: {1: 19, 2: 354}, 719: {1: 20, 2: 354}, 720: {1: 21, 2: 354}, 721: {1: 22, 2: 354}, 722: {1: 23, 2: 354}, 723: {1: 24, 2: 354}, 724: {1: 25, 2: 354}, 725: {1: 26, 2: 354}, 726: {1: 27, 2: 354}, 727: {1: 28, 2: 354}, 728: {1: 29, 2: 354}, 729: {1: 30, 2: 354}, 730: {1: 31, 2: 354}, 731: {1: 32, 2: 354}, 732: {1: 33, 2: 354}, 733: {1: 34, 2: 354}, 734: {1: 35, 2: 354}, 735: {1: 36, 2: 354}, 736: {1: 37, 2: 354}, 737: {1: 38, 2: 354}, 738: {1: 39, 2: 354}, 739: {1: 40, 2: 354}, 740: {1: 41, 2: 354}, 741: {1: 42, 2: 354}, 742: {1: 43, 2: 354}, 743: {1: 44, 2: 354}, 744: {1: 45, 2: 354}, 745: {1: 46, 2: 354}, 746: {1: 47, 2: 354}, 747: {1: 48, 2: 354}, 748: {1: 49, 2: 354}, 749: {1: 50, 2: 354}, 750: {1: 51, 2: 354}, 751: {1: 52, 2: 354}, 752: {1: 53, 2: 354}, 753: {1: 54, 2: 354}, 754: {1: 55, 2: 354}, 755: {1: 56, 2: 354}, 756: {1: 57, 2: 354}, 757: {1: 58, 2: 354}, 758: {1: 59, 2: 354}, 759: {1: 60, 2: 354}, 760: {1: 61, 2: 354}, 761: {1: 62, 2: 354}, 762: {1: 63, 2: 354}, 763: {1: 64, 2: 354}, 764: {1: 65, 2: 354}, 765: {1: 66, 2: 354}, 766: {1: 67, 2: 354}, 767: {1: 68, 2: 354}, 768: {1: 69, 2: 354}, 769: {1: 70, 2: 354}, 770: {1: 71, 2: 354}, 771: {1: 72, 2: 354}, 772: {1: 73, 2: 354}, 773: {1: 74, 2: 354}, 774: {1: 75, 2: 354}, 775: {1: 76, 2: 354}, 776: {1: 77, 2: 354}, 777: {1: 78, 2: 354}, 778: {1: 79, 2: 354}, 779: {1: 80, 2: 354}, 780: {1: 81, 2: 354}, 781: {1: 82, 2: 354}, 782: {1: 83, 2: 354}, 783: {1: 84, 2: 354}, 784: {1: 85, 2: 354}, 785: {1: 86, 2: 354}, 786: {1: 87, 2: 354}, 787: {1: 88, 2: 354}, 788: {1: 89, 2: 354}, 789: {1: 90, 2: 354}, 790: {1: 91, 2: 354}, 791: {1: 92, 2: 354}, 792: {1: 93, 2: 354}, 793: {1: 94, 2: 354}, 794: {1: 95, 2: 354}, 795: {1: 96, 2: 354}, 796: {1: 97, 2: 354}, 797: {1: 98, 2: 354}, 798: {1: 99, 2: 354}, 799: {1: 100, 2: 354}, 800: {1: 101, 2: 354}, 801: {1: 102, 2: 354}, 802: {1: 103, 2: 354}, 803: {1: 104, 2: 354}, 804: {1: 105, 2: 354}, 805: {1: 106, 2: 354}, 806: {1: 107, 2: 354}, 807: {1: 108, 2: 354}, 808: {1: 109, 2: 354}, 809: {1: 110, 2: 354}, 810: {1: 111, 2: 354}, 811: {1: 112, 2: 354}, 812: {1: 113, 2: 354}, 813: {1: 114, 2: 354}, 814: {1: 115, 2: 354}, 815: {1: 116, 2: 354}, 816: {1: 117, 2: 354}, 817: {1: 118, 2: 354}, 818: {1: 119, 2: 354}, 819: {1: 120, 2: 354}, 820: {1: 121, 2: 354}, 821: {1: 122, 2: 354}, 822: {1: 123, 2: 354}, 823: {1: 124, 2: 354}, 824: {1: 125, 2: 354}, 825: {1: 126, 2: 354}, 826: {1: 127, 2: 354}, 827: {1: 128, 2: 354}, 828: {1: 129, 2: 354}, 829: {1: 130, 2: 354}, 830: {1: 131, 2: 354}, 831: {1: 132, 2: 354}, 832: {1: 133, 2: 354}, 833: {1: 134, 2: 354}, 834: {1: 135, 2: 354}, 835: {1: 136, 2: 354}, 836: {1: 137, 2: 354}, 837: {1: 138, 2: 354}, 838: {1: 139, 2: 354}, 839: {1: 140, 2: 354}, 840: {1: 141, 2: 354}, 841: {1: 142, 2: 354}, 842: {1: 143, 2: 354}, 843: {1: 144, 2: 354}, 844: {1: 145, 2: 354}, 845: {1: 146, 2: 354}, 846: {1: 147, 2: 354}, 847: {1: 148, 2: 354}, 848: {1: 149, 2: 354}, 849: {1: 150, 2: 354}, 850: {1: 151, 2: 354}, 851: {1: 152, 2: 354}, 852: {1: 153, 2: 354}, 853: {1: 154, 2: 354}, 854: {1: 155, 2: 354}, 855: {1: 156, 2: 354}, 856: {1: 157, 2: 354}, 857: {1: 158, 2: 354}, 858: {1: 159, 2: 354}, 859: {1: 160, 2: 354}, 860: {1: 161, 2: 354}, 861: {1: 162, 2: 354}, 862: {1: 163, 2: 354}, 863: {1: 164, 2: 354}, 864: {1: 165, 2: 354}, 865: {1: 166, 2: 354}, 866: {1: 167, 2: 354}, 867: {1: 168, 2: 354}, 868: {1: 169, 2: 354}, 869: {1: 170, 2: 354}, 870: {1: 171, 2: 354}, 871: {1: 172, 2: 354}, 872: {1: 173, 2: 354}, 873: {1: 174, 2: 354}, 874: {1: 175, 2: 354}, 875: {1: 176, 2: 354}, 876: {1: 177, 2: 354}, 877: {1: 178, 2: 354}, 878: {1: 179, 2: 354}, 879: {1: 180, 2: 354}, 880: {1: 181, 2: 354}, 881: {1: 182, 2: 354}, 882: {1: 183, 2: 354}, 883: {1: 184, 2: 354}, 884: {1: 185, 2: 354}, 885: {1: 186, 2: 354}, 886: {1: 187, 2: 354}, 887: {1: 188, 2: 354}, 888: {1: 189, 2: 354}, 889: {1: 190, 2: 354}, 890: {1: 191, 2: 354}, 891: {1: 192, 2: 354}, 892: {1: 193, 2: 354}, 893: {1: 194, 2: 354}, 894: {1: 195, 2: 354}, 895: {1: 196, 2: 354}, 896: {1: 197, 2: 354}, 897: {1: 198, 2: 354}, 898: {1: 199, 2: 354}, 899: {1: 200, 2: 354}, 900: {1: 201, 2: 354}, 901: {1: 202, 2: 354}, 902: {1: 203, 2: 354}, 903: {1: 204, 2: 354}, 904: {1: 205, 2: 354}, 905: {1: 206, 2: 354}, 906: {1: 207, 2: 354}, 907: {1: 208, 2: 354}, 908: {1: 209, 2: 354}, 909: {1: 210, 2: 354}, 910: {1: 211, 2: 354}, 911: {1: 212, 2: 354}, 912: {1: 213, 2: 354}, 913: {1: 214, 2: 354}, 914: {1: 215, 2: 354}, 915: {1: 216, 2: 354}, 916: {1: 217, 2: 354}, 917: {1: 218, 2: 354}, 918: {1: 219, 2: 354}, 919: {1: 220, 2: 354}, 920: {1: 221, 2: 354}, 921: {1: 222, 2: 354}, 922: {1: 223, 2: 354}, 923: {1: 224, 2: 354}, 924: {1: 225, 2: 354}, 925: {1: 226, 2: 354}, 926: {1: 227, 2: 354}, 927: {1: 228, 2: 354}, 928: {1: 229, 2: 354}, 929: {1: 230, 2: 354}, 930: {1: 231, 2: 354}, 931: {1: 232, 2: 354}, 932: {1: 233, 2: 354}, 933: {1: 234, 2: 354}, 934: {1: 235, 2: 354}, 935: {1: 236, 2: 354}, 936: {1: 237, 2: 354}, 937: {1: 238, 2: 354}, 938: {1: 239, 2: 354}, 939: {1: 240, 2: 354}, 940: {1: 241, 2: 354}, 941: {1: 242, 2: 354}, 942: {1: 243, 2: 354}, 943: {1: 244, 2: 354}, 944: {1: 245, 2: 354}, 945: {1: 246, 2: 354}, 946: {1: 247, 2: 354}, 947: {1: 248, 2: 354}, 948: {1: 249, 2: 354}, 949: {1: 250, 2: 354}, 950: {1: 251, 2: 354}, 951: {1: 252, 2: 354}, 952: {1: 253, 2: 354}, 953: {1: 254, 2: 354}, 954: {1: 255, 2: 354}, 955: {1: 256, 2: 354}, 956: {1: 257, 2: 354}, 957: {1: 258, 2: 354}, 958: {1: 259, 2: 354}, 959: {1: 260, 2: 354}, 960: {1: 261, 2: 354}, 961: {1: 262, 2: 354}, 962: {1: 263, 2: 354}, 963: {1: 264, 2: 354}, 964: {1: 265, 2: 354}, 965: {1: 266, 2: 354}, 966: {1: 267, 2: 354}, 967: {1: 268, 2: 354}, 968: {1: 269, 2: 354}, 969: {1: 270, 2: 354}, 970: {1: 271, 2: 354}, 971: {1: 272, 2: 354}, 972: {1: 273, 2: 354}, 973: {1: 274, 2: 354}, 974: {1: 275, 2: 354}, 975: {1: 276, 2: 354}, 976: {1: 277, 2: 354}, 977: {1: 278, 2: 354}, 978: {1: 279, 2: 354}, 979: {1: 280, 2: 354}, 980: {1: 281, 2: 354}, 981: {1: 282, 2: 354}, 982: {1: 283, 2: 354}, 983: {1: 284, 2: 354}, 984: {1: 285, 2: 354}, 985: {1: 286, 2: 354}, 986: {1: 287, 2: 354}, 987: {1: 288, 2: 354}, 988: {1: 289, 2: 354}, 989: {1: 290, 2: 354}, 990: {1: 291, 2: 354}, 991: {1: 292, 2: 354}, 992: {1: 293, 2: 354}, 993: {1: 294, 2: 354}, 994: {1: 295, 2: 354}, 995: {1: 296, 2: 354}, 996: {1: 297, 2: 354}, 997: {1: 298, 2: 354}, 998: {1: 299, 2: 354}, 999: {1: 300, 2: 354}, 1000: {1: 301, 2: 354}, 1001: {1: 302, 2: 354}, 1002: {1: 303, 2: 354}, 1003: {1: 304, 2: 354}, 1004: {1: 305, 2: 354}, 1005: {1: 306, 2: 354}, 1006: {1: 307, 2: 354}, 1007: {1: 308, 2: 354}, 1008: {1: 309, 2: 354}, 1009: {1: 310, 2: 354}, 1010: {1: 311, 2: 354}, 1011: {1: 312, 2: 354}, 1012: {1: 313, 2: 354}, 1013: {1: 314, 2: 354}, 1014: {1: 315, 2: 354}, 1015: {1: 316, 2: 354}, 1016: {1: 317, 2: 354}, 1017: {1: 318, 2: 354}, 1018: {1: 319, 2: 354}, 1019: {1: 320, 2: 354}, 1020: {1: 321, 2: 354}, 1021: {1: 322, 2: 354}, 1022: {1: 323, 2: 354}, 1023: {1: 324, 2: 354}, 1024: {1: 325, 2: 354}, 1025: {1: 326, 2: 354}, 1026: {1: 327, 2: 354}, 1027: {1: 328, 2: 354}, 1028: {1: 329, 2: 354}, 1029: {1: 330, 2: 354}, 1030: {1: 331, 2: 354}, 1031: {1: 332, 2: 354}, 1032: {1: 333, 2: 354}, 1033: {1: 334, 2: 354}, 1034: {1: 335, 2: 354}, 1035: {1: 336, 2: 354}, 1036: {1: 337, 2: 354}, 1037: {1: 338, 2: 354}, 1038: {1: 339, 2: 354}, 1039: {1: 340, 2: 354}, 1040: {1: 341, 2: 354}, 1041: {1: 342, 2: 354}, 1042: {1: 343, 2: 354}, 1043: {1: 344, 2: 354}, 1044: {1: 345, 2: 354}, 1045: {1: 346, 2: 354}, 1046: {1: 347, 2: 354}, 1047: {1: 348, 2: 354}, 1048: {1: 0, 2: 355}, 1049: {1: 1, 2: 355}, 1050: {1: 2, 2: 355}, 1051: {1: 3, 2: 355}, 1052: {1: 4, 2: 355}, 1053: {1: 5, 2: 355}, 1054: {1: 6, 2: 355}, 1055: {1: 7, 2: 355}, 1056: {1: 8, 2: 355}, 1057: {1: 9, 2: 355}, 1058: {1: 10, 2: 355}, 1059: {1: 11, 2: 355}, 1060: {1: 12, 2: 355}, 1061: {1: 13, 2: 355}, 1062: {1: 14, 2: 355}, 1063: {1: 15, 2: 355}, 1064: {1: 16, 2: 355}, 1065: {1: 17, 2: 355}, 1066: {1: 18, 2: 355}, 1067: {1: 19, 2: 355}, 1068: {1: 20, 2: 355}, 1069: {1: 21, 2: 355}, 1070: {1: 22, 2: 355}, 1071: {1: 23, 2: 355}, 1072: {1: 24, 2: 355}, 1073: {1: 25, 2: 355}, 1074: {1: 26, 2: 355}, 1075: {1: 27, 2: 355}, 1076: {1: 28, 2: 355}, 1077: {1: 29, 2: 355}, 1078: {1: 30, 2: 355}, 1079: {1: 31, 2: 355}, 1080: {1: 32, 2: 355}, 1081: {1: 33, 2: 355}, 1082: {1: 34, 2: 355}, 1083: {1: 35, 2: 355}, 1084: {1: 36, 2: 355}, 1085: {1: 37, 2: 355}, 1086: {1: 38, 2: 355}, 1087: {1: 39, 2: 355}, 1088: {1: 40, 2: 355}, 1089: {1: 41, 2: 355}, 1090: {1: 42, 2: 355}, 1091: {1: 43, 2: 355}, 1092: {1: 44, 2: 355}, 1093: {1: 45, 2: 355}, 1094: {1: 46, 2: 355}, 1095: {1: 47, 2: 355}, 1096: {1: 48, 2: 355}, 1097: {1: 49, 2: 355}, 1098: {1: 50, 2: 355}, 1099: {1: 51, 2: 355}, 1100: {1: 52, 2: 355}, 1101: {1: 53, 2: 355}, 1102: {1: 54, 2: 355}, 1103: {1: 55, 2: 355}, 1104: {1: 56, 2: 355}, 1105: {1: 57, 2: 355}, 1106: {1: 58, 2: 355}, 1107: {1: 59, 2: 355}, 1108: {1: 60, 2: 355}, 1109: {1: 61, 2: 355}, 1110: {1: 62, 2: 355}, 1111: {1: 63, 2: 355}, 1112: {1: 64, 2: 355}, 1113: {1: 65, 2: 355}, 1114: {1: 66, 2: 355}, 1115: {1: 67, 2: 355}, 1116: {1: 68, 2: 355}, 1117: {1: 69, 2: 355}, 1118: {1: 70, 2: 355}, 1119: {1: 71, 2: 355}, 1120: {1: 72, 2: 355}, 1121: {1: 73, 2: 355}, 1122: {1: 74, 2: 355}, 1123: {1: 75, 2: 355}, 1124: {1: 76, 2: 355}, 1125: {1: 77, 2: 355}, 1126: {1: 78, 2: 355}, 1127: {1: 79, 2: 355}, 1128: {1: 80, 2: 355}, 1129: {1: 81, 2: 355}, 1130: {1: 82, 2: 355}, 1131: {1: 83, 2: 355}, 1132: {1: 84, 2: 355}, 1133: {1: 85, 2: 355}, 1134: {1: 86, 2: 355}, 1135: {1: 87, 2: 355}, 1136: {1: 88, 2: 355}, 1137: {1: 89, 2: 355}, 1138: {1: 90, 2: 355}, 1139: {1: 91, 2: 355}, 1140: {1: 92, 2: 355}, 1141: {1: 93, 2: 355}, 1142: {1: 94, 2: 355}, 1143: {1: 95, 2: 355}, 1144: {1: 96, 2: 355}, 1145: {1: 97, 2: 355}, 1146: {1: 98, 2: 355}, 1147: {1: 99, 2: 355}, 1148: {1: 100, 2: 355}, 1149: {1: 101, 2: 355}, 1150: {1: 102, 2: 355}, 1151: {1: 103, 2: 355}, 1152: {1: 104, 2: 355}, 1153: {1: 105, 2: 355}, 1154: {1: 106, 2: 355}, 1155: {1: 107, 2: 355}, 1156: {1: 108, 2: 355}, 1157: {1: 109, 2: 355}, 1158: {1: 110, 2: 355}, 1159: {1: 111, 2: 355}, 1160: {1: 112, 2: 355}, 1161: {1: 113, 2: 355}, 1162: {1: 114, 2: 355}, 1163: {1: 115, 2: 355}, 1164: {1: 116, 2: 355}, 1165: {1: 117, 2: 355}, 1166: {1: 118, 2: 355}, 1167: {1: 119, 2: 355}, 1168: {1: 120, 2: 355}, 1169: {1: 121, 2: 355}, 1170: {1: 122, 2: 355}, 1171: {1: 123, 2: 355}, 1172: {1: 124, 2: 355}, 1173: {1: 125, 2: 355}, 1174: {1: 126, 2: 355}, 1175: {1: 127, 2: 355}, 1176: {1: 128, 2: 355}, 1177: {1: 129, 2: 355}, 1178: {1: 130, 2: 355}, 1179: {1: 131, 2: 355}, 1180: {1: 132, 2: 355}, 1181: {1: 133, 2: 355}, 1182: {1: 134, 2: 355}, 1183: {1: 135, 2: 355}, 1184: {1: 136, 2: 355}, 1185: {1: 137, 2: 355}, 1186: {1: 138, 2: 355}, 1187: {1: 139, 2: 355}, 1188: {1: 140, 2: 355}, 1189: {1: 141, 2: 355}, 1190: {1: 142, 2: 355}, 1191: {1: 143, 2: 355}, 1192: {1: 144, 2: 355}, 1193: {1: 145, 2: 355}, 1194: {1: 146, 2: 355}, 1195: {1: 147, 2: 355}, 1196: {1: 148, 2: 355}, 1197: {1: 149, 2: 355}, 1198: {1: 150, 2: 355}, 1199: {1: 151, 2: 355}, 1200: {1: 152, 2: 355}, 1201: {1: 153, 2: 355}, 1202: {1: 154, 2: 355}, 1203: {1: 155, 2: 355}, 1204: {1: 156, 2: 355}, 1205: {1: 157, 2: 355}, 1206: {1: 158, 2: 355}, 1207: {1: 159, 2: 355}, 1208: {1: 160, 2: 355}, 1209: {1: 161, 2: 355}, 1210: {1: 162, 2: 355}, 1211: {1: 163, 2: 355}, 1212: {1: 164, 2: 355}, 1213: {1: 165, 2: 355}, 1214: {1: 166, 2: 355}, 1215: {1: 167, 2: 355}, 1216: {1: 168, 2: 355}, 1217: {1: 169, 2: 355}, 1218: {1: 170, 2: 355}, 1219: {1: 171, 2: 355}, 1220: {1: 172, 2: 355}, 1221: {1: 173, 2: 355}, 1222: {1: 174, 2: 355}, 1223: {1: 175, 2: 355}, 1224: {1: 176, 2: 355}, 1225: {1: 177, 2: 355}, 1226: {1: 178, 2: 355}, 1227: {1: 179, 2: 355}, 1228: {1: 180, 2: 355}, 1229: {1: 181, 2: 355}, 1230: {1: 182, 2: 355}, 1231: {1: 183, 2: 355}, 1232: {1: 184, 2: 355}, 1233: {1: 185, 2: 355}, 1234: {1: 186, 2: 355}, 1235: {1: 187, 2: 355}, 1236: {1: 188, 2: 355}, 1237: {1: 189, 2: 355}, 1238: {1: 190, 2: 355}, 1239: {1: 191, 2: 355}, 1240: {1: 192, 2: 355}, 1241: {1: 193, 2: 355}, 1242: {1: 194, 2: 355}, 1243: {1: 195, 2: 355}, 1244: {1: 196, 2: 355}, 1245: {1: 197, 2: 355}, 1246: {1: 198, 2: 355}, 1247: {1: 199, 2: 355}, 1248: {1: 200, 2: 355}, 1249: {1: 201, 2: 355}, 1250: {1: 202, 2: 355}, 1251: {1: 203, 2: 355}, 1252: {1: 204, 2: 355}, 1253: {1: 205, 2: 355}, 1254: {1: 206, 2: 355}, 1255: {1: 207, 2: 355}, 1256: {1: 208, 2: 355}, 1257: {1: 209, 2: 355}, 1258: {1: 210, 2: 355}, 1259: {1: 211, 2: 355}, 1260: {1: 212, 2: 355}, 1261: {1: 213, 2: 355}, 1262: {1: 214, 2: 355}, 1263: {1: 215, 2: 355}, 1264: {1: 216, 2: 355}, 1265: {1: 217, 2: 355}, 1266: {1: 218, 2: 355}, 1267: {1: 219, 2: 355}, 1268: {1: 220, 2: 355}, 1269: {1: 221, 2: 355}, 1270: {1: 222, 2: 355}, 1271: {1: 223, 2: 355}, 1272: {1: 224, 2: 355}, 1273: {1: 225, 2: 355}, 1274: {1: 226, 2: 355}, 1275: {1: 227, 2: 355}, 1276: {1: 228, 2: 355}, 1277: {1: 229, 2: 355}, 1278: {1: 230, 2: 355}, 1279: {1: 231, 2: 355}, 1280: {1: 232, 2: 355}, 1281: {1: 233, 2: 355}, 1282: {1: 234, 2: 355}, 1283: {1: 235, 2: 355}, 1284: {1: 236, 2: 355}, 1285: {1: 237, 2: 355}, 1286: {1: 238, 2: 355}, 1287: {1: 239, 2: 355}, 1288: {1: 240, 2: 355}, 1289: {1: 241, 2: 355}, 1290: {1: 242, 2: 355}, 1291: {1: 243, 2: 355}, 1292: {1: 244, 2: 355}, 1293: {1: 245, 2: 355}, 1294: {1: 246, 2: 355}, 1295: {1: 247, 2: 355}, 1296: {1: 248, 2: 355}, 1297: {1: 249, 2: 355}, 1298: {1: 250, 2: 355}, 1299: {1: 251, 2: 355}, 1300: {1: 252, 2: 355}, 1301: {1: 253, 2: 355}, 1302: {1: 254, 2: 355}, 1303: {1: 255, 2: 355}, 1304: {1: 256, 2: 355}, 1305: {1: 257, 2: 355}, 1306: {1: 258, 2: 355}, 1307: {1: 259, 2: 355}, 1308: {1: 260, 2: 355}, 1309: {1: 261, 2: 355}, 1310: {1: 262, 2: 355}, 1311: {1: 263, 2: 355}, 1312: {1: 264, 2: 355}, 1313: {1: 265, 2: 355}, 1314: {1: 266, 2: 355}, 1315: {1: 267, 2: 355}, 1316: {1: 268, 2: 355}, 1317: {1: 269, 2: 355}, 1318: {1: 270, 2: 355}, 1319: {1: 271, 2: 355}, 1320: {1: 272, 2: 355}, 1321: {1: 273, 2: 355}, 1322: {1: 274, 2: 355}, 1323: {1: 275, 2: 355}, 1324: {1: 276, 2: 355}, 1325: {1: 277, 2: 355}, 1326: {1: 278, 2: 355}, 1327: {1: 279, 2: 355}, 1328: {1: 280, 2: 355}, 1329: {1: 281, 2: 355}, 1330: {1: 282, 2: 355}, 1331: {1: 283, 2: 355}, 1332: {1: 284, 2: 355}, 1333: {1: 285, 2: 355}, 1334: {1: 286, 2: 355}, 1335: {1: 287, 2: 355}, 1336: {1: 288, 2: 355}, 1337: {1: 289, 2: 355}, 1338: {1: 290, 2: 355}, 1339: {1: 291, 2: 355}, 1340: {1: 292, 2: 355}, 1341: {1: 293, 2: 355}, 1342: {1: 294, 2: 355}, 1343: {1: 295, 2: 355}, 1344: {1: 296, 2: 355}, 1345: {1: 297, 2: 355}, 1346: {1: 298, 2: 355}, 1347: {1: 299, 2: 355}, 1348: {1: 300, 2: 355}, 1349: {1: 301, 2: 355}, 1350: {1: 302, 2: 355}, 1351: {1: 303, 2: 355}, 1352: {1: 304, 2: 355}, 1353: {1: 305, 2: 355}, 1354: {1: 306, 2: 355}, 1355: {1: 307, 2: 355}, 1356: {1: 308, 2: 355}, 1357: {1: 309, 2: 355}, 1358: {1: 310, 2: 355}, 1359: {1: 311, 2: 355}, 1360: {1: 312, 2: 355}, 1361: {1: 313, 2: 355}, 1362: {1: 314, 2: 355}, 1363: {1: 315, 2: 355}, 1364: {1: 316, 2: 355}, 1365: {1: 317, 2: 355}, 1366: {1: 318, 2: 355}, 1367: {1: 319, 2: 355}, 1368: {1: 320, 2: 355}, 1369: {1: 321, 2: 355}, 1370: {1: 322, 2: 355}, 1371: {1: 323, 2: 355}, 1372: {1: 324, 2: 355}, 1373: {1: 325, 2: 355}, 1374: {1: 326, 2: 355}, 1375: {1: 327, 2: 355}, 1376: {1: 328, 2: 355}, 1377: {1: 329, 2: 355}, 1378: {1: 330, 2: 355}, 1379: {1: 331, 2: 355}, 1380: {1: 332, 2: 355}, 1381: {1: 333, 2: 355}, 1382: {1: 334, 2: 355}, 1383: {1: 335, 2: 355}, 1384: {1: 336, 2: 355}, 1385: {1: 337, 2: 355}, 1386: {1: 338, 2: 355}, 1387: {1: 339, 2: 355}, 1388: {1: 340, 2: 355}, 1389: {1: 341, 2: 355}, 1390: {1: 342, 2: 355}, 1391: {1: 343, 2: 355}, 1392: {1: 344, 2: 355}, 1393: {1: 345, 2: 355}, 1394: {1: 346, 2: 355}, 1395: {1: 347, 2: 355}, 1396: {1: 348, 2: 355}, 1397: {1: 0, 2: 356}, 1398: {1: 1, 2: 356}, 1399: {1: 2, 2: 356}, 1400: {1: 3, 2: 356}, 1401: {1: 4, 2: 356}, 1402: {1: 5, 2: 356}, 1403: {1: 6, 2: 356}, 1404: {1: 7, 2: 356}, 1405: {1: 8, 2: 356}, 1406: {1: 9, 2: 356}, 1407: {1: 10, 2: 356}, 1408: {1: 11, 2: 356}, 1409: {1: 12, 2: 356}, 1410: {1: 13, 2: 356}, 1411: {1: 14, 2: 356}, 1412: {1: 15, 2: 356}, 1413: {1: 16, 2: 356}, 1414: {1: 17, 2: 356}, 1415: {1: 18, 2: 356}, 1416: {1: 19, 2: 356}, 1417: {1: 20, 2: 356}, 1418: {1: 21, 2: 356}, 1419: {1: 22, 2: 356}, 1420: {1: 23, 2: 356}, 1421: {1: 24, 2: 356}, 1422: {1: 25, 2: 356}, 1423: {1: 26, 2: 356}, 1424: {1: 27, 2: 356}, 1425: {1: 28, 2: 356}, 1426: {1: 29, 2: 356}, 1427: {1: 30, 2: 356}, 1428: {1: 31, 2: 356}, 1429: {1: 32, 2: 356}, 1430: {1: 33, 2: 356}, 1431: {1: 34, 2: 356}, 1432: {1: 35, 2: 356}, 1433: {1: 36, 2: 356}, 1434: {1: 37, 2: 356}, 1435: {1: 38, 2: 356}, 1436: {1: 39, 2: 356}, 1437: {1: 40, 2: 356}, 1438: {1: 41, 2: 356}, 1439: {1: 42, 2: 356}, 1440: {1: 43, 2: 356}, 1441: {1: 44, 2: 356}, 1442: {1: 45, 2: 356}, 1443: {1: 46, 2: 356}, 1444: {1: 47, 2: 356}, 1445: {1: 48, 2: 356}, 1446: {1: 49, 2: 356}, 1447: {1: 50, 2: 356}, 1448: {1: 51, 2: 356}, 1449: {1: 52, 2: 356}, 1450: {1: 53, 2: 356}, 1451: {1: 54, 2: 356}, 1452: {1: 55, 2: 356}, 1453: {1: 56, 2: 356}, 1454: {1: 57, 2: 356}, 1455: {1: 58, 2: 356}, 1456: {1: 59, 2: 356}, 1457: {1: 60, 2: 356}, 1458: {1: 61, 2: 356}, 1459: {1: 62, 2: 356}, 1460: {1: 63, 2: 356}, 1461: {1: 64, 2: 356}, 1462: {1: 65, 2: 356}, 1463: {1: 66, 2: 356}, 1464: {1: 67, 2: 356}, 1465: {1: 68, 2: 356}, 1466: {1: 69, 2: 356}, 1467: {1: 70, 2: 356}, 1468: {1: 71, 2: 356}, 1469: {1: 72, 2: 356}, 1470: {1: 73, 2: 356}, 1471: {1: 74, 2: 356}, 1472: {1: 75, 2: 356}, 1473: {1: 76, 2: 356}, 1474: {1: 77, 2: 356}, 1475: {1: 78, 2: 356}, 1476: {1: 79, 2: 356}, 1477: {1: 80, 2: 356}, 1478: {1: 81, 2: 356}, 1479: {1: 82, 2: 356}, 1480: {1: 83, 2: 356}, 1481: {1: 84, 2: 356}, 1482: {1: 85, 2: 356}, 1483: {1: 86, 2: 356}, 1484: {1: 87, 2: 356}, 1485: {1: 88, 2: 356}, 1486: {1: 89, 2: 356}, 1487: {1: 90, 2: 356}, 1488: {1: 91, 2: 356}, 1489: {1: 92, 2: 356}, 1490: {1: 93, 2: 356}, 1491: {1: 94, 2: 356}, 1492: {1: 95, 2: 356}, 1493: {1: 96, 2: 356}, 1494: {1: 97, 2: 356}, 1495: {1: 98, 2: 356}, 1496: {1: 99, 2: 356}, 1497: {1: 100, 2: 356}, 1498: {1: 101, 2: 356}, 1499: {1: 102, 2: 356}, 1500: {1: 103, 2: 356}, 1501: {1: 104, 2: 356}, 1502: {1: 105, 2: 356}, 1503: {1: 106, 2: 356}, 1504: {1: 107, 2: 356}, 1505: {1: 108, 2: 356}, 1506: {1: 109, 2: 356}, 1507: {1: 110, 2: 356}, 1508: {1: 111, 2: 356}, 1509: {1: 112, 2: 356}, 1510: {1: 113, 2: 356}, 1511: {1: 114, 2: 356}, 1512: {1: 115, 2: 356}, 1513: {1: 116, 2: 356}, 1514: {1: 117, 2: 356}, 1515: {1: 118, 2: 356}, 1516: {1: 119, 2: 356}, 1517: {1: 120, 2: 356}, 1518: {1: 121, 2: 356}, 1519: {1: 122, 2: 356}, 1520: {1: 123, 2: 356}, 1521: {1: 124, 2: 356}, 1522: {1: 125, 2: 356}, 1523: {1: 126, 2: 356}, 1524: {1: 127, 2: 356}, 1525: {1: 128, 2: 356}, 1526: {1: 129, 2: 356}, 1527: {1: 130, 2: 356}, 1528: {1: 131, 2: 356}, 1529: {1: 132, 2: 356}, 1530: {1: 133, 2: 356}, 1531: {1: 134, 2: 356}, 1532: {1: 135, 2: 356}, 1533: {1: 136, 2: 356}, 1534: {1: 137, 2: 356}, 1535: {1: 138, 2: 356}, 1536: {1: 139, 2: 356}, 1537: {1: 140, 2: 356}, 1538: {1: 141, 2: 356}, 1539: {1: 142, 2: 356}, 1540: {1: 143, 2: 356}, 1541: {1: 144, 2: 356}, 1542: {1: 145, 2: 356}, 1543: {1: 146, 2: 356}, 1544: {1: 147, 2: 356}, 1545: {1: 148, 2: 356}, 1546: {1: 149, 2: 356}, 1547: {1: 150, 2: 356}, 1548: {1: 151, 2: 356}, 1549: {1: 152, 2: 356}, 1550: {1: 153, 2: 356}, 1551: {1: 154, 2: 356}, 1552: {1: 155, 2: 356}, 1553: {1: 156, 2: 356}, 1554: {1: 157, 2: 356}, 1555: {1: 158, 2: 356}, 1556: {1: 159, 2: 356}, 1557: {1: 160, 2: 356}, 1558: {1: 161, 2: 356}, 1559: {1: 162, 2: 356}, 1560: {1: 163, 2: 356}, 1561: {1: 164, 2: 356}, 1562: {1: 165, 2: 356}, 1563: {1: 166, 2: 356}, 1564: {1: 167, 2: 356}, 1565: {1: 168, 2: 356}, 1566: {1: 169, 2: 356}, 1567: {1: 170, 2: 356}, 1568: {1: 171, 2: 356}, 1569: {1: 172, 2: 356}, 1570: {1: 173, 2: 356}, 1571: {1: 174, 2: 356}, 1572: {1: 175, 2: 356}, 1573: {1: 176, 2: 356}, 1574: {1: 177, 2: 356}, 1575: {1: 178, 2: 356}, 1576: {1: 179, 2: 356}, 1577: {1: 180, 2: 356}, 1578: {1: 181, 2: 356}, 1579: {1: 182, 2: 356}, 1580: {1: 183, 2: 356}, 1581: {1: 184, 2: 356}, 1582: {1: 185, 2: 356}, 1583: {1: 186, 2: 356}, 1584: {1: 187, 2: 356}, 1585: {1: 188, 2: 356}, 1586: {1: 189, 2: 356}, 1587: {1: 190, 2: 356}, 1588: {1: 191, 2: 356}, 1589: {1: 192, 2: 356}, 1590: {1: 193, 2: 356}, 1591: {1: 194, 2: 356}, 1592: {1: 195, 2: 356}, 1593: {1: 196, 2: 356}, 1594: {1: 197, 2: 356}, 1595: {1: 198, 2: 356}, 1596: {1: 199, 2: 356}, 1597: {1: 200, 2: 356}, 1598: {1: 201, 2: 356}, 1599: {1: 202, 2: 356}, 1600: {1: 203, 2: 356}, 1601: {1: 204, 2: 356}, 1602: {1: 205, 2: 356}, 1603: {1: 206, 2: 356}, 1604: {1: 207, 2: 356}, 1605: {1: 208, 2: 356}, 1606: {1: 209, 2: 356}, 1607: {1: 210, 2: 356}, 1608: {1: 211, 2: 356}, 1609: {1: 212, 2: 356}, 1610: {1: 213, 2: 356}, 1611: {1: 214, 2: 356}, 1612: {1: 215, 2: 356}, 1613: {1: 216, 2: 356}, 1614: {1: 217, 2: 356}, 1615: {1: 218, 2: 356}, 1616: {1: 219, 2: 356}, 1617: {1: 220, 2: 356}, 1618: {1: 221, 2: 356}, 1619: {1: 222, 2: 356}, 1620: {1: 223, 2: 356}, 1621: {1: 224, 2: 356}, 1622: {1: 225, 2: 356}, 1623: {1: 226, 2: 356}, 1624: {1: 227, 2: 356}, 1625: {1: 228, 2: 356}, 1626: {1: 229, 2: 356}, 1627: {1: 230, 2: 356}, 1628: {1: 231, 2: 356}, 1629: {1: 232, 2: 356}, 1630: {1: 233, 2: 356}, 1631: {1: 234, 2: 356}, 1632: {1: 235, 2: 356}, 1633: {1: 236, 2: 356}, 1634: {1: 237, 2: 356}, 1635: {1: 238, 2: 356}, 1636: {1: 239, 2: 356}, 1637: {1: 240, 2: 356}, 1638: {1: 241, 2: 356}, 1639: {1: 242, 2: 356}, 1640: {1: 243, 2: 356}, 1641: {1: 244, 2: 356}, 1642: {1: 245, 2: 356}, 1643: {1: 246, 2: 356}, 1644: {1: 247, 2: 356}, 1645: {1: 248, 2: 356}, 1646: {1: 249, 2: 356}, 1647: {1: 250, 2: 356}, 1648: {1: 251, 2: 356}, 1649: {1: 252, 2: 356}, 1650: {1: 253, 2: 356}, 1651: {1: 254, 2: 356}, 1652: {1: 255, 2: 356}, 1653: {1: 256, 2: 356}, 1654: {1: 257, 2: 356}, 1655: {1: 258, 2: 356}, 1656: {1: 259, 2: 356}, 1657: {1: 260, 2: 356}, 1658: {1: 261, 2: 356}, 1659: {1: 262, 2: 356}, 1660: {1: 263, 2: 356}, 1661: {1: 264, 2: 356}, 1662: {1: 265, 2: 356}, 1663: {1: 266, 2: 356}, 1664: {1: 267, 2: 356}, 1665: {1: 268, 2: 356}, 1666: {1: 269, 2: 356}, 1667: {1: 270, 2: 356}, 1668: {1: 271, 2: 356}, 1669: {1: 272, 2: 356}, 1670: {1: 273, 2: 356}, 1671: {1: 274, 2: 356}, 1672: {1: 275, 2: 356}, 1673: {1: 276, 2: 356}, 1674: {1: 277, 2: 356}, 1675: {1: 278, 2: 356}, 1676: {1: 279, 2: 356}, 1677: {1: 280, 2: 356}, 1678: {1: 281, 2: 356}, 1679: {1: 282, 2: 356}, 1680: {1: 283, 2: 356}, 1681: {1: 284, 2: 356}, 1682: {1: 285, 2: 356}, 1683: {1: 286, 2: 356}, 1684: {1: 287, 2: 356}, 1685: {1: 288, 2: 356}, 1686: {1: 289, 2: 356}, 1687: {1: 290, 2: 356}, 1688: {1: 291, 2: 356}, 1689: {1: 292, 2: 356}, 1690: {1: 293, 2: 356}, 1691: {1: 294, 2: 356}, 1692: {1: 295, 2: 356}, 1693: {1: 296, 2: 356}, 1694: {1: 297, 2: 356}, 1695: {1: 298, 2: 356}, 1696: {1: 299, 2: 356}, 1697: {1: 300, 2: 356}, 1698: {1: 301, 2: 356}, 1699: {1: 302, 2: 356}, 1700: {1: 303, 2: 356}, 1701: {1: 304, 2: 356}, 1702: {1: 305, 2: 356}, 1703: {1: 306, 2: 356}, 1704: {1: 307, 2: 356}, 1705: {1: 308, 2: 356}, 1706: {1: 309, 2: 356}, 1707: {1: 310, 2: 356}, 1708: {1: 311, 2: 356}, 1709: {1: 312, 2: 356}, 1710: {1: 313, 2: 356}, 1711: {1: 314, 2: 356}, 1712: {1: 315, 2: 356}, 1713: {1: 316, 2: 356}, 1714: {1: 317, 2: 356}, 1715: {1: 318, 2: 356}, 1716: {1: 319, 2: 356}, 1717: {1: 320, 2: 356}, 1718: {1: 321, 2: 356}, 1719: {1: 322, 2: 356}, 1720: {1: 323, 2: 356}, 1721: {1: 324, 2: 356}, 1722: {1: 325, 2: 356}, 1723: {1: 326, 2: 356}, 1724: {1: 327, 2: 356}, 1725: {1: 328, 2: 356}, 1726: {1: 329, 2: 356}, 1727: {1: 330, 2: 356}, 1728: {1: 331, 2: 356}, 1729: {1: 332, 2: 356}, 1730: {1: 333, 2: 356}, 1731: {1: 334, 2: 356}, 1732: {1: 335, 2: 356}, 1733: {1: 336, 2: 356}, 1734: {1: 337, 2: 356}, 1735: {1: 338, 2: 356}, 1736: {1: 339, 2: 356}, 1737: {1: 340, 2: 356}, 1738: {1: 341, 2: 356}, 1739: {1: 342, 2: 356}, 1740: {1: 343, 2: 356}, 1741: {1: 344, 2: 356}, 1742: {1: 345, 2: 356}, 1743: {1: 346, 2: 356}, 1744: {1: 347, 2: 356}, 1745: {1: 348, 2: 356}, 1746: {1: 0, 2: 357}, 1747: {1: 1, 2: 357}, 1748: {1: 2, 2: 357}, 1749: {1: 3, 2: 357}, 1750: {1: 4, 2: 357}, 1751: {1: 5, 2: 357}, 1752: {1: 6, 2: 357}, 1753: {1: 7, 2: 357}, 1754: {1: 8, 2: 357}, 1755: {1: 9, 2: 357}, 1756: {1: 10, 2: 357}, 1757: {1: 11, 2: 357}, 1758: {1: 12, 2: 357}, 1759: {1: 13, 2: 357}, 1760: {1: 14, 2: 357}, 1761: {1: 15, 2: 357}, 1762: {1: 16, 2: 357}, 1763: {1: 17, 2: 357}, 1764: {1: 18, 2: 357}, 1765: {1: 19, 2: 357}, 1766: {1: 20, 2: 357}, 1767: {1: 21, 2: 357}, 1768: {1: 22, 2: 357}, 1769: {1: 23, 2: 357}, 1770: {1: 24, 2: 357}, 1771: {1: 25, 2: 357}, 1772: {1: 26, 2: 357}, 1773: {1: 27, 2: 357}, 1774: {1: 28, 2: 357}, 1775: {1: 29, 2: 357}, 1776: {1: 30, 2: 357}, 1777: {1: 31, 2: 357}, 1778: {1: 32, 2: 357}, 1779: {1: 33, 2: 357}, 1780: {1: 34, 2: 357}, 1781: {1: 35, 2: 357}, 1782: {1: 36, 2: 357}, 1783: {1: 37, 2: 357}, 1784: {1: 38, 2: 357}, 1785: {1: 39, 2: 357}, 1786: {1: 40, 2: 357}, 1787: {1: 41, 2: 357}, 1788: {1: 42, 2: 357}, 1789: {1: 43, 2: 357}, 1790: {1: 44, 2: 357}, 1791: {1: 45, 2: 357}, 1792: {1: 46, 2: 357}, 1793: {1: 47, 2: 357}, 1794: {1: 48, 2: 357}, 1795: {1: 49, 2: 357}, 1796: {1: 50, 2: 357}, 1797: {1: 51, 2: 357}, 1798: {1: 52, 2: 357}, 1799: {1: 53, 2: 357}, 1800: {1: 54, 2: 357}, 1801: {1: 55, 2: 357}, 1802: {1: 56, 2: 357}, 1803: {1: 57, 2: 357}, 1804: {1: 58, 2: 357}, 1805: {1: 59, 2: 357}, 1806: {1: 60, 2: 357}, 1807: {1: 61, 2: 357}, 1808: {1: 62, 2: 357}, 1809: {1: 63, 2: 357}, 1810: {1: 64, 2: 357}, 1811: {1: 65, 2: 357}, 1812: {1: 66, 2: 357}, 1813: {1: 67, 2: 357}, 1814: {1: 68, 2: 357}, 1815: {1: 69, 2: 357}, 1816: {1: 70, 2: 357}, 1817: {1: 71, 2: 357}, 1818: {1: 72, 2: 357}, 1819: {1: 73, 2: 357}, 1820: {1: 74, 2: 357}, 1821: {1: 75, 2: 357}, 1822: {1: 76, 2: 357}, 1823: {1: 77, 2: 357}, 1824: {1: 78, 2: 357}, 1825: {1: 79, 2: 357}, 1826: {1: 80, 2: 357}, 1827: {1: 81, 2: 357}, 1828: {1: 82, 2: 357}, 1829: {1: 83, 2: 357}, 1830: {1: 84, 2: 357}, 1831: {1: 85, 2: 357}, 1832: {1: 86, 2: 357}, 1833: {1: 87, 2: 357}, 1834: {1: 88, 2: 357}, 1835: {1: 89, 2: 357}, 1836: {1: 90, 2: 357}, 1837: {1: 91, 2: 357}, 1838: {1: 92, 2: 357}, 1839: {1: 93, 2: 357}, 1840: {1: 94, 2: 357}, 1841: {1: 95, 2: 357}, 1842: {1: 96, 2: 357}, 1843: {1: 97, 2: 357}, 1844: {1: 98, 2: 357}, 1845: {1: 99, 2: 357}, 1846: {1: 100, 2: 357}, 1847: {1: 101, 2: 357}, 1848: {1: 102, 2: 357}, 1849: {1: 103, 2: 357}, 1850: {1: 104, 2: 357}, 1851: {1: 105, 2: 357}, 1852: {1: 106, 2: 357}, 1853: {1: 107, 2: 357}, 1854: {1: 108, 2: 357}, 1855: {1: 109, 2: 357}, 1856: {1: 110, 2: 357}, 1857: {1: 111, 2: 357}, 1858: {1: 112, 2: 357}, 1859: {1: 113, 2: 357}, 1860: {1: 114, 2: 357}, 1861: {1: 115, 2: 357}, 1862: {1: 116, 2: 357}, 1863: {1: 117, 2: 357}, 1864: {1: 118, 2: 357}, 1865: {1: 119, 2: 357}, 1866: {1: 120, 2: 357}, 1867: {1: 121, 2: 357}, 1868: {1: 122, 2: 357}, 1869: {1: 123, 2: 357}, 1870: {1: 124, 2: 357}, 1871: {1: 125, 2: 357}, 1872: {1: 126, 2: 357}, 1873: {1: 127, 2: 357}, 1874: {1: 128, 2: 357}, 1875: {1: 129, 2: 357}, 1876: {1: 130, 2: 357}, 1877: {1: 131, 2: 357}, 1878: {1: 132, 2: 357}, 1879: {1: 133, 2: 357}, 1880: {1: 134, 2: 357}, 1881: {1: 135, 2: 357}, 1882: {1: 136, 2: 357}, 1883: {1: 137, 2: 357}, 1884: {1: 138, 2: 357}, 1885: {1: 139, 2: 357}, 1886: {1: 140, 2: 357}, 1887: {1: 141, 2: 357}, 1888: {1: 142, 2: 357}, 1889: {1: 143, 2: 357}, 1890: {1: 144, 2: 357}, 1891: {1: 145, 2: 357}, 1892: {1: 146, 2: 357}, 1893: {1: 147, 2: 357}, 1894: {1: 148, 2: 357}, 1895: {1: 149, 2: 357}, 1896: {1: 150, 2: 357}, 1897: {1: 151, 2: 357}, 1898: {1: 152, 2: 357}, 1899: {1: 153, 2: 357}, 1900: {1: 154, 2: 357}, 1901: {1: 155, 2: 357}, 1902: {1: 156, 2: 357}, 1903: {1: 157, 2: 357}, 1904: {1: 158, 2: 357}, 1905: {1: 159, 2: 357}, 1906: {1: 160, 2: 357}, 1907: {1: 161, 2: 357}, 1908: {1: 162, 2: 357}, 1909: {1: 163, 2: 357}, 1910: {1: 164, 2: 357}, 1911: {1: 165, 2: 357}, 1912: {1: 166, 2: 357}, 1913: {1: 167, 2: 357}, 1914: {1: 168, 2: 357}, 1915: {1: 169, 2: 357}, 1916: {1: 170, 2: 357}, 1917: {1: 171, 2: 357}, 1918: {1: 172, 2: 357}, 1919: {1: 173, 2: 357}, 1920: {1: 174, 2: 357}, 1921: {1: 175, 2: 357}, 1922: {1: 176, 2: 357}, 1923: {1: 177, 2: 357}, 1924: {1: 178, 2: 357}, 1925: {1: 179, 2: 357}, 1926: {1: 180, 2: 357}, 1927: {1: 181, 2: 357}, 1928: {1: 182, 2: 357}, 1929: {1: 183, 2: 357}, 1930: {1: 184, 2: 357}, 1931: {1: 185, 2: 357}, 1932: {1: 186, 2: 357}, 1933: {1: 187, 2: 357}, 1934: {1: 188, 2: 357}, 1935: {1: 189, 2: 357}, 1936: {1: 190, 2: 357}, 1937: {1: 191, 2: 357}, 1938: {1: 192, 2: 357}, 1939: {1: 193, 2: 357}, 1940: {1: 194, 2: 357}, 1941: {1: 195, 2: 357}, 1942: {1: 196, 2: 357}, 1943: {1: 197, 2: 357}, 1944: {1: 198, 2: 357}, 1945: {1: 199, 2: 357}, 1946: {1: 200, 2: 357}, 1947: {1: 201, 2: 357}, 1948: {1: 202, 2: 357}, 1949: {1: 203, 2: 357}, 1950: {1: 204, 2: 357}, 1951: {1: 205, 2: 357}, 1952: {1: 206, 2: 357}, 1953: {1: 207, 2: 357}, 1954: {1: 208, 2: 357}, 1955: {1: 209, 2: 357}, 1956: {1: 210, 2: 357}, 1957: {1: 211, 2: 357}, 1958: {1: 212, 2: 357}, 1959: {1: 213, 2: 357}, 1960: {1: 214, 2: 357}, 1961: {1: 215, 2: 357}, 1962: {1: 216, 2: 357}, 1963: {1: 217, 2: 357}, 1964: {1: 218, 2: 357}, 1965: {1: 219, 2: 357}, 1966: {1: 220, 2: 357}, 1967: {1: 221, 2: 357}, 1968: {1: 222, 2: 357}, 1969: {1: 223, 2: 357}, 1970: {1: 224, 2: 357}, 1971: {1: 225, 2: 357}, 1972: {1: 226, 2: 357}, 1973: {1: 227, 2: 357}, 1974: {1: 228, 2: 357}, 1975: {1: 229, 2: 357}, 1976: {1: 230, 2: 357}, 1977: {1: 231, 2: 357}, 1978: {1: 232, 2: 357}, 1979: {1: 233, 2: 357}, 1980: {1: 234, 2: 357}, 1981: {1: 235, 2: 357}, 1982: {1: 236, 2: 357}, 1983: {1: 237, 2: 357}, 1984: {1: 238, 2: 357}, 1985: {1: 239, 2: 357}, 1986: {1: 240, 2: 357}, 1987: {1: 241, 2: 357}, 1988: {1: 242, 2: 357}, 1989: {1: 243, 2: 357}, 1990: {1: 244, 2: 357}, 1991: {1: 245, 2: 357}, 1992: {1: 246, 2: 357}, 1993: {1: 247, 2: 357}, 1994: {1: 248, 2: 357}, 1995: {1: 249, 2: 357}, 1996: {1: 250, 2: 357}, 1997: {1: 251, 2: 357}, 1998: {1: 252, 2: 357}, 1999: {1: 253, 2: 357}, 2000: {1: 254, 2: 357}, 2001: {1: 255, 2: 357}, 2002: {1: 256, 2: 357}, 2003: {1: 257, 2: 357}, 2004: {1: 258, 2: 357}, 2005: {1: 259, 2: 357}, 2006: {1: 260, 2: 357}, 2007: {1: 261, 2: 357}, 2008: {1: 262, 2: 357}, 2009: {1: 263, 2: 357}, 2010: {1: 264, 2: 357}, 2011: {1: 265, 2: 357}, 2012: {1: 266, 2: 357}, 2013: {1: 267, 2: 357}, 2014: {1: 268, 2: 357}, 2015: {1: 269, 2: 357}, 2016: {1: 270, 2: 357}, 2017: {1: 271, 2: 357}, 2018: {1: 272, 2: 357}, 2019: {1: 273, 2: 357}, 2020: {1: 274, 2: 357}, 2021: {1: 275, 2: 357}, 2022: {1: 276, 2: 357}, 2023: {1: 277, 2: 357}, 2024: {1: 278, 2: 357}, 2025: {1: 279, 2: 357}, 2026: {1: 280, 2: 357}, 2027: {1: 281, 2: 357}, 2028: {1: 282, 2: 357}, 2029: {1: 283, 2: 357}, 2030: {1: 284, 2: 357}, 2031: {1: 285, 2: 357}, 2032: {1: 286, 2: 357}, 2033: {1: 287, 2: 357}, 2034: {1: 288, 2: 357}, 2035: {1: 289, 2: 357}, 2036: {1: 290, 2: 357}, 2037: {1: 291, 2: 357}, 2038: {1: 292, 2: 357}, 2039: {1: 293, 2: 357}, 2040: {1: 294, 2: 357}, 2041: {1: 295, 2: 357}, 2042: {1: 296, 2: 357}, 2043: {1: 297, 2: 357}, 2044: {1: 298, 2: 357}, 2045: {1: 299, 2: 357}, 2046: {1: 300, 2: 357}, 2047: {1: 301, 2: 357}, 2048: {1: 302, 2: 357}, 2049: {1: 303, 2: 357}, 2050: {1: 304, 2: 357}, 2051: {1: 305, 2: 357}, 2052: {1: 306, 2: 357}, 2053: {1: 307, 2: 357}, 2054: {1: 308, 2: 357}, 2055: {1: 309, 2: 357}, 2056: {1: 310, 2: 357}, 2057: {1: 311, 2: 357}, 2058: {1: 312, 2: 357}, 2059: {1: 313, 2: 357}, 2060: {1: 314, 2: 357}, 2061: {1: 315, 2: 357}, 2062: {1: 316, 2: 357}, 2063: {1: 317, 2: 357}, 2064: {1: 318, 2: 357}, 2065: {1: 319, 2: 357}, 2066: {1: 320, 2: 357}, 2067: {1: 321, 2: 357}, 2068: {1: 322, 2: 357}, 2069: {1: 323, 2: 357}, 2070: {1: 324, 2: 357}, 2071: {1: 325, 2: 357}, 2072: {1: 326, 2: 357}, 2073: {1: 327, 2: 357}, 2074: {1: 328, 2: 357}, 2075: {1: 329, 2: 357}, 2076: {1: 330, 2: 357}, 2077: {1: 331, 2: 357}, 2078: {1: 332, 2: 357}, 2079: {1: 333, 2: 357}, 2080: {1: 334, 2: 357}, 2081: {1: 335, 2: 357}, 2082: {1: 336, 2: 357}, 2083: {1: 337, 2: 357}, 2084: {1: 338, 2: 357}, 2085: {1: 339, 2: 357}, 2086: {1: 340, 2: 357}, 2087: {1: 341, 2: 357}, 2088: {1: 342, 2: 357}, 2089: {1: 343, 2: 357}, 2090: {1: 344, 2: 357}, 2091: {1: 345, 2: 357}, 2092: {1: 346, 2: 357}, 2093: {1: 347, 2: 357}, 2094: {1: 348, 2: 357}, 2095: {1: 0, 2: 358}, 2096: {1: 1, 2: 358}, 2097: {1: 2, 2: 358}, 2098: {1: 3, 2: 358}, 2099: {1: 4, 2: 358}, 2100: {1: 5, 2: 358}, 2101: {1: 6, 2: 358}, 2102: {1: 7, 2: 358}, 2103: {1: 8, 2: 358}, 2104: {1: 9, 2: 358}, 2105: {1: 10, 2: 358}, 2106: {1: 11, 2: 358}, 2107: {1: 12, 2: 358}, 2108: {1: 13, 2: 358}, 2109: {1: 14, 2: 358}, 2110: {1: 15, 2: 358}, 2111: {1: 16, 2: 358}, 2112: {1: 17, 2: 358}, 2113: {1: 18, 2: 358}, 2114: {1: 19, 2: 358}, 2115: {1: 20, 2: 358}, 2116: {1: 21, 2: 358}, 2117: {1: 22, 2: 358}, 2118: {1: 23, 2: 358}, 2119: {1: 24, 2: 358}, 2120: {1: 25, 2: 358}, 2121: {1: 26, 2: 358}, 2122: {1: 27, 2: 358}, 2123: {1: 28, 2: 358}, 2124: {1: 29, 2: 358}, 2125: {1: 30, 2: 358}, 2126: {1: 31, 2: 358}, 2127: {1: 32, 2: 358}, 2128: {1: 33, 2: 358}, 2129: {1: 34, 2: 358}, 2130: {1: 35, 2: 358}, 2131: {1: 36, 2: 358}, 2132: {1: 37, 2: 358}, 2133: {1: 38, 2: 358}, 2134: {1: 39, 2: 358}, 2135: {1: 40, 2: 358}, 2136: {1: 41, 2: 358}, 2137: {1: 42, 2: 358}, 2138: {1: 43, 2: 358}, 2139: {1: 44, 2: 358}, 2140: {1: 45, 2: 358}, 2141: {1: 46, 2: 358}, 2142: {1: 47, 2: 358}, 2143: {1: 48, 2: 358}, 2144: {1: 49, 2: 358}, 2145: {1: 50, 2: 358}, 2146: {1: 51, 2: 358}, 2147: {1: 52, 2: 358}, 2148: {1: 53, 2: 358}, 2149: {1: 54, 2: 358}, 2150: {1: 55, 2: 358}, 2151: {1: 56, 2: 358}, 2152: {1: 57, 2: 358}, 2153: {1: 58, 2: 358}, 2154: {1: 59, 2: 358}, 2155: {1: 60, 2: 358}, 2156: {1: 61, 2: 358}, 2157: {1: 62, 2: 358}, 2158: {1: 63, 2: 358}, 2159: {1: 64, 2: 358}, 2160: {1: 65, 2: 358}, 2161: {1: 66, 2: 358}, 2162: {1: 67, 2: 358}, 2163: {1: 68, 2: 358}, 2164: {1: 69, 2: 358}, 2165: {1: 70, 2: 358}, 2166: {1: 71, 2: 358}, 2167: {1: 72, 2: 358}, 2168: {1: 73, 2: 358}, 2169: {1: 74, 2: 358}, 2170: {1: 75, 2: 358}, 2171: {1: 76, 2: 358}, 2172: {1: 77, 2: 358}, 2173: {1: 78, 2: 358}, 2174: {1: 79, 2: 358}, 2175: {1: 80, 2: 358}, 2176: {1: 81, 2: 358}, 2177: {1: 82, 2: 358}, 2178: {1: 83, 2: 358}, 2179: {1: 84, 2: 358}, 2180: {1: 85, 2: 358}, 2181: {1: 86, 2: 358}, 2182: {1: 87, 2: 358}, 2183: {1: 88, 2: 358}, 2184: {1: 89, 2: 358}, 2185: {1: 90, 2: 358}, 2186: {1: 91, 2: 358}, 2187: {1: 92, 2: 358}, 2188: {1: 93, 2: 358}, 2189: {1: 94, 2: 358}, 2190: {1: 95, 2: 358}, 2191: {1: 96, 2: 358}, 2192: {1: 97, 2: 358}, 2193: {1: 98, 2: 358}, 2194: {1: 99, 2: 358}, 2195: {1: 100, 2: 358}, 2196: {1: 101, 2: 358}, 2197: {1: 102, 2: 358}, 2198: {1: 103, 2: 358}, 2199: {1: 104, 2: 358}, 2200: {1: 105, 2: 358}, 2201: {1: 106, 2: 358}, 2202: {1: 107, 2: 358}, 2203: {1: 108, 2: 358}, 2204: {1: 109, 2: 358}, 2205: {1: 110, 2: 358}, 2206: {1: 111, 2: 358}, 2207: {1: 112, 2: 358}, 2208: {1: 113, 2: 358}, 2209: {1: 114, 2: 358}, 2210: {1: 115, 2: 358}, 2211: {1: 116, 2: 358}, 2212: {1: 117, 2: 358}, 2213: {1: 118, 2: 358}, 2214: {1: 119, 2: 358}, 2215: {1: 120, 2: 358}, 2216: {1: 121, 2: 358}, 2217: {1: 122, 2: 358}, 2218: {1: 123, 2: 358}, 2219: {1: 124, 2: 358}, 2220: {1: 125, 2: 358}, 2221: {1: 126, 2: 358}, 2222: {1: 127, 2: 358}, 2223: {1: 128, 2: 358}, 2224: {1: 129, 2: 358}, 2225: {1: 130, 2: 358}, 2226: {1: 131, 2: 358}, 2227: {1: 132, 2: 358}, 2228: {1: 133, 2: 358}, 2229: {1: 134, 2: 358}, 2230: {1: 135, 2: 358}, 2231: {1: 136, 2: 358}, 2232: {1: 137, 2: 358}, 2233: {1: 138, 2: 358}, 2234: {1: 139, 2: 358}, 2235: {1: 140, 2: 358}, 2236: {1: 141, 2: 358}, 2237: {1: 142, 2: 358}, 2238: {1: 143, 2: 358}, 2239: {1: 144, 2: 358}, 2240: {1: 145, 2: 358}, 2241: {1: 146, 2: 358}, 2242: {1: 147, 2: 358}, 2243: {1: 148, 2: 358}, 2244: {1: 149, 2: 358}, 2245: {1: 150, 2: 358}, 2246: {1: 151, 2: 358}, 2247: {1: 152, 2: 358}, 2248: {1: 153, 2: 358}, 2249: {1: 154, 2: 358}, 2250: {1: 155, 2: 358}, 2251: {1: 156, 2: 358}, 2252: {1: 157, 2: 358}, 2253: {1: 158, 2: 358}, 2254: {1: 159, 2: 358}, 2255: {1: 160, 2: 358}, 2256: {1: 161, 2: 358}, 2257: {1: 162, 2: 358}, 2258: {1: 163, 2: 358}, 2259: {1: 164, 2: 358}, 2260: {1: 165, 2: 358}, 2261: {1: 166, 2: 358}, 2262: {1: 167, 2: 358}, 2263: {1: 168, 2: 358}, 2264: {1: 169, 2: 358}, 2265: {1: 170, 2: 358}, 2266: {1: 171, 2: 358}, 2267: {1: 172, 2: 358}, 2268: {1: 173, 2: 358}, 2269: {1: 174, 2: 358}, 2270: {1: 175, 2: 358}, 2271: {1: 176, 2: 358}, 2272: {1: 177, 2: 358}, 2273: {1: 178, 2: 358}, 2274: {1: 179, 2: 358}, 2275: {1: 180, 2: 358}, 2276: {1: 181, 2: 358}, 2277: {1: 182, 2: 358}, 2278: {1: 183, 2: 358}, 2279: {1: 184, 2: 358}, 2280: {1: 185, 2: 358}, 2281: {1: 186, 2: 358}, 2282: {1: 187, 2: 358}, 2283: {1: 188, 2: 358}, 2284: {1: 189, 2: 358}, 2285: {1: 190, 2: 358}, 2286: {1: 191, 2: 358}, 2287: {1: 192, 2: 358}, 2288: {1: 193, 2: 358}, 2289: {1: 194, 2: 358}, 2290: {1: 195, 2: 358}, 2291: {1: 196, 2: 358}, 2292: {1: 197, 2: 358}, 2293: {1: 198, 2: 358}, 2294: {1: 199, 2: 358}, 2295: {1: 200, 2: 358}, 2296: {1: 201, 2: 358}, 2297: {1: 202, 2: 358}, 2298: {1: 203, 2: 358}, 2299: {1: 204, 2: 358}, 2300: {1: 205, 2: 358}, 2301: {1: 206, 2: 358}, 2302: {1: 207, 2: 358}, 2303: {1: 208, 2: 358}, 2304: {1: 209, 2: 358}, 2305: {1: 210, 2: 358}, 2306: {1: 211, 2: 358}, 2307: {1: 212, 2: 358}, 2308: {1: 213, 2: 358}, 2309: {1: 214, 2: 358}, 2310: {1: 215, 2: 358}, 2311: {1: 216, 2: 358}, 2312: {1: 217, 2: 358}, 2313: {1: 218, 2: 358}, 2314: {1: 219, 2: 358}, 2315: {1: 220, 2: 358}, 2316: {1: 221, 2: 358}, 2317: {1: 222, 2: 358}, 2318: {1: 223, 2: 358}, 2319: {1: 224, 2: 358}, 2320: {1: 225, 2: 358}, 2321: {1: 226, 2: 358}, 2322: {1: 227, 2: 358}, 2323: {1: 228, 2: 358}, 2324: {1: 229, 2: 358}, 2325: {1: 230, 2: 358}, 2326: {1: 231, 2: 358}, 2327: {1: 232, 2: 358}, 2328: {1: 233, 2: 358}, 2329: {1: 234, 2: 358}, 2330: {1: 235, 2: 358}, 2331: {1: 236, 2: 358}, 2332: {1: 237, 2: 358}, 2333: {1: 238, 2: 358}, 2334: {1: 239, 2: 358}, 2335: {1: 240, 2: 358}, 2336: {1: 241, 2: 358}, 2337: {1: 242, 2: 358}, 2338: {1: 243, 2: 358}, 2339: {1: 244, 2: 358}, 2340: {1: 245, 2: 358}, 2341: {1: 246, 2: 358}, 2342: {1: 247, 2: 358}, 2343: {1: 248, 2: 358}, 2344: {1: 249, 2: 358}, 2345: {1: 250, 2: 358}, 2346: {1: 251, 2: 358}, 2347: {1: 252, 2: 358}, 2348: {1: 253, 2: 358}, 2349: {1: 254, 2: 358}, 2350: {1: 255, 2: 358}, 2351: {1: 256, 2: 358}, 2352: {1: 257, 2: 358}, 2353: {1: 258, 2: 358}, 2354: {1: 259, 2: 358}, 2355: {1: 260, 2: 358}, 2356: {1: 261, 2: 358}, 2357: {1: 262, 2: 358}, 2358: {1: 263, 2: 358}, 2359: {1: 264, 2: 358}, 2360: {1: 265, 2: 358}, 2361: {1: 266, 2: 358}, 2362: {1: 267, 2: 358}, 2363: {1: 268, 2: 358}, 2364: {1: 269, 2: 358}, 2365: {1: 270, 2: 358}, 2366: {1: 271, 2: 358}, 2367: {1: 272, 2: 358}, 2368: {1: 273, 2: 358}, 2369: {1: 274, 2: 358}, 2370: {1: 275, 2: 358}, 2371: {1: 276, 2: 358}, 2372: {1: 277, 2: 358}, 2373: {1: 278, 2: 358}, 2374: {1: 279, 2: 358}, 2375: {1: 280, 2: 358}, 2376: {1: 281, 2: 358}, 2377: {1: 282, 2: 358}, 2378: {1: 283, 2: 358}, 2379: {1: 284, 2: 358}, 2380: {1: 285, 2: 358}, 2381: {1: 286, 2: 358}, 2382: {1: 287, 2: 358}, 2383: {1: 288, 2: 358}, 2384: {1: 289, 2: 358}, 2385: {1: 290, 2: 358}, 2386: {1: 291, 2: 358}, 2387: {1: 292, 2: 358}, 2388: {1: 293, 2: 358}, 2389: {1: 294, 2: 358}, 2390: {1: 295, 2: 358}, 2391: {1: 296, 2: 358}, 2392: {1: 297, 2: 358}, 2393: {1: 298, 2: 358}, 2394: {1: 299, 2: 358}, 2395: {1: 300, 2: 358}, 2396: {1: 301, 2: 358}, 2397: {1: 302, 2: 358}, 2398: {1: 303, 2: 358}, 2399: {1: 304, 2: 358}, 2400: {1: 305, 2: 358}, 2401: {1: 306, 2: 358}, 2402: {1: 307, 2: 358}, 2403: {1: 308, 2: 358}, 2404: {1: 309, 2: 358}, 2405: {1: 310, 2: 358}, 2406: {1: 311, 2: 358}, 2407: {1: 312, 2: 358}, 2408: {1: 313, 2: 358}, 2409: {1: 314, 2: 358}, 2410: {1: 315, 2: 358}, 2411: {1: 316, 2: 358}, 2412: {1: 317, 2: 358}, 2413: {1: 318, 2: 358}, 2414: {1: 319, 2: 358}, 2415: {1: 320, 2: 358}, 2416: {1: 321, 2: 358}, 2417: {1: 322, 2: 358}, 2418: {1: 323, 2: 358}, 2419: {1: 324, 2: 358}, 2420: {1: 325, 2: 358}, 2421: {1: 326, 2: 358}, 2422: {1: 327, 2: 358}, 2423: {1: 328, 2: 358}, 2424: {1: 329, 2: 358}, 2425: {1: 330, 2: 358}, 2426: {1: 331, 2: 358}, 2427: {1: 332, 2: 358}, 2428: {1: 333, 2: 358}, 2429: {1: 334, 2: 358}, 2430: {1: 335, 2: 358}, 2431: {1: 336, 2: 358}, 2432: {1: 337, 2: 358}, 2433: {1: 338, 2: 358}, 2434: {1: 339, 2: 358}, 2435: {1: 340, 2: 358}, 2436: {1: 341, 2: 358}, 2437: {1: 342, 2: 358}, 2438: {1: 343, 2: 358}, 2439: {1: 344, 2: 358}, 2440: {1: 345, 2: 358}, 2441: {1: 346, 2: 358}, 2442: {1: 347, 2: 358}, 2443: {1: 348, 2: 358}, 2444: {1: 0, 2: 349}, 2445: {1: 1, 2: 349}, 2446: {1: 2, 2: 349}, 2447: {1: 3, 2: 349}, 2448: {1: 4, 2: 349}, 2449: {1: 5, 2: 349}, 2450: {1: 6, 2: 349}, 2451: {1: 7, 2: 349}, 2452: {1: 8, 2: 349}, 2453: {1: 9, 2: 349}, 2454: {1: 10, 2: 349}, 2455: {1: 11, 2: 349}, 2456: {1: 12, 2: 349}, 2457: {1: 13, 2: 349}, 2458: {1: 14, 2: 349}, 2459: {1: 15, 2: 349}, 2460: {1: 16, 2: 349}, 2461: {1: 17, 2: 349}, 2462: {1: 18, 2: 349}, 2463: {1: 19, 2: 349}, 2464: {1: 20, 2: 349}, 2465: {1: 21, 2: 349}, 2466: {1: 22, 2: 349}, 2467: {1: 23, 2: 349}, 2468: {1: 24, 2: 349}, 2469: {1: 25, 2: 349}, 2470: {1: 26, 2: 349}, 2471: {1: 27, 2: 349}, 2472: {1: 28, 2: 349}, 2473: {1: 29, 2: 349}, 2474: {1: 30, 2: 349}, 2475: {1: 31, 2: 349}, 2476: {1: 32, 2: 349}, 2477: {1: 33, 2: 349}, 2478: {1: 34, 2: 349}, 2479: {1: 35, 2: 349}, 2480: {1: 36, 2: 349}, 2481: {1: 37, 2: 349}, 2482: {1: 38, 2: 349}, 2483: {1: 39, 2: 349}, 2484: {1: 40, 2: 349}, 2485: {1: 41, 2: 349}, 2486: {1: 42, 2: 349}, 2487: {1: 43, 2: 349}, 2488: {1: 44, 2: 349}, 2489: {1: 45, 2: 349}, 2490: {1: 46, 2: 349}, 2491: {1: 47, 2: 349}, 2492: {1: 48, 2: 349}, 2493: {1: 49, 2: 349}, 2494: {1: 50, 2: 349}, 2495: {1: 51, 2: 349}, 2496: {1: 52, 2: 349}, 2497: {1: 53, 2: 349}, 2498: {1: 54, 2: 349}, 2499: {1: 55, 2: 349}, 2500: {1: 56, 2: 349}, 2501: {1: 57, 2: 349}, 2502: {1: 58, 2: 349}, 2503: {1: 59, 2: 349}, 2504: {1: 60, 2: 349}, 2505: {1: 61, 2: 349}, 2506: {1: 62, 2: 349}, 2507: {1: 63, 2: 349}, 2508: {1: 64, 2: 349}, 2509: {1: 65, 2: 349}, 2510: {1: 66, 2: 349}, 2511: {1: 67, 2: 349}, 2512: {1: 68, 2: 349}, 2513: {1: 69, 2: 349}, 2514: {1: 70, 2: 349}, 2515: {1: 71, 2: 349}, 2516: {1: 72, 2: 349}, 2517: {1: 73, 2: 349}, 2518: {1: 74, 2: 349}, 2519: {1: 75, 2: 349}, 2520: {1: 76, 2: 349}, 2521: {1: 77, 2: 349}, 2522: {1: 78, 2: 349}, 2523: {1: 79, 2: 349}, 2524: {1: 80, 2: 349}, 2525: {1: 81, 2: 349}, 2526: {1: 82, 2: 349}, 2527: {1: 83, 2: 349}, 2528: {1: 84, 2: 349}, 2529: {1: 85, 2: 349}, 2530: {1: 86, 2: 349}, 2531: {1: 87, 2: 349}, 2532: {1: 88, 2: 349}, 2533: {1: 89, 2: 349}, 2534: {1: 90, 2: 349}, 2535: {1: 91, 2: 349}, 2536: {1: 92, 2: 349}, 2537: {1: 93, 2: 349}, 2538: {1: 94, 2: 349}, 2539: {1: 95, 2: 349}, 2540: {1: 96, 2: 349}, 2541: {1: 97, 2: 349}, 2542: {1: 98, 2: 349}, 2543: {1: 99, 2: 349}, 2544: {1: 100, 2: 349}, 2545: {1: 101, 2: 349}, 2546: {1: 102, 2: 349}, 2547: {1: 103, 2: 349}, 2548: {1: 104, 2: 349}, 2549: {1: 105, 2: 349}, 2550: {1: 106, 2: 349}, 2551: {1: 107, 2: 349}, 2552: {1: 108, 2: 349}, 2553: {1: 109, 2: 349}, 2554: {1: 110, 2: 349}, 2555: {1: 111, 2: 349}, 2556: {1: 112, 2: 349}, 2557: {1: 113, 2: 349}, 2558: {1: 114, 2: 349}, 2559: {1: 115, 2: 349}, 2560: {1: 116, 2: 349}, 2561: {1: 117, 2: 349}, 2562: {1: 118, 2: 349}, 2563: {1: 119, 2: 349}, 2564: {1: 120, 2: 349}, 2565: {1: 121, 2: 349}, 2566: {1: 122, 2: 349}, 2567: {1: 123, 2: 349}, 2568: {1: 124, 2: 349}, 2569: {1: 125, 2: 349}, 2570: {1: 126, 2: 349}, 2571: {1: 127, 2: 349}, 2572: {1: 128, 2: 349}, 2573: {1: 129, 2: 349}, 2574: {1: 130, 2: 349}, 2575: {1: 131, 2: 349}, 2576: {1: 132, 2: 349}, 2577: {1: 133, 2: 349}, 2578: {1: 134, 2: 349}, 2579: {1: 135, 2: 349}, 2580: {1: 136, 2: 349}, 2581: {1: 137, 2: 349}, 2582: {1: 138, 2: 349}, 2583: {1: 139, 2: 349}, 2584: {1: 140, 2: 349}, 2585: {1: 141, 2: 349}, 2586: {1: 142, 2: 349}, 2587: {1: 143, 2: 349}, 2588: {1: 144, 2: 349}, 2589: {1: 145, 2: 349}, 2590: {1: 146, 2: 349}, 2591: {1: 147, 2: 349}, 2592: {1: 148, 2: 349}, 2593: {1: 149, 2: 349}, 2594: {1: 150, 2: 349}, 2595: {1: 151, 2: 349}, 2596: {1: 152, 2: 349}, 2597: {1: 153, 2: 349}, 2598: {1: 154, 2: 349}, 2599: {1: 155, 2: 349}, 2600: {1: 156, 2: 349}, 2601: {1: 157, 2: 349}, 2602: {1: 158, 2: 349}, 2603: {1: 159, 2: 349}, 2604: {1: 160, 2: 349}, 2605: {1: 161, 2: 349}, 2606: {1: 162, 2: 349}, 2607: {1: 163, 2: 349}, 2608: {1: 164, 2: 349}, 2609: {1: 165, 2: 349}, 2610: {1: 166, 2: 349}, 2611: {1: 167, 2: 349}, 2612: {1: 168, 2: 349}, 2613: {1: 169, 2: 349}, 2614: {1: 170, 2: 349}, 2615: {1: 171, 2: 349}, 2616: {1: 172, 2: 349}, 2617: {1: 173, 2: 349}, 2618: {1: 174, 2: 349}, 2619: {1: 175, 2: 349}, 2620: {1: 176, 2: 349}, 2621: {1: 177, 2: 349}, 2622: {1: 178, 2: 349}, 2623: {1: 179, 2: 349}, 2624: {1: 180, 2: 349}, 2625: {1: 181, 2: 349}, 2626: {1: 182, 2: 349}, 2627: {1: 183, 2: 349}, 2628: {1: 184, 2: 349}, 2629: {1: 185, 2: 349}, 2630: {1: 186, 2: 349}, 2631: {1: 187, 2: 349}, 2632: {1: 188, 2: 349}, 2633: {1: 189, 2: 349}, 2634: {1: 190, 2: 349}, 2635: {1: 191, 2: 349}, 2636: {1: 192, 2: 349}, 2637: {1: 193, 2: 349}, 2638: {1: 194, 2: 349}, 2639: {1: 195, 2: 349}, 2640: {1: 196, 2: 349}, 2641: {1: 197, 2: 349}, 2642: {1: 198, 2: 349}, 2643: {1: 199, 2: 349}, 2644: {1: 200, 2: 349}, 2645: {1: 201, 2: 349}, 2646: {1: 202, 2: 349}, 2647: {1: 203, 2: 349}, 2648: {1: 204, 2: 349}, 2649: {1: 205, 2: 349}, 2650: {1: 206, 2: 349}, 2651: {1: 207, 2: 349}, 2652: {1: 208, 2: 349}, 2653: {1: 209, 2: 349}, 2654: {1: 210, 2: 349}, 2655: {1: 211, 2: 349}, 2656: {1: 212, 2: 349}, 2657: {1: 213, 2: 349}, 2658: {1: 214, 2: 349}, 2659: {1: 215, 2: 349}, 2660: {1: 216, 2: 349}, 2661: {1: 217, 2: 349}, 2662: {1: 218, 2: 349}, 2663: {1: 219, 2: 349}, 2664: {1: 220, 2: 349}, 2665: {1: 221, 2: 349}, 2666: {1: 222, 2: 349}, 2667: {1: 223, 2: 349}, 2668: {1: 224, 2: 349}, 2669: {1: 225, 2: 349}, 2670: {1: 226, 2: 349}, 2671: {1: 227, 2: 349}, 2672: {1: 228, 2: 349}, 2673: {1: 229, 2: 349}, 2674: {1: 230, 2: 349}, 2675: {1: 231, 2: 349}, 2676: {1: 232, 2: 349}, 2677: {1: 233, 2: 349}, 2678: {1: 234, 2: 349}, 2679: {1: 235, 2: 349}, 2680: {1: 236, 2: 349}, 2681: {1: 237, 2: 349}, 2682: {1: 238, 2: 349}, 2683: {1: 239, 2: 349}, 2684: {1: 240, 2: 349}, 2685: {1: 241, 2: 349}, 2686: {1: 242, 2: 349}, 2687: {1: 243, 2: 349}, 2688: {1: 244, 2: 349}, 2689: {1: 245, 2: 349}, 2690: {1: 246, 2: 349}, 2691: {1: 247, 2: 349}, 2692: {1: 248, 2: 349}, 2693: {1: 249, 2: 349}, 2694: {1: 250, 2: 349}, 2695: {1: 251, 2: 349}, 2696: {1: 252, 2: 349}, 2697: {1: 253, 2: 349}, 2698: {1: 254, 2: 349}, 2699: {1: 255, 2: 349}, 2700: {1: 256, 2: 349}, 2701: {1: 257, 2: 349}, 2702: {1: 258, 2: 349}, 2703: {1: 259, 2: 349}, 2704: {1: 260, 2: 349}, 2705: {1: 261, 2: 349}, 2706: {1: 262, 2: 349}, 2707: {1: 263, 2: 349}, 2708: {1: 264, 2: 349}, 2709: {1: 265, 2: 349}, 2710: {1: 266, 2: 349}, 2711: {1: 267, 2: 349}, 2712: {1: 268, 2: 349}, 2713: {1: 269, 2: 349}, 2714: {1: 270, 2: 349}, 2715: {1: 271, 2: 349}, 2716: {1: 272, 2: 349}, 2717: {1: 273, 2: 349}, 2718: {1: 274, 2: 349}, 2719: {1: 275, 2: 349}, 2720: {1: 276, 2: 349}, 2721: {1: 277, 2: 349}, 2722: {1: 278, 2: 349}, 2723: {1: 279, 2: 349}, 2724: {1: 280, 2: 349}, 2725: {1: 281, 2: 349}, 2726: {1: 282, 2: 349}, 2727: {1: 283, 2: 349}, 2728: {1: 284, 2: 349}, 2729: {1: 285, 2: 349}, 2730: {1: 286, 2: 349}, 2731: {1: 287, 2: 349}, 2732: {1: 288, 2: 349}, 2733: {1: 289, 2: 349}, 2734: {1: 290, 2: 349}, 2735: {1: 291, 2: 349}, 2736: {1: 292, 2: 349}, 2737: {1: 293, 2: 349}, 2738: {1: 294, 2: 349}, 2739: {1: 295, 2: 349}, 2740: {1: 296, 2: 349}, 2741: {1: 297, 2: 349}, 2742: {1: 298, 2: 349}, 2743: {1: 299, 2: 349}, 2744: {1: 300, 2: 349}, 2745: {1: 301, 2: 349}, 2746: {1: 302, 2: 349}, 2747: {1: 303, 2: 349}, 2748: {1: 304, 2: 349}, 2749: {1: 305, 2: 349}, 2750: {1: 306, 2: 349}, 2751: {1: 307, 2: 349}, 2752: {1: 308, 2: 349}, 2753: {1: 309, 2: 349}, 2754: {1: 310, 2: 349}, 2755: {1: 311, 2: 349}, 2756: {1: 312, 2: 349}, 2757: {1: 313, 2: 349}, 2758: {1: 314, 2: 349}, 2759: {1: 315, 2: 349}, 2760: {1: 316, 2: 349}, 2761: {1: 317, 2: 349}, 2762: {1: 318, 2: 349}, 2763: {1: 319, 2: 349}, 2764: {1: 320, 2: 349}, 2765: {1: 321, 2: 349}, 2766: {1: 322, 2: 349}, 2767: {1: 323, 2: 349}, 2768: {1: 324, 2: 349}, 2769: {1: 325, 2: 349}, 2770: {1: 326, 2: 349}, 2771: {1: 327, 2: 349}, 2772: {1: 328, 2: 349}, 2773: {1: 329, 2: 349}, 2774: {1: 330, 2: 349}, 2775: {1: 331, 2: 349}, 2776: {1: 332, 2: 349}, 2777: {1: 333, 2: 349}, 2778: {1: 334, 2: 349}, 2779: {1: 335, 2: 349}, 2780: {1: 336, 2: 349}, 2781: {1: 337, 2: 349}, 2782: {1: 338, 2: 349}, 2783: {1: 339, 2: 349}, 2784: {1: 340, 2: 349}, 2785: {1: 341, 2: 349}, 2786: {1: 342, 2: 349}, 2787: {1: 343, 2: 349}, 2788: {1: 344, 2: 349}, 2789: {1: 345, 2: 349}, 2790: {1: 346, 2: 349}, 2791: {1: 347, 2: 349}, 2792: {1: 348, 2: 349}, 2793: {1: 0, 2: 350}, 2794: {1: 1, 2: 350}, 2795: {1: 2, 2: 350}, 2796: {1: 3, 2: 350}, 2797: {1: 4, 2: 350}, 2798: {1: 5, 2: 350}, 2799: {1: 6, 2: 350}, 2800: {1: 7, 2: 350}, 2801: {1: 8, 2: 350}, 2802: {1: 9, 2: 350}, 2803: {1: 10, 2: 350}, 2804: {1: 11, 2: 350}, 2805: {1: 12, 2: 350}, 2806: {1: 13, 2: 350}, 2807: {1: 14, 2: 350}, 2808: {1: 15, 2: 350}, 2809: {1: 16, 2: 350}, 2810: {1: 17, 2: 350}, 2811: {1: 18, 2: 350}, 2812: {1: 19, 2: 350}, 2813: {1: 20, 2: 350}, 2814: {1: 21, 2: 350}, 2815: {1: 22, 2: 350}, 2816: {1: 23, 2: 350}, 2817: {1: 24, 2: 350}, 2818: {1: 25, 2: 350}, 2819: {1: 26, 2: 350}, 2820: {1: 27, 2: 350}, 2821: {1: 28, 2: 350}, 2822: {1: 29, 2: 350}, 2823: {1: 30, 2: 350}, 2824: {1: 31, 2: 350}, 2825: {1: 32, 2: 350}, 2826: {1: 33, 2: 350}, 2827: {1: 34, 2: 350}, 2828: {1: 35, 2: 350}, 2829: {1: 36, 2: 350}, 2830: {1: 37, 2: 350}, 2831: {1: 38, 2: 350}, 2832: {1: 39, 2: 350}, 2833: {1: 40, 2: 350}, 2834: {1: 41, 2: 350}, 2835: {1: 42, 2: 350}, 2836: {1: 43, 2: 350}, 2837: {1: 44, 2: 350}, 2838: {1: 45, 2: 350}, 2839: {1: 46, 2: 350}, 2840: {1: 47, 2: 350}, 2841: {1: 48, 2: 350}, 2842: {1: 49, 2: 350}, 2843: {1: 50, 2: 350}, 2844: {1: 51, 2: 350}, 2845: {1: 52, 2: 350}, 2846: {1: 53, 2: 350}, 2847: {1: 54, 2: 350}, 2848: {1: 55, 2: 350}, 2849: {1: 56, 2: 350}, 2850: {1: 57, 2: 350}, 2851: {1: 58, 2: 350}, 2852: {1: 59, 2: 350}, 2853: {1: 60, 2: 350}, 2854: {1: 61, 2: 350}, 2855: {1: 62, 2: 350}, 2856: {1: 63, 2: 350}, 2857: {1: 64, 2: 350}, 2858: {1: 65, 2: 350}, 2859: {1: 66, 2: 350}, 2860: {1: 67, 2: 350}, 2861: {1: 68, 2: 350}, 2862: {1: 69, 2: 350}, 2863: {1: 70, 2: 350}, 2864: {1: 71, 2: 350}, 2865: {1: 72, 2: 350}, 2866: {1: 73, 2: 350}, 2867: {1: 74, 2: 350}, 2868: {1: 75, 2: 350}, 2869: {1: 76, 2: 350}, 2870: {1: 77, 2: 350}, 2871: {1: 78, 2: 350}, 2872: {1: 79, 2: 350}, 2873: {1: 80, 2: 350}, 2874: {1: 81, 2: 350}, 2875: {1: 82, 2: 350}, 2876: {1: 83, 2: 350}, 2877: {1: 84, 2: 350}, 2878: {1: 85, 2: 350}, 2879: {1: 86, 2: 350}, 2880: {1: 87, 2: 350}, 2881: {1: 88, 2: 350}, 2882: {1: 89, 2: 350}, 2883: {1: 90, 2: 350}, 2884: {1: 91, 2: 350}, 2885: {1: 92, 2: 350}, 2886: {1: 93, 2: 350}, 2887: {1: 94, 2: 350}, 2888: {1: 95, 2: 350}, 2889: {1: 96, 2: 350}, 2890: {1: 97, 2: 350}, 2891: {1: 98, 2: 350}, 2892: {1: 99, 2: 350}, 2893: {1: 100, 2: 350}, 2894: {1: 101, 2: 350}, 2895: {1: 102, 2: 350}, 2896: {1: 103, 2: 350}, 2897: {1: 104, 2: 350}, 2898: {1: 105, 2: 350}, 2899: {1: 106, 2: 350}, 2900: {1: 107, 2: 350}, 2901: {1: 108, 2: 350}, 2902: {1: 109, 2: 350}, 2903: {1: 110, 2: 350}, 2904: {1: 111, 2: 350}, 2905: {1: 112, 2: 350}, 2906: {1: 113, 2: 350}, 2907: {1: 114, 2: 350}, 2908: {1: 115, 2: 350}, 2909: {1: 116, 2: 350}, 2910: {1: 117, 2: 350}, 2911: {1: 118, 2: 350}, 2912: {1: 119, 2: 350}, 2913: {1: 120, 2: 350}, 2914: {1: 121, 2: 350}, 2915: {1: 122, 2: 350}, 2916: {1: 123, 2: 350}, 2917: {1: 124, 2: 350}, 2918: {1: 125, 2: 350}, 2919: {1: 126, 2: 350}, 2920: {1: 127, 2: 350}, 2921: {1: 128, 2: 350}, 2922: {1: 129, 2: 350}, 2923: {1: 130, 2: 350}, 2924: {1: 131, 2: 350}, 2925: {1: 132, 2: 350}, 2926: {1: 133, 2: 350}, 2927: {1: 134, 2: 350}, 2928: {1: 135, 2: 350}, 2929: {1: 136, 2: 350}, 2930: {1: 137, 2: 350}, 2931: {1: 138, 2: 350}, 2932: {1: 139, 2: 350}, 2933: {1: 140, 2: 350}, 2934: {1: 141, 2: 350}, 2935: {1: 142, 2: 350}, 2936: {1: 143, 2: 350}, 2937: {1: 144, 2: 350}, 2938: {1: 145, 2: 350}, 2939: {1: 146, 2: 350}, 2940: {1: 147, 2: 350}, 2941: {1: 148, 2: 350}, 2942: {1: 149, 2: 350}, 2943: {1: 150, 2: 350}, 2944: {1: 151, 2: 350}, 2945: {1: 152, 2: 350}, 2946: {1: 153, 2: 350}, 2947: {1: 154, 2: 350}, 2948: {1: 155, 2: 350}, 2949: {1: 156, 2: 350}, 2950: {1: 157, 2: 350}, 2951: {1: 158, 2: 350}, 2952: {1: 159, 2: 350}, 2953: {1: 160, 2: 350}, 2954: {1: 161, 2: 350}, 2955: {1: 162, 2: 350}, 2956: {1: 163, 2: 350}, 2957: {1: 164, 2: 350}, 2958: {1: 165, 2: 350}, 2959: {1: 166, 2: 350}, 2960: {1: 167, 2: 350}, 2961: {1: 168, 2: 350}, 2962: {1: 169, 2: 350}, 2963: {1: 170, 2: 350}, 2964: {1: 171, 2: 350}, 2965: {1: 172, 2: 350}, 2966: {1: 173, 2: 350}, 2967: {1: 174, 2: 350}, 2968: {1: 175, 2: 350}, 2969: {1: 176, 2: 350}, 2970: {1: 177, 2: 350}, 2971: {1: 178, 2: 350}, 2972: {1: 179, 2: 350}, 2973: {1: 180, 2: 350}, 2974: {1: 181, 2: 350}, 2975: {1: 182, 2: 350}, 2976: {1: 183, 2: 350}, 2977: {1: 184, 2: 350}, 2978: {1: 185, 2: 350}, 2979: {1: 186, 2: 350}, 2980: {1: 187, 2: 350}, 2981: {1: 188, 2: 350}, 2982: {1: 189, 2: 350}, 2983: {1: 190, 2: 350}, 2984: {1: 191, 2: 350}, 2985: {1: 192, 2: 350}, 2986: {1: 193, 2: 350}, 2987: {1: 194, 2: 350}, 2988: {1: 195, 2: 350}, 2989: {1: 196, 2: 350}, 2990: {1: 197, 2: 350}, 2991: {1: 198, 2: 350}, 2992: {1: 199, 2: 350}, 2993: {1: 200, 2: 350}, 2994: {1: 201, 2: 350}, 2995: {1: 202, 2: 350}, 2996: {1: 203, 2: 350}, 2997: {1: 204, 2: 350}, 2998: {1: 205, 2: 350}, 2999: {1: 206, 2: 350}, 3000: {1: 207, 2: 350}, 3001: {1: 208, 2: 350}, 3002: {1: 209, 2: 350}, 3003: {1: 210, 2: 350}, 3004: {1: 211, 2: 350}, 3005: {1: 212, 2: 350}, 3006: {1: 213, 2: 350}, 3007: {1: 214, 2: 350}, 3008: {1: 215, 2: 350}, 3009: {1: 216, 2: 350}, 3010: {1: 217, 2: 350}, 3011: {1: 218, 2: 350}, 3012: {1: 219, 2: 350}, 3013: {1: 220, 2: 350}, 3014: {1: 221, 2: 350}, 3015: {1: 222, 2: 350}, 3016: {1: 223, 2: 350}, 3017: {1: 224, 2: 350}, 3018: {1: 225, 2: 350}, 3019: {1: 226, 2: 350}, 3020: {1: 227, 2: 350}, 3021: {1: 228, 2: 350}, 3022: {1: 229, 2: 350}, 3023: {1: 230, 2: 350}, 3024: {1: 231, 2: 350}, 3025: {1: 232, 2: 350}, 3026: {1: 233, 2: 350}, 3027: {1: 234, 2: 350}, 3028: {1: 235, 2: 350}, 3029: {1: 236, 2: 350}, 3030: {1: 237, 2: 350}, 3031: {1: 238, 2: 350}, 3032: {1: 239, 2: 350}, 3033: {1: 240, 2: 350}, 3034: {1: 241, 2: 350}, 3035: {1: 242, 2: 350}, 3036: {1: 243, 2: 350}, 3037: {1: 244, 2: 350}, 3038: {1: 245, 2: 350}, 3039: {1: 246, 2: 350}, 3040: {1: 247, 2: 350}, 3041: {1: 248, 2: 350}, 3042: {1: 249, 2: 350}, 3043: {1: 250, 2: 350}, 3044: {1: 251, 2: 350}, 3045: {1: 252, 2: 350}, 3046: {1: 253, 2: 350}, 3047: {1: 254, 2: 350}, 3048: {1: 255, 2: 350}, 3049: {1: 256, 2: 350}, 3050: {1: 257, 2: 350}, 3051: {1: 258, 2: 350}, 3052: {1: 259, 2: 350}, 3053: {1: 260, 2: 350}, 3054: {1: 261, 2: 350}, 3055: {1: 262, 2: 350}, 3056: {1: 263, 2: 350}, 3057: {1: 264, 2: 350}, 3058: {1: 265, 2: 350}, 3059: {1: 266, 2: 350}, 3060: {1: 267, 2: 350}, 3061: {1: 268, 2: 350}, 3062: {1: 269, 2: 350}, 3063: {1: 270, 2: 350}, 3064: {1: 271, 2: 350}, 3065: {1: 272, 2: 350}, 3066: {1: 273, 2: 350}, 3067: {1: 274, 2: 350}, 3068: {1: 275, 2: 350}, 3069: {1: 276, 2: 350}, 3070: {1: 277, 2: 350}, 3071: {1: 278, 2: 350}, 3072: {1: 279, 2: 350}, 3073: {1: 280, 2: 350}, 3074: {1: 281, 2: 350}, 3075: {1: 282, 2: 350}, 3076: {1: 283, 2: 350}, 3077: {1: 284, 2: 350}, 3078: {1: 285, 2: 350}, 3079: {1: 286, 2: 350}, 3080: {1: 287, 2: 350}, 3081: {1: 288, 2: 350}, 3082: {1: 289, 2: 350}, 3083: {1: 290, 2: 350}, 3084: {1: 291, 2: 350}, 3085: {1: 292, 2: 350}, 3086: {1: 293, 2: 350}, 3087: {1: 294, 2: 350}, 3088: {1: 295, 2: 350}, 3089: {1: 296, 2: 350}, 3090: {1: 297, 2: 350}, 3091: {1: 298, 2: 350}, 3092: {1: 299, 2: 350}, 3093: {1: 300, 2: 350}, 3094: {1: 301, 2: 350}, 3095: {1: 302, 2: 350}, 3096: {1: 303, 2: 350}, 3097: {1: 304, 2: 350}, 3098: {1: 305, 2: 350}, 3099: {1: 306, 2: 350}, 3100: {1: 307, 2: 350}, 3101: {1: 308, 2: 350}, 3102: {1: 309, 2: 350}, 3103: {1: 310, 2: 350}, 3104: {1: 311, 2: 350}, 3105: {1: 312, 2: 350}, 3106: {1: 313, 2: 350}, 3107: {1: 314, 2: 350}, 3108: {1: 315, 2: 350}, 3109: {1: 316, 2: 350}, 3110: {1: 317, 2: 350}, 3111: {1: 318, 2: 350}, 3112: {1: 319, 2: 350}, 3113: {1: 320, 2: 350}, 3114: {1: 321, 2: 350}, 3115: {1: 322, 2: 350}, 3116: {1: 323, 2: 350}, 3117: {1: 324, 2: 350}, 3118: {1: 325, 2: 350}, 3119: {1: 326, 2: 350}, 3120: {1: 327, 2: 350}, 3121: {1: 328, 2: 350}, 3122: {1: 329, 2: 350}, 3123: {1: 330, 2: 350}, 3124: {1: 331, 2: 350}, 3125: {1: 332, 2: 350}, 3126: {1: 333, 2: 350}, 3127: {1: 334, 2: 350}, 3128: {1: 335, 2: 350}, 3129: {1: 336, 2: 350}, 3130: {1: 337, 2: 350}, 3131: {1: 338, 2: 350}, 3132: {1: 339, 2: 350}, 3133: {1: 340, 2: 350}, 3134: {1: 341, 2: 350}, 3135: {1: 342, 2: 350}, 3136: {1: 343, 2: 350}, 3137: {1: 344, 2: 350}, 3138: {1: 345, 2: 350}, 3139: {1: 346, 2: 350}, 3140: {1: 347, 2: 350}, 3141: {1: 348, 2: 350}, 3142: {1: 0, 2: 351}, 3143: {1: 1, 2: 351}, 3144: {1: 2, 2: 351}, 3145: {1: 3, 2: 351}, 3146: {1: 4, 2: 351}, 3147: {1: 5, 2: 351}, 3148: {1: 6, 2: 351}, 3149: {1: 7, 2: 351}, 3150: {1: 8, 2: 351}, 3151: {1: 9, 2: 351}, 3152: {1: 10, 2: 351}, 3153: {1: 11, 2: 351}, 3154: {1: 12, 2: 351}, 3155: {1: 13, 2: 351}, 3156: {1: 14, 2: 351}, 3157: {1: 15, 2: 351}, 3158: {1: 16, 2: 351}, 3159: {1: 17, 2: 351}, 3160: {1: 18, 2: 351}, 3161: {1: 19, 2: 351}, 3162: {1: 20, 2: 351}, 3163: {1: 21, 2: 351}, 3164: {1: 22, 2: 351}, 3165: {1: 23, 2: 351}, 3166: {1: 24, 2: 351}, 3167: {1: 25, 2: 351}, 3168: {1: 26, 2: 351}, 3169: {1: 27, 2: 351}, 3170: {1: 28, 2: 351}, 3171: {1: 29, 2: 351}, 3172: {1: 30, 2: 351}, 3173: {1: 31, 2: 351}, 3174: {1: 32, 2: 351}, 3175: {1: 33, 2: 351}, 3176: {1: 34, 2: 351}, 3177: {1: 35, 2: 351}, 3178: {1: 36, 2: 351}, 3179: {1: 37, 2: 351}, 3180: {1: 38, 2: 351}, 3181: {1: 39, 2: 351}, 3182: {1: 40, 2: 351}, 3183: {1: 41, 2: 351}, 3184: {1: 42, 2: 351}, 3185: {1: 43, 2: 351}, 3186: {1: 44, 2: 351}, 3187: {1: 45, 2: 351}, 3188: {1: 46, 2: 351}, 3189: {1: 47, 2: 351}, 3190: {1: 48, 2: 351}, 3191: {1: 49, 2: 351}, 3192: {1: 50, 2: 351}, 3193: {1: 51, 2: 351}, 3194: {1: 52, 2: 351}, 3195: {1: 53, 2: 351}, 3196: {1: 54, 2: 351}, 3197: {1: 55, 2: 351}, 3198: {1: 56, 2: 351}, 3199: {1: 57, 2: 351}, 3200: {1: 58, 2: 351}, 3201: {1: 59, 2: 351}, 3202: {1: 60, 2: 351}, 3203: {1: 61, 2: 351}, 3204: {1: 62, 2: 351}, 3205: {1: 63, 2: 351}, 3206: {1: 64, 2: 351}, 3207: {1: 65, 2: 351}, 3208: {1: 66, 2: 351}, 3209: {1: 67, 2: 351}, 3210: {1: 68, 2: 351}, 3211: {1: 69, 2: 351}, 3212: {1: 70, 2: 351}, 3213: {1: 71, 2: 351}, 3214: {1: 72, 2: 351}, 3215: {1: 73, 2: 351}, 3216: {1: 74, 2: 351}, 3217: {1: 75, 2: 351}, 3218: {1: 76, 2: 351}, 3219: {1: 77, 2: 351}, 3220: {1: 78, 2: 351}, 3221: {1: 79, 2: 351}, 3222: {1: 80, 2: 351}, 3223: {1: 81, 2: 351}, 3224: {1: 82, 2: 351}, 3225: {1: 83, 2: 351}, 3226: {1: 84, 2: 351}, 3227: {1: 85, 2: 351}, 3228: {1: 86, 2: 351}, 3229: {1: 87, 2: 351}, 3230: {1: 88, 2: 351}, 3231: {1: 89, 2: 351}, 3232: {1: 90, 2: 351}, 3233: {1: 91, 2: 351}, 3234: {1: 92, 2: 351}, 3235: {1: 93, 2: 351}, 3236: {1: 94, 2: 351}, 3237: {1: 95, 2: 351}, 3238: {1: 96, 2: 351}, 3239: {1: 97, 2: 351}, 3240: {1: 98, 2: 351}, 3241: {1: 99, 2: 351}, 3242: {1: 100, 2: 351}, 3243: {1: 101, 2: 351}, 3244: {1: 102, 2: 351}, 3245: {1: 103, 2: 351}, 3246: {1: 104, 2: 351}, 3247: {1: 105, 2: 351}, 3248: {1: 106, 2: 351}, 3249: {1: 107, 2: 351}, 3250: {1: 108, 2: 351}, 3251: {1: 109, 2: 351}, 3252: {1: 110, 2: 351}, 3253: {1: 111, 2: 351}, 3254: {1: 112, 2: 351}, 3255: {1: 113, 2: 351}, 3256: {1: 114, 2: 351}, 3257: {1: 115, 2: 351}, 3258: {1: 116, 2: 351}, 3259: {1: 117, 2: 351}, 3260: {1: 118, 2: 351}, 3261: {1: 119, 2: 351}, 3262: {1: 120, 2: 351}, 3263: {1: 121, 2: 351}, 3264: {1: 122, 2: 351}, 3265: {1: 123, 2: 351}, 3266: {1: 124, 2: 351}, 3267: {1: 125, 2: 351}, 3268: {1: 126, 2: 351}, 3269: {1: 127, 2: 351}, 3270: {1: 128, 2: 351}, 3271: {1: 129, 2: 351}, 3272: {1: 130, 2: 351}, 3273: {1: 131, 2: 351}, 3274: {1: 132, 2: 351}, 3275: {1: 133, 2: 351}, 3276: {1: 134, 2: 351}, 3277: {1: 135, 2: 351}, 3278: {1: 136, 2: 351}, 3279: {1: 137, 2: 351}, 3280: {1: 138, 2: 351}, 3281: {1: 139, 2: 351}, 3282: {1: 140, 2: 351}, 3283: {1: 141, 2: 351}, 3284: {1: 142, 2: 351}, 3285: {1: 143, 2: 351}, 3286: {1: 144, 2: 351}, 3287: {1: 145, 2: 351}, 3288: {1: 146, 2: 351}, 3289: {1: 147, 2: 351}, 3290: {1: 148, 2: 351}, 3291: {1: 149, 2: 351}, 3292: {1: 150, 2: 351}, 3293: {1: 151, 2: 351}, 3294: {1: 152, 2: 351}, 3295: {1: 153, 2: 351}, 3296: {1: 154, 2: 351}, 3297: {1: 155, 2: 351}, 3298: {1: 156, 2: 351}, 3299: {1: 157, 2: 351}, 3300: {1: 158, 2: 351}, 3301: {1: 159, 2: 351}, 3302: {1: 160, 2: 351}, 3303: {1: 161, 2: 351}, 3304: {1: 162, 2: 351}, 3305: {1: 163, 2: 351}, 3306: {1: 164, 2: 351}, 3307: {1: 165, 2: 351}, 3308: {1: 166, 2: 351}, 3309: {1: 167, 2: 351}, 3310: {1: 168, 2: 351}, 3311: {1: 169, 2: 351}, 3312: {1: 170, 2: 351}, 3313: {1: 171, 2: 351}, 3314: {1: 172, 2: 351}, 3315: {1: 173, 2: 351}, 3316: {1: 174, 2: 351}, 3317: {1: 175, 2: 351}, 3318: {1: 176, 2: 351}, 3319: {1: 177, 2: 351}, 3320: {1: 178, 2: 351}, 3321: {1: 179, 2: 351}, 3322: {1: 180, 2: 351}, 3323: {1: 181, 2: 351}, 3324: {1: 182, 2: 351}, 3325: {1: 183, 2: 351}, 3326: {1: 184, 2: 351}, 3327: {1: 185, 2: 351}, 3328: {1: 186, 2: 351}, 3329: {1: 187, 2: 351}, 3330: {1: 188, 2: 351}, 3331: {1: 189, 2: 351}, 3332: {1: 190, 2: 351}, 3333: {1: 191, 2: 351}, 3334: {1: 192, 2: 351}, 3335: {1: 193, 2: 351}, 3336: {1: 194, 2: 351}, 3337: {1: 195, 2: 351}, 3338: {1: 196, 2: 351}, 3339: {1: 197, 2: 351}, 3340: {1: 198, 2: 351}, 3341: {1: 199, 2: 351}, 3342: {1: 200, 2: 351}, 3343: {1: 201, 2: 351}, 3344: {1: 202, 2: 351}, 3345: {1: 203, 2: 351}, 3346: {1: 204, 2: 351}, 3347: {1: 205, 2: 351}, 3348: {1: 206, 2: 351}, 3349: {1: 207, 2: 351}, 3350: {1: 208, 2: 351}, 3351: {1: 209, 2: 351}, 3352: {1: 210, 2: 351}, 3353: {1: 211, 2: 351}, 3354: {1: 212, 2: 351}, 3355: {1: 213, 2: 351}, 3356: {1: 214, 2: 351}, 3357: {1: 215, 2: 351}, 3358: {1: 216, 2: 351}, 3359: {1: 217, 2: 351}, 3360: {1: 218, 2: 351}, 3361: {1: 219, 2: 351}, 3362: {1: 220, 2: 351}, 3363: {1: 221, 2: 351}, 3364: {1: 222, 2: 351}, 3365: {1: 223, 2: 351}, 3366: {1: 224, 2: 351}, 3367: {1: 225, 2: 351}, 3368: {1: 226, 2: 351}, 3369: {1: 227, 2: 351}, 3370: {1: 228, 2: 351}, 3371: {1: 229, 2: 351}, 3372: {1: 230, 2: 351}, 3373: {1: 231, 2: 351}, 3374: {1: 232, 2: 351}, 3375: {1: 233, 2: 351}, 3376: {1: 234, 2: 351}, 3377: {1: 235, 2: 351}, 3378: {1: 236, 2: 351}, 3379: {1: 237, 2: 351}, 3380: {1: 238, 2: 351}, 3381: {1: 239, 2: 351}, 3382: {1: 240, 2: 351}, 3383: {1: 241, 2: 351}, 3384: {1: 242, 2: 351}, 3385: {1: 243, 2: 351}, 3386: {1: 244, 2: 351}, 3387: {1: 245, 2: 351}, 3388: {1: 246, 2: 351}, 3389: {1: 247, 2: 351}, 3390: {1: 248, 2: 351}, 3391: {1: 249, 2: 351}, 3392: {1: 250, 2: 351}, 3393: {1: 251, 2: 351}, 3394: {1: 252, 2: 351}, 3395: {1: 253, 2: 351}, 3396: {1: 254, 2: 351}, 3397: {1: 255, 2: 351}, 3398: {1: 256, 2: 351}, 3399: {1: 257, 2: 351}, 3400: {1: 258, 2: 351}, 3401: {1: 259, 2: 351}, 3402: {1: 260, 2: 351}, 3403: {1: 261, 2: 351}, 3404: {1: 262, 2: 351}, 3405: {1: 263, 2: 351}, 3406: {1: 264, 2: 351}, 3407: {1: 265, 2: 351}, 3408: {1: 266, 2: 351}, 3409: {1: 267, 2: 351}, 3410: {1: 268, 2: 351}, 3411: {1: 269, 2: 351}, 3412: {1: 270, 2: 351}, 3413: {1: 271, 2: 351}, 3414: {1: 272, 2: 351}, 3415: {1: 273, 2: 351}, 3416: {1: 274, 2: 351}, 3417: {1: 275, 2: 351}, 3418: {1: 276, 2: 351}, 3419: {1: 277, 2: 351}, 3420: {1: 278, 2: 351}, 3421: {1: 279, 2: 351}, 3422: {1: 280, 2: 351}, 3423: {1: 281, 2: 351}, 3424: {1: 282, 2: 351}, 3425: {1: 283, 2: 351}, 3426: {1: 284, 2: 351}, 3427: {1: 285, 2: 351}, 3428: {1: 286, 2: 351}, 3429: {1: 287, 2: 351}, 3430: {1: 288, 2: 351}, 3431: {1: 289, 2: 351}, 3432: {1: 290, 2: 351}, 3433: {1: 291, 2: 351}, 3434: {1: 292, 2: 351}, 3435: {1: 293, 2: 351}, 3436: {1: 294, 2: 351}, 3437: {1: 295, 2: 351}, 3438: {1: 296, 2: 351}, 3439: {1: 297, 2: 351}, 3440: {1: 298, 2: 351}, 3441: {1: 299, 2: 351}, 3442: {1: 300, 2: 351}, 3443: {1: 301, 2: 351}, 3444: {1: 302, 2: 351}, 3445: {1: 303, 2: 351}, 3446: {1: 304, 2: 351}, 3447: {1: 305, 2: 351}, 3448: {1: 306, 2: 351}, 3449: {1: 307, 2: 351}, 3450: {1: 308, 2: 351}, 3451: {1: 309, 2: 351}, 3452: {1: 310, 2: 351}, 3453: {1: 311, 2: 351}, 3454: {1: 312, 2: 351}, 3455: {1: 313, 2: 351}, 3456: {1: 314, 2: 351}, 3457: {1: 315, 2: 351}, 3458: {1: 316, 2: 351}, 3459: {1: 317, 2: 351}, 3460: {1: 318, 2: 351}, 3461: {1: 319, 2: 351}, 3462: {1: 320, 2: 351}, 3463: {1: 321, 2: 351}, 3464: {1: 322, 2: 351}, 3465: {1: 323, 2: 351}, 3466: {1: 324, 2: 351}, 3467: {1: 325, 2: 351}, 3468: {1: 326, 2: 351}, 3469: {1: 327, 2: 351}, 3470: {1: 328, 2: 351}, 3471: {1: 329, 2: 351}, 3472: {1: 330, 2: 351}, 3473: {1: 331, 2: 351}, 3474: {1: 332, 2: 351}, 3475: {1: 333, 2: 351}, 3476: {1: 334, 2: 351}, 3477: {1: 335, 2: 351}, 3478: {1: 336, 2: 351}, 3479: {1: 337, 2: 351}, 3480: {1: 338, 2: 351}, 3481: {1: 339, 2: 351}, 3482: {1: 340, 2: 351}, 3483: {1: 341, 2: 351}, 3484: {1: 342, 2: 351}, 3485: {1: 343, 2: 351}, 3486: {1: 344, 2: 351}, 3487: {1: 345, 2: 351}, 3488: {1: 346, 2: 351}, 3489: {1: 347, 2: 351}, 3490: {1: 348, 2: 351}, 3491: {1: 352, 2: 359}, 3492: {1: 353, 2: 359}, 3493: {1: 354, 2: 359}, 3494: {1: 355, 2: 359}, 3495: {1: 356, 2: 359}, 3496: {1: 357, 2: 359}, 3497: {1: 358, 2: 359}, 3498: {1: 0, 2: 359}, 3499: {1: 349, 2: 359}, 3500: {1: 350, 2: 359}, 3501: {1: 351, 2: 359}}, 'deo': {1: {1: 21.7454982145, 2: -3.26182473217}}, 'inno': {1: 348, 2: 347, 3: 346, 4: 345, 5: 344, 6: 343, 7: 342, 8: 341, 9: 340, 10: 339, 11: 338, 12: 337, 13: 336, 14: 335, 15: 334, 16: 333, 17: 332, 18: 331, 19: 330, 20: 329, 21: 328, 22: 327, 23: 326, 24: 325, 25: 324, 26: 323, 27: 322, 28: 321, 29: 320, 30: 319, 31: 318, 32: 317, 33: 316, 34: 315, 35: 314, 36: 313, 37: 312, 38: 311, 39: 310, 40: 309, 41: 308, 42: 307, 43: 306, 44: 305, 45: 304, 46: 303, 47: 302, 48: 301, 49: 300, 50: 299, 51: 298, 52: 297, 53: 296, 54: 295, 55: 294, 56: 293, 57: 292, 58: 291, 59: 290, 60: 289, 61: 288, 62: 287, 63: 286, 64: 285, 65: 284, 66: 283, 67: 282, 68: 281, 69: 280, 70: 279, 71: 278, 72: 277, 73: 276, 74: 275, 75: 274, 76: 273, 77: 272, 78: 271, 79: 270, 80: 269, 81: 268, 82: 267, 83: 266, 84: 265, 85: 264, 86: 263, 87: 262, 88: 261, 89: 260, 90: 259, 91: 258, 92: 257, 93: 256, 94: 255, 95: 254, 96: 253, 97: 252, 98: 251, 99: 250, 100: 249, 101: 248, 102: 247, 103: 246, 104: 245, 105: 244, 106: 243, 107: 242, 108: 241, 109: 240, 110: 239, 111: 238, 112: 237, 113: 236, 114: 235, 115: 234, 116: 233, 117: 232, 118: 231, 119: 230, 120: 229, 121: 228, 122: 227, 123: 226, 124: 225, 125: 224, 126: 223, 127: 222, 128: 221, 129: 220, 130: 219, 131: 218, 132: 217, 133: 216, 134: 215, 135: 214, 136: 213, 137: 212, 138: 211, 139: 210, 140: 209, 141: 208, 142: 207, 143: 206, 144: 205, 145: 204, 146: 203, 147: 202, 148: 201, 149: 200, 150: 199, 151: 198, 152: 197, 153: 196, 154: 195, 155: 194, 156: 193, 157: 192, 158: 191, 159: 190, 160: 189, 161: 188, 162: 187, 163: 186, 164: 185, 165: 184, 166: 183, 167: 182, 168: 181, 169: 180, 170: 179, 171: 178, 172: 177, 173: 176, 174: 175, 175: 174, 176: 173, 177: 172, 178: 171, 179: 170, 180: 169, 181: 168, 182: 167, 183: 166, 184: 165, 185: 164, 186: 163, 187: 162, 188: 161, 189: 160, 190: 159, 191: 158, 192: 157, 193: 156, 194: 155, 195: 154, 196: 153, 197: 152, 198: 151, 199: 150, 200: 149, 201: 148, 202: 147, 203: 146, 204: 145, 205: 144, 206: 143, 207: 142, 208: 141, 209: 140, 210: 139, 211: 138, 212: 137, 213: 136, 214: 135, 215: 134, 216: 133, 217: 132, 218: 131, 219: 130, 220: 129, 221: 128, 222: 127, 223: 126, 224: 125, 225: 124, 226: 123, 227: 122, 228: 121, 229: 120, 230: 119, 231: 118, 232: 117, 233: 116, 234: 115, 235: 114, 236: 113, 237: 112, 238: 111, 239: 110, 240: 109, 241: 108, 242: 107, 243: 106, 244: 105, 245: 104, 246: 103, 247: 102, 248: 101, 249: 100, 250: 99, 251: 98, 252: 97, 253: 96, 254: 95, 255: 94, 256: 93, 257: 92, 258: 91, 259: 90, 260: 89, 261: 88, 262: 87, 263: 86, 264: 85, 265: 84, 266: 83, 267: 82, 268: 81, 269: 80, 270: 79, 271: 78, 272: 77, 273: 76, 274: 75, 275: 74, 276: 73, 277: 72, 278: 71, 279: 70, 280: 69, 281: 68, 282: 67, 283: 66, 284: 65, 285: 64, 286: 63, 287: 62, 288: 61, 289: 60, 290: 59, 291: 58, 292: 57, 293: 56, 294: 55, 295: 54, 296: 53, 297: 52, 298: 51, 299: 50, 300: 49, 301: 48, 302: 47, 303: 46, 304: 45, 305: 44, 306: 43, 307: 42, 308: 41, 309: 40, 310: 39, 311: 38, 312: 37, 313: 36, 314: 35, 315: 34, 316: 33, 317: 32, 318: 31, 319: 30, 320: 29, 321: 28, 322: 27, 323: 26, 324: 25, 325: 24, 326: 23, 327: 22, 328: 21, 329: 20, 330: 19, 331: 18, 332: 17, 333: 16, 334: 15, 335: 14, 336: 13, 337: 12, 338: 11, 339: 10, 340: 9, 341: 8, 342: 7, 343: 6, 344: 5, 345: 4, 346: 3, 347: 2, 348: 1}})
     return nets
 
-print("\nNNScore 2.02")
-print("============\n")
+def main():
+    print("\nNNScore 2.02")
+    print("============\n")
 
-print((textwrap.fill("NNScore 2.02 is released under the GNU General Public License (see http://www.gnu.org/licenses/gpl.html). If you have any questions, comments, or suggestions, please contact the author, Jacob Durrant, at durrantj [at] pitt [dot] edu. If you use NNScore 2.02 in your work, please cite NNScore 2.0: A Neural-Network Receptor-Ligand Scoring Function. Jacob D. Durrant, Andrew McCammon. Journal of Chemical Information and Modeling, 2011, 51 (11), pp 2897-2903.")))
+    print((textwrap.fill("NNScore 2.02 is released under the GNU General Public License (see http://www.gnu.org/licenses/gpl.html). If you have any questions, comments, or suggestions, please contact the author, Jacob Durrant, at durrantj [at] pitt [dot] edu. If you use NNScore 2.02 in your work, please cite NNScore 2.0: A Neural-Network Receptor-Ligand Scoring Function. Jacob D. Durrant, Andrew McCammon. Journal of Chemical Information and Modeling, 2011, 51 (11), pp 2897-2903.")))
 
-print("")
+    print("")
 
-print((textwrap.fill("NNScore 2.02 is based in part on the ffnet python package developed by Marek Wojciechowski (http://ffnet.sourceforge.net/).")))
-print("")
+    print((textwrap.fill("NNScore 2.02 is based in part on the ffnet python package developed by Marek Wojciechowski (http://ffnet.sourceforge.net/).")))
+    print("")
 
-print("Use the -help command-line parameter for extended help.\n")
-print("Example: python NNScore2.py -receptor myreceptor.pdbqt -ligand myligand.pdbqt -vina_executable /PATH/TO/VINA/1.1.2/vina\n")
+    print("Use the -help command-line parameter for extended help.\n")
+    print("Example: python NNScore2.py -receptor myreceptor.pdbqt -ligand myligand.pdbqt -vina_executable /PATH/TO/VINA/1.1.2/vina\n")
+
+    cmd_params = command_line_parameters(sys.argv[:])
+
+    if cmd_params.okay_to_proceed() is False:
+        print("ERROR: You need to specify the ligand and receptor PDBQT files, as\nwell as the full path the the AutoDock Vina 1.1.2 executable, using the\n-receptor, -ligand, and -vina_executable tags from the command line.\nThe -ligand tag can also specify an AutoDock Vina output file.\n")
+        sys.exit(0)
+
+    lig = cmd_params.params['ligand']
+    rec = cmd_params.params['receptor']
+
+    def calculate_score(lig, rec, cmd_params, actual_filename_if_lig_is_list="", actual_filename_if_rec_is_list="", line_header = ""):
+
+        d = binana(lig, rec, cmd_params, line_header, actual_filename_if_lig_is_list, actual_filename_if_rec_is_list)
+
+        # now load in neural networks
+        scores = []
+        total = 0.0
+        nets = networks()
+        for net_array in nets:
+            try:
+                net = ffnet()
+                net.load(net_array)
+
+                val = net.normcall(d.input_vector)
+                print((line_header + "Network #" + str(len(scores) + 1) + " gave a score of " + str( round(val,3)) + " (" + score_to_kd(val) + ")"))
+                scores.append(val)
+                total = total + val
+            except OverflowError:
+                print((line_header + "The output of network #" + str(len(scores) + 1) + " could not be determined because of an overflow error!"))
+
+        if len(scores) != 0:
+            average = total / len(scores)
+
+            best_score = 0.0
+            best_network = -1
+            count = 1
+            sum = 0.0
+            for score in scores:
+                if score > best_score:
+                    best_score = score
+                    best_network = count
+                sum = sum + math.pow(score - average,2)
+                count = count + 1
+            stdev = math.pow(sum / (len(scores)-1), 0.5)
+
+            print("")
+
+            print((line_header + "Best Score:         ", round(best_score,3), "(" + score_to_kd(best_score) + ")"))
+            print((line_header + "Average Score:      ", round(average,3), "(" + score_to_kd(average) + ")"))
+            print((line_header + "Standard Deviation: ", round(stdev,3)))
+            print("")
+
+            return [average, stdev, best_score, best_network, scores]
+        else:
+            print((line_header + "Could not compute the score of this receptor-ligand complex because none of the networks returned a valid score."))
+            return [0, 0, 0, 0, []]
 
-cmd_params = command_line_parameters(sys.argv[:])
+    # load the rec into an array so you only have to load it from the disk once
+    print("\nLOADING THE RECEPTOR")
+    print("====================\n")
 
-if cmd_params.okay_to_proceed() is False:
-    print("ERROR: You need to specify the ligand and receptor PDBQT files, as\nwell as the full path the the AutoDock Vina 1.1.2 executable, using the\n-receptor, -ligand, and -vina_executable tags from the command line.\nThe -ligand tag can also specify an AutoDock Vina output file.\n")
-    sys.exit(0)
+    #f2 = open(rec, "r")
+    #rec_array = f2.readlines()
+    #f2.close()
+    receptor = PDB()
+    receptor.LoadPDB_from_file(rec)
+    receptor.OrigFileName = rec
 
-lig = cmd_params.params['ligand']
-rec = cmd_params.params['receptor']
+    print("\nEVALUATING EACH OF THE POSES IN THE LIGAND FILE USING 20 TRAINED NEURAL NETWORKS")
+    print("================================================================================\n")
 
-def calculate_score(lig, rec, cmd_params, actual_filename_if_lig_is_list="", actual_filename_if_rec_is_list="", line_header = ""):
+    # determine if the ligand input file is a single pdbqt or an autodock vina output file. Both are acceptable inputs.
 
-    d = binana(lig, rec, cmd_params, line_header, actual_filename_if_lig_is_list, actual_filename_if_rec_is_list)
+    f = open(lig, "r")
 
-    # now load in neural networks
-    scores = []
-    total = 0.0
-    nets = networks()
-    for net_array in nets:
-        try:
-            net = ffnet()
-            net.load(net_array)
-
-            val = net.normcall(d.input_vector)
-            print((line_header + "Network #" + str(len(scores) + 1) + " gave a score of " + str( round(val,3)) + " (" + score_to_kd(val) + ")"))
-            scores.append(val)
-            total = total + val
-        except OverflowError:
-            print((line_header + "The output of network #" + str(len(scores) + 1) + " could not be determined because of an overflow error!"))
-
-    if len(scores) != 0:
-        average = total / len(scores)
-
-        best_score = 0.0
-        best_network = -1
-        count = 1
-        sum = 0.0
-        for score in scores:
-            if score > best_score:
-                best_score = score
-                best_network = count
-            sum = sum + math.pow(score - average,2)
-            count = count + 1
-        stdev = math.pow(sum / (len(scores)-1), 0.5)
+    lig_array = []
+    line = "NULL"
 
-        print("")
-
-        print((line_header + "Best Score:         ", round(best_score,3), "(" + score_to_kd(best_score) + ")"))
-        print((line_header + "Average Score:      ", round(average,3), "(" + score_to_kd(average) + ")"))
-        print((line_header + "Standard Deviation: ", round(stdev,3)))
-        print("")
-
-        return [average, stdev, best_score, best_network, scores]
-    else:
-        print((line_header + "Could not compute the score of this receptor-ligand complex because none of the networks returned a valid score."))
-        return [0, 0, 0, 0, []]
-
-# load the rec into an array so you only have to load it from the disk once
-print("\nLOADING THE RECEPTOR")
-print("====================\n")
-
-#f2 = open(rec, "r")
-#rec_array = f2.readlines()
-#f2.close()
-receptor = PDB()
-receptor.LoadPDB_from_file(rec)
-receptor.OrigFileName = rec
+    scores = []
 
-print("\nEVALUATING EACH OF THE POSES IN THE LIGAND FILE USING 20 TRAINED NEURAL NETWORKS")
-print("================================================================================\n")
+    model_id = 1
+    while len(line) != 0:
+        line = f.readline()
+        if line[:6] != "ENDMDL": lig_array.append(line)
+        if line[:6] == "ENDMDL" or len(line) == 0:
+            if len(lig_array) != 0 and lig_array != ['']:
+                temp_filename = lig + ".MODEL_" + str(model_id) + ".pdbqt"
 
-# determine if the ligand input file is a single pdbqt or an autodock vina output file. Both are acceptable inputs.
+                temp_f = open(temp_filename, "w")
+                for ln in lig_array: temp_f.write(ln)
+                temp_f.close()
 
-f = open(lig, "r")
+                model_name = "MODEL " + str(model_id)
 
-lig_array = []
-line = "NULL"
+                print(model_name)
 
-scores = []
+                score=calculate_score(lig_array, receptor, cmd_params, temp_filename, rec, "\t")
+                scores.append([score[0], score[1], score[2], score[3], score[4], model_name])
 
-model_id = 1
-while len(line) != 0:
-    line = f.readline()
-    if line[:6] != "ENDMDL": lig_array.append(line)
-    if line[:6] == "ENDMDL" or len(line) == 0:
-        if len(lig_array) != 0 and lig_array != ['']:
-            temp_filename = lig + ".MODEL_" + str(model_id) + ".pdbqt"
+                os.remove(temp_filename)
 
-            temp_f = open(temp_filename, "w")
-            for ln in lig_array: temp_f.write(ln)
-            temp_f.close()
+                lig_array = []
+                model_id = model_id + 1
 
-            model_name = "MODEL " + str(model_id)
+    f.close()
 
-            print(model_name)
+    # now find the best score across all models, for each network
+    print("\nRANKED POSES AND SCORES WHEN EACH OF THE 20 NETWORKS IS CONSIDERED SEPARATELY")
+    print("=============================================================================\n")
 
-            score=calculate_score(lig_array, receptor, cmd_params, temp_filename, rec, "\t")
-            scores.append([score[0], score[1], score[2], score[3], score[4], model_name])
+    best_network_scores = []
+    for t in range(20):
+        net_scores = []
+        for score in scores:
+            net_scores.append((score[4][t],score[5]))
+        net_scores = sorted(net_scores,key=lambda net_score: net_score[0], reverse=True) # sort by score
+        print(("USING NETWORK #" + str(t+1)).center(42," "))
+        print(" Rank | Pose     | Score | Predicted Kd ")
+        print("------+----------+-------+--------------")
+        count = 1
+        best_network_scores.append(net_scores[0])
+        for net_score in net_scores:
+            print((str(count).center(6," ") + "|" + net_score[1].center(10," ") + "|" + str(round(net_score[0],3)).center(7," ") + "|" + score_to_kd(net_score[0]).replace("Kd = ","").center(14," ")))
+            count = count + 1
+        print("")
 
-            os.remove(temp_filename)
+    print("\nRANKED POSES AND SCORES WHEN A CONSENSUS OF NETWORK OUTPUTS ARE CONSIDERED")
+    print("==========================================================================\n")
 
-            lig_array = []
-            model_id = model_id + 1
+    # now get the best score of all vina output poses
+    best_scores = sorted(scores,key=lambda score: score[2], reverse=True) # sort by score
 
-f.close()
+    best_best_score = best_scores[0]
 
-# now find the best score across all models, for each network
-print("\nRANKED POSES AND SCORES WHEN EACH OF THE 20 NETWORKS IS CONSIDERED SEPARATELY")
-print("=============================================================================\n")
+    print(("BEST SCORE OF ALL 20 NETWORKS, BY POSE".center(65," ")))
+    print(" Rank | Pose     | Average Score | Predicted Kd | Network")
+    print("------+----------+---------------+--------------+---------")
 
-best_network_scores = []
-for t in range(20):
-    net_scores = []
-    for score in scores:
-        net_scores.append((score[4][t],score[5]))
-    net_scores = sorted(net_scores,key=lambda net_score: net_score[0], reverse=True) # sort by score
-    print(("USING NETWORK #" + str(t+1)).center(42," "))
-    print(" Rank | Pose     | Score | Predicted Kd ")
-    print("------+----------+-------+--------------")
     count = 1
-    best_network_scores.append(net_scores[0])
-    for net_score in net_scores:
-        print((str(count).center(6," ") + "|" + net_score[1].center(10," ") + "|" + str(round(net_score[0],3)).center(7," ") + "|" + score_to_kd(net_score[0]).replace("Kd = ","").center(14," ")))
+    for score in best_scores:
+        print((str(count).center(6," ") + "|" + score[5].center(10," ") + "|" + str(round(score[2],3)).center(15," ") + "|" + score_to_kd(score[2]).replace("Kd = ","").center(14," ") + "|" + ("#" + str(score[3])).center(9," ")))
         count = count + 1
-    print("")
 
-print("\nRANKED POSES AND SCORES WHEN A CONSENSUS OF NETWORK OUTPUTS ARE CONSIDERED")
-print("==========================================================================\n")
-
-# now get the best score of all vina output poses
-best_scores = sorted(scores,key=lambda score: score[2], reverse=True) # sort by score
-
-best_best_score = best_scores[0]
-
-print(("BEST SCORE OF ALL 20 NETWORKS, BY POSE".center(65," ")))
-print(" Rank | Pose     | Average Score | Predicted Kd | Network")
-print("------+----------+---------------+--------------+---------")
+    print("")
 
-count = 1
-for score in best_scores:
-    print((str(count).center(6," ") + "|" + score[5].center(10," ") + "|" + str(round(score[2],3)).center(15," ") + "|" + score_to_kd(score[2]).replace("Kd = ","").center(14," ") + "|" + ("#" + str(score[3])).center(9," ")))
-    count = count + 1
+    # now get the best average score of all vina output poses
+    average_scores = sorted(scores,key=lambda score: score[0], reverse=True) # sort by score
 
-print("")
+    best_of_average_scores = average_scores[0]
 
-# now get the best average score of all vina output poses
-average_scores = sorted(scores,key=lambda score: score[0], reverse=True) # sort by score
+    print(("AVERAGE SCORE OF ALL 20 NETWORKS, BY POSE".center(70," ")))
+    print(" Rank | Pose     | Average Score | Standard Deviation | Predicted Kd")
+    print("------+----------+---------------+--------------------+--------------")
 
-best_of_average_scores = average_scores[0]
+    count = 1
+    for score in average_scores:
+        print((str(count).center(6," ") + "|" + score[5].center(10," ") + "|" + str(round(score[0],3)).center(15," ") + "|" + str(round(score[1],3)).center(20," ") + "|" + score_to_kd(score[0]).replace("Kd = ","").center(15," ")))
+        count = count + 1
 
-print(("AVERAGE SCORE OF ALL 20 NETWORKS, BY POSE".center(70," ")))
-print(" Rank | Pose     | Average Score | Standard Deviation | Predicted Kd")
-print("------+----------+---------------+--------------------+--------------")
+    print("")
+    print("\nSUMMARY")
+    print("=======\n")
 
-count = 1
-for score in average_scores:
-    print((str(count).center(6," ") + "|" + score[5].center(10," ") + "|" + str(round(score[0],3)).center(15," ") + "|" + str(round(score[1],3)).center(20," ") + "|" + score_to_kd(score[0]).replace("Kd = ","").center(15," ")))
-    count = count + 1
+    count = 1
+    for best_network_score in best_network_scores:
+        print((textwrap.fill("Best pose scored by network #" + str(count) + ": " + best_network_score[1] + " (Score = " + str(round(best_network_score[0],3)) + " = " + score_to_kd(best_network_score[0]).replace("Kd = ","") + ")")))
+        count = count + 1
 
-print("")
-print("\nSUMMARY")
-print("=======\n")
+    print("")
 
-count = 1
-for best_network_score in best_network_scores:
-    print((textwrap.fill("Best pose scored by network #" + str(count) + ": " + best_network_score[1] + " (Score = " + str(round(best_network_score[0],3)) + " = " + score_to_kd(best_network_score[0]).replace("Kd = ","") + ")")))
-    count = count + 1
+    print((textwrap.fill("When the poses were ranked by the best of the 20 network scores associated with each pose, the best-scoring pose was " + best_best_score[5] + " (Score = " + str(round(best_best_score[2],3)) + " = " + score_to_kd(best_best_score[2]).replace("Kd = ","") + ")")))
+    print("")
+    print((textwrap.fill("When the poses were ranked by the average of the 20 network scores associated with each pose, the best-scoring pose was " + best_of_average_scores[5] + " (Score = " + str(round(best_of_average_scores[0],3)) + " +/- " + str(round(best_of_average_scores[1],3)) + " = " + score_to_kd(best_of_average_scores[0]).replace("Kd = ","") + "). This is the recommended ranking/scoring metric.")))
 
-print("")
+    print("")
 
-print((textwrap.fill("When the poses were ranked by the best of the 20 network scores associated with each pose, the best-scoring pose was " + best_best_score[5] + " (Score = " + str(round(best_best_score[2],3)) + " = " + score_to_kd(best_best_score[2]).replace("Kd = ","") + ")")))
-print("")
-print((textwrap.fill("When the poses were ranked by the average of the 20 network scores associated with each pose, the best-scoring pose was " + best_of_average_scores[5] + " (Score = " + str(round(best_of_average_scores[0],3)) + " +/- " + str(round(best_of_average_scores[1],3)) + " = " + score_to_kd(best_of_average_scores[0]).replace("Kd = ","") + "). This is the recommended ranking/scoring metric.")))
 
-print("")
+if __name__ == "__main__":
+    main()
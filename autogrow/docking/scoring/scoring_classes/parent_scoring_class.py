@@ -31,3 +31,16 @@ class ParentScoring(ABC):
 
         # raise NotImplementedError("run_scoring() not implemented")
         pass
+
+    def uses_batch_rescoring(self) -> bool:
+        """
+        Whether this class rescores whole batches of files at once with
+        run_rescoring_batch rather than one file at a time with
+        run_rescoring. Classes which rescore in batches must override this and
+        implement run_rescoring_batch.
+
+        Returns:
+        :returns: bool False: by default files are rescored one at a time
+        """
+
+        return False
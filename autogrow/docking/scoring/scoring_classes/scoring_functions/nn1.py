@@ -11,6 +11,9 @@ import sys
 
 from autogrow.docking.scoring.scoring_classes.parent_scoring_class import ParentScoring
 from autogrow.docking.scoring.scoring_classes.scoring_functions.vina import VINA
+from autogrow.docking.scoring.nn_score_engines.nnscore1_engine import (
+    get_nnscore1_engine,
+)
 
 
 class NN1(VINA):
@@ -86,6 +89,34 @@ class NN1(VINA):
 
         return result_of_rescore
 
+    def uses_batch_rescoring(self):
+        """
+        NN1 rescores whole batches of files in-process unless the user turned
+        off nn_rescoring_in_process.
+
+        Returns:
+        :returns: bool uses_batch: True if run_rescoring_batch should be used
+        """
+
+        return self.vars["nn_rescoring_in_process"] is True
+
+    def run_rescoring_batch(self, list_of_vina_output_files):
+        """
+        Run the NN1 scoring on a batch of files with the in-process NNScore1
+        engine. Return a list of rescored files with NN1 ie *.pdbqt.vina.nn1
+
+        Inputs:
+        :param list list_of_vina_output_files: Paths to vina output files to
+            be rescored
+
+        Returns:
+        :returns: list results of the rescoring function: [[file_path,
+            it_rescored], ...]. [PATH, True] means it passed. [PATH, False]
+            means it failed.
+        """
+
+        return run_nn_rescoring_batch(self.vars, list_of_vina_output_files)
+
     def run_scoring(self, file_path):
         """
         Get all relevant scoring info and return as a list
@@ -212,14 +243,7 @@ def run_nn_rescoring(vars, vina_output_file):
     # Unpackage vars
     receptor = vars["filename_of_receptor"] + "qt"
     nn1_executable = vars["nn1_script"]
-    networks_dir = (
-        os.path.dirname(vars["nn1_script"])
-        + os.sep
-        + "networks"
-        + os.sep
-        + "top_3_networks"
-        + os.sep
-    )
+    networks_dir = get_nn1_networks_dir(vars)
 
     nn1_output = vina_output_file + ".nn1"
     # sys.executable is the path to python executable
@@ -247,6 +271,61 @@ def run_nn_rescoring(vars, vina_output_file):
     return results
 
 
+def run_nn_rescoring_batch(vars, list_of_vina_output_files):
+    """
+    This will run NN1 on a batch of vina files in this process. The receptor
+    and networks are only loaded the first time a process needs them and all
+    poses of the batch are scored by the networks together.
+
+    Inputs:
+    :param dict vars: User variables which will govern how the programs runs
+    :param list list_of_vina_output_files: Paths to vina output files to be
+        rescored
+
+    Returns:
+    :returns: list results of the rescoring function: [[file_path,
+        it_rescored], ...]. [PATH, True] means it passed. [PATH, False] means
+        it failed.
+    """
+
+    list_of_vina_output_files = [
+        x for x in list_of_vina_output_files if x is not None
+    ]
+    if len(list_of_vina_output_files) == 0:
+        return []
+
+    receptor = vars["filename_of_receptor"] + "qt"
+    try:
+        engine = get_nnscore1_engine(receptor, get_nn1_networks_dir(vars))
+    except Exception as e:
+        print("Failed to load the NNScore1 receptor or networks: ", e)
+        return [[x + ".nn1", False] for x in list_of_vina_output_files]
+
+    return engine.rescore_vina_files(list_of_vina_output_files)
+
+
+def get_nn1_networks_dir(vars):
+    """
+    Get the directory of the NNScore1 networks used by AutoGrow. These are
+    kept next to the nn1_script.
+
+    Inputs:
+    :param dict vars: User variables which will govern how the programs runs
+
+    Returns:
+    :returns: str networks_dir: the path to the top_3_networks directory
+    """
+
+    return (
+        os.path.dirname(vars["nn1_script"])
+        + os.sep
+        + "networks"
+        + os.sep
+        + "top_3_networks"
+        + os.sep
+    )
+
+
 def execute_nn_scoring(command, file_path):
     """
     Run an individual NN scoring function.
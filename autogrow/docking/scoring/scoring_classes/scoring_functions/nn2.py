@@ -11,6 +11,9 @@ import sys
 
 from autogrow.docking.scoring.scoring_classes.parent_scoring_class import ParentScoring
 from autogrow.docking.scoring.scoring_classes.scoring_functions.vina import VINA
+from autogrow.docking.scoring.nn_score_engines.nnscore2_engine import (
+    get_nnscore2_engine,
+)
 
 
 class NN2(VINA):
@@ -86,6 +89,34 @@ class NN2(VINA):
 
         return result_of_rescore
 
+    def uses_batch_rescoring(self):
+        """
+        NN2 rescores whole batches of files in-process unless the user turned
+        off nn_rescoring_in_process.
+
+        Returns:
+        :returns: bool uses_batch: True if run_rescoring_batch should be used
+        """
+
+        return self.vars["nn_rescoring_in_process"] is True
+
+    def run_rescoring_batch(self, list_of_vina_output_files):
+        """
+        Run the NN2 scoring on a batch of files with the in-process NNScore2
+        engine. Return a list of rescored files with NN2 ie *.pdbqt.vina.nn2
+
+        Inputs:
+        :param list list_of_vina_output_files: Paths to vina output files to
+            be rescored
+
+        Returns:
+        :returns: list results of the rescoring function: [[file_path,
+            it_rescored], ...]. [PATH, True] means it passed. [PATH, False]
+            means it failed.
+        """
+
+        return run_nn_rescoring_batch(self.vars, list_of_vina_output_files)
+
     def run_scoring(self, file_path):
         """
         Get all relevant scoring info and return as a list
@@ -253,6 +284,46 @@ def run_nn_rescoring(vars, vina_output_file):
     return results
 
 
+def run_nn_rescoring_batch(vars, list_of_vina_output_files):
+    """
+    This will run NN2 on a batch of vina files in this process. The receptor
+    is only loaded and preprocessed the first time a process needs it, the
+    Vina terms are computed in-process and all poses of the batch are scored
+    by the 20 networks together.
+
+    As with run_nn_rescoring, the ligand that is scored for each file is the
+    vina file name without the .vina extension.
+
+    Inputs:
+    :param dict vars: User variables which will govern how the programs runs
+    :param list list_of_vina_output_files: Paths to vina output files to be
+        rescored
+
+    Returns:
+    :returns: list results of the rescoring function: [[file_path,
+        it_rescored], ...]. [PATH, True] means it passed. [PATH, False] means
+        it failed.
+    """
+
+    list_of_vina_output_files = [
+        x for x in list_of_vina_output_files if x is not None
+    ]
+    if len(list_of_vina_output_files) == 0:
+        return []
+
+    list_of_nn2_outputs = [str(x) + ".nn2" for x in list_of_vina_output_files]
+    list_of_ligands = [x.replace(".vina", "") for x in list_of_vina_output_files]
+
+    receptor = vars["filename_of_receptor"] + "qt"
+    try:
+        engine = get_nnscore2_engine(receptor)
+    except Exception as e:
+        print("Failed to load the NNScore2 receptor: ", e)
+        return [[x, False] for x in list_of_nn2_outputs]
+
+    return engine.rescore_ligand_files(list_of_ligands, list_of_nn2_outputs)
+
+
 def execute_nn_scoring(command, file_path):
     """
     Run an individual NN scoring function.
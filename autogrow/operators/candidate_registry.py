@@ -0,0 +1,243 @@
+"""
+Keeps track of the ligands made by mutation or crossover in a generation and
+decides how many reactions to run at a time.
+
+The CandidateRegistry holds the SMILES strings and IDs of every ligand made so
+far in sets, so checking whether a new ligand is a duplicate doesn't depend on
+how many ligands have been made.
+
+The AdaptiveBatchScheduler picks the seed ligands for each batch of jobs sent
+to the parallelizer. It estimates how many jobs are needed to make the
+remaining ligands from the fraction of jobs in the last batch which made a new
+ligand. Filters can reject most of the products, so sending just the number of
+ligands still needed would take many underfilled rounds.
+"""
+
+import __future__
+
+import math
+import random
+
+
+# A seed list can be gone through this many times before giving up. This is
+# the old limit of 2000 rounds of reactions on the whole seed list.
+MAX_PASSES_THROUGH_SEED_LIST = 2000
+
+
+class CandidateRegistry(object):
+    """
+    The ligands made in this generation by a single operator (mutation or
+    crossover).
+    """
+
+    def __init__(self, already_made_ligands=None):
+        """
+        Initialize the registry.
+
+        The SMILES strings from SmilesClickChem and SmilesMerge are already
+        canonical rdkit SMILES strings, so they are used as given.
+
+        Inputs:
+        :param list already_made_ligands: a list of ligands made by this
+            operator in a previous call for this generation. ie. [['CCC',
+            '(ZINC123)Gen_1_Mutant_7_12345'], ...]. These count as duplicates
+            but are not returned in self.ligands_list.
+        """
+
+        self.ligands_list = []
+        self.smiles_set = set([])
+        self.id_set = set([])
+
+        if already_made_ligands is not None:
+            for ligand_info in already_made_ligands:
+                self.smiles_set.add(ligand_info[0])
+                self.id_set.add(ligand_info[1])
+
+    def __len__(self):
+        """
+        Returns:
+        :returns: int num_ligands: the number of new ligands in the registry
+        """
+
+        return len(self.ligands_list)
+
+    def has_smiles(self, smiles):
+        """
+        Check if a SMILES string has already been made.
+
+        Inputs:
+        :param str smiles: a SMILES string
+
+        Returns:
+        :returns: bool has_smiles: True if it has already been made
+        """
+
+        return smiles in self.smiles_set
+
+    def make_unique_id(self, id_prefix):
+        """
+        Make an ID which is not yet used by appending a random number to a
+        prefix.
+
+        Inputs:
+        :param str id_prefix: the start of the ID. ie.
+            '(ZINC123)Gen_1_Mutant_7'
+
+        Returns:
+        :returns: str new_lig_id: a unique ID. ie.
+            '(ZINC123)Gen_1_Mutant_7_12345'
+        """
+
+        while True:
+            random_id_num = random.randint(100, 1000000)
+            new_lig_id = "{}_{}".format(id_prefix, random_id_num)
+            if new_lig_id not in self.id_set:
+                return new_lig_id
+
+    def add_ligand(self, smiles, id_prefix):
+        """
+        Add a ligand to the registry with a unique ID, unless its SMILES
+        string has already been made.
+
+        Inputs:
+        :param str smiles: the SMILES string of the new ligand
+        :param str id_prefix: the start of the ID. A random number is
+            appended to make it unique.
+
+        Returns:
+        :returns: bool added: True if the ligand was added; False if it is a
+            duplicate
+        """
+
+        if smiles in self.smiles_set:
+            return False
+
+        new_lig_id = self.make_unique_id(id_prefix)
+
+        self.smiles_set.add(smiles)
+        self.id_set.add(new_lig_id)
+        self.ligands_list.append([smiles, new_lig_id])
+
+        return True
+
+
+class AdaptiveBatchScheduler(object):
+    """
+    Picks the seed ligands for each batch of operator jobs. The batch size
+    is set from the success rate of the previous batch.
+    """
+
+    def __init__(
+        self,
+        seed_list,
+        number_of_processors,
+        max_passes=MAX_PASSES_THROUGH_SEED_LIST,
+        overshoot=1.25,
+        max_growth=8,
+    ):
+        """
+        Initialize the scheduler.
+
+        Inputs:
+        :param list seed_list: the seed ligands to react. Seeds are taken from
+            the end of the list, and the list is started again once they have
+            all been used.
+        :param int number_of_processors: the number of processors. Batch sizes
+            are rounded up to a multiple of this.
+        :param int max_passes: the number of times to go through seed_list
+            before giving up
+        :param float overshoot: how many more jobs than the estimate to send,
+            so that an unlucky batch doesn't take another round
+        :param int max_growth: the most a batch can grow compared to the
+            previous batch
+        """
+
+        self.seed_list = seed_list
+        self.number_of_processors = max(1, int(number_of_processors))
+        self.max_jobs = max_passes * len(seed_list)
+        self.overshoot = overshoot
+        self.max_growth = max_growth
+
+        self.next_seed_index = len(seed_list) - 1
+        self.num_jobs_dispatched = 0
+        self.last_batch_size = 0
+        self.last_batch_success_rate = None
+
+    def is_exhausted(self):
+        """
+        Check if the scheduler has run out of attempts.
+
+        Returns:
+        :returns: bool is_exhausted: True if no more batches should be run
+        """
+
+        return len(self.seed_list) == 0 or self.num_jobs_dispatched >= self.max_jobs
+
+    def get_batch_size(self, num_still_needed):
+        """
+        Get the number of jobs to run in the next batch.
+
+        Inputs:
+        :param int num_still_needed: the number of ligands still needed
+
+        Returns:
+        :returns: int batch_size: the number of jobs to run
+        """
+
+        if self.last_batch_success_rate is None:
+            # First batch. One job per ligand needed.
+            batch_size = num_still_needed
+        else:
+            batch_size = int(
+                math.ceil(
+                    self.overshoot * num_still_needed / self.last_batch_success_rate
+                )
+            )
+            batch_size = min(batch_size, self.max_growth * self.last_batch_size)
+
+        # Give every processor the same number of jobs
+        batch_size = max(batch_size, self.number_of_processors)
+        batch_size = self.number_of_processors * int(
+            math.ceil(float(batch_size) / self.number_of_processors)
+        )
+
+        return max(1, min(batch_size, self.max_jobs - self.num_jobs_dispatched))
+
+    def get_next_batch(self, num_still_needed):
+        """
+        Get the seed ligands for the next batch of jobs.
+
+        Inputs:
+        :param int num_still_needed: the number of ligands still needed
+
+        Returns:
+        :returns: list batch: the seed ligands to react. A seed can appear more
+            than once if the batch is bigger than the seed list.
+        """
+
+        batch_size = self.get_batch_size(num_still_needed)
+
+        batch = []
+        for _ in range(batch_size):
+            batch.append(self.seed_list[self.next_seed_index])
+            self.next_seed_index = self.next_seed_index - 1
+            if self.next_seed_index < 0:
+                self.next_seed_index = len(self.seed_list) - 1
+
+        self.num_jobs_dispatched = self.num_jobs_dispatched + batch_size
+        self.last_batch_size = batch_size
+
+        return batch
+
+    def record_batch(self, num_jobs, num_added):
+        """
+        Record how many new ligands the last batch made.
+
+        Inputs:
+        :param int num_jobs: the number of jobs in the batch
+        :param int num_added: the number of new unique ligands it made
+        """
+
+        # Add one success so a batch which made nothing doesn't give a rate
+        # of zero
+        self.last_batch_success_rate = (num_added + 1.0) / (num_jobs + 1.0)
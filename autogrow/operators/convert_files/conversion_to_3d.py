@@ -4,6 +4,7 @@ Run file type conversions from .smi to .sdf to .pdb
 import __future__
 
 import glob
+import math
 import sys
 import os
 from os.path import basename
@@ -30,7 +31,28 @@ GYPSUM_GYPSUM_DIR = (
 sys.path.extend([GYPSUM_DIR, CURRENT_DIR, GYPSUM_GYPSUM_DIR])
 
 import autogrow.operators.convert_files.gypsum_dl.gypsum_dl.MolObjectHandling as MOH
+import autogrow.docking.docking_class.docking_file_conversion.convert_with_rdkit as RDKitPDBQT
+import autogrow.utils.job_costs as JobCosts
+import autogrow.utils.checkpoint_journal as CheckpointJournal
+import autogrow.utils.stage_metrics as StageMetrics
 from autogrow.operators.convert_files.gypsum_dl.gypsum_dl.Start import prepare_molecules
+from autogrow.operators.convert_files.gypsum_dl.gypsum_dl.Start import (
+    set_parameters,
+    execute_gypsum_dl,
+    detect_unassigned_bonds,
+)
+from autogrow.operators.convert_files.gypsum_dl.gypsum_dl.MolContainer import (
+    MolContainer,
+)
+from autogrow.operators.convert_files.gypsum_dl.gypsum_dl.Parallelizer import (
+    Parallelizer,
+)
+
+# When converting in batches, each processor is given about this many batches
+# so a slow batch doesn't leave the other processors idle at the end
+GYPSUM_BATCHES_PER_PROCESSOR = 4
+# The most ligands put in a single batch
+MAX_GYPSUM_BATCH_SIZE = 50
 
 
 class StdoutRedirection:
@@ -74,6 +96,7 @@ class StdoutRedirection:
         sys.stdout = sys.__stdout__
 
 
+@StageMetrics.timed_stage("convert_to_3d")
 def convert_to_3d(vars, smi_file, smile_file_directory):
     """
     This function converts SMILES from 1D to 3D using gypsum Gypsum converts
@@ -87,20 +110,66 @@ def convert_to_3d(vars, smi_file, smile_file_directory):
         .smi file
     """
 
+    # Ligands converted by an earlier attempt at this generation (see
+    # checkpoint_journal.py) aren't converted again
+    converted_ligands = CheckpointJournal.get_completed(
+        smile_file_directory, CheckpointJournal.CONVERTED_LIGAND_STAGE
+    )
+    if len(converted_ligands) != 0:
+        ligands_to_convert = [
+            x for x in get_ligand_short_names(smi_file) if x not in converted_ligands
+        ]
+        print(
+            "{} LIGANDS WERE ALREADY CONVERTED TO 3D. CONVERTING THE OTHER {}".format(
+                len(converted_ligands), len(ligands_to_convert)
+            )
+        )
+        if len(ligands_to_convert) == 0:
+            return
+
     print("CONVERTING SMILES TO SDF")
     # convert smiles in an .SMI file to sdfs using gypsum
     gypsum_output_folder_path = convert_smi_to_sdfs_with_gypsum(
-        vars, smi_file, smile_file_directory
+        vars, smi_file, smile_file_directory, converted_ligands
     )
     print("CONVERTING SMILES TO SDF COMPLETED")
 
     print("CONVERTING SDF TO PDB")
     # convert sdf files to PDBs using rdkit
-    convert_sdf_to_pdbs(vars, smile_file_directory, gypsum_output_folder_path)
+    convert_sdf_to_pdbs(
+        vars, smile_file_directory, gypsum_output_folder_path, converted_ligands
+    )
     print("CONVERTING SDF TO PDB COMPLETED")
 
 
-def convert_smi_to_sdfs_with_gypsum(vars, gen_smiles_file, smile_file_directory):
+def get_ligand_short_names(smi_file):
+    """
+    Get the abridged name of every ligand in a .smi file. See
+    get_ligand_short_name().
+
+    Inputs:
+    :param str smi_file: the file name of the .smi file
+
+    Returns:
+    :returns: list lig_names_short: the abridged name of every ligand
+    """
+
+    lig_names_short = []
+    with open(smi_file) as smiles_file:
+        for line in smiles_file:
+            line = line.replace("\n", "")
+            line = line.replace("    ", "\t")
+            parts = line.split("\t")
+            if len(parts) < 2:
+                continue
+            lig_names_short.append(get_ligand_short_name(parts[1]))
+
+    return lig_names_short
+
+
+def convert_smi_to_sdfs_with_gypsum(
+    vars, gen_smiles_file, smile_file_directory, skip_ligands=None
+):
     """
     Convert a file of SMILES to a set of 3d .sdf files using Gypsum. This does
     so by making a set of .json files for running Gypsum for every ligand in
@@ -114,12 +183,82 @@ def convert_smi_to_sdfs_with_gypsum(vars, gen_smiles_file, smile_file_directory)
         to 3D sdf's
     :param srt smile_file_directory: the directory path which contains the
         .smi file
+    :param dict skip_ligands: the short names of ligands not to convert. If
+        None all of the ligands are converted.
 
     Returns:
     :returns: str gypsum_output_folder_path: a path to the folder with all of
         the 3D sdf's created by gypsum.
     """
 
+    if vars["batch_gypsum_conversion"] is True:
+        gypsum_output_folder_path, job_input = make_gypsum_batch_job_inputs(
+            vars, gen_smiles_file, smile_file_directory, skip_ligands
+        )
+
+        sys.stdout.flush()
+        failed_to_convert = StageMetrics.run_jobs(
+            vars["parallelizer"],
+            "gypsum",
+            job_input,
+            run_gypsum_batch,
+            count_failures=len,
+            count_items=lambda log_path, params, ligand_batch, timeout: len(
+                ligand_batch
+            ),
+            job_cost_func=get_gypsum_batch_job_cost,
+        )
+        failed_to_convert = [x for batch in failed_to_convert for x in batch]
+        sys.stdout.flush()
+    else:
+        gypsum_output_folder_path, job_input = make_gypsum_job_inputs(
+            vars, gen_smiles_file, smile_file_directory, skip_ligands
+        )
+
+        sys.stdout.flush()
+        failed_to_convert = StageMetrics.run_jobs(
+            vars["parallelizer"],
+            "gypsum",
+            job_input,
+            run_gypsum_multiprocessing,
+            count_failures=lambda result: result is not None,
+            job_cost_func=get_gypsum_job_cost,
+        )
+        sys.stdout.flush()
+
+    lig_failed_to_convert = [x for x in failed_to_convert if x is not None]
+    lig_failed_to_convert = list(set(lig_failed_to_convert))
+    if len(lig_failed_to_convert) > 0:
+        print("The Following ligands Failed to convert in Gypsum")
+        print("Likely due to a Timeout")
+        print(lig_failed_to_convert)
+    sys.stdout.flush()
+    return gypsum_output_folder_path
+
+
+def make_gypsum_job_inputs(
+    vars, gen_smiles_file, smile_file_directory, skip_ligands=None
+):
+    """
+    Make the folders Gypsum-DL writes to and the job inputs for
+    run_gypsum_multiprocessing, one per ligand in the .smi file.
+
+    Inputs:
+    :param dict vars: User variables which will govern how the programs runs
+    :param str gen_smiles_file: the file name of the .smi file to be converted
+        to 3D sdf's
+    :param srt smile_file_directory: the directory path which contains the
+        .smi file
+    :param dict skip_ligands: the short names of ligands to leave out. If
+        None there is a job for every ligand.
+
+    Returns:
+    :returns: str gypsum_output_folder_path: a path to the folder which will
+        contain all of the 3D sdf's created by gypsum.
+    :returns: tuple job_input: a tuple of (gypsum_log_path, gypsum_params,
+        gypsum_timeout_limit) tuples
+    """
+
     max_variants_per_compound = vars["max_variants_per_compound"]
     gypsum_thoroughness = vars["gypsum_thoroughness"]
     min_ph = vars["min_ph"]
@@ -127,6 +266,50 @@ def convert_smi_to_sdfs_with_gypsum(vars, gen_smiles_file, smile_file_directory)
     pka_precision = vars["pka_precision"]
     gypsum_timeout_limit = vars["gypsum_timeout_limit"]
 
+    folder_path, gypsum_output_folder_path, gypsum_log_path = make_gypsum_folders(
+        smile_file_directory
+    )
+
+    # Make All of the json files to submit to gypsum
+    list_of_gypsum_params = make_smi_and_gyspum_params(
+        gen_smiles_file,
+        folder_path,
+        gypsum_output_folder_path,
+        max_variants_per_compound,
+        gypsum_thoroughness,
+        min_ph,
+        max_ph,
+        pka_precision,
+        skip_ligands,
+    )
+
+    # create a the job_inputs to run gypsum in multithread
+    job_input = tuple(
+        [
+            tuple([gypsum_log_path, gypsum_params, gypsum_timeout_limit,])
+            for gypsum_params in list_of_gypsum_params
+        ]
+    )
+
+    return gypsum_output_folder_path, job_input
+
+
+def make_gypsum_folders(smile_file_directory):
+    """
+    Make the folders Gypsum-DL reads from and writes to.
+
+    Inputs:
+    :param srt smile_file_directory: the directory path which contains the
+        .smi file
+
+    Returns:
+    :returns: str folder_path: a path to the folder for the gypsum .smi's and
+        json
+    :returns: str gypsum_output_folder_path: a path to the folder which will
+        contain all of the 3D sdf's created by gypsum.
+    :returns: str gypsum_log_path: a path to the folder for the gypsum logs
+    """
+
     # Make a new folder to put gypsum .smi's and json. Name folder
     # gypsum_submission_files.
     folder_path = "{}gypsum_submission_files{}".format(smile_file_directory, os.sep)
@@ -143,38 +326,87 @@ def convert_smi_to_sdfs_with_gypsum(vars, gen_smiles_file, smile_file_directory)
     if os.path.exists(gypsum_log_path) is False:
         os.makedirs(gypsum_log_path)
 
-    # Make All of the json files to submit to gypsum
-    list_of_gypsum_params = make_smi_and_gyspum_params(
+    return folder_path, gypsum_output_folder_path, gypsum_log_path
+
+
+def make_gypsum_batch_job_inputs(
+    vars, gen_smiles_file, smile_file_directory, skip_ligands=None
+):
+    """
+    Make the folders Gypsum-DL writes to and the job inputs for
+    run_gypsum_batch. The ligands in the .smi file are split into batches
+    so each job converts several ligands with the same Gypsum-DL settings.
+
+    Inputs:
+    :param dict vars: User variables which will govern how the programs runs
+    :param str gen_smiles_file: the file name of the .smi file to be converted
+        to 3D sdf's
+    :param srt smile_file_directory: the directory path which contains the
+        .smi file
+    :param dict skip_ligands: the short names of ligands to leave out. If
+        None every ligand is put in a batch.
+
+    Returns:
+    :returns: str gypsum_output_folder_path: a path to the folder which will
+        contain all of the 3D sdf's created by gypsum.
+    :returns: tuple job_input: a tuple of (gypsum_log_path, gypsum_params,
+        ligand_batch, gypsum_timeout_limit) tuples
+    """
+
+    folder_path, gypsum_output_folder_path, gypsum_log_path = make_gypsum_folders(
+        smile_file_directory
+    )
+
+    gypsum_params = make_gypsum_params(
         gen_smiles_file,
-        folder_path,
         gypsum_output_folder_path,
-        max_variants_per_compound,
-        gypsum_thoroughness,
-        min_ph,
-        max_ph,
-        pka_precision,
+        vars["max_variants_per_compound"],
+        vars["gypsum_thoroughness"],
+        vars["min_ph"],
+        vars["max_ph"],
+        vars["pka_precision"],
     )
 
-    # create a the job_inputs to run gypsum in multithread
+    ligands = []
+    with open(gen_smiles_file) as smiles_file:
+        for line in smiles_file:
+            if line == "\n":
+                continue
+            line = line.replace("\n", "")
+            line = line.replace("    ", "\t")
+            parts = line.split("\t")
+            if len(parts) < 2:
+                print(parts)
+                continue
+            lig_name_short = get_ligand_short_name(parts[1])
+            if skip_ligands is not None and lig_name_short in skip_ligands:
+                continue
+            ligands.append([parts[0], lig_name_short])
+
+    # Give each processor a few batches so the work stays balanced
+    number_of_processors = int(vars["parallelizer"].return_node())
+    batch_size = int(
+        math.ceil(
+            float(len(ligands)) / (number_of_processors * GYPSUM_BATCHES_PER_PROCESSOR)
+        )
+    )
+    batch_size = min(max(batch_size, 1), MAX_GYPSUM_BATCH_SIZE)
+
     job_input = tuple(
         [
-            tuple([gypsum_log_path, gypsum_params, gypsum_timeout_limit,])
-            for gypsum_params in list_of_gypsum_params
+            tuple(
+                [
+                    gypsum_log_path,
+                    gypsum_params,
+                    ligands[i : i + batch_size],
+                    vars["gypsum_timeout_limit"],
+                ]
+            )
+            for i in range(0, len(ligands), batch_size)
         ]
     )
 
-    sys.stdout.flush()
-    failed_to_convert = vars["parallelizer"].run(job_input, run_gypsum_multiprocessing)
-    sys.stdout.flush()
-
-    lig_failed_to_convert = [x for x in failed_to_convert if x is not None]
-    lig_failed_to_convert = list(set(lig_failed_to_convert))
-    if len(lig_failed_to_convert) > 0:
-        print("The Following ligands Failed to convert in Gypsum")
-        print("Likely due to a Timeout")
-        print(lig_failed_to_convert)
-    sys.stdout.flush()
-    return gypsum_output_folder_path
+    return gypsum_output_folder_path, job_input
 
 
 def make_smi_and_gyspum_params(
@@ -186,6 +418,7 @@ def make_smi_and_gyspum_params(
     min_ph,
     max_ph,
     pka_precision,
+    skip_ligands=None,
 ):
     """
     Make an individual .smi file and parameter dictionary to submit to Gypsum
@@ -212,6 +445,8 @@ def make_smi_and_gyspum_params(
         Dimorphite-DL
     :param float pka_precision: User variable for Size of pH substructure
         ranges by Dimorphite-DL
+    :param dict skip_ligands: the short names of ligands to leave out. If
+        None every ligand is included.
 
     Returns:
     :returns: list list_of_gypsum_params: a list of dictionaries. Each
@@ -238,26 +473,9 @@ def make_smi_and_gyspum_params(
             # split the name
 
             ligand_name = parts[1]
-            if len(ligand_name.split(")")) == 2:
-                lig_name_short = ligand_name.split(")")[1]
-            elif len(ligand_name.split(")")) == 1:
-                lig_name_short = ligand_name
-            else:
-                printout = "Ligand name failed to abridge. Smiles may be \
-                            named in improper format please separate with _ \
-                            or camelcase. Our formatting is: \
-                            (Gen_2_Cross_631+Gen_3_Cross_744)Gen_4_Cross_702 \
-                            which reads as Gen_34_Cross_702 (aka ligand 702) \
-                            was produced by crossover using ligands: \
-                            Gen_2_Cross_631 and Gen_3_Cross_744. \
-                            This will abridge to Gen_4_Cross_702 for saving \
-                            files.\nThe failed ligand name was \
-                            {}".format(
-                    ligand_name
-                )
-
-                print(printout)
-                raise Exception(printout)
+            lig_name_short = get_ligand_short_name(ligand_name)
+            if skip_ligands is not None and lig_name_short in skip_ligands:
+                continue
 
             smi_line = "{}\t{}".format(smile, lig_name_short)
 
@@ -268,37 +486,121 @@ def make_smi_and_gyspum_params(
                 smi_file.write(smi_line)
 
             # Make .json file
-            gypsum_params = {
-                "source": smi_path,
-                "output_folder": gypsum_output_folder_path,
-                "num_processors": 1,
-                "job_manager": "serial",
-                "use_durrant_lab_filters": True,
-                "max_variants_per_compound": max_variance,
-                "thoroughness": gypsum_thoroughness,
-                "separate_output_files": True,
-                "add_pdb_output": False,
-                "add_html_output": False,
-                "min_ph": min_ph,
-                "max_ph": max_ph,
-                "pka_precision": pka_precision,
-                "skip_optimize_geometry": False,
-                "skip_alternate_ring_conformations": False,
-                "skip_adding_hydrogen": False,
-                "skip_making_tautomers": False,
-                "skip_enumerate_chiral_mol": False,
-                "skip_enumerate_double_bonds": False,
-                "let_tautomers_change_chirality": False,
-                "2d_output_only": False,
-                "cache_prerun": False,
-                "test": False,
-            }
+            gypsum_params = make_gypsum_params(
+                smi_path,
+                gypsum_output_folder_path,
+                max_variance,
+                gypsum_thoroughness,
+                min_ph,
+                max_ph,
+                pka_precision,
+            )
 
             list_of_gypsum_params.append(gypsum_params)
 
     return list_of_gypsum_params
 
 
+def get_ligand_short_name(ligand_name):
+    """
+    Abridge a ligand name to the name its files are saved under.
+
+    ie) (Gen_30_Cross_639427+Gen_31_Cross_717928)Gen_34_Cross_709666 becomes
+    Gen_34_Cross_709666. Names of ligands from the source files are not
+    changed.
+
+    Inputs:
+    :param str ligand_name: the full name of the ligand
+
+    Returns:
+    :returns: str lig_name_short: the abridged name of the ligand
+    """
+
+    if len(ligand_name.split(")")) == 2:
+        lig_name_short = ligand_name.split(")")[1]
+    elif len(ligand_name.split(")")) == 1:
+        lig_name_short = ligand_name
+    else:
+        printout = "Ligand name failed to abridge. Smiles may be \
+                    named in improper format please separate with _ \
+                    or camelcase. Our formatting is: \
+                    (Gen_2_Cross_631+Gen_3_Cross_744)Gen_4_Cross_702 \
+                    which reads as Gen_34_Cross_702 (aka ligand 702) \
+                    was produced by crossover using ligands: \
+                    Gen_2_Cross_631 and Gen_3_Cross_744. \
+                    This will abridge to Gen_4_Cross_702 for saving \
+                    files.\nThe failed ligand name was \
+                    {}".format(
+            ligand_name
+        )
+
+        print(printout)
+        raise Exception(printout)
+
+    return lig_name_short
+
+
+def make_gypsum_params(
+    source,
+    gypsum_output_folder_path,
+    max_variance,
+    gypsum_thoroughness,
+    min_ph,
+    max_ph,
+    pka_precision,
+):
+    """
+    Make the dictionary of Gypsum-DL parameters used to convert ligands to 3D.
+
+    Inputs:
+    :param str source: the .smi file of the ligands to convert
+    :param str gypsum_output_folder_path: a path to the folder with all of the
+        3D sdf's created by gypsum.
+    :param int max_variance: User variable for how many conformers per ligand
+        should be made by Gypsum
+    :param int gypsum_thoroughness: User variable for How widely Gypsum-DL
+        will search for low-energy conformers. Larger values increase run times
+        but can produce better results
+    :param float min_ph: User variable for Minimum pH to consider by
+        Dimorphite-DL
+    :param float max_ph: User variable for Maximum pH to consider by
+        Dimorphite-DL
+    :param float pka_precision: User variable for Size of pH substructure
+        ranges by Dimorphite-DL
+
+    Returns:
+    :returns: dict gypsum_params: the Gypsum-DL parameters
+    """
+
+    gypsum_params = {
+        "source": source,
+        "output_folder": gypsum_output_folder_path,
+        "num_processors": 1,
+        "job_manager": "serial",
+        "use_durrant_lab_filters": True,
+        "max_variants_per_compound": max_variance,
+        "thoroughness": gypsum_thoroughness,
+        "separate_output_files": True,
+        "add_pdb_output": False,
+        "add_html_output": False,
+        "min_ph": min_ph,
+        "max_ph": max_ph,
+        "pka_precision": pka_precision,
+        "skip_optimize_geometry": False,
+        "skip_alternate_ring_conformations": False,
+        "skip_adding_hydrogen": False,
+        "skip_making_tautomers": False,
+        "skip_enumerate_chiral_mol": False,
+        "skip_enumerate_double_bonds": False,
+        "let_tautomers_change_chirality": False,
+        "2d_output_only": False,
+        "cache_prerun": False,
+        "test": False,
+    }
+
+    return gypsum_params
+
+
 def run_gypsum_multiprocessing(gypsum_log_path, gypsum_params, gypsum_timeout_limit):
     """
     This converts the a single ligand from a SMILE to a 3D SDF using Gypsum.
@@ -348,6 +650,184 @@ def run_gypsum_multiprocessing(gypsum_log_path, gypsum_params, gypsum_timeout_li
     return None
 
 
+def get_gypsum_job_cost(gypsum_log_path, gypsum_params, gypsum_timeout_limit):
+    """
+    Estimate how long a run_gypsum_multiprocessing job will take relative to
+    the others, from the size and flexibility of its ligand. This takes the
+    same inputs as run_gypsum_multiprocessing.
+
+    Inputs:
+    :param str gypsum_log_path: a path to the folder to place the log files
+        produced when running gypsum.
+    :param dict gypsum_params: dictionary of params to be feed to Gypsum-DL to
+        convert to 3D sdf for a single ligand
+    :param int gypsum_timeout_limit: the maximum amount of time to run Gypsum
+        per ligand
+
+    Returns:
+    :returns: float cost: the relative cost of the job
+    """
+
+    return JobCosts.get_smi_file_cost(gypsum_params["source"])
+
+
+def get_gypsum_batch_job_cost(
+    gypsum_log_path, gypsum_params, ligand_batch, gypsum_timeout_limit
+):
+    """
+    Estimate how long a run_gypsum_batch job will take relative to the
+    others, from the size and flexibility of its ligands. This takes the same
+    inputs as run_gypsum_batch.
+
+    Inputs:
+    :param str gypsum_log_path: a path to the folder to place the log files
+        produced when running gypsum.
+    :param dict gypsum_params: dictionary of params to be feed to Gypsum-DL
+    :param list ligand_batch: a list of [SMILES, lig_id] lists to convert
+    :param int gypsum_timeout_limit: the maximum amount of time to run Gypsum
+        per ligand
+
+    Returns:
+    :returns: float cost: the relative cost of the job
+    """
+
+    return sum([JobCosts.get_smiles_cost(ligand[0]) for ligand in ligand_batch])
+
+
+def run_gypsum_batch(
+    gypsum_log_path, gypsum_params, ligand_batch, gypsum_timeout_limit
+):
+    """
+    Convert a batch of ligands from SMILES to 3D SDFs using Gypsum. This is
+    used within a multithread.
+
+    Unlike run_gypsum_multiprocessing, the Gypsum-DL parameters are set up
+    once for the whole batch and the ligands are passed to Gypsum-DL in
+    memory rather than through a .smi file. Each ligand still has its own
+    timeout, its own log file and its own .sdf file.
+
+    Inputs:
+    :param str gypsum_log_path: a path to the folder to place the log files
+        produced when running gypsum.
+    :param dict gypsum_params: dictionary of params to be feed to Gypsum-DL
+    :param list ligand_batch: a list of [SMILES, lig_id] lists to convert
+    :param int gypsum_timeout_limit: this is taken from
+        vars["gypsum_timeout_limit"]. It determines the maximum amount of time to
+        run Gypsum per ligand
+
+    Returns:
+    :returns: list failed_lig_ids: the names of the ligands which failed to
+        convert to 3D sdf.
+    """
+
+    params = set_parameters(gypsum_params)
+    # Each ligand is run in this process, one step at a time
+    params["Parallelizer"] = Parallelizer("serial", 1, True)
+    if os.path.exists(params["output_folder"]) is False:
+        os.makedirs(params["output_folder"])
+
+    failed_lig_ids = []
+    for smile, lig_id in ligand_batch:
+        log_file = "{}{}_log.txt".format(gypsum_log_path, lig_id)
+        try:
+            with StdoutRedirection(log_file):
+                made_3d_mols = func_timeout(
+                    gypsum_timeout_limit,
+                    run_gypsum_on_single_ligand,
+                    args=(smile, lig_id, params),
+                )
+            sys.stdout.flush()
+        except:
+            # This Ligand Timed out
+            made_3d_mols = False
+
+        if made_3d_mols is False:
+            failed_lig_ids.append(lig_id)
+
+    return failed_lig_ids
+
+
+def run_gypsum_on_single_ligand(smile, lig_id, params):
+    """
+    Run every Gypsum-DL step on a single ligand which is already in memory.
+    Gypsum-DL writes the ligand's .sdf file to params["output_folder"].
+
+    Inputs:
+    :param str smile: the SMILES string of the ligand
+    :param str lig_id: the name of the ligand
+    :param dict params: the Gypsum-DL parameters from set_parameters
+
+    Returns:
+    :returns: bool made_3d_mols: True if any 3D models were made for the
+        ligand; False if not.
+    """
+
+    if detect_unassigned_bonds(smile) is None:
+        print("WARNING: Throwing out SMILES because of unassigned bonds: " + smile)
+        return False
+
+    contnr = MolContainer(smile, lig_id, 0, {})
+    if type(contnr.orig_smi_canonical) != str:
+        print(
+            "WARNING: Throwing out SMILES because it couldn't convert to mol: "
+            + smile
+        )
+        return False
+
+    execute_gypsum_dl([contnr], params)
+
+    return len(contnr.mols) != 0
+
+
+def convert_single_ligand_to_pdbs(
+    gypsum_log_path,
+    gypsum_params,
+    gypsum_timeout_limit,
+    pdb_subfolder_path,
+    make_pdbqt=False,
+):
+    """
+    Convert a single ligand from a SMILE to 3D SDF with Gypsum and then
+    convert its SDF to PDB files. This runs both steps for one ligand in the
+    same job so the ligand does not wait for every other ligand between the
+    two steps.
+
+    Inputs:
+    :param str gypsum_log_path: a path to the folder to place the log files
+        produced when running gypsum.
+    :param dict gypsum_params: dictionary of params to be feed to Gypsum-DL to
+        convert to 3D sdf for a single ligand
+    :param int gypsum_timeout_limit: this is taken from
+        vars["gypsum_timeout_limit"]. It determines the maximum amount of time to
+        run Gypsum per ligand
+    :param str pdb_subfolder_path: Path of the folder to place all created pdb
+        files
+    :param bool make_pdbqt: if True also write a .pdbqt file for each .pdb
+        file. Defaults to False.
+
+    Returns:
+    :returns: str lig_id: the name of the ligand if it failed or None if it
+        successfully converted to 3D sdf.
+    :returns: list pdb_files: the pdb files made for the ligand
+    """
+
+    failed_lig_id = run_gypsum_multiprocessing(
+        gypsum_log_path, gypsum_params, gypsum_timeout_limit
+    )
+    if failed_lig_id is not None:
+        return failed_lig_id, []
+
+    lig_id = gypsum_params["source"].split(os.sep)[-1].replace(".smi", "")
+    sdf_files = glob.glob(
+        gypsum_params["output_folder"] + os.sep + lig_id + "__input*.sdf"
+    )
+    for sdf_file in sdf_files:
+        convert_single_sdf_to_pdb(pdb_subfolder_path, sdf_file, make_pdbqt)
+
+    pdb_files = glob.glob(pdb_subfolder_path + lig_id + "__*.pdb")
+    return None, pdb_files
+
+
 def check_gypsum_log_did_complete(log_file_path):
     """
     This function checks a log_file_path to see if the last line reads
@@ -394,7 +874,7 @@ def check_gypsum_log_did_complete(log_file_path):
     return True
 
 
-def convert_sdf_to_pdbs(vars, gen_folder_path, sdfs_folder_path):
+def convert_sdf_to_pdbs(vars, gen_folder_path, sdfs_folder_path, skip_ligands=None):
     """
     It will find any .sdf files within the folder_path and convert them to
     .pdb types using rdkit.Chem. It also makes a subfolder to store the pdb
@@ -405,6 +885,8 @@ def convert_sdf_to_pdbs(vars, gen_folder_path, sdfs_folder_path):
     :param str gen_folder_path: Path of the folder for the current generation
     :param str sdfs_folder_path: Path of the folder with all of the 3D .sdf
         files to convert
+    :param dict skip_ligands: the short names of ligands whose .sdf files
+        were already converted. If None all of the .sdf files are converted.
     """
 
     files = []
@@ -431,14 +913,25 @@ def convert_sdf_to_pdbs(vars, gen_folder_path, sdfs_folder_path):
     if not os.path.isdir(pdb_subfolder_path):
         os.makedirs(pdb_subfolder_path)
 
+    # RDKitConversion's PDBQTs are written with the PDBs
+    make_pdbqt = vars["conversion_choice"] == "RDKitConversion"
+
     job_inputs = []
     for file_path in files:
         if "params" in file_path:
             continue
-        job_inputs.append(tuple([pdb_subfolder_path, file_path]))
+        if (
+            skip_ligands is not None
+            and basename(file_path).split("__input1")[0] in skip_ligands
+        ):
+            continue
+        job_inputs.append(tuple([pdb_subfolder_path, file_path, make_pdbqt]))
     job_inputs = tuple(job_inputs)
 
     # Check that there are .sdf files to test. If not raise Exception
+    if len(job_inputs) == 0 and skip_ligands is not None and len(skip_ligands) != 0:
+        # Everything Gypsum-DL made was converted by an earlier attempt
+        return
     if len(job_inputs) == 0:
         printout = "\n\nThere are no SDF files were found to convert to PDB. "
         printout = printout + "This may be a problem with the Gypsum-DL "
@@ -450,18 +943,28 @@ def convert_sdf_to_pdbs(vars, gen_folder_path, sdfs_folder_path):
         raise Exception(printout)
 
     # Convert sdf files to pdbs in multithread
-    vars["parallelizer"].run(job_inputs, convert_single_sdf_to_pdb)
+    StageMetrics.run_jobs(
+        vars["parallelizer"], "sdf_to_pdb", job_inputs, convert_single_sdf_to_pdb
+    )
 
 
-def convert_single_sdf_to_pdb(pdb_subfolder_path, sdf_file_path):
+def convert_single_sdf_to_pdb(pdb_subfolder_path, sdf_file_path, make_pdbqt=False):
     """
     This will convert a given .sdf into separate .pdb files.
 
+    Each PDB is written once, with the REMARK of its final SMILES string
+    already in place. If make_pdbqt is True, the PDBQT of each variant is also
+    written straight from the RDKit mol (ie. --conversion_choice
+    RDKitConversion), so the PDB doesn't need to be read back and converted
+    later.
+
     Inputs:
     :param str pdb_subfolder_path: Path of the folder to place all created pdb
         files
     :param str sdf_file_path: Path of the sdf_file_path to convert to pdb
         files
+    :param bool make_pdbqt: if True also write a .pdbqt file for each .pdb
+        file. Defaults to False.
     """
 
     if os.path.exists(sdf_file_path) is True:
@@ -478,64 +981,73 @@ def convert_single_sdf_to_pdb(pdb_subfolder_path, sdf_file_path):
         except:
             mols = None
 
+        # The number of PDB files written
+        counter = 0
+
         # if mols is None rdkit couldn't import the sdf so we will not do anything else
         if mols is None:
             pass
         elif len(mols) == 0:
             pass
         else:
-            try:
-                mols_no_hydrogen = Chem.SDMolSupplier(
-                    sdf_file_path, sanitize=True, removeHs=True, strictParsing=False
-                )
-            except:
-                mols_no_hydrogen = [None for x in range(0, len(mols))]
-
             # if len(mols)==0 gypsum output a blank file by accident
             # if mols is None rdkit couldn't import the sdf
-            if len(mols) != 0:
-                counter = 0
-                for i in range(0, len(mols)):
-                    mol = mols[i]
-                    # Extra precaution to prevent None's within a set of good
-                    # mols
-                    if mol is None:
-                        continue
-
-                    mol = MOH.check_sanitization(mol)
-                    # Filter out any which failed
-                    if mol is None:
-                        continue
-
-                    # pdb_name indexed to 1
-                    pdb_name = "{}_{}.pdb".format(file_output_name, counter + 1)
-                    if mol is not None:  # For extra precaution...
-                        Chem.MolToPDBFile(mol, pdb_name, flavor=32)
-                        # Add header to PDB file with SMILES containing
-                        # protanation and stereochem
-
-                        no_hydrogen_smiles = mols_no_hydrogen[i]
-                        if no_hydrogen_smiles is None:
-                            no_hydrogen_smiles = Chem.MolToSmiles(mol)
-
-                        if no_hydrogen_smiles is None:
-                            print("SMILES was None for: ", pdb_name)
-                            printout = "REMARK Final SMILES string: {}\n".format("None")
-                        elif type(no_hydrogen_smiles) == str:
-                            printout = "REMARK Final SMILES string: {}\n".format(
-                                no_hydrogen_smiles
-                            )
-                        elif type(no_hydrogen_smiles) == type(Chem.MolFromSmiles("C")):
-                            printout = "REMARK Final SMILES string: {}\n".format(
-                                Chem.MolToSmiles(no_hydrogen_smiles)
-                            )
-
-                        with open(pdb_name) as f:
-                            printout = printout + f.read()
-                        with open(pdb_name, "w") as f:
-                            f.write(printout)
-                        printout = ""
-
-                    counter = counter + 1
-            else:
-                pass
+            for i in range(0, len(mols)):
+                mol = mols[i]
+                # Extra precaution to prevent None's within a set of good
+                # mols
+                if mol is None:
+                    continue
+
+                mol = MOH.check_sanitization(mol)
+                # Filter out any which failed
+                if mol is None:
+                    continue
+
+                # pdb_name indexed to 1
+                pdb_name = "{}_{}.pdb".format(file_output_name, counter + 1)
+
+                # Add header to PDB file with SMILES containing
+                # protanation and stereochem. The SMILES comes from the
+                # same SDF entry parsed with sanitization and without
+                # hydrogens.
+                try:
+                    no_hydrogen_mol = Chem.MolFromMolBlock(
+                        mols.GetItemText(i),
+                        sanitize=True,
+                        removeHs=True,
+                        strictParsing=False,
+                    )
+                except:
+                    no_hydrogen_mol = None
+                if no_hydrogen_mol is None:
+                    no_hydrogen_smiles = Chem.MolToSmiles(mol)
+                else:
+                    no_hydrogen_smiles = Chem.MolToSmiles(no_hydrogen_mol)
+
+                if no_hydrogen_smiles is None:
+                    print("SMILES was None for: ", pdb_name)
+                    printout = "REMARK Final SMILES string: {}\n".format("None")
+                else:
+                    printout = "REMARK Final SMILES string: {}\n".format(
+                        no_hydrogen_smiles
+                    )
+
+                printout = printout + Chem.MolToPDBBlock(mol, flavor=32)
+                with open(pdb_name, "w") as f:
+                    f.write(printout)
+
+                if make_pdbqt is True:
+                    name = mol.GetProp("_Name") if mol.HasProp("_Name") else None
+                    RDKitPDBQT.write_ligand_pdbqt(mol, pdb_name + "qt", name)
+
+                counter = counter + 1
+
+        # Only record the ligand if a PDB was made, so a ligand which failed
+        # is converted again when the generation is resumed
+        if counter > 0:
+            CheckpointJournal.record(
+                os.path.dirname(os.path.abspath(pdb_subfolder_path)),
+                CheckpointJournal.CONVERTED_LIGAND_STAGE,
+                file_basename,
+            )
@@ -44,6 +44,11 @@ try:
 except:
     Utils.exception("You need to install rdkit and its dependencies.")
 
+try:
+    import numpy
+except:
+    Utils.exception("You need to install numpy and its dependencies.")
+
 try:
     from gypsum_dl.molvs import standardize_smiles as ssmiles
 except:
@@ -573,7 +578,7 @@ class MyMol:
         self.set_rdkit_mol_prop("Genealogy", genealogy)
         self.set_rdkit_mol_prop("_Name", self.name)
 
-    def add_conformers(self, num, rmsd_cutoff=0.1, minimize=True):
+    def add_conformers(self, num, rmsd_cutoff=0.1, minimize=True, num_threads=1):
         """Add conformers to this molecule.
 
         :param num: The total number of conformers to generate, including ones
@@ -585,26 +590,34 @@ class MyMol:
         :param minimize: Whether or not to minimize the geometry of all these
            conformers. Defaults to True.
         :param minimize: bool, optional
+        :param num_threads: The number of threads RDKit may use to embed and
+           minimize the conformers. -1 uses all available processors.
+           Defaults to 1.
+        :param num_threads: int, optional
         """
 
         # First, do you need to add new conformers? Some might have already
         # been added. Just add enough to meet the requested amount.
         num_new_confs = max(0, num - len(self.conformers))
-        for i in range(num_new_confs):
-            if len(self.conformers) == 0:
-                # For the first one, don't start from random coordinates.
-                new_conf = MyConformer(self)
-            else:
-                # For all subsequent ones, do start from random coordinates.
-                new_conf = MyConformer(self, None, False, True)
+        if num_new_confs > 0 and len(self.conformers) == 0:
+            # For the first one, don't start from random coordinates.
+            new_conf = MyConformer(self)
+            num_new_confs = num_new_confs - 1
 
             if new_conf.mol is not False:
                 self.conformers.append(new_conf)
 
+        if num_new_confs > 0:
+            # For all subsequent ones, do start from random coordinates. These
+            # are all embedded together.
+            self.conformers.extend(
+                self.embed_random_conformers(num_new_confs, num_threads)
+            )
+
         # Are the current ones minimized if necessary?
         if minimize == True:
-            for conf in self.conformers:
-                conf.minimize()  # Won't reminimize if it's already been done.
+            # Won't reminimize the ones that have already been done.
+            self.minimize_conformers(num_threads)
 
         # Automatically sort by the energy.
         self.conformers.sort(key=operator.attrgetter("energy"))
@@ -612,36 +625,120 @@ class MyMol:
         # Remove ones that are very structurally similar.
         self.eliminate_structurally_similar_conformers(rmsd_cutoff)
 
+    def embed_random_conformers(self, num, num_threads=1):
+        """Generates conformers starting from random coordinates. Rather than
+           embedding each conformer separately, they are all embedded with a
+           single AllChem.EmbedMultipleConfs call.
+
+        :param num: The number of conformers to generate.
+        :type num: int
+        :param num_threads: The number of threads RDKit may use. -1 uses all
+           available processors. Defaults to 1.
+        :param num_threads: int, optional
+        :return: A list of the MyConformer objects that could be embedded.
+           Could be shorter than num.
+        :rtype: list
+        """
+
+        mol = copy.deepcopy(self.rdkit_mol)
+        mol.RemoveAllConformers()
+
+        # Same parameters as MyConformer uses for the conformers that start
+        # from random coordinates.
+        try:
+            params = AllChem.ETKDGv2()
+        except:
+            params = AllChem.ETKDG()
+        params.enforcechiral = True
+        params.maxIterations = 0
+        params.useRandomCoords = True
+        params.numThreads = get_rdkit_num_threads(num_threads)
+
+        conf_ids = AllChem.EmbedMultipleConfs(mol, num, params)
+
+        # Copy the conformers out of mol before making the MyConformer
+        # objects, because MyConformer renumbers the conformer it is given.
+        conformers = [Chem.Conformer(mol.GetConformer(i)) for i in conf_ids]
+
+        return [MyConformer(self, conformer) for conformer in conformers]
+
+    def minimize_conformers(self, num_threads=1, conformers=None):
+        """Minimize (optimize) the geometries of conformers that haven't
+           already been optimized. They are all minimized together with a
+           single AllChem.UFFOptimizeMoleculeConfs call.
+
+        :param num_threads: The number of threads RDKit may use. -1 uses all
+           available processors. Defaults to 1.
+        :param num_threads: int, optional
+        :param conformers: The MyConformer objects to minimize. If not
+           specified, all of this molecule's conformers are minimized.
+           Defaults to None.
+        :param conformers: list, optional
+        """
+
+        if conformers is None:
+            conformers = self.conformers
+        conformers = [conf for conf in conformers if conf.minimized == False]
+        if len(conformers) == 0:
+            return
+
+        mol = copy.deepcopy(conformers[0].mol)
+        mol.RemoveAllConformers()
+        for conf in conformers:
+            mol.AddConformer(conf.conformer(), assignId=True)
+
+        try:
+            results = AllChem.UFFOptimizeMoleculeConfs(
+                mol, numThreads=get_rdkit_num_threads(num_threads)
+            )
+        except:
+            # Minimize them one at a time instead, so the ones that can't be
+            # minimized are logged and given a bad energy.
+            for conf in conformers:
+                conf.minimize()
+            return
+
+        for conf, new_conf, result in zip(conformers, mol.GetConformers(), results):
+            conf.conformer(new_conf)
+            conf.energy = result[1]
+            conf.minimized = True
+
     def eliminate_structurally_similar_conformers(self, rmsd_cutoff=0.1):
-        """Eliminates conformers that are very geometrically similar.
+        """Eliminates conformers that are very geometrically similar. The
+           heavy-atom RMSD between every pair of conformers (after aligning
+           them) is calculated at once, and a conformer is removed if it is
+           too similar to any conformer before it that was kept.
 
         :param rmsd_cutoff: The RMSD cutoff to use. Defaults to 0.1
         :param rmsd_cutoff: float, optional
         """
 
-        # Eliminate redundant ones.
-        for i1 in range(0, len(self.conformers) - 1):
-            if self.conformers[i1] is not None:
-                for i2 in range(i1 + 1, len(self.conformers)):
-                    if self.conformers[i2] is not None:
-                        # Align them.
-                        self.conformers[i2] = self.conformers[i1].align_to_me(
-                            self.conformers[i2]
-                        )
-
-                        # Calculate the RMSD.
-                        rmsd = self.conformers[i1].rmsd_to_me(self.conformers[i2])
-
-                        # Replace the second one with None if it's too similar
-                        # to the first.
-                        if rmsd <= rmsd_cutoff:
-                            self.conformers[i2] = None
+        if len(self.conformers) < 2:
+            return
 
-        # Remove all the None entries.
-        while None in self.conformers:
-            self.conformers.remove(None)
+        ids_hvy_atms = self.conformers[0].ids_hvy_atms
+        rmsds = get_aligned_rmsd_matrix(
+            numpy.array(
+                [conf.conformer().GetPositions() for conf in self.conformers]
+            )[:, ids_hvy_atms, :]
+        )
 
-        # Those that remains are only the distinct conformers.
+        # Eliminate redundant ones.
+        keep = []
+        for i2 in range(len(self.conformers)):
+            if not any(rmsds[i1, i2] <= rmsd_cutoff for i1 in keep):
+                keep.append(i2)
+        self.conformers = [self.conformers[i] for i in keep]
+
+        # Those that remains are only the distinct conformers. Align them all
+        # to the first one.
+        mol = copy.deepcopy(self.conformers[0].mol)
+        mol.RemoveAllConformers()
+        for conf in self.conformers:
+            mol.AddConformer(conf.conformer(), assignId=True)
+        AllChem.AlignMolConformers(mol, atomIds=ids_hvy_atms)
+        for conf, aligned_conf in zip(self.conformers, mol.GetConformers()):
+            conf.conformer(aligned_conf)
 
     def count_hyd_bnd_to_carb(self):
         """Count the number of Hydrogens bound to carbons."""
@@ -828,17 +925,16 @@ class MyConformer:
         """
 
         # Add the conformer of the other MyConformer object.
-        self.mol.AddConformer(other_conf.conformer(), assignId=True)
+        last_conf_id = self.mol.AddConformer(other_conf.conformer(), assignId=True)
 
         # Align them.
         AllChem.AlignMolConformers(self.mol, atomIds=self.ids_hvy_atms)
 
         # Reset the conformer of the other MyConformer object.
-        last_conf = self.mol.GetConformers()[-1]
-        other_conf.conformer(last_conf)
+        other_conf.conformer(self.mol.GetConformer(last_conf_id))
 
         # Remove the added conformer.
-        self.mol.RemoveConformer(last_conf.GetId())
+        self.mol.RemoveConformer(last_conf_id)
 
         # Return that other object.
         return other_conf
@@ -866,18 +962,65 @@ class MyConformer:
         amol = MOH.check_sanitization(amol)
         amol = MOH.try_reprotanation(amol)
 
-        # Add the conformer of the other MyConformer object.
-        amol.AddConformer(self.conformer(), assignId=True)
-        amol.AddConformer(other_conf.conformer(), assignId=True)
-
-        # Get the two confs.
-        first_conf = amol.GetConformers()[0]
-        last_conf = amol.GetConformers()[-1]
+        # Add the conformer of the other MyConformer object. Keep the ids of
+        # the two confs (newer RDKit versions don't support indexing
+        # GetConformers() with -1).
+        first_conf_id = amol.AddConformer(self.conformer(), assignId=True)
+        last_conf_id = amol.AddConformer(other_conf.conformer(), assignId=True)
 
         # Return the RMSD.
         amol = MOH.try_deprotanation(amol)
         rmsd = AllChem.GetConformerRMS(
-            amol, first_conf.GetId(), last_conf.GetId(), prealigned=True
+            amol, first_conf_id, last_conf_id, prealigned=True
         )
 
         return rmsd
+
+
+def get_rdkit_num_threads(num_threads):
+    """Converts a number of threads to the value RDKit expects. RDKit uses 0
+       (not -1) to mean all available processors.
+
+    :param num_threads: The number of threads. -1 means all available
+       processors.
+    :type num_threads: int
+    :return: The numThreads value to pass to RDKit.
+    :rtype: int
+    """
+
+    if num_threads == -1:
+        return 0
+    return num_threads
+
+
+def get_aligned_rmsd_matrix(coords):
+    """Calculates the RMSD between every pair of coordinate sets, after
+       optimally superimposing each pair (Kabsch algorithm). All pairs are
+       aligned at once with numpy, rather than one pair at a time.
+
+    :param coords: The coordinate sets, with shape (number of conformers,
+       number of atoms, 3).
+    :type coords: numpy.array
+    :return: The RMSD matrix, with shape (number of conformers, number of
+       conformers).
+    :rtype: numpy.array
+    """
+
+    coords = coords - coords.mean(axis=1, keepdims=True)
+    num_atoms = coords.shape[1]
+
+    # The covariance matrix of every pair, and its singular values.
+    covariances = numpy.einsum("ima,jmb->ijab", coords, coords)
+    singular_values = numpy.linalg.svd(covariances, compute_uv=False)
+
+    # Don't allow reflections.
+    signs = numpy.sign(numpy.linalg.det(covariances))
+    signs[signs == 0] = 1
+    singular_values[:, :, 2] = singular_values[:, :, 2] * signs
+
+    sum_squares = (coords ** 2).sum(axis=(1, 2))
+    msds = (
+        sum_squares[:, None] + sum_squares[None, :] - 2 * singular_values.sum(axis=2)
+    ) / num_atoms
+
+    return numpy.sqrt(numpy.clip(msds, 0, None))
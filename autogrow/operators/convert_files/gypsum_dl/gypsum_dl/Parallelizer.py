@@ -28,8 +28,12 @@ system. (Description provided by Harrison Green.)
 """
 
 import __future__
+import atexit
 import multiprocessing
+import os
+import queue
 import sys
+import traceback
 
 MPI_installed = False
 try:
@@ -39,13 +43,33 @@ try:
 except:
     MPI_installed = False
 
+# The MPI schedules. "static" splits the jobs into one equal chunk per node.
+# "dynamic" has the root node hand out small chunks of jobs as the other
+# nodes finish their last ones.
+MPI_SCHEDULES = ["static", "dynamic"]
+
+# The most jobs handed to a node at a time in the dynamic MPI schedule
+MPI_MAX_JOBS_PER_CHUNK = 8
+
+# Aim for this many chunks per node in the dynamic MPI schedule, so the
+# nodes which get slow jobs can be given fewer of them. Each chunk holds
+# about 1/(MPI_CHUNKS_PER_NODE * number of nodes) of the total cost of the
+# jobs, so the slowest jobs are handed out one at a time.
+MPI_CHUNKS_PER_NODE = 4
+
+# MPI message tags for the dynamic schedule
+MPI_JOB_TAG = 11
+MPI_RESULT_TAG = 12
+
 
 class Parallelizer(object):
     """
     Abstract parallelization class
     """
 
-    def __init__(self, mode=None, num_procs=None, flag_for_low_level=False):
+    def __init__(
+        self, mode=None, num_procs=None, flag_for_low_level=False, mpi_schedule="static"
+    ):
         """
         This will initialize the Parallelizer class and kick off the specific classes for multiprocessing and MPI.
 
@@ -72,11 +96,20 @@ class Parallelizer(object):
                                         This will be overriden and fixed to a single processor if mode==serial
         :param bol flag_for_low_level: this will override mode and number of processors and set it to a multiprocess as serial. This is useful because
                                 a low-level program in mpi mode referenced by a top level program in mpi mode will have terrible problems. This means you can't mpi-multiprocess inside an mpi-multiprocess.
+        :param str mpi_schedule: how jobs are shared between the nodes in mpi mode, ie) "static" or "dynamic":
+                                static splits the jobs into one equal chunk per node.
+                                dynamic has the root node hand out small chunks of jobs as the other nodes finish their last ones, so a node
+                                which gets a few slow jobs doesn't hold up the rest.
         """
 
         if mode == "none" or mode == "None":
             mode = None
 
+        if mpi_schedule not in MPI_SCHEDULES:
+            printout = "mpi_schedule must be one of: {}".format(MPI_SCHEDULES)
+            raise Exception(printout)
+        self.mpi_schedule = mpi_schedule
+
         self.HAS_MPI = self.test_import_MPI(mode, flag_for_low_level)
 
         # Pick the mode
@@ -125,6 +158,24 @@ class Parallelizer(object):
         else:
             self.num_procs = self.compute_nodes()
 
+        # The multiprocessing worker pool. It is started by the first run()
+        # which needs it, reused by every later run() and shut down by end()
+        self.worker_pool = None
+
+    def __getstate__(self):
+        """
+        The worker pool's queues and processes can't be pickled, so copies of
+        this object (ie in vars sent to a job) are made without it. A copy
+        starts its own pool if it needs one.
+
+        Returns:
+        :returns: dict state: the attributes of this object without the pool
+        """
+
+        state = self.__dict__.copy()
+        state["worker_pool"] = None
+        return state
+
     def test_import_MPI(self, mode, flag_for_low_level=False):
         """
         This tests for the ability of importing the MPI sublibrary from mpi4py.
@@ -227,7 +278,7 @@ class Parallelizer(object):
         if mode == "mpi":
             if self.HAS_MPI == True:
                 # THIS IS EXPLICITILY CHOSEN TO BE RUN IN MPI AND CAN WORK WITH MPI
-                ParallelMPI_obj = ParallelMPI()
+                ParallelMPI_obj = ParallelMPI(self.mpi_schedule)
                 ParallelMPI_obj.start()
                 return ParallelMPI_obj
             else:
@@ -248,6 +299,8 @@ class Parallelizer(object):
                             if you have smaller programs used by a larger program, with both mpi enabled there will be problems, so specify multiprocessing is important.
         """
 
+        self.end_worker_pool()
+
         if mode == None:
             mode = self.mode
         if mode == "mpi":
@@ -259,7 +312,24 @@ class Parallelizer(object):
             else:
                 raise Exception("mpi4py package must be available to use mpi mode")
 
-    def run(self, args, func, num_procs=None, mode=None):
+    def end_worker_pool(self):
+        """
+        Stop the multiprocessing worker pool, if one was started.
+        """
+
+        if self.worker_pool is not None:
+            self.worker_pool.shutdown()
+            self.worker_pool = None
+
+    def run(
+        self,
+        args,
+        func,
+        num_procs=None,
+        mode=None,
+        shared_kwargs=None,
+        job_cost_func=None,
+    ):
         """
         Run a task in parallel across the system.
 
@@ -274,6 +344,24 @@ class Parallelizer(object):
                     args = [(0,0),(1,0),(2,0),(0,1),(1,1),(2,1),(0,2),(1,2),(2,2)]
                     func = foo      The namespace of foo
 
+        Large read-only objects which every job needs (ie a class object or a
+        list of all the ligands) should be passed through shared_kwargs rather
+        than in every tuple of args. shared_kwargs is sent to each worker
+        process (or MPI node) once per call and is passed to every job as
+        keyword arguments, so only the small per-job arguments are pickled
+        for each job.
+                    ie) def foo(x, big_list): ...
+                    args = [(0,),(1,),(2,)]
+                    shared_kwargs = {"big_list": big_list}
+
+        If the jobs take very different amounts of time, job_cost_func can
+        estimate how long each will take. The jobs expected to take longest
+        are then started first (in mpi and multiprocessing mode), so a slow
+        job isn't left until the end of the run. The results are still in
+        the order of args.
+                    ie) def foo_cost(x, y): return x * y
+                    job_cost_func = foo_cost
+
 
         Inputs:
         :param python_obj func: This is the object of the function which will be used.
@@ -285,10 +373,18 @@ class Parallelizer(object):
                             top level coding. It is best practice to specify which multiprocessing choice to use.
                             if you have smaller programs used by a larger program, with both mpi enabled there will be problems, so specify multiprocessing is important.
                             BEST TO LEAVE THIS BLANK
+        :param dict shared_kwargs: keyword arguments passed to every job in
+                            addition to its tuple of args. These are sent once per worker rather than once per job.
+                            If None no keyword arguments are passed.
+        :param python_obj job_cost_func: a function which takes the args of a job (like func) and returns a number
+                            estimating how long the job will take. If None the jobs are started in the order of args.
         Returns:
         :returns: list results: A list containing all the results from the multiprocess
         """
 
+        if shared_kwargs is None:
+            shared_kwargs = {}
+
         # determine the mode
         if mode == None:
             mode = self.mode
@@ -324,13 +420,61 @@ class Parallelizer(object):
             if not self.HAS_MPI:
                 raise Exception("mpi4py package must be available to use mpi mode")
 
-            return self.parallel_obj.run(func, args)
+            return self.parallel_obj.run(
+                func, args, shared_kwargs, get_job_costs(args, job_cost_func)
+            )
 
         elif mode == "multiprocessing":
-            return MultiThreading(args, num_procs, func)
+            return self.run_with_worker_pool(
+                args, func, num_procs, shared_kwargs, job_cost_func
+            )
         else:
             # serial is running the ParallelThreading with num_procs=1
-            return MultiThreading(args, 1, func)
+            return MultiThreading(args, 1, func, shared_kwargs)
+
+    def run_with_worker_pool(
+        self, args, func, num_procs, shared_kwargs, job_cost_func=None
+    ):
+        """
+        Run a task in multiprocessing mode using this object's worker pool.
+        The pool is started the first time it is needed and then kept, so
+        later calls don't pay to start processes (and import their modules)
+        again. Calls with a single job, or which override num_procs, are run
+        through MultiThreading instead.
+
+        Inputs:
+        :param list args: a list of lists/tuples, each sublist/tuple must contain all information required by the function for a single object which will be multiprocessed
+        :param python_obj func: This is the object of the function which will be used.
+        :param int num_procs: the number of processors to use
+        :param dict shared_kwargs: keyword arguments passed to every job
+        :param python_obj job_cost_func: a function which estimates how long
+            each job will take, or None
+        Returns:
+        :returns: list results: A list containing all the results from the multiprocess
+        """
+
+        if len(args) == 0:
+            return []
+
+        if len(args) == 1 or num_procs != self.num_procs or self.num_procs == 1:
+            return MultiThreading(args, num_procs, func, shared_kwargs)
+
+        args = check_and_format_inputs_to_list_of_tuples(args)
+
+        if self.worker_pool is None:
+            self.worker_pool = WorkerPool(self.num_procs)
+
+        try:
+            return self.worker_pool.run(
+                args,
+                func,
+                shared_kwargs,
+                get_job_order(get_job_costs(args, job_cost_func)),
+            )
+        except WorkerPoolBroken:
+            # A worker died, so the pool can't be reused
+            self.end_worker_pool()
+            raise
 
     def pick_mode(self):
         """
@@ -410,12 +554,17 @@ class ParallelMPI(object):
     Utility code for running tasks in parallel across an MPI cluster.
     """
 
-    def __init__(self):
+    def __init__(self, schedule="static"):
         """
         Default num_procs is all the processesors possible
+
+        Inputs:
+        :param str schedule: how jobs are shared between the nodes, "static"
+            or "dynamic". See run().
         """
 
         self.COMM = mpi4py.MPI.COMM_WORLD
+        self.schedule = schedule
 
         self.Empty_object = Empty_obj()
 
@@ -451,6 +600,15 @@ class ParallelMPI(object):
             if func is None:
                 exit(0)
 
+            # receive the keyword arguments shared by every job
+            shared_kwargs = self.COMM.bcast(None, root=0)
+
+            # receive how the jobs will be shared out
+            schedule = self.COMM.bcast(None, root=0)
+            if schedule == "dynamic":
+                self._dynamic_worker(func, shared_kwargs)
+                continue
+
             # receive arguments
             args_chunk = self.COMM.scatter([], root=0)
 
@@ -463,12 +621,112 @@ class ParallelMPI(object):
             else:
                 # perform the calculation and send results
                 result_chunk = [
-                    func(*arg)
+                    func(*arg, **shared_kwargs)
                     for arg in args_chunk
                     if type(arg[0]) != type(self.Empty_object)
                 ]
                 result_chunk = self.COMM.gather(result_chunk, root=0)
 
+    def _dynamic_worker(self, func, shared_kwargs):
+        """
+        Run chunks of jobs sent by the root node until it sends an empty
+        chunk. Each chunk is a list of (index, args). The results of each
+        chunk are sent back as a list of (index, result), which also asks
+        the root node for the next chunk.
+
+        Inputs:
+        :param python_obj func: the function to run for each job
+        :param dict shared_kwargs: keyword arguments passed to every job
+        """
+
+        while True:
+            job_chunk = self.COMM.recv(source=0, tag=MPI_JOB_TAG)
+            if len(job_chunk) == 0:
+                return
+
+            result_chunk = [
+                (index, func(*arg, **shared_kwargs)) for index, arg in job_chunk
+            ]
+            sys.stdout.flush()
+            self.COMM.send(result_chunk, dest=0, tag=MPI_RESULT_TAG)
+
+    def _run_dynamic(self, func, args, shared_kwargs, job_costs):
+        """
+        Run the jobs with the dynamic schedule. The jobs are ordered by their
+        cost, most expensive first. The root node hands each worker node a
+        small chunk of jobs from the front of this order and sends it another
+        chunk each time it returns its results, so the nodes which get quick
+        jobs do more of them.
+
+        While no worker is waiting, the root node runs jobs itself, one at a
+        time from the back of the order, so it is never busy for long.
+
+        Inputs:
+        :param python_obj func: the function to run for each job
+        :param list args: a list of the args of each job
+        :param dict shared_kwargs: keyword arguments passed to every job
+        :param list job_costs: the expected cost of each job in args
+
+        Returns:
+        :returns: list results: the results of the jobs, in the order of args
+        """
+
+        num_workers = self.COMM.Get_size() - 1
+        job_order = get_job_order(job_costs)
+        chunk_cost = sum(job_costs) / (
+            float(num_workers + 1) * MPI_CHUNKS_PER_NODE
+        )
+
+        results = [None for i in range(len(args))]
+        first_job = 0
+        last_job = len(job_order)
+
+        # Every worker is sent a first chunk, which is empty if there are
+        # more workers than jobs
+        num_busy_workers = 0
+        for worker_rank in range(1, num_workers + 1):
+            end = get_chunk_end(job_order, job_costs, first_job, last_job, chunk_cost)
+            job_chunk = [(i, args[i]) for i in job_order[first_job:end]]
+            first_job = end
+            self.COMM.send(job_chunk, dest=worker_rank, tag=MPI_JOB_TAG)
+            if len(job_chunk) != 0:
+                num_busy_workers = num_busy_workers + 1
+
+        status = mpi4py.MPI.Status()
+        while num_busy_workers > 0 or first_job < last_job:
+            if num_busy_workers == 0:
+                wait_for_worker = False
+            elif first_job == last_job:
+                # Nothing is left for the root node to run
+                wait_for_worker = True
+            else:
+                wait_for_worker = self.COMM.Iprobe(
+                    source=mpi4py.MPI.ANY_SOURCE, tag=MPI_RESULT_TAG
+                )
+
+            if wait_for_worker is True:
+                result_chunk = self.COMM.recv(
+                    source=mpi4py.MPI.ANY_SOURCE, tag=MPI_RESULT_TAG, status=status
+                )
+                for index, result in result_chunk:
+                    results[index] = result
+
+                end = get_chunk_end(
+                    job_order, job_costs, first_job, last_job, chunk_cost
+                )
+                job_chunk = [(i, args[i]) for i in job_order[first_job:end]]
+                first_job = end
+                self.COMM.send(job_chunk, dest=status.Get_source(), tag=MPI_JOB_TAG)
+                if len(job_chunk) == 0:
+                    num_busy_workers = num_busy_workers - 1
+            else:
+                last_job = last_job - 1
+                index = job_order[last_job]
+                results[index] = func(*args[index], **shared_kwargs)
+
+        sys.stdout.flush()
+        return results
+
     def handle_undersized_jobs(self, arr, n):
         if len(arr) > n:
             printout = "the length of the package is bigger than the length of the number of nodes!"
@@ -558,16 +816,26 @@ class ParallelMPI(object):
             print(printout)
             raise Exception(printout)
 
-    def run(self, func, args):
+    def run(self, func, args, shared_kwargs=None, job_costs=None):
         """
         Run a function in parallel across the current MPI cluster.
 
         * func is a pure function of type (A)->(B)
         * args is a list of type list(A)
+        * shared_kwargs is a dict of keyword arguments passed to every call
+          of func. It is broadcast to each node once.
+        * job_costs is a list of the expected cost of each job in args. It
+          is only used by the dynamic schedule, which starts the most
+          expensive jobs first. If None every job has the same cost and the
+          jobs are started in order.
 
         This method batches the computation across the MPI cluster and returns
         the result of type list(B) where result[i] = func(args[i]).
 
+        With the static schedule args is split into one equal chunk per node.
+        With the dynamic schedule the root node hands out small chunks of
+        jobs as the other nodes finish their last ones (see _run_dynamic()).
+
         Important note: func must exist in the namespace at initialization.
         """
         num_of_args_start = len(args)
@@ -575,11 +843,25 @@ class ParallelMPI(object):
             return []
         args = self.check_and_format_args(args)
 
+        if shared_kwargs is None:
+            shared_kwargs = {}
+
         size = self.COMM.Get_size()
 
         # broadcast function to worker processors
         self.COMM.bcast(func, root=0)
 
+        # broadcast the keyword arguments shared by every job
+        self.COMM.bcast(shared_kwargs, root=0)
+
+        # broadcast how the jobs will be shared out
+        self.COMM.bcast(self.schedule, root=0)
+
+        if self.schedule == "dynamic":
+            if job_costs is None:
+                job_costs = [1.0 for i in range(len(args))]
+            return self._run_dynamic(func, args, shared_kwargs, job_costs)
+
         # chunkify the argument list
         args_chunk = self._split(args, size)
 
@@ -590,7 +872,7 @@ class ParallelMPI(object):
             raise Exception("args_chunk needs to be a list")
 
         # perform the calculation and get results
-        result_chunk = [func(*arg) for arg in args_chunk]
+        result_chunk = [func(*arg, **shared_kwargs) for arg in args_chunk]
         sys.stdout.flush()
 
         result_chunk = self.COMM.gather(result_chunk, root=0)
@@ -628,7 +910,7 @@ Adapted from examples on https://docs.python.org/2/library/multiprocessing.html
 """
 
 
-def MultiThreading(inputs, num_procs, task_name):
+def MultiThreading(inputs, num_procs, task_name, shared_kwargs=None):
     """Initialize this object.
 
     Args:
@@ -637,10 +919,16 @@ def MultiThreading(inputs, num_procs, task_name):
         num_procs (int): The number of processors to use.
         task_class_name (class): The class that governs what to do for each
             job on each processor.
+        shared_kwargs (dict): Keyword arguments passed to every job. These
+            are handed to each process once, not put on the queue with every
+            job.
     """
 
     results = []
 
+    if shared_kwargs is None:
+        shared_kwargs = {}
+
     # If there are no inputs, just return an empty list.
     if len(inputs) == 0:
         return results
@@ -660,23 +948,242 @@ def MultiThreading(inputs, num_procs, task_name):
     if num_procs == 1:
         for item in tasks:
             job, args = item[1]
-            output = job(*args)
+            output = job(*args, **shared_kwargs)
             results.append(output)
     else:
-        results = start_processes(tasks, num_procs)
+        results = start_processes(tasks, num_procs, shared_kwargs)
 
     return results
 
 
+class WorkerPoolBroken(Exception):
+    """
+    Raised when a worker process of a WorkerPool dies.
+    """
+
+    pass
+
+
+# Every WorkerPool started by this process, so they can be stopped when the
+# process exits
+ACTIVE_WORKER_POOLS = []
+
+# Put on the done queue by a worker which needs the shared_kwargs of a run
+SHARED_KWARGS_REQUEST = "SHARED_KWARGS_REQUEST"
+
+
+class WorkerPool(object):
+    """
+    A set of worker processes which are kept running between calls to run().
+
+    Jobs are put on a single task queue so the workers share them out as
+    they finish. Each worker also has its own queue for the shared_kwargs of
+    each run. When a worker takes the first of a run's jobs it asks for the
+    run's shared_kwargs, so a worker is sent them once per run no matter how
+    many of the run's jobs it does, and workers which take none of a run's
+    jobs aren't sent them at all.
+    """
+
+    def __init__(self, num_procs):
+        """
+        Start the worker processes.
+
+        Inputs:
+        :param int num_procs: the number of worker processes to start
+        """
+
+        self.num_procs = num_procs
+        self.run_id = 0
+
+        # Forked processes inherit ACTIVE_WORKER_POOLS, but only the process
+        # which started a pool can stop it
+        self.owner_pid = os.getpid()
+
+        self.task_queue = multiprocessing.Queue()
+        self.done_queue = multiprocessing.Queue()
+        self.shared_kwargs_queues = [multiprocessing.Queue() for i in range(num_procs)]
+
+        self.processes = []
+        for i in range(num_procs):
+            process = multiprocessing.Process(
+                target=pool_worker,
+                args=(
+                    i,
+                    self.task_queue,
+                    self.done_queue,
+                    self.shared_kwargs_queues[i],
+                ),
+            )
+            process.start()
+            self.processes.append(process)
+
+        ACTIVE_WORKER_POOLS.append(self)
+
+        # The pool's processes are not daemons (so their jobs can start
+        # processes of their own), so at exit multiprocessing waits for them
+        # to finish. Stop any pool end() wasn't called for first. atexit
+        # runs the last registered function first, so this is registered
+        # again after multiprocessing has registered its own exit function.
+        atexit.unregister(shutdown_worker_pools)
+        atexit.register(shutdown_worker_pools)
+
+    def run(self, inputs, task_name, shared_kwargs, job_order=None):
+        """
+        Run every job on the worker processes and wait for the results.
+
+        Inputs:
+        :param list inputs: a list of tuples, each tuple holds the args of one job
+        :param python_obj task_name: the function to run for each job
+        :param dict shared_kwargs: keyword arguments passed to every job
+        :param list job_order: the indices of inputs in the order the jobs
+            should be put on the queue. If None they are put on in order.
+        Returns:
+        :returns: list results: the results of the jobs, in the order of inputs
+        """
+
+        self.run_id = self.run_id + 1
+
+        if job_order is None:
+            job_order = range(len(inputs))
+
+        for index in job_order:
+            self.task_queue.put((self.run_id, index, task_name, inputs[index]))
+
+        results = [None for i in range(len(inputs))]
+        errors = []
+        num_finished = 0
+        while num_finished < len(inputs):
+            run_id, index, finished, result = self.get_result()
+            if finished == SHARED_KWARGS_REQUEST:
+                # index is the worker which took its first job of this run
+                self.shared_kwargs_queues[index].put((self.run_id, shared_kwargs))
+                continue
+            if run_id != self.run_id:
+                # Left over from a run which raised an error
+                continue
+
+            num_finished = num_finished + 1
+            if finished is True:
+                results[index] = result
+            else:
+                errors.append(result)
+
+        if len(errors) != 0:
+            printout = "{} jobs raised an exception. The first was:\n{}".format(
+                len(errors), errors[0]
+            )
+            raise Exception(printout)
+
+        return results
+
+    def get_result(self):
+        """
+        Wait for the next job to finish. Checks that the workers are still
+        running while it waits so a dead worker doesn't hang the run.
+
+        Returns:
+        :returns: tuple result: (run_id, index, finished, result) where
+            finished is False if the job raised and result is the traceback.
+            If finished is SHARED_KWARGS_REQUEST, worker number index needs
+            the shared_kwargs of the run.
+        """
+
+        while True:
+            try:
+                return self.done_queue.get(timeout=5)
+            except queue.Empty:
+                for process in self.processes:
+                    if process.is_alive() is False:
+                        printout = "A worker process stopped with exit code {}".format(
+                            process.exitcode
+                        )
+                        raise WorkerPoolBroken(printout)
+
+    def shutdown(self):
+        """
+        Stop the worker processes.
+        """
+
+        # Any worker can take any STOP, so send one for every worker. A worker
+        # which already stopped just leaves its STOP on the queue.
+        for process in self.processes:
+            self.task_queue.put("STOP")
+
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive() is True:
+                process.terminate()
+                process.join()
+
+        self.processes = []
+
+        # Anything still on the queues (ie. if a run was stopped by an error)
+        # will never be read. Don't wait at exit to finish sending it.
+        for worker_queue in [self.task_queue] + self.shared_kwargs_queues:
+            worker_queue.cancel_join_thread()
+            worker_queue.close()
+
+        if self in ACTIVE_WORKER_POOLS:
+            ACTIVE_WORKER_POOLS.remove(self)
+
+
+def shutdown_worker_pools():
+    """
+    Stop every WorkerPool started by this process.
+    """
+
+    for worker_pool in list(ACTIVE_WORKER_POOLS):
+        if worker_pool.owner_pid == os.getpid():
+            worker_pool.shutdown()
+
+
 ###
 # Worker function
 ###
 
 
-def worker(input, output):
+def pool_worker(worker_id, task_queue, done_queue, shared_kwargs_queue):
+    """
+    Run jobs from task_queue until it receives "STOP".
+
+    Each job is (run_id, index, func, args). When a job of a new run is
+    received, the worker asks for the shared_kwargs of that run on
+    done_queue and takes them from shared_kwargs_queue.
+
+    Inputs:
+    :param int worker_id: the number of this worker in the pool
+    :param multiprocessing.Queue task_queue: the queue of jobs
+    :param multiprocessing.Queue done_queue: the queue to put results on
+    :param multiprocessing.Queue shared_kwargs_queue: this worker's queue of
+        (run_id, shared_kwargs)
+    """
+
+    current_run_id = None
+    shared_kwargs = {}
+    try:
+        for run_id, index, func, args in iter(task_queue.get, "STOP"):
+            if current_run_id != run_id:
+                done_queue.put((run_id, worker_id, SHARED_KWARGS_REQUEST, None))
+                while current_run_id != run_id:
+                    current_run_id, shared_kwargs = shared_kwargs_queue.get()
+
+            try:
+                result = func(*args, **shared_kwargs)
+                ret_val = (run_id, index, True, result)
+            except Exception:
+                ret_val = (run_id, index, False, traceback.format_exc())
+            sys.stdout.flush()
+            done_queue.put(ret_val)
+    finally:
+        # Stop any pools the jobs started in this process
+        shutdown_worker_pools()
+
+
+
+def worker(input, output, shared_kwargs):
     for seq, job in iter(input.get, "STOP"):
         func, args = job
-        result = func(*args)
+        result = func(*args, **shared_kwargs)
         ret_val = (seq, result)
         output.put(ret_val)
 
@@ -729,11 +1236,17 @@ def count_processors(num_inputs, num_procs):
     return num_procs
 
 
-def start_processes(inputs, num_procs):
+def start_processes(inputs, num_procs, shared_kwargs=None):
     """
     Creates a queue of inputs and outputs
+
+    shared_kwargs is given to each process when it starts rather than being
+    put on the queue with every job.
     """
 
+    if shared_kwargs is None:
+        shared_kwargs = {}
+
     # Create queues
     task_queue = multiprocessing.Queue()
     done_queue = multiprocessing.Queue()
@@ -744,7 +1257,9 @@ def start_processes(inputs, num_procs):
 
     # Start worker processes
     for i in range(num_procs):
-        multiprocessing.Process(target=worker, args=(task_queue, done_queue)).start()
+        multiprocessing.Process(
+            target=worker, args=(task_queue, done_queue, shared_kwargs)
+        ).start()
 
     # Get and print results
     results = []
@@ -765,6 +1280,69 @@ def start_processes(inputs, num_procs):
 ###
 
 
+def get_job_costs(args, job_cost_func):
+    """
+    Estimate the cost of every job.
+
+    :param list args: a list of lists/tuples, each holds the args of one job
+    :param python_obj job_cost_func: a function which takes the args of a job
+        and returns its expected cost, or None
+
+    :returns: A list of the cost of each job in args, or None if
+        job_cost_func is None.
+    """
+    if job_cost_func is None:
+        return None
+
+    return [float(job_cost_func(*arg)) for arg in args]
+
+
+def get_job_order(job_costs):
+    """
+    Order the jobs so the ones expected to take longest are started first.
+    Jobs with the same cost keep their order.
+
+    :param list job_costs: the cost of each job, or None
+
+    :returns: A list of the indices of the jobs, in the order they should be
+        started, or None if job_costs is None.
+    """
+    if job_costs is None:
+        return None
+
+    return sorted(range(len(job_costs)), key=lambda i: -job_costs[i])
+
+
+def get_chunk_end(job_order, job_costs, first_job, last_job, chunk_cost):
+    """
+    Pick the jobs for the next chunk of the dynamic MPI schedule. A chunk has
+    at least one job (unless there are none left) and takes jobs until their
+    total cost would go over chunk_cost or it has MPI_MAX_JOBS_PER_CHUNK jobs.
+
+    :param list job_order: the indices of the jobs, most expensive first
+    :param list job_costs: the cost of each job
+    :param int first_job: the position in job_order of the first job which
+        hasn't been started
+    :param int last_job: the position in job_order after the last job which
+        hasn't been started
+    :param float chunk_cost: the most a chunk of several jobs should cost
+
+    :returns: The position in job_order after the last job of the chunk.
+    """
+    if first_job == last_job:
+        return first_job
+
+    end = first_job + 1
+    total_cost = job_costs[job_order[first_job]]
+    while end < last_job and end - first_job < MPI_MAX_JOBS_PER_CHUNK:
+        total_cost = total_cost + job_costs[job_order[end]]
+        if total_cost > chunk_cost:
+            break
+        end = end + 1
+
+    return end
+
+
 def flatten_list(tier_list):
     """
     Given a list of lists, this returns a flat list of all items.
@@ -391,6 +391,7 @@ def set_parameters(params_unicode):
             "let_tautomers_change_chirality": False,
             "use_durrant_lab_filters": False,
             "job_manager": "multiprocessing",
+            "conformer_threads": 1,
             "cache_prerun": False,
             "test": False,
         }
@@ -702,6 +702,10 @@ class ProtSubstructFuncs:
 
     args = {}
 
+    # The substructures for each (min_ph, max_ph, pka_std_range), so they are
+    # only loaded once per process rather than once per molecule.
+    substructs_cache = {}
+
     @staticmethod
     def load_substructre_smarts_file():
         """Loads the substructure smarts file. Similar to just using readlines,
@@ -736,6 +740,10 @@ class ProtSubstructFuncs:
                  range.
         """
 
+        cache_key = (min_ph, max_ph, pka_std_range)
+        if cache_key in ProtSubstructFuncs.substructs_cache:
+            return ProtSubstructFuncs.substructs_cache[cache_key]
+
         subs = []
 
         for line in ProtSubstructFuncs.load_substructre_smarts_file():
@@ -762,6 +770,8 @@ class ProtSubstructFuncs:
 
                 sub["prot_states_for_pH"] = prot
                 subs.append(sub)
+
+        ProtSubstructFuncs.substructs_cache[cache_key] = subs
         return subs
 
     @staticmethod
@@ -34,6 +34,7 @@ def minimize_3d(
     second_embed,
     job_manager,
     parallelizer_obj,
+    conformer_threads=1,
 ):
     """This function minimizes a 3D molecular conformation. In an attempt to
        not get trapped in a local minimum, it actually generates a number of
@@ -65,11 +66,19 @@ def minimize_3d(
     :type job_manager: string
     :param parallelizer_obj: The Parallelizer object.
     :type parallelizer_obj: Parallelizer.Parallelizer
+    :param conformer_threads: The number of threads RDKit may use to embed
+       and minimize the conformers of each molecule, if job_manager is
+       serial. -1 uses all available processors. Defaults to 1.
+    :type conformer_threads: int, optional
     """
 
     # Let the user know you're on this step.
     Utils.log("Minimizing all 3D molecular structures...")
 
+    # In serial mode the molecules are processed one at a time, so RDKit can
+    # use several threads for the conformers of each molecule instead.
+    num_threads = conformer_threads if job_manager == "serial" else 1
+
     # Create the parameters (inputs) for the parallelizer.
     params = []
     ones_without_nonaro_rngs = set([])
@@ -80,7 +89,15 @@ def minimize_3d(
             for mol in contnr.mols:
                 ones_without_nonaro_rngs.add(mol.contnr_idx)
                 params.append(
-                    tuple([mol, max_variants_per_compound, thoroughness, second_embed])
+                    tuple(
+                        [
+                            mol,
+                            max_variants_per_compound,
+                            thoroughness,
+                            second_embed,
+                            num_threads,
+                        ]
+                    )
                 )
     params = tuple(params)
 
@@ -90,7 +107,7 @@ def minimize_3d(
         tmp = parallelizer_obj.run(params, parallel_minit, num_procs, job_manager)
     else:
         for i in params:
-            tmp.append(parallel_minit(i[0], i[1], i[2], i[3]))
+            tmp.append(parallel_minit(i[0], i[1], i[2], i[3], i[4]))
 
     # Save energy into MyMol object, and get a list of just those objects.
     contnr_list_not_empty = set([])  # To keep track of which container lists
@@ -122,7 +139,9 @@ def minimize_3d(
                 mol.conformers = []
 
 
-def parallel_minit(mol, max_variants_per_compound, thoroughness, second_embed):
+def parallel_minit(
+    mol, max_variants_per_compound, thoroughness, second_embed, num_threads=1
+):
     """Minimizes the geometries of a MyMol.MyMol object. Meant to be run
     within parallelizer.
 
@@ -145,12 +164,17 @@ def parallel_minit(mol, max_variants_per_compound, thoroughness, second_embed):
         run time, but sometimes converts certain molecules that would
         otherwise fail.
     :type second_embed: bool
+    :param num_threads: The number of threads RDKit may use to embed and
+        minimize the conformers. Defaults to 1.
+    :type num_threads: int, optional
     :return: A molecule with the minimized conformers inside it.
     :rtype: MyMol.MyMol
     """
 
     # Not minimizing. Just adding the conformers.
-    mol.add_conformers(thoroughness * max_variants_per_compound, 0.1, False)
+    mol.add_conformers(
+        thoroughness * max_variants_per_compound, 0.1, False, num_threads
+    )
 
     if len(mol.conformers) > 0:
         # Because it is possible to find a molecule that has no
@@ -161,8 +185,7 @@ def parallel_minit(mol, max_variants_per_compound, thoroughness, second_embed):
         # Further minimize the unoptimized conformers that were among the best
         # scoring.
         max_vars_per_cmpd = max_variants_per_compound
-        for i in range(len(mol.conformers[:max_vars_per_cmpd])):
-            mol.conformers[i].minimize()
+        mol.minimize_conformers(num_threads, mol.conformers[:max_vars_per_cmpd])
 
         # Remove similar conformers
         # mol.eliminate_structurally_similar_conformers()
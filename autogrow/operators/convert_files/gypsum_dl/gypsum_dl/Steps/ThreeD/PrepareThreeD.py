@@ -41,6 +41,7 @@ def prepare_3d(contnrs, params):
     num_procs = params["num_processors"]
     job_manager = params["job_manager"]
     parallelizer_obj = params["Parallelizer"]
+    conformer_threads = params["conformer_threads"]
 
     # Do the 2d to 3d conversionl, if requested.
     if not params["2d_output_only"]:
@@ -64,6 +65,7 @@ def prepare_3d(contnrs, params):
                 second_embed,
                 job_manager,
                 parallelizer_obj,
+                conformer_threads,
             )
 
         # Minimize the molecules, if requested.
@@ -76,4 +78,5 @@ def prepare_3d(contnrs, params):
                 second_embed,
                 job_manager,
                 parallelizer_obj,
+                conformer_threads,
             )
@@ -20,8 +20,10 @@ for now.
 import os
 import shutil
 import glob
+import time
 from gypsum_dl import Utils
 from gypsum_dl.Start import prepare_molecules
+from gypsum_dl.Parallelizer import Parallelizer
 
 
 def run_test():
@@ -227,3 +229,51 @@ def run_test():
     # Delete test output directory if it exists.
     if os.path.exists(output_folder):
         shutil.rmtree(output_folder)
+
+    test_worker_pool_shutdown()
+
+
+def get_shared_kwarg_size(number, shared_kwarg=None):
+    """
+    A job for test_worker_pool_shutdown.
+    """
+
+    return number + len(shared_kwarg)
+
+
+def test_worker_pool_shutdown():
+    """
+    Check that a worker pool with idle workers and large shared_kwargs shuts
+    down at once. Each run only has jobs for some of the workers, so the idle
+    workers must not be left with shared_kwargs they never read, and every
+    worker must get a STOP. A slow shutdown means a worker was left waiting
+    until the join timeout of WorkerPool.shutdown.
+    """
+
+    shared_kwarg = "x" * (2 * 1024 * 1024)
+    for num_procs in [2, 4, 8]:
+        for num_jobs in [1, 2, 3, num_procs]:
+            parallelizer = Parallelizer("multiprocessing", num_procs, True)
+            inputs = tuple((i,) for i in range(num_jobs))
+            expected = [i + len(shared_kwarg) for i in range(num_jobs)]
+            for i in range(3):
+                results = parallelizer.run(
+                    inputs,
+                    get_shared_kwarg_size,
+                    shared_kwargs={"shared_kwarg": shared_kwarg},
+                )
+                if results != expected:
+                    Utils.exception("FAILED. Worker pool returned: " + str(results))
+
+            # WorkerPool.shutdown waits up to 5 seconds for each worker.
+            start = time.time()
+            parallelizer.end()
+            shutdown_time = time.time() - start
+            msg = "Worker pool of {} workers and {} jobs took {:.2f} seconds ".format(
+                num_procs, num_jobs, shutdown_time
+            )
+            msg = msg + "to stop."
+            if shutdown_time > 1.0:
+                Utils.exception("FAILED. " + msg)
+            else:
+                Utils.log("PASSED. " + msg)
@@ -189,6 +189,15 @@ PARSER.add_argument(
     help="Number of processors to use for parallel \
                     calculations.",
 )
+PARSER.add_argument(
+    "--conformer_threads",
+    type=int,
+    metavar="N",
+    help="Number of threads RDKit may use to generate and \
+                    minimize the conformers of each molecule. Only used if \
+                    --job_manager is serial. -1 uses all available \
+                    processors.",
+)
 PARSER.add_argument(
     "--max_variants_per_compound",
     "-m",
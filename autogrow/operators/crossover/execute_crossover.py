@@ -9,15 +9,23 @@ molecules from smile_list Those 2 smiles are tested using the MCS function to
 find the most common structure (MCS). If MCS returns None (ie. no shared
 structures) then mol2 is reassigned using the random function generator. This
 iterates until a shared structure is returned.
+
+Partners which can't share enough atoms with the 1st molecule are skipped
+without running MCS, likely partners are tried first, and each pair's MCS is
+kept for the rest of the generation (see CompiledPartnerIndex).
 """
 
 import __future__
 
 import random
-import copy
+import hashlib
+import json
 
+import numpy
 import rdkit
 from rdkit import Chem
+from rdkit import DataStructs
+from rdkit.Chem import AllChem
 from rdkit.Chem import rdFMCS
 
 # Disable the unnecessary RDKit warnings
@@ -27,6 +35,254 @@ rdkit.RDLogger.DisableLog("rdApp.*")
 import autogrow.operators.filter.execute_filters as Filter
 import autogrow.operators.crossover.smiles_merge.smiles_merge as smiles_merge
 import autogrow.operators.convert_files.gypsum_dl.gypsum_dl.MolObjectHandling as MOH
+import autogrow.operators.candidate_registry as CandidateRegistry
+import autogrow.utils.stage_metrics as StageMetrics
+
+# Compiled partner indexes for this process keyed by MCSPartnerIndex.index_key.
+# The MCSPartnerIndex is sent to every worker with each batch of crossovers, so
+# the parsed ligands and MCS results are kept here rather than on the object.
+# Only the current generation's index is kept, so each pair of seed ligands
+# is only compared once per generation in each process.
+COMPILED_PARTNER_INDEX_CACHE = {}
+
+# Added to each fingerprint similarity when weighting the order partners are
+# tried in, so dissimilar partners can still be picked
+MIN_PARTNER_WEIGHT = 0.05
+
+
+class MCSRecord(object):
+    """
+    The parts of an rdFMCS.MCSResult needed by crossover. MCSResult objects
+    can't be pickled or made by hand, so this is what is stored.
+    """
+
+    def __init__(self, smarts_string, num_atoms, canceled, timeout):
+        """
+        Inputs:
+        :param str smarts_string: the SMARTS string of the MCS
+        :param int num_atoms: the number of atoms in the MCS
+        :param bool canceled: True if FindMCS timed out
+        :param int timeout: the timeout FindMCS was run with
+        """
+
+        self.smarts_string = smarts_string
+        self.num_atoms = num_atoms
+        self.canceled = canceled
+        self.timeout = timeout
+
+
+class MCSPartnerIndex(object):
+    """
+    The seed ligands of a generation's crossovers, used to pick the 2nd parent
+    (lig2) for each crossover. This is what is sent to the workers;
+    get_compiled_index gets the parsed form for the current process.
+    """
+
+    def __init__(self, ligands_list, min_atom_match_mcs):
+        """
+        Inputs:
+        :param list ligands_list: a list of all the seed ligands from the
+            previous generation. ie. [['CCC', 'ZINC123'], ...]
+        :param int min_atom_match_mcs: the minimum number of atoms two
+            ligands must share
+        """
+
+        self.smiles_list = [x[0] for x in ligands_list]
+        self.min_atom_match_mcs = min_atom_match_mcs
+
+        self.index_key = hashlib.sha1(
+            json.dumps([self.smiles_list, min_atom_match_mcs]).encode("utf-8")
+        ).hexdigest()
+
+    def get_compiled_index(self):
+        """
+        Get the compiled index for this process, compiling it if this process
+        hasn't yet.
+
+        Returns:
+        :returns: CompiledPartnerIndex compiled_index: the parsed ligands and
+            the MCS results for this process
+        """
+
+        if self.index_key not in COMPILED_PARTNER_INDEX_CACHE:
+            # A new generation's seeds. Drop the old MCS results.
+            COMPILED_PARTNER_INDEX_CACHE.clear()
+            COMPILED_PARTNER_INDEX_CACHE[self.index_key] = CompiledPartnerIndex(
+                self.smiles_list, self.min_atom_match_mcs
+            )
+        return COMPILED_PARTNER_INDEX_CACHE[self.index_key]
+
+
+class CompiledPartnerIndex(object):
+    """
+    The parsed seed ligands, their element counts and fingerprints, and the
+    MCS results of every pair compared in this process.
+
+    Before running rdFMCS.FindMCS on a pair two cheap checks are made:
+        1) The MCS can't have more atoms of an element than either ligand, so
+            the sum over elements of the smaller count is an upper bound on
+            the size of the MCS. Pairs where this is less than
+            min_atom_match_mcs can never pass and are skipped.
+        2) The remaining partners are tried in a random order weighted by
+            their Morgan fingerprint Tanimoto similarity to lig1, so the
+            partners most likely to share a large substructure are usually
+            tried first.
+    """
+
+    def __init__(self, smiles_list, min_atom_match_mcs):
+        """
+        Parse and fingerprint all of the ligands.
+
+        Inputs:
+        :param list smiles_list: the SMILES strings of the seed ligands
+        :param int min_atom_match_mcs: the minimum number of atoms two
+            ligands must share
+        """
+
+        self.smiles_list = smiles_list
+        self.min_atom_match_mcs = min_atom_match_mcs
+
+        self.smiles_to_index = {}
+        for index, smiles in enumerate(smiles_list):
+            if smiles not in self.smiles_to_index:
+                self.smiles_to_index[smiles] = index
+
+        # convert_mol_from_smiles returns False if a ligand fails to
+        # deprotanate
+        self.mol_list = []
+        for smiles in smiles_list:
+            mol = convert_mol_from_smiles(smiles)
+            self.mol_list.append(None if mol is False else mol)
+
+        # Count each element in each ligand. Ligands which failed to parse
+        # have no atoms, so they never pass the atom count bound.
+        atomic_nums = sorted(
+            set(
+                atom.GetAtomicNum()
+                for mol in self.mol_list
+                if mol is not None
+                for atom in mol.GetAtoms()
+            )
+        )
+        column = {atomic_num: i for i, atomic_num in enumerate(atomic_nums)}
+        self.element_counts = numpy.zeros(
+            (len(smiles_list), len(atomic_nums)), dtype=numpy.int32
+        )
+        self.fingerprints = []
+        for index, mol in enumerate(self.mol_list):
+            if mol is None:
+                self.fingerprints.append(DataStructs.ExplicitBitVect(1024))
+                continue
+            for atom in mol.GetAtoms():
+                self.element_counts[index, column[atom.GetAtomicNum()]] += 1
+            self.fingerprints.append(
+                AllChem.GetMorganFingerprintAsBitVect(mol, 2, nBits=1024)
+            )
+
+        # MCS results keyed by the (smaller, larger) pair of ligand indexes
+        self.mcs_records = {}
+
+    def get_partner_order(self, lig1_index):
+        """
+        Get the indexes of the ligands which could share enough atoms with
+        lig1, in the order they should be tried. The order is random but
+        weighted by fingerprint similarity.
+
+        Inputs:
+        :param int lig1_index: the index of lig1 in the seed list
+
+        Returns:
+        :returns: list partner_order: the indexes of the partners to try
+        """
+
+        # Upper bound of the number of atoms in the MCS of lig1 with every
+        # ligand
+        max_shared_atoms = numpy.minimum(
+            self.element_counts[lig1_index], self.element_counts
+        ).sum(axis=1)
+
+        lig1_smiles = self.smiles_list[lig1_index]
+        candidates = [
+            index
+            for index in numpy.nonzero(max_shared_atoms >= self.min_atom_match_mcs)[0]
+            if self.mol_list[index] is not None
+            and self.smiles_list[index] != lig1_smiles
+        ]
+        if len(candidates) == 0:
+            return []
+
+        similarities = DataStructs.BulkTanimotoSimilarity(
+            self.fingerprints[lig1_index],
+            [self.fingerprints[index] for index in candidates],
+        )
+
+        # Weighted random order: sort by u ** (1 / weight) with u uniform in
+        # (0, 1]
+        keys = [
+            (1.0 - random.random()) ** (1.0 / (similarity + MIN_PARTNER_WEIGHT))
+            for similarity in similarities
+        ]
+        order = sorted(range(len(candidates)), key=lambda i: keys[i], reverse=True)
+
+        return [int(candidates[i]) for i in order]
+
+    def get_mcs(self, index_1, index_2, timeout):
+        """
+        Get the MCS of two seed ligands, running rdFMCS.FindMCS if this pair
+        hasn't been compared with at least this timeout yet. A finished MCS
+        doesn't depend on the timeout, so it is always reused.
+
+        Inputs:
+        :param int index_1: the index of a ligand in the seed list
+        :param int index_2: the index of another ligand in the seed list
+        :param int timeout: the timeout for FindMCS in seconds
+
+        Returns:
+        :returns: MCSRecord mcs_record: the MCS of the two ligands. Returns
+            None if FindMCS failed.
+        """
+
+        pair = (min(index_1, index_2), max(index_1, index_2))
+        if pair in self.mcs_records:
+            mcs_record = self.mcs_records[pair]
+            if mcs_record is None:
+                return None
+            if mcs_record.canceled is False or mcs_record.timeout >= timeout:
+                return mcs_record
+
+        try:
+            result = rdFMCS.FindMCS(
+                [self.mol_list[index_1], self.mol_list[index_2]],
+                matchValences=False,
+                ringMatchesRingOnly=True,
+                completeRingsOnly=False,
+                timeout=timeout,
+            )
+            mcs_record = MCSRecord(
+                result.smartsString, result.numAtoms, result.canceled, timeout
+            )
+        except:
+            mcs_record = None
+
+        self.mcs_records[pair] = mcs_record
+
+        return mcs_record
+
+    def is_mcs_sufficient(self, mcs_record):
+        """
+        Check that an MCS finished and has at least min_atom_match_mcs atoms.
+
+        Inputs:
+        :param MCSRecord mcs_record: the MCS of two ligands or None
+
+        Returns:
+        :returns: bool is_sufficient: True if the pair can be crossed over
+        """
+
+        if mcs_record is None or mcs_record.canceled is True:
+            return False
+        return mcs_record.num_atoms >= self.min_atom_match_mcs
+
 
 
 def test_for_mcs(vars, mol_1, mol_2):
@@ -85,12 +341,15 @@ def test_for_mcs(vars, mol_1, mol_2):
     return result
 
 
-def find_random_lig2(vars, ligands_list, ligand1_pair):
+def find_random_lig2(vars, ligands_list, ligand1_pair, partner_index=None):
     """
-    Pick a random molecule from the list and check that it can be converted
-    into a rdkit mol object and then test for a satistifactory Most common
-    substructure (MCS) which satisifies the User specified minimum shared
-    substructure
+    Pick a random molecule from the list which can be converted into a rdkit
+    mol object and has a satistifactory Most common substructure (MCS) with
+    Ligand 1 which satisifies the User specified minimum shared substructure.
+
+    Partners which can't share enough atoms are skipped without running MCS
+    and the rest are tried in a random order weighted towards partners
+    similar to Ligand 1 (see CompiledPartnerIndex).
 
     NECESSARY INCASE THE SMILE CANNOT BE USED (ie. valence issue)
 
@@ -99,6 +358,8 @@ def find_random_lig2(vars, ligands_list, ligand1_pair):
     :param list ligands_list: list of all the lignads to chose from
     :param list ligand1_pair: information for the Ligand 1. This info includes
         the name and SMILES string
+    :param MCSPartnerIndex partner_index: the index of ligands_list. If None
+        one is made.
 
     Returns:
     :returns: list mol2_pair: a set of information for a 2nd ligand (Lig2)
@@ -107,38 +368,28 @@ def find_random_lig2(vars, ligands_list, ligand1_pair):
         it returns False
     """
 
-    count = 0
-    shuffled_num_list = list(range(0, len(ligands_list) - 1))
-    random.shuffle(shuffled_num_list)
+    if partner_index is None:
+        partner_index = MCSPartnerIndex(ligands_list, vars["min_atom_match_mcs"])
+    compiled_index = partner_index.get_compiled_index()
 
-    # Convert lig_1 into an RDkit mol
     lig_1_string = ligand1_pair[0]
-    lig1_mol = convert_mol_from_smiles(lig_1_string)
-
-    while count < len(ligands_list) - 1:
-        rand_num = shuffled_num_list[count]
-        mol2_pair = ligands_list[rand_num]
-
-        if mol2_pair[0] == lig_1_string:
-            count = count + 1
-            continue
-
-        # Convert lig_1 into an RDkit mol
-        lig_2_string = mol2_pair[0]
-        lig2_mol = convert_mol_from_smiles(lig_2_string)
-
-        if lig2_mol is None:
-            count = count + 1
-            continue
+    if lig_1_string not in compiled_index.smiles_to_index:
+        return False
+    lig1_index = compiled_index.smiles_to_index[lig_1_string]
+    if compiled_index.mol_list[lig1_index] is None:
+        return False
 
+    for lig2_index in compiled_index.get_partner_order(lig1_index):
         # it converts and it is not Ligand1. now lets test for a common
         # substructure
-        if test_for_mcs(vars, lig1_mol, lig2_mol) is None:
-            count = count + 1
+        mcs_record = compiled_index.get_mcs(
+            lig1_index, lig2_index, vars["max_time_mcs_prescreen"]
+        )
+        if compiled_index.is_mcs_sufficient(mcs_record) is False:
             continue
 
         # We found a good pair of Ligands
-        return mol2_pair
+        return ligands_list[lig2_index]
 
     return False
 
@@ -199,7 +450,7 @@ def make_crossovers(
         for this generation but in a previous run of crossover, i.e., if filtering
         ligands removed some of the ligands generated by crossover, it requires
         another loop of crossover to fill out the list so this is used to prevent
-        creating the same mol multiple times
+        creating the same mol multiple times. These are not returned.
 
     Returns:
     :returns: list new_ligands_list: list of new unique ligands with unique
@@ -207,11 +458,6 @@ def make_crossovers(
         new mol gets generated
     """
 
-    if len(new_crossover_smiles_list) == 0:
-        new_ligands_list = []
-    else:
-        new_ligands_list = copy.deepcopy(new_crossover_smiles_list)
-
     # Use a temp vars dict so you don't put mpi multiprocess info through
     # itself...
     temp_vars = {}
@@ -220,111 +466,86 @@ def make_crossovers(
             continue
         temp_vars[key] = vars[key]
 
-    new_ligands_list = []
     number_of_processors = int(vars["parallelizer"].return_node())
 
-    loop_counter = 0
-    while loop_counter < 2000 and len(new_ligands_list) < num_crossovers_to_make:
-
-        react_list = copy.deepcopy(list_previous_gen_smiles)
-
-        while len(new_ligands_list) < num_crossovers_to_make and len(react_list) > 0:
-
-            num_to_grab = num_crossovers_to_make - len(new_ligands_list)
-            num_to_make = num_to_grab
-
-            # to minimize a big loop of running a single crossover at a time
-            # we will make 1 new lig/processor. This will help to prevent
-            # wasting reasources and time.
-            if num_to_make < number_of_processors:
-                num_to_make = number_of_processors
-
-            smile_pairs = [
-                react_list.pop() for x in range(num_to_make) if len(react_list) > 0
-            ]
-
-            # smile_inputs = [x[0] for x in smile_pairs]
-            # smile_names = [x[1] for x in smile_pairs]
-
-            # make a list of tuples for multi-processing Crossover
-            job_input = []
-            for i in smile_pairs:
-                temp = tuple([temp_vars, i, list_previous_gen_smiles])
-                job_input.append(temp)
-            job_input = tuple(job_input)
-
-            # Example information:
-            # result is a list of lists
-            # result = [[ligand_new_smiles, lig1_smile_pair,lig_2_pair],...]
-            # ligand_new_smiles is the smiles string of a new ligand from crossover
-            # lig1_smile_pair = ["NCCCCCC","zinc123"]
-            # Lig2_smile_pair = ["NCCCO","zinc456"]
-            # Lig1 and lig 2 were used to generate the ligand_new_smiles
-
-            results = vars["parallelizer"].run(job_input, do_crossovers_smiles_merge)
-            results = [x for x in results if x is not None]
-
-            for index, i in enumerate(results):
-                if i is None:
-                    continue
-
-                # Get the new molecule's (aka the Child lig) Smile string
-                child_lig_smile = i[0]
-
-                # get the ID for the parent of a child mol
-                parent_lig_1_id = i[1][1]
-                parent_lig_2_id = i[2][1]
-
-                # get the unique ID (last few diget ID of the parent mol)
-                parent_lig_1_id = parent_lig_1_id.split(")")[-1]
-                parent_lig_2_id = parent_lig_2_id.split(")")[-1]
-
-                # Make a list of all smiles and smile_id's of all previously
-                # made smiles in this generation
-                list_of_already_made_smiles = []
-                list_of_already_made_id = []
-
-                # fill lists of all smiles and smile_id's of all previously
-                # made smiles in this generation
-                for x in new_ligands_list:
-                    list_of_already_made_smiles.append(x[0])
-                    list_of_already_made_id.append(x[1])
-
-                if child_lig_smile not in list_of_already_made_smiles:
-                    # if the smiles string is unique to the list of previous
-                    # smile strings in this round of reactions then we append
-                    # it to the list of newly created ligands we append it
-                    # with a unique ID, which also tracks the progress of the
-                    # reactant
-                    is_name_unique = False
-                    while is_name_unique is False:
-
-                        # make unique ID with the 1st number being the
-                        # ligand_id_Name for the derived mol. second being the
-                        # lig2 number. Followed by Cross. folowed by the
-                        # generation number. followed by a  unique.
-
-                        random_id_num = random.randint(100, 1000000)
-                        new_lig_id = "({}+{})Gen_{}_Cross_{}".format(
-                            parent_lig_1_id,
-                            parent_lig_2_id,
-                            generation_num,
-                            random_id_num,
-                        )
-
-                        # check name is unique
-                        if new_lig_id not in list_of_already_made_id:
-                            is_name_unique = True
-
-                    # make a temporary list containing the smiles string of
-                    # the new product and the unique ID
-                    ligand_info = [child_lig_smile, new_lig_id]
-
-                    # append the new ligand smile and ID to the list of all
-                    # newly made ligands
-                    new_ligands_list.append(ligand_info)
-
-        loop_counter = loop_counter + 1
+    # Crossovers made in a previous call for this generation are kept out of
+    # the new ligands
+    registry = CandidateRegistry.CandidateRegistry(new_crossover_smiles_list)
+
+    # The seed ligands are parsed and each pair's MCS is found at most once
+    # per process for this generation
+    partner_index = MCSPartnerIndex(
+        list_previous_gen_smiles, vars["min_atom_match_mcs"]
+    )
+    scheduler = CandidateRegistry.AdaptiveBatchScheduler(
+        list_previous_gen_smiles, number_of_processors
+    )
+
+    while len(registry) < num_crossovers_to_make and scheduler.is_exhausted() is False:
+
+        # The batch is sized from how many of the last batch's crossovers
+        # made a new ligand, and is at least 1 new lig/processor.
+        smile_pairs = scheduler.get_next_batch(num_crossovers_to_make - len(registry))
+
+        # make a list of tuples for multi-processing Crossover. temp_vars,
+        # list_previous_gen_smiles and partner_index are the same for every
+        # job so they are sent to each worker once through shared_kwargs
+        job_input = tuple([tuple([i]) for i in smile_pairs])
+
+        # Example information:
+        # result is a list of lists
+        # result = [[ligand_new_smiles, lig1_smile_pair,lig_2_pair],...]
+        # ligand_new_smiles is the smiles string of a new ligand from crossover
+        # lig1_smile_pair = ["NCCCCCC","zinc123"]
+        # Lig2_smile_pair = ["NCCCO","zinc456"]
+        # Lig1 and lig 2 were used to generate the ligand_new_smiles
+
+        results = StageMetrics.run_jobs(
+            vars["parallelizer"],
+            "crossover",
+            job_input,
+            do_crossovers_smiles_merge,
+            count_failures=lambda result: result is None,
+            shared_kwargs={
+                "vars": temp_vars,
+                "ligands_list": list_previous_gen_smiles,
+                "partner_index": partner_index,
+            },
+        )
+
+        num_added = 0
+        for i in results:
+            if i is None:
+                continue
+            if len(registry) >= num_crossovers_to_make:
+                break
+
+            # Get the new molecule's (aka the Child lig) Smile string
+            child_lig_smile = i[0]
+
+            # get the ID for the parent of a child mol
+            parent_lig_1_id = i[1][1]
+            parent_lig_2_id = i[2][1]
+
+            # get the unique ID (last few diget ID of the parent mol)
+            parent_lig_1_id = parent_lig_1_id.split(")")[-1]
+            parent_lig_2_id = parent_lig_2_id.split(")")[-1]
+
+            # make unique ID with the 1st number being the ligand_id_Name for
+            # the derived mol. second being the lig2 number. Followed by
+            # Cross. folowed by the generation number. followed by a unique.
+            id_prefix = "({}+{})Gen_{}_Cross".format(
+                parent_lig_1_id, parent_lig_2_id, generation_num
+            )
+
+            # The ligand is only added if its smiles string is unique to the
+            # smiles made so far in this generation
+            if registry.add_ligand(child_lig_smile, id_prefix) is True:
+                num_added = num_added + 1
+
+        scheduler.record_batch(len(smile_pairs), num_added)
+
+    new_ligands_list = registry.ligands_list
 
     if len(new_ligands_list) < num_crossovers_to_make:
         return None
@@ -333,7 +554,7 @@ def make_crossovers(
     return new_ligands_list
 
 
-def run_smiles_merge_prescreen(vars, ligands_list, ligand1_pair):
+def run_smiles_merge_prescreen(vars, ligands_list, ligand1_pair, partner_index=None):
     """
     This function runs a series of functions to find two molecules with a
     sufficient amount of shared common structure (most common structure = MCS)
@@ -346,6 +567,8 @@ def run_smiles_merge_prescreen(vars, ligands_list, ligand1_pair):
     :param list ligands_list: list of all the lignads to chose from
     :param list ligand1_pair: information for the Ligand 1. This info includes
         the name and SMILES string
+    :param MCSPartnerIndex partner_index: the index of ligands_list. If None
+        one is made.
 
     Returns:
     :returns: list lig_2_pair: a set of information for a 2nd ligand (Lig2)
@@ -363,7 +586,7 @@ def run_smiles_merge_prescreen(vars, ligands_list, ligand1_pair):
         return None
 
     # GET TWO UNIQUE LIGANDS TO WITH A SHARED SUBSTRUCTURE
-    lig_2_pair = find_random_lig2(vars, ligands_list, ligand1_pair)
+    lig_2_pair = find_random_lig2(vars, ligands_list, ligand1_pair, partner_index)
 
     if lig_2_pair is False:
         # ligand_1 has no matches
@@ -372,7 +595,7 @@ def run_smiles_merge_prescreen(vars, ligands_list, ligand1_pair):
     return lig_2_pair
 
 
-def do_crossovers_smiles_merge(vars, lig1_smile_pair, ligands_list):
+def do_crossovers_smiles_merge(lig1_smile_pair, vars, ligands_list, partner_index=None):
     """
     This function will take the list of ligands to work on and the number in
     that list for the Ligand 1.
@@ -387,11 +610,13 @@ def do_crossovers_smiles_merge(vars, lig1_smile_pair, ligands_list):
     and return a new molecule
 
     Inputs:
-    :param dict vars: User variables which will govern how the programs runs
     :param list lig1_smile_pair: a list with the SMILES string and info for
         lig1
+    :param dict vars: User variables which will govern how the programs runs
     :param list ligands_list: a list of all the seed ligands from the previous
         generation
+    :param MCSPartnerIndex partner_index: the index of ligands_list. If None
+        one is made.
 
     Returns:
     :returns: str ligand_new_smiles: a new mol's SMILES string
@@ -403,7 +628,12 @@ def do_crossovers_smiles_merge(vars, lig1_smile_pair, ligands_list):
 
     # Run the run_smiles_merge_prescreen of the ligand. This gets a new a lig2
     # which passed the prescreen.
-    lig_2_pair = run_smiles_merge_prescreen(vars, ligands_list, lig1_smile_pair)
+    if partner_index is None:
+        partner_index = MCSPartnerIndex(ligands_list, vars["min_atom_match_mcs"])
+
+    lig_2_pair = run_smiles_merge_prescreen(
+        vars, ligands_list, lig1_smile_pair, partner_index
+    )
 
     if lig_2_pair is None:
         return None
@@ -411,11 +641,25 @@ def do_crossovers_smiles_merge(vars, lig1_smile_pair, ligands_list):
     ligand_1_string = lig1_smile_pair[0]
     ligand_2_string = lig_2_pair[0]
 
+    # Without protanation SmilesMerge finds the MCS of the same molecules as
+    # the prescreen, so the pair's MCS is looked up rather than found again
+    # for every attempt.
+    mcs_record = None
+    if vars["protanate_step"] is False:
+        compiled_index = partner_index.get_compiled_index()
+        mcs_record = compiled_index.get_mcs(
+            compiled_index.smiles_to_index[ligand_1_string],
+            compiled_index.smiles_to_index[ligand_2_string],
+            vars["max_time_mcs_thorough"],
+        )
+        if compiled_index.is_mcs_sufficient(mcs_record) is False:
+            return None
+
     counter = 0
     while counter < 3:
         # run SmilesMerge
         ligand_new_smiles = smiles_merge.run_main_smiles_merge(
-            vars, ligand_1_string, ligand_2_string
+            vars, ligand_1_string, ligand_2_string, mcs_record
         )
 
         if ligand_new_smiles is None:
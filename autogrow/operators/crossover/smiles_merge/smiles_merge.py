@@ -57,7 +57,7 @@ def process_ligand_new_mol(ligand_new_mol):
     return ligand_new_smiles
 
 
-def run_main_smiles_merge(vars, lig_string_1, lig_string_2):
+def run_main_smiles_merge(vars, lig_string_1, lig_string_2, mcs_record=None):
     """
     This runs the main script for SmileMerge.
 
@@ -68,6 +68,9 @@ def run_main_smiles_merge(vars, lig_string_1, lig_string_2):
     :param str lig_string_2: smile string for lig 2. example: lig_string_1 =
         "[N-] = [N+] = NCC(O)COc1cccc2ccccc12"; example: lig_string_2 = "C#
         CCOc1ccc2ccccc2c1CO"
+    :param MCSRecord mcs_record: the already computed MCS of the two ligands
+        from execute_crossover.CompiledPartnerIndex.get_mcs. If None, the MCS
+        is found here.
 
     Returns:
     :returns: str ligand_new_smiles: smile string for the child ligand derived
@@ -99,25 +102,33 @@ def run_main_smiles_merge(vars, lig_string_1, lig_string_2):
     # make a list of the two rdkit.Chem.rdchem.Mol objects
     mols = [mol_1, mol_2]
 
-    # Use the below mcs_H function for Most Common Substructure searching.
-    # This will prevent broken rings.
-    mcs_results = rdFMCS.FindMCS(
-        mols,
-        matchValences=False,
-        ringMatchesRingOnly=True,
-        completeRingsOnly=False,
-        timeout=vars["max_time_mcs_thorough"],
-    )
-
-    if mcs_results.canceled is True:
+    if mcs_record is None:
+        # Use the below mcs_H function for Most Common Substructure searching.
+        # This will prevent broken rings.
+        mcs_results = rdFMCS.FindMCS(
+            mols,
+            matchValences=False,
+            ringMatchesRingOnly=True,
+            completeRingsOnly=False,
+            timeout=vars["max_time_mcs_thorough"],
+        )
+        mcs_canceled = mcs_results.canceled
+        mcs_num_atoms = mcs_results.numAtoms
+        mcs_smarts_string = mcs_results.smartsString
+    else:
+        mcs_canceled = mcs_record.canceled
+        mcs_num_atoms = mcs_record.num_atoms
+        mcs_smarts_string = mcs_record.smarts_string
+
+    if mcs_canceled is True:
         return None
 
     # confirm that this meets the minimum number of matching atoms
-    if mcs_results.numAtoms < vars["min_atom_match_mcs"]:
+    if mcs_num_atoms < vars["min_atom_match_mcs"]:
         return None
 
     ### Convert mcs_res from into usable and referable forms
-    mcs_mol = Chem.MolFromSmarts(mcs_results.smartsString)
+    mcs_mol = Chem.MolFromSmarts(mcs_smarts_string)
 
     # handle_mcs_align_labeling_and_cyclicbreaks
     mol_1, mol_2, mcs_mol = AnB.handle_mcs_align_labeling_and_cyclicbreaks(
@@ -3,8 +3,6 @@ Top level for running filters.
 """
 import __future__
 
-import copy
-
 import rdkit
 from rdkit import Chem
 from rdkit.Chem.MolStandardize import rdMolStandardize
@@ -18,8 +16,17 @@ from autogrow.operators.filter.filter_classes.get_child_filter_class import (
 )
 
 import autogrow.operators.convert_files.gypsum_dl.gypsum_dl.MolObjectHandling as MOH
+from autogrow.operators.filter.filter_classes.mol_descriptors import MolDescriptors
+import autogrow.operators.filter.filter_classes.substructure_catalog as SubstructureCatalog
+import autogrow.utils.stage_metrics as StageMetrics
 from autogrow.operators.filter.filter_classes.filter_children_classes import *
 
+# Filter results for this process keyed by (the names of the filters, how the
+# mol was prepared, SMILES string). Mutation and crossover make many of the
+# same products over a generation, so each is only filtered once.
+FILTER_RESULT_CACHE = {}
+MAX_FILTER_RESULT_CACHE_SIZE = 100000
+
 
 def make_run_class_dict(filters_to_use):
     """
@@ -73,14 +80,18 @@ def run_filter(vars, list_of_new_ligands):
     # Get the already generated dictionary of filter objects
     filter_object_dict = vars["filter_object_dict"]
 
-    # make a list of tuples for multi-processing Filter
-    job_input = []
-    for smiles_info in list_of_new_ligands:
-        temp_tuple = tuple([smiles_info, filter_object_dict])
-        job_input.append(temp_tuple)
-    job_input = tuple(job_input)
+    # make a list of tuples for multi-processing Filter. The filter objects
+    # are sent to each worker once rather than with every ligand
+    job_input = tuple([tuple([smiles_info]) for smiles_info in list_of_new_ligands])
 
-    results = vars["parallelizer"].run(job_input, run_filter_mol)
+    results = StageMetrics.run_jobs(
+        vars["parallelizer"],
+        "filtering",
+        job_input,
+        run_filter_mol,
+        count_failures=lambda result: result is None,
+        shared_kwargs={"child_dict": filter_object_dict},
+    )
 
     # remove mols which fail the filter
     ligands_which_passed_filter = [x for x in results if x is not None]
@@ -108,6 +119,13 @@ def run_filter_mol(smiles_info, child_dict):
 
     smiles_string = smiles_info[0]
 
+    if child_dict is not None:
+        cache_key = get_filter_cache_key(child_dict, "uncharged", smiles_string)
+        if cache_key in FILTER_RESULT_CACHE:
+            if FILTER_RESULT_CACHE[cache_key] is False:
+                return None
+            return smiles_info
+
     mol = Chem.MolFromSmiles(smiles_string, sanitize=False)
     # try sanitizing, which is necessary later
     mol = MOH.check_sanitization(mol)
@@ -132,8 +150,10 @@ def run_filter_mol(smiles_info, child_dict):
         return None
 
     if child_dict is not None:
-        # run through the filters
-        filter_result = run_all_selected_filters(mol, child_dict)
+        # run through the filters. The mol was just sanitized.
+        filter_result = run_filters_on_cached_mol(
+            mol, child_dict, "uncharged", smiles_string
+        )
 
         # see if passed
         if filter_result is False:
@@ -162,6 +182,13 @@ def run_filter_on_just_smiles(smile_string, child_dict):
         False If the mol fails a filter.
     """
 
+    if child_dict is not None:
+        cache_key = get_filter_cache_key(child_dict, "deprotanated", smile_string)
+        if cache_key in FILTER_RESULT_CACHE:
+            if FILTER_RESULT_CACHE[cache_key] is False:
+                return False
+            return smile_string
+
     mol = Chem.MolFromSmiles(smile_string, sanitize=False)
     # try sanitizing, which is necessary later
     mol = MOH.check_sanitization(mol)
@@ -173,8 +200,10 @@ def run_filter_on_just_smiles(smile_string, child_dict):
         return False
 
     if child_dict is not None:
-        # run through the filters
-        filter_result = run_all_selected_filters(mol, child_dict)
+        # run through the filters. try_deprotanation sanitizes the mol.
+        filter_result = run_filters_on_cached_mol(
+            mol, child_dict, "deprotanated", smile_string
+        )
 
         # see if passed
         if filter_result is False:
@@ -202,18 +231,107 @@ def run_all_selected_filters(mol, child_dict):
         fails any filters.
     """
 
-    filters_failed = 0
     mol = MOH.check_sanitization(mol)
     if mol is None:
         return False
+
+    return run_filters_on_sanitized_mol(mol, child_dict)
+
+
+def run_filters_on_sanitized_mol(mol, child_dict):
+    """
+    Iterate through all of the filters specified by the user for a single
+    sanitized molecule, stopping at the first filter it fails.
+
+    The descriptors of the mol are computed once and shared by all of the
+    filters (see MolDescriptors). The catalogs of all of the substructure
+    filters (ie. PAINS, BRENK and NIH) are searched together as one
+    FilterCatalog after the other filters have passed.
+
+    Inputs:
+    :param rdkit.Chem.rdchem.Mol object mol: A sanitized rdkit mol object to
+        be tested if it passes the filters
+    :param dict child_dict: This dictionary contains all the names of the
+        chosen filters as keys and the the filter objects as the items
+
+    Returns:
+    returns bol bol: True if the mol passes all the filters. False if the mol
+        fails any filters.
+    """
+
+    descriptors = MolDescriptors(mol)
+    catalog_names = []
     for child in list(child_dict.keys()):
-        mol_copy = copy.deepcopy(mol)
-        filter_function = child_dict[child].run_filter
-        if filter_function(mol_copy) is False:
-            filters_failed = filters_failed + 1
+        filter_object = child_dict[child]
+        if filter_object.substructure_catalogs is not None:
+            catalog_names.extend(filter_object.substructure_catalogs)
+            continue
+
+        if filter_object.run_filter_with_descriptors(mol, descriptors) is False:
+            # failed one or more filters
+            return False
+
+    if len(catalog_names) != 0:
+        matched_filter_set = SubstructureCatalog.get_matched_filter_set(
+            mol, catalog_names
+        )
+        if matched_filter_set is not None:
+            # failed a substructure filter
+            return False
 
-    if filters_failed == 0:
-        return True
+    return True
+
+
+def run_filters_on_cached_mol(mol, child_dict, mol_preparation, smiles_string):
+    """
+    Run all of the filters on a sanitized molecule, looking up and saving the
+    result in FILTER_RESULT_CACHE under both the SMILES string it was made
+    from and its canonical SMILES string.
+
+    Inputs:
+    :param rdkit.Chem.rdchem.Mol object mol: A sanitized rdkit mol object to
+        be tested if it passes the filters
+    :param dict child_dict: This dictionary contains all the names of the
+        chosen filters as keys and the the filter objects as the items
+    :param str mol_preparation: how the mol was prepared from its SMILES
+        string. ie. 'deprotanated' or 'uncharged'
+    :param str smiles_string: the SMILES string mol was made from
+
+    Returns:
+    returns bol bol: True if the mol passes all the filters. False if the mol
+        fails any filters.
+    """
+
+    canonical_smiles = Chem.MolToSmiles(mol, isomericSmiles=True)
+    canonical_key = get_filter_cache_key(child_dict, mol_preparation, canonical_smiles)
+    if canonical_key in FILTER_RESULT_CACHE:
+        filter_result = FILTER_RESULT_CACHE[canonical_key]
+    else:
+        filter_result = run_filters_on_sanitized_mol(mol, child_dict)
+
+    if len(FILTER_RESULT_CACHE) >= MAX_FILTER_RESULT_CACHE_SIZE:
+        FILTER_RESULT_CACHE.clear()
+    FILTER_RESULT_CACHE[canonical_key] = filter_result
+    FILTER_RESULT_CACHE[
+        get_filter_cache_key(child_dict, mol_preparation, smiles_string)
+    ] = filter_result
+
+    return filter_result
+
+
+def get_filter_cache_key(child_dict, mol_preparation, smiles_string):
+    """
+    Get the FILTER_RESULT_CACHE key of a SMILES string.
+
+    Inputs:
+    :param dict child_dict: This dictionary contains all the names of the
+        chosen filters as keys and the the filter objects as the items
+    :param str mol_preparation: how the mol was prepared from its SMILES
+        string. ie. 'deprotanated' or 'uncharged'
+    :param str smiles_string: a SMILES string
+
+    Returns:
+    :returns: tuple cache_key: the key for FILTER_RESULT_CACHE
+    """
 
-    # failed one or more filters
-    return False
+    return (tuple(sorted(child_dict.keys())), mol_preparation, smiles_string)
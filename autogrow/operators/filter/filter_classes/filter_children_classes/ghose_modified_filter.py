@@ -22,18 +22,14 @@ databases Journal of Combinatorial Chemistry, 1 (1999), pp. 55-68
 
 import __future__
 
-import copy
-
 import rdkit
 import rdkit.Chem as Chem
-import rdkit.Chem.Lipinski as Lipinski
-import rdkit.Chem.Crippen as Crippen
-import rdkit.Chem.Descriptors as Descriptors
 
 # Disable the unnecessary RDKit warnings
 rdkit.RDLogger.DisableLog("rdApp.*")
 
 from autogrow.operators.filter.filter_classes.parent_filter_class import ParentFilter
+from autogrow.operators.filter.filter_classes.mol_descriptors import MolDescriptors
 
 
 class GhoseModifiedFilter(ParentFilter):
@@ -64,6 +60,23 @@ class GhoseModifiedFilter(ParentFilter):
     """
 
     def run_filter(self, mol: rdkit.Chem.rdchem.Mol) -> bool:
+        """
+        Run the filter on a single molecule. See run_filter_with_descriptors.
+
+        Inputs:
+        :param rdkit.Chem.rdchem.Mol object mol: An rdkit mol object to be
+            tested if it passes the filters
+
+        Returns:
+        :returns: bool bool: True if the mol passes the filter; False if it
+            fails the filter
+        """
+
+        return self.run_filter_with_descriptors(mol, MolDescriptors(mol))
+
+    def run_filter_with_descriptors(
+        self, mol: rdkit.Chem.rdchem.Mol, descriptors
+    ) -> bool:
         """
         This runs a Ghose filter for drug-likeliness. Ghose filter filters
         molecules by Molecular weight (MW), the number of atoms, and the logP
@@ -81,28 +94,30 @@ class GhoseModifiedFilter(ParentFilter):
         Inputs:
         :param rdkit.Chem.rdchem.Mol object mol: An rdkit mol object to be
             tested if it passes the filters
+        :param MolDescriptors descriptors: the descriptor record of mol
 
         Returns:
         :returns: bool bool: True if the mol passes the filter; False if it
             fails the filter
         """
-        copy_mol = copy.deepcopy(mol)
-        copy_mol = Chem.AddHs(copy_mol)
-        exact_mwt = Descriptors.ExactMolWt(copy_mol)
+        # number of atoms is altered by the presence/absence of hydrogens.
+        # Our Ghose filter counts hydrogenss towards atom count, so these
+        # descriptors are computed on a copy of the mol with Hs added
+        exact_mwt = descriptors.get("ExactMolWtWithHs")
         if (exact_mwt < 160) or (exact_mwt > 500):
             return False
 
-        num_atoms = copy_mol.GetNumAtoms()
+        num_atoms = descriptors.get("NumAtomsWithHs")
         if (num_atoms < 20) or (num_atoms > 70):
             return False
 
         # molar Refractivity
-        MolMR = Crippen.MolMR(copy_mol)
+        MolMR = descriptors.get("MolMRWithHs")
         if (MolMR < 40) or (MolMR > 130):
             return False
 
         # molar LogP
-        mol_log_p = Crippen.MolLogP(copy_mol)
+        mol_log_p = descriptors.get("MolLogPWithHs")
         if (mol_log_p < -0.4) or (mol_log_p > 5.6):
             return False
 
@@ -18,14 +18,12 @@ import __future__
 
 import rdkit
 import rdkit.Chem as Chem
-import rdkit.Chem.Lipinski as Lipinski
-import rdkit.Chem.Crippen as Crippen
-import rdkit.Chem.Descriptors as Descriptors
 
 # Disable the unnecessary RDKit warnings
 rdkit.RDLogger.DisableLog("rdApp.*")
 
 from autogrow.operators.filter.filter_classes.parent_filter_class import ParentFilter
+from autogrow.operators.filter.filter_classes.mol_descriptors import MolDescriptors
 
 
 class LipinskiStrictFilter(ParentFilter):
@@ -47,6 +45,23 @@ class LipinskiStrictFilter(ParentFilter):
     """
 
     def run_filter(self, mol: rdkit.Chem.rdchem.Mol) -> bool:
+        """
+        Run the filter on a single molecule. See run_filter_with_descriptors.
+
+        Inputs:
+        :param rdkit.Chem.rdchem.Mol object mol: An rdkit mol object to be
+            tested if it passes the filters
+
+        Returns:
+        :returns: bool bool: True if the mol passes the filter; False if it
+            fails the filter
+        """
+
+        return self.run_filter_with_descriptors(mol, MolDescriptors(mol))
+
+    def run_filter_with_descriptors(
+        self, mol: rdkit.Chem.rdchem.Mol, descriptors
+    ) -> bool:
         """
         This runs a Strict Lipinski filter. Lipinski filter refines for orally
         available drugs. It filters molecules by Molecular weight (MW), the
@@ -70,25 +85,26 @@ class LipinskiStrictFilter(ParentFilter):
         Inputs:
         :param rdkit.Chem.rdchem.Mol object mol: An rdkit mol object to be
             tested if it passes the filters
+        :param MolDescriptors descriptors: the descriptor record of mol
 
         Returns:
         :returns: bool bool: True if the mol passes the filter; False if it
           fails the filter
         """
 
-        exact_mwt = Descriptors.ExactMolWt(mol)
+        exact_mwt = descriptors.get("ExactMolWt")
         if exact_mwt > 500:
             return False
 
-        num_hydrogen_bond_donors = Lipinski.NumHDonors(mol)
+        num_hydrogen_bond_donors = descriptors.get("NumHDonors")
         if num_hydrogen_bond_donors > 5:
             return False
 
-        num_hydrogen_bond_acceptors = Lipinski.NumHAcceptors(mol)
+        num_hydrogen_bond_acceptors = descriptors.get("NumHAcceptors")
         if num_hydrogen_bond_acceptors > 10:
             return False
 
-        mol_log_p = Crippen.MolLogP(mol)
+        mol_log_p = descriptors.get("MolLogP")
         if mol_log_p > 5:
             return False
 
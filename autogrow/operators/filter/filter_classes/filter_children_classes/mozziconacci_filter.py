@@ -21,12 +21,12 @@ import __future__
 
 import rdkit
 import rdkit.Chem as Chem
-import rdkit.Chem.Lipinski as Lipinski
 
 # Disable the unnecessary RDKit warnings
 rdkit.RDLogger.DisableLog("rdApp.*")
 
 from autogrow.operators.filter.filter_classes.parent_filter_class import ParentFilter
+from autogrow.operators.filter.filter_classes.mol_descriptors import MolDescriptors
 
 
 class MozziconacciFilter(ParentFilter):
@@ -52,6 +52,23 @@ class MozziconacciFilter(ParentFilter):
     """
 
     def run_filter(self, mol: rdkit.Chem.rdchem.Mol) -> bool:
+        """
+        Run the filter on a single molecule. See run_filter_with_descriptors.
+
+        Inputs:
+        :param rdkit.Chem.rdchem.Mol object mol: An rdkit mol object to be
+            tested if it passes the filters
+
+        Returns:
+        :returns: bool bool: True if the mol passes the filter; False if it
+            fails the filter
+        """
+
+        return self.run_filter_with_descriptors(mol, MolDescriptors(mol))
+
+    def run_filter_with_descriptors(
+        self, mol: rdkit.Chem.rdchem.Mol, descriptors
+    ) -> bool:
         """
         This runs a Mozziconacci filter. Mozziconacci filter is a filter for
         Drug-likeliness which filters molecules by the number of:
@@ -66,32 +83,30 @@ class MozziconacciFilter(ParentFilter):
         Inputs:
         :param rdkit.Chem.rdchem.Mol object mol: An rdkit mol object to be
             tested if it passes the filters
+        :param MolDescriptors descriptors: the descriptor record of mol
 
         Returns:
         :returns: bool bool: True if the mol passes the filter; False if it
             fails the filter
         """
 
-        halogen = Chem.MolFromSmarts("[*;#9,#17,#35,#53,#85]")
-        number_of_halogens = len(mol.GetSubstructMatches(halogen, maxMatches=8))
+        number_of_halogens = descriptors.get("NumHalogens")
         if number_of_halogens > 7:
             return False
 
-        oxygen = Chem.MolFromSmarts("[#8]")
-        number_of_oxygens = len(mol.GetSubstructMatches(oxygen, maxMatches=2))
+        number_of_oxygens = descriptors.get("NumOxygens")
         if number_of_oxygens < 1:
             return False
 
-        nitrogen = Chem.MolFromSmarts("[#7]")
-        number_of_nitrogen = len(mol.GetSubstructMatches(nitrogen, maxMatches=2))
+        number_of_nitrogen = descriptors.get("NumNitrogens")
         if number_of_nitrogen < 1:
             return False
 
-        num_rotatable_bonds = Lipinski.NumRotatableBonds(mol)
+        num_rotatable_bonds = descriptors.get("NumRotatableBonds")
         if num_rotatable_bonds > 15:
             return False
 
-        ring_count = Chem.rdmolops.GetSSSR(mol)
+        ring_count = descriptors.get("RingCount")
         if ring_count > 6:
             return False
 
@@ -13,10 +13,9 @@ doi:10.1021/jm901070c.
 import __future__
 
 import rdkit
-from rdkit.Chem import FilterCatalog
-from rdkit.Chem.FilterCatalog import FilterCatalogParams
 
 from autogrow.operators.filter.filter_classes.parent_filter_class import ParentFilter
+import autogrow.operators.filter.filter_classes.substructure_catalog as SubstructureCatalog
 
 
 class NIHFilter(ParentFilter):
@@ -37,27 +36,8 @@ class NIHFilter(ParentFilter):
     :param class ParentFilter: a parent class to initialize off of.
     """
 
-    def __init__(self):
-        """
-        This loads in the filters which will be used.
-        """
-
-        self.filters = self.get_filters()
-
-    def get_filters(self):
-        """
-        This loads in the filters which will be used.
-
-        Returns:
-        :returns: rdkit.Chem.rdfiltercatalog.FilterCatalog filters: A set of
-            RDKit Filters
-        """
-
-        # Make a list of the NIH filter.
-        params = FilterCatalogParams()
-        params.AddCatalog(FilterCatalogParams.FilterCatalogs.NIH)
-        # This is our set of all the NIH filters
-        return FilterCatalog.FilterCatalog(params)
+    # The rdkit FilterCatalogs this filter searches (see substructure_catalog)
+    substructure_catalogs = ["NIH"]
 
     def run_filter(self, mol: rdkit.Chem.rdchem.Mol) -> bool:
         """
@@ -79,7 +59,29 @@ class NIHFilter(ParentFilter):
             fails the filter
         """
 
-        # If the mol matches a mol in the filter list. we return a False (as it
-        # failed the filter). if No matches are found to filter list this will
-        # return a True as it Passed the filter.
-        return self.filters.HasMatch(mol) is not True
+        # The search stops at the first entry the mol matches, in which case
+        # it failed the filter. If no matches are found it passed the filter.
+        matched_filter_set = SubstructureCatalog.get_matched_filter_set(
+            mol, self.substructure_catalogs
+        )
+
+        return matched_filter_set is None
+
+    def run_filter_with_descriptors(
+        self, mol: rdkit.Chem.rdchem.Mol, descriptors
+    ) -> bool:
+        """
+        Run the filter without copying mol. This is only a substructure search,
+        so it doesn't change mol or use the descriptor record.
+
+        Inputs:
+        :param rdkit.Chem.rdchem.Mol object mol: An rdkit mol object to be
+            tested if it passes the filters
+        :param MolDescriptors descriptors: the descriptor record of mol
+
+        Returns:
+        :returns: bool bool: True if the mol passes the filter; False if it
+            fails the filter
+        """
+
+        return self.run_filter(mol)
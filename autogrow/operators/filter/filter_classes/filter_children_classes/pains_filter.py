@@ -16,10 +16,9 @@ doi:10.1021/jm901137j.
 import __future__
 
 import rdkit
-from rdkit.Chem import FilterCatalog
-from rdkit.Chem.FilterCatalog import FilterCatalogParams
 
 from autogrow.operators.filter.filter_classes.parent_filter_class import ParentFilter
+import autogrow.operators.filter.filter_classes.substructure_catalog as SubstructureCatalog
 
 
 class PAINSFilter(ParentFilter):
@@ -41,42 +40,9 @@ class PAINSFilter(ParentFilter):
     :param class ParentFilter: a parent class to initialize off
     """
 
-    def __init__(self):
-        """
-        This loads in the filters which will be used.
-        """
-
-        self.filters_list = self.get_filters_list()
-
-    def get_filters_list(self):
-        """
-        This loads in the filters which will be used.
-
-        Returns:
-        :returns: rdkit.Chem.rdfiltercatalog.FilterCatalog filters: A set of
-            RDKit Filters
-        """
-
-        # Make a list of all the different PAINS Filters. PAINS should include
-        # PAINS_A,PAINS_B, and PAINS_C, but because RDKit documentation
-        # doesn't specify this explicitly we have included all 4 of the PAINS
-        # FilterCatalogs for precaution.
-        params_PAINS_A = FilterCatalogParams()
-        params_PAINS_A.AddCatalog(FilterCatalogParams.FilterCatalogs.PAINS_A)
-        params_PAINS_B = FilterCatalogParams()
-        params_PAINS_B.AddCatalog(FilterCatalogParams.FilterCatalogs.PAINS_B)
-        params_PAINS_C = FilterCatalogParams()
-        params_PAINS_C.AddCatalog(FilterCatalogParams.FilterCatalogs.PAINS_C)
-        params_PAINS = FilterCatalogParams()
-        params_PAINS.AddCatalog(FilterCatalogParams.FilterCatalogs.PAINS)
-
-        params_list = [params_PAINS_A, params_PAINS_B, params_PAINS_C, params_PAINS]
-        filters_list = []
-        for param in params_list:
-            filtr = FilterCatalog.FilterCatalog(param)
-            filters_list.append(filtr)
-
-        return filters_list
+    # PAINS is made of the PAINS_A, PAINS_B and PAINS_C catalogs, so it is the
+    # only catalog which needs to be searched
+    substructure_catalogs = ["PAINS"]
 
     def run_filter(self, mol: rdkit.Chem.rdchem.Mol) -> bool:
         """
@@ -97,14 +63,29 @@ class PAINSFilter(ParentFilter):
             False if it fails the filter
         """
 
-        # This is our set of all the PAINS filters
-        for filters in self.filters_list:
+        # The search stops at the first entry the mol matches, in which case
+        # it failed the filter. If no matches are found it passed the filter.
+        matched_filter_set = SubstructureCatalog.get_matched_filter_set(
+            mol, self.substructure_catalogs
+        )
 
-            # If the mol matches a mol in the filter list we return a False
-            # (as it failed the filter)
-            if filters.HasMatch(mol) is True:
-                return False
+        return matched_filter_set is None
+
+    def run_filter_with_descriptors(
+        self, mol: rdkit.Chem.rdchem.Mol, descriptors
+    ) -> bool:
+        """
+        Run the filter without copying mol. This is only a substructure search,
+        so it doesn't change mol or use the descriptor record.
+
+        Inputs:
+        :param rdkit.Chem.rdchem.Mol object mol: An rdkit mol object to be
+            tested if it passes the filters
+        :param MolDescriptors descriptors: the descriptor record of mol
+
+        Returns:
+        :returns: bool bool: True if the mol passes the filter; False if it
+            fails the filter
+        """
 
-        # if No matches are found to filter list this will return a True as it
-        # Passed the filter.
-        return True
+        return self.run_filter(mol)
@@ -17,13 +17,12 @@ import __future__
 
 import rdkit
 import rdkit.Chem as Chem
-import rdkit.Chem.MolSurf as MolSurf
-import rdkit.Chem.Descriptors as Descriptors
 
 # Disable the unnecessary RDKit warnings
 rdkit.RDLogger.DisableLog("rdApp.*")
 
 from autogrow.operators.filter.filter_classes.parent_filter_class import ParentFilter
+from autogrow.operators.filter.filter_classes.mol_descriptors import MolDescriptors
 
 
 class VandeWaterbeemdFilter(ParentFilter):
@@ -48,6 +47,23 @@ class VandeWaterbeemdFilter(ParentFilter):
     """
 
     def run_filter(self, mol: rdkit.Chem.rdchem.Mol) -> bool:
+        """
+        Run the filter on a single molecule. See run_filter_with_descriptors.
+
+        Inputs:
+        :param rdkit.Chem.rdchem.Mol object mol: An rdkit mol object to be
+            tested if it passes the filters
+
+        Returns:
+        :returns: bool bool: True if the mol passes the filter; False if it
+            fails the filter
+        """
+
+        return self.run_filter_with_descriptors(mol, MolDescriptors(mol))
+
+    def run_filter_with_descriptors(
+        self, mol: rdkit.Chem.rdchem.Mol, descriptors
+    ) -> bool:
         """
         This runs a VandeWaterbeemd filter for drugs which are likely to be
         blood brain barrier permeable. VandeWaterbeemd filter filters
@@ -60,15 +76,16 @@ class VandeWaterbeemdFilter(ParentFilter):
         Inputs:
         :param rdkit.Chem.rdchem.Mol object mol: An rdkit mol object to be
             tested if it passes the filters
+        :param MolDescriptors descriptors: the descriptor record of mol
         Returns:
         :returns: bool bool: True if the mol passes the filter; False if it
             fails the filter
         """
 
-        exact_mwt = Descriptors.ExactMolWt(mol)
+        exact_mwt = descriptors.get("ExactMolWt")
         if exact_mwt >= 450:
             return False
-        psa = MolSurf.TPSA(mol)
+        psa = descriptors.get("TPSA")
         if psa >= 90:
             return False
 
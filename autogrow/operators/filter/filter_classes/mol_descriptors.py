@@ -0,0 +1,136 @@
+"""
+This script holds the descriptor record which is shared by all of the filters
+run on a molecule.
+
+Many filters test the same descriptors (ie. Lipinski, Ghose and
+VandeWaterbeemd all test the molecular weight). Each descriptor is computed
+the first time a filter asks for it and then kept, so a molecule's
+descriptors are only computed once no matter how many filters are run.
+"""
+import __future__
+
+import rdkit
+import rdkit.Chem as Chem
+import rdkit.Chem.Lipinski as Lipinski
+import rdkit.Chem.Crippen as Crippen
+import rdkit.Chem.Descriptors as Descriptors
+import rdkit.Chem.MolSurf as MolSurf
+
+# Disable the unnecessary RDKit warnings
+rdkit.RDLogger.DisableLog("rdApp.*")
+
+
+# Atomic numbers of the halogens (F, Cl, Br, I, At)
+HALOGEN_ATOMIC_NUMS = [9, 17, 35, 53, 85]
+
+
+class MolDescriptors(object):
+    """
+    The descriptors of a single molecule, each computed the first time it is
+    requested with get().
+
+    Descriptors ending in WithHs are computed on a copy of the molecule with
+    explicit hydrogens (ie. for the Ghose filters, which count hydrogens
+    against the total number of atoms).
+    """
+
+    def __init__(self, mol):
+        """
+        Inputs:
+        :param rdkit.Chem.rdchem.Mol object mol: the molecule to describe. It
+            should not be changed while this record is in use.
+        """
+
+        self.mol = mol
+        self.mol_with_hs = None
+        self.element_counts = None
+        self.values = {}
+
+    def get(self, name):
+        """
+        Get a descriptor of the molecule, computing it if this is the first
+        time it has been requested.
+
+        Inputs:
+        :param str name: the name of the descriptor. This must be a key of
+            DESCRIPTOR_FUNCTIONS, ie. 'ExactMolWt'
+
+        Returns:
+        :returns: float value: the value of the descriptor
+        """
+
+        if name not in self.values:
+            self.values[name] = DESCRIPTOR_FUNCTIONS[name](self)
+        return self.values[name]
+
+    def get_mol_with_hs(self):
+        """
+        Get a copy of the molecule with explicit hydrogens.
+
+        Returns:
+        :returns: rdkit.Chem.rdchem.Mol object mol_with_hs: the molecule with
+            explicit hydrogens
+        """
+
+        if self.mol_with_hs is None:
+            self.mol_with_hs = Chem.AddHs(self.mol)
+        return self.mol_with_hs
+
+    def get_element_count(self, atomic_nums):
+        """
+        Get the number of atoms of the molecule with any of the given atomic
+        numbers.
+
+        Inputs:
+        :param list atomic_nums: a list of atomic numbers
+
+        Returns:
+        :returns: int count: the number of atoms with those atomic numbers
+        """
+
+        if self.element_counts is None:
+            self.element_counts = {}
+            for atom in self.mol.GetAtoms():
+                atomic_num = atom.GetAtomicNum()
+                self.element_counts[atomic_num] = (
+                    self.element_counts.get(atomic_num, 0) + 1
+                )
+        return sum(self.element_counts.get(x, 0) for x in atomic_nums)
+
+
+def get_sssr_count(mol):
+    """
+    Get the number of rings in the smallest set of smallest rings (SSSR).
+    Older versions of rdkit return this number from GetSSSR, while newer
+    versions return the rings themselves.
+
+    Inputs:
+    :param rdkit.Chem.rdchem.Mol object mol: an rdkit molecule
+
+    Returns:
+    :returns: int ring_count: the number of rings in the SSSR
+    """
+
+    sssr = Chem.rdmolops.GetSSSR(mol)
+    if isinstance(sssr, int):
+        return sssr
+    return len(sssr)
+
+
+# The functions used to compute each descriptor from a MolDescriptors record
+DESCRIPTOR_FUNCTIONS = {
+    "ExactMolWt": lambda d: Descriptors.ExactMolWt(d.mol),
+    "NumHDonors": lambda d: Lipinski.NumHDonors(d.mol),
+    "NumHAcceptors": lambda d: Lipinski.NumHAcceptors(d.mol),
+    "MolLogP": lambda d: Crippen.MolLogP(d.mol),
+    "NumRotatableBonds": lambda d: Lipinski.NumRotatableBonds(d.mol),
+    "RingCount": lambda d: get_sssr_count(d.mol),
+    "TPSA": lambda d: MolSurf.TPSA(d.mol),
+    "NumHalogens": lambda d: d.get_element_count(HALOGEN_ATOMIC_NUMS),
+    "NumOxygens": lambda d: d.get_element_count([8]),
+    "NumNitrogens": lambda d: d.get_element_count([7]),
+    "ExactMolWtWithHs": lambda d: Descriptors.ExactMolWt(d.get_mol_with_hs()),
+    "NumAtomsWithHs": lambda d: d.get_mol_with_hs().GetNumAtoms(),
+    "MolMRWithHs": lambda d: Crippen.MolMR(d.get_mol_with_hs()),
+    "MolLogPWithHs": lambda d: Crippen.MolLogP(d.get_mol_with_hs()),
+}
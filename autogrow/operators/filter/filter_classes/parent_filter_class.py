@@ -4,6 +4,7 @@ This is used as the basis for all filter classes.
 """
 import __future__
 from abc import ABC, abstractmethod
+import copy
 import rdkit
 
 
@@ -28,6 +29,13 @@ class ParentFilter(ABC):
         3) BRENKFilter
     """
 
+    # The names of the rdkit FilterCatalogs (ie. ['PAINS']) searched by
+    # filters which are only a substructure search. When several of these
+    # filters are selected, execute_filters searches all of their catalogs
+    # at once as a single FilterCatalog (see substructure_catalog). None for
+    # all other filters.
+    substructure_catalogs = None
+
     def get_name(self) -> str:
         """
         Returns the current class name.
@@ -52,3 +60,26 @@ class ParentFilter(ABC):
 
         # raise NotImplementedError("run_filter() not implemented")
         pass
+
+    def run_filter_with_descriptors(
+        self, mol: rdkit.Chem.rdchem.Mol, descriptors
+    ) -> bool:
+        """
+        Run the filter with a descriptor record which is shared by all of the
+        filters run on this molecule (see
+        autogrow.operators.filter.filter_classes.mol_descriptors). Filters
+        which test descriptors should override this to get them from the
+        record, so each descriptor is only computed once per molecule.
+
+        By default this runs run_filter on a copy of the molecule, so filters
+        which change the molecule don't affect the other filters.
+
+        Inputs:
+        :param rdkit.Chem.rdchem.Mol mol: a molecule to filter
+        :param MolDescriptors descriptors: the descriptor record of mol
+
+        Returns:
+        :returns: bool: True if the molecule passes the filter, False if it fails
+        """
+
+        return self.run_filter(copy.deepcopy(mol))
@@ -0,0 +1,107 @@
+"""
+This script runs the substructure filters (ie. PAINS, BRENK and NIH) as a
+single rdkit FilterCatalog.
+
+All of the catalogs selected for a run are merged into one FilterCatalog,
+which is built once per process and searched once per molecule. The search
+stops at the first match. A matched entry's FilterSet (ie. 'PAINS_A',
+'Brenk' or 'NIH') tells which catalog the molecule failed.
+
+Each catalog is only added once, even if several filters ask for it. The
+PAINS catalog is made of the PAINS_A, PAINS_B and PAINS_C catalogs, so those
+are not added again if PAINS is selected.
+"""
+import __future__
+
+import rdkit
+from rdkit.Chem import FilterCatalog
+from rdkit.Chem.FilterCatalog import FilterCatalogParams
+
+# Disable the unnecessary RDKit warnings
+rdkit.RDLogger.DisableLog("rdApp.*")
+
+
+# Combined FilterCatalogs for this process keyed by the sorted tuple of the
+# catalog names they were built from. The filter objects only hold the names
+# of their catalogs, so the catalogs are built here rather than being sent to
+# each worker.
+COMBINED_CATALOG_CACHE = {}
+
+# Catalogs which are already part of a larger catalog
+CATALOGS_CONTAINED_IN = {
+    "PAINS_A": "PAINS",
+    "PAINS_B": "PAINS",
+    "PAINS_C": "PAINS",
+}
+
+
+def get_unique_catalog_names(catalog_names):
+    """
+    Remove duplicate catalogs and catalogs which are part of another selected
+    catalog.
+
+    Inputs:
+    :param list catalog_names: the names of rdkit FilterCatalogs. ie.
+        ['PAINS_A', 'PAINS', 'NIH']
+
+    Returns:
+    :returns: tuple unique_catalog_names: the sorted names of the catalogs to
+        search. ie. ('NIH', 'PAINS')
+    """
+
+    catalog_names = set(catalog_names)
+    unique_catalog_names = [
+        name
+        for name in catalog_names
+        if CATALOGS_CONTAINED_IN.get(name) not in catalog_names
+    ]
+
+    return tuple(sorted(unique_catalog_names))
+
+
+def get_combined_catalog(catalog_names):
+    """
+    Get a single FilterCatalog containing all of the given catalogs, building
+    it if this process hasn't yet.
+
+    Inputs:
+    :param list catalog_names: the names of rdkit FilterCatalogs. ie.
+        ['PAINS', 'NIH']
+
+    Returns:
+    :returns: rdkit.Chem.rdfiltercatalog.FilterCatalog catalog: a
+        FilterCatalog of all the entries of the given catalogs
+    """
+
+    key = get_unique_catalog_names(catalog_names)
+    if key not in COMBINED_CATALOG_CACHE:
+        params = FilterCatalogParams()
+        for name in key:
+            params.AddCatalog(getattr(FilterCatalogParams.FilterCatalogs, name))
+        COMBINED_CATALOG_CACHE[key] = FilterCatalog.FilterCatalog(params)
+
+    return COMBINED_CATALOG_CACHE[key]
+
+
+def get_matched_filter_set(mol, catalog_names):
+    """
+    Search a molecule against all of the given catalogs at once, stopping at
+    the first match.
+
+    Inputs:
+    :param rdkit.Chem.rdchem.Mol object mol: An rdkit mol object to be tested
+        if it passes the filters
+    :param list catalog_names: the names of rdkit FilterCatalogs. ie.
+        ['PAINS', 'NIH']
+
+    Returns:
+    :returns: str filter_set: the FilterSet of the first matching entry (ie.
+        'PAINS_A', 'Brenk' or 'NIH'). Returns None if mol matches nothing, ie.
+        it passes the filters.
+    """
+
+    entry = get_combined_catalog(catalog_names).GetFirstMatch(mol)
+    if entry is None:
+        return None
+
+    return entry.GetProp("FilterSet")
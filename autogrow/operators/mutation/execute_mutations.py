@@ -4,11 +4,9 @@ This function should contain all the info for executing the mutation functions
 
 import __future__
 
-import random
-import copy
-
-
 import autogrow.operators.mutation.smiles_click_chem.smiles_click_chem as SmileClickClass
+import autogrow.operators.candidate_registry as CandidateRegistry
+import autogrow.utils.stage_metrics as StageMetrics
 
 
 #######################################
@@ -35,9 +33,10 @@ def make_mutants(
         user
     :param int num_mutants_to_make: number of mutants to return
     :param list ligands_list: list of ligand/name pairs which are the order in
-        which to be sampled :param list new_mutation_smiles_list: is the list of
-        mutants made for the current generation being populated but in a previous
-        iteration of the loop in Operations
+        which to be sampled
+    :param list new_mutation_smiles_list: is the list of mutants made for the
+        current generation being populated but in a previous iteration of the
+        loop in Operations. These are not made again or returned.
     :param list rxn_library_variables: a list of user variables which define
         the rxn_library, rxn_library_file, and function_group_library. ie.
         rxn_library_variables = [vars['rxn_library'], vars['rxn_library_file'],
@@ -48,126 +47,89 @@ def make_mutants(
         sufficient number was not generated. None: bol if mutations failed
     """
 
-    if len(new_mutation_smiles_list) == 0:
-        new_ligands_list = []
-    else:
-        new_ligands_list = new_mutation_smiles_list
-
-    loop_counter = 0
-
     number_of_processors = int(vars["parallelizer"].return_node())
 
+    # Mutants made in a previous call for this generation are kept out of
+    # the new ligands
+    registry = CandidateRegistry.CandidateRegistry(new_mutation_smiles_list)
+    scheduler = CandidateRegistry.AdaptiveBatchScheduler(
+        ligands_list, number_of_processors
+    )
+
     # initialize the smileclickclass
     a_smiles_click_chem_object = SmileClickClass.SmilesClickChem(
         rxn_library_variables, new_mutation_smiles_list, vars["filter_object_dict"]
     )
 
-    while loop_counter < 2000 and len(new_ligands_list) < num_mutants_to_make:
-
-        react_list = copy.deepcopy(ligands_list)
-
-        while len(new_ligands_list) < num_mutants_to_make and len(react_list) > 0:
-
-            a_smiles_click_chem_object.update_list_of_already_made_smiles(
-                new_ligands_list
-            )
-            num_to_grab = num_mutants_to_make - len(new_ligands_list)
-            num_to_make = num_to_grab
-
-            # to minimize a big loop of running a single mutation at a time we
-            # will make 1 new lig/processor. This will help to prevent wasting
-            # reasources and time.
-            if num_to_make < number_of_processors:
-                num_to_make = number_of_processors
-
-            smile_pairs = [
-                react_list.pop() for x in range(num_to_make) if len(react_list) > 0
-            ]
-
-            smile_inputs = [x[0] for x in smile_pairs]
-            smile_names = [x[1] for x in smile_pairs]
-
-            job_input = tuple(
-                [tuple([smile, a_smiles_click_chem_object]) for smile in smile_inputs]
-            )
-
-            results = vars["parallelizer"].run(
-                job_input, run_smiles_click_for_multithread
-            )
-
-            for index, i in enumerate(results):
-                if i is not None:
-
-                    # Get the new molecule's (aka the Child lig) Smile string
-                    child_lig_smile = i[0]
-
-                    # get the reaction id number
-                    reaction_id_number = i[1]
-
-                    # get the ID for the parent of a child mol and the
-                    # complementary parent mol. comp mol could be None or a
-                    # zinc database ID
-                    parent_lig_id = smile_names[index]
-                    zinc_id_comp_mol = i[2]
-
-                    # Make a list of all smiles and smile_id's of all
-                    # previously made smiles in this generation
-                    list_of_already_made_smiles = []
-                    list_of_already_made_id = []
-
-                    # fill lists of all smiles and smile_id's of all
-                    # previously made smiles in this generation
-                    for x in new_ligands_list:
-                        list_of_already_made_smiles.append(x[0])
-                        list_of_already_made_id.append(x[1])
-
-                    if child_lig_smile not in list_of_already_made_smiles:
-                        # if the smiles string is unique to the list of
-                        # previous smile strings in this round of reactions
-                        # then we append it to the list of newly created
-                        # ligands we append it with a unique ID, which also
-                        # tracks the progress of the reactant
-                        is_name_unique = False
-                        while is_name_unique is False:
-                            # make unique ID with the 1st number being the
-                            # parent_lig_id for the derived mol, Followed by
-                            # Mutant, folowed by the generationnumber,
-                            # followed by a unique.
-
-                            # get the unique ID (last few diget ID of the
-                            # parent mol
-                            parent_lig_id = parent_lig_id.split(")")[-1]
-
-                            random_id_num = random.randint(100, 1000000)
-                            if zinc_id_comp_mol is None:
-                                new_lig_id = "({})Gen_{}_Mutant_{}_{}".format(
-                                    parent_lig_id,
-                                    generation_num,
-                                    reaction_id_number,
-                                    random_id_num,
-                                )
-                            else:
-                                new_lig_id = "({}+{})Gen_{}_Mutant_{}_{}".format(
-                                    parent_lig_id,
-                                    zinc_id_comp_mol,
-                                    generation_num,
-                                    reaction_id_number,
-                                    random_id_num,
-                                )
-
-                            # check name is unique
-                            if new_lig_id not in list_of_already_made_id:
-                                is_name_unique = True
-
-                        # make a temporary list containing the smiles string
-                        # of the new product and the unique ID
-                        ligand_info = [child_lig_smile, new_lig_id]
-
-                        # append the new ligand smile and ID to the list of
-                        # all newly made ligands
-                        new_ligands_list.append(ligand_info)
-
-        loop_counter = loop_counter + 1
+    while len(registry) < num_mutants_to_make and scheduler.is_exhausted() is False:
+
+        a_smiles_click_chem_object.update_list_of_already_made_smiles(
+            registry.ligands_list
+        )
+
+        # The batch is sized from how many of the last batch's reactions
+        # made a new ligand, and is at least 1 new lig/processor.
+        smile_pairs = scheduler.get_next_batch(
+            num_mutants_to_make - len(registry)
+        )
+
+        smile_inputs = [x[0] for x in smile_pairs]
+        smile_names = [x[1] for x in smile_pairs]
+
+        # The SmilesClickChem object is sent to each worker once rather
+        # than with every SMILES
+        job_input = tuple([tuple([smile]) for smile in smile_inputs])
+
+        results = StageMetrics.run_jobs(
+            vars["parallelizer"],
+            "mutation",
+            job_input,
+            run_smiles_click_for_multithread,
+            count_failures=lambda result: result is None,
+            shared_kwargs={"a_smiles_click_chem_object": a_smiles_click_chem_object},
+        )
+
+        num_added = 0
+        for index, i in enumerate(results):
+            if i is None:
+                continue
+            if len(registry) >= num_mutants_to_make:
+                break
+
+            # Get the new molecule's (aka the Child lig) Smile string
+            child_lig_smile = i[0]
+
+            # get the reaction id number
+            reaction_id_number = i[1]
+
+            # get the ID for the parent of a child mol and the complementary
+            # parent mol. comp mol could be None or a zinc database ID
+            parent_lig_id = smile_names[index]
+            zinc_id_comp_mol = i[2]
+
+            # get the unique ID (last few diget ID of the parent mol
+            parent_lig_id = parent_lig_id.split(")")[-1]
+
+            # make unique ID with the 1st number being the parent_lig_id for
+            # the derived mol, Followed by Mutant, folowed by the
+            # generationnumber, followed by a unique.
+            if zinc_id_comp_mol is None:
+                id_prefix = "({})Gen_{}_Mutant_{}".format(
+                    parent_lig_id, generation_num, reaction_id_number
+                )
+            else:
+                id_prefix = "({}+{})Gen_{}_Mutant_{}".format(
+                    parent_lig_id, zinc_id_comp_mol, generation_num, reaction_id_number
+                )
+
+            # The ligand is only added if its smiles string is unique to the
+            # smiles made so far in this generation
+            if registry.add_ligand(child_lig_smile, id_prefix) is True:
+                num_added = num_added + 1
+
+        scheduler.record_batch(len(smile_pairs), num_added)
+
+    new_ligands_list = registry.ligands_list
 
     if len(new_ligands_list) < num_mutants_to_make:
         return None
@@ -186,6 +148,8 @@ def run_smiles_click_for_multithread(smile, a_smiles_click_chem_object):
 
     Inputs:
     :param str smile: a SMILES string
+    :param obj a_smiles_click_chem_object: the SmilesClickChem object to
+        react the SMILES with
 
     Returns:
     :returns: str result_of_run: either a smile string of a child mol or None
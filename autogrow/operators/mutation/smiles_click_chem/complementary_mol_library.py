@@ -0,0 +1,214 @@
+"""
+complementary_mol_library.py lets Mutation pick a random complementary
+molecule without reading the whole .smi file each time.
+
+Each complementary molecule .smi file gets a line index: a NumPy array of the
+byte offset where every line starts, saved next to the .smi file as
+{file}.smi.idx.npy. The .smi file is memory-mapped, so picking a molecule
+only reads the one line it needs.
+
+The indexes are built when SmilesClickChem is set up (or ahead of time with
+accessory_scripts/index_complementary_mol_library.py). An index is rebuilt if
+it is older than its .smi file. If the index can't be written (ie. a read-only
+install) each process builds it in memory instead.
+"""
+import __future__
+
+import mmap
+import os
+import random
+
+import numpy as np
+
+INDEX_FILE_EXTENSION = ".idx.npy"
+
+# The open complementary molecule libraries of this process by .smi file
+# path. A library's memory map and line index stay open for the life of the
+# process, so each .smi file is only opened and indexed once per worker.
+# SmilesClickChem only holds the paths (a memory map can't be pickled).
+COMPLEMENTARY_MOL_LIBRARY_CACHE = {}
+
+
+def get_index_file(smi_file):
+    """
+    Get the path of the line index for a .smi file.
+
+    Inputs:
+    :param str smi_file: path to a complementary molecule .smi file
+
+    Returns:
+    :returns: str index_file: path to the line index file
+    """
+
+    return smi_file + INDEX_FILE_EXTENSION
+
+
+def make_line_offsets(smi_file):
+    """
+    Find the byte offset of the start of every line in a .smi file. The
+    returned array has one more entry than there are lines; the last entry is
+    the size of the file, so line i is offsets[i]:offsets[i + 1].
+
+    Lines are counted the same way as file.readlines(), so a last line
+    without a newline still counts as a line.
+
+    Inputs:
+    :param str smi_file: path to a complementary molecule .smi file
+
+    Returns:
+    :returns: np.array offsets: uint64 array of the line start offsets
+    """
+
+    with open(smi_file, "rb") as f:
+        data = np.frombuffer(f.read(), dtype=np.uint8)
+
+    line_ends = np.flatnonzero(data == ord("\n")) + 1
+    if len(data) != 0 and (len(line_ends) == 0 or line_ends[-1] != len(data)):
+        line_ends = np.append(line_ends, len(data))
+
+    return np.concatenate([[0], line_ends]).astype(np.uint64)
+
+
+def index_is_current(smi_file):
+    """
+    Check if the line index of a .smi file exists and is not older than the
+    .smi file.
+
+    Inputs:
+    :param str smi_file: path to a complementary molecule .smi file
+
+    Returns:
+    :returns: bool is_current: True if the index can be used
+    """
+
+    index_file = get_index_file(smi_file)
+    if os.path.isfile(index_file) is False:
+        return False
+    return os.path.getmtime(index_file) >= os.path.getmtime(smi_file)
+
+
+def write_line_index(smi_file):
+    """
+    Build the line index of a .smi file and save it next to the .smi file.
+    The index is written to a temporary file first so another process never
+    reads a partly written index.
+
+    Inputs:
+    :param str smi_file: path to a complementary molecule .smi file
+    """
+
+    index_file = get_index_file(smi_file)
+    temp_file = "{}.{}.tmp.npy".format(index_file, os.getpid())
+    np.save(temp_file, make_line_offsets(smi_file))
+    os.replace(temp_file, index_file)
+
+
+def write_line_indexes_if_needed(smi_files):
+    """
+    Build the line index of every .smi file which doesn't have a current
+    one. If an index can't be written the .smi file is skipped; its index
+    will be built in memory by each process which uses it.
+
+    Inputs:
+    :param list smi_files: paths to complementary molecule .smi files
+    """
+
+    for smi_file in smi_files:
+        if index_is_current(smi_file) is True:
+            continue
+        try:
+            write_line_index(smi_file)
+        except OSError:
+            print(
+                "Could not write the line index for {}. ".format(smi_file)
+                + "It will be built in memory instead."
+            )
+
+
+class ComplementaryMolLibrary(object):
+    """
+    A memory-mapped complementary molecule .smi file and its line index.
+    """
+
+    def __init__(self, smi_file):
+        """
+        Open a .smi file and load its line index.
+
+        Inputs:
+        :param str smi_file: path to a complementary molecule .smi file
+        """
+
+        self.smi_file = smi_file
+        self.mtime = os.path.getmtime(smi_file)
+
+        if index_is_current(smi_file) is True:
+            self.offsets = np.load(get_index_file(smi_file), mmap_mode="r")
+        else:
+            self.offsets = make_line_offsets(smi_file)
+
+        if int(self.offsets[-1]) == 0:
+            # mmap can't map an empty file
+            self.data = b""
+        else:
+            with open(smi_file, "rb") as f:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.data) != int(self.offsets[-1]):
+            # The index doesn't match the file, so rebuild it
+            self.offsets = make_line_offsets(smi_file)
+
+    def __len__(self):
+        """
+        Get the number of lines in the .smi file.
+
+        Returns:
+        :returns: int num_lines: the number of lines
+        """
+
+        return len(self.offsets) - 1
+
+    def get_line(self, line_number):
+        """
+        Get a single line of the .smi file, including its newline.
+
+        Inputs:
+        :param int line_number: the index of the line
+
+        Returns:
+        :returns: str line: the line of the .smi file
+        """
+
+        start = int(self.offsets[line_number])
+        end = int(self.offsets[line_number + 1])
+        return self.data[start:end].decode("utf-8").replace("\r\n", "\n")
+
+    def get_random_line(self):
+        """
+        Get a random line of the .smi file. This draws from random the same
+        way random.choice(f.readlines()) does, so a seeded run picks the same
+        molecules as reading the whole file would.
+
+        Returns:
+        :returns: str line: a randomly chosen line of the .smi file
+        """
+
+        return self.get_line(random.choice(range(len(self))))
+
+
+def get_complementary_mol_library(smi_file):
+    """
+    Get the ComplementaryMolLibrary of a .smi file for this process, opening
+    it only if this process hasn't yet or if the file has changed.
+
+    Inputs:
+    :param str smi_file: path to a complementary molecule .smi file
+
+    Returns:
+    :returns: ComplementaryMolLibrary library: the opened library
+    """
+
+    library = COMPLEMENTARY_MOL_LIBRARY_CACHE.get(smi_file)
+    if library is None or library.mtime != os.path.getmtime(smi_file):
+        library = ComplementaryMolLibrary(smi_file)
+        COMPLEMENTARY_MOL_LIBRARY_CACHE[smi_file] = library
+    return library
@@ -5,6 +5,7 @@ import random
 import os
 import json
 import copy
+import hashlib
 
 import rdkit
 from rdkit import Chem
@@ -15,6 +16,108 @@ rdkit.RDLogger.DisableLog("rdApp.*")
 
 import autogrow.operators.convert_files.gypsum_dl.gypsum_dl.MolObjectHandling as MOH
 import autogrow.operators.filter.execute_filters as Filter
+import autogrow.operators.mutation.smiles_click_chem.complementary_mol_library as ComplementaryMolLibrary
+
+# Compiled reaction libraries for this process keyed by
+# SmilesClickChem.library_key. SmilesClickChem objects are pickled into every
+# mutation job, so the compiled reactions and SMARTS queries are kept here
+# rather than on the object. Each process only parses the SMARTS once.
+COMPILED_LIBRARY_CACHE = {}
+
+# Functional group bitmasks of parent SMILES for this process keyed by
+# (library_key, SMILES string). Parents are reacted many times per
+# generation, so their functional groups are only searched for once.
+FUNCTIONAL_GROUP_BITMASK_CACHE = {}
+MAX_FUNCTIONAL_GROUP_BITMASK_CACHE_SIZE = 100000
+
+
+class CompiledReactionLibrary(object):
+    """
+    The reactions and functional group SMARTS of a reaction library compiled
+    into initialized rdkit reaction objects and query mols.
+
+    Functional groups are numbered in the order of the functional group
+    dictionary. A molecule's functional groups are stored as a bitmask with
+    bit i set if it has functional group i, and each reaction has a bitmask
+    of the functional groups it uses. A reaction can only use a molecule if
+    the two bitmasks share a bit.
+    """
+
+    def __init__(self, reaction_dict, functional_group_dict):
+        """
+        Compile all of the reactions and functional groups.
+
+        Inputs:
+        :param dict reaction_dict: the reaction library from
+            SmilesClickChem.retrieve_reaction_dict
+        :param dict functional_group_dict: the functional groups from
+            SmilesClickChem.retrieve_functional_group_dict
+        """
+
+        self.functional_group_names = list(functional_group_dict.keys())
+        self.functional_group_index = {
+            name: i for i, name in enumerate(self.functional_group_names)
+        }
+        self.functional_group_mols = {
+            name: Chem.MolFromSmarts(functional_group_dict[name])
+            for name in self.functional_group_names
+        }
+
+        self.reactions = {}
+        self.reaction_bitmasks = {}
+        for reaction_name in list(reaction_dict.keys()):
+            a_reaction_dict = reaction_dict[reaction_name]
+            rxn = AllChem.ReactionFromSmarts(str(a_reaction_dict["reaction_string"]))
+            rxn.Initialize()
+            self.reactions[reaction_name] = rxn
+
+            bitmask = 0
+            for functional_group in a_reaction_dict["functional_groups"]:
+                if functional_group in self.functional_group_index:
+                    bitmask = bitmask | (
+                        1 << self.functional_group_index[functional_group]
+                    )
+            self.reaction_bitmasks[reaction_name] = bitmask
+
+    def get_functional_group_bitmask(self, mol_deprotanated, mol_reprotanated):
+        """
+        Find which functional groups are in a molecule.
+
+        Inputs:
+        :param rdkit.Chem.rdchem.Mol mol_deprotanated: an rdkit molecule which
+            has been sanitized and deprotanated
+        :param rdkit.Chem.rdchem.Mol mol_reprotanated: an rdkit molecule which
+            has been sanitized and fully protanated
+
+        Returns:
+        :returns: int bitmask: bit i is set if the molecule has functional
+            group i
+        """
+
+        bitmask = 0
+        for i, name in enumerate(self.functional_group_names):
+            substructure = self.functional_group_mols[name]
+            if mol_reprotanated.HasSubstructMatch(substructure):
+                bitmask = bitmask | (1 << i)
+            elif mol_deprotanated.HasSubstructMatch(substructure):
+                bitmask = bitmask | (1 << i)
+        return bitmask
+
+    def has_functional_group(self, bitmask, functional_group):
+        """
+        Check if a functional group's bit is set in a bitmask.
+
+        Inputs:
+        :param int bitmask: a bitmask from get_functional_group_bitmask
+        :param str functional_group: the name of the functional group
+
+        Returns:
+        :returns: bool bool: True if the functional group is in the bitmask
+        """
+
+        if functional_group not in self.functional_group_index:
+            return False
+        return (bitmask >> self.functional_group_index[functional_group]) & 1 == 1
 
 
 class SmilesClickChem(object):
@@ -59,13 +162,41 @@ class SmilesClickChem(object):
         self.complementary_mol_dict = self.retrieve_complementary_dictionary(
             rxn_library, complementary_mol_dir
         )
+        # Index the complementary molecule files so a random molecule can be
+        # read without loading the whole file
+        ComplementaryMolLibrary.write_line_indexes_if_needed(
+            list(self.complementary_mol_dict.values())
+        )
+
+        # Identifies this reaction library in COMPILED_LIBRARY_CACHE
+        self.library_key = hashlib.sha1(
+            json.dumps(
+                [self.reaction_dict, self.functional_group_dict], sort_keys=True
+            ).encode("utf-8")
+        ).hexdigest()
 
-        # List of already predicted smiles
-        self.list_of_already_made_smiles = [x[0] for x in list_of_already_made_smiles]
+        # Set of already predicted smiles
+        self.already_made_smiles = set([x[0] for x in list_of_already_made_smiles])
         # Dictionary containing all Filter class
         # objects to be impossed on the ligand
         self.filter_object_dict = filter_object_dict
 
+    def get_compiled_library(self):
+        """
+        Get the compiled reaction library for this process, compiling it if
+        this process hasn't yet.
+
+        Returns:
+        :returns: CompiledReactionLibrary compiled_library: the compiled
+            reactions and functional groups
+        """
+
+        if self.library_key not in COMPILED_LIBRARY_CACHE:
+            COMPILED_LIBRARY_CACHE[self.library_key] = CompiledReactionLibrary(
+                self.reaction_dict, self.functional_group_dict
+            )
+        return COMPILED_LIBRARY_CACHE[self.library_key]
+
     def update_list_of_already_made_smiles(self, list_of_already_made_smiles):
         """
         This updates the list of Smiles which have been made in this
@@ -77,8 +208,7 @@ class SmilesClickChem(object):
             ie. [['O=C([O-])',
             '(Gen_3_Mutant_37_747+ZINC51)Gen_4_Mutant_15_52']]
         """
-        list_of_already_made_smiles = [x[0] for x in list_of_already_made_smiles]
-        self.list_of_already_made_smiles.extend(list_of_already_made_smiles)
+        self.already_made_smiles.update([x[0] for x in list_of_already_made_smiles])
 
     def rxn_lib_format_json_dict_of_dict(self, old_dict):
         """
@@ -556,24 +686,24 @@ class SmilesClickChem(object):
         """
         infile = self.complementary_mol_dict[functional_group]
 
-        with open(infile, "r") as f:
-            random_comp_mol_line = random.choice(f.readlines())
-            random_comp_mol_line = (
-                random_comp_mol_line.replace("\n", "")
-                .replace("\t", " ")
-                .replace("    ", " ")
-            )
-            for i in range(10):
-                random_comp_mol_line.replace("  ", " ")
-            parts = random_comp_mol_line.split(
-                " "
-            )  # split line into parts separated by 4-spaces
-            # parts = [x for x in random_comp_mol_line.split(" ") if x!= ""]
-            # # split line into parts separated by 4-spaces
-
-            smile_list = parts[0]
-            zinc_name_list = parts[1]
-            random_comp_mol = [smile_list, zinc_name_list]
+        library = ComplementaryMolLibrary.get_complementary_mol_library(infile)
+        random_comp_mol_line = library.get_random_line()
+        random_comp_mol_line = (
+            random_comp_mol_line.replace("\n", "")
+            .replace("\t", " ")
+            .replace("    ", " ")
+        )
+        for i in range(10):
+            random_comp_mol_line.replace("  ", " ")
+        parts = random_comp_mol_line.split(
+            " "
+        )  # split line into parts separated by 4-spaces
+        # parts = [x for x in random_comp_mol_line.split(" ") if x!= ""]
+        # # split line into parts separated by 4-spaces
+
+        smile_list = parts[0]
+        zinc_name_list = parts[1]
+        random_comp_mol = [smile_list, zinc_name_list]
 
         return random_comp_mol
 
@@ -594,20 +724,53 @@ class SmilesClickChem(object):
             functional group found within the molecule. these will be used later
             to filter for reactions.
         """
-        list_subs_within_mol = []
-        functional_group_dict = self.functional_group_dict
+        compiled_library = self.get_compiled_library()
+        bitmask = compiled_library.get_functional_group_bitmask(
+            mol_deprotanated, mol_reprotanated
+        )
 
-        for key in list(functional_group_dict.keys()):
-            substructure = Chem.MolFromSmarts(functional_group_dict[key])
-            if mol_reprotanated.HasSubstructMatch(substructure):
-                list_subs_within_mol.append(key)
-            else:
-                if mol_deprotanated.HasSubstructMatch(substructure):
-                    list_subs_within_mol.append(key)
-                else:
-                    continue
+        list_subs_within_mol = [
+            key
+            for key in compiled_library.functional_group_names
+            if compiled_library.has_functional_group(bitmask, key)
+        ]
         return list_subs_within_mol
 
+    def get_parent_functional_group_bitmask(
+        self, ligand_smiles_string, mol_deprotanated, mol_reprotanated
+    ):
+        """
+        Get the functional group bitmask of a parent molecule. Bitmasks are
+        kept in FUNCTIONAL_GROUP_BITMASK_CACHE so a parent which is reacted
+        again is not searched again.
+
+        Inputs:
+        :param str ligand_smiles_string: SMILES string of the parent
+        :param rdkit.Chem.rdchem.Mol mol_deprotanated: an rdkit molecule which
+            has been sanitized and deprotanated
+        :param rdkit.Chem.rdchem.Mol mol_reprotanated: an rdkit molecule which
+            has been sanitized and fully protanated
+
+        Returns:
+        :returns: int bitmask: bit i is set if the molecule has functional
+            group i
+        """
+
+        key = (self.library_key, ligand_smiles_string)
+        if key not in FUNCTIONAL_GROUP_BITMASK_CACHE:
+            if (
+                len(FUNCTIONAL_GROUP_BITMASK_CACHE)
+                >= MAX_FUNCTIONAL_GROUP_BITMASK_CACHE_SIZE
+            ):
+                FUNCTIONAL_GROUP_BITMASK_CACHE.clear()
+            compiled_library = self.get_compiled_library()
+            FUNCTIONAL_GROUP_BITMASK_CACHE[
+                key
+            ] = compiled_library.get_functional_group_bitmask(
+                mol_deprotanated, mol_reprotanated
+            )
+        return FUNCTIONAL_GROUP_BITMASK_CACHE[key]
+
     def run_smiles_click(self, ligand_smiles_string):
         """
         This will take the shuffled list of reaction names
@@ -654,10 +817,11 @@ class SmilesClickChem(object):
             return None
 
         # Determine which functional groups are within a ligand
-        list_subs_within_mol = self.determine_functional_groups_in_mol(
-            mol_deprotanated, mol_reprotanated
+        compiled_library = self.get_compiled_library()
+        parent_bitmask = self.get_parent_functional_group_bitmask(
+            ligand_smiles_string, mol_deprotanated, mol_reprotanated
         )
-        if len(list_subs_within_mol) == 0:
+        if parent_bitmask == 0:
             print(
                 "{} had no functional groups to react with.".format(
                     ligand_smiles_string
@@ -678,10 +842,17 @@ class SmilesClickChem(object):
             reaction_name = shuffled_reaction_list[tries]
             a_reaction_dict = self.reaction_dict[reaction_name]
 
+            if compiled_library.reaction_bitmasks[reaction_name] & parent_bitmask == 0:
+                # The ligand has none of the reaction's functional groups.
+                tries = tries + 1
+                continue
+
             fun_groups_in_rxn = a_reaction_dict["functional_groups"]
             contains_group = None
             for i in range(0, len(fun_groups_in_rxn)):
-                if fun_groups_in_rxn[i] in list_subs_within_mol:
+                if compiled_library.has_functional_group(
+                    parent_bitmask, fun_groups_in_rxn[i]
+                ):
                     contains_group = i
                     # The number i which contains_group is now equal to will
                     # be used to remember the placement of the molecule later
@@ -698,9 +869,9 @@ class SmilesClickChem(object):
 
             # Determine whether to react using the protanated or
             # deprotanated form of the ligand
-            substructure = Chem.MolFromSmarts(
-                self.functional_group_dict[fun_groups_in_rxn[i]]
-            )
+            substructure = compiled_library.functional_group_mols[
+                fun_groups_in_rxn[i]
+            ]
 
             if mol_deprotanated.HasSubstructMatch(substructure) is True:
                 mol_to_use = copy.deepcopy(mol_deprotanated)
@@ -708,8 +879,7 @@ class SmilesClickChem(object):
                 mol_to_use = copy.deepcopy(mol_reprotanated)
             substructure = None
 
-            rxn = AllChem.ReactionFromSmarts(str(a_reaction_dict["reaction_string"]))
-            rxn.Initialize()
+            rxn = compiled_library.reactions[reaction_name]
 
             # if the reaction requires only a single reactant we will attempt
             # to run the reaction
@@ -785,9 +955,9 @@ class SmilesClickChem(object):
 
                         # Determine whether to react using the protanated or
                         # deprotanated form of the ligand
-                        substructure = Chem.MolFromSmarts(
-                            self.functional_group_dict[fun_groups_in_rxn[i]]
-                        )
+                        substructure = compiled_library.functional_group_mols[
+                            fun_groups_in_rxn[i]
+                        ]
 
                         # lets give up to 100 tries to find a comp molecule
                         # which is viable
@@ -938,7 +1108,7 @@ class SmilesClickChem(object):
         This function will test whether the product passes all of the
             requirements:
             1) Mol sanitizes
-            2) It isn't in the self.list_of_already_made_smiles
+            2) It isn't in the self.already_made_smiles
             3) It passes Filters
         Returns the smile if it passes; returns None if it fails.
 
@@ -982,7 +1152,7 @@ class SmilesClickChem(object):
         reaction_product_smilestring = Chem.MolToSmiles(
             reaction_product, isomericSmiles=True
         )
-        if reaction_product_smilestring in self.list_of_already_made_smiles:
+        if reaction_product_smilestring in self.already_made_smiles:
             return None
 
         # Run through filters
@@ -6,7 +6,6 @@ import __future__
 
 import os
 import random
-import copy
 import sys
 
 import rdkit
@@ -17,15 +16,21 @@ rdkit.RDLogger.DisableLog("rdApp.*")
 
 import autogrow.operators.filter.execute_filters as Filter
 import autogrow.docking.ranking.ranking_mol as Ranking
+import autogrow.docking.ranking.source_library as SourceLibrary
 import autogrow.operators.mutation.execute_mutations as Mutation
 import autogrow.operators.crossover.execute_crossover as execute_crossover
 import autogrow.operators.convert_files.conversion_to_3d as conversion_to_3d
 import autogrow.operators.convert_files.gypsum_dl.gypsum_dl.MolObjectHandling as MOH
+import autogrow.docking.docking_cache as DockingCache
+import autogrow.utils.generation_store as GenerationStore
+import autogrow.utils.checkpoint_journal as CheckpointJournal
+import autogrow.utils.stage_metrics as StageMetrics
 
 
 #############
 # Main run Autogrow operators to make a generation
 #############
+@StageMetrics.timed_stage("populate_generation")
 def populate_generation(vars, generation_num):
     """
     This will run all of the mutations, crossovers, and filters for a single
@@ -45,6 +50,19 @@ def populate_generation(vars, generation_num):
     """
     number_of_processors = int(vars["number_of_processors"])
 
+    # If a previous attempt at this generation saved the whole population,
+    # only the ligands it didn't convert are left to do
+    new_gen_folder_path = vars["output_directory"] + "generation_{}{}".format(
+        generation_num, os.sep
+    )
+    if (
+        CheckpointJournal.is_stage_complete(
+            new_gen_folder_path, CheckpointJournal.POPULATION_STAGE
+        )
+        is True
+    ):
+        return resume_populated_generation(vars, generation_num)
+
     # Determine which generation it is and how many mutations and crossovers
     # to make
     if generation_num == 1:
@@ -70,7 +88,9 @@ def populate_generation(vars, generation_num):
     # entire User specified Source compound list If either has a SMILES that
     # does not sanitize in RDKit it will be excluded and a printout of its
     # Name and SMILES string will be printed.
-    source_compounds_list = get_complete_list_prev_gen_or_source_compounds(
+    # The list is kept as a SourceLibrary so that only the chosen seeds are
+    # made into lists.
+    source_compounds_list = get_source_library_prev_gen_or_source_compounds(
         vars, generation_num
     )
 
@@ -83,56 +103,57 @@ def populate_generation(vars, generation_num):
         num_crossovers + num_mutations + num_elite_to_advance_from_previous_gen
     )
 
-    # Get starting compounds for Mutations
-    seed_list_mutations = make_seed_list(
-        vars,
-        source_compounds_list,
-        generation_num,
-        num_seed_diversity,
-        num_seed_dock_fitness,
-    )
+    if (
+        CheckpointJournal.is_stage_complete(
+            new_gen_folder_path, CheckpointJournal.MUTATION_STAGE
+        )
+        is True
+    ):
+        # A previous attempt at this generation finished the mutations
+        print("LOAD MUTATIONS FROM THE PREVIOUS ATTEMPT")
+        new_mutation_smiles_list = load_ligand_list(
+            vars["output_directory"], generation_num, "Chosen_Mutants"
+        )
+    else:
+        # Get starting compounds for Mutations
+        seed_list_mutations = make_seed_list(
+            vars,
+            source_compounds_list,
+            generation_num,
+            num_seed_diversity,
+            num_seed_dock_fitness,
+        )
 
-    # Save seed list for Mutations
-    save_ligand_list(
-        vars["output_directory"],
-        generation_num,
-        seed_list_mutations,
-        "Mutation_Seed_List",
-    )
-    sys.stdout.flush()
+        # Save seed list for Mutations
+        save_ligand_list(
+            vars["output_directory"],
+            generation_num,
+            seed_list_mutations,
+            "Mutation_Seed_List",
+        )
+        sys.stdout.flush()
 
-    print("MAKE MUTATIONS")
-    # Making Mutations
+        print("MAKE MUTATIONS")
+        # Making Mutations
 
-    # Package user vars specifying the Reaction library to use for mutation
-    rxn_library_variables = [
-        vars["rxn_library"],
-        vars["rxn_library_file"],
-        vars["function_group_library"],
-        vars["complementary_mol_directory"],
-    ]
+        # Package user vars specifying the Reaction library to use for mutation
+        rxn_library_variables = [
+            vars["rxn_library"],
+            vars["rxn_library_file"],
+            vars["function_group_library"],
+            vars["complementary_mol_directory"],
+        ]
 
-    # List of SMILES from mutation
-    new_mutation_smiles_list = []
+        # List of SMILES from mutation
+        new_mutation_smiles_list = []
 
-    # Make all the required ligands by mutations
-    while len(new_mutation_smiles_list) < num_mutations:
-        sys.stdout.flush()
+        # Make all the required ligands by mutations
+        while len(new_mutation_smiles_list) < num_mutations:
+            sys.stdout.flush()
 
-        num_mutants_to_make = num_mutations - len(new_mutation_smiles_list)
+            num_mutants_to_make = num_mutations - len(new_mutation_smiles_list)
 
-        # Make all mutants
-        new_mutants = Mutation.make_mutants(
-            vars,
-            generation_num,
-            number_of_processors,
-            num_mutants_to_make,
-            seed_list_mutations,
-            new_mutation_smiles_list,
-            rxn_library_variables,
-        )
-        if new_mutants is None:
-            # try once more
+            # Make all mutants
             new_mutants = Mutation.make_mutants(
                 vars,
                 generation_num,
@@ -142,85 +163,102 @@ def populate_generation(vars, generation_num):
                 new_mutation_smiles_list,
                 rxn_library_variables,
             )
+            if new_mutants is None:
+                # try once more
+                new_mutants = Mutation.make_mutants(
+                    vars,
+                    generation_num,
+                    number_of_processors,
+                    num_mutants_to_make,
+                    seed_list_mutations,
+                    new_mutation_smiles_list,
+                    rxn_library_variables,
+                )
+
+            if new_mutants is None:
+                break
 
-        if new_mutants is None:
-            break
-
-        # Remove Nones:
-        new_mutants = [x for x in new_mutants if x is not None]
+            # Remove Nones:
+            new_mutants = [x for x in new_mutants if x is not None]
 
-        for i in new_mutants:
-            new_mutation_smiles_list.append(i)
-            if len(new_mutation_smiles_list) == num_mutations:
-                break
-    sys.stdout.flush()
+            for i in new_mutants:
+                new_mutation_smiles_list.append(i)
+                if len(new_mutation_smiles_list) == num_mutations:
+                    break
+        sys.stdout.flush()
 
-    # save new_mutation_smiles_list
-    save_ligand_list(
-        vars["output_directory"],
-        generation_num,
-        new_mutation_smiles_list,
-        "Chosen_Mutants",
-    )
+        # save new_mutation_smiles_list
+        save_ligand_list(
+            vars["output_directory"],
+            generation_num,
+            new_mutation_smiles_list,
+            "Chosen_Mutants",
+        )
 
-    if (
-        new_mutation_smiles_list is None
-        or len(new_mutation_smiles_list) < num_mutations
-    ):
-        print("")
-        print("")
-        print("We needed to make {} ligands through Mutation".format(num_mutations))
-        print(
-            "We only made {} ligands through Mutation".format(
-                len(new_mutation_smiles_list)
+        if (
+            new_mutation_smiles_list is None
+            or len(new_mutation_smiles_list) < num_mutations
+        ):
+            print("")
+            print("")
+            print("We needed to make {} ligands through Mutation".format(num_mutations))
+            print(
+                "We only made {} ligands through Mutation".format(
+                    len(new_mutation_smiles_list)
+                )
             )
+            print("")
+            print("")
+            raise Exception("Mutation failed to make enough new ligands.")
+
+        CheckpointJournal.record_stage_complete(
+            new_gen_folder_path, CheckpointJournal.MUTATION_STAGE
         )
-        print("")
-        print("")
-        raise Exception("Mutation failed to make enough new ligands.")
 
     print("FINISHED MAKING MUTATIONS")
 
-    # Get starting compounds to seed Crossovers
-    seed_list_crossovers = make_seed_list(
-        vars,
-        source_compounds_list,
-        generation_num,
-        num_seed_diversity,
-        num_seed_dock_fitness,
-    )
+    if (
+        CheckpointJournal.is_stage_complete(
+            new_gen_folder_path, CheckpointJournal.CROSSOVER_STAGE
+        )
+        is True
+    ):
+        # A previous attempt at this generation finished the crossovers
+        print("LOAD CROSSOVERS FROM THE PREVIOUS ATTEMPT")
+        new_crossover_smiles_list = load_ligand_list(
+            vars["output_directory"], generation_num, "Chosen_Crossovers"
+        )
+    else:
+        # Get starting compounds to seed Crossovers
+        seed_list_crossovers = make_seed_list(
+            vars,
+            source_compounds_list,
+            generation_num,
+            num_seed_diversity,
+            num_seed_dock_fitness,
+        )
 
-    # Save seed list for Crossovers
-    save_ligand_list(
-        vars["output_directory"],
-        generation_num,
-        seed_list_crossovers,
-        "Crossover_Seed_List",
-    )
+        # Save seed list for Crossovers
+        save_ligand_list(
+            vars["output_directory"],
+            generation_num,
+            seed_list_crossovers,
+            "Crossover_Seed_List",
+        )
 
-    print("MAKE CROSSOVERS")
-    sys.stdout.flush()
+        print("MAKE CROSSOVERS")
+        sys.stdout.flush()
 
-    # Making Crossovers
-    # List of smiles from crossover
-    new_crossover_smiles_list = []
+        # Making Crossovers
+        # List of smiles from crossover
+        new_crossover_smiles_list = []
 
-    # Make all the required ligands by Crossover
-    while len(new_crossover_smiles_list) < num_crossovers:
-        sys.stdout.flush()
-        num_crossovers_to_make = num_crossovers - len(new_crossover_smiles_list)
+        # Make all the required ligands by Crossover
+        while len(new_crossover_smiles_list) < num_crossovers:
+            sys.stdout.flush()
+            num_crossovers_to_make = num_crossovers - len(new_crossover_smiles_list)
 
-        # Make all crossovers
-        new_crossovers = execute_crossover.make_crossovers(
-            vars,
-            generation_num,
-            number_of_processors,
-            num_crossovers_to_make,
-            seed_list_crossovers,
-            new_crossover_smiles_list,
-        )
-        if new_crossovers is None:
-            # try once more
+            # Make all crossovers
             new_crossovers = execute_crossover.make_crossovers(
                 vars,
                 generation_num,
@@ -229,41 +267,59 @@ def populate_generation(vars, generation_num):
                 seed_list_crossovers,
                 new_crossover_smiles_list,
             )
-        if new_crossovers is None:
-            break
+            if new_crossovers is None:
+                # try once more
+                new_crossovers = execute_crossover.make_crossovers(
+                    vars,
+                    generation_num,
+                    number_of_processors,
+                    num_crossovers_to_make,
+                    seed_list_crossovers,
+                    new_crossover_smiles_list,
+                )
+            if new_crossovers is None:
+                break
 
-        # Remove Nones:
-        new_crossovers = [x for x in new_crossovers if x is not None]
+            # Remove Nones:
+            new_crossovers = [x for x in new_crossovers if x is not None]
 
-        # append those which passed the filter
-        for i in new_crossovers:
-            new_crossover_smiles_list.append(i)
-            if len(new_crossover_smiles_list) == num_crossovers:
-                break
+            # append those which passed the filter
+            for i in new_crossovers:
+                new_crossover_smiles_list.append(i)
+                if len(new_crossover_smiles_list) == num_crossovers:
+                    break
 
-    # save new_crossover_smiles_list
-    save_ligand_list(
-        vars["output_directory"],
-        generation_num,
-        new_crossover_smiles_list,
-        "Chosen_Crossovers",
-    )
+        # save new_crossover_smiles_list
+        save_ligand_list(
+            vars["output_directory"],
+            generation_num,
+            new_crossover_smiles_list,
+            "Chosen_Crossovers",
+        )
 
-    if (
-        new_crossover_smiles_list is None
-        or len(new_crossover_smiles_list) < num_crossovers
-    ):
-        print("")
-        print("")
-        print("We needed to make {} ligands through Crossover".format(num_crossovers))
-        print(
-            "We only made {} ligands through Crossover".format(
-                len(new_crossover_smiles_list)
+        if (
+            new_crossover_smiles_list is None
+            or len(new_crossover_smiles_list) < num_crossovers
+        ):
+            print("")
+            print("")
+            print(
+                "We needed to make {} ligands through Crossover".format(
+                    num_crossovers
+                )
+            )
+            print(
+                "We only made {} ligands through Crossover".format(
+                    len(new_crossover_smiles_list)
+                )
             )
+            print("")
+            print("")
+            raise Exception("Crossover failed to make enough new ligands.")
+
+        CheckpointJournal.record_stage_complete(
+            new_gen_folder_path, CheckpointJournal.CROSSOVER_STAGE
         )
-        print("")
-        print("")
-        raise Exception("Crossover failed to make enough new ligands.")
 
     print("FINISHED MAKING CROSSOVERS")
 
@@ -345,6 +401,18 @@ def populate_generation(vars, generation_num):
         vars["output_directory"], generation_num, full_generation_smiles_list, None
     )
 
+    if vars["use_docking_cache"] is True:
+        # Ligands which were docked in an earlier generation are not
+        # converted or docked again. Their poses are copied from the docking
+        # cache into the PDBs folder by run_docking_common.
+        (
+            new_generation_smiles_list,
+            cached_smiles_list,
+        ) = DockingCache.split_cached_ligands(vars, new_generation_smiles_list)
+        save_generation_smi(
+            vars["output_directory"], generation_num, cached_smiles_list, "_cached"
+        )
+
     # Save the File to convert to 3d
     smiles_to_convert_file, new_gen_folder_path = save_generation_smi(
         vars["output_directory"],
@@ -352,6 +420,9 @@ def populate_generation(vars, generation_num):
         new_generation_smiles_list,
         "_to_convert",
     )
+    CheckpointJournal.record_stage_complete(
+        new_gen_folder_path, CheckpointJournal.POPULATION_STAGE
+    )
 
     sys.stdout.flush()
     # CONVERT SMILES TO .sdf USING GYPSUM and convert .sdf to .pdb with rdkit
@@ -359,12 +430,16 @@ def populate_generation(vars, generation_num):
     # valid mol, but all the others will be valid the 1st Smiles in the
     # original .smi file is saved as .smi.1.sdf and 2nd file is saved as
     # .smi.2.sdf
-    conversion_to_3d.convert_to_3d(vars, smiles_to_convert_file, new_gen_folder_path)
+    # In streaming mode run_docking_common converts each ligand to 3D in the
+    # same job that docks it.
+    if len(new_generation_smiles_list) != 0 and vars["streaming_pipeline"] is False:
+        conversion_to_3d.convert_to_3d(vars, smiles_to_convert_file, new_gen_folder_path)
     sys.stdout.flush()
 
     return full_generation_smiles_file, full_generation_smiles_list
 
 
+@StageMetrics.timed_stage("populate_generation")
 def populate_generation_zero(vars, generation_num=0):
     """
     This will handle all that is required for generation 0redock and handle
@@ -384,6 +459,23 @@ def populate_generation_zero(vars, generation_num=0):
     """
     number_of_processors = int(vars["number_of_processors"])
 
+    # If a previous attempt at this generation saved the whole population,
+    # only the ligands it didn't convert are left to do
+    new_gen_folder_path = vars["output_directory"] + "generation_{}{}".format(
+        generation_num, os.sep
+    )
+    if (
+        CheckpointJournal.is_stage_complete(
+            new_gen_folder_path, CheckpointJournal.POPULATION_STAGE
+        )
+        is True
+    ):
+        (
+            full_generation_smiles_file,
+            full_generation_smiles_list,
+        ) = resume_populated_generation(vars, generation_num)
+        return False, full_generation_smiles_file, full_generation_smiles_list
+
     num_crossovers = 0
     num_mutations = 0
 
@@ -466,9 +558,6 @@ def populate_generation_zero(vars, generation_num=0):
     # order files by -2 of each lig
     try:
         full_generation_smiles_list.sort(key=lambda x: float(x[-2]), reverse=False)
-        full_generation_smiles_list_printout = [
-            "\t".join(x) for x in full_generation_smiles_list
-        ]
         already_docked = True
     except:
         print(
@@ -479,14 +568,16 @@ def populate_generation_zero(vars, generation_num=0):
 
     if already_docked is True:
         # Write all the ligands to a ranked file
-        full_generation_smiles_list_printout = "\n".join(
-            full_generation_smiles_list_printout
-        )
         ranked_file = new_gen_folder_path + os.sep + "generation_0_ranked.smi"
-        with open(ranked_file, "w") as f:
-            f.write(full_generation_smiles_list_printout)
+        GenerationStore.save_ligand_list(
+            vars["output_directory"], ranked_file, full_generation_smiles_list
+        )
         return already_docked, full_generation_smiles_file, full_generation_smiles_list
 
+    CheckpointJournal.record_stage_complete(
+        new_gen_folder_path, CheckpointJournal.POPULATION_STAGE
+    )
+
     # If you are to redock and convert the generation zero you will also need
     # to do the following:
 
@@ -495,11 +586,62 @@ def populate_generation_zero(vars, generation_num=0):
     # is not a valid mol, but all the others will be valid the 1st Smiles
     # in the original .smi file is saved as .smi.1.sdf and 2nd file is
     # saved as .smi.2.sdf
-    conversion_to_3d.convert_to_3d(vars, smiles_to_convert_file, new_gen_folder_path)
+    # In streaming mode run_docking_common converts each ligand to 3D in the
+    # same job that docks it.
+    if vars["streaming_pipeline"] is False:
+        conversion_to_3d.convert_to_3d(vars, smiles_to_convert_file, new_gen_folder_path)
 
     return already_docked, full_generation_smiles_file, full_generation_smiles_list
 
 
+def resume_populated_generation(vars, generation_num):
+    """
+    Pick up a generation whose population was saved by a previous attempt
+    which stopped before the generation finished. The population is read
+    from generation_N.smi rather than made again, and any ligands which
+    weren't converted to 3D are converted.
+
+    Inputs:
+    :param dict vars: a dictionary of all user variables
+    :param int generation_num: the generation number
+
+    Returns:
+    :returns: str full_generation_smiles_file: the name of the .smi file
+        containing the population
+    :returns: list full_generation_smiles_list: list with the population of
+        ligands
+    """
+
+    print(
+        "RESUMING GENERATION {} FROM ITS CHECKPOINT JOURNAL".format(generation_num)
+    )
+
+    new_gen_folder_path = vars["output_directory"] + "generation_{}{}".format(
+        generation_num, os.sep
+    )
+    full_generation_smiles_file = new_gen_folder_path + "generation_{}.smi".format(
+        generation_num
+    )
+    smiles_to_convert_file = new_gen_folder_path + "generation_{}{}.smi".format(
+        generation_num, "_to_convert"
+    )
+
+    full_generation_smiles_list = read_saved_ligand_list(
+        vars["output_directory"], full_generation_smiles_file
+    )
+    new_generation_smiles_list = read_saved_ligand_list(
+        vars["output_directory"], smiles_to_convert_file
+    )
+
+    # Ligands which were converted by the previous attempt are skipped by
+    # convert_to_3d. In streaming mode run_docking_common skips them.
+    if len(new_generation_smiles_list) != 0 and vars["streaming_pipeline"] is False:
+        conversion_to_3d.convert_to_3d(vars, smiles_to_convert_file, new_gen_folder_path)
+    sys.stdout.flush()
+
+    return full_generation_smiles_file, full_generation_smiles_list
+
+
 #############
 # Get seeds
 #############
@@ -630,28 +772,45 @@ def get_complete_list_prev_gen_or_source_compounds(vars, generation_num):
         and information about the smiles from the previous generation or the
         source compound list
     """
+
+    library = get_source_library_prev_gen_or_source_compounds(vars, generation_num)
+
+    usable_list_of_smiles = library.to_list()
+    random.shuffle(usable_list_of_smiles)
+
+    return usable_list_of_smiles
+
+
+def get_source_library_prev_gen_or_source_compounds(vars, generation_num):
+    """
+    Get the ligands from the previous generation or the source compound list
+    as a SourceLibrary, which keeps them in compact arrays rather than as a
+    list of lists. This is the same as
+    get_complete_list_prev_gen_or_source_compounds() otherwise.
+
+    Inputs:
+    :param dict vars: a dictionary of all user variables
+    :param int generation_num: the interger of the current generation
+
+    Returns:
+    :returns: SourceLibrary library: the ligands from the previous generation
+        or the source compound list which sanitize (and pass the filters if
+        filter_source_compounds is True)
+    """
+
     source_file_gen_0 = vars[
         "output_directory"
     ] + "generation_{}{}generation_{}_ranked.smi".format(0, os.sep, 0)
-    if generation_num == 0:
-        # This will be the full length list of starting molecules as the seed
-        source_file = str(vars["source_compound_file"])
-        usable_list_of_smiles = Ranking.get_usable_format(source_file)
-
-        if len(usable_list_of_smiles) == 0:
-            print(
-                "\nThere were no available ligands in source compound. Check formatting\n"
-            )
-            raise Exception(
-                "There were no available ligands in source compound. Check formatting"
-            )
-
-    elif generation_num == 1 and os.path.exists(source_file_gen_0) is False:
+    if generation_num == 0 or (
+        generation_num == 1 and os.path.exists(source_file_gen_0) is False
+    ):
         # This will be the full length list of starting molecules as the seed
         source_file = str(vars["source_compound_file"])
-        usable_list_of_smiles = Ranking.get_usable_format(source_file)
+        library = load_source_library(
+            vars, SourceLibrary.iter_smi_file_chunks(source_file)
+        )
 
-        if len(usable_list_of_smiles) == 0:
+        if len(library) == 0:
             print(
                 "\nThere were no available ligands in source compound. Check formatting\n"
             )
@@ -675,9 +834,17 @@ def get_complete_list_prev_gen_or_source_compounds(vars, generation_num):
             print(printout)
             raise Exception(printout)
 
-        usable_list_of_smiles = Ranking.get_usable_format(source_file)
+        # Read the ranked list from the generation store rather than parsing
+        # the .smi file if it has an up-to-date copy
+        if GenerationStore.has_ligand_list(vars["output_directory"], source_file):
+            chunks = GenerationStore.iter_ligand_list_chunks(
+                vars["output_directory"], source_file
+            )
+        else:
+            chunks = SourceLibrary.iter_smi_file_chunks(source_file)
+        library = load_source_library(vars, chunks)
 
-        if len(usable_list_of_smiles) == 0:
+        if len(library) == 0:
             printout = (
                 "\n"
                 + "There were no available ligands in previous"
@@ -687,57 +854,93 @@ def get_complete_list_prev_gen_or_source_compounds(vars, generation_num):
             print(printout)
             raise Exception(printout)
 
-    # Test that every SMILES in the usable_list_of_smiles is a valid SMILES
-    # which will import and Sanitize in RDKit. SMILES will be excluded if they
-    # are fragmented, contain atoms with no atomic number (*), or do not
-    # sanitize
-    job_input = tuple([tuple([i]) for i in usable_list_of_smiles])
+    return library
 
-    usable_list_of_smiles = vars["parallelizer"].run(
-        job_input, test_source_smiles_convert
-    )
-    usable_list_of_smiles = [x for x in usable_list_of_smiles if x is not None]
-    print_errors = [x for x in usable_list_of_smiles if type(x) is str]
-    usable_list_of_smiles = [x for x in usable_list_of_smiles if type(x) is list]
-    for x in print_errors:
-        print(x)
 
-    if len(usable_list_of_smiles) == 0:
-        printout = "\nThere were no ligands in source compound or previous \
-            generation which could sanitize.\n"
-        print(printout)
-        raise Exception(printout)
+def load_source_library(vars, chunks):
+    """
+    Read a list of ligands into a SourceLibrary a chunk at a time.
 
-    if vars["filter_source_compounds"] is True:
+    Each chunk is tested to ensure that every SMILES will import and Sanitize
+    in RDKit, and is run through the filters if filter_source_compounds is
+    True, before it is added to the library. This way only one chunk of the
+    list is ever held as lists of strings.
+
+    Inputs:
+    :param dict vars: a dictionary of all user variables
+    :param iter chunks: the chunks of the list, each a list of ligands as
+        made by SourceLibrary.iter_smi_file_chunks() or
+        GenerationStore.iter_ligand_list_chunks()
+
+    Returns:
+    :returns: SourceLibrary library: the ligands which passed. This is empty
+        only if the list had no lines.
+    """
 
-        prefilter_list = copy.deepcopy(usable_list_of_smiles)
+    if vars["filter_source_compounds"] is True:
         print("")
         print("Running Filter on the Compounds from last generation/Source")
-        usable_list_of_smiles = Filter.run_filter(vars, usable_list_of_smiles)
 
-        # Remove Nones:
-        usable_list_of_smiles = [x for x in usable_list_of_smiles if x is not None]
+    library = SourceLibrary.SourceLibrary()
+    num_lines_read = 0
+    num_sanitized = 0
+    for chunk in chunks:
+        num_lines_read = num_lines_read + len(chunk)
+
+        # Test that every SMILES in the chunk is a valid SMILES which will
+        # import and Sanitize in RDKit. SMILES will be excluded if they are
+        # fragmented, contain atoms with no atomic number (*), or do not
+        # sanitize
+        job_input = tuple([tuple([i]) for i in chunk])
+        results = StageMetrics.run_jobs(
+            vars["parallelizer"],
+            "source_validation",
+            job_input,
+            test_source_smiles_convert,
+            count_failures=lambda result: type(result) is not list,
+        )
+        results = [x for x in results if x is not None]
+        print_errors = [x for x in results if type(x) is str]
+        usable_chunk = [x for x in results if type(x) is list]
+        for x in print_errors:
+            print(x)
 
-        if len(usable_list_of_smiles) == 0:
-            printout = "\nThere were no ligands in source compound which \
-                        passed the User-selected Filters.\n"
-            print(printout)
-            raise Exception(printout)
+        num_sanitized = num_sanitized + len(usable_chunk)
 
-        for lig in usable_list_of_smiles:
-            failed_filter_list = []
-            if lig not in prefilter_list:
-                failed_filter_list.append(lig[1])
+        if vars["filter_source_compounds"] is True and len(usable_chunk) != 0:
+            passed_filter = Filter.run_filter(vars, usable_chunk)
+            passed_filter = [x for x in passed_filter if x is not None]
 
-        if len(failed_filter_list) != 0:
-            printout = "\n THE FOLLOWING LIGANDS WERE REMOVED FROM THE\
-                        SOURCE LIST: Failed the User-selected Filters\n"
-            printout = printout + "\t{}".format(failed_filter_list)
-            print(printout)
+            passed_ids = set([x[1] for x in passed_filter])
+            failed_filter_list = [x[1] for x in usable_chunk if x[1] not in passed_ids]
+            if len(failed_filter_list) != 0:
+                printout = "\n THE FOLLOWING LIGANDS WERE REMOVED FROM THE\
+                            SOURCE LIST: Failed the User-selected Filters\n"
+                printout = printout + "\t{}".format(failed_filter_list)
+                print(printout)
 
-    random.shuffle(usable_list_of_smiles)
+            usable_chunk = passed_filter
 
-    return usable_list_of_smiles
+        library.add_rows(usable_chunk)
+
+    library.finalize()
+
+    if num_lines_read == 0:
+        return library
+
+    if num_sanitized == 0:
+        printout = "\nThere were no ligands in source compound or previous \
+            generation which could sanitize.\n"
+        print(printout)
+        raise Exception(printout)
+
+    if len(library) == 0:
+        printout = "\nThere were no ligands in source compound which \
+                    passed the User-selected Filters.\n"
+        print(printout)
+        raise Exception(printout)
+
+    return library
 
 
 def make_seed_list(
@@ -758,7 +961,7 @@ def make_seed_list(
     :param dict vars: a dictionary of all user variables
     :param list source_compounds_list: a list with SMILES strings, names, and
         information about the smiles from either the previous generation or the
-        source compound list
+        source compound list. This can also be a SourceLibrary.
     :param int generation_num: the interger of the current generation
     :param int num_seed_diversity: the number of seed molecules which come
         from diversity selection
@@ -770,7 +973,12 @@ def make_seed_list(
         and information about the smiles which will be used to seed the next
         generation
     """
-    usable_list_of_smiles = copy.deepcopy(source_compounds_list)
+    if type(source_compounds_list) is SourceLibrary.SourceLibrary:
+        usable_list_of_smiles = source_compounds_list
+    else:
+        # Each ligand is a list of strings, so copying each list is the same as
+        # a deepcopy
+        usable_list_of_smiles = [list(x) for x in source_compounds_list]
 
     full_length = False
     if generation_num == 0:
@@ -818,8 +1026,21 @@ def make_seed_list(
 
     if full_length is True or generation_num == 0:
         # This will be the full length list of starting molecules as the seed
+        if type(usable_list_of_smiles) is SourceLibrary.SourceLibrary:
+            usable_list_of_smiles = usable_list_of_smiles.to_list()
         random.shuffle(usable_list_of_smiles)
 
+    elif type(usable_list_of_smiles) is SourceLibrary.SourceLibrary:
+        # Select from the library's score arrays, so that only the chosen
+        # ligands are made into lists
+        usable_list_of_smiles = Ranking.create_seed_list_from_arrays(
+            usable_list_of_smiles,
+            num_seed_diversity,
+            num_seed_dock_fitness,
+            vars["selector_choice"],
+            vars["tourn_size"],
+        )
+
     else:
         selector_choice = vars["selector_choice"]
         tourn_size = vars["tourn_size"]
@@ -906,7 +1127,8 @@ def make_pass_through_list(
     :param dict vars: a dictionary of all user variables
     :param list smiles_from_previous_gen_list: List of SMILES from the last
         generation chosen to seed the list of molecules to advance to the next
-        generation without modification via elitism.
+        generation without modification via elitism. This can also be a
+        SourceLibrary, which was already filtered when it was loaded.
     :param int num_elite_to_advance_from_previous_gen: the number of molecules
         to advance from the last generation without modifications.
     :param int generation_num: the interger of the current generation
@@ -936,11 +1158,16 @@ def make_pass_through_list(
         )
         return printout
 
-    smiles_from_previous_gen_list = [
-        x for x in smiles_from_previous_gen_list if type(x) == list
-    ]
+    is_library = type(smiles_from_previous_gen_list) is SourceLibrary.SourceLibrary
+    if is_library is False:
+        smiles_from_previous_gen_list = [
+            x for x in smiles_from_previous_gen_list if type(x) == list
+        ]
 
-    if generation_num == 0 and vars["filter_source_compounds"] is True:
+    if is_library is True:
+        # load_source_library() already ran the filters
+        ligands_which_passed_filters = smiles_from_previous_gen_list
+    elif generation_num == 0 and vars["filter_source_compounds"] is True:
         # Run Filters on ligand list
         ligands_which_passed_filters = Filter.run_filter(
             vars, smiles_from_previous_gen_list
@@ -964,22 +1191,46 @@ def make_pass_through_list(
 
     # Save seed list of all ligands which passed which will serve as the seed
     # list.
-    save_ligand_list(
-        vars["output_directory"],
-        generation_num,
-        ligands_which_passed_filters,
-        "Previous_Gen_Elite_Seed_List",
-    )
+    if is_library is True:
+        save_ligand_list(
+            vars["output_directory"],
+            generation_num,
+            ligands_which_passed_filters.iter_rows(),
+            "Previous_Gen_Elite_Seed_List",
+        )
+    else:
+        save_ligand_list(
+            vars["output_directory"],
+            generation_num,
+            ligands_which_passed_filters,
+            "Previous_Gen_Elite_Seed_List",
+        )
 
     # check if ligands_which_passed_filters has docking scores
     has_dock_score = False
-    try:
-        temp = [float(x[-2]) for x in ligands_which_passed_filters]
-        has_dock_score = True
-    except:
-        has_dock_score = False
+    if is_library is True:
+        has_dock_score = ligands_which_passed_filters.has_scores()
+    else:
+        try:
+            temp = [float(x[-2]) for x in ligands_which_passed_filters]
+            has_dock_score = True
+        except:
+            has_dock_score = False
+
+    if is_library is True and has_dock_score is False:
+        # Only make the ligands which will advance into lists
+        if generation_num == 0:
+            num_to_advance = len(ligands_which_passed_filters)
+        else:
+            num_to_advance = num_elite_to_advance_from_previous_gen
+        chosen_indices = random.sample(
+            range(len(ligands_which_passed_filters)), num_to_advance
+        )
+        list_of_ligands_to_advance = ligands_which_passed_filters.get_rows(
+            chosen_indices
+        )
 
-    if generation_num == 0 and has_dock_score is False:
+    elif generation_num == 0 and has_dock_score is False:
         # Take the 1st num_elite_to_advance_from_previous_gen number of
         # molecules from ligands_which_passed_filters
         random.shuffle(ligands_which_passed_filters)
@@ -1072,13 +1323,13 @@ def save_generation_smi(
             generation_num, nomenclature_tag
         )
 
-    # write as a tab delineated .smi file
-    with open(output_file_name, "w") as f:
-        for smile in formatted_smile_list:
-            # smile_string = smile[0]
-            # smile_id = smile[1]
-            x = str(smile[0] + "\t" + str(smile[1]) + "\n")
-            f.write(x)
+    # write as a tab delineated .smi file with the SMILES string and ID of
+    # each ligand
+    GenerationStore.save_ligand_list(
+        output_directory,
+        output_file_name,
+        [[smile[0], str(smile[1])] for smile in formatted_smile_list],
+    )
 
     sys.stdout.flush()
     return output_file_name, new_gen_folder_path
@@ -1124,9 +1375,56 @@ def save_ligand_list(
     )
 
     # save to a new output smiles file. ie. save to ranked_smiles_file
-    with open(output_file_name, "w") as output:
-        for line in list_of_chosen_ligands:
-            output_line = "\t".join(line) + "\n"
-            output.write(output_line)
+    GenerationStore.save_ligand_list(
+        output_directory, output_file_name, list_of_chosen_ligands
+    )
 
     sys.stdout.flush()
+
+
+def load_ligand_list(output_directory, generation_num, nomenclature_tag):
+    """
+    Read a list of ligands saved by save_ligand_list.
+
+    Inputs:
+    :param dict output_directory: the directory of the run
+    :param int generation_num: The generation number
+    :param str nomenclature_tag: The str describing the ligand list. ie.
+        Chosen_Mutants
+
+    Returns:
+    :returns: list list_of_chosen_ligands: The formatted list of ligands
+    """
+
+    seed_folder_path = (
+        output_directory
+        + "generation_{}{}".format(generation_num, os.sep)
+        + "SeedFolder"
+        + os.sep
+    )
+    file_name = "{}{}_Gen_{}.smi".format(
+        seed_folder_path, nomenclature_tag, generation_num
+    )
+
+    return read_saved_ligand_list(output_directory, file_name)
+
+
+def read_saved_ligand_list(output_directory, smi_file):
+    """
+    Read a list of ligands saved in the run's output directory, from the
+    generation store if it has an up-to-date copy or from the .smi file.
+
+    Inputs:
+    :param dict output_directory: the directory of the run
+    :param str smi_file: the path of the .smi file
+
+    Returns:
+    :returns: list ligand_list: the ligands, in the format of
+        Ranking.get_usable_format()
+    """
+
+    ligand_list = GenerationStore.get_ligand_list(output_directory, smi_file)
+    if ligand_list is None:
+        ligand_list = Ranking.get_usable_format(smi_file)
+
+    return ligand_list
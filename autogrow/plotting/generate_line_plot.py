@@ -7,6 +7,8 @@ import glob
 import matplotlib
 import matplotlib.pyplot as plt
 
+import autogrow.utils.generation_store as GenerationStore
+
 
 def get_usable_format(infile):
     """
@@ -63,6 +65,35 @@ def get_usable_format(infile):
     return usable_list_of_smiles
 
 
+def get_ranked_scores(infolder, rank_file):
+    """
+    Get the docking scores (part -2) of every ligand in a ranked .smi file, in
+    the order of the file. The scores are read from the run's generation store
+    if it has an up-to-date copy of the file.
+
+    Inputs:
+    :param str infolder: the path of the folder which has all of the
+        generation folders
+    :param str rank_file: the path of the ranked .smi file
+
+    Returns:
+    :returns: list scores: the docking score of every ligand in rank_file
+    """
+
+    scores = GenerationStore.get_scores(infolder, rank_file)
+    if scores is not None:
+        return scores
+
+    scores = []
+    # read as a tab delineated .smi file
+    with open(rank_file, "r") as f:
+        for line in f:
+            parts = line.replace("\n", "").split("\t")
+            scores.append(float(parts[-2]))
+
+    return scores
+
+
 def get_average_score_per_gen(infolder, folder_list):
     """
     This script will get the average docking score from the ranked .smi file
@@ -85,24 +116,8 @@ def get_average_score_per_gen(infolder, folder_list):
         ranked_file = glob.glob(gen_folder_name + "*_ranked.smi")
 
         for rank_file in ranked_file:
-            # write as a tab delineated .smi file
-            with open(rank_file, "r") as f:
-                gen_affinity_sum = float(0.0)
-                num_lines_counter = float(0.0)
-                for line in f:
-                    line = line.replace("\n", "")
-                    parts = line.split(
-                        "\t"
-                    )  # split line into parts separated by 4-spaces
-
-                    choice_list = []
-                    for i in range(0, len(parts)):
-                        choice_list.append(parts[i])
-
-                    gen_affinity_sum = gen_affinity_sum + float(choice_list[-2])
-                    num_lines_counter = num_lines_counter + float(1.0)
-
-            gen_affinity_average = gen_affinity_sum / num_lines_counter
+            scores = get_ranked_scores(infolder, rank_file)
+            gen_affinity_average = sum(scores) / float(len(scores))
 
             gen_num = os.path.basename(rank_file).split("_")[1]
             gen_name = "generation_{}".format(gen_num)
@@ -138,36 +153,15 @@ def get_average_top_score_per_gen(infolder, folder_list, top_score_per_gen):
         ranked_file = glob.glob(gen_folder_name + "*_ranked.smi")
 
         for rank_file in ranked_file:
-            # Check number of lines
-            num_lines = 0
-            with open(rank_file, "r") as rf:
-                for line in rf:
-                    num_lines = num_lines + 1
-
-            if num_lines >= top_score_per_gen:
-                # read as a tab delineated .smi file
-                with open(rank_file, "r") as f:
-                    gen_affinity_sum = float(0.0)
-
-                    for i, line in enumerate(f.readlines()):
-                        if i >= top_score_per_gen:
-                            break
-                        line = line.replace("\n", "")
-                        parts = line.split(
-                            "\t"
-                        )  # split line into parts separated by 4-spaces
-
-                        choice_list = []
-                        for j in range(0, len(parts)):
-                            choice_list.append(parts[j])
-
-                        gen_affinity_sum = gen_affinity_sum + float(choice_list[-2])
-
-                    gen_affinity_average = gen_affinity_sum / top_score_per_gen
-
-                    gen_num = os.path.basename(rank_file).split("_")[1]
-                    gen_name = "generation_{}".format(gen_num)
-                    average_affinity_dict[gen_name] = gen_affinity_average
+            scores = get_ranked_scores(infolder, rank_file)
+
+            if len(scores) >= top_score_per_gen:
+                gen_affinity_sum = sum(scores[:top_score_per_gen])
+                gen_affinity_average = gen_affinity_sum / top_score_per_gen
+
+                gen_num = os.path.basename(rank_file).split("_")[1]
+                gen_name = "generation_{}".format(gen_num)
+                average_affinity_dict[gen_name] = gen_affinity_average
 
             else:
                 gen_num = os.path.basename(rank_file).split("_")[1]
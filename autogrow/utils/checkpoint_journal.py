@@ -0,0 +1,199 @@
+"""
+checkpoint_journal.py keeps a journal of the work finished in a generation so
+a run which is stopped part way through a generation (ie. killed at the end
+of its wall time) can pick up where it stopped rather than making, converting
+and docking the whole generation again.
+
+The journal is a text file in the generation folder. Each line records one
+finished piece of work as:
+    stage<TAB>item<TAB>value
+
+The stages are:
+    - MUTATION_STAGE, CROSSOVER_STAGE and POPULATION_STAGE: recorded once, with
+        an empty item, when the mutants, the crossovers and the whole
+        population (ie. generation_N.smi and generation_N_to_convert.smi) have
+        been saved.
+    - CONVERTED_LIGAND_STAGE: the short name of each ligand converted from
+        SMILES to 3D PDB files.
+    - CONVERTED_PDB_STAGE: the file name of each PDB converted to the docking
+        file format.
+    - DOCKED_FILE_STAGE: the file name of each ligand file which was docked.
+    - DOCKED_LIGAND_STAGE: the short name of each ligand converted and docked
+        in one job (--streaming_pipeline).
+    - RESCORED_FILE_STAGE: the path of each docked file which was rescored,
+        with the path of the rescored file as the value.
+
+Lines are written by whichever process finishes the work, after its output
+files are written, so nothing is recorded for work which was interrupted.
+Each line is written with a single append, and lines which were only partly
+written are ignored when the journal is read. Work which isn't in the journal
+is simply done again.
+
+Nothing is recorded unless the journal was started for the generation with
+start_journal().
+"""
+import __future__
+
+import os
+
+CHECKPOINT_JOURNAL_FILE_NAME = "checkpoint_journal.txt"
+
+MUTATION_STAGE = "mutation"
+CROSSOVER_STAGE = "crossover"
+POPULATION_STAGE = "population"
+CONVERTED_LIGAND_STAGE = "converted_ligand"
+CONVERTED_PDB_STAGE = "converted_pdb"
+DOCKED_FILE_STAGE = "docked_file"
+DOCKED_LIGAND_STAGE = "docked_ligand"
+RESCORED_FILE_STAGE = "rescored_file"
+
+
+def get_journal_file(gen_dir):
+    """
+    Get the path of the checkpoint journal of a generation.
+
+    Inputs:
+    :param str gen_dir: the path of the generation folder
+
+    Returns:
+    :returns: str journal_file: the path of the journal
+    """
+
+    return os.path.join(gen_dir, CHECKPOINT_JOURNAL_FILE_NAME)
+
+
+def get_gen_dir_of_pdbs_file(file_path):
+    """
+    Get the generation folder of a file in a generation's PDBs folder.
+
+    Inputs:
+    :param str file_path: the path of a file in the PDBs folder. ie.
+        'Run_0/generation_3/PDBs/Gen_3_Mutant_7_123__1.pdbqt'
+
+    Returns:
+    :returns: str gen_dir: the path of the generation folder. ie.
+        'Run_0/generation_3'
+    """
+
+    return os.path.dirname(os.path.dirname(os.path.abspath(file_path)))
+
+
+def start_journal(gen_dir):
+    """
+    Start the checkpoint journal of a generation, if it doesn't already have
+    one. Work is only recorded once the journal is started.
+
+    Inputs:
+    :param str gen_dir: the path of the generation folder
+    """
+
+    if os.path.isdir(gen_dir) is False:
+        os.makedirs(gen_dir)
+
+    journal_file = get_journal_file(gen_dir)
+    if os.path.exists(journal_file) is False:
+        with open(journal_file, "a"):
+            pass
+
+
+def has_journal(gen_dir):
+    """
+    Check if a generation has a checkpoint journal.
+
+    Inputs:
+    :param str gen_dir: the path of the generation folder
+
+    Returns:
+    :returns: bool has_journal: True if the journal was started
+    """
+
+    return os.path.exists(get_journal_file(gen_dir))
+
+
+def record(gen_dir, stage, item="", value=""):
+    """
+    Record a finished piece of work in a generation's checkpoint journal.
+    Nothing is recorded if the generation's journal wasn't started.
+
+    Inputs:
+    :param str gen_dir: the path of the generation folder
+    :param str stage: the stage the work was part of. ie. DOCKED_FILE_STAGE
+    :param str item: what was finished (ie. the name of a ligand or file).
+        Empty for stages which are recorded once.
+    :param str value: any result to keep with the item
+    """
+
+    journal_file = get_journal_file(gen_dir)
+    if os.path.exists(journal_file) is False:
+        return
+
+    line = "{}\t{}\t{}\n".format(stage, item, value)
+
+    # A single write to a file opened for appending, so lines written by
+    # different processes don't interleave
+    fd = os.open(journal_file, os.O_WRONLY | os.O_APPEND)
+    try:
+        os.write(fd, line.encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+def record_stage_complete(gen_dir, stage):
+    """
+    Record that a stage which is done once per generation is finished.
+
+    Inputs:
+    :param str gen_dir: the path of the generation folder
+    :param str stage: the stage. ie. MUTATION_STAGE
+    """
+
+    record(gen_dir, stage)
+
+
+def get_completed(gen_dir, stage):
+    """
+    Get all of the work recorded for a stage.
+
+    Inputs:
+    :param str gen_dir: the path of the generation folder
+    :param str stage: the stage. ie. DOCKED_FILE_STAGE
+
+    Returns:
+    :returns: dict completed: the value of every item recorded for the stage.
+        Empty if the generation has no journal.
+    """
+
+    journal_file = get_journal_file(gen_dir)
+    completed = {}
+    if os.path.exists(journal_file) is False:
+        return completed
+
+    with open(journal_file, "r") as f:
+        for line in f:
+            # A line without its newline was cut off part way through
+            if line.endswith("\n") is False:
+                continue
+
+            parts = line[:-1].split("\t")
+            if len(parts) != 3:
+                continue
+
+            if parts[0] == stage:
+                completed[parts[1]] = parts[2]
+
+    return completed
+
+
+def is_stage_complete(gen_dir, stage):
+    """
+    Check if a stage which is done once per generation was finished.
+
+    Inputs:
+    :param str gen_dir: the path of the generation folder
+    :param str stage: the stage. ie. MUTATION_STAGE
+
+    Returns:
+    :returns: bool is_complete: True if the stage was recorded
+    """
+
+    return "" in get_completed(gen_dir, stage)
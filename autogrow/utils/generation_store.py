@@ -0,0 +1,566 @@
+"""
+generation_store.py keeps every ligand list a run writes (ie. generation_N.smi,
+generation_N_ranked.smi and the SeedFolder lists) in an SQLite database in
+the run's output directory, with the SMILES, IDs, parent IDs, scores and
+diversity scores as typed columns.
+
+The .smi files are still written, so the output folder looks the same as
+before, but AutoGrow reads the lists back from the database. Scores are
+stored as numbers so ranking and plotting don't parse them from strings, and
+a ligand can be found by its SMILES and ID without reading a whole file.
+
+Each list is keyed by the path of its .smi file relative to the output
+directory. The size and modification time of the .smi file are saved with the
+list. If the .smi file on disk no longer matches (ie. it was edited by hand),
+the file is read instead of the database.
+"""
+import __future__
+
+import os
+import sqlite3
+
+
+GENERATION_STORE_FILE_NAME = "generation_store.db"
+
+# Number of ligands fetched from the database at a time when iterating
+# through a list
+GENERATION_STORE_CHUNK_SIZE = 20000
+
+
+def get_generation_store_file(output_directory):
+    """
+    Get the path of the generation store database for a run.
+
+    Inputs:
+    :param str output_directory: the output directory of the run
+
+    Returns:
+    :returns: str store_file: path to the SQLite database
+    """
+
+    return output_directory + GENERATION_STORE_FILE_NAME
+
+
+def connect_to_generation_store(output_directory):
+    """
+    Open the generation store database, creating the tables if needed.
+
+    Inputs:
+    :param str output_directory: the output directory of the run
+
+    Returns:
+    :returns: sqlite3.Connection conn: connection to the generation store
+    """
+
+    conn = sqlite3.connect(get_generation_store_file(output_directory))
+    # file_size and file_mtime_ns are NULL while a list is being saved
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS smi_files ("
+        + "file_id INTEGER PRIMARY KEY, "
+        + "file_name TEXT UNIQUE NOT NULL, "
+        + "generation INTEGER, "
+        + "file_size INTEGER, "
+        + "file_mtime_ns INTEGER, "
+        + "num_ligands INTEGER)"
+    )
+    # other_fields holds the ligand's information after its ID, as it was
+    # written to the .smi file, so the lists read back exactly as written
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS ligands ("
+        + "file_id INTEGER NOT NULL, "
+        + "position INTEGER NOT NULL, "
+        + "smiles TEXT NOT NULL, "
+        + "lig_id TEXT, "
+        + "short_id TEXT, "
+        + "parent_ids TEXT, "
+        + "score REAL, "
+        + "diversity REAL, "
+        + "other_fields TEXT, "
+        + "PRIMARY KEY (file_id, position)) WITHOUT ROWID"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS ligands_by_smiles ON ligands (file_id, smiles)"
+    )
+    return conn
+
+
+def get_file_id(conn, file_name):
+    """
+    Get the number of a .smi file in the generation store.
+
+    Inputs:
+    :param sqlite3.Connection conn: connection to the generation store
+    :param str file_name: the key of the .smi file
+
+    Returns:
+    :returns: int file_id: the number of the file, or None if it has never
+        been saved
+    """
+
+    row = conn.execute(
+        "SELECT file_id FROM smi_files WHERE file_name = ?", (file_name,)
+    ).fetchone()
+    if row is None:
+        return None
+    return row[0]
+
+
+def get_file_name(output_directory, smi_file):
+    """
+    Get the key of a .smi file in the generation store.
+
+    Inputs:
+    :param str output_directory: the output directory of the run
+    :param str smi_file: the path of the .smi file
+
+    Returns:
+    :returns: str file_name: the path of smi_file relative to
+        output_directory, with / as the separator. Returns None if smi_file
+        isn't in output_directory (ie. the source compound file), as it
+        isn't stored.
+    """
+
+    try:
+        file_name = os.path.relpath(smi_file, output_directory)
+    except ValueError:
+        # On a different drive
+        return None
+
+    if file_name.startswith(".."):
+        return None
+
+    return file_name.replace(os.sep, "/")
+
+
+def get_generation_num(file_name):
+    """
+    Get the generation a .smi file belongs to from its path.
+
+    Inputs:
+    :param str file_name: the path of the .smi file relative to the output
+        directory. ie. 'generation_3/generation_3_ranked.smi'
+
+    Returns:
+    :returns: int generation_num: the generation number, or None if the file
+        isn't in a generation folder
+    """
+
+    folder = file_name.split("/")[0]
+    parts = folder.split("_")
+    if len(parts) == 2 and parts[0] == "generation" and parts[1].isdigit():
+        return int(parts[1])
+    return None
+
+
+def split_lig_id(lig_id):
+    """
+    Split a ligand ID into its parents and its shorthand name.
+    ie) '(ZINC123+ZINC345)Gen_0_Cross_99571' -> ('ZINC123+ZINC345',
+    'Gen_0_Cross_99571')
+
+    Inputs:
+    :param str lig_id: the full ligand ID
+
+    Returns:
+    :returns: str parent_ids: the IDs of the parents, or None if the ID
+        doesn't have them
+    :returns: str short_id: the shorthand ligand ID
+    """
+
+    parts = lig_id.split(")")
+    if len(parts) == 2 and lig_id.startswith("("):
+        return parts[0][1:], parts[1]
+    if len(parts) == 2:
+        return None, parts[1]
+    return None, lig_id
+
+
+def get_float_or_none(value):
+    """
+    Convert a column of a ligand to a float.
+
+    Inputs:
+    :param value: the value to convert. This can be a str or a number.
+
+    Returns:
+    :returns: float value: the value as a float, or None if it isn't a number
+    """
+
+    try:
+        return float(value)
+    except:
+        return None
+
+
+def get_file_stats(smi_file):
+    """
+    Get the size and modification time of a file.
+
+    Inputs:
+    :param str smi_file: the path of the file
+
+    Returns:
+    :returns: tuple stats: (size in bytes, modification time in ns)
+    """
+
+    stat = os.stat(smi_file)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def save_ligand_list(output_directory, smi_file, ligand_list):
+    """
+    Write a list of ligands to a tab separated .smi file and save it in the
+    generation store, replacing any list previously saved for that file.
+
+    Inputs:
+    :param str output_directory: the output directory of the run
+    :param str smi_file: the path of the .smi file to write
+    :param iter ligand_list: the ligands to save. Each is a list of its
+        information ie. ['CCC', '(ZINC123)Gen_1_Mutant_7_12345', -7.1, 0.4].
+        Numbers are written with str(). This can be a generator, so the
+        ligands don't all need to be in memory.
+    """
+
+    file_name = get_file_name(output_directory, smi_file)
+    if file_name is None:
+        with open(smi_file, "w") as output:
+            for ligand_info in ligand_list:
+                output.write("\t".join([str(x) for x in ligand_info]) + "\n")
+        return
+
+    conn = connect_to_generation_store(output_directory)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO smi_files (file_name, generation) VALUES (?, ?)",
+                (file_name, get_generation_num(file_name)),
+            )
+            file_id = get_file_id(conn, file_name)
+            conn.execute(
+                "UPDATE smi_files SET file_size = NULL, file_mtime_ns = NULL "
+                + "WHERE file_id = ?",
+                (file_id,),
+            )
+            conn.execute("DELETE FROM ligands WHERE file_id = ?", (file_id,))
+
+            num_ligands = 0
+            records = []
+            with open(smi_file, "w") as output:
+                for ligand_info in ligand_list:
+                    ligand_info = [str(x) for x in ligand_info]
+                    output.write("\t".join(ligand_info) + "\n")
+
+                    records.append(
+                        make_ligand_record(file_id, num_ligands, ligand_info)
+                    )
+                    num_ligands = num_ligands + 1
+                    if len(records) == GENERATION_STORE_CHUNK_SIZE:
+                        conn.executemany(
+                            "INSERT INTO ligands VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            records,
+                        )
+                        records = []
+
+            if len(records) != 0:
+                conn.executemany(
+                    "INSERT INTO ligands VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", records
+                )
+
+            # Saved last, once the file is closed, so a list is only used if
+            # the file was written completely
+            file_size, file_mtime_ns = get_file_stats(smi_file)
+            conn.execute(
+                "UPDATE smi_files SET file_size = ?, file_mtime_ns = ?, "
+                + "num_ligands = ? WHERE file_id = ?",
+                (file_size, file_mtime_ns, num_ligands, file_id),
+            )
+    finally:
+        conn.close()
+
+
+def make_ligand_record(file_id, position, ligand_info):
+    """
+    Make the row of the ligands table for a ligand.
+
+    Inputs:
+    :param int file_id: the number of the .smi file
+    :param int position: the line number of the ligand in the .smi file
+    :param list ligand_info: the ligand's information as strings
+
+    Returns:
+    :returns: tuple record: the values of the row
+    """
+
+    smiles = ligand_info[0]
+    if len(ligand_info) > 1:
+        lig_id = ligand_info[1]
+        parent_ids, short_id = split_lig_id(lig_id)
+    else:
+        lig_id = None
+        parent_ids = None
+        short_id = None
+
+    # Only lists with more than a SMILES string and ID have scores
+    if len(ligand_info) > 2:
+        score = get_float_or_none(ligand_info[-2])
+        diversity = get_float_or_none(ligand_info[-1])
+    else:
+        score = None
+        diversity = None
+
+    if len(ligand_info) > 2:
+        other_fields = "\t".join(ligand_info[2:])
+    else:
+        other_fields = None
+
+    return (
+        file_id,
+        position,
+        smiles,
+        lig_id,
+        short_id,
+        parent_ids,
+        score,
+        diversity,
+        other_fields,
+    )
+
+
+def make_ligand_info(smiles, lig_id, other_fields):
+    """
+    Rebuild a ligand's information from its row of the ligands table.
+
+    Inputs:
+    :param str smiles: the SMILES string
+    :param str lig_id: the ligand ID, or None
+    :param str other_fields: the tab separated information after the ID, or
+        None
+
+    Returns:
+    :returns: list ligand_info: the ligand's information as strings, in the
+        same format as Ranking.get_usable_format()
+    """
+
+    ligand_info = [smiles]
+    if lig_id is not None:
+        ligand_info.append(lig_id)
+    if other_fields is not None:
+        ligand_info.extend(other_fields.split("\t"))
+
+    return ligand_info
+
+
+def is_stored(conn, output_directory, smi_file):
+    """
+    Check if the generation store has an up-to-date copy of a .smi file.
+
+    Inputs:
+    :param sqlite3.Connection conn: connection to the generation store
+    :param str output_directory: the output directory of the run
+    :param str smi_file: the path of the .smi file
+
+    Returns:
+    :returns: bool is_stored: True if the list in the store matches the .smi
+        file on disk
+    """
+
+    file_name = get_file_name(output_directory, smi_file)
+    if file_name is None:
+        return False
+
+    row = conn.execute(
+        "SELECT file_size, file_mtime_ns FROM smi_files "
+        + "WHERE file_name = ? AND file_size IS NOT NULL",
+        (file_name,),
+    ).fetchone()
+    if row is None:
+        return False
+
+    if os.path.exists(smi_file) is False:
+        return False
+
+    return tuple(row) == get_file_stats(smi_file)
+
+
+def open_store_if_has_file(output_directory, smi_file):
+    """
+    Open the generation store if it has an up-to-date copy of a .smi file.
+
+    Inputs:
+    :param str output_directory: the output directory of the run
+    :param str smi_file: the path of the .smi file
+
+    Returns:
+    :returns: sqlite3.Connection conn: connection to the generation store, or
+        None if the file should be read from disk instead
+    """
+
+    if get_file_name(output_directory, smi_file) is None:
+        return None
+
+    if os.path.exists(get_generation_store_file(output_directory)) is False:
+        return None
+
+    conn = connect_to_generation_store(output_directory)
+    if is_stored(conn, output_directory, smi_file) is False:
+        conn.close()
+        return None
+
+    return conn
+
+
+def iter_ligand_list_chunks(
+    output_directory, smi_file, chunk_size=GENERATION_STORE_CHUNK_SIZE
+):
+    """
+    Go through a saved list of ligands a chunk at a time.
+
+    Inputs:
+    :param str output_directory: the output directory of the run
+    :param str smi_file: the path of the .smi file the list was saved as
+    :param int chunk_size: the number of ligands in each chunk
+
+    Returns:
+    :returns: list chunk: (yielded) a list of ligands, each a list of strings
+        in the same format as Ranking.get_usable_format(). Nothing is yielded
+        if the list isn't in the store.
+    """
+
+    conn = open_store_if_has_file(output_directory, smi_file)
+    if conn is None:
+        return
+
+    try:
+        cursor = conn.execute(
+            "SELECT smiles, lig_id, other_fields FROM ligands "
+            + "WHERE file_id = ? ORDER BY position",
+            (get_file_id(conn, get_file_name(output_directory, smi_file)),),
+        )
+        while True:
+            records = cursor.fetchmany(chunk_size)
+            if len(records) == 0:
+                break
+            yield [make_ligand_info(*record) for record in records]
+    finally:
+        conn.close()
+
+
+def has_ligand_list(output_directory, smi_file):
+    """
+    Check if a .smi file can be read from the generation store.
+
+    Inputs:
+    :param str output_directory: the output directory of the run
+    :param str smi_file: the path of the .smi file
+
+    Returns:
+    :returns: bool has_list: True if the store has an up-to-date copy
+    """
+
+    conn = open_store_if_has_file(output_directory, smi_file)
+    if conn is None:
+        return False
+
+    conn.close()
+    return True
+
+
+def get_ligand_list(output_directory, smi_file):
+    """
+    Get a saved list of ligands.
+
+    Inputs:
+    :param str output_directory: the output directory of the run
+    :param str smi_file: the path of the .smi file the list was saved as
+
+    Returns:
+    :returns: list ligand_list: a list of ligands, each a list of strings in
+        the same format as Ranking.get_usable_format(). Returns None if the
+        list isn't in the store.
+    """
+
+    if has_ligand_list(output_directory, smi_file) is False:
+        return None
+
+    ligand_list = []
+    for chunk in iter_ligand_list_chunks(output_directory, smi_file):
+        ligand_list.extend(chunk)
+
+    return ligand_list
+
+
+def get_ligands_by_smiles_and_id(output_directory, smi_file, smiles_id_pairs):
+    """
+    Look up ligands in a saved list by their SMILES string and ID. If a list
+    has a ligand more than once, the copy with the best (lowest) score is
+    returned.
+
+    Inputs:
+    :param str output_directory: the output directory of the run
+    :param str smi_file: the path of the .smi file the list was saved as
+    :param list smiles_id_pairs: a list of [SMILES, ID] to look up
+
+    Returns:
+    :returns: dict ligand_dict: dictionary with the SMILES string + ID as the
+        key and the ligand's information (a list of strings) as the item.
+        Ligands which aren't in the list are left out. Returns None if the
+        list isn't in the store.
+    """
+
+    conn = open_store_if_has_file(output_directory, smi_file)
+    if conn is None:
+        return None
+
+    ligand_dict = {}
+    try:
+        file_id = get_file_id(conn, get_file_name(output_directory, smi_file))
+        for smiles_id_pair in smiles_id_pairs:
+            smiles = str(smiles_id_pair[0])
+            lig_id = str(smiles_id_pair[1])
+            record = conn.execute(
+                "SELECT smiles, lig_id, other_fields FROM ligands "
+                + "WHERE file_id = ? AND smiles = ? AND lig_id = ? "
+                + "ORDER BY score, position LIMIT 1",
+                (file_id, smiles, lig_id),
+            ).fetchone()
+            if record is not None:
+                ligand_dict[smiles + lig_id] = make_ligand_info(*record)
+    finally:
+        conn.close()
+
+    return ligand_dict
+
+
+def get_scores(output_directory, smi_file):
+    """
+    Get the scores (part -2) of a saved list of ligands in the order they
+    were saved.
+
+    Inputs:
+    :param str output_directory: the output directory of the run
+    :param str smi_file: the path of the .smi file the list was saved as
+
+    Returns:
+    :returns: list scores: the score of every ligand. Returns None if the
+        list isn't in the store or a ligand has no score.
+    """
+
+    conn = open_store_if_has_file(output_directory, smi_file)
+    if conn is None:
+        return None
+
+    try:
+        file_id = get_file_id(conn, get_file_name(output_directory, smi_file))
+        scores = [
+            record[0]
+            for record in conn.execute(
+                "SELECT score FROM ligands WHERE file_id = ? ORDER BY position",
+                (file_id,),
+            )
+        ]
+    finally:
+        conn.close()
+
+    if None in scores:
+        return None
+    return scores
@@ -0,0 +1,117 @@
+"""
+job_costs.py estimates how long converting or docking a ligand will take, so
+the parallelizer can start the slowest jobs first.
+
+Gypsum-DL and docking times grow with the size and flexibility of a ligand,
+and can differ 10-100x between ligands in a generation. If a slow ligand is
+started last, every other processor sits idle while it finishes. The costs
+here are only used to order the jobs, so they only need to rank ligands
+roughly: the number of heavy atoms plus a weight for each rotatable bond
+(each rotatable bond is a torsion the docking search has to explore).
+"""
+import __future__
+
+import rdkit
+from rdkit import Chem
+from rdkit.Chem.rdMolDescriptors import CalcNumRotatableBonds
+
+# Disable the unnecessary RDKit warnings
+rdkit.RDLogger.DisableLog("rdApp.*")
+
+# How much a rotatable bond adds to a ligand's cost relative to a heavy atom
+ROTATABLE_BOND_COST = 5.0
+
+
+def get_ligand_cost(num_heavy_atoms, num_rotatable_bonds):
+    """
+    Estimate the relative cost of converting or docking a ligand.
+
+    Inputs:
+    :param int num_heavy_atoms: the number of heavy atoms in the ligand
+    :param int num_rotatable_bonds: the number of rotatable bonds (or
+        torsions) in the ligand
+
+    Returns:
+    :returns: float cost: the ligand's relative cost
+    """
+
+    return float(num_heavy_atoms) + ROTATABLE_BOND_COST * num_rotatable_bonds
+
+
+def get_smiles_cost(smiles):
+    """
+    Estimate the relative cost of converting or docking a ligand from its
+    SMILES string.
+
+    Inputs:
+    :param str smiles: the SMILES string of the ligand
+
+    Returns:
+    :returns: float cost: the ligand's relative cost. 0.0 if RDKit can't read
+        the SMILES, as the job will fail quickly.
+    """
+
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        return 0.0
+
+    return get_ligand_cost(mol.GetNumHeavyAtoms(), CalcNumRotatableBonds(mol))
+
+
+def get_smi_file_cost(smi_file):
+    """
+    Estimate the relative cost of converting or docking the ligands in a .smi
+    file.
+
+    Inputs:
+    :param str smi_file: the path of a .smi file
+
+    Returns:
+    :returns: float cost: the sum of the costs of the ligands in the file.
+        0.0 if the file can't be read.
+    """
+
+    cost = 0.0
+    try:
+        with open(smi_file, "r") as f:
+            for line in f:
+                line = line.replace("    ", "\t").strip()
+                if line == "":
+                    continue
+                cost = cost + get_smiles_cost(line.split("\t")[0])
+    except IOError:
+        return 0.0
+
+    return cost
+
+
+def get_pdbqt_cost(pdbqt_file):
+    """
+    Estimate the relative cost of docking a ligand from its .pdbqt file. The
+    heavy atoms are the ATOM and HETATM records which aren't hydrogens and
+    the rotatable bonds are taken from the TORSDOF record.
+
+    Inputs:
+    :param str pdbqt_file: the path of the ligand's .pdbqt file
+
+    Returns:
+    :returns: float cost: the ligand's relative cost. 0.0 if the file can't
+        be read.
+    """
+
+    num_heavy_atoms = 0
+    num_torsions = 0
+    try:
+        with open(pdbqt_file, "r") as f:
+            for line in f:
+                if line.startswith("ATOM") or line.startswith("HETATM"):
+                    # The AutoDock atom type is the last column
+                    atom_type = line.split()[-1]
+                    if atom_type not in ["H", "HD", "HS"]:
+                        num_heavy_atoms = num_heavy_atoms + 1
+                elif line.startswith("TORSDOF"):
+                    num_torsions = int(line.split()[1])
+    except (IOError, ValueError, IndexError):
+        return 0.0
+
+    return get_ligand_cost(num_heavy_atoms, num_torsions)
@@ -0,0 +1,471 @@
+"""
+stage_metrics.py records where the time goes in each generation, so settings
+like number_of_processors, the timeouts and gypsum_thoroughness can be tuned
+for a target from measurements.
+
+Two kinds of stages are recorded:
+    - Steps run in the main process (ie. populate_generation or
+        run_docking_common) are timed with time_stage() or timed_stage(). Each
+        records its wall time and the CPU time of the main process.
+    - Jobs run through the parallelizer (ie. each ligand docked) are run with
+        run_jobs(). The whole run is timed like a step, and each job is also
+        timed in the worker which runs it, so these stages also get the number
+        of jobs, the items in and out, the number of failures and the
+        distribution of the time each job took.
+
+At the end of each generation save_generation() writes
+generation_N_metrics.json and generation_N_metrics.csv to the generation
+folder.
+
+If profiling is turned on (--profile_stages) each job is also run under
+cProfile in its worker. The profiles of each stage are merged into
+profiles/{stage}.prof in the generation folder, which can be read with
+pstats (ie. python -m pstats profiles/docking.prof).
+
+Nothing is recorded unless start_generation() was called in this process.
+"""
+import __future__
+
+import cProfile
+import csv
+import functools
+import glob
+import itertools
+import json
+import os
+import pstats
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+PROFILE_FOLDER_NAME = "profiles"
+
+# The metrics of the generation being run. None if no generation was started
+# in this process.
+CURRENT_METRICS = None
+
+# Numbers the profiles written by this (worker) process
+PROFILE_COUNTER = itertools.count()
+
+LATENCY_PERCENTILES = [50, 90, 99]
+
+CSV_COLUMNS = [
+    "stage",
+    "calls",
+    "wall_time",
+    "cpu_time",
+    "jobs",
+    "items_in",
+    "items_out",
+    "failures",
+    "worker_wall_time",
+    "worker_cpu_time",
+    "latency_mean",
+    "latency_p50",
+    "latency_p90",
+    "latency_p99",
+    "latency_max",
+]
+
+
+class GenerationMetrics(object):
+    """
+    The metrics of every stage of a generation.
+    """
+
+    def __init__(self, generation_num, profile_dir=None):
+        """
+        Inputs:
+        :param int generation_num: the generation number
+        :param str profile_dir: the folder to write worker profiles to. None
+            if jobs shouldn't be profiled.
+        """
+
+        self.generation_num = generation_num
+        self.profile_dir = profile_dir
+        self.start_time = time.time()
+        self.stages = {}
+        self.stage_order = []
+
+    def get_stage(self, stage):
+        """
+        Get the metrics of a stage, adding the stage if it's new.
+
+        Inputs:
+        :param str stage: the name of the stage
+
+        Returns:
+        :returns: dict stage_metrics: the metrics of the stage
+        """
+
+        if stage not in self.stages:
+            self.stages[stage] = {
+                "calls": 0,
+                "wall_time": 0.0,
+                "cpu_time": 0.0,
+                "jobs": 0,
+                "items_in": 0,
+                "items_out": 0,
+                "failures": 0,
+                "job_wall_times": [],
+                "job_cpu_times": [],
+            }
+            self.stage_order.append(stage)
+
+        return self.stages[stage]
+
+    def add_time(self, stage, wall_time, cpu_time):
+        """
+        Add a call of a stage run in the main process.
+
+        Inputs:
+        :param str stage: the name of the stage
+        :param float wall_time: the wall time of the call in seconds
+        :param float cpu_time: the CPU time of the main process in seconds
+        """
+
+        stage_metrics = self.get_stage(stage)
+        stage_metrics["calls"] = stage_metrics["calls"] + 1
+        stage_metrics["wall_time"] = stage_metrics["wall_time"] + wall_time
+        stage_metrics["cpu_time"] = stage_metrics["cpu_time"] + cpu_time
+
+    def add_jobs(
+        self, stage, job_wall_times, job_cpu_times, items_in, items_out, failures
+    ):
+        """
+        Add the jobs of a stage run through the parallelizer.
+
+        Inputs:
+        :param str stage: the name of the stage
+        :param list job_wall_times: the wall time of each job in seconds
+        :param list job_cpu_times: the CPU time of each job in seconds
+        :param int items_in: the number of items (ie. ligands) in the jobs
+        :param int items_out: the number of items which didn't fail
+        :param int failures: the number of failures
+        """
+
+        stage_metrics = self.get_stage(stage)
+        stage_metrics["jobs"] = stage_metrics["jobs"] + len(job_wall_times)
+        stage_metrics["items_in"] = stage_metrics["items_in"] + items_in
+        stage_metrics["items_out"] = stage_metrics["items_out"] + items_out
+        stage_metrics["failures"] = stage_metrics["failures"] + failures
+        stage_metrics["job_wall_times"].extend(job_wall_times)
+        stage_metrics["job_cpu_times"].extend(job_cpu_times)
+
+    def get_summary(self):
+        """
+        Summarize the metrics of every stage.
+
+        Returns:
+        :returns: dict summary: the metrics of the generation, with the
+            latency distribution of each stage in place of the time of each
+            job
+        """
+
+        stages = {}
+        for stage in self.stage_order:
+            stage_metrics = self.stages[stage]
+            summary = {
+                key: value
+                for key, value in stage_metrics.items()
+                if key not in ["job_wall_times", "job_cpu_times"]
+            }
+            summary["worker_wall_time"] = float(sum(stage_metrics["job_wall_times"]))
+            summary["worker_cpu_time"] = float(sum(stage_metrics["job_cpu_times"]))
+            summary["latency"] = get_latency_distribution(
+                stage_metrics["job_wall_times"]
+            )
+            stages[stage] = summary
+
+        return {
+            "generation": self.generation_num,
+            "wall_time": time.time() - self.start_time,
+            "stages": stages,
+        }
+
+
+def get_latency_distribution(latencies):
+    """
+    Summarize the distribution of job times.
+
+    Inputs:
+    :param list latencies: the wall time of each job in seconds
+
+    Returns:
+    :returns: dict distribution: the mean, max and percentiles of the job
+        times. Empty if there were no jobs.
+    """
+
+    if len(latencies) == 0:
+        return {}
+
+    latencies = np.array(latencies, dtype=np.float64)
+    distribution = {"mean": float(latencies.mean())}
+    for percentile in LATENCY_PERCENTILES:
+        distribution["p{}".format(percentile)] = float(
+            np.percentile(latencies, percentile)
+        )
+    distribution["max"] = float(latencies.max())
+
+    return distribution
+
+
+#######
+def start_generation(generation_num, gen_dir, profile_stages=False):
+    """
+    Start recording the metrics of a generation in this process.
+
+    Inputs:
+    :param int generation_num: the generation number
+    :param str gen_dir: the path of the generation folder
+    :param bool profile_stages: if True run each job under cProfile
+    """
+
+    global CURRENT_METRICS
+
+    profile_dir = None
+    if profile_stages is True:
+        profile_dir = os.path.abspath(os.path.join(gen_dir, PROFILE_FOLDER_NAME))
+        if os.path.isdir(profile_dir) is False:
+            os.makedirs(profile_dir)
+
+    CURRENT_METRICS = GenerationMetrics(generation_num, profile_dir)
+
+
+def save_generation(gen_dir):
+    """
+    Write the metrics of the current generation to
+    generation_N_metrics.json and generation_N_metrics.csv in the generation
+    folder, and stop recording.
+
+    Inputs:
+    :param str gen_dir: the path of the generation folder
+
+    Returns:
+    :returns: str json_file: the path of the .json file. None if no
+        generation was started.
+    """
+
+    global CURRENT_METRICS
+
+    if CURRENT_METRICS is None:
+        return None
+
+    summary = CURRENT_METRICS.get_summary()
+    CURRENT_METRICS = None
+
+    file_name = os.path.join(
+        gen_dir, "generation_{}_metrics".format(summary["generation"])
+    )
+    with open(file_name + ".json", "w") as f:
+        json.dump(summary, f, indent=4)
+
+    with open(file_name + ".csv", "w") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for stage, stage_summary in summary["stages"].items():
+            row = [stage]
+            for column in CSV_COLUMNS[1:]:
+                if column.startswith("latency_"):
+                    value = stage_summary["latency"].get(column.split("_")[1], "")
+                else:
+                    value = stage_summary[column]
+                row.append(value)
+            writer.writerow(row)
+
+    return file_name + ".json"
+
+
+#######
+@contextmanager
+def time_stage(stage):
+    """
+    Time a step run in the main process.
+
+        ie) with StageMetrics.time_stage("rank_and_save_output_smi"):
+                ...
+
+    Inputs:
+    :param str stage: the name of the stage
+    """
+
+    metrics = CURRENT_METRICS
+    start_wall_time = time.time()
+    start_cpu_time = time.process_time()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.add_time(
+                stage,
+                time.time() - start_wall_time,
+                time.process_time() - start_cpu_time,
+            )
+
+
+def timed_stage(stage):
+    """
+    Decorate a function so every call is timed as a stage. See time_stage().
+
+    Inputs:
+    :param str stage: the name of the stage
+
+    Returns:
+    :returns: function decorator: the decorator
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with time_stage(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+#######
+class TimedJob(object):
+    """
+    Runs a job function and returns its result with how long it took. This
+    is what is sent to the workers in place of the job function, so it must
+    be picklable (ie. func must be a module level function).
+    """
+
+    def __init__(self, func, stage, profile_dir=None):
+        """
+        Inputs:
+        :param python_obj func: the job function
+        :param str stage: the name of the stage
+        :param str profile_dir: the folder to write profiles to. None if the
+            job shouldn't be profiled.
+        """
+
+        self.func = func
+        self.stage = stage
+        self.profile_dir = profile_dir
+
+    def __call__(self, *args, **kwargs):
+        """
+        Run the job.
+
+        Returns:
+        :returns: tuple timed_result: (the result of the job, the wall time
+            of the job, the CPU time of the job)
+        """
+
+        profiler = None
+        if self.profile_dir is not None:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        start_wall_time = time.time()
+        start_cpu_time = time.process_time()
+        try:
+            result = self.func(*args, **kwargs)
+        finally:
+            wall_time = time.time() - start_wall_time
+            cpu_time = time.process_time() - start_cpu_time
+            if profiler is not None:
+                profiler.disable()
+                profile_file = "{}_{}_{}.prof.part".format(
+                    self.stage, os.getpid(), next(PROFILE_COUNTER)
+                )
+                profiler.dump_stats(os.path.join(self.profile_dir, profile_file))
+
+        return result, wall_time, cpu_time
+
+
+def merge_worker_profiles(profile_dir, stage):
+    """
+    Merge the profiles of a stage's jobs, written by the workers, into
+    {profile_dir}/{stage}.prof and delete them.
+
+    Inputs:
+    :param str profile_dir: the folder profiles are written to
+    :param str stage: the name of the stage
+    """
+
+    part_files = glob.glob(os.path.join(profile_dir, stage + "_*.prof.part"))
+    if len(part_files) == 0:
+        return
+
+    stage_file = os.path.join(profile_dir, stage + ".prof")
+    profile_files = list(part_files)
+    if os.path.exists(stage_file) is True:
+        profile_files.append(stage_file)
+
+    stats = pstats.Stats(*profile_files)
+    stats.dump_stats(stage_file)
+    for part_file in part_files:
+        os.unlink(part_file)
+
+
+#######
+def run_jobs(
+    parallelizer,
+    stage,
+    job_input,
+    func,
+    count_failures=None,
+    count_items=None,
+    **run_kwargs
+):
+    """
+    Run jobs through the parallelizer and record the time each job took.
+    This takes the same inputs as Parallelizer.run and returns the same
+    results.
+
+    Inputs:
+    :param Parallelizer_obj parallelizer: a paralellizer object used to
+        multiprocess.
+    :param str stage: the name of the stage
+    :param tuple job_input: the args of each job
+    :param python_obj func: the job function
+    :param python_obj count_failures: a function which takes the result of a
+        job and returns the number of failures in it (a bool is fine). If
+        None no failures are counted.
+    :param python_obj count_items: a function which takes the args of a job
+        and returns the number of items (ie. ligands) in it. If None each job
+        is one item.
+    :param run_kwargs: any other keyword arguments of Parallelizer.run (ie.
+        shared_kwargs or job_cost_func)
+
+    Returns:
+    :returns: list results: the result of each job
+    """
+
+    metrics = CURRENT_METRICS
+    if metrics is None:
+        return parallelizer.run(job_input, func, **run_kwargs)
+
+    with time_stage(stage):
+        timed_results = parallelizer.run(
+            job_input, TimedJob(func, stage, metrics.profile_dir), **run_kwargs
+        )
+
+    results = [x[0] for x in timed_results]
+    items_in = 0
+    failures = 0
+    for args, result in zip(job_input, results):
+        if count_items is None:
+            items_in = items_in + 1
+        else:
+            items_in = items_in + int(count_items(*args))
+        if count_failures is not None:
+            failures = failures + int(count_failures(result))
+
+    metrics.add_jobs(
+        stage,
+        [x[1] for x in timed_results],
+        [x[2] for x in timed_results],
+        items_in,
+        max(items_in - failures, 0),
+        failures,
+    )
+    if metrics.profile_dir is not None:
+        merge_worker_profiles(metrics.profile_dir, stage)
+
+    return results
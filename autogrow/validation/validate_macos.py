@@ -15,7 +15,8 @@ def run_macos_notarization(params):
     """
     if (
         sys.platform.lower() != "darwin"
-        or params["dock_choice"] not in ["VinaDocking", "QuickVina2Docking"]
+        or params["dock_choice"]
+        not in ["VinaDocking", "QuickVina2Docking", "VinaPersistentDocking"]
     ):
         return
 